@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Member, Author, Book, Category, Borrow, Reservation
+from .models import Member, Author, Book, Category, Borrow, BorrowArchive, Reservation, BookNeighbor,\
+    Branch, BookCopy, BranchAvailability, ChangeEvent, ChangeConsumer
 from django.utils.translation import gettext_lazy as _
 
 
@@ -29,6 +30,13 @@ class MemberAdmin(UserAdmin):
 
 admin.site.register(Author)
 admin.site.register(Book)
+admin.site.register(Branch)
+admin.site.register(BookCopy)
+admin.site.register(BranchAvailability)
 admin.site.register(Category)
 admin.site.register(Borrow)
-admin.site.register(Reservation)
\ No newline at end of file
+admin.site.register(BorrowArchive)
+admin.site.register(Reservation)
+admin.site.register(BookNeighbor)
+admin.site.register(ChangeEvent)
+admin.site.register(ChangeConsumer)
\ No newline at end of file
@@ -0,0 +1,250 @@
+"""
+Live ``available_copies`` updates pushed to kiosk and OPAC screens over
+Server-Sent Events.
+
+``availability_stream`` is a plain ASGI app mounted by
+``library_management/asgi.py`` in front of Django, so thousands of mostly idle
+connections don't each hold a Django request and middleware stack. Each
+connection subscribes to a set of book ids on the process-wide
+``AvailabilityBroadcaster``, which fans events out to per-connection queues.
+
+Where events come from is decided by ``AVAILABILITY_EVENTS_BACKEND``:
+
+- ``InProcessBackend`` delivers what the borrow and return views publish in the
+  same process. Good for a single ASGI worker.
+- ``ChangeFeedBackend`` tails the ``ChangeEvent`` outbox instead, so every
+  worker (and WSGI processes that only write) shares the same events.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from .models import Book, ChangeEvent
+from .outbox import changes_since, sequence_events
+
+
+logger = logging.getLogger(__name__)
+
+MAX_BOOKS_PER_STREAM = 100
+QUEUE_SIZE = 100
+
+
+def database_sync_to_async(func):
+    """
+    ``sync_to_async`` for ORM calls made outside Django's request cycle.
+
+    Nothing else recycles the worker thread's connection here, so stale or
+    broken connections are dropped before and after each call, as
+    ``request_started`` and ``request_finished`` would for a view.
+    """
+    def call(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(call)
+
+
+class BaseBackend:
+    """Moves availability events from the code that changes counters to the broadcaster."""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    def publish(self, book_id, available_copies):
+        """Called from synchronous request code, possibly in another thread."""
+        raise NotImplementedError
+
+    async def run(self):
+        """Background task started with the first subscriber, for backends that poll."""
+
+
+class InProcessBackend(BaseBackend):
+    def publish(self, book_id, available_copies):
+        loop = self.broadcaster.loop
+        if loop is None or loop.is_closed():
+            return  # nobody in this process is listening
+        loop.call_soon_threadsafe(self.broadcaster.dispatch, book_id, available_copies)
+
+
+class ChangeFeedBackend(BaseBackend):
+    """Polls the change feed for book updates written by any process."""
+
+    def publish(self, book_id, available_copies):
+        pass  # the views already wrote the book's ChangeEvent
+
+    async def run(self):
+        cursor = None
+        while True:
+            try:
+                if cursor is None:
+                    cursor = await database_sync_to_async(sequence_events)()
+                events = await database_sync_to_async(changes_since)(cursor, 1000, 'book')
+            except Exception:
+                logger.exception("Polling the change feed for availability events failed")
+                events = []
+            for event in events:
+                if event.payload and event.operation == ChangeEvent.UPDATED:
+                    self.broadcaster.dispatch(event.entity_id, event.payload['available_copies'])
+            if events:
+                cursor = events[-1].position
+            if len(events) < 1000:
+                await asyncio.sleep(settings.AVAILABILITY_EVENTS_POLL_SECONDS)
+
+
+class AvailabilityBroadcaster:
+    """
+    Fans availability events out to subscriber queues. All methods except
+    ``publish`` must run on the event loop that serves the streams.
+    """
+
+    def __init__(self, backend_class):
+        self.backend = backend_class(self)
+        self.loop = None
+        self.subscribers = {}
+        self._backend_task = None
+
+    def publish(self, book_id, available_copies):
+        self.backend.publish(book_id, available_copies)
+
+    def subscribe(self, book_ids):
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.get_running_loop()
+            self._backend_task = None
+        if self._backend_task is not None and self._backend_task.done() and (
+            self._backend_task.cancelled() or self._backend_task.exception() is not None
+        ):
+            if not self._backend_task.cancelled():
+                logger.error("The availability events backend stopped and is being restarted",
+                             exc_info=self._backend_task.exception())
+            self._backend_task = None
+        if self._backend_task is None:
+            self._backend_task = self.loop.create_task(self.backend.run())
+
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for book_id in book_ids:
+            self.subscribers.setdefault(book_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue, book_ids):
+        for book_id in book_ids:
+            queues = self.subscribers.get(book_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[book_id]
+
+    def dispatch(self, book_id, available_copies):
+        for queue in self.subscribers.get(book_id, ()):
+            if queue.full():
+                # A slow client only needs the latest count; drop the oldest.
+                queue.get_nowait()
+            queue.put_nowait((book_id, available_copies))
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = AvailabilityBroadcaster(import_string(settings.AVAILABILITY_EVENTS_BACKEND))
+    return _broadcaster
+
+
+def publish_availability(book):
+    """Sends ``book.available_copies`` to stream subscribers once the current transaction commits."""
+    book_id, available_copies = book.pk, book.available_copies
+    transaction.on_commit(lambda: get_broadcaster().publish(book_id, available_copies))
+
+
+def _snapshot(book_ids):
+    return dict(Book.objects.filter(id__in=book_ids).values_list('id', 'available_copies'))
+
+
+def _event(book_id, available_copies):
+    data = json.dumps({'book': book_id, 'available_copies': available_copies})
+    return f"event: availability\ndata: {data}\n\n".encode()
+
+
+async def _respond(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def availability_stream(scope, receive, send):
+    """
+    ASGI app serving `GET ?ids=1,2,3` as a text/event-stream.
+
+    Sends the current count of each requested book, then an `availability`
+    event whenever one changes, with a comment line every
+    `AVAILABILITY_STREAM_HEARTBEAT_SECONDS` to keep proxies from closing the
+    connection.
+    """
+    if scope['method'] != 'GET':
+        await _respond(send, 405, {'detail': 'Method not allowed.'})
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    try:
+        book_ids = sorted({int(value) for raw in query.get('ids', []) for value in raw.split(',') if value})
+    except ValueError:
+        book_ids = None
+    if not book_ids or len(book_ids) > MAX_BOOKS_PER_STREAM:
+        await _respond(send, 400, {
+            'detail': f'Pass between 1 and {MAX_BOOKS_PER_STREAM} book ids as ?ids=1,2,3.'
+        })
+        return
+
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe(book_ids)
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    disconnect = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        snapshot = await database_sync_to_async(_snapshot)(book_ids)
+        body = b''.join(_event(book_id, count) for book_id, count in sorted(snapshot.items()))
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        heartbeat = settings.AVAILABILITY_STREAM_HEARTBEAT_SECONDS
+        while True:
+            try:
+                async with asyncio.timeout(heartbeat):
+                    messages = [await queue.get()]
+            except TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                continue
+            # Send everything that queued up while this connection was waiting in one write.
+            while not queue.empty():
+                messages.append(queue.get_nowait())
+            if None in messages:
+                break
+            body = b''.join(_event(*message) for message in messages)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broadcaster.unsubscribe(queue, book_ids)
+        disconnect.cancel()
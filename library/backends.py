@@ -0,0 +1,102 @@
+"""
+Authentication backend that keeps password hashing off the request threads.
+
+Password hashes are deliberately expensive, so a burst of logins (term start,
+say) can use every core and starve the circulation endpoints. This backend
+runs hashing on a small, bounded thread pool. The argon2, scrypt and PBKDF2
+implementations release the GIL, so at most ``PASSWORD_HASHING_WORKERS`` cores
+go to logins. A login that finds ``PASSWORD_HASHING_MAX_PENDING`` hashes
+already queued is turned away at once instead of waiting for a slot: with 429
+from the JWT login, or as a failed login for other callers of
+``authenticate()`` such as the admin login form.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.exceptions import PermissionDenied
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+# Seconds sent as Retry-After when the hashing queue is full.
+RETRY_AFTER = 1
+
+
+class LoginCapacityExceeded(Throttled):
+    default_detail = 'Too many logins are being processed. Please try again shortly.'
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _pool = (
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing'),
+                threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_MAX_PENDING),
+            )
+        return _pool
+
+
+def run_hashing(func, *args):
+    """
+    Runs ``func(*args)`` on the hashing pool and waits for its result. Raises
+    ``LoginCapacityExceeded`` straight away if the pool's queue is full.
+    """
+    executor, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise LoginCapacityExceeded(wait=RETRY_AFTER)
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+class BoundedHashingBackend(ModelBackend):
+    """
+    ``ModelBackend`` that verifies, and when needed upgrades, password hashes on
+    the bounded hashing pool. Only the CPU-bound hashing runs in the pool; the
+    user lookup and any save stay on the request thread and its connection.
+    """
+
+    def hash(self, request, func, *args):
+        try:
+            return run_hashing(func, *args)
+        except LoginCapacityExceeded:
+            if isinstance(request, Request):
+                raise
+            # authenticate() only handles PermissionDenied; anything else
+            # would turn an admin login during a spike into a 500.
+            raise PermissionDenied(LoginCapacityExceeded.default_detail)
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown accounts take as long as known ones (Django #20760).
+            self.hash(request, make_password, password)
+            return None
+
+        is_correct, must_update = self.hash(request, verify_password, password, user.password)
+        if not is_correct:
+            return None
+
+        if must_update:
+            # The stored hash uses another hasher or older parameters.
+            user.password = self.hash(request, make_password, password)
+            user.save(update_fields=['password'])
+
+        return user if self.user_can_authenticate(user) else None
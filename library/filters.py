@@ -0,0 +1,56 @@
+import django_filters
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Concat
+from .models import Author, Book, BranchAvailability
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    """Accepts a comma separated list of numbers, e.g. `?ids=1,2,3`."""
+
+
+class BookFilterSet(django_filters.FilterSet):
+    """
+    Filters for the book catalogue.
+
+    Author filters are applied as `EXISTS` subqueries instead of joins across
+    the authors many-to-many table, so a book matching several of its authors
+    is still returned once and no `distinct()` is needed.
+    """
+    ids = NumberInFilter(field_name='id')
+    isbn = django_filters.CharFilter(field_name='isbn')
+    available = django_filters.BooleanFilter(method='filter_available')
+    branch = django_filters.NumberFilter(method='filter_branch')
+    category_ids = NumberInFilter(field_name='category_id')
+    category__name = django_filters.CharFilter(field_name='category__name')
+    author_ids = NumberInFilter(method='filter_author_ids')
+    author_name = django_filters.CharFilter(method='filter_author_name')
+    authors__first_name = django_filters.CharFilter(method='filter_author_field')
+    authors__last_name = django_filters.CharFilter(method='filter_author_field')
+
+    class Meta:
+        model = Book
+        fields = []
+
+    def _with_author(self, queryset, authors):
+        return queryset.filter(Exists(authors.filter(book=OuterRef('pk'))))
+
+    def filter_available(self, queryset, name, value):
+        if value:
+            return queryset.filter(available_copies__gt=0)
+        return queryset.filter(available_copies__lte=0)
+
+    def filter_branch(self, queryset, name, value):
+        """Books with a copy on the shelf at the given branch."""
+        on_shelf = BranchAvailability.objects.filter(book=OuterRef('pk'), branch_id=value, available_copies__gt=0)
+        return queryset.filter(Exists(on_shelf))
+
+    def filter_author_ids(self, queryset, name, value):
+        return self._with_author(queryset, Author.objects.filter(id__in=value))
+
+    def filter_author_name(self, queryset, name, value):
+        authors = Author.objects.annotate(full_name=Concat('first_name', Value(' '), 'last_name'))
+        return self._with_author(queryset, authors.filter(full_name__icontains=value.strip()))
+
+    def filter_author_field(self, queryset, name, value):
+        field = name.split('__', 1)[1]
+        return self._with_author(queryset, Author.objects.filter(**{field: value}))
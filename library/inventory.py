@@ -0,0 +1,142 @@
+"""
+Copy-level inventory operations.
+
+Every change to a ``BookCopy`` status goes through here so that the per-branch
+``BranchAvailability`` counters move with it. Counters are updated with ``F()``
+expressions rather than read-modify-write, and checkouts lock the chosen copy
+with ``SKIP LOCKED`` so concurrent borrows of the same title pick different
+copies instead of queueing on one row.
+
+For books with tracked copies the ``Book`` totals are not touched here: they
+are rolled up from the branch counters by ``refresh_book_totals`` after the
+borrow or return has committed, so borrows at different branches don't hold
+the book's row lock for the length of their transactions. Books stocked only
+through their scalar counts keep updating ``Book`` directly.
+
+All functions must be called inside a transaction.
+"""
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+from .models import Book, BookCopy, Borrow, BranchAvailability
+
+
+def _adjust_counters(book_id, branch_id, available=0, total=0):
+    changes = {}
+    if available:
+        changes['available_copies'] = F('available_copies') + available
+    if total:
+        changes['total_copies'] = F('total_copies') + total
+
+    if branch_id is None:
+        Book.objects.filter(pk=book_id).update(**changes)
+    else:
+        BranchAvailability.objects.filter(book_id=book_id, branch_id=branch_id).update(**changes)
+
+
+def refresh_book_totals(book_id):
+    """
+    Sets the ``Book`` totals of a book with tracked copies to the sum of its
+    branch counters. Call it in a transaction of its own, after the one that
+    changed the counters has committed: the book row is locked before the
+    counters are summed, so of several concurrent refreshes the last one sees
+    every committed change. Returns the updated book, or None if it no longer
+    exists.
+    """
+    book = Book.objects.select_for_update().filter(pk=book_id).first()
+    if book is None:
+        return None
+    totals = BranchAvailability.objects.filter(book_id=book_id).aggregate(
+        total=Coalesce(Sum('total_copies'), 0),
+        available=Coalesce(Sum('available_copies'), 0),
+    )
+    book.total_copies, book.available_copies = totals['total'], totals['available']
+    Book.objects.filter(pk=book_id).update(total_copies=book.total_copies, available_copies=book.available_copies)
+    return book
+
+
+def checkout(book, branch=None):
+    """
+    Takes an available copy of ``book`` off the shelf, from ``branch`` if given.
+
+    Returns the copy, or None for books whose copies are not tracked
+    individually, in which case ``Book.available_copies`` is decremented.
+    Raises a ValidationError when nothing is available.
+    """
+    copies = BookCopy.objects.filter(book=book, status=BookCopy.AVAILABLE)
+    if branch is not None:
+        copies = copies.filter(branch=branch)
+
+    copy = copies.select_for_update(skip_locked=True).order_by('id').first()
+    if copy is not None:
+        BookCopy.objects.filter(pk=copy.pk).update(status=BookCopy.ON_LOAN)
+        copy.status = BookCopy.ON_LOAN
+        _adjust_counters(book.pk, copy.branch_id, available=-1)
+        return copy
+
+    if branch is None and not BookCopy.objects.filter(book=book).exists():
+        if Book.objects.filter(pk=book.pk, available_copies__gt=0)\
+                .update(available_copies=F('available_copies') - 1):
+            return None
+
+    if branch is not None:
+        raise serializers.ValidationError({"detail": f"No copies available for borrowing at {branch.name}."})
+    raise serializers.ValidationError({"detail": "No copies available for borrowing."})
+
+
+def checkin(borrow):
+    """Puts the copy of a returned ``borrow`` back on the shelf."""
+    branch_id = None
+    if borrow.copy_id is not None:
+        copies = BookCopy.objects.filter(pk=borrow.copy_id)
+        branch_id = copies.values_list('branch_id', flat=True).first()
+        copies.update(status=BookCopy.AVAILABLE)
+    _adjust_counters(borrow.book_id, branch_id, available=1)
+
+
+def _track_existing_copies(book, branch_id):
+    """
+    Turns the scalar counts of a book stocked before its copies were tracked
+    into ``BookCopy`` rows at ``branch_id``, as migration 0005 did for books
+    that existed then, and links its open borrows to the copies on loan.
+    """
+    available = max(0, min(book.available_copies, book.total_copies))
+    on_loan = book.total_copies - available
+    BookCopy.objects.bulk_create(
+        [BookCopy(book=book, branch_id=branch_id, status=BookCopy.AVAILABLE) for _ in range(available)]
+        + [BookCopy(book=book, branch_id=branch_id, status=BookCopy.ON_LOAN) for _ in range(on_loan)]
+    )
+    BranchAvailability.objects.update_or_create(
+        book=book, branch_id=branch_id,
+        defaults={'total_copies': book.total_copies, 'available_copies': available},
+    )
+
+    copy_ids = BookCopy.objects.filter(book=book, status=BookCopy.ON_LOAN).order_by('id').values_list('id', flat=True)
+    borrows = list(Borrow.objects.filter(book=book, return_date__isnull=True, copy__isnull=True).order_by('id'))
+    for borrow, copy_id in zip(borrows, copy_ids):
+        borrow.copy_id = copy_id
+    Borrow.objects.bulk_update(borrows[:on_loan], ['copy'])
+
+
+def add_copy(copy):
+    """
+    Counts a newly created, available ``copy`` in its branch totals.
+
+    The first copy added to a book that was stocked through its scalar counts
+    brings the existing stock under tracking at the same branch, so the
+    counts stay right and later borrows can find those copies.
+    """
+    book = Book.objects.select_for_update().get(pk=copy.book_id)
+    if book.total_copies and not BookCopy.objects.filter(book=book).exclude(pk=copy.pk).exists():
+        _track_existing_copies(book, copy.branch_id)
+
+    BranchAvailability.objects.get_or_create(book_id=copy.book_id, branch_id=copy.branch_id)
+    _adjust_counters(copy.book_id, copy.branch_id, available=1, total=1)
+
+
+def remove_copy(copy):
+    """Deletes a copy that is on the shelf and takes it out of the totals."""
+    deleted, _ = BookCopy.objects.filter(pk=copy.pk, status=BookCopy.AVAILABLE).delete()
+    if not deleted:
+        raise serializers.ValidationError({"detail": "Copies on loan cannot be removed."})
+    _adjust_counters(copy.book_id, copy.branch_id, available=-1, total=-1)
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from library.models import Borrow, BorrowArchive
+
+
+ARCHIVED_FIELDS = ['id', 'member_id', 'book_id', 'copy_id', 'borrow_date', 'due_date', 'return_date']
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves returned borrows older than the configured age from the Borrow table "
+        "into BorrowArchive. Each batch is committed on its own, so an interrupted run "
+        "can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.BORROW_ARCHIVE_AFTER_DAYS,
+            help='Archive borrows returned more than this many days ago.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be moved.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        cutoff = date.today() - timedelta(days=options['days'])
+        candidates = Borrow.objects.filter(return_date__isnull=False, return_date__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"{candidates.count()} borrows returned before {cutoff} would be archived.")
+            return
+
+        moved = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    candidates.filter(id__gt=last_id)
+                    .order_by('id')
+                    .select_for_update()
+                    .values(*ARCHIVED_FIELDS)[:options['batch_size']]
+                )
+                if not rows:
+                    break
+
+                ids = [row['id'] for row in rows]
+                # ignore_conflicts keeps a re-run idempotent if a previous run
+                # died between the insert and the delete of the same batch.
+                BorrowArchive.objects.bulk_create(
+                    [BorrowArchive(**row) for row in rows], ignore_conflicts=True
+                )
+                Borrow.objects.filter(id__in=ids).delete()
+
+            moved += len(rows)
+            last_id = ids[-1]
+            self.stdout.write(f"Archived {moved} borrows (up to id {last_id}).")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {moved} borrows returned before {cutoff} archived."))
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks password verification, the CPU-bound part of a login, for the "
+        "configured hashers. Reports logins per second and per CPU-second at "
+        "several worker counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', action='append', dest='hashers',
+            help='Hasher algorithm to measure (argon2, scrypt, pbkdf2_sha256, ...). '
+                 'Repeat for several; defaults to every hasher in PASSWORD_HASHERS.'
+        )
+        parser.add_argument('--logins', type=int, default=50, help='Verifications per measurement.')
+        parser.add_argument(
+            '--workers', type=int, action='append',
+            help='Concurrent verifications. Repeat for several; defaults to 1 and '
+                 'PASSWORD_HASHING_WORKERS.'
+        )
+
+    def measure(self, hasher, encoded, logins, workers):
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda _: hasher.verify('correct horse', encoded), range(logins)))
+        wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+        if not all(results):
+            raise CommandError(f"{hasher.algorithm} failed to verify its own hash.")
+        return wall, cpu
+
+    def handle(self, *args, **options):
+        algorithms = options['hashers'] or [hasher.algorithm for hasher in get_hashers()]
+        worker_counts = sorted(set(options['workers'] or [1, settings.PASSWORD_HASHING_WORKERS]))
+
+        self.stdout.write(f"{os.cpu_count()} CPUs, {options['logins']} logins per measurement")
+        self.stdout.write(f"{'hasher':<16}{'workers':>8}{'logins/s':>12}{'logins/cpu-s':>14}{'ms/login':>10}")
+        for algorithm in algorithms:
+            try:
+                hasher = get_hasher(algorithm)
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+            encoded = hasher.encode('correct horse', hasher.salt())
+
+            for workers in worker_counts:
+                wall, cpu = self.measure(hasher, encoded, options['logins'], workers)
+                self.stdout.write(
+                    f"{algorithm:<16}{workers:>8}{options['logins'] / wall:>12.1f}"
+                    f"{options['logins'] / cpu:>14.1f}{cpu / options['logins'] * 1000:>10.1f}"
+                )
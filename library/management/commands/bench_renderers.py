@@ -0,0 +1,124 @@
+import gzip
+import random
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from library.models import Author, Book, Borrow, Category, Member
+from library.renderers import FastJSONRenderer, orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+BIOGRAPHY_SENTENCES = [
+    "{name} was born in {year} and grew up in a small coastal town.",
+    "Before writing full time, {name} worked as a schoolteacher, translator and newspaper columnist.",
+    "The first novel appeared in {year2} and was shortlisted for several prizes.",
+    "Later books moved between historical fiction and essays on libraries and reading.",
+    "{name} has been translated into {languages} languages.",
+    "A collection of letters was published posthumously by the family.",
+    "Recurring themes include migration, memory and the history of the printed book.",
+    "{name} taught creative writing at a university for {years} years.",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares JSON rendering time and bytes on the wire (identity, gzip, brotli) "
+        "for list pages of /books/ and /borrows/. Sample data is created in a "
+        "transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50, help='Renders per measurement.')
+
+    def biography(self, rng, i):
+        sentences = rng.sample(BIOGRAPHY_SENTENCES, k=6)
+        return ' '.join(sentences).format(
+            name=f'Author {i}', year=rng.randint(1900, 1990), year2=rng.randint(1930, 2020),
+            languages=rng.randint(2, 40), years=rng.randint(2, 30),
+        )
+
+    def create_sample_data(self, rows):
+        rng = random.Random(0)
+        category = Category.objects.create(name='Benchmark')
+        authors = Author.objects.bulk_create([
+            Author(first_name='Author', last_name=str(i), biography=self.biography(rng, i))
+            for i in range(rows)
+        ])
+        books = Book.objects.bulk_create([
+            Book(title=f'Benchmark book {i}', isbn=f'{i:013d}', category=category,
+                 total_copies=5, available_copies=4)
+            for i in range(rows)
+        ])
+        through = Book.authors.through
+        through.objects.bulk_create([
+            through(book=book, author=authors[(i + offset) % rows])
+            for i, book in enumerate(books) for offset in range(2)
+        ])
+        admin = Member.objects.create(
+            email='bench-renderers@example.com', first_name='Bench', last_name='Admin', is_staff=True
+        )
+        today = timezone.now().date()
+        Borrow.objects.bulk_create([
+            Borrow(member=admin, book=book, borrow_date=today, due_date=today + timedelta(days=14))
+            for book in books
+        ])
+        return admin
+
+    def measure(self, renderer, data):
+        started = time.perf_counter()
+        for _ in range(self.repeat):
+            body = renderer.render(data, 'application/json')
+        return body, (time.perf_counter() - started) / self.repeat
+
+    def handle(self, *args, **options):
+        if not 1 <= options['page_size'] <= 100:
+            raise CommandError('--page-size must be between 1 and 100.')
+        self.repeat = options['repeat']
+
+        self.stdout.write(
+            f"orjson {'available' if orjson else 'missing'}, brotli {'available' if brotli else 'missing'}, "
+            f"{options['page_size']} rows per page, {self.repeat} renders per measurement"
+        )
+        self.stdout.write(
+            f"{'endpoint':<10}{'renderer':<18}{'ms':>8}{'bytes':>10}{'gzip':>9}{'gzip ms':>9}"
+            f"{'br':>9}{'br ms':>8}"
+        )
+        with transaction.atomic():
+            client = APIClient(HTTP_HOST='127.0.0.1')
+            client.force_authenticate(self.create_sample_data(options['page_size']))
+
+            for endpoint in ('/books/', '/borrows/'):
+                response = client.get(endpoint, {'page_size': options['page_size']})
+                if response.status_code != 200:
+                    raise CommandError(f"{endpoint} returned {response.status_code}.")
+                bodies = []
+                for renderer in (JSONRenderer(), FastJSONRenderer()):
+                    body, seconds = self.measure(renderer, response.data)
+                    bodies.append(body)
+                    self.stdout.write(
+                        f"{endpoint:<10}{type(renderer).__name__:<18}{seconds * 1000:>8.2f}{len(body):>10}"
+                        + self.compressed(body)
+                    )
+                if bodies[0] != bodies[1]:
+                    raise CommandError(f"The renderers produced different output for {endpoint}.")
+            transaction.set_rollback(True)
+
+    def compressed(self, body):
+        started = time.perf_counter()
+        gzipped = gzip.compress(body, compresslevel=6)
+        row = f"{len(gzipped):>9}{(time.perf_counter() - started) * 1000:>9.2f}"
+        if brotli is not None:
+            started = time.perf_counter()
+            compressed = brotli.compress(body, quality=settings.API_COMPRESSION_BROTLI_QUALITY)
+            row += f"{len(compressed):>9}{(time.perf_counter() - started) * 1000:>8.2f}"
+        return row
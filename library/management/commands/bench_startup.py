@@ -0,0 +1,92 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter: imports the WSGI app the way the serverless
+# runtime does and serves a single request through it.
+CHILD_SCRIPT = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+started = time.perf_counter()
+from library_management.wsgi import app
+loaded = time.perf_counter()
+
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': sys.argv[2]}
+setup_testing_defaults(environ)
+status = []
+body = b''.join(app(environ, lambda s, h, exc_info=None: status.append(s)))
+responded = time.perf_counter()
+
+print(json.dumps({
+    'status': status[0],
+    'import_seconds': loaded - started,
+    'first_response_seconds': responded - loaded,
+    'modules': len(sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures time-to-first-response of the WSGI app from a fresh Python "
+        "interpreter, to track cold start regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/', help='Path of the first request.')
+        parser.add_argument('--host', default=settings.ALLOWED_HOSTS[-1] if settings.ALLOWED_HOSTS else 'localhost')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON.')
+
+    def run_once(self, path, host):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, path, host],
+            capture_output=True, text=True, env=os.environ.copy(), cwd=settings.BASE_DIR,
+        )
+        total = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(f"Startup run failed:\n{result.stderr}")
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample['total_seconds'] = total
+        return sample
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be positive.')
+
+        samples = [self.run_once(options['path'], options['host']) for _ in range(options['runs'])]
+
+        summary = {
+            'path': options['path'],
+            'runs': len(samples),
+            'status': samples[-1]['status'],
+            'modules': samples[-1]['modules'],
+        }
+        for key in ('total_seconds', 'import_seconds', 'first_response_seconds'):
+            values = [sample[key] for sample in samples]
+            summary[key] = {
+                'median': statistics.median(values),
+                'min': min(values),
+                'max': max(values),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary))
+            return
+
+        self.stdout.write(f"GET {summary['path']} -> {summary['status']}, {summary['runs']} runs, "
+                          f"{summary['modules']} modules loaded")
+        for key, label in (('total_seconds', 'process start to response'),
+                           ('import_seconds', 'import WSGI app'),
+                           ('first_response_seconds', 'first request')):
+            stats = summary[key]
+            self.stdout.write(f"  {label:<26} median {stats['median'] * 1000:8.1f} ms  "
+                              f"min {stats['min'] * 1000:8.1f} ms  max {stats['max'] * 1000:8.1f} ms")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from library.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the \"members who borrowed this also borrowed\" neighbours served by "
+        "/books/{id}/related/. Requires numpy and scipy (pip install -r requirements-offline.txt). "
+        "Borrows deleted outside the API are only picked up by --full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20, help='Neighbours stored per book.')
+        parser.add_argument(
+            '--min-support', type=int, default=1,
+            help='Minimum number of members who borrowed both books.'
+        )
+        parser.add_argument('--full', action='store_true', help='Recompute every book instead of only affected ones.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched per database round trip.')
+        parser.add_argument('--block-size', type=int, default=512, help='Books scored per block.')
+
+    def handle(self, *args, **options):
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be positive.')
+        try:
+            updated = build_recommendations(
+                top_k=options['top_k'],
+                min_support=options['min_support'],
+                full=options['full'],
+                chunk_size=options['chunk_size'],
+                block_size=options['block_size'],
+            )
+        except ImportError as exc:
+            raise CommandError(f"build_recommendations needs numpy and scipy; install requirements-offline.txt ({exc}).") from exc
+        self.stdout.write(self.style.SUCCESS(f"Updated neighbours for {updated} books."))
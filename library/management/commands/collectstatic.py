@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finder
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+
+
+class Command(CollectStaticCommand):
+    help = (
+        "Collects static files into STATIC_ROOT. With ENABLE_API_DOCS the OpenAPI schema "
+        "is generated first, so it is served as a hashed, precompressed static file."
+    )
+
+    def handle(self, **options):
+        if settings.ENABLE_API_DOCS:
+            from library_management.api_docs import write_schema
+
+            path = write_schema()
+            # The app directories finder only looks at static/ folders that
+            # existed when it was first built.
+            get_finder.cache_clear()
+            if options['verbosity'] >= 1:
+                self.stdout.write(f"Wrote the API schema to {path}.")
+        return super().handle(**options)
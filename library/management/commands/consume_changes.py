@@ -0,0 +1,56 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from library.models import ChangeConsumer
+from library.outbox import changes_since
+from library.serializers import ChangeEventSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams change feed events as JSON lines, in batches. With --consumer the "
+        "position is saved after every batch, so the next run resumes where this one stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help='Name under which the feed position is stored.')
+        parser.add_argument('--since', type=int, help='Start after this feed position instead of the saved position.')
+        parser.add_argument('--entity', help='Only stream events of this entity, e.g. book.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new events once caught up.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --follow.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        consumer = None
+        cursor = 0
+        if options['consumer']:
+            consumer, _ = ChangeConsumer.objects.get_or_create(name=options['consumer'])
+            cursor = consumer.cursor
+        if options['since'] is not None:
+            cursor = options['since']
+
+        streamed = 0
+        try:
+            while True:
+                events = changes_since(cursor, options['batch_size'], options['entity'])
+                for event in ChangeEventSerializer(events, many=True).data:
+                    self.stdout.write(json.dumps(event))
+                self.stdout.flush()
+
+                if events:
+                    cursor = events[-1].position
+                    streamed += len(events)
+                    if consumer is not None:
+                        ChangeConsumer.objects.filter(pk=consumer.pk).update(cursor=cursor)
+
+                if len(events) < options['batch_size']:
+                    if not options['follow']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stderr.write(f"Streamed {streamed} events, cursor at {cursor}.")
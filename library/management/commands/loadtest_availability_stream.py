@@ -0,0 +1,144 @@
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from library import availability
+
+
+class FakeClient:
+    """Stands in for an ASGI server connection and records when events arrive."""
+
+    def __init__(self, published_at, delivered):
+        self.published_at = published_at
+        self.delivered = delivered
+        self.connected = asyncio.Event()
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] != 'http.response.body':
+            return
+        if not self.connected.is_set():
+            self.connected.set()  # the first body is the snapshot
+            return
+        for line in message['body'].split(b'\n'):
+            if line.startswith(b'data: '):
+                sequence = json.loads(line[6:])['available_copies']
+                self.delivered.append(time.perf_counter() - self.published_at[sequence])
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the live availability stream in-process: opens many idle "
+        "subscribers, publishes events from a request thread and reports memory "
+        "per subscriber and fan-out latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--books', type=int, default=50, help='Distinct book ids subscribed to.')
+        parser.add_argument('--ids-per-subscriber', type=int, default=5)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--rate', type=float, default=20.0, help='Events published per second.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['ids_per_subscriber'] > options['books']:
+            raise CommandError('--ids-per-subscriber cannot exceed --books.')
+
+        # Always exercise the in-process fan-out, whatever backend is configured.
+        configured = availability._broadcaster
+        availability._broadcaster = availability.AvailabilityBroadcaster(availability.InProcessBackend)
+        try:
+            asyncio.run(self.run(options))
+        finally:
+            availability._broadcaster = configured
+
+    async def run(self, options):
+        rng = random.Random(options['seed'])
+        published_at = {}
+        delivered = []
+        books = range(1, options['books'] + 1)
+
+        clients, tasks, subscriptions = [], [], []
+
+        async def connect(count):
+            opened = []
+            for _ in range(count):
+                ids = rng.sample(books, options['ids_per_subscriber'])
+                client = FakeClient(published_at, delivered)
+                scope = {
+                    'type': 'http', 'method': 'GET', 'path': '/books/availability/stream/',
+                    'query_string': f"ids={','.join(map(str, ids))}".encode(),
+                }
+                opened.append(client)
+                subscriptions.append(ids)
+                tasks.append(asyncio.ensure_future(
+                    availability.availability_stream(scope, client.receive, client.send)
+                ))
+            await asyncio.gather(*(client.connected.wait() for client in opened))
+            clients.extend(opened)
+
+        # Memory is traced on a sample only; tracing every connection would
+        # distort the connect timings.
+        sample = min(options['subscribers'], 500)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await connect(sample)
+        per_subscriber = (tracemalloc.get_traced_memory()[0] - baseline) / sample
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        await connect(options['subscribers'] - sample)
+        connect_rate = (options['subscribers'] - sample) / (time.perf_counter() - started)
+
+        subscribers_of = {}
+        for ids in subscriptions:
+            for book_id in ids:
+                subscribers_of[book_id] = subscribers_of.get(book_id, 0) + 1
+        events = [rng.choice(books) for _ in range(options['events'])]
+        expected = sum(subscribers_of.get(book_id, 0) for book_id in events)
+
+        broadcaster = availability.get_broadcaster()
+
+        def publish():
+            # Runs outside the event loop, like a borrow or return view would.
+            for sequence, book_id in enumerate(events):
+                published_at[sequence] = time.perf_counter()
+                broadcaster.publish(book_id, sequence)
+                time.sleep(1 / options['rate'])
+
+        publish_started = time.perf_counter()
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        while publisher.is_alive() or len(delivered) < expected:
+            if time.perf_counter() - publish_started > 60 + options['events'] / options['rate']:
+                break
+            await asyncio.sleep(0.01)
+        publisher.join()
+        fanout_seconds = time.perf_counter() - publish_started
+
+        for client in clients:
+            client.disconnected.set()
+        await asyncio.gather(*tasks)
+
+        self.stdout.write(f"{options['subscribers']} subscribers over {options['books']} books, "
+                          f"~{per_subscriber / 1024:.1f} KiB each, {connect_rate:.0f} connections/s")
+        self.stdout.write(f"{options['events']} events -> {len(delivered)}/{expected} deliveries "
+                          f"in {fanout_seconds:.2f} s ({len(delivered) / fanout_seconds:.0f} deliveries/s)")
+        if delivered:
+            delivered.sort()
+            self.stdout.write(
+                f"latency p50 {statistics.median(delivered) * 1000:.2f} ms, "
+                f"p99 {delivered[int(len(delivered) * 0.99) - 1] * 1000:.2f} ms, "
+                f"max {delivered[-1] * 1000:.2f} ms"
+            )
+        if len(delivered) < expected:
+            raise CommandError(f"{expected - len(delivered)} deliveries were lost.")
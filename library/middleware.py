@@ -0,0 +1,79 @@
+"""
+Compression of API responses.
+
+``CompressionMiddleware`` extends Django's ``GZipMiddleware`` with brotli,
+which is picked when the client accepts it and the ``brotli`` package is
+installed. Only non-streaming responses with a compressible content type and a
+body of at least ``API_COMPRESSION_MIN_SIZE`` bytes are compressed. Only JSON
+API payloads qualify: HTML pages such as the admin and the browsable API carry
+CSRF tokens, and brotli has none of the BREACH padding Django's gzip adds.
+Static files are already served precompressed by WhiteNoise.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/openapi+json')
+
+
+def accepted_encodings(header):
+    """
+    Returns the codings an Accept-Encoding header allows, honouring q=0 and
+    the ``*`` wildcard.
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding] = quality
+    return {
+        coding for coding in ('br', 'gzip')
+        if qualities.get(coding, qualities.get('*', 0)) > 0
+    }
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < settings.API_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or 'br' not in accepted:
+            # GZipMiddleware ignores q-values, so only hand over when gzip is acceptable.
+            if 'gzip' in accepted:
+                return super().process_response(request, response)
+            return response
+
+        compressed_content = brotli.compress(response.content, quality=settings.API_COMPRESSION_BROTLI_QUALITY)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        # Weaken a strong ETag like GZipMiddleware does (RFC 9110 Section 8.8.1).
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 08:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorrowArchive',
+            fields=[
+                ('borrow_date', models.DateField()),
+                ('due_date', models.DateField()),
+                ('return_date', models.DateField(blank=True, null=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['member', '-borrow_date'], name='library_bor_member__4e718d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['return_date', 'due_date'], name='library_bor_return__c22f43_idx'),
+        ),
+        migrations.AddField(
+            model_name='borrowarchive',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='library.book'),
+        ),
+        migrations.AddField(
+            model_name='borrowarchive',
+            name='member',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='borrowarchive',
+            index=models.Index(fields=['member', '-borrow_date'], name='library_bor_member__a08705_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_book_neighbors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='library_boo_title_c38ef2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['isbn'], name='library_boo_isbn_951e8b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['available_copies'], name='library_boo_availab_13fdf7_idx'),
+        ),
+    ]
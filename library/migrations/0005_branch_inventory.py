@@ -0,0 +1,118 @@
+# Generated by Django 5.2 on 2026-10-19 08:20
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+
+def split_counts_into_copies(apps, schema_editor):
+    """
+    Turns each book's scalar copy counts into BookCopy rows at a "Main" branch
+    and links open borrows to the copies that are on loan.
+    """
+    Book = apps.get_model('library', 'Book')
+    Borrow = apps.get_model('library', 'Borrow')
+    Branch = apps.get_model('library', 'Branch')
+    BookCopy = apps.get_model('library', 'BookCopy')
+    BranchAvailability = apps.get_model('library', 'BranchAvailability')
+
+    books = Book.objects.filter(total_copies__gt=0).order_by('id').values_list('id', 'total_copies', 'available_copies')
+    if not books.exists():
+        return
+
+    main, _ = Branch.objects.get_or_create(name='Main')
+    last_id = 0
+    while True:
+        batch = list(books.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        copies = []
+        availability = []
+        for book_id, total, available in batch:
+            available = max(0, min(available, total))
+            copies += [BookCopy(book_id=book_id, branch=main, status='available') for _ in range(available)]
+            copies += [BookCopy(book_id=book_id, branch=main, status='on_loan') for _ in range(total - available)]
+            availability.append(BranchAvailability(
+                book_id=book_id, branch=main, total_copies=total, available_copies=available
+            ))
+        BookCopy.objects.bulk_create(copies, batch_size=1000)
+        BranchAvailability.objects.bulk_create(availability, batch_size=1000)
+
+        on_loan = {}
+        for copy_id, book_id in BookCopy.objects.filter(
+            book_id__in=[row[0] for row in batch], status='on_loan'
+        ).order_by('id').values_list('id', 'book_id'):
+            on_loan.setdefault(book_id, []).append(copy_id)
+
+        borrows = list(Borrow.objects.filter(
+            book_id__in=list(on_loan), return_date__isnull=True, copy__isnull=True
+        ).order_by('id'))
+        for borrow in borrows:
+            if on_loan.get(borrow.book_id):
+                borrow.copy_id = on_loan[borrow.book_id].pop(0)
+        Borrow.objects.bulk_update([b for b in borrows if b.copy_id], ['copy'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_book_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('address', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookCopy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('available', 'Available'), ('on_loan', 'On loan')], default='available', max_length=10)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copies', to='library.book')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='copies', to='library.branch')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='borrow',
+            name='copy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.bookcopy'),
+        ),
+        migrations.AddField(
+            model_name='borrowarchive',
+            name='copy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.bookcopy'),
+        ),
+        migrations.CreateModel(
+            name='BranchAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_copies', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('available_copies', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='branch_availability', to='library.book')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='library.branch')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bookcopy',
+            index=models.Index(fields=['book', 'status', 'branch'], name='library_boo_book_id_2fbb7c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branchavailability',
+            index=models.Index(fields=['branch', 'available_copies'], name='library_bra_branch__ef4903_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='branchavailability',
+            constraint=models.UniqueConstraint(fields=('book', 'branch'), name='unique_book_branch_availability'),
+        ),
+        migrations.RunPython(split_counts_into_copies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 08:55
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def sequence_existing_events(apps, schema_editor):
+    # Existing cursors are event ids, so existing events keep their id as position.
+    ChangeEvent = apps.get_model('library', 'ChangeEvent')
+    ChangeFeedSequence = apps.get_model('library', 'ChangeFeedSequence')
+    ChangeEvent.objects.update(position=F('id'))
+    last = ChangeEvent.objects.aggregate(last=Max('id'))['last'] or 0
+    ChangeFeedSequence.objects.update_or_create(pk=1, defaults={'last_position': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_position', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='changeevent',
+            name='library_cha_entity_6943b8_idx',
+        ),
+        migrations.AddField(
+            model_name='changeevent',
+            name='position',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(sequence_existing_events, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['entity', 'position'], name='library_cha_entity_c76832_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(condition=models.Q(('position__isnull', True)), fields=['id'], name='changeevent_unsequenced_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_change_feed_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendationbuild',
+            name='last_change_position',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from datetime import date
@@ -51,30 +52,121 @@ class Book(models.Model):
     total_copies = models.IntegerField(validators=[MinValueValidator(0)])
     available_copies = models.IntegerField(validators=[MinValueValidator(0)])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['title']),
+            models.Index(fields=['isbn']),
+            models.Index(fields=['available_copies']),
+        ]
+
     def __str__(self):
         return self.title
 
 
-class Borrow(models.Model):
+class Branch(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    address = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return self.name
+
+
+class BookCopy(models.Model):
+    AVAILABLE = 'available'
+    ON_LOAN = 'on_loan'
+    STATUS_CHOICES = [
+        (AVAILABLE, 'Available'),
+        (ON_LOAN, 'On loan'),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='copies')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, related_name='copies')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=AVAILABLE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', 'status', 'branch']),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title} #{self.pk} ({self.branch.name})"
+
+
+class BranchAvailability(models.Model):
+    """
+    Per-branch copy counters of a book, kept in step with ``BookCopy`` by
+    ``library.inventory``. ``Book.total_copies`` and ``Book.available_copies``
+    hold the totals across all branches, rolled up from these rows after each
+    borrow, return or stocking change commits.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='branch_availability')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='availability')
+    total_copies = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    available_copies = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'branch'], name='unique_book_branch_availability'),
+        ]
+        indexes = [
+            models.Index(fields=['branch', 'available_copies']),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} at {self.branch_id}: {self.available_copies}/{self.total_copies}"
+
+
+def calculate_fine(due_date, return_date):
+    if return_date and return_date > due_date:
+        overdue_days = (return_date - due_date).days
+    elif not return_date and date.today() > due_date:
+        overdue_days = (date.today() - due_date).days
+    else:
+        overdue_days = 0
+    return overdue_days * 10
+
+
+class BaseBorrow(models.Model):
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    copy = models.ForeignKey(BookCopy, on_delete=models.SET_NULL, null=True, blank=True)
     borrow_date = models.DateField()
     due_date = models.DateField()
     return_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
     @property
     def fine(self):
-        if self.return_date and self.return_date > self.due_date:
-            overdue_days = (self.return_date - self.due_date).days
-        elif not self.return_date and date.today() > self.due_date:
-            overdue_days = (date.today() - self.due_date).days
-        else:
-            overdue_days = 0
-        return overdue_days * 10
+        return calculate_fine(self.due_date, self.return_date)
 
     def __str__(self):
         return f"{self.member.email} borrowed {self.book.title}"
 
 
+class Borrow(BaseBorrow):
+    class Meta:
+        indexes = [
+            models.Index(fields=['member', '-borrow_date']),
+            models.Index(fields=['return_date', 'due_date']),
+        ]
+
+
+class BorrowArchive(BaseBorrow):
+    """
+    Returned borrows moved out of the hot ``Borrow`` table by the
+    ``archive_borrows`` management command. Rows keep their original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['member', '-borrow_date']),
+        ]
+
+
 class Reservation(models.Model):
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
@@ -82,4 +174,92 @@ class Reservation(models.Model):
     is_active = models.BooleanField(default=True)
 
     def __str__(self):
-        return f"{self.member.email} reserved {self.book.title}"
\ No newline at end of file
+        return f"{self.member.email} reserved {self.book.title}"
+
+class BookNeighbor(models.Model):
+    """
+    Precomputed "members who borrowed this also borrowed" neighbours of a book,
+    written by the ``build_recommendations`` management command.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='unique_book_neighbor_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
+class RecommendationBuild(models.Model):
+    """
+    Watermark of the last ``build_recommendations`` run, used to limit the next
+    run to books affected by newer borrows and by borrows deleted since, which
+    are read from the change feed after ``last_change_position``.
+    """
+    last_borrow_id = models.BigIntegerField(default=0)
+    last_change_position = models.BigIntegerField(default=0)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommendations built up to borrow {self.last_borrow_id}"
+
+
+class ChangeEvent(models.Model):
+    """
+    Transactional outbox of catalogue and circulation changes. Rows are written
+    in the same transaction as the change itself by ``library.outbox`` and read
+    in ``position`` order by ``/changes/`` and the ``consume_changes`` command.
+
+    ``position`` is assigned by ``library.outbox.sequence_events`` once the
+    event has committed, so it follows commit order where ``id`` doesn't.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    OPERATION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    entity = models.CharField(max_length=50)
+    entity_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    position = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['entity', 'position']),
+            models.Index(fields=['id'], condition=models.Q(position__isnull=True), name='changeevent_unsequenced_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.entity} {self.entity_id} {self.operation}"
+
+
+class ChangeFeedSequence(models.Model):
+    """
+    Single row holding the last ``ChangeEvent.position`` handed out. Locking it
+    lets one reader at a time sequence newly committed events.
+    """
+    last_position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"change feed at {self.last_position}"
+
+
+class ChangeConsumer(models.Model):
+    """Last change feed position acknowledged by a named ``consume_changes`` consumer."""
+    name = models.CharField(max_length=100, unique=True)
+    cursor = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.cursor}"
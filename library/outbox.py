@@ -0,0 +1,101 @@
+"""
+Writing to and reading from the ``ChangeEvent`` outbox.
+"""
+from django.db import router, transaction
+from django.db.models import F, Max, Min
+from django.db.models.deletion import Collector
+from .models import Book, Borrow, ChangeEvent, ChangeFeedSequence, Reservation
+
+
+# Models whose rows appear in the change feed.
+FEED_MODELS = (Book, Borrow, Reservation)
+
+
+def _payload(instance):
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def record_change(instance, operation):
+    """
+    Adds an outbox event for ``instance`` carrying its field values; for
+    DELETED events these are the values the row had when it was deleted. Call
+    it inside the transaction that makes the change, and before deleting an
+    instance, so the event is only visible if the change commits.
+    """
+    return ChangeEvent.objects.create(
+        entity=instance._meta.model_name,
+        entity_id=instance.pk,
+        operation=operation,
+        payload=_payload(instance),
+    )
+
+
+def record_deletion(instance):
+    """
+    Adds DELETED events for ``instance`` and for the feed rows its deletion
+    cascades to, such as the borrows and reservations of a deleted book or
+    member, so consumers mirroring those endpoints aren't left with orphans.
+    ``instance`` itself only gets an event if its model is in the feed. Call
+    it inside the deleting transaction, before the delete.
+    """
+    collector = Collector(using=router.db_for_write(type(instance)))
+    collector.collect([instance])
+
+    deleted = [
+        (model, obj.pk, _payload(obj))
+        for model, objs in collector.data.items() if model in FEED_MODELS
+        for obj in objs if obj != instance
+    ]
+    for queryset in collector.fast_deletes:
+        if queryset.model in FEED_MODELS:
+            opts = queryset.model._meta
+            fields = [field.attname for field in opts.concrete_fields]
+            deleted += [(queryset.model, row[opts.pk.attname], row) for row in queryset.values(*fields)]
+
+    deleted.sort(key=lambda row: (row[0]._meta.model_name, row[1]))
+    if type(instance) in FEED_MODELS:
+        deleted.append((type(instance), instance.pk, _payload(instance)))
+
+    return ChangeEvent.objects.bulk_create([
+        ChangeEvent(entity=model._meta.model_name, entity_id=pk, operation=ChangeEvent.DELETED, payload=payload)
+        for model, pk, payload in deleted
+    ])
+
+
+def sequence_events():
+    """
+    Gives every committed event without a ``position`` one above the last
+    position handed out, in id order, and returns the new last position.
+
+    Ids are allocated when a row is inserted, not when its transaction commits,
+    so an event can become visible after one with a higher id has been read.
+    Positions are only handed out to events that are already visible, under a
+    lock on the ``ChangeFeedSequence`` row, so an event that commits late gets
+    a position above every cursor issued before it and can't be skipped.
+    """
+    with transaction.atomic():
+        ChangeFeedSequence.objects.get_or_create(pk=1)
+        sequence = ChangeFeedSequence.objects.select_for_update().get(pk=1)
+        pending = ChangeEvent.objects.filter(position__isnull=True)
+        bounds = pending.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return sequence.last_position
+
+        # Positions stay equal to ids until an event commits out of order. Events
+        # that commit while this runs are outside the range and wait for the next call.
+        offset = max(sequence.last_position + 1 - bounds['first'], 0)
+        pending.filter(id__range=(bounds['first'], bounds['last'])).update(position=F('id') + offset)
+        sequence.last_position = bounds['last'] + offset
+        sequence.save(update_fields=['last_position'])
+        return sequence.last_position
+
+
+def changes_since(cursor, limit, entity=None):
+    """
+    Returns up to ``limit`` events after the ``cursor`` position, in commit order.
+    """
+    sequence_events()
+    events = ChangeEvent.objects.filter(position__gt=cursor)
+    if entity:
+        events = events.filter(entity=entity)
+    return list(events.order_by('position')[:limit])
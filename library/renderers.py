@@ -0,0 +1,37 @@
+"""
+JSON rendering for the API.
+
+``FastJSONRenderer`` produces the same compact output as DRF's
+``JSONRenderer`` but encodes with orjson, which is several times faster on the
+nested list pages (``/borrows/`` with ``book_detail`` and author biographies).
+Without orjson installed, or when indented output is asked for, it falls back
+to DRF's own encoder.
+"""
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        # Decimals, lazy translations and datetimes go through DRF's encoder, so
+        # they render exactly as JSONRenderer would.
+        ret = orjson.dumps(
+            data,
+            default=encoders.JSONEncoder().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+
+        # Same escaping as JSONRenderer, so the output stays a strict javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
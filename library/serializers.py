@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Member, Book, Author, Category, Borrow, Reservation
+from .models import Member, Book, Author, Category, Borrow, Reservation, BookNeighbor, Branch, BookCopy,\
+    BranchAvailability, ChangeEvent, calculate_fine
 
 
 class MemberSerializer(serializers.ModelSerializer):
@@ -67,11 +68,79 @@ class BookSerializer(serializers.ModelSerializer):
                 'available_copies': 'Available copies cannot exceed total copies.'
             })
 
+        counts_changed = self.instance is not None and any(
+            field in data and data[field] != getattr(self.instance, field)
+            for field in ('total_copies', 'available_copies')
+        )
+        if counts_changed and self.instance.copies.exists():
+            raise serializers.ValidationError({
+                'total_copies': 'Copy counts of books with tracked copies are managed through /copies/.'
+            })
+
         return data
 
+
+    def update(self, instance, validated_data):
+        """
+        Writes only the fields in the request, and leaves out copy counts it
+        doesn't change, so an edit can't overwrite a borrow or return that
+        committed after the book was loaded.
+        """
+        for field in ('total_copies', 'available_copies'):
+            if field in validated_data and validated_data[field] == getattr(instance, field):
+                del validated_data[field]
+        authors = validated_data.pop('authors', None)
+
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        if authors is not None:
+            instance.authors.set(authors)
+
+        instance.refresh_from_db(fields=['total_copies', 'available_copies'])
+        return instance
+
+
+class BranchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Branch
+        fields = ['id', 'name', 'address']
+
+
+class BookCopySerializer(serializers.ModelSerializer):
+    book_title = serializers.CharField(source='book.title', read_only=True)
+    branch_name = serializers.CharField(source='branch.name', read_only=True)
+
+    class Meta:
+        model = BookCopy
+        fields = ['id', 'book', 'book_title', 'branch', 'branch_name', 'status']
+        read_only_fields = ['status']
+
+
+class BranchAvailabilitySerializer(serializers.ModelSerializer):
+    branch_name = serializers.CharField(source='branch.name', read_only=True)
+
+    class Meta:
+        model = BranchAvailability
+        fields = ['branch', 'branch_name', 'total_copies', 'available_copies']
+
+class RelatedBookSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='neighbor_id')
+    title = serializers.CharField(source='neighbor.title')
+
+    class Meta:
+        model = BookNeighbor
+        fields = ['id', 'title', 'score']
+
+
 class BorrowSerializer(serializers.ModelSerializer):
     member_email = serializers.EmailField(source='member.email', read_only=True)
     book_detail = BookSerializer(source='book', read_only=True)
+    branch = serializers.PrimaryKeyRelatedField(
+        queryset=Branch.objects.all(), write_only=True, required=False,
+        help_text='Borrow from this branch. Any branch with a copy on the shelf is used if omitted.'
+    )
 
     class Meta:
         model = Borrow
@@ -81,12 +150,43 @@ class BorrowSerializer(serializers.ModelSerializer):
             'member_email',
             'book',
             'book_detail',
+            'copy',
+            'branch',
             'borrow_date',
             'due_date',
             'return_date',
             'fine',
         ]
-        read_only_fields = ['member', 'fine']
+        # Returns go through the return_book action, which puts the copy back on the shelf.
+        read_only_fields = ['member', 'copy', 'return_date', 'fine']
+
+    def validate(self, data):
+        if self.instance is not None:
+            if 'book' in data and data['book'] != self.instance.book:
+                raise serializers.ValidationError({
+                    'book': 'The book of a borrow cannot be changed. Return it and borrow the other book.'
+                })
+            data.pop('branch', None)
+        return data
+
+
+class BorrowHistorySerializer(serializers.Serializer):
+    """
+    Serializes the flat rows produced by ``BorrowViewSet.history``, which may
+    come from either the ``Borrow`` or the ``BorrowArchive`` table.
+    """
+    id = serializers.IntegerField()
+    member = serializers.IntegerField()
+    book = serializers.IntegerField()
+    book_title = serializers.CharField(source='book__title')
+    borrow_date = serializers.DateField()
+    due_date = serializers.DateField()
+    return_date = serializers.DateField(allow_null=True)
+    fine = serializers.SerializerMethodField()
+    archived = serializers.BooleanField()
+
+    def get_fine(self, obj):
+        return calculate_fine(obj['due_date'], obj['return_date'])
 
 
 class ReservationSerializer(serializers.ModelSerializer):
@@ -96,4 +196,10 @@ class ReservationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = ['id', 'member', 'member_email', 'book', 'book_title', 'reservation_date', 'is_active']
-        read_only_fields = ['member']
\ No newline at end of file
+        read_only_fields = ['member']
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChangeEvent
+        fields = ['id', 'position', 'entity', 'entity_id', 'operation', 'payload', 'created_at']
@@ -1,3 +1,744 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from importlib.util import find_spec
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from decimal import Decimal
+import brotli
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from . import availability, backends, inventory
+from .filters import BookFilterSet
+from .middleware import accepted_encodings
+from .models import Author, Book, BookCopy, BookNeighbor, Borrow, BorrowArchive, Branch, BranchAvailability,\
+    Category, ChangeEvent, Member, Reservation
+from .recommendations import build_recommendations
+from .renderers import FastJSONRenderer
+from .serializers import BookSerializer
 
-# Create your tests here.
+
+class CommittingAPIClient(APIClient):
+    """
+    Runs the on-commit callbacks of each request when it finishes, as the
+    commit of a real request's transaction would.
+    """
+    def request(self, **kwargs):
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            return super().request(**kwargs)
+
+
+class BorrowArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Member.objects.create_superuser('admin@example.com', 'pass', first_name='A', last_name='D')
+        cls.member = Member.objects.create_user('member@example.com', 'pass', first_name='M', last_name='E')
+        book = Book.objects.create(title='Dune', isbn='9780441013593', total_copies=1, available_copies=1)
+
+        long_ago = date.today() - timedelta(days=800)
+        # Five old returned borrows, one recent return and one still open.
+        cls.old_ids = [
+            Borrow.objects.create(
+                member=cls.member, book=book, borrow_date=long_ago + timedelta(days=i),
+                due_date=long_ago + timedelta(days=i + 14), return_date=long_ago + timedelta(days=i + 7),
+            ).id
+            for i in range(5)
+        ]
+        recent = date.today() - timedelta(days=10)
+        Borrow.objects.create(member=cls.member, book=book, borrow_date=recent, due_date=recent, return_date=recent)
+        Borrow.objects.create(member=cls.member, book=book, borrow_date=date.today(), due_date=date.today())
+
+    def archive(self):
+        call_command('archive_borrows', batch_size=2, stdout=StringIO())
+
+    def test_archive_moves_old_returns_in_batches(self):
+        self.archive()
+        self.assertEqual(sorted(BorrowArchive.objects.values_list('id', flat=True)), self.old_ids)
+        self.assertEqual(Borrow.objects.count(), 2)
+
+        # A second run finds nothing left to move.
+        self.archive()
+        self.assertEqual(BorrowArchive.objects.count(), 5)
+        self.assertEqual(Borrow.objects.count(), 2)
+
+    def test_full_history_unions_archive_newest_first(self):
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.member)
+        self.assertEqual(client.get('/borrows/history/').data['total_items'], 2)
+
+        rows = []
+        for page in (1, 2, 3):
+            response = client.get('/borrows/history/', {'full': 'true', 'page_size': 3, 'page': page})
+            self.assertEqual(response.data['total_items'], 7)
+            rows += response.data['results']
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(
+            [row['borrow_date'] for row in rows], sorted((row['borrow_date'] for row in rows), reverse=True)
+        )
+        self.assertEqual([row['archived'] for row in rows], [False] * 2 + [True] * 5)
+
+    def test_history_member_must_be_an_integer(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get('/borrows/history/', {'member': 'abc'}).status_code, 400)
+        response = client.get('/borrows/history/', {'member': self.member.id, 'full': 'true'})
+        self.assertEqual(response.data['total_items'], 7)
+
+
+@unittest.skipUnless(find_spec('numpy') and find_spec('scipy'), 'build_recommendations needs numpy and scipy')
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = {
+            name: Book.objects.create(title=name, isbn=name, total_copies=1, available_copies=1)
+            for name in 'abcd'
+        }
+        cls.members = [
+            Member.objects.create_user(f'm{i}@example.com', 'pass', first_name='M', last_name=str(i))
+            for i in range(4)
+        ]
+        # a and d are always borrowed together; b is also borrowed with c.
+        for member, names in zip(cls.members, ['abd', 'abd', 'bc']):
+            for name in names:
+                cls.borrow(member, name)
+
+    @classmethod
+    def borrow(cls, member, name):
+        Borrow.objects.create(member=member, book=cls.books[name], borrow_date=date.today(), due_date=date.today())
+
+    def neighbors(self, name):
+        rows = BookNeighbor.objects.filter(book=self.books[name]).order_by('rank')
+        return [(row.neighbor.title, row.score) for row in rows]
+
+    def test_build_scores_cosine_similarity(self):
+        self.assertEqual(build_recommendations(), 4)
+        self.assertEqual(self.neighbors('a'), [('d', 1.0), ('b', 2 / 6 ** 0.5)])
+        self.assertEqual(self.neighbors('c'), [('b', 1 / 3 ** 0.5)])
+
+    def test_incremental_build_matches_full_build(self):
+        build_recommendations()
+        # Only c is borrowed again, but that changes its similarity to b too.
+        self.borrow(self.members[3], 'c')
+        self.assertEqual(build_recommendations(), 2)
+        incremental = {name: self.neighbors(name) for name in self.books}
+
+        build_recommendations(full=True)
+        self.assertEqual(incremental, {name: self.neighbors(name) for name in self.books})
+        self.assertEqual(self.neighbors('b')[-1], ('c', 1 / 6 ** 0.5))
+
+    def test_incremental_build_rescores_deleted_borrows(self):
+        build_recommendations()
+        admin = Member.objects.create_superuser('admin@example.com', 'pass', first_name='A', last_name='D')
+        client = CommittingAPIClient()
+        client.force_authenticate(admin)
+        # c loses its only borrow, and d is no longer always borrowed with a.
+        for member, name in [(self.members[2], 'c'), (self.members[0], 'd')]:
+            borrow = Borrow.objects.get(member=member, book=self.books[name])
+            self.assertEqual(client.delete(f'/borrows/{borrow.id}/').status_code, 204)
+
+        build_recommendations()
+        incremental = {name: self.neighbors(name) for name in self.books}
+        self.assertEqual(incremental['c'], [])
+        self.assertNotIn('c', [title for title, _ in incremental['b']])
+
+        build_recommendations(full=True)
+        self.assertEqual(incremental, {name: self.neighbors(name) for name in self.books})
+
+    def test_related_endpoints(self):
+        build_recommendations(top_k=1)
+        client = APIClient()
+        book = self.books['a']
+        with self.assertNumQueries(1):
+            self.assertEqual([row['title'] for row in client.get(f'/books/{book.id}/related/').data], ['d'])
+        self.assertEqual([row['title'] for row in client.get(f'/books/{book.id}/').data['related']], ['d'])
+        self.assertEqual(client.get('/books/abc/related/').status_code, 404)
+        self.assertEqual(client.get('/books/99999/related/').status_code, 404)
+        unborrowed = Book.objects.create(title='e', isbn='e', total_copies=1, available_copies=1)
+        self.assertEqual(client.get(f'/books/{unborrowed.id}/related/').data, [])
+        self.assertEqual(client.get('/books/abc/availability/').status_code, 404)
+
+
+class BookFilterSetTests(TestCase):
+    BOOKS = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        fiction = Category.objects.create(name='Fiction')
+        history = Category.objects.create(name='History')
+        cls.smiths = Author.objects.bulk_create([
+            Author(first_name='Jane', last_name='Smith', biography=''),
+            Author(first_name='John', last_name='Smith', biography=''),
+        ])
+        cls.other = Author.objects.create(first_name='Ada', last_name='Lovelace', biography='')
+
+        books = Book.objects.bulk_create([
+            Book(
+                title=f'Book {i}', isbn=f'{i:013d}',
+                category=fiction if i % 2 else history,
+                total_copies=2, available_copies=i % 3,
+            )
+            for i in range(cls.BOOKS)
+        ])
+        # Every book has both Smiths, so a join on the authors table would
+        # return each book twice.
+        through = Book.authors.through
+        links = [through(book=book, author=author) for book in books for author in cls.smiths]
+        links += [through(book=book, author=cls.other) for book in books[:10]]
+        through.objects.bulk_create(links)
+
+    def filter(self, **params):
+        return BookFilterSet(params, queryset=Book.objects.all()).qs
+
+    def assertUsesSemiJoin(self, queryset):
+        sql = str(queryset.query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn(Book.authors.through._meta.db_table, queryset.query.alias_map)
+
+    def test_author_last_name_returns_each_book_once(self):
+        books = self.filter(authors__last_name='Smith')
+        self.assertUsesSemiJoin(books)
+        self.assertEqual(books.count(), self.BOOKS)
+        self.assertEqual(len(set(books.values_list('id', flat=True))), self.BOOKS)
+
+    def test_author_ids(self):
+        books = self.filter(author_ids=f'{self.smiths[0].id},{self.other.id}')
+        self.assertUsesSemiJoin(books)
+        self.assertEqual(books.count(), self.BOOKS)
+
+        self.assertEqual(self.filter(author_ids=str(self.other.id)).count(), 10)
+
+    def test_author_full_name(self):
+        books = self.filter(author_name='ada lovelace')
+        self.assertUsesSemiJoin(books)
+        self.assertEqual(books.count(), 10)
+
+    def test_availability(self):
+        available = self.filter(available='true').count()
+        unavailable = self.filter(available='false').count()
+        self.assertEqual(available, Book.objects.filter(available_copies__gt=0).count())
+        self.assertEqual(available + unavailable, self.BOOKS)
+
+    def test_isbn_ids_and_categories(self):
+        self.assertEqual(self.filter(isbn=f'{7:013d}').get().title, 'Book 7')
+
+        ids = list(Book.objects.order_by('id').values_list('id', flat=True)[:5])
+        self.assertEqual(self.filter(ids=','.join(map(str, ids))).count(), 5)
+
+        self.assertEqual(self.filter(category__name='Fiction').count(), self.BOOKS // 2)
+        category_ids = ','.join(str(pk) for pk in Category.objects.values_list('id', flat=True))
+        self.assertEqual(self.filter(category_ids=category_ids).count(), self.BOOKS)
+
+    def test_books_endpoint_counts_without_duplicates(self):
+        response = APIClient().get('/books/', {'authors__first_name': 'Jane', 'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], self.BOOKS)
+        self.assertEqual(len({book['id'] for book in response.data['results']}), 100)
+
+
+class BranchInventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Member.objects.create_superuser('admin@example.com', 'pass', first_name='A', last_name='D')
+        cls.member = Member.objects.create_user('member@example.com', 'pass', first_name='M', last_name='E')
+        cls.north = Branch.objects.create(name='North')
+        cls.south = Branch.objects.create(name='South')
+        cls.book = Book.objects.create(title='Dune', isbn='9780441013593', total_copies=0, available_copies=0)
+
+    def setUp(self):
+        self.client = CommittingAPIClient()
+        self.client.force_authenticate(self.admin)
+        for branch in (self.north, self.north, self.south):
+            response = self.client.post('/copies/', {'book': self.book.id, 'branch': branch.id})
+            self.assertEqual(response.status_code, 201)
+
+    def availability(self, branch):
+        return BranchAvailability.objects.get(book=self.book, branch=branch).available_copies
+
+    def borrow(self, **extra):
+        self.client.force_authenticate(self.member)
+        return self.client.post('/borrows/', {
+            'book': self.book.id, 'borrow_date': '2025-01-01', 'due_date': '2025-01-15', **extra
+        })
+
+    def test_adding_copies_updates_counters(self):
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (3, 3))
+        self.assertEqual(self.availability(self.north), 2)
+        self.assertEqual(self.availability(self.south), 1)
+
+    def test_borrow_and_return_move_a_copy(self):
+        response = self.borrow(branch=self.south.id)
+        self.assertEqual(response.status_code, 201)
+        copy = BookCopy.objects.get(pk=response.data['copy'])
+        self.assertEqual((copy.branch, copy.status), (self.south, BookCopy.ON_LOAN))
+        self.assertEqual(self.availability(self.south), 0)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+
+        self.assertEqual(self.borrow(branch=self.south.id).status_code, 400)
+        self.assertEqual(
+            [book['id'] for book in self.client.get('/books/', {'branch': self.south.id}).data['results']], []
+        )
+
+        returned = self.client.post(f"/borrows/{response.data['id']}/return_book/")
+        self.assertEqual(returned.status_code, 200)
+        self.assertEqual(self.client.post(f"/borrows/{response.data['id']}/return_book/").status_code, 400)
+        copy.refresh_from_db()
+        self.assertEqual(copy.status, BookCopy.AVAILABLE)
+        self.assertEqual(self.availability(self.south), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 3)
+
+    def test_book_totals_are_rolled_up_after_the_borrow_commits(self):
+        client = APIClient()
+        client.force_authenticate(self.member)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post('/borrows/', {
+                'book': self.book.id, 'borrow_date': '2025-01-01', 'due_date': '2025-01-15'
+            })
+            self.assertEqual(response.status_code, 201)
+            # Only the branch counter moved inside the borrow's transaction.
+            self.book.refresh_from_db()
+            self.assertEqual(self.book.available_copies, 3)
+            self.assertEqual(self.availability(self.north), 1)
+
+        for callback in callbacks:
+            callback()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+        event = ChangeEvent.objects.filter(entity='book').latest('id')
+        self.assertEqual(event.payload['available_copies'], 2)
+
+    def test_returns_go_through_return_book(self):
+        borrow_id = self.borrow(branch=self.north.id).data['id']
+        self.client.force_authenticate(self.admin)
+        response = self.client.patch(f'/borrows/{borrow_id}/', {'return_date': '2025-01-10'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['return_date'])
+        other = Book.objects.create(title='Emma', isbn='9780141439587', total_copies=1, available_copies=1)
+        response = self.client.patch(f'/borrows/{borrow_id}/', {'book': other.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.client.post(f'/borrows/{borrow_id}/return_book/').status_code, 200)
+        self.assertEqual(self.availability(self.north), 2)
+
+    def test_deleting_an_open_borrow_puts_the_copy_back(self):
+        response = self.borrow(branch=self.north.id)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.delete(f"/borrows/{response.data['id']}/").status_code, 204)
+        self.assertEqual(BookCopy.objects.get(pk=response.data['copy']).status, BookCopy.AVAILABLE)
+        self.assertEqual(self.availability(self.north), 2)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 3)
+
+    def test_copy_counts_are_read_only_once_tracked(self):
+        response = self.client.patch(f'/books/{self.book.id}/', {'total_copies': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_first_copy_brings_scalar_stock_under_tracking(self):
+        book = Book.objects.create(title='Emma', isbn='9780141439587', total_copies=5, available_copies=4)
+        open_borrow = Borrow.objects.create(
+            member=self.member, book=book, borrow_date='2025-01-01', due_date='2025-01-15'
+        )
+        self.assertEqual(self.client.post('/copies/', {'book': book.id, 'branch': self.north.id}).status_code, 201)
+
+        book.refresh_from_db()
+        self.assertEqual((book.total_copies, book.available_copies), (6, 5))
+        counts = BranchAvailability.objects.get(book=book, branch=self.north)
+        self.assertEqual((counts.total_copies, counts.available_copies), (6, 5))
+        open_borrow.refresh_from_db()
+        self.assertEqual(open_borrow.copy.status, BookCopy.ON_LOAN)
+
+        self.client.force_authenticate(self.member)
+        for _ in range(5):
+            response = self.client.post('/borrows/', {
+                'book': book.id, 'borrow_date': '2025-01-01', 'due_date': '2025-01-15'
+            })
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post('/borrows/', {
+            'book': book.id, 'borrow_date': '2025-01-01', 'due_date': '2025-01-15'
+        }).status_code, 400)
+
+        self.assertEqual(self.client.post(f'/borrows/{open_borrow.id}/return_book/').status_code, 200)
+        self.assertEqual(BookCopy.objects.get(pk=open_borrow.copy_id).status, BookCopy.AVAILABLE)
+
+    def test_book_edits_keep_counts_changed_by_concurrent_borrows(self):
+        untracked = Book.objects.create(title='Emma', isbn='9780141439587', total_copies=5, available_copies=5)
+        for book, data in ((untracked, {'title': 'Emma (2nd ed.)'}), (self.book, {'title': 'Dune', 'total_copies': 3})):
+            loaded = Book.objects.get(pk=book.pk)
+            available = loaded.available_copies
+            serializer = BookSerializer(loaded, data=data, partial=True)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+            # A borrow commits between the load and the save.
+            with self.captureOnCommitCallbacks(execute=True):
+                inventory.checkout(book)
+                if book == self.book:
+                    transaction.on_commit(lambda: inventory.refresh_book_totals(self.book.pk))
+
+            serializer.save()
+            book.refresh_from_db()
+            self.assertEqual(book.title, data['title'])
+            self.assertEqual(book.available_copies, available - 1)
+            self.assertEqual(serializer.data['available_copies'], book.available_copies)
+
+    def test_branches_holding_copies_cannot_be_deleted(self):
+        response = self.client.delete(f'/branches/{self.north.id}/')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Branch.objects.filter(pk=self.north.id).exists())
+
+        empty = Branch.objects.create(name='East')
+        self.assertEqual(self.client.delete(f'/branches/{empty.id}/').status_code, 204)
+
+    def test_books_without_copies_keep_editable_counts(self):
+        category = Category.objects.create(name='Fiction')
+        response = self.client.post('/books/', {
+            'title': 'Emma', 'isbn': '9780141439587', 'author_ids': [], 'category_id': category.id,
+            'total_copies': 2, 'available_copies': 2,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.patch(f"/books/{response.data['id']}/", {'total_copies': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_copies'], 3)
+
+
+class ChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Member.objects.create_superuser('admin@example.com', 'pass', first_name='A', last_name='D')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_book_changes_are_streamed_from_a_cursor(self):
+        category = Category.objects.create(name='Fiction')
+        book_id = self.client.post('/books/', {
+            'title': 'Dune', 'isbn': '9780441013593', 'author_ids': [], 'category_id': category.id,
+            'total_copies': 1, 'available_copies': 1,
+        }, format='json').data['id']
+        self.client.patch(f'/books/{book_id}/', {'title': 'Dune Messiah'}, format='json')
+
+        feed = self.client.get('/changes/', {'since': 0}).data
+        self.assertEqual(
+            [(e['entity'], e['entity_id'], e['operation']) for e in feed['results']],
+            [('book', book_id, ChangeEvent.CREATED), ('book', book_id, ChangeEvent.UPDATED)],
+        )
+        self.assertEqual(feed['results'][1]['payload']['title'], 'Dune Messiah')
+
+        self.client.delete(f'/books/{book_id}/')
+        feed = self.client.get('/changes/', {'since': feed['next_cursor']}).data
+        self.assertEqual([e['operation'] for e in feed['results']], [ChangeEvent.DELETED])
+
+    def test_events_committed_after_a_higher_id_are_not_skipped(self):
+        ChangeEvent.objects.create(id=10, entity='book', entity_id=1, operation=ChangeEvent.CREATED)
+        ChangeEvent.objects.create(id=20, entity='book', entity_id=2, operation=ChangeEvent.CREATED)
+        feed = self.client.get('/changes/').data
+        self.assertEqual([e['id'] for e in feed['results']], [10, 20])
+
+        # A long transaction that got its id before event 20 commits after it was read.
+        ChangeEvent.objects.create(id=15, entity='book', entity_id=3, operation=ChangeEvent.UPDATED)
+        ChangeEvent.objects.create(id=30, entity='book', entity_id=4, operation=ChangeEvent.CREATED)
+        feed = self.client.get('/changes/', {'since': feed['next_cursor']}).data
+        self.assertEqual([e['id'] for e in feed['results']], [15, 30])
+        self.assertGreater(feed['results'][0]['position'], 20)
+        self.assertEqual(self.client.get('/changes/', {'since': feed['next_cursor']}).data['results'], [])
+
+    def feed_deletions(self):
+        return [
+            (e['entity'], e['entity_id']) for e in self.client.get('/changes/', {'limit': 1000}).data['results']
+            if e['operation'] == ChangeEvent.DELETED
+        ]
+
+    def test_deletes_record_cascaded_borrows_and_reservations(self):
+        member = Member.objects.create_user('member@example.com', 'pass', first_name='M', last_name='E')
+        book = Book.objects.create(title='Dune', isbn='9780441013593', total_copies=2, available_copies=2)
+        borrow = Borrow.objects.create(member=member, book=book, borrow_date=date.today(), due_date=date.today())
+        reservation = Reservation.objects.create(member=member, book=book, reservation_date=date.today())
+
+        self.assertEqual(self.client.delete(f'/books/{book.id}/').status_code, 204)
+        self.assertEqual(
+            self.feed_deletions(),
+            [('borrow', borrow.id), ('reservation', reservation.id), ('book', book.id)],
+        )
+
+    def test_deleting_a_member_returns_their_copies(self):
+        member = Member.objects.create_user('member@example.com', 'pass', first_name='M', last_name='E')
+        branch = Branch.objects.create(name='North')
+        book = Book.objects.create(title='Dune', isbn='9780441013593', total_copies=0, available_copies=0)
+        client = CommittingAPIClient()
+        client.force_authenticate(self.admin)
+        client.post('/copies/', {'book': book.id, 'branch': branch.id})
+        client.force_authenticate(member)
+        borrow_id = client.post('/borrows/', {
+            'book': book.id, 'borrow_date': '2025-01-01', 'due_date': '2025-01-15'
+        }).data['id']
+
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.delete(f'/members/{member.id}/').status_code, 204)
+        self.assertEqual(BookCopy.objects.get().status, BookCopy.AVAILABLE)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 1)
+        self.assertEqual(self.feed_deletions(), [('borrow', borrow_id)])
+
+    def test_feed_is_admin_only(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/changes/').status_code, (401, 403))
+
+
+class FakeConnection:
+    """Plays the ASGI server's side of one availability stream connection."""
+
+    def __init__(self):
+        self.messages = asyncio.Queue()
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        await self.messages.put(message)
+
+    async def next_message(self, message_type):
+        while True:
+            message = await asyncio.wait_for(self.messages.get(), 5)
+            if message['type'] == message_type:
+                return message
+
+    async def next_events(self):
+        body = (await self.next_message('http.response.body'))['body']
+        return [json.loads(line[6:]) for line in body.split(b'\n') if line.startswith(b'data: ')]
+
+
+class AvailabilityStreamTests(TransactionTestCase):
+    """Runs with real commits, since events are published once the change commits."""
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Dune', isbn='9780441013593', total_copies=2, available_copies=2)
+        self.other = Book.objects.create(title='Emma', isbn='9780141439587', total_copies=1, available_copies=1)
+        self.admin = Member.objects.create_superuser('admin@example.com', 'pass', first_name='A', last_name='D')
+
+        configured = availability._broadcaster
+        self.broadcaster = availability._broadcaster = \
+            availability.AvailabilityBroadcaster(availability.InProcessBackend)
+        self.addCleanup(setattr, availability, '_broadcaster', configured)
+
+    def stream(self, connection, ids):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/books/availability/stream/',
+                 'query_string': f'ids={ids}'.encode()}
+        return asyncio.ensure_future(availability.availability_stream(scope, connection.receive, connection.send))
+
+    def test_rejects_bad_ids(self):
+        async def status(ids):
+            connection = FakeConnection()
+            await self.stream(connection, ids)
+            return (await connection.next_message('http.response.start'))['status']
+
+        for ids in ('', 'abc', ','.join(map(str, range(1, 102)))):
+            self.assertEqual(async_to_sync(status)(ids), 400)
+
+    def test_snapshot_then_changes_until_disconnect(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        async def scenario():
+            connection = FakeConnection()
+            task = self.stream(connection, f'{self.book.id},{self.other.id}')
+            self.assertEqual((await connection.next_message('http.response.start'))['status'], 200)
+            self.assertEqual(await connection.next_events(), [
+                {'book': self.book.id, 'available_copies': 2},
+                {'book': self.other.id, 'available_copies': 1},
+            ])
+            self.assertEqual(set(self.broadcaster.subscribers), {self.book.id, self.other.id})
+
+            response = await sync_to_async(client.patch)(
+                f'/books/{self.book.id}/', {'available_copies': 1}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(await connection.next_events(), [{'book': self.book.id, 'available_copies': 1}])
+
+            self.broadcaster.publish(self.other.id, 0)
+            self.assertEqual(await connection.next_events(), [{'book': self.other.id, 'available_copies': 0}])
+
+            connection.disconnected.set()
+            await asyncio.wait_for(task, 5)
+            self.assertEqual(self.broadcaster.subscribers, {})
+
+        async_to_sync(scenario)()
+
+    def test_failed_backend_is_restarted(self):
+        runs = []
+
+        class FailingBackend(availability.BaseBackend):
+            async def run(self):
+                runs.append(1)
+                if len(runs) == 1:
+                    raise ConnectionError('database went away')
+
+        broadcaster = availability.AvailabilityBroadcaster(FailingBackend)
+
+        async def scenario():
+            broadcaster.subscribe([self.book.id])
+            await asyncio.sleep(0)
+            broadcaster.subscribe([self.book.id])
+            await asyncio.sleep(0)
+
+        with self.assertLogs('library.availability', 'ERROR'):
+            async_to_sync(scenario)()
+        self.assertEqual(len(runs), 2)
+
+
+class LoginHashingTests(TestCase):
+    def test_login_upgrades_legacy_hash(self):
+        member = Member.objects.create_user('member@example.com', 'pass', first_name='M', last_name='E')
+        Member.objects.filter(pk=member.pk).update(password=make_password('s3cret-pass', hasher='pbkdf2_sha256'))
+
+        response = APIClient().post('/auth/jwt/create/', {'email': member.email, 'password': 's3cret-pass'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        member.refresh_from_db()
+        self.assertTrue(member.password.startswith('argon2$'))
+        self.assertTrue(member.check_password('s3cret-pass'))
+
+    def test_wrong_password_is_rejected(self):
+        Member.objects.create_user('member@example.com', 's3cret-pass', first_name='M', last_name='E')
+        response = APIClient().post('/auth/jwt/create/', {'email': 'member@example.com', 'password': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+    def full_hashing_queue(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        return mock.patch.object(backends, '_pool', (ThreadPoolExecutor(max_workers=1), slots))
+
+    def test_full_hashing_queue_rejects_logins_at_once(self):
+        Member.objects.create_user('member@example.com', 's3cret-pass', first_name='M', last_name='E')
+        with self.full_hashing_queue():
+            response = APIClient().post(
+                '/auth/jwt/create/', {'email': 'member@example.com', 'password': 's3cret-pass'}
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(backends.RETRY_AFTER))
+
+    def test_full_hashing_queue_fails_admin_login_without_error(self):
+        Member.objects.create_superuser('admin@example.com', 's3cret-pass', first_name='A', last_name='D')
+        with self.full_hashing_queue():
+            response = Client().post(
+                '/admin/login/', {'username': 'admin@example.com', 'password': 's3cret-pass'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class RenderingAndCompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction')
+        author = Author.objects.create(first_name='Ada', last_name='Lovelace', biography='Mathematician. ' * 20)
+        books = Book.objects.bulk_create([
+            Book(title=f'Book {i}', isbn=f'{i:013d}', category=category, total_copies=1, available_copies=1)
+            for i in range(20)
+        ])
+        Book.authors.through.objects.bulk_create([Book.authors.through(book=book, author=author) for book in books])
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'fine': Decimal('1.50'), 'when': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            1: ['caf\u00e9', 'line\u2028separator', None, 2.5],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, deflate, br;q=0.5'), {'gzip', 'br'})
+        self.assertEqual(accepted_encodings('br;q=0, gzip'), {'gzip'})
+        self.assertEqual(accepted_encodings('*, br;q=0'), {'gzip'})
+        self.assertEqual(accepted_encodings('gzip;q=0, br;q=0'), set())
+
+    def test_list_responses_are_compressed_by_negotiation(self):
+        client = APIClient()
+        plain = client.get('/books/', {'page_size': 20})
+        self.assertNotIn('Content-Encoding', plain)
+
+        response = client.get('/books/', {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = client.get('/books/', {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_refused_encodings_are_not_used(self):
+        client = APIClient()
+        for header in ('gzip;q=0', 'br;q=0, gzip;q=0', 'identity'):
+            response = client.get('/books/', {'page_size': 20}, HTTP_ACCEPT_ENCODING=header)
+            self.assertNotIn('Content-Encoding', response, header)
+
+    def test_html_pages_are_not_compressed(self):
+        response = Client().get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        response = APIClient().get('/books/', {'page_size': 20}, HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='br')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_small_responses_are_not_compressed(self):
+        response = APIClient().get('/books/', {'isbn': 'none'}, HTTP_ACCEPT_ENCODING='br')
+        self.assertNotIn('Content-Encoding', response)
+
+
+@unittest.skipUnless(settings.ENABLE_API_DOCS, 'API docs are disabled')
+class ApiDocsTests(TestCase):
+    def setUp(self):
+        from drf_yasg.generators import OpenAPISchemaGenerator
+
+        cache.clear()
+        patcher = mock.patch.object(
+            OpenAPISchemaGenerator, 'get_schema', autospec=True, side_effect=OpenAPISchemaGenerator.get_schema,
+        )
+        self.get_schema = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_collected_schema_is_served_as_a_static_file(self):
+        response = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(response.status_code, 302)
+        self.assertRegex(response['Location'], r'/library/api-docs/openapi\.[0-9a-f]{12}\.json$')
+
+        schema = json.loads(b''.join(self.client.get(response['Location']).streaming_content))
+        self.assertIn('/books/', schema['paths'])
+        self.get_schema.assert_not_called()
+
+    def test_schema_is_generated_once_without_a_collected_copy(self):
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            first = self.client.get('/swagger/', {'format': 'openapi'})
+            second = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.get_schema.call_count, 1)
+
+    def test_write_schema(self):
+        from library_management.api_docs import write_schema
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = write_schema(Path(directory) / 'api-docs' / 'openapi.json')
+            schema = json.loads(path.read_text())
+        self.assertIn('/books/', schema['paths'])
+        self.assertNotIn('host', schema)
@@ -1,18 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import MemberViewSet, AuthorViewSet, CategoryViewSet, BookViewSet,\
-    BorrowViewSet, ReservationViewSet
+    BranchViewSet, BookCopyViewSet, BorrowViewSet, ReservationViewSet, ChangeEventViewSet, LoginView
 
 router = DefaultRouter()
 router.register(r'members', MemberViewSet, basename='member')
 router.register(r'authors', AuthorViewSet, basename='author')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'books', BookViewSet, basename='book')
+router.register(r'branches', BranchViewSet, basename='branch')
+router.register(r'copies', BookCopyViewSet, basename='copy')
 router.register(r'borrows', BorrowViewSet, basename='borrow')
 router.register(r'reservations', ReservationViewSet, basename='reservations')
+router.register(r'changes', ChangeEventViewSet, basename='change')
 
 urlpatterns = [
     path('', include(router.urls)),             # Your custom member routes
+    path('auth/jwt/create/', LoginView.as_view(), name='jwt-create'),  # Throttled JWT login
     path('auth/', include('djoser.urls')),          # Djoser endpoints
     path('auth/', include('djoser.urls.jwt')),      # Djoser JWT endpoints
 ]
\ No newline at end of file
@@ -1,14 +1,88 @@
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.http import Http404
+from django.db.models import BooleanField, ProtectedError, Value
+from django.utils import timezone
 from .serializers import MemberSerializer, AuthorSerializer, CategorySerializer, BookSerializer,\
-    BorrowSerializer, ReservationSerializer
-from .models import Member, Category, Book, Author, Borrow, Reservation
+    RelatedBookSerializer, BorrowSerializer, BorrowHistorySerializer, ReservationSerializer,\
+    BranchSerializer, BookCopySerializer, BranchAvailabilitySerializer, ChangeEventSerializer
+from .models import Member, Category, Book, Author, Borrow, BorrowArchive, Reservation, BookNeighbor,\
+    Branch, BookCopy, BranchAvailability, ChangeEvent
+from .outbox import record_change, record_deletion, changes_since
+from .availability import publish_availability
+from . import inventory
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
-from rest_framework import serializers, viewsets, permissions, filters
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.response import Response
+from rest_framework import serializers, viewsets, permissions, filters, status
 from .permissions import IsAdminOrSelf
+from .filters import BookFilterSet
 from datetime import date
 from rest_framework.decorators import action
 from .permissions import IsAdminOrSelf, IsAdminOrReadOnly
 
+
+def record_book_counts(book, tracked):
+    """
+    Publishes a book whose copy counters were just changed with F() expressions
+    to the change feed and the live availability stream.
+
+    For books with `tracked` copies only the branch counters changed in the
+    current transaction; the book's totals are rolled up from them once it
+    commits, in a short transaction of their own.
+    """
+    if tracked:
+        book_id = book.pk
+        transaction.on_commit(lambda: _roll_up_book_counts(book_id), robust=True)
+        return
+
+    book.refresh_from_db(fields=['total_copies', 'available_copies'])
+    record_change(book, ChangeEvent.UPDATED)
+    publish_availability(book)
+
+
+def _roll_up_book_counts(book_id):
+    with transaction.atomic():
+        book = inventory.refresh_book_totals(book_id)
+        if book is not None:
+            record_change(book, ChangeEvent.UPDATED)
+            publish_availability(book)
+
+
+class ChangeFeedMixin:
+    """
+    Writes a `ChangeEvent` in the same transaction as every create, update and
+    delete made through the viewset. Deletes also write events for the borrows
+    and reservations they cascade to.
+    """
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            record_change(serializer.instance, ChangeEvent.CREATED)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+            record_change(serializer.instance, ChangeEvent.UPDATED)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            record_deletion(instance)
+            super().perform_destroy(instance)
+
+
+class LoginView(TokenObtainPairView):
+    """
+    Issues a JWT pair, like djoser's `jwt/create` endpoint it replaces.
+
+    - Rate limited per client with the 'login' throttle scope.
+    - Password checks run on the bounded hashing pool of `BoundedHashingBackend`.
+    """
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'login'
+
+
 class MemberViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Member instances.
@@ -21,10 +95,23 @@ class MemberViewSet(viewsets.ModelViewSet):
     Custom Actions:
     - me (GET): Returns the current authenticated user's profile data.
     - me (PUT): Allows the authenticated user to partially update their own profile.
+
+    Deleting a member puts the copies of their open borrows back on the shelf
+    and writes change feed events for the borrows and reservations deleted
+    with them.
     """
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            for borrow in Borrow.objects.filter(member=instance, return_date__isnull=True)\
+                    .select_related('book').select_for_update(of=('self',)):
+                inventory.checkin(borrow)
+                record_book_counts(borrow.book, tracked=borrow.copy_id is not None)
+            record_deletion(instance)
+            instance.delete()
+
     def get_permissions(self):
         if self.action in ['list', 'create', 'destroy']:
             return [permissions.IsAdminUser()]
@@ -71,7 +158,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Book instances.
 
@@ -79,34 +166,148 @@ class BookViewSet(viewsets.ModelViewSet):
     - Read operations are available to all users.
     - Write operations (create, update, delete) are restricted to admin users.
 
+    Copy counts of books stocked through /copies/ are maintained by the
+    inventory and can't be edited here.
+
     Features:
-    - Filtering by category name and author name fields.
+    - Filtering through `BookFilterSet`: availability (optionally at one
+      branch), ISBN, book/author/category id lists, category name and author names.
     - Searching by book title, author name, and category name.
     - Ordering by title and number of available copies.
+    - Related books ("members who borrowed this also borrowed"): the top few
+      on the detail view, all stored neighbours via the 'related' action.
+    - Per-branch copy counts via the 'availability' action.
     """
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrReadOnly]
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     
-    filterset_fields = ['category__name', 'authors__first_name', 'authors__last_name']
-    search_fields = ['title', 'authors__name', 'category__name']
+    filterset_class = BookFilterSet
+    search_fields = ['title', 'authors__first_name', 'authors__last_name', 'category__name']
     ordering_fields = ['title', 'available_copies']
+    ordering = ['title', 'id']
+    related_on_detail = 5
 
     def get_queryset(self):
         return Book.objects.select_related('category').prefetch_related('authors')
 
+    def perform_update(self, serializer):
+        """
+        Saves the book and, when an admin changed `available_copies` of a book
+        without tracked copies, sends the new count to live availability subscribers.
+        """
+        previous = serializer.instance.available_copies
+        with transaction.atomic():
+            super().perform_update(serializer)
+            if serializer.instance.available_copies != previous:
+                publish_availability(serializer.instance)
 
+    def get_related(self, book_id):
+        return BookNeighbor.objects.filter(book_id=book_id).select_related('neighbor').order_by('rank')
 
-class BorrowViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Returns a book with its top related books under `related`.
+        """
+        book = self.get_object()
+        data = self.get_serializer(book).data
+        related = self.get_related(book.pk)[:self.related_on_detail]
+        data['related'] = RelatedBookSerializer(related, many=True).data
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        Lists books most often borrowed by members who also borrowed this book.
+
+        - Served from neighbours precomputed by the `build_recommendations` command.
+        - Returns an empty list until the first build has run.
+        - Reads the neighbour rows only; the book itself is only looked up
+          when it has none, to tell an unknown id from a book without neighbours.
+        """
+        try:
+            book_id = int(pk)
+        except ValueError:
+            raise Http404
+        related = list(self.get_related(book_id))
+        if not related and not Book.objects.filter(pk=book_id).exists():
+            raise Http404
+        return Response(RelatedBookSerializer(related, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """
+        Lists how many copies of the book each branch holds and has on the shelf.
+        """
+        counts = BranchAvailability.objects.filter(book=self.get_object())\
+            .select_related('branch').order_by('branch__name')
+        serializer = BranchAvailabilitySerializer(counts, many=True)
+        return Response(serializer.data)
+
+
+class BranchViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for managing library branches.
+
+    - Read operations are accessible to all users.
+    - Write operations (create, update, delete) are restricted to admin users only.
+    - Branches that still hold copies cannot be deleted.
+    """
+    queryset = Branch.objects.order_by('name')
+    serializer_class = BranchSerializer
+    permission_classes = [IsAdminOrReadOnly]
+
+    def perform_destroy(self, instance):
+        try:
+            instance.delete()
+        except ProtectedError:
+            raise serializers.ValidationError({
+                "detail": "This branch still holds copies. Delete or move them through /copies/ first."
+            })
+
+
+class BookCopyViewSet(viewsets.ModelViewSet):
+    """
+    Admin endpoint for the physical copies held at each branch.
+
+    - Creating a copy puts it on the shelf and updates the branch and book counters.
+    - Only copies on the shelf can be deleted.
+    - Copies can't be edited; delete and recreate one to move it to another branch.
+    """
+    serializer_class = BookCopySerializer
+    permission_classes = [IsAdminUser]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+    filterset_fields = ['book', 'branch', 'status']
+
+    def get_queryset(self):
+        return BookCopy.objects.select_related('book', 'branch').order_by('id')
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            copy = serializer.save(status=BookCopy.AVAILABLE)
+            inventory.add_copy(copy)
+            record_book_counts(copy.book, tracked=True)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            inventory.remove_copy(instance)
+            record_book_counts(instance.book, tracked=True)
+
+
+
+class BorrowViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing borrowing of books by members.
 
     - Admins can view, create, and manage all borrow records.
     - Members can view and create their own borrow records.
     - Books cannot be borrowed if no available copies exist.
-    - Automatically decreases the available copies on borrow.
-    - Includes custom actions for returning books and viewing overdue borrows.
+    - Automatically decreases the available copies on borrow, and increases
+      them on return or when an open borrow is deleted.
+    - The return date can only be set through the 'return_book' action.
+    - Includes custom actions for returning books, viewing overdue borrows and
+      browsing borrow history including archived records.
     """
     serializer_class = BorrowSerializer
     permission_classes = [IsAdminOrSelf]
@@ -134,22 +335,38 @@ class BorrowViewSet(viewsets.ModelViewSet):
         """
         Handles borrowing a book.
 
-        - Validates book availability.
-        - Decreases book's available copies.
+        - Takes an available copy off the shelf, from the requested branch if one is given.
+        - Decreases the book's and the branch's available copies.
         - Assigns the authenticated user as member if not admin.
         """
         book = serializer.validated_data['book']
+        branch = serializer.validated_data.pop('branch', None)
 
-        if book.available_copies < 1:
-            raise serializers.ValidationError({"detail": "No copies available for borrowing."})
+        with transaction.atomic():
+            copy = inventory.checkout(book, branch)
 
-        book.available_copies -= 1
-        book.save()
+            if self.request.user.is_staff:
+                serializer.save(copy=copy)
+            else:
+                serializer.save(member=self.request.user, copy=copy)
 
-        if self.request.user.is_staff:
-            serializer.save()
-        else:
-            serializer.save(member=self.request.user)
+            record_change(serializer.instance, ChangeEvent.CREATED)
+            record_book_counts(book, tracked=copy is not None)
+
+    def perform_destroy(self, instance):
+        """
+        Deletes a borrow record. A borrow that was still open puts its copy
+        back on the shelf and increments the available copies.
+        """
+        with transaction.atomic():
+            borrow = Borrow.objects.select_for_update().filter(pk=instance.pk).first()
+            if borrow is None:
+                return
+            record_change(borrow, ChangeEvent.DELETED)
+            borrow.delete()
+            if borrow.return_date is None:
+                inventory.checkin(borrow)
+                record_book_counts(instance.book, tracked=borrow.copy_id is not None)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def return_book(self, request, pk=None):
@@ -157,17 +374,22 @@ class BorrowViewSet(viewsets.ModelViewSet):
         Marks a borrowed book as returned.
 
         - Sets the return date.
-        - Increments the book's available copies.
+        - Puts the copy back on the shelf and increments the available copies.
         - Fails if the book is already returned.
         """
         borrow = self.get_object()
-        if borrow.return_date:
-            return Response({"detail": "Book already returned."}, status=status.HTTP_400_BAD_REQUEST)
 
-        borrow.return_date = timezone.now().date()
-        borrow.book.available_copies += 1
-        borrow.book.save()
-        borrow.save()
+        with transaction.atomic():
+            returned = Borrow.objects.filter(pk=borrow.pk, return_date__isnull=True)\
+                .update(return_date=timezone.now().date())
+            if not returned:
+                return Response({"detail": "Book already returned."}, status=status.HTTP_400_BAD_REQUEST)
+            inventory.checkin(borrow)
+
+            borrow.return_date = timezone.now().date()
+            record_change(borrow, ChangeEvent.UPDATED)
+            record_book_counts(borrow.book, tracked=borrow.copy_id is not None)
+
         return Response({"detail": "Book returned successfully."})
 
     @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
@@ -183,9 +405,47 @@ class BorrowViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(overdue_borrows, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def history(self, request):
+        """
+        Lists borrow history, newest first.
+
+        - Members see their own history; admins see everyone's, optionally
+          narrowed with `?member=<id>`.
+        - `?full=true` also includes records moved to the archive table by
+          the `archive_borrows` command.
+        """
+        fields = ['id', 'member', 'book', 'book__title', 'borrow_date', 'due_date', 'return_date']
+
+        member_filter = {}
+        if not request.user.is_staff:
+            member_filter['member'] = request.user
+        elif request.query_params.get('member'):
+            try:
+                member_filter['member_id'] = int(request.query_params['member'])
+            except ValueError:
+                raise serializers.ValidationError({"detail": "`member` must be an integer."})
+
+        history = Borrow.objects.filter(**member_filter)\
+            .values(*fields, archived=Value(False, output_field=BooleanField()))
+
+        if request.query_params.get('full', '').lower() in ('1', 'true', 'yes'):
+            archived = BorrowArchive.objects.filter(**member_filter)\
+                .values(*fields, archived=Value(True, output_field=BooleanField()))
+            history = history.union(archived, all=True)
+
+        history = history.order_by('-borrow_date', '-id')
+
+        page = self.paginate_queryset(history)
+        if page is not None:
+            serializer = BorrowHistorySerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = BorrowHistorySerializer(history, many=True)
+        return Response(serializer.data)
+
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing book reservations.
 
@@ -217,7 +477,9 @@ class ReservationViewSet(viewsets.ModelViewSet):
 
         - Automatically assigns the reservation to the authenticated user.
         """
-        serializer.save(member=self.request.user)
+        with transaction.atomic():
+            serializer.save(member=self.request.user)
+            record_change(serializer.instance, ChangeEvent.CREATED)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def cancel(self, request, pk=None):
@@ -231,5 +493,41 @@ class ReservationViewSet(viewsets.ModelViewSet):
         if not reservation.is_active:
             return Response({"detail": "Reservation already canceled."}, status=status.HTTP_400_BAD_REQUEST)
         reservation.is_active = False
-        reservation.save()
+        with transaction.atomic():
+            reservation.save()
+            record_change(reservation, ChangeEvent.UPDATED)
         return Response({"detail": "Reservation canceled successfully."})
+
+
+class ChangeEventViewSet(viewsets.GenericViewSet):
+    """
+    Admin-only feed of Book, Borrow and Reservation changes for downstream systems.
+
+    - `?since=<cursor>` returns events after the cursor, in commit order.
+    - `?limit=` caps the batch size (default 100, at most 1000).
+    - `?entity=book|borrow|reservation` narrows the feed to one kind of record.
+    - Pass the returned `next_cursor` as `since` to read the next batch.
+    - Deleting a book or member also emits DELETED events for the borrows and
+      reservations deleted with it. DELETED events carry the row's last values.
+    """
+    serializer_class = ChangeEventSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = None
+
+    def get_queryset(self):
+        return ChangeEvent.objects.order_by('position')
+
+    def list(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 1000)
+        except ValueError:
+            raise serializers.ValidationError({"detail": "`since` and `limit` must be integers."})
+
+        events = changes_since(since, limit, request.query_params.get('entity'))
+        serializer = self.get_serializer(events, many=True)
+        return Response({
+            'next_cursor': events[-1].position if events else since,
+            'has_more': len(events) == limit,
+            'results': serializer.data,
+        })
@@ -0,0 +1,99 @@
+"""
+Swagger and ReDoc views for the API.
+
+drf_yasg is comparatively slow to import, so ``urls.py`` only references these
+views by dotted path and they are loaded on the first docs request.
+
+The OpenAPI JSON schema is written by ``write_schema`` when ``collectstatic``
+runs and served as a hashed static file, so serverless instances don't
+generate it on a cold start.
+"""
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.shortcuts import redirect
+from rest_framework import permissions
+from rest_framework.response import Response
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.views import get_schema_view
+from drf_yasg import openapi
+
+
+# Static path of the schema written at collectstatic time.
+SCHEMA_STATIC_PATH = 'library/api-docs/openapi.json'
+SCHEMA_SOURCE = Path(__file__).resolve().parent.parent / 'library' / 'static' / SCHEMA_STATIC_PATH
+
+API_INFO = openapi.Info(
+   title="Library Management API",
+   default_version='v1',
+   description="API documentation for the Library Management REST API",
+   terms_of_service="https://www.google.com/policies/terms/",
+   contact=openapi.Contact(email="libman@gmail.com"),
+   license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+   API_INFO,
+   public=True,
+   permission_classes=(permissions.AllowAny,),
+)
+
+
+def write_schema(path=SCHEMA_SOURCE):
+    """
+    Generates the public OpenAPI schema and writes it to ``path`` as JSON. It
+    has no host, so clients resolve it against the origin they loaded it from.
+    """
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(OpenAPICodecJson(validators=[]).encode(schema))
+    return path
+
+
+def precomputed_schema_url():
+    """
+    URL of the hashed schema written by ``collectstatic``, or None if it
+    hasn't been collected. Always None with DEBUG, so the docs follow code changes.
+    """
+    if settings.DEBUG:
+        return None
+    try:
+        staticfiles_storage.stored_name(SCHEMA_STATIC_PATH)
+    except ValueError:
+        return None
+    return staticfiles_storage.url(SCHEMA_STATIC_PATH)
+
+
+class CachedSchemaView(schema_view):
+    """
+    Redirects requests for the JSON schema to the copy precomputed at
+    collectstatic time. Other formats, and the JSON schema when none was
+    collected, are generated once per renderer, host and version and served
+    from the cache afterwards. The schema is public, so unlike drf_yasg's
+    ``cache_page`` wrapper this doesn't need to vary on the user's cookies or
+    Authorization header.
+    """
+    precomputed_formats = ('openapi', '.json')
+
+    def get(self, request, version='', format=None):
+        if request.accepted_renderer.format in self.precomputed_formats:
+            url = precomputed_schema_url()
+            if url is not None:
+                return redirect(url)
+
+        version = request.version or version or ''
+        key = f"api-docs:{request.accepted_renderer.format}:{request.scheme}://{request.get_host()}:{version}"
+        schema = cache.get(key)
+        if schema is not None:
+            return Response(schema)
+
+        response = super().get(request, version, format)
+        cache.set(key, response.data, settings.API_DOCS_CACHE_TIMEOUT)
+        return response
+
+
+swagger_ui = CachedSchemaView.with_ui('swagger')
+redoc_ui = CachedSchemaView.with_ui('redoc')
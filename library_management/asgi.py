@@ -3,6 +3,10 @@ ASGI config for library_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests for the live book availability stream are answered by
+``library.availability.availability_stream`` directly; everything else goes
+to Django.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +17,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from library.availability import availability_stream  # noqa: E402  (needs the app registry)
+
+AVAILABILITY_STREAM_PATH = '/books/availability/stream/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == AVAILABILITY_STREAM_PATH:
+        await availability_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
@@ -14,7 +15,13 @@ AUTH_USER_MODEL = 'library.Member'
 SECRET_KEY = config('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = False
+DEBUG = config('DEBUG', default=False, cast=bool)
+
+# Optional tooling. When disabled these are left out of INSTALLED_APPS,
+# MIDDLEWARE and the URLconf entirely, so serverless cold starts don't pay
+# for importing them. The API docs views are imported on first use either way.
+ENABLE_API_DOCS = config('ENABLE_API_DOCS', default=True, cast=bool)
+ENABLE_DEBUG_TOOLBAR = config('ENABLE_DEBUG_TOOLBAR', default=DEBUG, cast=bool)
 
 INTERNAL_IPS = [
     # ...
@@ -28,6 +35,9 @@ ALLOWED_HOSTS = ['.vercel.app', '127.0.0.1']
 # Application definition
 
 INSTALLED_APPS = [
+    # Listed before staticfiles so its collectstatic, which also writes the
+    # API schema, takes precedence.
+    'library',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -35,18 +45,16 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     "whitenoise.runserver_nostatic",
-    'drf_yasg',
-    "debug_toolbar",
     'rest_framework',
     'rest_framework.authtoken',
     'rest_framework_simplejwt.token_blacklist',
     'djoser',
-    'library',
     'django_filters',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'library.middleware.CompressionMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,9 +62,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+if ENABLE_API_DOCS:
+    INSTALLED_APPS.append('drf_yasg')
+
+if ENABLE_DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'library_management.urls'
 
 TEMPLATES = [
@@ -118,6 +132,35 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PASSWORD_HASHER picks the hasher for new and upgraded hashes; the others are
+# kept so existing hashes still verify and are rehashed on the next login.
+
+_PASSWORD_HASHERS = {
+    'argon2': 'library.hashers.TunedArgon2PasswordHasher',
+    'scrypt': 'library.hashers.TunedScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='argon2')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=1, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2**14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+
+# Password checks run on a bounded pool (library.backends) so logins can't use
+# more than this many cores; logins arriving while MAX_PENDING hashes are
+# already queued get a 429 immediately rather than holding a request thread.
+AUTHENTICATION_BACKENDS = ['library.backends.BoundedHashingBackend']
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=max(1, (os.cpu_count() or 2) // 2), cast=int)
+PASSWORD_HASHING_MAX_PENDING = config('PASSWORD_HASHING_MAX_PENDING', default=8, cast=int)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -137,7 +180,19 @@ STATIC_URL = 'static/'
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
+# Content-hashed file names plus gzip and brotli copies are written at
+# collectstatic time. WhiteNoise serves the hashed files with far-future,
+# immutable cache headers and picks the precompressed variant the client accepts.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -145,6 +200,22 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Returned borrows older than this are moved to BorrowArchive by `manage.py archive_borrows`.
+BORROW_ARCHIVE_AFTER_DAYS = config('BORROW_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+
+# Live availability stream served by library_management/asgi.py. Use
+# 'library.availability.ChangeFeedBackend' when running more than one worker.
+AVAILABILITY_EVENTS_BACKEND = config('AVAILABILITY_EVENTS_BACKEND', default='library.availability.InProcessBackend')
+AVAILABILITY_EVENTS_POLL_SECONDS = config('AVAILABILITY_EVENTS_POLL_SECONDS', default=1.0, cast=float)
+AVAILABILITY_STREAM_HEARTBEAT_SECONDS = config('AVAILABILITY_STREAM_HEARTBEAT_SECONDS', default=15, cast=int)
+
+# API responses at least this many bytes long are compressed with brotli or
+# gzip, whichever the client accepts. Brotli quality 11 is too slow for
+# per-request use; 4-6 compresses better than gzip at a similar cost.
+API_COMPRESSION_MIN_SIZE = config('API_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+API_COMPRESSION_BROTLI_QUALITY = config('API_COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
+
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -155,8 +226,15 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'library.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'library.pagination.CustomPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_RATES': {
+        'login': config('LOGIN_THROTTLE_RATE', default='20/min'),
+    },
 }
 
 
@@ -178,6 +256,10 @@ DJOSER = {
     }
 }
 
+# Seconds a generated API schema is reused before being regenerated. The JSON
+# schema is normally precomputed by collectstatic instead; see api_docs.py.
+API_DOCS_CACHE_TIMEOUT = config('API_DOCS_CACHE_TIMEOUT', default=86400, cast=int)
+
 SWAGGER_SETTINGS = {
    'SECURITY_DEFINITIONS': {
       'Bearer': {
@@ -1,29 +1,34 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from debug_toolbar.toolbar import debug_toolbar_urls
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Library Management API",
-      default_version='v1',
-      description="API documentation for the Library Management REST API",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="libman@gmail.com"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from django.utils.module_loading import import_string
+
+
+def lazy_view(dotted_path):
+    """
+    Returns a view that imports ``dotted_path`` on its first request instead of
+    when the URLconf is loaded.
+    """
+    def view(request, *args, **kwargs):
+        return import_string(dotted_path)(request, *args, **kwargs)
+
+    # The wrapped views are DRF views, which do their own CSRF checks.
+    view.csrf_exempt = True
+    return view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('library.urls')),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-] + debug_toolbar_urls()
+]
+
+if settings.ENABLE_API_DOCS:
+    urlpatterns += [
+        path('swagger/', lazy_view('library_management.api_docs.swagger_ui'), name='schema-swagger-ui'),
+        path('redoc/', lazy_view('library_management.api_docs.redoc_ui'), name='schema-redoc'),
+    ]
+
+if settings.ENABLE_DEBUG_TOOLBAR:
+    from debug_toolbar.toolbar import debug_toolbar_urls
 
+    urlpatterns += debug_toolbar_urls()
@@ -1,3 +1,3 @@
 /*! For license information please see swagger-ui-es-bundle-core.js.LICENSE.txt */
 import*as e from"react-immutable-pure-component";import*as t from"remarkable/linkify";import*as r from"dompurify";import*as n from"zenscroll";import*as a from"lodash/reduce";import*as l from"@babel/runtime-corejs3/core-js-stable/instance/repeat";import*as s from"@babel/runtime-corejs3/core-js-stable/instance/fill";import*as o from"lodash/zipObject";import*as i from"randexp";import*as u from"lodash/isEmpty";import*as c from"@babel/runtime-corejs3/core-js-stable/promise";import*as d from"@babel/runtime-corejs3/core-js-stable/date/now";import*as p from"lodash/isString";import*as f from"lodash/debounce";import*as h from"lodash/set";import*as m from"swagger-client/es/resolver";import*as g from"swagger-client/es/execute";import*as y from"swagger-client/es/http";import*as v from"swagger-client/es/subtree-resolver";import*as E from"react-dom";import*as b from"react-redux";import*as S from"lodash/omit";import*as _ from"lodash/identity";import*as w from"react-syntax-highlighter/dist/esm/light";import*as C from"react-syntax-highlighter/dist/esm/languages/hljs/javascript";import*as x from"react-syntax-highlighter/dist/esm/languages/hljs/json";import*as A from"react-syntax-highlighter/dist/esm/languages/hljs/xml";import*as I from"react-syntax-highlighter/dist/esm/languages/hljs/bash";import*as R from"react-syntax-highlighter/dist/esm/languages/hljs/yaml";import*as N from"react-syntax-highlighter/dist/esm/languages/hljs/http";import*as T from"react-syntax-highlighter/dist/esm/languages/hljs/powershell";import*as O from"react-syntax-highlighter/dist/esm/styles/hljs/agate";import*as k from"react-syntax-highlighter/dist/esm/styles/hljs/arta";import*as M from"react-syntax-highlighter/dist/esm/styles/hljs/monokai";import*as P from"react-syntax-highlighter/dist/esm/styles/hljs/nord";import*as j from"react-syntax-highlighter/dist/esm/styles/hljs/obsidian";import*as L from"react-syntax-highlighter/dist/esm/styles/hljs/tomorrow-night";import*as q from"@braintree/sanitize-url";import*as B from"lodash/camelCase";import*as D from"lodash/upperFirst";import*as U from"lodash/find";import*as V from"lodash/some";import*as z from"lodash/eq";import*as F from"css.escape";import*as $ from"@babel/runtime-corejs3/core-js-stable/instance/find-index";import*as J from"@babel/runtime-corejs3/core-js-stable/array/from";import*as W from"@babel/runtime-corejs3/core-js-stable/array/is-array";import*as H from"@babel/runtime-corejs3/core-js-stable/instance/bind";import*as K from"@babel/runtime-corejs3/core-js-stable/instance/concat";import*as G from"@babel/runtime-corejs3/core-js-stable/instance/entries";import*as Z from"@babel/runtime-corejs3/core-js-stable/instance/every";import*as Y from"@babel/runtime-corejs3/core-js-stable/instance/filter";import*as X from"@babel/runtime-corejs3/core-js-stable/instance/find";import*as Q from"@babel/runtime-corejs3/core-js-stable/instance/for-each";import*as ee from"@babel/runtime-corejs3/core-js-stable/instance/includes";import*as te from"@babel/runtime-corejs3/core-js-stable/instance/index-of";import*as re from"@babel/runtime-corejs3/core-js-stable/instance/keys";import*as ne from"@babel/runtime-corejs3/core-js-stable/instance/map";import*as ae from"@babel/runtime-corejs3/core-js-stable/instance/reduce";import*as le from"@babel/runtime-corejs3/core-js-stable/instance/slice";import*as se from"@babel/runtime-corejs3/core-js-stable/instance/some";import*as oe from"@babel/runtime-corejs3/core-js-stable/instance/sort";import*as ie from"@babel/runtime-corejs3/core-js-stable/instance/starts-with";import*as ue from"@babel/runtime-corejs3/core-js-stable/instance/trim";import*as ce from"@babel/runtime-corejs3/core-js-stable/json/stringify";import*as de from"@babel/runtime-corejs3/core-js-stable/map";import*as pe from"@babel/runtime-corejs3/core-js-stable/object/assign";import*as fe from"@babel/runtime-corejs3/core-js-stable/object/keys";import*as he from"@babel/runtime-corejs3/core-js-stable/object/values";import*as me from"@babel/runtime-corejs3/core-js-stable/set-timeout";import*as ge from"@babel/runtime-corejs3/core-js-stable/url";import*as ye from"@babel/runtime-corejs3/helpers/defineProperty";import*as ve from"@babel/runtime-corejs3/helpers/extends";import*as Ee from"base64-js";import*as be from"classnames";import*as Se from"ieee754";import*as _e from"immutable";import*as we from"js-yaml";import*as Ce from"lodash/get";import*as xe from"lodash/isFunction";import*as Ae from"lodash/memoize";import*as Ie from"prop-types";import*as Re from"react";import*as Ne from"react-copy-to-clipboard";import*as Te from"react-immutable-proptypes";import*as Oe from"redux";import*as ke from"remarkable";import*as Me from"reselect";import*as Pe from"serialize-error";import*as je from"swagger-client/es/helpers";import*as Le from"url-parse";import*as qe from"@babel/runtime-corejs3/core-js-stable/instance/last-index-of";import*as Be from"redux-immutable";import*as De from"lodash/merge";import*as Ue from"lodash/toString";import*as Ve from"@babel/runtime-corejs3/core-js-stable/instance/splice";import*as ze from"js-file-download";import*as Fe from"@babel/runtime-corejs3/core-js-stable/instance/values";import*as $e from"xml-but-prettier";import*as Je from"lodash/toLower";import*as We from"react-debounce-input";var He={1543:(t,r,n)=>{n.d(r,{Z:()=>p});var a=n(863),l=n(775),s=n(8818),o=n(2565),i=n(810);const u=(e=>{var t={};return n.d(t,e),t})({default:()=>e.default});var c=n(9569),d=n(5053);class p extends u.default{constructor(){super(...arguments),(0,l.default)(this,"getModelName",(e=>-1!==(0,s.default)(e).call(e,"#/definitions/")?e.replace(/^.*#\/definitions\//,""):-1!==(0,s.default)(e).call(e,"#/components/schemas/")?e.replace(/^.*#\/components\/schemas\//,""):void 0)),(0,l.default)(this,"getRefSchema",(e=>{let{specSelectors:t}=this.props;return t.findDefinition(e)}))}render(){let{getComponent:e,getConfigs:t,specSelectors:r,schema:l,required:s,name:o,isRef:u,specPath:c,displayName:d,includeReadOnly:p,includeWriteOnly:f}=this.props;const h=e("ObjectModel"),m=e("ArrayModel"),g=e("PrimitiveModel");let y="object",v=l&&l.get("$$ref");if(!o&&v&&(o=this.getModelName(v)),!l&&v&&(l=this.getRefSchema(o)),!l)return i.default.createElement("span",{className:"model model-title"},i.default.createElement("span",{className:"model-title__text"},d||o),i.default.createElement("img",{src:n(2517),height:"20px",width:"20px"}));const E=r.isOAS3()&&l.get("deprecated");switch(u=void 0!==u?u:!!v,y=l&&l.get("type")||y,y){case"object":return i.default.createElement(h,(0,a.default)({className:"object"},this.props,{specPath:c,getConfigs:t,schema:l,name:o,deprecated:E,isRef:u,includeReadOnly:p,includeWriteOnly:f}));case"array":return i.default.createElement(m,(0,a.default)({className:"array"},this.props,{getConfigs:t,schema:l,name:o,deprecated:E,required:s,includeReadOnly:p,includeWriteOnly:f}));default:return i.default.createElement(g,(0,a.default)({},this.props,{getComponent:e,getConfigs:t,schema:l,name:o,deprecated:E,required:s}))}}}(0,l.default)(p,"propTypes",{schema:(0,o.default)(c.default).isRequired,getComponent:d.default.func.isRequired,getConfigs:d.default.func.isRequired,specSelectors:d.default.object.isRequired,name:d.default.string,displayName:d.default.string,isRef:d.default.bool,required:d.default.bool,expandDepth:d.default.number,depth:d.default.number,specPath:c.default.list.isRequired,includeReadOnly:d.default.bool,includeWriteOnly:d.default.bool})},5623:(e,t,r)=>{r.d(t,{Z:()=>u});var n=r(775),a=r(2740),l=r(810),s=r(8900),o=(r(5053),r(6298)),i=r(7504);class u extends l.default.Component{constructor(e,t){super(e,t),(0,n.default)(this,"getDefinitionUrl",(()=>{let{specSelectors:e}=this.props;return new s.default(e.url(),i.Z.location).toString()}));let{getConfigs:r}=e,{validatorUrl:a}=r();this.state={url:this.getDefinitionUrl(),validatorUrl:void 0===a?"https://validator.swagger.io/validator":a}}UNSAFE_componentWillReceiveProps(e){let{getConfigs:t}=e,{validatorUrl:r}=t();this.setState({url:this.getDefinitionUrl(),validatorUrl:void 0===r?"https://validator.swagger.io/validator":r})}render(){let{getConfigs:e}=this.props,{spec:t}=e(),r=(0,o.Nm)(this.state.validatorUrl);return"object"==typeof t&&(0,a.default)(t).length?null:this.state.url&&(0,o.hW)(this.state.validatorUrl)&&(0,o.hW)(this.state.url)?l.default.createElement("span",{className:"float-right"},l.default.createElement("a",{target:"_blank",rel:"noopener noreferrer",href:`${r}/debug?url=${encodeURIComponent(this.state.url)}`},l.default.createElement(c,{src:`${r}?url=${encodeURIComponent(this.state.url)}`,alt:"Online validator badge"}))):null}}class c extends l.default.Component{constructor(e){super(e),this.state={loaded:!1,error:!1}}componentDidMount(){const e=new Image;e.onload=()=>{this.setState({loaded:!0})},e.onerror=()=>{this.setState({error:!0})},e.src=this.props.src}UNSAFE_componentWillReceiveProps(e){if(e.src!==this.props.src){const t=new Image;t.onload=()=>{this.setState({loaded:!0})},t.onerror=()=>{this.setState({error:!0})},t.src=e.src}}render(){return this.state.error?l.default.createElement("img",{alt:"Error"}):this.state.loaded?l.default.createElement("img",{src:this.props.src,alt:this.props.alt}):null}}},5466:(e,n,a)=>{a.d(n,{Z:()=>d,s:()=>p});var l=a(810),s=(a(5053),a(3952));const o=(e=>{var t={};return a.d(t,e),t})({linkify:()=>t.linkify});const i=(e=>{var t={};return a.d(t,e),t})({default:()=>r.default});var u=a(8096);function c(e){let{source:t,className:r="",getConfigs:n}=e;if("string"!=typeof t)return null;const a=new s.Remarkable({html:!0,typographer:!0,breaks:!0,linkTarget:"_blank"}).use(o.linkify);a.core.ruler.disable(["replacements","smartquotes"]);const{useUnsafeMarkdown:i}=n(),c=a.render(t),d=p(c,{useUnsafeMarkdown:i});return t&&c&&d?l.default.createElement("div",{className:(0,u.default)(r,"markdown"),dangerouslySetInnerHTML:{__html:d}}):null}i.default.addHook&&i.default.addHook("beforeSanitizeElements",(function(e){return e.href&&e.setAttribute("rel","noopener noreferrer"),e})),c.defaultProps={getConfigs:()=>({useUnsafeMarkdown:!1})};const d=c;function p(e){let{useUnsafeMarkdown:t=!1}=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};const r=t,n=t?[]:["style","class"];return t&&!p.hasWarnedAboutDeprecation&&(console.warn("useUnsafeMarkdown display configuration parameter is deprecated since >3.26.0 and will be removed in v4.0.0."),p.hasWarnedAboutDeprecation=!0),i.default.sanitize(e,{ADD_ATTR:["target"],FORBID_TAGS:["style","form"],ALLOW_DATA_ATTR:r,FORBID_ATTR:n})}p.hasWarnedAboutDeprecation=!1},5308:(e,t,r)=>{r.r(t),r.d(t,{default:()=>c});var n,a=r(29),l=r(5487),s=r(6298),o=r(8102);const i=r(5102),u={},c=u;(0,a.default)(n=(0,l.default)(i).call(i)).call(n,(function(e){if("./index.js"===e)return;let t=i(e);u[(0,s.Zl)(e)]=t.default?t.default:t})),u.SafeRender=o.default},5812:(e,t,r)=>{r.r(t),r.d(t,{AUTHORIZE:()=>u,AUTHORIZE_OAUTH2:()=>p,CONFIGURE_AUTH:()=>h,LOGOUT:()=>c,PRE_AUTHORIZE_OAUTH2:()=>d,RESTORE_AUTHORIZATION:()=>m,SHOW_AUTH_POPUP:()=>i,VALIDATE:()=>f,authPopup:()=>k,authorize:()=>y,authorizeAccessCodeWithBasicAuthentication:()=>I,authorizeAccessCodeWithFormParams:()=>A,authorizeApplication:()=>x,authorizeOauth2:()=>_,authorizeOauth2WithPersistOption:()=>w,authorizePassword:()=>C,authorizeRequest:()=>R,authorizeWithPersistOption:()=>v,configureAuth:()=>N,logout:()=>E,logoutWithPersistOption:()=>b,persistAuthorizationIfNeeded:()=>O,preAuthorizeImplicit:()=>S,restoreAuthorization:()=>T,showDefinitions:()=>g});var n=r(313),a=r(7512),l=r(8900),s=r(7504),o=r(6298);const i="show_popup",u="authorize",c="logout",d="pre_authorize_oauth2",p="authorize_oauth2",f="validate",h="configure_auth",m="restore_authorization";function g(e){return{type:i,payload:e}}function y(e){return{type:u,payload:e}}const v=e=>t=>{let{authActions:r}=t;r.authorize(e),r.persistAuthorizationIfNeeded()};function E(e){return{type:c,payload:e}}const b=e=>t=>{let{authActions:r}=t;r.logout(e),r.persistAuthorizationIfNeeded()},S=e=>t=>{let{authActions:r,errActions:a}=t,{auth:l,token:o,isValid:i}=e,{schema:u,name:c}=l,d=u.get("flow");delete s.Z.swaggerUIRedirectOauth2,"accessCode"===d||i||a.newAuthErr({authId:c,source:"auth",level:"warning",message:"Authorization may be unsafe, passed state was changed in server Passed state wasn't returned from auth server"}),o.error?a.newAuthErr({authId:c,source:"auth",level:"error",message:(0,n.default)(o)}):r.authorizeOauth2WithPersistOption({auth:l,token:o})};function _(e){return{type:p,payload:e}}const w=e=>t=>{let{authActions:r}=t;r.authorizeOauth2(e),r.persistAuthorizationIfNeeded()},C=e=>t=>{let{authActions:r}=t,{schema:n,name:l,username:s,password:i,passwordType:u,clientId:c,clientSecret:d}=e,p={grant_type:"password",scope:e.scopes.join(" "),username:s,password:i},f={};switch(u){case"request-body":!function(e,t,r){t&&(0,a.default)(e,{client_id:t});r&&(0,a.default)(e,{client_secret:r})}(p,c,d);break;case"basic":f.Authorization="Basic "+(0,o.r3)(c+":"+d);break;default:console.warn(`Warning: invalid passwordType ${u} was passed, not including client id and secret`)}return r.authorizeRequest({body:(0,o.GZ)(p),url:n.get("tokenUrl"),name:l,headers:f,query:{},auth:e})};const x=e=>t=>{let{authActions:r}=t,{schema:n,scopes:a,name:l,clientId:s,clientSecret:i}=e,u={Authorization:"Basic "+(0,o.r3)(s+":"+i)},c={grant_type:"client_credentials",scope:a.join(" ")};return r.authorizeRequest({body:(0,o.GZ)(c),name:l,url:n.get("tokenUrl"),auth:e,headers:u})},A=e=>{let{auth:t,redirectUrl:r}=e;return e=>{let{authActions:n}=e,{schema:a,name:l,clientId:s,clientSecret:i,codeVerifier:u}=t,c={grant_type:"authorization_code",code:t.code,client_id:s,client_secret:i,redirect_uri:r,code_verifier:u};return n.authorizeRequest({body:(0,o.GZ)(c),name:l,url:a.get("tokenUrl"),auth:t})}},I=e=>{let{auth:t,redirectUrl:r}=e;return e=>{let{authActions:n}=e,{schema:a,name:l,clientId:s,clientSecret:i,codeVerifier:u}=t,c={Authorization:"Basic "+(0,o.r3)(s+":"+i)},d={grant_type:"authorization_code",code:t.code,client_id:s,redirect_uri:r,code_verifier:u};return n.authorizeRequest({body:(0,o.GZ)(d),name:l,url:a.get("tokenUrl"),auth:t,headers:c})}},R=e=>t=>{let r,{fn:s,getConfigs:o,authActions:i,errActions:u,oas3Selectors:c,specSelectors:d,authSelectors:p}=t,{body:f,query:h={},headers:m={},name:g,url:y,auth:v}=e,{additionalQueryStringParams:E}=p.getConfigs()||{};if(d.isOAS3()){let e=c.serverEffectiveValue(c.selectedServer());r=(0,l.default)(y,e,!0)}else r=(0,l.default)(y,d.url(),!0);"object"==typeof E&&(r.query=(0,a.default)({},r.query,E));const b=r.toString();let S=(0,a.default)({Accept:"application/json, text/plain, */*","Content-Type":"application/x-www-form-urlencoded","X-Requested-With":"XMLHttpRequest"},m);s.fetch({url:b,method:"post",headers:S,query:h,body:f,requestInterceptor:o().requestInterceptor,responseInterceptor:o().responseInterceptor}).then((function(e){let t=JSON.parse(e.data),r=t&&(t.error||""),a=t&&(t.parseError||"");e.ok?r||a?u.newAuthErr({authId:g,level:"error",source:"auth",message:(0,n.default)(t)}):i.authorizeOauth2WithPersistOption({auth:v,token:t}):u.newAuthErr({authId:g,level:"error",source:"auth",message:e.statusText})})).catch((e=>{let t=new Error(e).message;if(e.response&&e.response.data){const r=e.response.data;try{const e="string"==typeof r?JSON.parse(r):r;e.error&&(t+=`, error: ${e.error}`),e.error_description&&(t+=`, description: ${e.error_description}`)}catch(e){}}u.newAuthErr({authId:g,level:"error",source:"auth",message:t})}))};function N(e){return{type:h,payload:e}}function T(e){return{type:m,payload:e}}const O=()=>e=>{let{authSelectors:t,getConfigs:r}=e;if(r().persistAuthorization){const e=t.authorized();localStorage.setItem("authorized",(0,n.default)(e.toJS()))}},k=(e,t)=>()=>{s.Z.swaggerUIRedirectOauth2=t,s.Z.open(e)}},3705:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i,preauthorizeApiKey:()=>c,preauthorizeBasic:()=>u});var n=r(5527),a=r(3962),l=r(5812),s=r(35),o=r(8302);function i(){return{afterLoad(e){this.rootInjects=this.rootInjects||{},this.rootInjects.initOAuth=e.authActions.configureAuth,this.rootInjects.preauthorizeApiKey=(0,n.default)(c).call(c,null,e),this.rootInjects.preauthorizeBasic=(0,n.default)(u).call(u,null,e)},statePlugins:{auth:{reducers:a.default,actions:l,selectors:s},spec:{wrapActions:o}}}}function u(e,t,r,n){const{authActions:{authorize:a},specSelectors:{specJson:l,isOAS3:s}}=e,o=s()?["components","securitySchemes"]:["securityDefinitions"],i=l().getIn([...o,t]);return i?a({[t]:{value:{username:r,password:n},schema:i.toJS()}}):null}function c(e,t,r){const{authActions:{authorize:n},specSelectors:{specJson:a,isOAS3:l}}=e,s=l()?["components","securitySchemes"]:["securityDefinitions"],o=a().getIn([...s,t]);return o?n({[t]:{value:r,schema:o.toJS()}}):null}},3962:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(29),a=r(7512),l=r(9725),s=r(6298),o=r(5812);const i={[o.SHOW_AUTH_POPUP]:(e,t)=>{let{payload:r}=t;return e.set("showDefinitions",r)},[o.AUTHORIZE]:(e,t)=>{var r;let{payload:a}=t,o=(0,l.fromJS)(a),i=e.get("authorized")||(0,l.Map)();return(0,n.default)(r=o.entrySeq()).call(r,(t=>{let[r,n]=t;if(!(0,s.Wl)(n.getIn))return e.set("authorized",i);let a=n.getIn(["schema","type"]);if("apiKey"===a||"http"===a)i=i.set(r,n);else if("basic"===a){let e=n.getIn(["value","username"]),t=n.getIn(["value","password"]);i=i.setIn([r,"value"],{username:e,header:"Basic "+(0,s.r3)(e+":"+t)}),i=i.setIn([r,"schema"],n.get("schema"))}})),e.set("authorized",i)},[o.AUTHORIZE_OAUTH2]:(e,t)=>{let r,{payload:n}=t,{auth:s,token:o}=n;s.token=(0,a.default)({},o),r=(0,l.fromJS)(s);let i=e.get("authorized")||(0,l.Map)();return i=i.set(r.get("name"),r),e.set("authorized",i)},[o.LOGOUT]:(e,t)=>{let{payload:r}=t,a=e.get("authorized").withMutations((e=>{(0,n.default)(r).call(r,(t=>{e.delete(t)}))}));return e.set("authorized",a)},[o.CONFIGURE_AUTH]:(e,t)=>{let{payload:r}=t;return e.set("configs",r)},[o.RESTORE_AUTHORIZATION]:(e,t)=>{let{payload:r}=t;return e.set("authorized",(0,l.fromJS)(r.authorized))}}},35:(e,t,r)=>{r.r(t),r.d(t,{authorized:()=>g,definitionsForRequirements:()=>m,definitionsToAuthorize:()=>f,getConfigs:()=>v,getDefinitionsByNames:()=>h,isAuthorized:()=>y,shownDefinitions:()=>p});var n=r(29),a=r(1778),l=r(6145),s=r(8818),o=r(2565),i=r(2740),u=r(8639),c=r(9725);const d=e=>e,p=(0,u.createSelector)(d,(e=>e.get("showDefinitions"))),f=(0,u.createSelector)(d,(()=>e=>{var t;let{specSelectors:r}=e,a=r.securityDefinitions()||(0,c.Map)({}),l=(0,c.List)();return(0,n.default)(t=a.entrySeq()).call(t,(e=>{let[t,r]=e,n=(0,c.Map)();n=n.set(t,r),l=l.push(n)})),l})),h=(e,t)=>e=>{var r;let{specSelectors:a}=e;console.warn("WARNING: getDefinitionsByNames is deprecated and will be removed in the next major version.");let l=a.securityDefinitions(),s=(0,c.List)();return(0,n.default)(r=t.valueSeq()).call(r,(e=>{var t;let r=(0,c.Map)();(0,n.default)(t=e.entrySeq()).call(t,(e=>{let t,[a,s]=e,o=l.get(a);var i;"oauth2"===o.get("type")&&s.size&&(t=o.get("scopes"),(0,n.default)(i=t.keySeq()).call(i,(e=>{s.contains(e)||(t=t.delete(e))})),o=o.set("allowedScopes",t));r=r.set(a,o)})),s=s.push(r)})),s},m=function(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:(0,c.List)();return e=>{let{authSelectors:r}=e;const l=r.definitionsToAuthorize()||(0,c.List)();let s=(0,c.List)();return(0,n.default)(l).call(l,(e=>{let r=(0,a.default)(t).call(t,(t=>t.get(e.keySeq().first())));r&&((0,n.default)(e).call(e,((t,a)=>{if("oauth2"===t.get("type")){const s=r.get(a);let o=t.get("scopes");var l;if(c.List.isList(s)&&c.Map.isMap(o))(0,n.default)(l=o.keySeq()).call(l,(e=>{s.contains(e)||(o=o.delete(e))})),e=e.set(a,t.set("scopes",o))}})),s=s.push(e))})),s}},g=(0,u.createSelector)(d,(e=>e.get("authorized")||(0,c.Map)())),y=(e,t)=>e=>{var r;let{authSelectors:n}=e,a=n.authorized();return c.List.isList(t)?!!(0,l.default)(r=t.toJS()).call(r,(e=>{var t,r;return-1===(0,s.default)(t=(0,o.default)(r=(0,i.default)(e)).call(r,(e=>!!a.get(e)))).call(t,!1)})).length:null},v=(0,u.createSelector)(d,(e=>e.get("configs")))},8302:(e,t,r)=>{r.r(t),r.d(t,{execute:()=>n});const n=(e,t)=>{let{authSelectors:r,specSelectors:n}=t;return t=>{let{path:a,method:l,operation:s,extras:o}=t,i={authorized:r.authorized()&&r.authorized().toJS(),definitions:n.securityDefinitions()&&n.securityDefinitions().toJS(),specSecurity:n.security()&&n.security().toJS()};return e({path:a,method:l,operation:s,securities:i,...o})}}},714:(e,t,r)=>{r.r(t),r.d(t,{TOGGLE_CONFIGS:()=>a,UPDATE_CONFIGS:()=>n,loaded:()=>o,toggle:()=>s,update:()=>l});const n="configs_update",a="configs_toggle";function l(e,t){return{type:n,payload:{[e]:t}}}function s(e){return{type:a,payload:e}}const o=()=>e=>{let{getConfigs:t,authActions:r}=e;if(t().persistAuthorization){const e=localStorage.getItem("authorized");e&&r.restoreAuthorization({authorized:JSON.parse(e)})}}},2256:(e,t,r)=>{r.r(t),r.d(t,{parseYamlConfig:()=>a});var n=r(626);const a=(e,t)=>{try{return n.default.load(e)}catch(e){return t&&t.errActions.newThrownErr(new Error(e)),{}}}},6709:(e,t,r)=>{r.r(t),r.d(t,{default:()=>u});var n=r(2256),a=r(714),l=r(2698),s=r(9018),o=r(7743);const i={getLocalConfig:()=>(0,n.parseYamlConfig)('---\nurl: "https://petstore.swagger.io/v2/swagger.json"\ndom_id: "#swagger-ui"\nvalidatorUrl: "https://validator.swagger.io/validator"\n')};function u(){return{statePlugins:{spec:{actions:l,selectors:i},configs:{reducers:o.default,actions:a,selectors:s}}}}},7743:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(9725),a=r(714);const l={[a.UPDATE_CONFIGS]:(e,t)=>e.merge((0,n.fromJS)(t.payload)),[a.TOGGLE_CONFIGS]:(e,t)=>{const r=t.payload,n=e.get(r);return e.set(r,!n)}}},9018:(e,t,r)=>{r.r(t),r.d(t,{get:()=>a});var n=r(4163);const a=(e,t)=>e.getIn((0,n.default)(t)?t:[t])},2698:(e,t,r)=>{r.r(t),r.d(t,{downloadConfig:()=>a,getConfigByUrl:()=>l});var n=r(2256);const a=e=>t=>{const{fn:{fetch:r}}=t;return r(e)},l=(e,t)=>r=>{let{specActions:a}=r;if(e)return a.downloadConfig(e).then(l,l);function l(r){r instanceof Error||r.status>=400?(a.updateLoadingStatus("failedConfig"),a.updateLoadingStatus("failedConfig"),a.updateUrl(""),console.error(r.statusText+" "+e.url),t(null)):t((0,n.parseYamlConfig)(r.text))}}},1970:(e,t,r)=>{r.r(t),r.d(t,{setHash:()=>n});const n=e=>e?history.pushState(null,null,`#${e}`):window.location.hash=""},4980:(e,t,r)=>{r.r(t),r.d(t,{default:()=>s});var n=r(5858),a=r(877),l=r(4584);function s(){return[n.default,{statePlugins:{configs:{wrapActions:{loaded:(e,t)=>function(){e(...arguments);const r=decodeURIComponent(window.location.hash);t.layoutActions.parseDeepLinkHash(r)}}}},wrapComponents:{operation:a.default,OperationTag:l.default}}]}},5858:(e,t,r)=>{r.r(t),r.d(t,{clearScrollTo:()=>E,default:()=>b,parseDeepLinkHash:()=>g,readyToScroll:()=>y,scrollTo:()=>m,scrollToElement:()=>v,show:()=>h});var a=r(4163),l=r(8136),s=r(2565),o=r(8818),i=r(1970);const u=(e=>{var t={};return r.d(t,e),t})({default:()=>n.default});var c=r(6298),d=r(9725);const p="layout_scroll_to",f="layout_clear_scroll",h=(e,t)=>{let{getConfigs:r,layoutSelectors:n}=t;return function(){for(var t=arguments.length,l=new Array(t),s=0;s<t;s++)l[s]=arguments[s];if(e(...l),r().deepLinking)try{let[e,t]=l;e=(0,a.default)(e)?e:[e];const r=n.urlHashArrayFromIsShownKey(e);if(!r.length)return;const[s,o]=r;if(!t)return(0,i.setHash)("/");2===r.length?(0,i.setHash)((0,c.oJ)(`/${encodeURIComponent(s)}/${encodeURIComponent(o)}`)):1===r.length&&(0,i.setHash)((0,c.oJ)(`/${encodeURIComponent(s)}`))}catch(e){console.error(e)}}},m=e=>({type:p,payload:(0,a.default)(e)?e:[e]}),g=e=>t=>{let{layoutActions:r,layoutSelectors:n,getConfigs:a}=t;if(a().deepLinking&&e){var i;let t=(0,l.default)(e).call(e,1);"!"===t[0]&&(t=(0,l.default)(t).call(t,1)),"/"===t[0]&&(t=(0,l.default)(t).call(t,1));const a=(0,s.default)(i=t.split("/")).call(i,(e=>e||"")),u=n.isShownKeyFromUrlHashArray(a),[c,d="",p=""]=u;if("operations"===c){const e=n.isShownKeyFromUrlHashArray([d]);(0,o.default)(d).call(d,"_")>-1&&(console.warn("Warning: escaping deep link whitespace with `_` will be unsupported in v4.0, use `%20` instead."),r.show((0,s.default)(e).call(e,(e=>e.replace(/_/g," "))),!0)),r.show(e,!0)}((0,o.default)(d).call(d,"_")>-1||(0,o.default)(p).call(p,"_")>-1)&&(console.warn("Warning: escaping deep link whitespace with `_` will be unsupported in v4.0, use `%20` instead."),r.show((0,s.default)(u).call(u,(e=>e.replace(/_/g," "))),!0)),r.show(u,!0),r.scrollTo(u)}},y=(e,t)=>r=>{const n=r.layoutSelectors.getScrollToKey();d.default.is(n,(0,d.fromJS)(e))&&(r.layoutActions.scrollToElement(t),r.layoutActions.clearScrollTo())},v=(e,t)=>r=>{try{t=t||r.fn.getScrollParent(e),u.default.createScroller(t).to(e)}catch(e){console.error(e)}},E=()=>({type:f});const b={fn:{getScrollParent:function(e,t){const r=document.documentElement;let n=getComputedStyle(e);const a="absolute"===n.position,l=t?/(auto|scroll|hidden)/:/(auto|scroll)/;if("fixed"===n.position)return r;for(let t=e;t=t.parentElement;)if(n=getComputedStyle(t),(!a||"static"!==n.position)&&l.test(n.overflow+n.overflowY+n.overflowX))return t;return r}},statePlugins:{layout:{actions:{scrollToElement:v,scrollTo:m,clearScrollTo:E,readyToScroll:y,parseDeepLinkHash:g},selectors:{getScrollToKey:e=>e.get("scrollToKey"),isShownKeyFromUrlHashArray(e,t){const[r,n]=t;return n?["operations",r,n]:r?["operations-tag",r]:[]},urlHashArrayFromIsShownKey(e,t){let[r,n,a]=t;return"operations"==r?[n,a]:"operations-tag"==r?[n]:[]}},reducers:{[p]:(e,t)=>e.set("scrollToKey",d.default.fromJS(t.payload)),[f]:e=>e.delete("scrollToKey")},wrapActions:{show:h}}}}},4584:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(775),a=r(810);r(5053);const l=(e,t)=>class extends a.default.Component{constructor(){super(...arguments),(0,n.default)(this,"onLoad",(e=>{const{tag:r}=this.props,n=["operations-tag",r];t.layoutActions.readyToScroll(n,e)}))}render(){return a.default.createElement("span",{ref:this.onLoad},a.default.createElement(e,this.props))}}},877:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(775),a=r(810);r(9569);const l=(e,t)=>class extends a.default.Component{constructor(){super(...arguments),(0,n.default)(this,"onLoad",(e=>{const{operation:r}=this.props,{tag:n,operationId:a}=r.toObject();let{isShownKey:l}=r.toObject();l=l||["operations",n,a],t.layoutActions.readyToScroll(l,e)}))}render(){return a.default.createElement("span",{ref:this.onLoad},a.default.createElement(e,this.props))}}},8011:(e,t,r)=>{r.r(t),r.d(t,{default:()=>c});var n=r(7512),a=r(3769),l=r(8818),s=r(313),o=r(8639),i=r(9725),u=r(7504);function c(e){let{fn:t}=e;return{statePlugins:{spec:{actions:{download:e=>r=>{let{errActions:l,specSelectors:s,specActions:o,getConfigs:i}=r,{fetch:c}=t;const d=i();function p(t){if(t instanceof Error||t.status>=400)return o.updateLoadingStatus("failed"),l.newThrownErr((0,n.default)(new Error((t.message||t.statusText)+" "+e),{source:"fetch"})),void(!t.status&&t instanceof Error&&function(){try{let t;if("URL"in u.Z?t=new a.default(e):(t=document.createElement("a"),t.href=e),"https:"!==t.protocol&&"https:"===u.Z.location.protocol){const e=(0,n.default)(new Error(`Possible mixed-content issue? The page was loaded over https:// but a ${t.protocol}// URL was specified. Check that you are not attempting to load mixed content.`),{source:"fetch"});return void l.newThrownErr(e)}if(t.origin!==u.Z.location.origin){const e=(0,n.default)(new Error(`Possible cross-origin (CORS) issue? The URL origin (${t.origin}) does not match the page (${u.Z.location.origin}). Check the server returns the correct 'Access-Control-Allow-*' headers.`),{source:"fetch"});l.newThrownErr(e)}}catch(e){return}}());o.updateLoadingStatus("success"),o.updateSpec(t.text),s.url()!==e&&o.updateUrl(e)}e=e||s.url(),o.updateLoadingStatus("loading"),l.clear({source:"fetch"}),c({url:e,loadSpec:!0,requestInterceptor:d.requestInterceptor||(e=>e),responseInterceptor:d.responseInterceptor||(e=>e),credentials:"same-origin",headers:{Accept:"application/json,*/*"}}).then(p,p)},updateLoadingStatus:e=>{let t=[null,"loading","failed","success","failedConfig"];return-1===(0,l.default)(t).call(t,e)&&console.error(`Error: ${e} is not one of ${(0,s.default)(t)}`),{type:"spec_update_loading_status",payload:e}}},reducers:{spec_update_loading_status:(e,t)=>"string"==typeof t.payload?e.set("loadingStatus",t.payload):e},selectors:{loadingStatus:(0,o.createSelector)((e=>e||(0,i.Map)()),(e=>e.get("loadingStatus")||null))}}}}}},4966:(e,t,r)=>{r.r(t),r.d(t,{CLEAR:()=>u,CLEAR_BY:()=>c,NEW_AUTH_ERR:()=>i,NEW_SPEC_ERR:()=>s,NEW_SPEC_ERR_BATCH:()=>o,NEW_THROWN_ERR:()=>a,NEW_THROWN_ERR_BATCH:()=>l,clear:()=>g,clearBy:()=>y,newAuthErr:()=>m,newSpecErr:()=>f,newSpecErrBatch:()=>h,newThrownErr:()=>d,newThrownErrBatch:()=>p});var n=r(8518);const a="err_new_thrown_err",l="err_new_thrown_err_batch",s="err_new_spec_err",o="err_new_spec_err_batch",i="err_new_auth_err",u="err_clear",c="err_clear_by";function d(e){return{type:a,payload:(0,n.serializeError)(e)}}function p(e){return{type:l,payload:e}}function f(e){return{type:s,payload:e}}function h(e){return{type:o,payload:e}}function m(e){return{type:i,payload:e}}function g(){return{type:u,payload:arguments.length>0&&void 0!==arguments[0]?arguments[0]:{}}}function y(){return{type:c,payload:arguments.length>0&&void 0!==arguments[0]?arguments[0]:()=>!0}}},6808:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(6145),l=r(2565);const s=(e=>{var t={};return r.d(t,e),t})({default:()=>a.default});const o=[r(2392),r(1835)];function i(e){var t;let r={jsSpec:{}},a=(0,s.default)(o,((e,t)=>{try{let a=t.transform(e,r);return(0,n.default)(a).call(a,(e=>!!e))}catch(t){return console.error("Transformer error:",t),e}}),e);return(0,l.default)(t=(0,n.default)(a).call(a,(e=>!!e))).call(t,(e=>(!e.get("line")&&e.get("path"),e)))}},2392:(e,t,r)=>{r.r(t),r.d(t,{transform:()=>o});var n=r(2565),a=r(8818),l=r(8136),s=r(6785);function o(e){return(0,n.default)(e).call(e,(e=>{var t;let r="is not of a type(s)",n=(0,a.default)(t=e.get("message")).call(t,r);if(n>-1){var o,i;let t=(0,l.default)(o=e.get("message")).call(o,n+r.length).split(",");return e.set("message",(0,l.default)(i=e.get("message")).call(i,0,n)+function(e){return(0,s.default)(e).call(e,((e,t,r,n)=>r===n.length-1&&n.length>1?e+"or "+t:n[r+1]&&n.length>2?e+t+", ":n[r+1]?e+t+" ":e+t),"should be a")}(t))}return e}))}},1835:(e,t,r)=>{r.r(t),r.d(t,{transform:()=>n});r(2565),r(8818),r(9908),r(9725);function n(e,t){let{jsSpec:r}=t;return e}},7793:(e,t,r)=>{r.r(t),r.d(t,{default:()=>s});var n=r(3527),a=r(4966),l=r(7667);function s(e){return{statePlugins:{err:{reducers:(0,n.default)(e),actions:a,selectors:l}}}}},3527:(e,t,r)=>{r.r(t),r.d(t,{default:()=>p});var n=r(7512),a=r(2565),l=r(5171),s=r(6145),o=r(7930),i=r(4966),u=r(9725),c=r(6808);let d={line:0,level:"error",message:"Unknown error"};function p(){return{[i.NEW_THROWN_ERR]:(e,t)=>{let{payload:r}=t,a=(0,n.default)(d,r,{type:"thrown"});return e.update("errors",(e=>(e||(0,u.List)()).push((0,u.fromJS)(a)))).update("errors",(e=>(0,c.default)(e)))},[i.NEW_THROWN_ERR_BATCH]:(e,t)=>{let{payload:r}=t;return r=(0,a.default)(r).call(r,(e=>(0,u.fromJS)((0,n.default)(d,e,{type:"thrown"})))),e.update("errors",(e=>{var t;return(0,l.default)(t=e||(0,u.List)()).call(t,(0,u.fromJS)(r))})).update("errors",(e=>(0,c.default)(e)))},[i.NEW_SPEC_ERR]:(e,t)=>{let{payload:r}=t,n=(0,u.fromJS)(r);return n=n.set("type","spec"),e.update("errors",(e=>(e||(0,u.List)()).push((0,u.fromJS)(n)).sortBy((e=>e.get("line"))))).update("errors",(e=>(0,c.default)(e)))},[i.NEW_SPEC_ERR_BATCH]:(e,t)=>{let{payload:r}=t;return r=(0,a.default)(r).call(r,(e=>(0,u.fromJS)((0,n.default)(d,e,{type:"spec"})))),e.update("errors",(e=>{var t;return(0,l.default)(t=e||(0,u.List)()).call(t,(0,u.fromJS)(r))})).update("errors",(e=>(0,c.default)(e)))},[i.NEW_AUTH_ERR]:(e,t)=>{let{payload:r}=t,a=(0,u.fromJS)((0,n.default)({},r));return a=a.set("type","auth"),e.update("errors",(e=>(e||(0,u.List)()).push((0,u.fromJS)(a)))).update("errors",(e=>(0,c.default)(e)))},[i.CLEAR]:(e,t)=>{var r;let{payload:n}=t;if(!n||!e.get("errors"))return e;let a=(0,s.default)(r=e.get("errors")).call(r,(e=>{var t;return(0,o.default)(t=e.keySeq()).call(t,(t=>{const r=e.get(t),a=n[t];return!a||r!==a}))}));return e.merge({errors:a})},[i.CLEAR_BY]:(e,t)=>{var r;let{payload:n}=t;if(!n||"function"!=typeof n)return e;let a=(0,s.default)(r=e.get("errors")).call(r,(e=>n(e)));return e.merge({errors:a})}}}},7667:(e,t,r)=>{r.r(t),r.d(t,{allErrors:()=>l,lastError:()=>s});var n=r(9725),a=r(8639);const l=(0,a.createSelector)((e=>e),(e=>e.get("errors",(0,n.List)()))),s=(0,a.createSelector)(l,(e=>e.last()))},9978:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(4309);function a(){return{fn:{opsFilter:n.default}}}},4309:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(6145),a=r(8818);function l(e,t){return(0,n.default)(e).call(e,((e,r)=>-1!==(0,a.default)(r).call(r,t)))}},5474:(e,t,r)=>{r.r(t),r.d(t,{SHOW:()=>o,UPDATE_FILTER:()=>l,UPDATE_LAYOUT:()=>a,UPDATE_MODE:()=>s,changeMode:()=>d,show:()=>c,updateFilter:()=>u,updateLayout:()=>i});var n=r(6298);const a="layout_update_layout",l="layout_update_filter",s="layout_update_mode",o="layout_show";function i(e){return{type:a,payload:e}}function u(e){return{type:l,payload:e}}function c(e){let t=!(arguments.length>1&&void 0!==arguments[1])||arguments[1];return e=(0,n.AF)(e),{type:o,payload:{thing:e,shown:t}}}function d(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:"";return e=(0,n.AF)(e),{type:s,payload:{thing:e,mode:t}}}},6821:(e,t,r)=>{r.r(t),r.d(t,{default:()=>o});var n=r(5672),a=r(5474),l=r(4400),s=r(8989);function o(){return{statePlugins:{layout:{reducers:n.default,actions:a,selectors:l},spec:{wrapSelectors:s}}}}},5672:(e,t,r)=>{r.r(t),r.d(t,{default:()=>s});var n=r(5171),a=r(9725),l=r(5474);const s={[l.UPDATE_LAYOUT]:(e,t)=>e.set("layout",t.payload),[l.UPDATE_FILTER]:(e,t)=>e.set("filter",t.payload),[l.SHOW]:(e,t)=>{const r=t.payload.shown,n=(0,a.fromJS)(t.payload.thing);return e.update("shown",(0,a.fromJS)({}),(e=>e.set(n,r)))},[l.UPDATE_MODE]:(e,t)=>{var r;let a=t.payload.thing,l=t.payload.mode;return e.setIn((0,n.default)(r=["modes"]).call(r,a),(l||"")+"")}}},4400:(e,t,r)=>{r.r(t),r.d(t,{current:()=>s,currentFilter:()=>o,isShown:()=>i,showSummary:()=>c,whatMode:()=>u});var n=r(8639),a=r(6298),l=r(9725);const s=e=>e.get("layout"),o=e=>e.get("filter"),i=(e,t,r)=>(t=(0,a.AF)(t),e.get("shown",(0,l.fromJS)({})).get((0,l.fromJS)(t),r)),u=function(e,t){let r=arguments.length>2&&void 0!==arguments[2]?arguments[2]:"";return t=(0,a.AF)(t),e.getIn(["modes",...t],r)},c=(0,n.createSelector)((e=>e),(e=>!i(e,"editor")))},8989:(e,t,r)=>{r.r(t),r.d(t,{taggedOperations:()=>a});var n=r(8136);const a=(e,t)=>function(r){for(var a=arguments.length,l=new Array(a>1?a-1:0),s=1;s<a;s++)l[s-1]=arguments[s];let o=e(r,...l);const{fn:i,layoutSelectors:u,getConfigs:c}=t.getSystem(),d=c(),{maxDisplayedTags:p}=d;let f=u.currentFilter();return f&&!0!==f&&"true"!==f&&"false"!==f&&(o=i.opsFilter(o,f)),p&&!isNaN(p)&&p>=0&&(o=(0,n.default)(o).call(o,0,p)),o}},9150:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(5527);function a(e){let{configs:t}=e;const r={debug:0,info:1,log:2,warn:3,error:4},a=e=>r[e]||-1;let{logLevel:l}=t,s=a(l);function o(e){for(var t=arguments.length,r=new Array(t>1?t-1:0),n=1;n<t;n++)r[n-1]=arguments[n];a(e)>=s&&console[e](...r)}return o.warn=(0,n.default)(o).call(o,null,"warn"),o.error=(0,n.default)(o).call(o,null,"error"),o.info=(0,n.default)(o).call(o,null,"info"),o.debug=(0,n.default)(o).call(o,null,"debug"),{rootInjects:{log:o}}}},7002:(e,t,r)=>{r.r(t),r.d(t,{CLEAR_REQUEST_BODY_VALIDATE_ERROR:()=>p,CLEAR_REQUEST_BODY_VALUE:()=>f,SET_REQUEST_BODY_VALIDATE_ERROR:()=>d,UPDATE_ACTIVE_EXAMPLES_MEMBER:()=>o,UPDATE_REQUEST_BODY_INCLUSION:()=>s,UPDATE_REQUEST_BODY_VALUE:()=>a,UPDATE_REQUEST_BODY_VALUE_RETAIN_FLAG:()=>l,UPDATE_REQUEST_CONTENT_TYPE:()=>i,UPDATE_RESPONSE_CONTENT_TYPE:()=>u,UPDATE_SELECTED_SERVER:()=>n,UPDATE_SERVER_VARIABLE_VALUE:()=>c,clearRequestBodyValidateError:()=>w,clearRequestBodyValue:()=>x,initRequestBodyValidateError:()=>C,setActiveExamplesMember:()=>v,setRequestBodyInclusion:()=>y,setRequestBodyValidateError:()=>_,setRequestBodyValue:()=>m,setRequestContentType:()=>E,setResponseContentType:()=>b,setRetainRequestBodyValueFlag:()=>g,setSelectedServer:()=>h,setServerVariableValue:()=>S});const n="oas3_set_servers",a="oas3_set_request_body_value",l="oas3_set_request_body_retain_flag",s="oas3_set_request_body_inclusion",o="oas3_set_active_examples_member",i="oas3_set_request_content_type",u="oas3_set_response_content_type",c="oas3_set_server_variable_value",d="oas3_set_request_body_validate_error",p="oas3_clear_request_body_validate_error",f="oas3_clear_request_body_value";function h(e,t){return{type:n,payload:{selectedServerUrl:e,namespace:t}}}function m(e){let{value:t,pathMethod:r}=e;return{type:a,payload:{value:t,pathMethod:r}}}const g=e=>{let{value:t,pathMethod:r}=e;return{type:l,payload:{value:t,pathMethod:r}}};function y(e){let{value:t,pathMethod:r,name:n}=e;return{type:s,payload:{value:t,pathMethod:r,name:n}}}function v(e){let{name:t,pathMethod:r,contextType:n,contextName:a}=e;return{type:o,payload:{name:t,pathMethod:r,contextType:n,contextName:a}}}function E(e){let{value:t,pathMethod:r}=e;return{type:i,payload:{value:t,pathMethod:r}}}function b(e){let{value:t,path:r,method:n}=e;return{type:u,payload:{value:t,path:r,method:n}}}function S(e){let{server:t,namespace:r,key:n,val:a}=e;return{type:c,payload:{server:t,namespace:r,key:n,val:a}}}const _=e=>{let{path:t,method:r,validationErrors:n}=e;return{type:d,payload:{path:t,method:r,validationErrors:n}}},w=e=>{let{path:t,method:r}=e;return{type:p,payload:{path:t,method:r}}},C=e=>{let{pathMethod:t}=e;return{type:p,payload:{path:t[0],method:t[1]}}},x=e=>{let{pathMethod:t}=e;return{type:f,payload:{pathMethod:t}}}},3723:(e,t,r)=>{r.r(t),r.d(t,{definitionsToAuthorize:()=>u});var n=r(29),a=r(6145),l=r(6785),s=r(8639),o=r(9725),i=r(7779);const u=(c=(0,s.createSelector)((e=>e),(e=>{let{specSelectors:t}=e;return t.securityDefinitions()}),((e,t)=>{var r;let s=(0,o.List)();return t?((0,n.default)(r=t.entrySeq()).call(r,(e=>{let[t,r]=e;const i=r.get("type");var u;if("oauth2"===i&&(0,n.default)(u=r.get("flows").entrySeq()).call(u,(e=>{let[n,l]=e,i=(0,o.fromJS)({flow:n,authorizationUrl:l.get("authorizationUrl"),tokenUrl:l.get("tokenUrl"),scopes:l.get("scopes"),type:r.get("type"),description:r.get("description")});s=s.push(new o.Map({[t]:(0,a.default)(i).call(i,(e=>void 0!==e))}))})),"http"!==i&&"apiKey"!==i||(s=s.push(new o.Map({[t]:r}))),"openIdConnect"===i&&r.get("openIdConnectData")){let e=r.get("openIdConnectData"),i=e.get("grant_types_supported")||["authorization_code","implicit"];(0,n.default)(i).call(i,(n=>{var i;let u=e.get("scopes_supported")&&(0,l.default)(i=e.get("scopes_supported")).call(i,((e,t)=>e.set(t,"")),new o.Map),c=(0,o.fromJS)({flow:n,authorizationUrl:e.get("authorization_endpoint"),tokenUrl:e.get("token_endpoint"),scopes:u,type:"oauth2",openIdConnectUrl:r.get("openIdConnectUrl")});s=s.push(new o.Map({[t]:(0,a.default)(c).call(c,(e=>void 0!==e))}))}))}})),s):s})),(e,t)=>function(){const r=t.getSystem().specSelectors.specJson();for(var n=arguments.length,a=new Array(n),l=0;l<n;l++)a[l]=arguments[l];if((0,i.isOAS3)(r)){let e=t.getState().getIn(["spec","resolvedSubtrees","components","securitySchemes"]);return c(t,e,...a)}return e(...a)});var c},3427:(e,t,r)=>{r.r(t),r.d(t,{default:()=>o});var n=r(863),a=r(2565),l=r(810),s=(r(5053),r(9569),r(9725));const o=e=>{var t;let{callbacks:r,getComponent:o,specPath:i}=e;const u=o("OperationContainer",!0);if(!r)return l.default.createElement("span",null,"No callbacks");let c=(0,a.default)(t=r.entrySeq()).call(t,(t=>{var r;let[o,c]=t;return l.default.createElement("div",{key:o},l.default.createElement("h2",null,o),(0,a.default)(r=c.entrySeq()).call(r,(t=>{var r;let[c,d]=t;return"$$ref"===c?null:l.default.createElement("div",{key:c},(0,a.default)(r=d.entrySeq()).call(r,(t=>{let[r,a]=t;if("$$ref"===r)return null;let d=(0,s.fromJS)({operation:a});return l.default.createElement(u,(0,n.default)({},e,{op:d,key:r,tag:"",method:r,path:c,specPath:i.push(o,c,r),allowTryItOut:!1}))})))})))}));return l.default.createElement("div",null,c)}},6775:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(775),a=r(7512),l=r(6145),s=r(2565),o=r(810);r(5053);class i extends o.default.Component{constructor(e,t){super(e,t),(0,n.default)(this,"onChange",(e=>{let{onChange:t}=this.props,{value:r,name:n}=e.target,l=(0,a.default)({},this.state.value);n?l[n]=r:l=r,this.setState({value:l},(()=>t(this.state)))}));let{name:r,schema:l}=this.props,s=this.getValue();this.state={name:r,schema:l,value:s}}getValue(){let{name:e,authorized:t}=this.props;return t&&t.getIn([e,"value"])}render(){var e;let{schema:t,getComponent:r,errSelectors:n,name:a}=this.props;const i=r("Input"),u=r("Row"),c=r("Col"),d=r("authError"),p=r("Markdown",!0),f=r("JumpToPath",!0),h=(t.get("scheme")||"").toLowerCase();let m=this.getValue(),g=(0,l.default)(e=n.allErrors()).call(e,(e=>e.get("authId")===a));if("basic"===h){var y;let e=m?m.get("username"):null;return o.default.createElement("div",null,o.default.createElement("h4",null,o.default.createElement("code",null,a||t.get("name")),"  (http, Basic)",o.default.createElement(f,{path:["securityDefinitions",a]})),e&&o.default.createElement("h6",null,"Authorized"),o.default.createElement(u,null,o.default.createElement(p,{source:t.get("description")})),o.default.createElement(u,null,o.default.createElement("label",null,"Username:"),e?o.default.createElement("code",null," ",e," "):o.default.createElement(c,null,o.default.createElement(i,{type:"text",required:"required",name:"username","aria-label":"auth-basic-username",onChange:this.onChange,autoFocus:!0}))),o.default.createElement(u,null,o.default.createElement("label",null,"Password:"),e?o.default.createElement("code",null," ****** "):o.default.createElement(c,null,o.default.createElement(i,{autoComplete:"new-password",name:"password",type:"password","aria-label":"auth-basic-password",onChange:this.onChange}))),(0,s.default)(y=g.valueSeq()).call(y,((e,t)=>o.default.createElement(d,{error:e,key:t}))))}var v;return"bearer"===h?o.default.createElement("div",null,o.default.createElement("h4",null,o.default.createElement("code",null,a||t.get("name")),"  (http, Bearer)",o.default.createElement(f,{path:["securityDefinitions",a]})),m&&o.default.createElement("h6",null,"Authorized"),o.default.createElement(u,null,o.default.createElement(p,{source:t.get("description")})),o.default.createElement(u,null,o.default.createElement("label",null,"Value:"),m?o.default.createElement("code",null," ****** "):o.default.createElement(c,null,o.default.createElement(i,{type:"text","aria-label":"auth-bearer-value",onChange:this.onChange,autoFocus:!0}))),(0,s.default)(v=g.valueSeq()).call(v,((e,t)=>o.default.createElement(d,{error:e,key:t})))):o.default.createElement("div",null,o.default.createElement("em",null,o.default.createElement("b",null,a)," HTTP authentication: unsupported scheme ",`'${h}'`))}}},6467:(e,t,r)=>{r.r(t),r.d(t,{default:()=>d});var n=r(3427),a=r(2458),l=r(5757),s=r(6617),o=r(9928),i=r(5327),u=r(6775),c=r(6796);const d={Callbacks:n.default,HttpAuth:u.default,RequestBody:a.default,Servers:s.default,ServersContainer:o.default,RequestBodyEditor:i.default,OperationServers:c.default,operationLink:l.default}},5757:(e,t,r)=>{r.r(t),r.d(t,{default:()=>o});var n=r(313),a=r(2565),l=r(810);r(5053),r(9569);class s extends l.Component{render(){const{link:e,name:t,getComponent:r}=this.props,s=r("Markdown",!0);let o=e.get("operationId")||e.get("operationRef"),i=e.get("parameters")&&e.get("parameters").toJS(),u=e.get("description");return l.default.createElement("div",{className:"operation-link"},l.default.createElement("div",{className:"description"},l.default.createElement("b",null,l.default.createElement("code",null,t)),u?l.default.createElement(s,{source:u}):null),l.default.createElement("pre",null,"Operation `",o,"`",l.default.createElement("br",null),l.default.createElement("br",null),"Parameters ",function(e,t){var r;if("string"!=typeof t)return"";return(0,a.default)(r=t.split("\n")).call(r,((t,r)=>r>0?Array(e+1).join(" ")+t:t)).join("\n")}(0,(0,n.default)(i,null,2))||"{}",l.default.createElement("br",null)))}}const o=s},6796:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(775),a=r(810);r(5053),r(9569);class l extends a.default.Component{constructor(){super(...arguments),(0,n.default)(this,"setSelectedServer",(e=>{const{path:t,method:r}=this.props;return this.forceUpdate(),this.props.setSelectedServer(e,`${t}:${r}`)})),(0,n.default)(this,"setServerVariableValue",(e=>{const{path:t,method:r}=this.props;return this.forceUpdate(),this.props.setServerVariableValue({...e,namespace:`${t}:${r}`})})),(0,n.default)(this,"getSelectedServer",(()=>{const{path:e,method:t}=this.props;return this.props.getSelectedServer(`${e}:${t}`)})),(0,n.default)(this,"getServerVariable",((e,t)=>{const{path:r,method:n}=this.props;return this.props.getServerVariable({namespace:`${r}:${n}`,server:e},t)})),(0,n.default)(this,"getEffectiveServerValue",(e=>{const{path:t,method:r}=this.props;return this.props.getEffectiveServerValue({server:e,namespace:`${t}:${r}`})}))}render(){const{operationServers:e,pathServers:t,getComponent:r}=this.props;if(!e&&!t)return null;const n=r("Servers"),l=e||t,s=e?"operation":"path";return a.default.createElement("div",{className:"opblock-section operation-servers"},a.default.createElement("div",{className:"opblock-section-header"},a.default.createElement("div",{className:"tab-header"},a.default.createElement("h4",{className:"opblock-title"},"Servers"))),a.default.createElement("div",{className:"opblock-description-wrapper"},a.default.createElement("h4",{className:"message"},"These ",s,"-level options override the global server options."),a.default.createElement(n,{servers:l,currentServer:this.getSelectedServer(),setSelectedServer:this.setSelectedServer,setServerVariableValue:this.setServerVariableValue,getServerVariable:this.getServerVariable,getEffectiveServerValue:this.getEffectiveServerValue})))}}},5327:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(775),a=r(810),l=(r(5053),r(8096)),s=r(6298);const o=Function.prototype;class i extends a.PureComponent{constructor(e,t){super(e,t),(0,n.default)(this,"applyDefaultValue",(e=>{const{onChange:t,defaultValue:r}=e||this.props;return this.setState({value:r}),t(r)})),(0,n.default)(this,"onChange",(e=>{this.props.onChange((0,s.Pz)(e))})),(0,n.default)(this,"onDomChange",(e=>{const t=e.target.value;this.setState({value:t},(()=>this.onChange(t)))})),this.state={value:(0,s.Pz)(e.value)||e.defaultValue},e.onChange(e.value)}UNSAFE_componentWillReceiveProps(e){this.props.value!==e.value&&e.value!==this.state.value&&this.setState({value:(0,s.Pz)(e.value)}),!e.value&&e.defaultValue&&this.state.value&&this.applyDefaultValue(e)}render(){let{getComponent:e,errors:t}=this.props,{value:r}=this.state,n=t.size>0;const s=e("TextArea");return a.default.createElement("div",{className:"body-param"},a.default.createElement(s,{className:(0,l.default)("body-param__text",{invalid:n}),title:t.size?t.join(", "):"",value:r,onChange:this.onDomChange}))}}(0,n.default)(i,"defaultProps",{onChange:o,userHasEditedBody:!1})},2458:(e,t,r)=>{r.r(t),r.d(t,{default:()=>p,getDefaultRequestBodyValue:()=>d});var n=r(2565),a=r(8818),l=r(2372),s=r(4163),o=r(810),i=(r(5053),r(9569),r(9725)),u=r(6298),c=r(2518);const d=(e,t,r)=>{const n=e.getIn(["content",t]),a=n.get("schema").toJS(),l=void 0!==n.get("examples"),s=n.get("example"),o=l?n.getIn(["examples",r,"value"]):s,i=(0,u.xi)(a,t,{includeWriteOnly:!0},o);return(0,u.Pz)(i)},p=e=>{let{userHasEditedBody:t,requestBody:r,requestBodyValue:p,requestBodyInclusionSetting:f,requestBodyErrors:h,getComponent:m,getConfigs:g,specSelectors:y,fn:v,contentType:E,isExecute:b,specPath:S,onChange:_,onChangeIncludeEmpty:w,activeExamplesKey:C,updateActiveExamplesKey:x,setRetainRequestBodyValueFlag:A}=e;const I=e=>{_(e.target.files[0])},R=e=>{let t={key:e,shouldDispatchInit:!1,defaultValue:!0};return"no value"===f.get(e,"no value")&&(t.shouldDispatchInit=!0),t},N=m("Markdown",!0),T=m("modelExample"),O=m("RequestBodyEditor"),k=m("highlightCode"),M=m("ExamplesSelectValueRetainer"),P=m("Example"),j=m("ParameterIncludeEmpty"),{showCommonExtensions:L}=g(),q=r&&r.get("description")||null,B=r&&r.get("content")||new i.OrderedMap;E=E||B.keySeq().first()||"";const D=B.get(E,(0,i.OrderedMap)()),U=D.get("schema",(0,i.OrderedMap)()),V=D.get("examples",null),z=null==V?void 0:(0,n.default)(V).call(V,((e,t)=>{var n;const a=null===(n=e)||void 0===n?void 0:n.get("value",null);return a&&(e=e.set("value",d(r,E,t),a)),e}));if(h=i.List.isList(h)?h:(0,i.List)(),!D.size)return null;const F="object"===D.getIn(["schema","type"]),$="binary"===D.getIn(["schema","format"]),J="base64"===D.getIn(["schema","format"]);if("application/octet-stream"===E||0===(0,a.default)(E).call(E,"image/")||0===(0,a.default)(E).call(E,"audio/")||0===(0,a.default)(E).call(E,"video/")||$||J){const e=m("Input");return b?o.default.createElement(e,{type:"file",onChange:I}):o.default.createElement("i",null,"Example values are not available for ",o.default.createElement("code",null,E)," media types.")}if(F&&("application/x-www-form-urlencoded"===E||0===(0,a.default)(E).call(E,"multipart/"))&&U.get("properties",(0,i.OrderedMap)()).size>0){var W;const e=m("JsonSchemaForm"),t=m("ParameterExt"),r=U.get("properties",(0,i.OrderedMap)());return p=i.Map.isMap(p)?p:(0,i.OrderedMap)(),o.default.createElement("div",{className:"table-container"},q&&o.default.createElement(N,{source:q}),o.default.createElement("table",null,o.default.createElement("tbody",null,i.Map.isMap(r)&&(0,n.default)(W=r.entrySeq()).call(W,(r=>{var a,c;let[d,g]=r;if(g.get("readOnly"))return;let y=L?(0,u.po)(g):null;const E=(0,l.default)(a=U.get("required",(0,i.List)())).call(a,d),S=g.get("type"),C=g.get("format"),x=g.get("description"),A=p.getIn([d,"value"]),I=p.getIn([d,"errors"])||h,T=f.get(d)||!1,O=g.has("default")||g.has("example")||g.hasIn(["items","example"])||g.hasIn(["items","default"]),k=g.has("enum")&&(1===g.get("enum").size||E),M=O||k;let P="";"array"!==S||M||(P=[]),("object"===S||M)&&(P=(0,u.xi)(g,!1,{includeWriteOnly:!0})),"string"!=typeof P&&"object"===S&&(P=(0,u.Pz)(P)),"string"==typeof P&&"array"===S&&(P=JSON.parse(P));const q="string"===S&&("binary"===C||"base64"===C);return o.default.createElement("tr",{key:d,className:"parameters","data-property-name":d},o.default.createElement("td",{className:"parameters-col_name"},o.default.createElement("div",{className:E?"parameter__name required":"parameter__name"},d,E?o.default.createElement("span",null," *"):null),o.default.createElement("div",{className:"parameter__type"},S,C&&o.default.createElement("span",{className:"prop-format"},"($",C,")"),L&&y.size?(0,n.default)(c=y.entrySeq()).call(c,(e=>{let[r,n]=e;return o.default.createElement(t,{key:`${r}-${n}`,xKey:r,xVal:n})})):null),o.default.createElement("div",{className:"parameter__deprecated"},g.get("deprecated")?"deprecated":null)),o.default.createElement("td",{className:"parameters-col_description"},o.default.createElement(N,{source:x}),b?o.default.createElement("div",null,o.default.createElement(e,{fn:v,dispatchInitialValue:!q,schema:g,description:d,getComponent:m,value:void 0===A?P:A,required:E,errors:I,onChange:e=>{_(e,[d])}}),E?null:o.default.createElement(j,{onChange:e=>w(d,e),isIncluded:T,isIncludedOptions:R(d),isDisabled:(0,s.default)(A)?0!==A.length:!(0,u.O2)(A)})):null))})))))}const H=d(r,E,C);let K=null;return(0,c.O)(H)&&(K="json"),o.default.createElement("div",null,q&&o.default.createElement(N,{source:q}),z?o.default.createElement(M,{userHasEditedBody:t,examples:z,currentKey:C,currentUserInputValue:p,onSelect:e=>{x(e)},updateValue:_,defaultToFirstExample:!0,getComponent:m,setRetainRequestBodyValueFlag:A}):null,b?o.default.createElement("div",null,o.default.createElement(O,{value:p,errors:h,defaultValue:H,onChange:_,getComponent:m})):o.default.createElement(T,{getComponent:m,getConfigs:g,specSelectors:y,expandDepth:1,isExecute:b,schema:D.get("schema"),specPath:S.push("content",E),example:o.default.createElement(k,{className:"body-param__example",getConfigs:g,language:K,value:(0,u.Pz)(p)||H}),includeWriteOnly:!0}),z?o.default.createElement(P,{example:z.get(C),getComponent:m,getConfigs:g}):null)}},9928:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(810);r(5053);class a extends n.default.Component{render(){const{specSelectors:e,oas3Selectors:t,oas3Actions:r,getComponent:a}=this.props,l=e.servers(),s=a("Servers");return l&&l.size?n.default.createElement("div",null,n.default.createElement("span",{className:"servers-title"},"Servers"),n.default.createElement(s,{servers:l,currentServer:t.selectedServer(),setSelectedServer:r.setSelectedServer,setServerVariableValue:r.setServerVariableValue,getServerVariable:t.serverVariableValue,getEffectiveServerValue:t.serverEffectiveValue})):null}}},6617:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(775),a=r(1778),l=r(2565),s=r(810),o=r(9725);r(5053),r(9569);class i extends s.default.Component{constructor(){super(...arguments),(0,n.default)(this,"onServerChange",(e=>{this.setServer(e.target.value)})),(0,n.default)(this,"onServerVariableValueChange",(e=>{let{setServerVariableValue:t,currentServer:r}=this.props,n=e.target.getAttribute("data-variable"),a=e.target.value;"function"==typeof t&&t({server:r,key:n,val:a})})),(0,n.default)(this,"setServer",(e=>{let{setSelectedServer:t}=this.props;t(e)}))}componentDidMount(){var e;let{servers:t,currentServer:r}=this.props;r||this.setServer(null===(e=t.first())||void 0===e?void 0:e.get("url"))}UNSAFE_componentWillReceiveProps(e){let{servers:t,setServerVariableValue:r,getServerVariable:n}=e;if(this.props.currentServer!==e.currentServer||this.props.servers!==e.servers){var s;let i=(0,a.default)(t).call(t,(t=>t.get("url")===e.currentServer)),u=(0,a.default)(s=this.props.servers).call(s,(e=>e.get("url")===this.props.currentServer))||(0,o.OrderedMap)();if(!i)return this.setServer(t.first().get("url"));let c=u.get("variables")||(0,o.OrderedMap)(),d=((0,a.default)(c).call(c,(e=>e.get("default")))||(0,o.OrderedMap)()).get("default"),p=i.get("variables")||(0,o.OrderedMap)(),f=((0,a.default)(p).call(p,(e=>e.get("default")))||(0,o.OrderedMap)()).get("default");(0,l.default)(p).call(p,((t,a)=>{n(e.currentServer,a)&&d===f||r({server:e.currentServer,key:a,val:t.get("default")||""})}))}}render(){var e,t;let{servers:r,currentServer:n,getServerVariable:i,getEffectiveServerValue:u}=this.props,c=((0,a.default)(r).call(r,(e=>e.get("url")===n))||(0,o.OrderedMap)()).get("variables")||(0,o.OrderedMap)(),d=0!==c.size;return s.default.createElement("div",{className:"servers"},s.default.createElement("label",{htmlFor:"servers"},s.default.createElement("select",{onChange:this.onServerChange,value:n},(0,l.default)(e=r.valueSeq()).call(e,(e=>s.default.createElement("option",{value:e.get("url"),key:e.get("url")},e.get("url"),e.get("description")&&` - ${e.get("description")}`))).toArray())),d?s.default.createElement("div",null,s.default.createElement("div",{className:"computed-url"},"Computed URL:",s.default.createElement("code",null,u(n))),s.default.createElement("h4",null,"Server variables"),s.default.createElement("table",null,s.default.createElement("tbody",null,(0,l.default)(t=c.entrySeq()).call(t,(e=>{var t;let[r,a]=e;return s.default.createElement("tr",{key:r},s.default.createElement("td",null,r),s.default.createElement("td",null,a.get("enum")?s.default.createElement("select",{"data-variable":r,onChange:this.onServerVariableValueChange},(0,l.default)(t=a.get("enum")).call(t,(e=>s.default.createElement("option",{selected:e===i(n,r),key:e,value:e},e)))):s.default.createElement("input",{type:"text",value:i(n,r)||"",onChange:this.onServerVariableValueChange,"data-variable":r})))}))))):null)}}},7779:(e,t,r)=>{r.r(t),r.d(t,{OAS3ComponentWrapFactory:()=>i,isOAS3:()=>s,isSwagger2:()=>o});var n=r(863),a=r(3590),l=r(810);function s(e){const t=e.get("openapi");return"string"==typeof t&&((0,a.default)(t).call(t,"3.0.")&&t.length>4)}function o(e){const t=e.get("swagger");return"string"==typeof t&&(0,a.default)(t).call(t,"2.0")}function i(e){return(t,r)=>a=>{if(r&&r.specSelectors&&r.specSelectors.specJson){return s(r.specSelectors.specJson())?l.default.createElement(e,(0,n.default)({},a,r,{Ori:t})):l.default.createElement(t,a)}return console.warn("OAS3 wrapper: couldn't get spec"),null}}},7451:(e,t,r)=>{r.r(t),r.d(t,{default:()=>d});var n=r(2044),a=r(3723),l=r(1741),s=r(6467),o=r(7761),i=r(7002),u=r(5065),c=r(2109);function d(){return{components:s.default,wrapComponents:o.default,statePlugins:{spec:{wrapSelectors:n,selectors:l},auth:{wrapSelectors:a},oas3:{actions:i,reducers:c.default,selectors:u}}}}},2109:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(5487),a=r(29),l=r(6785),s=r(9725),o=r(7002);const i={[o.UPDATE_SELECTED_SERVER]:(e,t)=>{let{payload:{selectedServerUrl:r,namespace:n}}=t;const a=n?[n,"selectedServer"]:["selectedServer"];return e.setIn(a,r)},[o.UPDATE_REQUEST_BODY_VALUE]:(e,t)=>{let{payload:{value:r,pathMethod:l}}=t,[o,i]=l;if(!s.Map.isMap(r))return e.setIn(["requestData",o,i,"bodyValue"],r);let u,c=e.getIn(["requestData",o,i,"bodyValue"])||(0,s.Map)();s.Map.isMap(c)||(c=(0,s.Map)());const[...d]=(0,n.default)(r).call(r);return(0,a.default)(d).call(d,(e=>{let t=r.getIn([e]);c.has(e)&&s.Map.isMap(t)||(u=c.setIn([e,"value"],t))})),e.setIn(["requestData",o,i,"bodyValue"],u)},[o.UPDATE_REQUEST_BODY_VALUE_RETAIN_FLAG]:(e,t)=>{let{payload:{value:r,pathMethod:n}}=t,[a,l]=n;return e.setIn(["requestData",a,l,"retainBodyValue"],r)},[o.UPDATE_REQUEST_BODY_INCLUSION]:(e,t)=>{let{payload:{value:r,pathMethod:n,name:a}}=t,[l,s]=n;return e.setIn(["requestData",l,s,"bodyInclusion",a],r)},[o.UPDATE_ACTIVE_EXAMPLES_MEMBER]:(e,t)=>{let{payload:{name:r,pathMethod:n,contextType:a,contextName:l}}=t,[s,o]=n;return e.setIn(["examples",s,o,a,l,"activeExample"],r)},[o.UPDATE_REQUEST_CONTENT_TYPE]:(e,t)=>{let{payload:{value:r,pathMethod:n}}=t,[a,l]=n;return e.setIn(["requestData",a,l,"requestContentType"],r)},[o.UPDATE_RESPONSE_CONTENT_TYPE]:(e,t)=>{let{payload:{value:r,path:n,method:a}}=t;return e.setIn(["requestData",n,a,"responseContentType"],r)},[o.UPDATE_SERVER_VARIABLE_VALUE]:(e,t)=>{let{payload:{server:r,namespace:n,key:a,val:l}}=t;const s=n?[n,"serverVariableValues",r,a]:["serverVariableValues",r,a];return e.setIn(s,l)},[o.SET_REQUEST_BODY_VALIDATE_ERROR]:(e,t)=>{let{payload:{path:r,method:n,validationErrors:a}}=t,o=[];if(o.push("Required field is not provided"),a.missingBodyValue)return e.setIn(["requestData",r,n,"errors"],(0,s.fromJS)(o));if(a.missingRequiredKeys&&a.missingRequiredKeys.length>0){const{missingRequiredKeys:t}=a;return e.updateIn(["requestData",r,n,"bodyValue"],(0,s.fromJS)({}),(e=>(0,l.default)(t).call(t,((e,t)=>e.setIn([t,"errors"],(0,s.fromJS)(o))),e)))}return console.warn("unexpected result: SET_REQUEST_BODY_VALIDATE_ERROR"),e},[o.CLEAR_REQUEST_BODY_VALIDATE_ERROR]:(e,t)=>{let{payload:{path:r,method:a}}=t;const o=e.getIn(["requestData",r,a,"bodyValue"]);if(!s.Map.isMap(o))return e.setIn(["requestData",r,a,"errors"],(0,s.fromJS)([]));const[...i]=(0,n.default)(o).call(o);return i?e.updateIn(["requestData",r,a,"bodyValue"],(0,s.fromJS)({}),(e=>(0,l.default)(i).call(i,((e,t)=>e.setIn([t,"errors"],(0,s.fromJS)([]))),e))):e},[o.CLEAR_REQUEST_BODY_VALUE]:(e,t)=>{let{payload:{pathMethod:r}}=t,[n,a]=r;const l=e.getIn(["requestData",n,a,"bodyValue"]);return l?s.Map.isMap(l)?e.setIn(["requestData",n,a,"bodyValue"],(0,s.Map)()):e.setIn(["requestData",n,a,"bodyValue"],""):e}}},5065:(e,t,r)=>{r.r(t),r.d(t,{activeExamplesMember:()=>E,hasUserEditedBody:()=>g,requestBodyErrors:()=>v,requestBodyInclusionSetting:()=>y,requestBodyValue:()=>f,requestContentType:()=>b,responseContentType:()=>S,selectDefaultRequestBodyValue:()=>m,selectedServer:()=>p,serverEffectiveValue:()=>C,serverVariableValue:()=>_,serverVariables:()=>w,shouldRetainRequestBodyValue:()=>h,validateBeforeExecute:()=>x,validateShallowRequired:()=>I});var n=r(2565),a=r(29),l=r(2740),s=r(8818),o=r(9725),i=r(7779),u=r(2458),c=r(6298);function d(e){return function(){for(var t=arguments.length,r=new Array(t),n=0;n<t;n++)r[n]=arguments[n];return t=>{const n=t.getSystem().specSelectors.specJson();return(0,i.isOAS3)(n)?e(...r):null}}}const p=d(((e,t)=>{const r=t?[t,"selectedServer"]:["selectedServer"];return e.getIn(r)||""})),f=d(((e,t,r)=>e.getIn(["requestData",t,r,"bodyValue"])||null)),h=d(((e,t,r)=>e.getIn(["requestData",t,r,"retainBodyValue"])||!1)),m=(e,t,r)=>e=>{const{oas3Selectors:n,specSelectors:a}=e.getSystem(),l=a.specJson();if((0,i.isOAS3)(l)){const e=n.requestContentType(t,r);if(e)return(0,u.getDefaultRequestBodyValue)(a.specResolvedSubtree(["paths",t,r,"requestBody"]),e,n.activeExamplesMember(t,r,"requestBody","requestBody"))}return null},g=(e,t,r)=>e=>{const{oas3Selectors:n,specSelectors:a}=e.getSystem(),l=a.specJson();if((0,i.isOAS3)(l)){let e=!1;const l=n.requestContentType(t,r);let s=n.requestBodyValue(t,r);if(o.Map.isMap(s)&&(s=(0,c.Pz)(s.mapEntries((e=>o.Map.isMap(e[1])?[e[0],e[1].get("value")]:e)).toJS())),o.List.isList(s)&&(s=(0,c.Pz)(s)),l){const o=(0,u.getDefaultRequestBodyValue)(a.specResolvedSubtree(["paths",t,r,"requestBody"]),l,n.activeExamplesMember(t,r,"requestBody","requestBody"));e=!!s&&s!==o}return e}return null},y=d(((e,t,r)=>e.getIn(["requestData",t,r,"bodyInclusion"])||(0,o.Map)())),v=d(((e,t,r)=>e.getIn(["requestData",t,r,"errors"])||null)),E=d(((e,t,r,n,a)=>e.getIn(["examples",t,r,n,a,"activeExample"])||null)),b=d(((e,t,r)=>e.getIn(["requestData",t,r,"requestContentType"])||null)),S=d(((e,t,r)=>e.getIn(["requestData",t,r,"responseContentType"])||null)),_=d(((e,t,r)=>{let n;if("string"!=typeof t){const{server:e,namespace:a}=t;n=a?[a,"serverVariableValues",e,r]:["serverVariableValues",e,r]}else{n=["serverVariableValues",t,r]}return e.getIn(n)||null})),w=d(((e,t)=>{let r;if("string"!=typeof t){const{server:e,namespace:n}=t;r=n?[n,"serverVariableValues",e]:["serverVariableValues",e]}else{r=["serverVariableValues",t]}return e.getIn(r)||(0,o.OrderedMap)()})),C=d(((e,t)=>{var r,a;if("string"!=typeof t){const{server:n,namespace:l}=t;a=n,r=l?e.getIn([l,"serverVariableValues",a]):e.getIn(["serverVariableValues",a])}else a=t,r=e.getIn(["serverVariableValues",a]);r=r||(0,o.OrderedMap)();let l=a;return(0,n.default)(r).call(r,((e,t)=>{l=l.replace(new RegExp(`{${t}}`,"g"),e)})),l})),x=(A=(e,t)=>((e,t)=>(t=t||[],!!e.getIn(["requestData",...t,"bodyValue"])))(e,t),function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return e=>{const r=e.getSystem().specSelectors.specJson();let n=[...t][1]||[];return!r.getIn(["paths",...n,"requestBody","required"])||A(...t)}});var A;const I=(e,t)=>{var r;let{oas3RequiredRequestBodyContentType:n,oas3RequestContentType:i,oas3RequestBodyValue:u}=t,c=[];if(!o.Map.isMap(u))return c;let d=[];return(0,a.default)(r=(0,l.default)(n.requestContentType)).call(r,(e=>{if(e===i){let t=n.requestContentType[e];(0,a.default)(t).call(t,(e=>{(0,s.default)(d).call(d,e)<0&&d.push(e)}))}})),(0,a.default)(d).call(d,(e=>{u.getIn([e,"value"])||c.push(e)})),c}},1741:(e,t,r)=>{r.r(t),r.d(t,{isSwagger2:()=>d,servers:()=>u});var n=r(8639),a=r(9725),l=r(7779);const s=e=>e||(0,a.Map)(),o=(0,n.createSelector)(s,(e=>e.get("json",(0,a.Map)()))),i=(0,n.createSelector)(s,(e=>e.get("resolved",(0,a.Map)()))),u=(c=(0,n.createSelector)((e=>{let t=i(e);return t.count()<1&&(t=o(e)),t}),(e=>e.getIn(["servers"])||(0,a.Map)())),()=>function(e){const t=e.getSystem().specSelectors.specJson();if((0,l.isOAS3)(t)){for(var r=arguments.length,n=new Array(r>1?r-1:0),a=1;a<r;a++)n[a-1]=arguments[a];return c(...n)}return null});var c;const d=(e,t)=>()=>{const e=t.getSystem().specSelectors.specJson();return(0,l.isSwagger2)(e)}},2044:(e,t,r)=>{r.r(t),r.d(t,{basePath:()=>y,consumes:()=>v,definitions:()=>f,hasHost:()=>h,host:()=>g,isOAS3:()=>_,isSwagger2:()=>w,produces:()=>E,schemes:()=>b,securityDefinitions:()=>m,servers:()=>S});var n=r(8639),a=r(3881),l=r(9725),s=r(7779);function o(e){return(t,r)=>function(){const n=r.getSystem().specSelectors.specJson();return(0,s.isOAS3)(n)?e(...arguments):t(...arguments)}}const i=e=>e||(0,l.Map)(),u=o((0,n.createSelector)((()=>null))),c=(0,n.createSelector)(i,(e=>e.get("json",(0,l.Map)()))),d=(0,n.createSelector)(i,(e=>e.get("resolved",(0,l.Map)()))),p=e=>{let t=d(e);return t.count()<1&&(t=c(e)),t},f=o((0,n.createSelector)(p,(e=>{const t=e.getIn(["components","schemas"]);return l.Map.isMap(t)?t:(0,l.Map)()}))),h=o((e=>p(e).hasIn(["servers",0]))),m=o((0,n.createSelector)(a.specJsonWithResolvedSubtrees,(e=>e.getIn(["components","securitySchemes"])||null))),g=u,y=u,v=u,E=u,b=u,S=o((0,n.createSelector)(p,(e=>e.getIn(["servers"])||(0,l.Map)()))),_=(e,t)=>()=>{const e=t.getSystem().specSelectors.specJson();return(0,s.isOAS3)(l.Map.isMap(e)?e:(0,l.Map)())},w=(e,t)=>()=>{const e=t.getSystem().specSelectors.specJson();return(0,s.isSwagger2)(l.Map.isMap(e)?e:(0,l.Map)())}},356:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(810);const a=(0,r(7779).OAS3ComponentWrapFactory)((e=>{let{Ori:t,...r}=e;const{schema:a,getComponent:l,errSelectors:s,authorized:o,onAuthChange:i,name:u}=r,c=l("HttpAuth");return"http"===a.get("type")?n.default.createElement(c,{key:u,schema:a,name:u,errSelectors:s,authorized:o,getComponent:l,onChange:i}):n.default.createElement(t,r)}))},7761:(e,t,r)=>{r.r(t),r.d(t,{default:()=>u});var n=r(2460),a=r(356),l=r(9487),s=r(58),o=r(3499),i=r(287);const u={Markdown:n.default,AuthItem:a.default,JsonSchema_string:i.default,VersionStamp:l.default,model:o.default,onlineValidatorBadge:s.default}},287:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(810);const a=(0,r(7779).OAS3ComponentWrapFactory)((e=>{let{Ori:t,...r}=e;const{schema:a,getComponent:l,errors:s,onChange:o}=r,i=a&&a.get?a.get("format"):null,u=a&&a.get?a.get("type"):null,c=l("Input");return u&&"string"===u&&i&&("binary"===i||"base64"===i)?n.default.createElement(c,{type:"file",className:s.length?"invalid":"",title:s.length?s:"",onChange:e=>{o(e.target.files[0])},disabled:t.isDisabled}):n.default.createElement(t,r)}))},2460:(e,t,r)=>{r.r(t),r.d(t,{Markdown:()=>c,default:()=>d});var n=r(5942),a=r(810),l=(r(5053),r(8096)),s=r(3952),o=r(7779),i=r(5466);const u=new s.Remarkable("commonmark");u.block.ruler.enable(["table"]),u.set({linkTarget:"_blank"});const c=e=>{let{source:t,className:r="",getConfigs:s}=e;if("string"!=typeof t)return null;if(t){const{useUnsafeMarkdown:e}=s(),o=u.render(t),c=(0,i.s)(o,{useUnsafeMarkdown:e});let d;return"string"==typeof c&&(d=(0,n.default)(c).call(c)),a.default.createElement("div",{dangerouslySetInnerHTML:{__html:d},className:(0,l.default)(r,"renderedMarkdown")})}return null};c.defaultProps={getConfigs:()=>({useUnsafeMarkdown:!1})};const d=(0,o.OAS3ComponentWrapFactory)(c)},3499:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(863),a=r(810),l=(r(5053),r(7779)),s=r(1543);class o extends a.Component{render(){let{getConfigs:e,schema:t}=this.props,r=["model-box"],l=null;return!0===t.get("deprecated")&&(r.push("deprecated"),l=a.default.createElement("span",{className:"model-deprecated-warning"},"Deprecated:")),a.default.createElement("div",{className:r.join(" ")},l,a.default.createElement(s.Z,(0,n.default)({},this.props,{getConfigs:e,depth:1,expandDepth:this.props.expandDepth||0})))}}const i=(0,l.OAS3ComponentWrapFactory)(o)},58:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(7779),a=r(5623);const l=(0,n.OAS3ComponentWrapFactory)(a.Z)},9487:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(810);const a=(0,r(7779).OAS3ComponentWrapFactory)((e=>{const{Ori:t}=e;return n.default.createElement("span",null,n.default.createElement(t,e),n.default.createElement("small",{className:"version-stamp"},n.default.createElement("pre",{className:"version"},"OAS3")))}))},8560:(e,t,r)=>{r.r(t),r.d(t,{default:()=>l});var n=r(6235);let a=!1;function l(){return{statePlugins:{spec:{wrapActions:{updateSpec:e=>function(){return a=!0,e(...arguments)},updateJsonSpec:(e,t)=>function(){const r=t.getConfigs().onComplete;return a&&"function"==typeof r&&((0,n.default)(r,0),a=!1),e(...arguments)}}}}}}},4624:(e,t,r)=>{r.r(t),r.d(t,{requestSnippetGenerator_curl_bash:()=>E,requestSnippetGenerator_curl_cmd:()=>b,requestSnippetGenerator_curl_powershell:()=>v});var n=r(8818),a=r(5942),s=r(313),o=r(2565);const i=(e=>{var t={};return r.d(t,e),t})({default:()=>l.default});var u=r(2954),c=r(2372),d=r(7504),p=r(9725);const f=e=>{var t;const r="_**[]";return(0,n.default)(e).call(e,r)<0?e:(0,a.default)(t=e.split(r)[0]).call(t)},h=e=>"-d "===e||/^[_\/-]/g.test(e)?e:"'"+e.replace(/'/g,"'\\''")+"'",m=e=>"-d "===(e=e.replace(/\^/g,"^^").replace(/\\"/g,'\\\\"').replace(/"/g,'""').replace(/\n/g,"^\n"))?e.replace(/-d /g,"-d ^\n"):/^[_\/-]/g.test(e)?e:'"'+e+'"',g=e=>"-d "===e?e:/\n/.test(e)?'@"\n'+e.replace(/"/g,'\\"').replace(/`/g,"``").replace(/\$/,"`$")+'\n"@':/^[_\/-]/g.test(e)?e:"'"+e.replace(/"/g,'""').replace(/'/g,"''")+"'";const y=function(e,t,r){let n=arguments.length>3&&void 0!==arguments[3]?arguments[3]:"",a=!1,l="";const h=function(){for(var e=arguments.length,r=new Array(e),n=0;n<e;n++)r[n]=arguments[n];return l+=" "+(0,o.default)(r).call(r,t).join(" ")},m=function(){for(var e=arguments.length,r=new Array(e),n=0;n<e;n++)r[n]=arguments[n];return l+=(0,o.default)(r).call(r,t).join(" ")},g=()=>l+=` ${r}`,y=function(){let e=arguments.length>0&&void 0!==arguments[0]?arguments[0]:1;return l+=(0,i.default)("  ").call("  ",e)};let v=e.get("headers");if(l+="curl"+n,e.has("curlOptions")&&h(...e.get("curlOptions")),h("-X",e.get("method")),g(),y(),m(`${e.get("url")}`),v&&v.size)for(let t of(0,u.default)(E=e.get("headers")).call(E)){var E;g(),y();let[e,r]=t;m("-H",`${e}: ${r}`),a=a||/^content-type$/i.test(e)&&/^multipart\/form-data$/i.test(r)}const b=e.get("body");var S;if(b)if(a&&(0,c.default)(S=["POST","PUT","PATCH"]).call(S,e.get("method")))for(let[e,t]of b.entrySeq()){let r=f(e);g(),y(),m("-F"),t instanceof d.Z.File?h(`${r}=@${t.name}${t.type?`;type=${t.type}`:""}`):h(`${r}=${t}`)}else if(b instanceof d.Z.File)g(),y(),m(`--data-binary '@${b.name}'`);else{g(),y(),m("-d ");let t=b;p.Map.isMap(t)?m(function(e){let t=[];for(let[r,n]of e.get("body").entrySeq()){let e=f(r);n instanceof d.Z.File?t.push(`  "${e}": {\n    "name": "${n.name}"${n.type?`,\n    "type": "${n.type}"`:""}\n  }`):t.push(`  "${e}": ${(0,s.default)(n,null,2).replace(/(\r\n|\r|\n)/g,"\n  ")}`)}return`{\n${t.join(",\n")}\n}`}(e)):("string"!=typeof t&&(t=(0,s.default)(t)),m(t))}else b||"POST"!==e.get("method")||(g(),y(),m("-d ''"));return l},v=e=>y(e,g,"`\n",".exe"),E=e=>y(e,h,"\\\n"),b=e=>y(e,m,"^\n")},6575:(e,t,r)=>{r.r(t),r.d(t,{default:()=>s});var n=r(4624),a=r(4669),l=r(4206);const s=()=>({components:{RequestSnippets:l.default},fn:n,statePlugins:{requestSnippets:{selectors:a}}})},4206:(e,t,r)=>{r.r(t),r.d(t,{default:()=>h});var n=r(6145),a=r(8898),l=r(29),s=r(2565),o=r(810),i=(r(5053),r(9908)),u=r(7068),c=r(9874),d=r(471);const p={cursor:"pointer",lineHeight:1,display:"inline-flex",backgroundColor:"rgb(250, 250, 250)",paddingBottom:"0",paddingTop:"0",border:"1px solid rgb(51, 51, 51)",borderRadius:"4px 4px 0 0",boxShadow:"none",borderBottom:"none"},f={cursor:"pointer",lineHeight:1,display:"inline-flex",backgroundColor:"rgb(51, 51, 51)",boxShadow:"none",border:"1px solid rgb(51, 51, 51)",paddingBottom:"0",paddingTop:"0",borderRadius:"4px 4px 0 0",marginTop:"-5px",marginRight:"-5px",marginLeft:"-5px",zIndex:"9999",borderBottom:"none"},h=e=>{var t,r;let{request:h,requestSnippetsSelectors:m,getConfigs:g}=e;const y=(0,u.default)(g)?g():null,v=!1!==(0,i.default)(y,"syntaxHighlight")&&(0,i.default)(y,"syntaxHighlight.activated",!0),E=(0,o.useRef)(null),[b,S]=(0,o.useState)(null===(t=m.getSnippetGenerators())||void 0===t?void 0:t.keySeq().first()),[_,w]=(0,o.useState)(null==m?void 0:m.getDefaultExpanded());(0,o.useEffect)((()=>{}),[]),(0,o.useEffect)((()=>{var e;const t=(0,n.default)(e=(0,a.default)(E.current.childNodes)).call(e,(e=>{var t;return!!e.nodeType&&(null===(t=e.classList)||void 0===t?void 0:t.contains("curl-command"))}));return(0,l.default)(t).call(t,(e=>e.addEventListener("mousewheel",N,{passive:!1}))),()=>{(0,l.default)(t).call(t,(e=>e.removeEventListener("mousewheel",N)))}}),[h]);const C=m.getSnippetGenerators(),x=C.get(b),A=x.get("fn")(h),I=()=>{w(!_)},R=e=>e===b?f:p,N=e=>{const{target:t,deltaY:r}=e,{scrollHeight:n,offsetHeight:a,scrollTop:l}=t;n>a&&(0===l&&r<0||a+l>=n&&r>0)&&e.preventDefault()},T=v?o.default.createElement(d.d3,{language:x.get("syntax"),className:"curl microlight",style:(0,d.C2)((0,i.default)(y,"syntaxHighlight.theme"))},A):o.default.createElement("textarea",{readOnly:!0,className:"curl",value:A});return o.default.createElement("div",{className:"request-snippets",ref:E},o.default.createElement("div",{style:{width:"100%",display:"flex",justifyContent:"flex-start",alignItems:"center",marginBottom:"15px"}},o.default.createElement("h4",{onClick:()=>I(),style:{cursor:"pointer"}},"Snippets"),o.default.createElement("button",{onClick:()=>I(),style:{border:"none",background:"none"},title:_?"Collapse operation":"Expand operation"},o.default.createElement("svg",{className:"arrow",width:"10",height:"10"},o.default.createElement("use",{href:_?"#large-arrow-down":"#large-arrow",xlinkHref:_?"#large-arrow-down":"#large-arrow"})))),_&&o.default.createElement("div",{className:"curl-command"},o.default.createElement("div",{style:{paddingLeft:"15px",paddingRight:"10px",width:"100%",display:"flex"}},(0,s.default)(r=C.entrySeq()).call(r,(e=>{let[t,r]=e;return o.default.createElement("div",{style:R(t),className:"btn",key:t,onClick:()=>(e=>{b!==e&&S(e)})(t)},o.default.createElement("h4",{style:t===b?{color:"white"}:{}},r.get("title")))}))),o.default.createElement("div",{className:"copy-to-clipboard"},o.default.createElement(c.CopyToClipboard,{text:A},o.default.createElement("button",null))),o.default.createElement("div",null,T)))}},4669:(e,t,r)=>{r.r(t),r.d(t,{getActiveLanguage:()=>d,getDefaultExpanded:()=>p,getGenerators:()=>u,getSnippetGenerators:()=>c});var n=r(6145),a=r(2372),l=r(2565),s=r(8639),o=r(9725);const i=e=>e||(0,o.Map)(),u=(0,s.createSelector)(i,(e=>{const t=e.get("languages"),r=e.get("generators",(0,o.Map)());return!t||t.isEmpty()?r:(0,n.default)(r).call(r,((e,r)=>(0,a.default)(t).call(t,r)))})),c=e=>t=>{var r,a;let{fn:s}=t;return(0,n.default)(r=(0,l.default)(a=u(e)).call(a,((e,t)=>{const r=(e=>s[`requestSnippetGenerator_${e}`])(t);return"function"!=typeof r?null:e.set("fn",r)}))).call(r,(e=>e))},d=(0,s.createSelector)(i,(e=>e.get("activeLanguage"))),p=(0,s.createSelector)(i,(e=>e.get("defaultExpanded")))},6195:(e,t,r)=>{r.r(t),r.d(t,{ErrorBoundary:()=>s,default:()=>o});r(5053);var n=r(810),a=r(6189),l=r(9403);class s extends n.Component{static getDerivedStateFromError(e){return{hasError:!0,error:e}}constructor(){super(...arguments),this.state={hasError:!1,error:null}}componentDidCatch(e,t){this.props.fn.componentDidCatch(e,t)}render(){const{getComponent:e,targetName:t,children:r}=this.props;if(this.state.hasError){const r=e("Fallback");return n.default.createElement(r,{name:t})}return r}}s.defaultProps={targetName:"this component",getComponent:()=>l.default,fn:{componentDidCatch:a.componentDidCatch},children:null};const o=s},9403:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(810);r(5053);const a=e=>{let{name:t}=e;return n.default.createElement("div",{className:"fallback"},"😱 ",n.default.createElement("i",null,"Could not render ","t"===t?"this component":t,", see the console."))}},6189:(e,t,r)=>{r.r(t),r.d(t,{componentDidCatch:()=>l,withErrorBoundary:()=>s});var n=r(863),a=r(810);const l=console.error,s=e=>t=>{const{getComponent:r,fn:l}=e(),s=r("ErrorBoundary"),o=l.getDisplayName(t);class i extends a.Component{render(){return a.default.createElement(s,{targetName:o,getComponent:r,fn:l},a.default.createElement(t,(0,n.default)({},this.props,this.context)))}}var u;return i.displayName=`WithErrorBoundary(${o})`,(u=t).prototype&&u.prototype.isReactComponent&&(i.prototype.mapStateToProps=t.prototype.mapStateToProps),i}},8102:(e,t,r)=>{r.r(t),r.d(t,{default:()=>c});const n=(e=>{var t={};return r.d(t,e),t})({default:()=>s.default});const a=(e=>{var t={};return r.d(t,e),t})({default:()=>o.default});var l=r(6195),i=r(9403),u=r(6189);const c=function(){let{componentList:e=[],fullOverride:t=!1}=arguments.length>0&&void 0!==arguments[0]?arguments[0]:{};return r=>{var s;let{getSystem:o}=r;const c=t?e:["App","BaseLayout","VersionPragmaFilter","InfoContainer","ServersContainer","SchemesContainer","AuthorizeBtnContainer","FilterContainer","Operations","OperationContainer","parameters","responses","OperationServers","Models","ModelWrapper",...e],d=(0,a.default)(c,(0,n.default)(s=Array(c.length)).call(s,((e,t)=>{let{fn:r}=t;return r.withErrorBoundary(e)})));return{fn:{componentDidCatch:u.componentDidCatch,withErrorBoundary:(0,u.withErrorBoundary)(o)},components:{ErrorBoundary:l.default,Fallback:i.default},wrapComponents:d}}}},2473:(e,t,r)=>{r.r(t),r.d(t,{createXMLExample:()=>O,inferSchema:()=>T,memoizedCreateXMLExample:()=>P,memoizedSampleFromSchema:()=>j,sampleFromSchema:()=>k,sampleFromSchemaGeneric:()=>N});var n=r(8818),a=r(29),l=r(4163),s=r(2372),o=r(9963),c=r(8136),d=r(1778),p=r(5171),f=r(2565),h=r(313),m=r(3479),g=r.n(m);const y=(e=>{var t={};return r.d(t,e),t})({default:()=>i.default});const v=(e=>{var t={};return r.d(t,e),t})({default:()=>u.default});var E=r(6298),b=r(9669);const S={string:e=>e.pattern?(e=>{try{return new y.default(e).gen()}catch(e){return"string"}})(e.pattern):"string",string_email:()=>"user@example.com","string_date-time":()=>(new Date).toISOString(),string_date:()=>(new Date).toISOString().substring(0,10),string_uuid:()=>"3fa85f64-5717-4562-b3fc-2c963f66afa6",string_hostname:()=>"example.com",string_ipv4:()=>"198.51.100.42",string_ipv6:()=>"2001:0db8:5b96:0000:0000:426f:8e17:642a",number:()=>0,number_float:()=>0,integer:()=>0,boolean:e=>"boolean"!=typeof e.default||e.default},_=e=>{e=(0,E.mz)(e);let{type:t,format:r}=e,n=S[`${t}_${r}`]||S[t];return(0,E.Wl)(n)?n(e):"Unknown Type: "+e.type},w=e=>(0,E.XV)(e,"$$ref",(e=>"string"==typeof e&&(0,n.default)(e).call(e,"#")>-1)),C=["maxProperties","minProperties"],x=["minItems","maxItems"],A=["minimum","maximum","exclusiveMinimum","exclusiveMaximum"],I=["minLength","maxLength"],R=function(e,t){var r;let o=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{};var i;((0,a.default)(r=["example","default","enum","xml","type",...C,...x,...A,...I]).call(r,(r=>(r=>{void 0===t[r]&&void 0!==e[r]&&(t[r]=e[r])})(r))),void 0!==e.required&&(0,l.default)(e.required))&&(void 0!==t.required&&t.required.length||(t.required=[]),(0,a.default)(i=e.required).call(i,(e=>{var r;(0,s.default)(r=t.required).call(r,e)||t.required.push(e)})));if(e.properties){t.properties||(t.properties={});let r=(0,E.mz)(e.properties);for(let a in r){var u;if(Object.prototype.hasOwnProperty.call(r,a))if(!r[a]||!r[a].deprecated)if(!r[a]||!r[a].readOnly||o.includeReadOnly)if(!r[a]||!r[a].writeOnly||o.includeWriteOnly)if(!t.properties[a])t.properties[a]=r[a],!e.required&&(0,l.default)(e.required)&&-1!==(0,n.default)(u=e.required).call(u,a)&&(t.required?t.required.push(a):t.required=[a])}}return e.items&&(t.items||(t.items={}),t.items=R(e.items,t.items,o)),t},N=function(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{},r=arguments.length>2&&void 0!==arguments[2]?arguments[2]:void 0,i=arguments.length>3&&void 0!==arguments[3]&&arguments[3];e&&(0,E.Wl)(e.toJS)&&(e=e.toJS());let u=void 0!==r||e&&void 0!==e.example||e&&void 0!==e.default;const h=!u&&e&&e.oneOf&&e.oneOf.length>0,m=!u&&e&&e.anyOf&&e.anyOf.length>0;if(!u&&(h||m)){const r=(0,E.mz)(h?e.oneOf[0]:e.anyOf[0]);if(R(r,e,t),!e.xml&&r.xml&&(e.xml=r.xml),void 0!==e.example&&void 0!==r.example)u=!0;else if(r.properties){e.properties||(e.properties={});let a=(0,E.mz)(r.properties);for(let s in a){var g;if(Object.prototype.hasOwnProperty.call(a,s))if(!a[s]||!a[s].deprecated)if(!a[s]||!a[s].readOnly||t.includeReadOnly)if(!a[s]||!a[s].writeOnly||t.includeWriteOnly)if(!e.properties[s])e.properties[s]=a[s],!r.required&&(0,l.default)(r.required)&&-1!==(0,n.default)(g=r.required).call(g,s)&&(e.required?e.required.push(s):e.required=[s])}}}const y={};let{xml:b,type:S,example:I,properties:T,additionalProperties:O,items:k}=e||{},{includeReadOnly:M,includeWriteOnly:P}=t;b=b||{};let j,{name:L,prefix:q,namespace:B}=b,D={};if(i&&(L=L||"notagname",j=(q?q+":":"")+L,B)){y[q?"xmlns:"+q:"xmlns"]=B}i&&(D[j]=[]);const U=t=>(0,o.default)(t).call(t,(t=>Object.prototype.hasOwnProperty.call(e,t)));e&&!S&&(T||O||U(C)?S="object":k||U(x)?S="array":U(A)?(S="number",e.type="number"):u||e.enum||(S="string",e.type="string"));const V=t=>{var r,n,a,l,s;null!==(null===(r=e)||void 0===r?void 0:r.maxItems)&&void 0!==(null===(n=e)||void 0===n?void 0:n.maxItems)&&(t=(0,c.default)(t).call(t,0,null===(s=e)||void 0===s?void 0:s.maxItems));if(null!==(null===(a=e)||void 0===a?void 0:a.minItems)&&void 0!==(null===(l=e)||void 0===l?void 0:l.minItems)){let r=0;for(;t.length<(null===(o=e)||void 0===o?void 0:o.minItems);){var o;t.push(t[r++%t.length])}}return t},z=(0,E.mz)(T);let F,$=0;const J=()=>e&&null!==e.maxProperties&&void 0!==e.maxProperties&&$>=e.maxProperties,W=t=>!e||null===e.maxProperties||void 0===e.maxProperties||!J()&&(!(t=>{var r;return!(e&&e.required&&e.required.length&&(0,s.default)(r=e.required).call(r,t))})(t)||e.maxProperties-$-(()=>{if(!e||!e.required)return 0;let t=0;var r,n;return i?(0,a.default)(r=e.required).call(r,(e=>t+=void 0===D[e]?0:1)):(0,a.default)(n=e.required).call(n,(e=>{var r;return t+=void 0===(null===(r=D[j])||void 0===r?void 0:(0,d.default)(r).call(r,(t=>void 0!==t[e])))?0:1})),e.required.length-t})()>0);if(F=i?function(r){let n=arguments.length>1&&void 0!==arguments[1]?arguments[1]:void 0;if(e&&z[r]){if(z[r].xml=z[r].xml||{},z[r].xml.attribute){const e=(0,l.default)(z[r].enum)?z[r].enum[0]:void 0,t=z[r].example,n=z[r].default;return void(y[z[r].xml.name||r]=void 0!==t?t:void 0!==n?n:void 0!==e?e:_(z[r]))}z[r].xml.name=z[r].xml.name||r}else z[r]||!1===O||(z[r]={xml:{name:r}});let a=N(e&&z[r]||void 0,t,n,i);var s;W(r)&&($++,(0,l.default)(a)?D[j]=(0,p.default)(s=D[j]).call(s,a):D[j].push(a))}:(r,n)=>{if(W(r)){if(Object.prototype.hasOwnProperty.call(e,"discriminator")&&e.discriminator&&Object.prototype.hasOwnProperty.call(e.discriminator,"mapping")&&e.discriminator.mapping&&Object.prototype.hasOwnProperty.call(e,"$$ref")&&e.$$ref&&e.discriminator.propertyName===r){for(let t in e.discriminator.mapping)if(-1!==e.$$ref.search(e.discriminator.mapping[t])){D[r]=t;break}}else D[r]=N(z[r],t,n,i);$++}},u){let n;if(n=w(void 0!==r?r:void 0!==I?I:e.default),!i){if("number"==typeof n&&"string"===S)return`${n}`;if("string"!=typeof n||"string"===S)return n;try{return JSON.parse(n)}catch(e){return n}}if(e||(S=(0,l.default)(n)?"array":typeof n),"array"===S){if(!(0,l.default)(n)){if("string"==typeof n)return n;n=[n]}const r=e?e.items:void 0;r&&(r.xml=r.xml||b||{},r.xml.name=r.xml.name||b.name);let a=(0,f.default)(n).call(n,(e=>N(r,t,e,i)));return a=V(a),b.wrapped?(D[j]=a,(0,v.default)(y)||D[j].push({_attr:y})):D=a,D}if("object"===S){if("string"==typeof n)return n;for(let t in n)Object.prototype.hasOwnProperty.call(n,t)&&(e&&z[t]&&z[t].readOnly&&!M||e&&z[t]&&z[t].writeOnly&&!P||(e&&z[t]&&z[t].xml&&z[t].xml.attribute?y[z[t].xml.name||t]=n[t]:F(t,n[t])));return(0,v.default)(y)||D[j].push({_attr:y}),D}return D[j]=(0,v.default)(y)?n:[{_attr:y},n],D}if("object"===S){for(let e in z)Object.prototype.hasOwnProperty.call(z,e)&&(z[e]&&z[e].deprecated||z[e]&&z[e].readOnly&&!M||z[e]&&z[e].writeOnly&&!P||F(e));if(i&&y&&D[j].push({_attr:y}),J())return D;if(!0===O)i?D[j].push({additionalProp:"Anything can be here"}):D.additionalProp1={},$++;else if(O){const r=(0,E.mz)(O),n=N(r,t,void 0,i);if(i&&r.xml&&r.xml.name&&"notagname"!==r.xml.name)D[j].push(n);else{const t=null!==e.minProperties&&void 0!==e.minProperties&&$<e.minProperties?e.minProperties-$:3;for(let e=1;e<=t;e++){if(J())return D;if(i){const t={};t["additionalProp"+e]=n.notagname,D[j].push(t)}else D["additionalProp"+e]=n;$++}}}return D}if("array"===S){if(!k)return;let r;var H,K;if(i)k.xml=k.xml||(null===(H=e)||void 0===H?void 0:H.xml)||{},k.xml.name=k.xml.name||b.name;if((0,l.default)(k.anyOf))r=(0,f.default)(K=k.anyOf).call(K,(e=>N(R(k,e,t),t,void 0,i)));else if((0,l.default)(k.oneOf)){var G;r=(0,f.default)(G=k.oneOf).call(G,(e=>N(R(k,e,t),t,void 0,i)))}else{if(!(!i||i&&b.wrapped))return N(k,t,void 0,i);r=[N(k,t,void 0,i)]}return r=V(r),i&&b.wrapped?(D[j]=r,(0,v.default)(y)||D[j].push({_attr:y}),D):r}let Z;if(e&&(0,l.default)(e.enum))Z=(0,E.AF)(e.enum)[0];else{if(!e)return;if(Z=_(e),"number"==typeof Z){let t=e.minimum;null!=t&&(e.exclusiveMinimum&&t++,Z=t);let r=e.maximum;null!=r&&(e.exclusiveMaximum&&r--,Z=r)}if("string"==typeof Z&&(null!==e.maxLength&&void 0!==e.maxLength&&(Z=(0,c.default)(Z).call(Z,0,e.maxLength)),null!==e.minLength&&void 0!==e.minLength)){let t=0;for(;Z.length<e.minLength;)Z+=Z[t++%Z.length]}}if("file"!==S)return i?(D[j]=(0,v.default)(y)?Z:[{_attr:y},Z],D):Z},T=e=>(e.schema&&(e=e.schema),e.properties&&(e.type="object"),e),O=(e,t,r)=>{const n=N(e,t,r,!0);if(n)return"string"==typeof n?n:g()(n,{declaration:!0,indent:"\t"})},k=(e,t,r)=>N(e,t,r,!1),M=(e,t,r)=>[e,(0,h.default)(t),(0,h.default)(r)],P=(0,b.Z)(O,M),j=(0,b.Z)(k,M)},8883:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(2473);function a(){return{fn:n}}},5179:(e,t,r)=>{r.r(t),r.d(t,{CLEAR_REQUEST:()=>V,CLEAR_RESPONSE:()=>U,CLEAR_VALIDATE_PARAMS:()=>z,LOG_REQUEST:()=>D,SET_MUTATED_REQUEST:()=>B,SET_REQUEST:()=>q,SET_RESPONSE:()=>L,SET_SCHEME:()=>W,UPDATE_EMPTY_PARAM_INCLUSION:()=>P,UPDATE_JSON:()=>k,UPDATE_OPERATION_META_VALUE:()=>F,UPDATE_PARAM:()=>M,UPDATE_RESOLVED:()=>$,UPDATE_RESOLVED_SUBTREE:()=>J,UPDATE_SPEC:()=>T,UPDATE_URL:()=>O,VALIDATE_PARAMS:()=>j,changeConsumesValue:()=>de,changeParam:()=>ae,changeParamByIdentity:()=>le,changeProducesValue:()=>pe,clearRequest:()=>be,clearResponse:()=>Ee,clearValidateParams:()=>ce,execute:()=>ve,executeRequest:()=>ye,invalidateResolvedSubtreeCache:()=>oe,logRequest:()=>ge,parseToJson:()=>X,requestResolvedSubtree:()=>ne,resolveSpec:()=>ee,setMutatedRequest:()=>me,setRequest:()=>he,setResponse:()=>fe,setScheme:()=>Se,updateEmptyParamInclusion:()=>ue,updateJsonSpec:()=>Y,updateResolved:()=>G,updateResolvedSubtree:()=>se,updateSpec:()=>K,updateUrl:()=>Z,validateParams:()=>ie});var n=r(4163),a=r(2565),l=r(6718),s=r.n(l),o=r(6785),i=r(7930);const u=(e=>{var t={};return r.d(t,e),t})({default:()=>c.default});var m=r(6145),g=r(374),y=r(8818),v=r(29),E=r(2740),b=r(7512);const S=(e=>{var t={};return r.d(t,e),t})({default:()=>d.default});var _=r(626),w=r(9725),C=r(8900),x=r(8518);const A=(e=>{var t={};return r.d(t,e),t})({default:()=>p.default});const I=(e=>{var t={};return r.d(t,e),t})({default:()=>f.default});const R=(e=>{var t={};return r.d(t,e),t})({default:()=>h.default});var N=r(6298);const T="spec_update_spec",O="spec_update_url",k="spec_update_json",M="spec_update_param",P="spec_update_empty_param_inclusion",j="spec_validate_param",L="spec_set_response",q="spec_set_request",B="spec_set_mutated_request",D="spec_log_request",U="spec_clear_response",V="spec_clear_request",z="spec_clear_validate_param",F="spec_update_operation_meta_value",$="spec_update_resolved",J="spec_update_resolved_subtree",W="set_scheme",H=e=>(0,A.default)(e)?e:"";function K(e){const t=H(e).replace(/\t/g,"  ");if("string"==typeof e)return{type:T,payload:t}}function G(e){return{type:$,payload:e}}function Z(e){return{type:O,payload:e}}function Y(e){return{type:k,payload:e}}const X=e=>t=>{let{specActions:r,specSelectors:n,errActions:a}=t,{specStr:l}=n,s=null;try{e=e||l(),a.clear({source:"parser"}),s=_.default.load(e,{schema:_.JSON_SCHEMA})}catch(e){return console.error(e),a.newSpecErr({source:"parser",level:"error",message:e.reason,line:e.mark&&e.mark.line?e.mark.line+1:void 0})}return s&&"object"==typeof s?r.updateJsonSpec(s):{}};let Q=!1;const ee=(e,t)=>r=>{let{specActions:l,specSelectors:o,errActions:i,fn:{fetch:u,resolve:c,AST:d={}},getConfigs:p}=r;Q||(console.warn("specActions.resolveSpec is deprecated since v3.10.0 and will be removed in v4.0.0; use requestResolvedSubtree instead!"),Q=!0);const{modelPropertyMacro:f,parameterMacro:h,requestInterceptor:m,responseInterceptor:g}=p();void 0===e&&(e=o.specJson()),void 0===t&&(t=o.url());let y=d.getLineNumberForPath?d.getLineNumberForPath:()=>{},v=o.specStr();return c({fetch:u,spec:e,baseDoc:t,modelPropertyMacro:f,parameterMacro:h,requestInterceptor:m,responseInterceptor:g}).then((e=>{let{spec:t,errors:r}=e;if(i.clear({type:"thrown"}),(0,n.default)(r)&&r.length>0){let e=(0,a.default)(r).call(r,(e=>(console.error(e),e.line=e.fullPath?y(v,e.fullPath):null,e.path=e.fullPath?e.fullPath.join("."):null,e.level="error",e.type="thrown",e.source="resolver",s()(e,"message",{enumerable:!0,value:e.message}),e)));i.newThrownErrBatch(e)}return l.updateResolved(t)}))};let te=[];const re=(0,I.default)((async()=>{const e=te.system;if(!e)return void console.error("debResolveSubtrees: don't have a system to operate on, aborting.");const{errActions:t,errSelectors:r,fn:{resolveSubtree:l,fetch:c,AST:d={}},specSelectors:p,specActions:f}=e;if(!l)return void console.error("Error: Swagger-Client did not provide a `resolveSubtree` method, doing nothing.");let h=d.getLineNumberForPath?d.getLineNumberForPath:()=>{};const y=p.specStr(),{modelPropertyMacro:v,parameterMacro:E,requestInterceptor:b,responseInterceptor:S}=e.getConfigs();try{var _=await(0,o.default)(te).call(te,(async(e,o)=>{const{resultMap:d,specWithCurrentSubtrees:f}=await e,{errors:_,spec:w}=await l(f,o,{baseDoc:p.url(),modelPropertyMacro:v,parameterMacro:E,requestInterceptor:b,responseInterceptor:S});if(r.allErrors().size&&t.clearBy((e=>{var t;return"thrown"!==e.get("type")||"resolver"!==e.get("source")||!(0,i.default)(t=e.get("fullPath")).call(t,((e,t)=>e===o[t]||void 0===o[t]))})),(0,n.default)(_)&&_.length>0){let e=(0,a.default)(_).call(_,(e=>(e.line=e.fullPath?h(y,e.fullPath):null,e.path=e.fullPath?e.fullPath.join("."):null,e.level="error",e.type="thrown",e.source="resolver",s()(e,"message",{enumerable:!0,value:e.message}),e)));t.newThrownErrBatch(e)}var C,x;w&&p.isOAS3()&&"components"===o[0]&&"securitySchemes"===o[1]&&await u.default.all((0,a.default)(C=(0,m.default)(x=(0,g.default)(w)).call(x,(e=>"openIdConnect"===e.type))).call(C,(async e=>{const t={url:e.openIdConnectUrl,requestInterceptor:b,responseInterceptor:S};try{const r=await c(t);r instanceof Error||r.status>=400?console.error(r.statusText+" "+t.url):e.openIdConnectData=JSON.parse(r.text)}catch(e){console.error(e)}})));return(0,R.default)(d,o,w),(0,R.default)(f,o,w),{resultMap:d,specWithCurrentSubtrees:f}}),u.default.resolve({resultMap:(p.specResolvedSubtree([])||(0,w.Map)()).toJS(),specWithCurrentSubtrees:p.specJson().toJS()}));delete te.system,te=[]}catch(e){console.error(e)}f.updateResolvedSubtree([],_.resultMap)}),35),ne=e=>t=>{var r;(0,y.default)(r=(0,a.default)(te).call(te,(e=>e.join("@@")))).call(r,e.join("@@"))>-1||(te.push(e),te.system=t,re())};function ae(e,t,r,n,a){return{type:M,payload:{path:e,value:n,paramName:t,paramIn:r,isXml:a}}}function le(e,t,r,n){return{type:M,payload:{path:e,param:t,value:r,isXml:n}}}const se=(e,t)=>({type:J,payload:{path:e,value:t}}),oe=()=>({type:J,payload:{path:[],value:(0,w.Map)()}}),ie=(e,t)=>({type:j,payload:{pathMethod:e,isOAS3:t}}),ue=(e,t,r,n)=>({type:P,payload:{pathMethod:e,paramName:t,paramIn:r,includeEmptyValue:n}});function ce(e){return{type:z,payload:{pathMethod:e}}}function de(e,t){return{type:F,payload:{path:e,value:t,key:"consumes_value"}}}function pe(e,t){return{type:F,payload:{path:e,value:t,key:"produces_value"}}}const fe=(e,t,r)=>({payload:{path:e,method:t,res:r},type:L}),he=(e,t,r)=>({payload:{path:e,method:t,req:r},type:q}),me=(e,t,r)=>({payload:{path:e,method:t,req:r},type:B}),ge=e=>({payload:e,type:D}),ye=e=>t=>{let{fn:r,specActions:l,specSelectors:s,getConfigs:o,oas3Selectors:i}=t,{pathName:u,method:c,operation:d}=e,{requestInterceptor:p,responseInterceptor:f}=o(),h=d.toJS();var g,y;d&&d.get("parameters")&&(0,v.default)(g=(0,m.default)(y=d.get("parameters")).call(y,(e=>e&&!0===e.get("allowEmptyValue")))).call(g,(t=>{if(s.parameterInclusionSettingFor([u,c],t.get("name"),t.get("in"))){e.parameters=e.parameters||{};const r=(0,N.cz)(t,e.parameters);(!r||r&&0===r.size)&&(e.parameters[t.get("name")]="")}}));if(e.contextUrl=(0,C.default)(s.url()).toString(),h&&h.operationId?e.operationId=h.operationId:h&&u&&c&&(e.operationId=r.opId(h,u,c)),s.isOAS3()){const t=`${u}:${c}`;e.server=i.selectedServer(t)||i.selectedServer();const r=i.serverVariables({server:e.server,namespace:t}).toJS(),l=i.serverVariables({server:e.server}).toJS();e.serverVariables=(0,E.default)(r).length?r:l,e.requestContentType=i.requestContentType(u,c),e.responseContentType=i.responseContentType(u,c)||"*/*";const s=i.requestBodyValue(u,c),o=i.requestBodyInclusionSetting(u,c);var _;if(s&&s.toJS)e.requestBody=(0,m.default)(_=(0,a.default)(s).call(s,(e=>w.Map.isMap(e)?e.get("value"):e))).call(_,((e,t)=>((0,n.default)(e)?0!==e.length:!(0,N.O2)(e))||o.get(t))).toJS();else e.requestBody=s}let A=(0,b.default)({},e);A=r.buildRequest(A),l.setRequest(e.pathName,e.method,A);e.requestInterceptor=async t=>{let r=await p.apply(void 0,[t]),n=(0,b.default)({},r);return l.setMutatedRequest(e.pathName,e.method,n),r},e.responseInterceptor=f;const I=(0,S.default)();return r.execute(e).then((t=>{t.duration=(0,S.default)()-I,l.setResponse(e.pathName,e.method,t)})).catch((t=>{"Failed to fetch"===t.message&&(t.name="",t.message='**Failed to fetch.**  \n**Possible Reasons:** \n  - CORS \n  - Network Failure \n  - URL scheme must be "http" or "https" for CORS request.'),l.setResponse(e.pathName,e.method,{error:!0,err:(0,x.serializeError)(t)})}))},ve=function(){let{path:e,method:t,...r}=arguments.length>0&&void 0!==arguments[0]?arguments[0]:{};return n=>{let{fn:{fetch:a},specSelectors:l,specActions:s}=n,o=l.specJsonWithResolvedSubtrees().toJS(),i=l.operationScheme(e,t),{requestContentType:u,responseContentType:c}=l.contentTypeValues([e,t]).toJS(),d=/xml/i.test(u),p=l.parameterValues([e,t],d).toJS();return s.executeRequest({...r,fetch:a,spec:o,pathName:e,method:t,parameters:p,requestContentType:u,scheme:i,responseContentType:c})}};function Ee(e,t){return{type:U,payload:{path:e,method:t}}}function be(e,t){return{type:V,payload:{path:e,method:t}}}function Se(e,t,r){return{type:W,payload:{scheme:e,path:t,method:r}}}},7038:(e,t,r)=>{r.r(t),r.d(t,{default:()=>o});var n=r(32),a=r(5179),l=r(3881),s=r(7508);function o(){return{statePlugins:{spec:{wrapActions:s,reducers:n.default,actions:a,selectors:l}}}}},32:(e,t,r)=>{r.r(t),r.d(t,{default:()=>d});var n=r(6785),a=r(2565),l=r(7512),s=r(9725),o=r(6298),i=r(7504),u=r(3881),c=r(5179);const d={[c.UPDATE_SPEC]:(e,t)=>"string"==typeof t.payload?e.set("spec",t.payload):e,[c.UPDATE_URL]:(e,t)=>e.set("url",t.payload+""),[c.UPDATE_JSON]:(e,t)=>e.set("json",(0,o.oG)(t.payload)),[c.UPDATE_RESOLVED]:(e,t)=>e.setIn(["resolved"],(0,o.oG)(t.payload)),[c.UPDATE_RESOLVED_SUBTREE]:(e,t)=>{const{value:r,path:n}=t.payload;return e.setIn(["resolvedSubtrees",...n],(0,o.oG)(r))},[c.UPDATE_PARAM]:(e,t)=>{let{payload:r}=t,{path:n,paramName:a,paramIn:l,param:s,value:i,isXml:u}=r,c=s?(0,o.V9)(s):`${l}.${a}`;const d=u?"value_xml":"value";return e.setIn(["meta","paths",...n,"parameters",c,d],i)},[c.UPDATE_EMPTY_PARAM_INCLUSION]:(e,t)=>{let{payload:r}=t,{pathMethod:n,paramName:a,paramIn:l,includeEmptyValue:s}=r;if(!a||!l)return console.warn("Warning: UPDATE_EMPTY_PARAM_INCLUSION could not generate a paramKey."),e;const o=`${l}.${a}`;return e.setIn(["meta","paths",...n,"parameter_inclusions",o],s)},[c.VALIDATE_PARAMS]:(e,t)=>{let{payload:{pathMethod:r,isOAS3:a}}=t;const l=(0,u.specJsonWithResolvedSubtrees)(e).getIn(["paths",...r]),i=(0,u.parameterValues)(e,r).toJS();return e.updateIn(["meta","paths",...r,"parameters"],(0,s.fromJS)({}),(t=>{var c;return(0,n.default)(c=l.get("parameters",(0,s.List)())).call(c,((t,n)=>{const l=(0,o.cz)(n,i),c=(0,u.parameterInclusionSettingFor)(e,r,n.get("name"),n.get("in")),d=(0,o.Ik)(n,l,{bypassRequiredCheck:c,isOAS3:a});return t.setIn([(0,o.V9)(n),"errors"],(0,s.fromJS)(d))}),t)}))},[c.CLEAR_VALIDATE_PARAMS]:(e,t)=>{let{payload:{pathMethod:r}}=t;return e.updateIn(["meta","paths",...r,"parameters"],(0,s.fromJS)([]),(e=>(0,a.default)(e).call(e,(e=>e.set("errors",(0,s.fromJS)([]))))))},[c.SET_RESPONSE]:(e,t)=>{let r,{payload:{res:n,path:a,method:s}}=t;r=n.error?(0,l.default)({error:!0,name:n.err.name,message:n.err.message,statusCode:n.err.statusCode},n.err.response):n,r.headers=r.headers||{};let u=e.setIn(["responses",a,s],(0,o.oG)(r));return i.Z.Blob&&n.data instanceof i.Z.Blob&&(u=u.setIn(["responses",a,s,"text"],n.data)),u},[c.SET_REQUEST]:(e,t)=>{let{payload:{req:r,path:n,method:a}}=t;return e.setIn(["requests",n,a],(0,o.oG)(r))},[c.SET_MUTATED_REQUEST]:(e,t)=>{let{payload:{req:r,path:n,method:a}}=t;return e.setIn(["mutatedRequests",n,a],(0,o.oG)(r))},[c.UPDATE_OPERATION_META_VALUE]:(e,t)=>{let{payload:{path:r,value:n,key:a}}=t,l=["paths",...r],o=["meta","paths",...r];return e.getIn(["json",...l])||e.getIn(["resolved",...l])||e.getIn(["resolvedSubtrees",...l])?e.setIn([...o,a],(0,s.fromJS)(n)):e},[c.CLEAR_RESPONSE]:(e,t)=>{let{payload:{path:r,method:n}}=t;return e.deleteIn(["responses",r,n])},[c.CLEAR_REQUEST]:(e,t)=>{let{payload:{path:r,method:n}}=t;return e.deleteIn(["requests",r,n])},[c.SET_SCHEME]:(e,t)=>{let{payload:{scheme:r,path:n,method:a}}=t;return n&&a?e.setIn(["scheme",n,a],r):n||a?void 0:e.setIn(["scheme","_defaultScheme"],r)}}},3881:(e,t,r)=>{r.r(t),r.d(t,{allowTryItOutFor:()=>te,basePath:()=>V,canExecuteScheme:()=>ge,consumes:()=>j,consumesOptionsFor:()=>he,contentTypeValues:()=>de,currentProducesFor:()=>pe,definitions:()=>U,externalDocs:()=>T,findDefinition:()=>D,getOAS3RequiredRequestBodyContentType:()=>Ee,getParameter:()=>se,hasHost:()=>oe,host:()=>z,info:()=>N,isMediaTypeSchemaPropertiesEqual:()=>be,isOAS3:()=>R,lastError:()=>v,mutatedRequestFor:()=>ee,mutatedRequests:()=>Y,operationScheme:()=>me,operationWithMeta:()=>le,operations:()=>P,operationsWithRootInherited:()=>$,operationsWithTags:()=>H,parameterInclusionSettingFor:()=>ne,parameterValues:()=>ie,parameterWithMeta:()=>ae,parameterWithMetaByIdentity:()=>re,parametersIncludeIn:()=>ue,parametersIncludeType:()=>ce,paths:()=>M,produces:()=>L,producesOptionsFor:()=>fe,requestFor:()=>Q,requests:()=>Z,responseFor:()=>X,responses:()=>G,schemes:()=>F,security:()=>q,securityDefinitions:()=>B,semver:()=>k,spec:()=>I,specJson:()=>_,specJsonWithResolvedSubtrees:()=>A,specResolved:()=>w,specResolvedSubtree:()=>C,specSource:()=>S,specStr:()=>b,tagDetails:()=>W,taggedOperations:()=>K,tags:()=>J,url:()=>E,validateBeforeExecute:()=>ve,validationErrors:()=>ye,version:()=>O});var n=r(8136),a=r(29),l=r(8818),s=r(2565),o=r(6145),i=r(1778),u=r(6785),c=r(4350),d=r(9963),p=r(4163),f=r(8639),h=r(6298),m=r(9725);const g=["get","put","post","delete","options","head","patch","trace"],y=e=>e||(0,m.Map)(),v=(0,f.createSelector)(y,(e=>e.get("lastError"))),E=(0,f.createSelector)(y,(e=>e.get("url"))),b=(0,f.createSelector)(y,(e=>e.get("spec")||"")),S=(0,f.createSelector)(y,(e=>e.get("specSource")||"not-editor")),_=(0,f.createSelector)(y,(e=>e.get("json",(0,m.Map)()))),w=(0,f.createSelector)(y,(e=>e.get("resolved",(0,m.Map)()))),C=(e,t)=>e.getIn(["resolvedSubtrees",...t],void 0),x=(e,t)=>m.Map.isMap(e)&&m.Map.isMap(t)?t.get("$$ref")?t:(0,m.OrderedMap)().mergeWith(x,e,t):t,A=(0,f.createSelector)(y,(e=>(0,m.OrderedMap)().mergeWith(x,e.get("json"),e.get("resolvedSubtrees")))),I=e=>_(e),R=(0,f.createSelector)(I,(()=>!1)),N=(0,f.createSelector)(I,(e=>Se(e&&e.get("info")))),T=(0,f.createSelector)(I,(e=>Se(e&&e.get("externalDocs")))),O=(0,f.createSelector)(N,(e=>e&&e.get("version"))),k=(0,f.createSelector)(O,(e=>{var t;return(0,n.default)(t=/v?([0-9]*)\.([0-9]*)\.([0-9]*)/i.exec(e)).call(t,1)})),M=(0,f.createSelector)(A,(e=>e.get("paths"))),P=(0,f.createSelector)(M,(e=>{if(!e||e.size<1)return(0,m.List)();let t=(0,m.List)();return e&&(0,a.default)(e)?((0,a.default)(e).call(e,((e,r)=>{if(!e||!(0,a.default)(e))return{};(0,a.default)(e).call(e,((e,n)=>{(0,l.default)(g).call(g,n)<0||(t=t.push((0,m.fromJS)({path:r,method:n,operation:e,id:`${n}-${r}`})))}))})),t):(0,m.List)()})),j=(0,f.createSelector)(I,(e=>(0,m.Set)(e.get("consumes")))),L=(0,f.createSelector)(I,(e=>(0,m.Set)(e.get("produces")))),q=(0,f.createSelector)(I,(e=>e.get("security",(0,m.List)()))),B=(0,f.createSelector)(I,(e=>e.get("securityDefinitions"))),D=(e,t)=>{const r=e.getIn(["resolvedSubtrees","definitions",t],null),n=e.getIn(["json","definitions",t],null);return r||n||null},U=(0,f.createSelector)(I,(e=>{const t=e.get("definitions");return m.Map.isMap(t)?t:(0,m.Map)()})),V=(0,f.createSelector)(I,(e=>e.get("basePath"))),z=(0,f.createSelector)(I,(e=>e.get("host"))),F=(0,f.createSelector)(I,(e=>e.get("schemes",(0,m.Map)()))),$=(0,f.createSelector)(P,j,L,((e,t,r)=>(0,s.default)(e).call(e,(e=>e.update("operation",(e=>{if(e){if(!m.Map.isMap(e))return;return e.withMutations((e=>(e.get("consumes")||e.update("consumes",(e=>(0,m.Set)(e).merge(t))),e.get("produces")||e.update("produces",(e=>(0,m.Set)(e).merge(r))),e)))}return(0,m.Map)()})))))),J=(0,f.createSelector)(I,(e=>{const t=e.get("tags",(0,m.List)());return m.List.isList(t)?(0,o.default)(t).call(t,(e=>m.Map.isMap(e))):(0,m.List)()})),W=(e,t)=>{var r;let n=J(e)||(0,m.List)();return(0,i.default)(r=(0,o.default)(n).call(n,m.Map.isMap)).call(r,(e=>e.get("name")===t),(0,m.Map)())},H=(0,f.createSelector)($,J,((e,t)=>(0,u.default)(e).call(e,((e,t)=>{let r=(0,m.Set)(t.getIn(["operation","tags"]));return r.count()<1?e.update("default",(0,m.List)(),(e=>e.push(t))):(0,u.default)(r).call(r,((e,r)=>e.update(r,(0,m.List)(),(e=>e.push(t)))),e)}),(0,u.default)(t).call(t,((e,t)=>e.set(t.get("name"),(0,m.List)())),(0,m.OrderedMap)())))),K=e=>t=>{var r;let{getConfigs:n}=t,{tagsSorter:a,operationsSorter:l}=n();return(0,s.default)(r=H(e).sortBy(((e,t)=>t),((e,t)=>{let r="function"==typeof a?a:h.wh.tagsSorter[a];return r?r(e,t):null}))).call(r,((t,r)=>{let n="function"==typeof l?l:h.wh.operationsSorter[l],a=n?(0,c.default)(t).call(t,n):t;return(0,m.Map)({tagDetails:W(e,r),operations:a})}))},G=(0,f.createSelector)(y,(e=>e.get("responses",(0,m.Map)()))),Z=(0,f.createSelector)(y,(e=>e.get("requests",(0,m.Map)()))),Y=(0,f.createSelector)(y,(e=>e.get("mutatedRequests",(0,m.Map)()))),X=(e,t,r)=>G(e).getIn([t,r],null),Q=(e,t,r)=>Z(e).getIn([t,r],null),ee=(e,t,r)=>Y(e).getIn([t,r],null),te=()=>!0,re=(e,t,r)=>{const n=A(e).getIn(["paths",...t,"parameters"],(0,m.OrderedMap)()),a=e.getIn(["meta","paths",...t,"parameters"],(0,m.OrderedMap)()),l=(0,s.default)(n).call(n,(e=>{const t=a.get(`${r.get("in")}.${r.get("name")}`),n=a.get(`${r.get("in")}.${r.get("name")}.hash-${r.hashCode()}`);return(0,m.OrderedMap)().merge(e,t,n)}));return(0,i.default)(l).call(l,(e=>e.get("in")===r.get("in")&&e.get("name")===r.get("name")),(0,m.OrderedMap)())},ne=(e,t,r,n)=>{const a=`${n}.${r}`;return e.getIn(["meta","paths",...t,"parameter_inclusions",a],!1)},ae=(e,t,r,n)=>{const a=A(e).getIn(["paths",...t,"parameters"],(0,m.OrderedMap)()),l=(0,i.default)(a).call(a,(e=>e.get("in")===n&&e.get("name")===r),(0,m.OrderedMap)());return re(e,t,l)},le=(e,t,r)=>{var n;const a=A(e).getIn(["paths",t,r],(0,m.OrderedMap)()),l=e.getIn(["meta","paths",t,r],(0,m.OrderedMap)()),o=(0,s.default)(n=a.get("parameters",(0,m.List)())).call(n,(n=>re(e,[t,r],n)));return(0,m.OrderedMap)().merge(a,l).set("parameters",o)};function se(e,t,r,n){t=t||[];let a=e.getIn(["meta","paths",...t,"parameters"],(0,m.fromJS)([]));return(0,i.default)(a).call(a,(e=>m.Map.isMap(e)&&e.get("name")===r&&e.get("in")===n))||(0,m.Map)()}const oe=(0,f.createSelector)(I,(e=>{const t=e.get("host");return"string"==typeof t&&t.length>0&&"/"!==t[0]}));function ie(e,t,r){t=t||[];let n=le(e,...t).get("parameters",(0,m.List)());return(0,u.default)(n).call(n,((e,t)=>{let n=r&&"body"===t.get("in")?t.get("value_xml"):t.get("value");return e.set((0,h.V9)(t,{allowHashes:!1}),n)}),(0,m.fromJS)({}))}function ue(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:"";if(m.List.isList(e))return(0,d.default)(e).call(e,(e=>m.Map.isMap(e)&&e.get("in")===t))}function ce(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:"";if(m.List.isList(e))return(0,d.default)(e).call(e,(e=>m.Map.isMap(e)&&e.get("type")===t))}function de(e,t){t=t||[];let r=A(e).getIn(["paths",...t],(0,m.fromJS)({})),n=e.getIn(["meta","paths",...t],(0,m.fromJS)({})),a=pe(e,t);const l=r.get("parameters")||new m.List,s=n.get("consumes_value")?n.get("consumes_value"):ce(l,"file")?"multipart/form-data":ce(l,"formData")?"application/x-www-form-urlencoded":void 0;return(0,m.fromJS)({requestContentType:s,responseContentType:a})}function pe(e,t){t=t||[];const r=A(e).getIn(["paths",...t],null);if(null===r)return;const n=e.getIn(["meta","paths",...t,"produces_value"],null),a=r.getIn(["produces",0],null);return n||a||"application/json"}function fe(e,t){t=t||[];const r=A(e),n=r.getIn(["paths",...t],null);if(null===n)return;const[a]=t,l=n.get("produces",null),s=r.getIn(["paths",a,"produces"],null),o=r.getIn(["produces"],null);return l||s||o}function he(e,t){t=t||[];const r=A(e),n=r.getIn(["paths",...t],null);if(null===n)return;const[a]=t,l=n.get("consumes",null),s=r.getIn(["paths",a,"consumes"],null),o=r.getIn(["consumes"],null);return l||s||o}const me=(e,t,r)=>{let n=e.get("url").match(/^([a-z][a-z0-9+\-.]*):/),a=(0,p.default)(n)?n[1]:null;return e.getIn(["scheme",t,r])||e.getIn(["scheme","_defaultScheme"])||a||""},ge=(e,t,r)=>{var n;return(0,l.default)(n=["http","https"]).call(n,me(e,t,r))>-1},ye=(e,t)=>{t=t||[];let r=e.getIn(["meta","paths",...t,"parameters"],(0,m.fromJS)([]));const n=[];return(0,a.default)(r).call(r,(e=>{let t=e.get("errors");t&&t.count()&&(0,a.default)(t).call(t,(e=>n.push(e)))})),n},ve=(e,t)=>0===ye(e,t).length,Ee=(e,t)=>{var r;let n={requestBody:!1,requestContentType:{}},l=e.getIn(["resolvedSubtrees","paths",...t,"requestBody"],(0,m.fromJS)([]));return l.size<1||(l.getIn(["required"])&&(n.requestBody=l.getIn(["required"])),(0,a.default)(r=l.getIn(["content"]).entrySeq()).call(r,(e=>{const t=e[0];if(e[1].getIn(["schema","required"])){const r=e[1].getIn(["schema","required"]).toJS();n.requestContentType[t]=r}}))),n},be=(e,t,r,n)=>{if((r||n)&&r===n)return!0;let a=e.getIn(["resolvedSubtrees","paths",...t,"requestBody","content"],(0,m.fromJS)([]));if(a.size<2||!r||!n)return!1;let l=a.getIn([r,"schema","properties"],(0,m.fromJS)([])),s=a.getIn([n,"schema","properties"],(0,m.fromJS)([]));return!!l.equals(s)};function Se(e){return m.Map.isMap(e)?e:new m.Map}},7508:(e,t,r)=>{r.r(t),r.d(t,{executeRequest:()=>i,updateJsonSpec:()=>o,updateSpec:()=>s,validateParams:()=>u});var n=r(2740),a=r(29),l=r(9908);const s=(e,t)=>{let{specActions:r}=t;return function(){e(...arguments),r.parseToJson(...arguments)}},o=(e,t)=>{let{specActions:r}=t;return function(){for(var t=arguments.length,s=new Array(t),o=0;o<t;o++)s[o]=arguments[o];e(...s),r.invalidateResolvedSubtreeCache();const[i]=s,u=(0,l.default)(i,["paths"])||{},c=(0,n.default)(u);(0,a.default)(c).call(c,(e=>{(0,l.default)(u,[e]).$ref&&r.requestResolvedSubtree(["paths",e])})),r.requestResolvedSubtree(["components","securitySchemes"])}},i=(e,t)=>{let{specActions:r}=t;return t=>(r.logRequest(t),e(t))},u=(e,t)=>{let{specSelectors:r}=t;return t=>e(t,r.isOAS3())}},4852:(e,t,r)=>{r.r(t),r.d(t,{loaded:()=>n});const n=(e,t)=>function(){e(...arguments);const r=t.getConfigs().withCredentials;void 0!==r&&(t.fn.fetch.withCredentials="string"==typeof r?"true"===r:!!r)}},2990:(e,t,r)=>{r.r(t),r.d(t,{default:()=>u});const n=(e=>{var t={};return r.d(t,e),t})({default:()=>m.default});const a=(e=>{var t={};return r.d(t,e),t})({buildRequest:()=>g.buildRequest,execute:()=>g.execute});const l=(e=>{var t={};return r.d(t,e),t})({default:()=>y.default,makeHttp:()=>y.makeHttp,serializeRes:()=>y.serializeRes});const s=(e=>{var t={};return r.d(t,e),t})({default:()=>v.default});var o=r(5013),i=r(4852);function u(e){let{configs:t,getConfigs:r}=e;return{fn:{fetch:(0,l.makeHttp)(l.default,t.preFetch,t.postFetch),buildRequest:a.buildRequest,execute:a.execute,resolve:n.default,resolveSubtree:function(e,t,n){if(void 0===n){const e=r();n={modelPropertyMacro:e.modelPropertyMacro,parameterMacro:e.parameterMacro,requestInterceptor:e.requestInterceptor,responseInterceptor:e.responseInterceptor}}for(var a=arguments.length,l=new Array(a>3?a-3:0),o=3;o<a;o++)l[o-3]=arguments[o];return(0,s.default)(e,t,n,...l)},serializeRes:l.serializeRes,opId:o.opId},statePlugins:{configs:{wrapActions:{loaded:i.loaded}}}}}},8525:(e,t,r)=>{r.r(t),r.d(t,{default:()=>a});var n=r(6298);function a(){return{fn:{shallowEqualKeys:n.be}}}},8347:(e,t,r)=>{r.r(t),r.d(t,{getDisplayName:()=>n});const n=e=>e.displayName||e.name||"Component"},3420:(e,t,r)=>{r.r(t),r.d(t,{default:()=>i});var n=r(313),a=r(6298),l=r(5005),s=r(8347),o=r(9669);const i=e=>{let{getComponents:t,getStore:r,getSystem:i}=e;const u=(c=(0,l.getComponent)(i,r,t),(0,a.HP)(c,(function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return(0,n.default)(t)})));var c;const d=(e=>(0,o.Z)(e,(function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return t})))((0,l.withMappedContainer)(i,r,u));return{rootInjects:{getComponent:u,makeMappedContainer:d,render:(0,l.render)(i,r,l.getComponent,t)},fn:{getDisplayName:s.getDisplayName}}}},5005:(e,t,r)=>{r.r(t),r.d(t,{getComponent:()=>y,render:()=>g,withMappedContainer:()=>m});var n=r(863),a=r(2740),l=r(810);const s=(e=>{var t={};return r.d(t,e),t})({default:()=>E.default});var o=r(9871);const i=(e=>{var t={};return r.d(t,e),t})({Provider:()=>b.Provider,connect:()=>b.connect});const u=(e=>{var t={};return r.d(t,e),t})({default:()=>S.default});const c=(e=>{var t={};return r.d(t,e),t})({default:()=>_.default}),d=e=>t=>{const{fn:r}=e();class a extends l.Component{render(){return l.default.createElement(t,(0,n.default)({},e(),this.props,this.context))}}return a.displayName=`WithSystem(${r.getDisplayName(t)})`,a},p=(e,t)=>r=>{const{fn:a}=e();class s extends l.Component{render(){return l.default.createElement(i.Provider,{store:t},l.default.createElement(r,(0,n.default)({},this.props,this.context)))}}return s.displayName=`WithRoot(${a.getDisplayName(r)})`,s},f=(e,t,r)=>(0,o.compose)(r?p(e,r):c.default,(0,i.connect)(((r,n)=>{var a;const l={...n,...e()},s=(null===(a=t.prototype)||void 0===a?void 0:a.mapStateToProps)||(e=>({state:e}));return s(r,l)})),d(e))(t),h=(e,t,r,n)=>{for(const a in t){const l=t[a];"function"==typeof l&&l(r[a],n[a],e())}},m=(e,t,r)=>(t,n)=>{const{fn:s}=e(),o=r(t,"root");class i extends l.Component{constructor(t,r){super(t,r),h(e,n,t,{})}UNSAFE_componentWillReceiveProps(t){h(e,n,t,this.props)}render(){const e=(0,u.default)(this.props,n?(0,a.default)(n):[]);return l.default.createElement(o,e)}}return i.displayName=`WithMappedContainer(${s.getDisplayName(o)})`,i},g=(e,t,r,n)=>a=>{const o=r(e,t,n)("App","root");s.default.render(l.default.createElement(o,null),a)},y=(e,t,r)=>function(n,a){let l=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{};if("string"!=typeof n)throw new TypeError("Need a string, to fetch a component. Was given a "+typeof n);const s=r(n);return s?a?"root"===a?f(e,s,t()):f(e,s):s:(l.failSilently||e().log.warn("Could not find component:",n),null)}},471:(e,t,r)=>{r.d(t,{d3:()=>l.default,C2:()=>S});var n=r(2740),a=r(2372);const l=(e=>{var t={};return r.d(t,e),t})({default:()=>w.default});const s=(e=>{var t={};return r.d(t,e),t})({default:()=>C.default});const o=(e=>{var t={};return r.d(t,e),t})({default:()=>x.default});const i=(e=>{var t={};return r.d(t,e),t})({default:()=>A.default});const u=(e=>{var t={};return r.d(t,e),t})({default:()=>I.default});const c=(e=>{var t={};return r.d(t,e),t})({default:()=>R.default});const d=(e=>{var t={};return r.d(t,e),t})({default:()=>N.default});const p=(e=>{var t={};return r.d(t,e),t})({default:()=>T.default});const f=(e=>{var t={};return r.d(t,e),t})({default:()=>O.default});const h=(e=>{var t={};return r.d(t,e),t})({default:()=>k.default});const m=(e=>{var t={};return r.d(t,e),t})({default:()=>M.default});const g=(e=>{var t={};return r.d(t,e),t})({default:()=>P.default});const y=(e=>{var t={};return r.d(t,e),t})({default:()=>j.default});const v=(e=>{var t={};return r.d(t,e),t})({default:()=>L.default});l.default.registerLanguage("json",o.default),l.default.registerLanguage("js",s.default),l.default.registerLanguage("xml",i.default),l.default.registerLanguage("yaml",c.default),l.default.registerLanguage("http",d.default),l.default.registerLanguage("bash",u.default),l.default.registerLanguage("powershell",p.default),l.default.registerLanguage("javascript",s.default);const E={agate:f.default,arta:h.default,monokai:m.default,nord:g.default,obsidian:y.default,"tomorrow-night":v.default},b=(0,n.default)(E),S=e=>(0,a.default)(b).call(b,e)?E[e]:(console.warn(`Request style '${e}' is not available, returning default instead`),f.default)},6298:(e,t,r)=>{r.d(t,{r3:()=>ke,GZ:()=>Pe,Xb:()=>Ge,oJ:()=>De,XV:()=>Fe,iQ:()=>ae,J6:()=>Ue,DR:()=>se,oG:()=>K,Uj:()=>Ke,QG:()=>Be,po:()=>ze,nX:()=>Ve,gp:()=>le,xi:()=>Te,kJ:()=>Q,O2:()=>Ye,LQ:()=>Z,Wl:()=>X,Kn:()=>Y,HP:()=>ee,AF:()=>G,D$:()=>Je,Ay:()=>te,Q2:()=>re,mz:()=>H,V9:()=>We,cz:()=>He,UG:()=>Oe,Zl:()=>oe,hW:()=>qe,Nm:()=>Le,be:()=>je,wh:()=>Me,Pz:()=>$e,_5:()=>ne,Ik:()=>Ce});var n=r(4163),a=r(2565),l=r(2954),s=r(29),o=r(6145),i=r(2740),u=(r(5527),r(6785)),c=r(7512),d=r(4350),p=r(8136),f=(r(5171),r(9963)),h=(r(2372),r(313)),m=r(8818),g=r(1778),y=r(3590),v=r(5942),E=r(9725);const b=(e=>{var t={};return r.d(t,e),t})({sanitizeUrl:()=>q.sanitizeUrl});const S=(e=>{var t={};return r.d(t,e),t})({default:()=>B.default});const _=(e=>{var t={};return r.d(t,e),t})({default:()=>D.default});var w=r(5476);const C=(e=>{var t={};return r.d(t,e),t})({default:()=>U.default});const x=(e=>{var t={};return r.d(t,e),t})({default:()=>V.default});const A=(e=>{var t={};return r.d(t,e),t})({default:()=>z.default});var I=r(7068),R=r(2473),N=r(7504);const T=(e=>{var t={};return r.d(t,e),t})({default:()=>F.default});var O=r(9069),k=r(1798),M=r.n(k),P=r(9072),j=r.n(P),L=r(626),$=r(8764).Buffer;const J="default",W=e=>E.default.Iterable.isIterable(e);function H(e){return Y(e)?W(e)?e.toJS():e:{}}function K(e){var t,r;if(W(e))return e;if(e instanceof N.Z.File)return e;if(!Y(e))return e;if((0,n.default)(e))return(0,a.default)(r=E.default.Seq(e)).call(r,K).toList();if((0,I.default)((0,l.default)(e))){var s;const t=function(e){if(!(0,I.default)((0,l.default)(e)))return e;const t={},r="_**[]",n={};for(let a of(0,l.default)(e).call(e))if(t[a[0]]||n[a[0]]&&n[a[0]].containsMultiple){if(!n[a[0]]){n[a[0]]={containsMultiple:!0,length:1},t[`${a[0]}${r}${n[a[0]].length}`]=t[a[0]],delete t[a[0]]}n[a[0]].length+=1,t[`${a[0]}${r}${n[a[0]].length}`]=a[1]}else t[a[0]]=a[1];return t}(e);return(0,a.default)(s=E.default.OrderedMap(t)).call(s,K)}return(0,a.default)(t=E.default.OrderedMap(e)).call(t,K)}function G(e){return(0,n.default)(e)?e:[e]}function Z(e){return"function"==typeof e}function Y(e){return!!e&&"object"==typeof e}function X(e){return"function"==typeof e}function Q(e){return(0,n.default)(e)}const ee=w.default;function te(e,t){var r;return(0,u.default)(r=(0,i.default)(e)).call(r,((r,n)=>(r[n]=t(e[n],n),r)),{})}function re(e,t){var r;return(0,u.default)(r=(0,i.default)(e)).call(r,((r,n)=>{let a=t(e[n],n);return a&&"object"==typeof a&&(0,c.default)(r,a),r}),{})}function ne(e){return t=>{let{dispatch:r,getState:n}=t;return t=>r=>"function"==typeof r?r(e()):t(r)}}function ae(e){var t;let r=e.keySeq();return r.contains(J)?J:(0,d.default)(t=(0,o.default)(r).call(r,(e=>"2"===(e+"")[0]))).call(t).first()}function le(e,t){if(!E.default.Iterable.isIterable(e))return E.default.List();let r=e.getIn((0,n.default)(t)?t:[t]);return E.default.List.isList(r)?r:E.default.List()}function se(e){let t,r=[/filename\*=[^']+'\w*'"([^"]+)";?/i,/filename\*=[^']+'\w*'([^;]+);?/i,/filename="([^;]*);?"/i,/filename=([^;]*);?/i];if((0,f.default)(r).call(r,(r=>(t=r.exec(e),null!==t))),null!==t&&t.length>1)try{return decodeURIComponent(t[1])}catch(e){console.error(e)}return null}function oe(e){return t=e.replace(/\.[^./]*$/,""),(0,_.default)((0,S.default)(t));var t}const ie=(e,t)=>{if(e>t)return`Value must be less than ${t}`},ue=(e,t)=>{if(e<t)return`Value must be greater than ${t}`},ce=e=>{if(!/^-?\d+(\.?\d+)?$/.test(e))return"Value must be a number"},de=e=>{if(!/^-?\d+$/.test(e))return"Value must be an integer"},pe=e=>{if(e&&!(e instanceof N.Z.File))return"Value must be a file"},fe=e=>{if("true"!==e&&"false"!==e&&!0!==e&&!1!==e)return"Value must be a boolean"},he=e=>{if(e&&"string"!=typeof e)return"Value must be a string"},me=e=>{if(isNaN(Date.parse(e)))return"Value must be a DateTime"},ge=e=>{if(e=e.toString().toLowerCase(),!/^[{(]?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}[)}]?$/.test(e))return"Value must be a Guid"},ye=(e,t)=>{if(e.length>t)return`Value must be no longer than ${t} character${1!==t?"s":""}`},ve=(e,t)=>{if(e&&("true"===t||!0===t)){const t=(0,E.fromJS)(e),r=t.toSet();if(e.length>r.size){let e=(0,E.Set)();if((0,s.default)(t).call(t,((r,n)=>{(0,o.default)(t).call(t,(e=>X(e.equals)?e.equals(r):e===r)).size>1&&(e=e.add(n))})),0!==e.size)return(0,a.default)(e).call(e,(e=>({index:e,error:"No duplicates allowed."}))).toArray()}}},Ee=(e,t)=>{if(!e&&t>=1||e&&e.length<t)return`Array must contain at least ${t} item${1===t?"":"s"}`},be=(e,t)=>{if(e&&e.length>t)return`Array must not contain more then ${t} item${1===t?"":"s"}`},Se=(e,t)=>{if(e.length<t)return`Value must be at least ${t} character${1!==t?"s":""}`},_e=(e,t)=>{if(!new RegExp(t).test(e))return"Value must follow pattern "+t};function we(e,t,r,l,o){if(!t)return[];let i=[],u=t.get("nullable"),c=t.get("required"),d=t.get("maximum"),p=t.get("minimum"),h=t.get("type"),m=t.get("format"),g=t.get("maxLength"),y=t.get("minLength"),v=t.get("uniqueItems"),b=t.get("maxItems"),S=t.get("minItems"),_=t.get("pattern");const w=r||!0===c,C=null!=e;if(u&&null===e||!h||!(w||C&&"array"===h||!(!w&&!C)))return[];let x="string"===h&&e,A="array"===h&&(0,n.default)(e)&&e.length,I="array"===h&&E.default.List.isList(e)&&e.count();const R=[x,A,I,"array"===h&&"string"==typeof e&&e,"file"===h&&e instanceof N.Z.File,"boolean"===h&&(e||!1===e),"number"===h&&(e||0===e),"integer"===h&&(e||0===e),"object"===h&&"object"==typeof e&&null!==e,"object"===h&&"string"==typeof e&&e],T=(0,f.default)(R).call(R,(e=>!!e));if(w&&!T&&!l)return i.push("Required field is not provided"),i;if("object"===h&&(null===o||"application/json"===o)){let r=e;if("string"==typeof e)try{r=JSON.parse(e)}catch(e){return i.push("Parameter string value must be valid JSON"),i}var O;if(t&&t.has("required")&&X(c.isList)&&c.isList()&&(0,s.default)(c).call(c,(e=>{void 0===r[e]&&i.push({propKey:e,error:"Required property not found"})})),t&&t.has("properties"))(0,s.default)(O=t.get("properties")).call(O,((e,t)=>{const n=we(r[t],e,!1,l,o);i.push(...(0,a.default)(n).call(n,(e=>({propKey:t,error:e}))))}))}if(_){let t=_e(e,_);t&&i.push(t)}if(S&&"array"===h){let t=Ee(e,S);t&&i.push(t)}if(b&&"array"===h){let t=be(e,b);t&&i.push({needRemove:!0,error:t})}if(v&&"array"===h){let t=ve(e,v);t&&i.push(...t)}if(g||0===g){let t=ye(e,g);t&&i.push(t)}if(y){let t=Se(e,y);t&&i.push(t)}if(d||0===d){let t=ie(e,d);t&&i.push(t)}if(p||0===p){let t=ue(e,p);t&&i.push(t)}if("string"===h){let t;if(t="date-time"===m?me(e):"uuid"===m?ge(e):he(e),!t)return i;i.push(t)}else if("boolean"===h){let t=fe(e);if(!t)return i;i.push(t)}else if("number"===h){let t=ce(e);if(!t)return i;i.push(t)}else if("integer"===h){let t=de(e);if(!t)return i;i.push(t)}else if("array"===h){if(!A&&!I)return i;e&&(0,s.default)(e).call(e,((e,r)=>{const n=we(e,t.get("items"),!1,l,o);i.push(...(0,a.default)(n).call(n,(e=>({index:r,error:e}))))}))}else if("file"===h){let t=pe(e);if(!t)return i;i.push(t)}return i}const Ce=function(e,t){let{isOAS3:r=!1,bypassRequiredCheck:n=!1}=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{},a=e.get("required"),{schema:l,parameterContentMediaType:s}=(0,O.Z)(e,{isOAS3:r});return we(t,l,a,n,s)},xe=(e,t,r)=>{if(e&&!e.xml&&(e.xml={}),e&&!e.xml.name){if(!e.$$ref&&(e.type||e.items||e.properties||e.additionalProperties))return'<?xml version="1.0" encoding="UTF-8"?>\n\x3c!-- XML example cannot be generated; root element name is undefined --\x3e';if(e.$$ref){let t=e.$$ref.match(/\S*\/(\S+)$/);e.xml.name=t[1]}}return(0,R.memoizedCreateXMLExample)(e,t,r)},Ae=[{when:/json/,shouldStringifyTypes:["string"]}],Ie=["object"],Re=(e,t,r,n)=>{const a=(0,R.memoizedSampleFromSchema)(e,t,n),l=typeof a,s=(0,u.default)(Ae).call(Ae,((e,t)=>t.when.test(r)?[...e,...t.shouldStringifyTypes]:e),Ie);return(0,x.default)(s,(e=>e===l))?(0,h.default)(a,null,2):a},Ne=(e,t,r,n)=>{const a=Re(e,t,r,n);let l;try{l=L.default.dump(L.default.load(a),{lineWidth:-1},{schema:L.JSON_SCHEMA}),"\n"===l[l.length-1]&&(l=(0,p.default)(l).call(l,0,l.length-1))}catch(e){return console.error(e),"error: could not generate yaml example"}return l.replace(/\t/g,"  ")},Te=function(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:"",r=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{},n=arguments.length>3&&void 0!==arguments[3]?arguments[3]:void 0;return e&&X(e.toJS)&&(e=e.toJS()),n&&X(n.toJS)&&(n=n.toJS()),/xml/.test(t)?xe(e,r,n):/(yaml|yml)/.test(t)?Ne(e,r,t,n):Re(e,r,t,n)},Oe=()=>{let e={},t=N.Z.location.search;if(!t)return{};if(""!=t){let r=t.substr(1).split("&");for(let t in r)Object.prototype.hasOwnProperty.call(r,t)&&(t=r[t].split("="),e[decodeURIComponent(t[0])]=t[1]&&decodeURIComponent(t[1])||"")}return e},ke=e=>{let t;return t=e instanceof $?e:$.from(e.toString(),"utf-8"),t.toString("base64")},Me={operationsSorter:{alpha:(e,t)=>e.get("path").localeCompare(t.get("path")),method:(e,t)=>e.get("method").localeCompare(t.get("method"))},tagsSorter:{alpha:(e,t)=>e.localeCompare(t)}},Pe=e=>{let t=[];for(let r in e){let n=e[r];void 0!==n&&""!==n&&t.push([r,"=",encodeURIComponent(n).replace(/%20/g,"+")].join(""))}return t.join("&")},je=(e,t,r)=>!!(0,C.default)(r,(r=>(0,A.default)(e[r],t[r])));function Le(e){return"string"!=typeof e||""===e?"":(0,b.sanitizeUrl)(e)}function qe(e){return!(!e||(0,m.default)(e).call(e,"localhost")>=0||(0,m.default)(e).call(e,"127.0.0.1")>=0||"none"===e)}function Be(e){if(!E.default.OrderedMap.isOrderedMap(e))return null;if(!e.size)return null;const t=(0,g.default)(e).call(e,((e,t)=>(0,y.default)(t).call(t,"2")&&(0,i.default)(e.get("content")||{}).length>0)),r=e.get("default")||E.default.OrderedMap(),n=(r.get("content")||E.default.OrderedMap()).keySeq().toJS().length?r:null;return t||n}const De=e=>"string"==typeof e||e instanceof String?(0,v.default)(e).call(e).replace(/\s/g,"%20"):"",Ue=e=>(0,T.default)(De(e).replace(/%20/g,"_")),Ve=e=>(0,o.default)(e).call(e,((e,t)=>/^x-/.test(t))),ze=e=>(0,o.default)(e).call(e,((e,t)=>/^pattern|maxLength|minLength|maximum|minimum/.test(t)));function Fe(e,t){var r;let a=arguments.length>2&&void 0!==arguments[2]?arguments[2]:()=>!0;if("object"!=typeof e||(0,n.default)(e)||null===e||!t)return e;const l=(0,c.default)({},e);return(0,s.default)(r=(0,i.default)(l)).call(r,(e=>{e===t&&a(l[e],e)?delete l[e]:l[e]=Fe(l[e],t,a)})),l}function $e(e){if("string"==typeof e)return e;if(e&&e.toJS&&(e=e.toJS()),"object"==typeof e&&null!==e)try{return(0,h.default)(e,null,2)}catch(t){return String(e)}return null==e?"":e.toString()}function Je(e){return"number"==typeof e?e.toString():e}function We(e){let{returnAll:t=!1,allowHashes:r=!0}=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};if(!E.default.Map.isMap(e))throw new Error("paramToIdentifier: received a non-Im.Map parameter as input");const n=e.get("name"),a=e.get("in");let l=[];return e&&e.hashCode&&a&&n&&r&&l.push(`${a}.${n}.hash-${e.hashCode()}`),a&&n&&l.push(`${a}.${n}`),l.push(n),t?l:l[0]||""}function He(e,t){var r;const n=We(e,{returnAll:!0});return(0,o.default)(r=(0,a.default)(n).call(n,(e=>t[e]))).call(r,(e=>void 0!==e))[0]}function Ke(){return Ze(M()(32).toString("base64"))}function Ge(e){return Ze(j()("sha256").update(e).digest("base64"))}function Ze(e){return e.replace(/\+/g,"-").replace(/\//g,"_").replace(/=/g,"")}const Ye=e=>!e||!(!W(e)||!e.isEmpty())},2518:(e,t,r)=>{function n(e){return function(e){try{return!!JSON.parse(e)}catch(e){return null}}(e)?"json":null}r.d(t,{O:()=>n})},7504:(e,t,r)=>{r.d(t,{Z:()=>n});const n=function(){var e={location:{},history:{},open:()=>{},close:()=>{},File:function(){}};if("undefined"==typeof window)return e;try{e=window;for(var t of["File","Blob","FormData"])t in window&&(e[t]=window[t])}catch(e){console.error(e)}return e}()},9069:(e,t,r)=>{r.d(t,{Z:()=>o});var n=r(6145),a=r(2372),l=r(9725);const s=l.default.Set.of("type","format","items","default","maximum","exclusiveMaximum","minimum","exclusiveMinimum","maxLength","minLength","pattern","maxItems","minItems","uniqueItems","enum","multipleOf");function o(e){let{isOAS3:t}=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};if(!l.default.Map.isMap(e))return{schema:l.default.Map(),parameterContentMediaType:null};if(!t)return"body"===e.get("in")?{schema:e.get("schema",l.default.Map()),parameterContentMediaType:null}:{schema:(0,n.default)(e).call(e,((e,t)=>(0,a.default)(s).call(s,t))),parameterContentMediaType:null};if(e.get("content")){const t=e.get("content",l.default.Map({})).keySeq().first();return{schema:e.getIn(["content",t,"schema"],l.default.Map()),parameterContentMediaType:t}}return{schema:e.get("schema")?e.get("schema",l.default.Map()):l.default.Map(),parameterContentMediaType:null}}},9669:(e,t,r)=>{r.d(t,{Z:()=>h});var n=r(4163),a=r(7930),l=r(8898),s=r(5487),o=r(1778);const i=(e=>{var t={};return r.d(t,e),t})({default:()=>$.default});var u=r(6914),c=r(5476);const d=e=>t=>(0,n.default)(e)&&(0,n.default)(t)&&e.length===t.length&&(0,a.default)(e).call(e,((e,r)=>e===t[r])),p=function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return t};class f extends u.default{delete(e){const t=(0,l.default)((0,s.default)(this).call(this)),r=(0,o.default)(t).call(t,d(e));return super.delete(r)}get(e){const t=(0,l.default)((0,s.default)(this).call(this)),r=(0,o.default)(t).call(t,d(e));return super.get(r)}has(e){const t=(0,l.default)((0,s.default)(this).call(this));return-1!==(0,i.default)(t).call(t,d(e))}}const h=function(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:p;const{Cache:r}=c.default;c.default.Cache=f;const n=(0,c.default)(e,t);return c.default.Cache=r,n}},8764:(e,t,r)=>{const n=r(4780),a=r(3294),l="function"==typeof Symbol&&"function"==typeof Symbol.for?Symbol.for("nodejs.util.inspect.custom"):null;t.Buffer=i,t.SlowBuffer=function(e){+e!=e&&(e=0);return i.alloc(+e)},t.INSPECT_MAX_BYTES=50;const s=2147483647;function o(e){if(e>s)throw new RangeError('The value "'+e+'" is invalid for option "size"');const t=new Uint8Array(e);return Object.setPrototypeOf(t,i.prototype),t}function i(e,t,r){if("number"==typeof e){if("string"==typeof t)throw new TypeError('The "string" argument must be of type string. Received type number');return d(e)}return u(e,t,r)}function u(e,t,r){if("string"==typeof e)return function(e,t){"string"==typeof t&&""!==t||(t="utf8");if(!i.isEncoding(t))throw new TypeError("Unknown encoding: "+t);const r=0|m(e,t);let n=o(r);const a=n.write(e,t);a!==r&&(n=n.slice(0,a));return n}(e,t);if(ArrayBuffer.isView(e))return function(e){if(G(e,Uint8Array)){const t=new Uint8Array(e);return f(t.buffer,t.byteOffset,t.byteLength)}return p(e)}(e);if(null==e)throw new TypeError("The first argument must be one of type string, Buffer, ArrayBuffer, Array, or Array-like Object. Received type "+typeof e);if(G(e,ArrayBuffer)||e&&G(e.buffer,ArrayBuffer))return f(e,t,r);if("undefined"!=typeof SharedArrayBuffer&&(G(e,SharedArrayBuffer)||e&&G(e.buffer,SharedArrayBuffer)))return f(e,t,r);if("number"==typeof e)throw new TypeError('The "value" argument must not be of type number. Received type number');const n=e.valueOf&&e.valueOf();if(null!=n&&n!==e)return i.from(n,t,r);const a=function(e){if(i.isBuffer(e)){const t=0|h(e.length),r=o(t);return 0===r.length||e.copy(r,0,0,t),r}if(void 0!==e.length)return"number"!=typeof e.length||Z(e.length)?o(0):p(e);if("Buffer"===e.type&&Array.isArray(e.data))return p(e.data)}(e);if(a)return a;if("undefined"!=typeof Symbol&&null!=Symbol.toPrimitive&&"function"==typeof e[Symbol.toPrimitive])return i.from(e[Symbol.toPrimitive]("string"),t,r);throw new TypeError("The first argument must be one of type string, Buffer, ArrayBuffer, Array, or Array-like Object. Received type "+typeof e)}function c(e){if("number"!=typeof e)throw new TypeError('"size" argument must be of type number');if(e<0)throw new RangeError('The value "'+e+'" is invalid for option "size"')}function d(e){return c(e),o(e<0?0:0|h(e))}function p(e){const t=e.length<0?0:0|h(e.length),r=o(t);for(let n=0;n<t;n+=1)r[n]=255&e[n];return r}function f(e,t,r){if(t<0||e.byteLength<t)throw new RangeError('"offset" is outside of buffer bounds');if(e.byteLength<t+(r||0))throw new RangeError('"length" is outside of buffer bounds');let n;return n=void 0===t&&void 0===r?new Uint8Array(e):void 0===r?new Uint8Array(e,t):new Uint8Array(e,t,r),Object.setPrototypeOf(n,i.prototype),n}function h(e){if(e>=s)throw new RangeError("Attempt to allocate Buffer larger than maximum size: 0x"+s.toString(16)+" bytes");return 0|e}function m(e,t){if(i.isBuffer(e))return e.length;if(ArrayBuffer.isView(e)||G(e,ArrayBuffer))return e.byteLength;if("string"!=typeof e)throw new TypeError('The "string" argument must be one of type string, Buffer, or ArrayBuffer. Received type '+typeof e);const r=e.length,n=arguments.length>2&&!0===arguments[2];if(!n&&0===r)return 0;let a=!1;for(;;)switch(t){case"ascii":case"latin1":case"binary":return r;case"utf8":case"utf-8":return W(e).length;case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return 2*r;case"hex":return r>>>1;case"base64":return H(e).length;default:if(a)return n?-1:W(e).length;t=(""+t).toLowerCase(),a=!0}}function g(e,t,r){let n=!1;if((void 0===t||t<0)&&(t=0),t>this.length)return"";if((void 0===r||r>this.length)&&(r=this.length),r<=0)return"";if((r>>>=0)<=(t>>>=0))return"";for(e||(e="utf8");;)switch(e){case"hex":return T(this,t,r);case"utf8":case"utf-8":return A(this,t,r);case"ascii":return R(this,t,r);case"latin1":case"binary":return N(this,t,r);case"base64":return x(this,t,r);case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return O(this,t,r);default:if(n)throw new TypeError("Unknown encoding: "+e);e=(e+"").toLowerCase(),n=!0}}function y(e,t,r){const n=e[t];e[t]=e[r],e[r]=n}function v(e,t,r,n,a){if(0===e.length)return-1;if("string"==typeof r?(n=r,r=0):r>2147483647?r=2147483647:r<-2147483648&&(r=-2147483648),Z(r=+r)&&(r=a?0:e.length-1),r<0&&(r=e.length+r),r>=e.length){if(a)return-1;r=e.length-1}else if(r<0){if(!a)return-1;r=0}if("string"==typeof t&&(t=i.from(t,n)),i.isBuffer(t))return 0===t.length?-1:E(e,t,r,n,a);if("number"==typeof t)return t&=255,"function"==typeof Uint8Array.prototype.indexOf?a?Uint8Array.prototype.indexOf.call(e,t,r):Uint8Array.prototype.lastIndexOf.call(e,t,r):E(e,[t],r,n,a);throw new TypeError("val must be string, number or Buffer")}function E(e,t,r,n,a){let l,s=1,o=e.length,i=t.length;if(void 0!==n&&("ucs2"===(n=String(n).toLowerCase())||"ucs-2"===n||"utf16le"===n||"utf-16le"===n)){if(e.length<2||t.length<2)return-1;s=2,o/=2,i/=2,r/=2}function u(e,t){return 1===s?e[t]:e.readUInt16BE(t*s)}if(a){let n=-1;for(l=r;l<o;l++)if(u(e,l)===u(t,-1===n?0:l-n)){if(-1===n&&(n=l),l-n+1===i)return n*s}else-1!==n&&(l-=l-n),n=-1}else for(r+i>o&&(r=o-i),l=r;l>=0;l--){let r=!0;for(let n=0;n<i;n++)if(u(e,l+n)!==u(t,n)){r=!1;break}if(r)return l}return-1}function b(e,t,r,n){r=Number(r)||0;const a=e.length-r;n?(n=Number(n))>a&&(n=a):n=a;const l=t.length;let s;for(n>l/2&&(n=l/2),s=0;s<n;++s){const n=parseInt(t.substr(2*s,2),16);if(Z(n))return s;e[r+s]=n}return s}function S(e,t,r,n){return K(W(t,e.length-r),e,r,n)}function _(e,t,r,n){return K(function(e){const t=[];for(let r=0;r<e.length;++r)t.push(255&e.charCodeAt(r));return t}(t),e,r,n)}function w(e,t,r,n){return K(H(t),e,r,n)}function C(e,t,r,n){return K(function(e,t){let r,n,a;const l=[];for(let s=0;s<e.length&&!((t-=2)<0);++s)r=e.charCodeAt(s),n=r>>8,a=r%256,l.push(a),l.push(n);return l}(t,e.length-r),e,r,n)}function x(e,t,r){return 0===t&&r===e.length?n.fromByteArray(e):n.fromByteArray(e.slice(t,r))}function A(e,t,r){r=Math.min(e.length,r);const n=[];let a=t;for(;a<r;){const t=e[a];let l=null,s=t>239?4:t>223?3:t>191?2:1;if(a+s<=r){let r,n,o,i;switch(s){case 1:t<128&&(l=t);break;case 2:r=e[a+1],128==(192&r)&&(i=(31&t)<<6|63&r,i>127&&(l=i));break;case 3:r=e[a+1],n=e[a+2],128==(192&r)&&128==(192&n)&&(i=(15&t)<<12|(63&r)<<6|63&n,i>2047&&(i<55296||i>57343)&&(l=i));break;case 4:r=e[a+1],n=e[a+2],o=e[a+3],128==(192&r)&&128==(192&n)&&128==(192&o)&&(i=(15&t)<<18|(63&r)<<12|(63&n)<<6|63&o,i>65535&&i<1114112&&(l=i))}}null===l?(l=65533,s=1):l>65535&&(l-=65536,n.push(l>>>10&1023|55296),l=56320|1023&l),n.push(l),a+=s}return function(e){const t=e.length;if(t<=I)return String.fromCharCode.apply(String,e);let r="",n=0;for(;n<t;)r+=String.fromCharCode.apply(String,e.slice(n,n+=I));return r}(n)}t.kMaxLength=s,i.TYPED_ARRAY_SUPPORT=function(){try{const e=new Uint8Array(1),t={foo:function(){return 42}};return Object.setPrototypeOf(t,Uint8Array.prototype),Object.setPrototypeOf(e,t),42===e.foo()}catch(e){return!1}}(),i.TYPED_ARRAY_SUPPORT||"undefined"==typeof console||"function"!=typeof console.error||console.error("This browser lacks typed array (Uint8Array) support which is required by `buffer` v5.x. Use `buffer` v4.x if you require old browser support."),Object.defineProperty(i.prototype,"parent",{enumerable:!0,get:function(){if(i.isBuffer(this))return this.buffer}}),Object.defineProperty(i.prototype,"offset",{enumerable:!0,get:function(){if(i.isBuffer(this))return this.byteOffset}}),i.poolSize=8192,i.from=function(e,t,r){return u(e,t,r)},Object.setPrototypeOf(i.prototype,Uint8Array.prototype),Object.setPrototypeOf(i,Uint8Array),i.alloc=function(e,t,r){return function(e,t,r){return c(e),e<=0?o(e):void 0!==t?"string"==typeof r?o(e).fill(t,r):o(e).fill(t):o(e)}(e,t,r)},i.allocUnsafe=function(e){return d(e)},i.allocUnsafeSlow=function(e){return d(e)},i.isBuffer=function(e){return null!=e&&!0===e._isBuffer&&e!==i.prototype},i.compare=function(e,t){if(G(e,Uint8Array)&&(e=i.from(e,e.offset,e.byteLength)),G(t,Uint8Array)&&(t=i.from(t,t.offset,t.byteLength)),!i.isBuffer(e)||!i.isBuffer(t))throw new TypeError('The "buf1", "buf2" arguments must be one of type Buffer or Uint8Array');if(e===t)return 0;let r=e.length,n=t.length;for(let a=0,l=Math.min(r,n);a<l;++a)if(e[a]!==t[a]){r=e[a],n=t[a];break}return r<n?-1:n<r?1:0},i.isEncoding=function(e){switch(String(e).toLowerCase()){case"hex":case"utf8":case"utf-8":case"ascii":case"latin1":case"binary":case"base64":case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return!0;default:return!1}},i.concat=function(e,t){if(!Array.isArray(e))throw new TypeError('"list" argument must be an Array of Buffers');if(0===e.length)return i.alloc(0);let r;if(void 0===t)for(t=0,r=0;r<e.length;++r)t+=e[r].length;const n=i.allocUnsafe(t);let a=0;for(r=0;r<e.length;++r){let t=e[r];if(G(t,Uint8Array))a+t.length>n.length?(i.isBuffer(t)||(t=i.from(t)),t.copy(n,a)):Uint8Array.prototype.set.call(n,t,a);else{if(!i.isBuffer(t))throw new TypeError('"list" argument must be an Array of Buffers');t.copy(n,a)}a+=t.length}return n},i.byteLength=m,i.prototype._isBuffer=!0,i.prototype.swap16=function(){const e=this.length;if(e%2!=0)throw new RangeError("Buffer size must be a multiple of 16-bits");for(let t=0;t<e;t+=2)y(this,t,t+1);return this},i.prototype.swap32=function(){const e=this.length;if(e%4!=0)throw new RangeError("Buffer size must be a multiple of 32-bits");for(let t=0;t<e;t+=4)y(this,t,t+3),y(this,t+1,t+2);return this},i.prototype.swap64=function(){const e=this.length;if(e%8!=0)throw new RangeError("Buffer size must be a multiple of 64-bits");for(let t=0;t<e;t+=8)y(this,t,t+7),y(this,t+1,t+6),y(this,t+2,t+5),y(this,t+3,t+4);return this},i.prototype.toString=function(){const e=this.length;return 0===e?"":0===arguments.length?A(this,0,e):g.apply(this,arguments)},i.prototype.toLocaleString=i.prototype.toString,i.prototype.equals=function(e){if(!i.isBuffer(e))throw new TypeError("Argument must be a Buffer");return this===e||0===i.compare(this,e)},i.prototype.inspect=function(){let e="";const r=t.INSPECT_MAX_BYTES;return e=this.toString("hex",0,r).replace(/(.{2})/g,"$1 ").trim(),this.length>r&&(e+=" ... "),"<Buffer "+e+">"},l&&(i.prototype[l]=i.prototype.inspect),i.prototype.compare=function(e,t,r,n,a){if(G(e,Uint8Array)&&(e=i.from(e,e.offset,e.byteLength)),!i.isBuffer(e))throw new TypeError('The "target" argument must be one of type Buffer or Uint8Array. Received type '+typeof e);if(void 0===t&&(t=0),void 0===r&&(r=e?e.length:0),void 0===n&&(n=0),void 0===a&&(a=this.length),t<0||r>e.length||n<0||a>this.length)throw new RangeError("out of range index");if(n>=a&&t>=r)return 0;if(n>=a)return-1;if(t>=r)return 1;if(this===e)return 0;let l=(a>>>=0)-(n>>>=0),s=(r>>>=0)-(t>>>=0);const o=Math.min(l,s),u=this.slice(n,a),c=e.slice(t,r);for(let e=0;e<o;++e)if(u[e]!==c[e]){l=u[e],s=c[e];break}return l<s?-1:s<l?1:0},i.prototype.includes=function(e,t,r){return-1!==this.indexOf(e,t,r)},i.prototype.indexOf=function(e,t,r){return v(this,e,t,r,!0)},i.prototype.lastIndexOf=function(e,t,r){return v(this,e,t,r,!1)},i.prototype.write=function(e,t,r,n){if(void 0===t)n="utf8",r=this.length,t=0;else if(void 0===r&&"string"==typeof t)n=t,r=this.length,t=0;else{if(!isFinite(t))throw new Error("Buffer.write(string, encoding, offset[, length]) is no longer supported");t>>>=0,isFinite(r)?(r>>>=0,void 0===n&&(n="utf8")):(n=r,r=void 0)}const a=this.length-t;if((void 0===r||r>a)&&(r=a),e.length>0&&(r<0||t<0)||t>this.length)throw new RangeError("Attempt to write outside buffer bounds");n||(n="utf8");let l=!1;for(;;)switch(n){case"hex":return b(this,e,t,r);case"utf8":case"utf-8":return S(this,e,t,r);case"ascii":case"latin1":case"binary":return _(this,e,t,r);case"base64":return w(this,e,t,r);case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return C(this,e,t,r);default:if(l)throw new TypeError("Unknown encoding: "+n);n=(""+n).toLowerCase(),l=!0}},i.prototype.toJSON=function(){return{type:"Buffer",data:Array.prototype.slice.call(this._arr||this,0)}};const I=4096;function R(e,t,r){let n="";r=Math.min(e.length,r);for(let a=t;a<r;++a)n+=String.fromCharCode(127&e[a]);return n}function N(e,t,r){let n="";r=Math.min(e.length,r);for(let a=t;a<r;++a)n+=String.fromCharCode(e[a]);return n}function T(e,t,r){const n=e.length;(!t||t<0)&&(t=0),(!r||r<0||r>n)&&(r=n);let a="";for(let n=t;n<r;++n)a+=Y[e[n]];return a}function O(e,t,r){const n=e.slice(t,r);let a="";for(let e=0;e<n.length-1;e+=2)a+=String.fromCharCode(n[e]+256*n[e+1]);return a}function k(e,t,r){if(e%1!=0||e<0)throw new RangeError("offset is not uint");if(e+t>r)throw new RangeError("Trying to access beyond buffer length")}function M(e,t,r,n,a,l){if(!i.isBuffer(e))throw new TypeError('"buffer" argument must be a Buffer instance');if(t>a||t<l)throw new RangeError('"value" argument is out of bounds');if(r+n>e.length)throw new RangeError("Index out of range")}function P(e,t,r,n,a){z(t,n,a,e,r,7);let l=Number(t&BigInt(4294967295));e[r++]=l,l>>=8,e[r++]=l,l>>=8,e[r++]=l,l>>=8,e[r++]=l;let s=Number(t>>BigInt(32)&BigInt(4294967295));return e[r++]=s,s>>=8,e[r++]=s,s>>=8,e[r++]=s,s>>=8,e[r++]=s,r}function j(e,t,r,n,a){z(t,n,a,e,r,7);let l=Number(t&BigInt(4294967295));e[r+7]=l,l>>=8,e[r+6]=l,l>>=8,e[r+5]=l,l>>=8,e[r+4]=l;let s=Number(t>>BigInt(32)&BigInt(4294967295));return e[r+3]=s,s>>=8,e[r+2]=s,s>>=8,e[r+1]=s,s>>=8,e[r]=s,r+8}function L(e,t,r,n,a,l){if(r+n>e.length)throw new RangeError("Index out of range");if(r<0)throw new RangeError("Index out of range")}function q(e,t,r,n,l){return t=+t,r>>>=0,l||L(e,0,r,4),a.write(e,t,r,n,23,4),r+4}function B(e,t,r,n,l){return t=+t,r>>>=0,l||L(e,0,r,8),a.write(e,t,r,n,52,8),r+8}i.prototype.slice=function(e,t){const r=this.length;(e=~~e)<0?(e+=r)<0&&(e=0):e>r&&(e=r),(t=void 0===t?r:~~t)<0?(t+=r)<0&&(t=0):t>r&&(t=r),t<e&&(t=e);const n=this.subarray(e,t);return Object.setPrototypeOf(n,i.prototype),n},i.prototype.readUintLE=i.prototype.readUIntLE=function(e,t,r){e>>>=0,t>>>=0,r||k(e,t,this.length);let n=this[e],a=1,l=0;for(;++l<t&&(a*=256);)n+=this[e+l]*a;return n},i.prototype.readUintBE=i.prototype.readUIntBE=function(e,t,r){e>>>=0,t>>>=0,r||k(e,t,this.length);let n=this[e+--t],a=1;for(;t>0&&(a*=256);)n+=this[e+--t]*a;return n},i.prototype.readUint8=i.prototype.readUInt8=function(e,t){return e>>>=0,t||k(e,1,this.length),this[e]},i.prototype.readUint16LE=i.prototype.readUInt16LE=function(e,t){return e>>>=0,t||k(e,2,this.length),this[e]|this[e+1]<<8},i.prototype.readUint16BE=i.prototype.readUInt16BE=function(e,t){return e>>>=0,t||k(e,2,this.length),this[e]<<8|this[e+1]},i.prototype.readUint32LE=i.prototype.readUInt32LE=function(e,t){return e>>>=0,t||k(e,4,this.length),(this[e]|this[e+1]<<8|this[e+2]<<16)+16777216*this[e+3]},i.prototype.readUint32BE=i.prototype.readUInt32BE=function(e,t){return e>>>=0,t||k(e,4,this.length),16777216*this[e]+(this[e+1]<<16|this[e+2]<<8|this[e+3])},i.prototype.readBigUInt64LE=X((function(e){F(e>>>=0,"offset");const t=this[e],r=this[e+7];void 0!==t&&void 0!==r||$(e,this.length-8);const n=t+256*this[++e]+65536*this[++e]+this[++e]*2**24,a=this[++e]+256*this[++e]+65536*this[++e]+r*2**24;return BigInt(n)+(BigInt(a)<<BigInt(32))})),i.prototype.readBigUInt64BE=X((function(e){F(e>>>=0,"offset");const t=this[e],r=this[e+7];void 0!==t&&void 0!==r||$(e,this.length-8);const n=t*2**24+65536*this[++e]+256*this[++e]+this[++e],a=this[++e]*2**24+65536*this[++e]+256*this[++e]+r;return(BigInt(n)<<BigInt(32))+BigInt(a)})),i.prototype.readIntLE=function(e,t,r){e>>>=0,t>>>=0,r||k(e,t,this.length);let n=this[e],a=1,l=0;for(;++l<t&&(a*=256);)n+=this[e+l]*a;return a*=128,n>=a&&(n-=Math.pow(2,8*t)),n},i.prototype.readIntBE=function(e,t,r){e>>>=0,t>>>=0,r||k(e,t,this.length);let n=t,a=1,l=this[e+--n];for(;n>0&&(a*=256);)l+=this[e+--n]*a;return a*=128,l>=a&&(l-=Math.pow(2,8*t)),l},i.prototype.readInt8=function(e,t){return e>>>=0,t||k(e,1,this.length),128&this[e]?-1*(255-this[e]+1):this[e]},i.prototype.readInt16LE=function(e,t){e>>>=0,t||k(e,2,this.length);const r=this[e]|this[e+1]<<8;return 32768&r?4294901760|r:r},i.prototype.readInt16BE=function(e,t){e>>>=0,t||k(e,2,this.length);const r=this[e+1]|this[e]<<8;return 32768&r?4294901760|r:r},i.prototype.readInt32LE=function(e,t){return e>>>=0,t||k(e,4,this.length),this[e]|this[e+1]<<8|this[e+2]<<16|this[e+3]<<24},i.prototype.readInt32BE=function(e,t){return e>>>=0,t||k(e,4,this.length),this[e]<<24|this[e+1]<<16|this[e+2]<<8|this[e+3]},i.prototype.readBigInt64LE=X((function(e){F(e>>>=0,"offset");const t=this[e],r=this[e+7];void 0!==t&&void 0!==r||$(e,this.length-8);const n=this[e+4]+256*this[e+5]+65536*this[e+6]+(r<<24);return(BigInt(n)<<BigInt(32))+BigInt(t+256*this[++e]+65536*this[++e]+this[++e]*2**24)})),i.prototype.readBigInt64BE=X((function(e){F(e>>>=0,"offset");const t=this[e],r=this[e+7];void 0!==t&&void 0!==r||$(e,this.length-8);const n=(t<<24)+65536*this[++e]+256*this[++e]+this[++e];return(BigInt(n)<<BigInt(32))+BigInt(this[++e]*2**24+65536*this[++e]+256*this[++e]+r)})),i.prototype.readFloatLE=function(e,t){return e>>>=0,t||k(e,4,this.length),a.read(this,e,!0,23,4)},i.prototype.readFloatBE=function(e,t){return e>>>=0,t||k(e,4,this.length),a.read(this,e,!1,23,4)},i.prototype.readDoubleLE=function(e,t){return e>>>=0,t||k(e,8,this.length),a.read(this,e,!0,52,8)},i.prototype.readDoubleBE=function(e,t){return e>>>=0,t||k(e,8,this.length),a.read(this,e,!1,52,8)},i.prototype.writeUintLE=i.prototype.writeUIntLE=function(e,t,r,n){if(e=+e,t>>>=0,r>>>=0,!n){M(this,e,t,r,Math.pow(2,8*r)-1,0)}let a=1,l=0;for(this[t]=255&e;++l<r&&(a*=256);)this[t+l]=e/a&255;return t+r},i.prototype.writeUintBE=i.prototype.writeUIntBE=function(e,t,r,n){if(e=+e,t>>>=0,r>>>=0,!n){M(this,e,t,r,Math.pow(2,8*r)-1,0)}let a=r-1,l=1;for(this[t+a]=255&e;--a>=0&&(l*=256);)this[t+a]=e/l&255;return t+r},i.prototype.writeUint8=i.prototype.writeUInt8=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,1,255,0),this[t]=255&e,t+1},i.prototype.writeUint16LE=i.prototype.writeUInt16LE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,2,65535,0),this[t]=255&e,this[t+1]=e>>>8,t+2},i.prototype.writeUint16BE=i.prototype.writeUInt16BE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,2,65535,0),this[t]=e>>>8,this[t+1]=255&e,t+2},i.prototype.writeUint32LE=i.prototype.writeUInt32LE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,4,4294967295,0),this[t+3]=e>>>24,this[t+2]=e>>>16,this[t+1]=e>>>8,this[t]=255&e,t+4},i.prototype.writeUint32BE=i.prototype.writeUInt32BE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,4,4294967295,0),this[t]=e>>>24,this[t+1]=e>>>16,this[t+2]=e>>>8,this[t+3]=255&e,t+4},i.prototype.writeBigUInt64LE=X((function(e,t=0){return P(this,e,t,BigInt(0),BigInt("0xffffffffffffffff"))})),i.prototype.writeBigUInt64BE=X((function(e,t=0){return j(this,e,t,BigInt(0),BigInt("0xffffffffffffffff"))})),i.prototype.writeIntLE=function(e,t,r,n){if(e=+e,t>>>=0,!n){const n=Math.pow(2,8*r-1);M(this,e,t,r,n-1,-n)}let a=0,l=1,s=0;for(this[t]=255&e;++a<r&&(l*=256);)e<0&&0===s&&0!==this[t+a-1]&&(s=1),this[t+a]=(e/l>>0)-s&255;return t+r},i.prototype.writeIntBE=function(e,t,r,n){if(e=+e,t>>>=0,!n){const n=Math.pow(2,8*r-1);M(this,e,t,r,n-1,-n)}let a=r-1,l=1,s=0;for(this[t+a]=255&e;--a>=0&&(l*=256);)e<0&&0===s&&0!==this[t+a+1]&&(s=1),this[t+a]=(e/l>>0)-s&255;return t+r},i.prototype.writeInt8=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,1,127,-128),e<0&&(e=255+e+1),this[t]=255&e,t+1},i.prototype.writeInt16LE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,2,32767,-32768),this[t]=255&e,this[t+1]=e>>>8,t+2},i.prototype.writeInt16BE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,2,32767,-32768),this[t]=e>>>8,this[t+1]=255&e,t+2},i.prototype.writeInt32LE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,4,2147483647,-2147483648),this[t]=255&e,this[t+1]=e>>>8,this[t+2]=e>>>16,this[t+3]=e>>>24,t+4},i.prototype.writeInt32BE=function(e,t,r){return e=+e,t>>>=0,r||M(this,e,t,4,2147483647,-2147483648),e<0&&(e=4294967295+e+1),this[t]=e>>>24,this[t+1]=e>>>16,this[t+2]=e>>>8,this[t+3]=255&e,t+4},i.prototype.writeBigInt64LE=X((function(e,t=0){return P(this,e,t,-BigInt("0x8000000000000000"),BigInt("0x7fffffffffffffff"))})),i.prototype.writeBigInt64BE=X((function(e,t=0){return j(this,e,t,-BigInt("0x8000000000000000"),BigInt("0x7fffffffffffffff"))})),i.prototype.writeFloatLE=function(e,t,r){return q(this,e,t,!0,r)},i.prototype.writeFloatBE=function(e,t,r){return q(this,e,t,!1,r)},i.prototype.writeDoubleLE=function(e,t,r){return B(this,e,t,!0,r)},i.prototype.writeDoubleBE=function(e,t,r){return B(this,e,t,!1,r)},i.prototype.copy=function(e,t,r,n){if(!i.isBuffer(e))throw new TypeError("argument should be a Buffer");if(r||(r=0),n||0===n||(n=this.length),t>=e.length&&(t=e.length),t||(t=0),n>0&&n<r&&(n=r),n===r)return 0;if(0===e.length||0===this.length)return 0;if(t<0)throw new RangeError("targetStart out of bounds");if(r<0||r>=this.length)throw new RangeError("Index out of range");if(n<0)throw new RangeError("sourceEnd out of bounds");n>this.length&&(n=this.length),e.length-t<n-r&&(n=e.length-t+r);const a=n-r;return this===e&&"function"==typeof Uint8Array.prototype.copyWithin?this.copyWithin(t,r,n):Uint8Array.prototype.set.call(e,this.subarray(r,n),t),a},i.prototype.fill=function(e,t,r,n){if("string"==typeof e){if("string"==typeof t?(n=t,t=0,r=this.length):"string"==typeof r&&(n=r,r=this.length),void 0!==n&&"string"!=typeof n)throw new TypeError("encoding must be a string");if("string"==typeof n&&!i.isEncoding(n))throw new TypeError("Unknown encoding: "+n);if(1===e.length){const t=e.charCodeAt(0);("utf8"===n&&t<128||"latin1"===n)&&(e=t)}}else"number"==typeof e?e&=255:"boolean"==typeof e&&(e=Number(e));if(t<0||this.length<t||this.length<r)throw new RangeError("Out of range index");if(r<=t)return this;let a;if(t>>>=0,r=void 0===r?this.length:r>>>0,e||(e=0),"number"==typeof e)for(a=t;a<r;++a)this[a]=e;else{const l=i.isBuffer(e)?e:i.from(e,n),s=l.length;if(0===s)throw new TypeError('The value "'+e+'" is invalid for argument "value"');for(a=0;a<r-t;++a)this[a+t]=l[a%s]}return this};const D={};function U(e,t,r){D[e]=class extends r{constructor(){super(),Object.defineProperty(this,"message",{value:t.apply(this,arguments),writable:!0,configurable:!0}),this.name=`${this.name} [${e}]`,this.stack,delete this.name}get code(){return e}set code(e){Object.defineProperty(this,"code",{configurable:!0,enumerable:!0,value:e,writable:!0})}toString(){return`${this.name} [${e}]: ${this.message}`}}}function V(e){let t="",r=e.length;const n="-"===e[0]?1:0;for(;r>=n+4;r-=3)t=`_${e.slice(r-3,r)}${t}`;return`${e.slice(0,r)}${t}`}function z(e,t,r,n,a,l){if(e>r||e<t){const n="bigint"==typeof t?"n":"";let a;throw a=l>3?0===t||t===BigInt(0)?`>= 0${n} and < 2${n} ** ${8*(l+1)}${n}`:`>= -(2${n} ** ${8*(l+1)-1}${n}) and < 2 ** ${8*(l+1)-1}${n}`:`>= ${t}${n} and <= ${r}${n}`,new D.ERR_OUT_OF_RANGE("value",a,e)}!function(e,t,r){F(t,"offset"),void 0!==e[t]&&void 0!==e[t+r]||$(t,e.length-(r+1))}(n,a,l)}function F(e,t){if("number"!=typeof e)throw new D.ERR_INVALID_ARG_TYPE(t,"number",e)}function $(e,t,r){if(Math.floor(e)!==e)throw F(e,r),new D.ERR_OUT_OF_RANGE(r||"offset","an integer",e);if(t<0)throw new D.ERR_BUFFER_OUT_OF_BOUNDS;throw new D.ERR_OUT_OF_RANGE(r||"offset",`>= ${r?1:0} and <= ${t}`,e)}U("ERR_BUFFER_OUT_OF_BOUNDS",(function(e){return e?`${e} is outside of buffer bounds`:"Attempt to access memory outside buffer bounds"}),RangeError),U("ERR_INVALID_ARG_TYPE",(function(e,t){return`The "${e}" argument must be of type number. Received type ${typeof t}`}),TypeError),U("ERR_OUT_OF_RANGE",(function(e,t,r){let n=`The value of "${e}" is out of range.`,a=r;return Number.isInteger(r)&&Math.abs(r)>2**32?a=V(String(r)):"bigint"==typeof r&&(a=String(r),(r>BigInt(2)**BigInt(32)||r<-(BigInt(2)**BigInt(32)))&&(a=V(a)),a+="n"),n+=` It must be ${t}. Received ${a}`,n}),RangeError);const J=/[^+/0-9A-Za-z-_]/g;function W(e,t){let r;t=t||1/0;const n=e.length;let a=null;const l=[];for(let s=0;s<n;++s){if(r=e.charCodeAt(s),r>55295&&r<57344){if(!a){if(r>56319){(t-=3)>-1&&l.push(239,191,189);continue}if(s+1===n){(t-=3)>-1&&l.push(239,191,189);continue}a=r;continue}if(r<56320){(t-=3)>-1&&l.push(239,191,189),a=r;continue}r=65536+(a-55296<<10|r-56320)}else a&&(t-=3)>-1&&l.push(239,191,189);if(a=null,r<128){if((t-=1)<0)break;l.push(r)}else if(r<2048){if((t-=2)<0)break;l.push(r>>6|192,63&r|128)}else if(r<65536){if((t-=3)<0)break;l.push(r>>12|224,r>>6&63|128,63&r|128)}else{if(!(r<1114112))throw new Error("Invalid code point");if((t-=4)<0)break;l.push(r>>18|240,r>>12&63|128,r>>6&63|128,63&r|128)}}return l}function H(e){return n.toByteArray(function(e){if((e=(e=e.split("=")[0]).trim().replace(J,"")).length<2)return"";for(;e.length%4!=0;)e+="=";return e}(e))}function K(e,t,r,n){let a;for(a=0;a<n&&!(a+r>=t.length||a>=e.length);++a)t[a+r]=e[a];return a}function G(e,t){return e instanceof t||null!=e&&null!=e.constructor&&null!=e.constructor.name&&e.constructor.name===t.name}function Z(e){return e!=e}const Y=function(){const e="0123456789abcdef",t=new Array(256);for(let r=0;r<16;++r){const n=16*r;for(let a=0;a<16;++a)t[n+a]=e[r]+e[a]}return t}();function X(e){return"undefined"==typeof BigInt?Q:e}function Q(){throw new Error("BigInt not supported")}},8171:(e,t,r)=>{r(6450);var n=r(4058).Object,a=e.exports=function(e,t,r){return n.defineProperty(e,t,r)};n.defineProperty.sham&&(a.sham=!0)},4883:(e,t,r)=>{var n=r(7475),a=r(9826),l=TypeError;e.exports=function(e){if(n(e))return e;throw l(a(e)+" is not a function")}},6059:(e,t,r)=>{var n=r(941),a=String,l=TypeError;e.exports=function(e){if(n(e))return e;throw l(a(e)+" is not an object")}},2532:(e,t,r)=>{var n=r(5329),a=n({}.toString),l=n("".slice);e.exports=function(e){return l(a(e),8,-1)}},2029:(e,t,r)=>{var n=r(5746),a=r(5988),l=r(1887);e.exports=n?function(e,t,r){return a.f(e,t,l(1,r))}:function(e,t,r){return e[t]=r,e}},1887:e=>{e.exports=function(e,t){return{enumerable:!(1&e),configurable:!(2&e),writable:!(4&e),value:t}}},5609:(e,t,r)=>{var n=r(1899),a=Object.defineProperty;e.exports=function(e,t){try{a(n,e,{value:t,configurable:!0,writable:!0})}catch(r){n[e]=t}return t}},5746:(e,t,r)=>{var n=r(5981);e.exports=!n((function(){return 7!=Object.defineProperty({},1,{get:function(){return 7}})[1]}))},6616:e=>{var t="object"==typeof document&&document.all,r=void 0===t&&void 0!==t;e.exports={all:t,IS_HTMLDDA:r}},1333:(e,t,r)=>{var n=r(1899),a=r(941),l=n.document,s=a(l)&&a(l.createElement);e.exports=function(e){return s?l.createElement(e):{}}},2861:e=>{e.exports="undefined"!=typeof navigator&&String(navigator.userAgent)||""},3385:(e,t,r)=>{var n,a,l=r(1899),s=r(2861),o=l.process,i=l.Deno,u=o&&o.versions||i&&i.version,c=u&&u.v8;c&&(a=(n=c.split("."))[0]>0&&n[0]<4?1:+(n[0]+n[1])),!a&&s&&(!(n=s.match(/Edge\/(\d+)/))||n[1]>=74)&&(n=s.match(/Chrome\/(\d+)/))&&(a=+n[1]),e.exports=a},6887:(e,t,r)=>{var n=r(1899),a=r(9730),l=r(7484),s=r(7475),o=r(9677).f,i=r(7252),u=r(4058),c=r(6843),d=r(2029),p=r(953),f=function(e){var t=function(r,n,l){if(this instanceof t){switch(arguments.length){case 0:return new e;case 1:return new e(r);case 2:return new e(r,n)}return new e(r,n,l)}return a(e,this,arguments)};return t.prototype=e.prototype,t};e.exports=function(e,t){var r,a,h,m,g,y,v,E,b,S=e.target,_=e.global,w=e.stat,C=e.proto,x=_?n:w?n[S]:(n[S]||{}).prototype,A=_?u:u[S]||d(u,S,{})[S],I=A.prototype;for(m in t)a=!(r=i(_?m:S+(w?".":"#")+m,e.forced))&&x&&p(x,m),y=A[m],a&&(v=e.dontCallGetSet?(b=o(x,m))&&b.value:x[m]),g=a&&v?v:t[m],a&&typeof y==typeof g||(E=e.bind&&a?c(g,n):e.wrap&&a?f(g):C&&s(g)?l(g):g,(e.sham||g&&g.sham||y&&y.sham)&&d(E,"sham",!0),d(A,m,E),C&&(p(u,h=S+"Prototype")||d(u,h,{}),d(u[h],m,g),e.real&&I&&(r||!I[m])&&d(I,m,g)))}},5981:e=>{e.exports=function(e){try{return!!e()}catch(e){return!0}}},9730:(e,t,r)=>{var n=r(8285),a=Function.prototype,l=a.apply,s=a.call;e.exports="object"==typeof Reflect&&Reflect.apply||(n?s.bind(l):function(){return s.apply(l,arguments)})},6843:(e,t,r)=>{var n=r(7484),a=r(4883),l=r(8285),s=n(n.bind);e.exports=function(e,t){return a(e),void 0===t?e:l?s(e,t):function(){return e.apply(t,arguments)}}},8285:(e,t,r)=>{var n=r(5981);e.exports=!n((function(){var e=function(){}.bind();return"function"!=typeof e||e.hasOwnProperty("prototype")}))},8834:(e,t,r)=>{var n=r(8285),a=Function.prototype.call;e.exports=n?a.bind(a):function(){return a.apply(a,arguments)}},7484:(e,t,r)=>{var n=r(2532),a=r(5329);e.exports=function(e){if("Function"===n(e))return a(e)}},5329:(e,t,r)=>{var n=r(8285),a=Function.prototype,l=a.call,s=n&&a.bind.bind(l,l);e.exports=n?s:function(e){return function(){return l.apply(e,arguments)}}},224:(e,t,r)=>{var n=r(4058),a=r(1899),l=r(7475),s=function(e){return l(e)?e:void 0};e.exports=function(e,t){return arguments.length<2?s(n[e])||s(a[e]):n[e]&&n[e][t]||a[e]&&a[e][t]}},9733:(e,t,r)=>{var n=r(4883),a=r(2119);e.exports=function(e,t){var r=e[t];return a(r)?void 0:n(r)}},1899:(e,t,r)=>{var n=function(e){return e&&e.Math==Math&&e};e.exports=n("object"==typeof globalThis&&globalThis)||n("object"==typeof window&&window)||n("object"==typeof self&&self)||n("object"==typeof r.g&&r.g)||function(){return this}()||Function("return this")()},953:(e,t,r)=>{var n=r(5329),a=r(9678),l=n({}.hasOwnProperty);e.exports=Object.hasOwn||function(e,t){return l(a(e),t)}},2840:(e,t,r)=>{var n=r(5746),a=r(5981),l=r(1333);e.exports=!n&&!a((function(){return 7!=Object.defineProperty(l("div"),"a",{get:function(){return 7}}).a}))},7026:(e,t,r)=>{var n=r(5329),a=r(5981),l=r(2532),s=Object,o=n("".split);e.exports=a((function(){return!s("z").propertyIsEnumerable(0)}))?function(e){return"String"==l(e)?o(e,""):s(e)}:s},7475:(e,t,r)=>{var n=r(6616),a=n.all;e.exports=n.IS_HTMLDDA?function(e){return"function"==typeof e||e===a}:function(e){return"function"==typeof e}},7252:(e,t,r)=>{var n=r(5981),a=r(7475),l=/#|\.prototype\./,s=function(e,t){var r=i[o(e)];return r==c||r!=u&&(a(t)?n(t):!!t)},o=s.normalize=function(e){return String(e).replace(l,".").toLowerCase()},i=s.data={},u=s.NATIVE="N",c=s.POLYFILL="P";e.exports=s},2119:e=>{e.exports=function(e){return null==e}},941:(e,t,r)=>{var n=r(7475),a=r(6616),l=a.all;e.exports=a.IS_HTMLDDA?function(e){return"object"==typeof e?null!==e:n(e)||e===l}:function(e){return"object"==typeof e?null!==e:n(e)}},2529:e=>{e.exports=!0},6664:(e,t,r)=>{var n=r(224),a=r(7475),l=r(7046),s=r(2302),o=Object;e.exports=s?function(e){return"symbol"==typeof e}:function(e){var t=n("Symbol");return a(t)&&l(t.prototype,o(e))}},5988:(e,t,r)=>{var n=r(5746),a=r(2840),l=r(3937),s=r(6059),o=r(3894),i=TypeError,u=Object.defineProperty,c=Object.getOwnPropertyDescriptor,d="enumerable",p="configurable",f="writable";t.f=n?l?function(e,t,r){if(s(e),t=o(t),s(r),"function"==typeof e&&"prototype"===t&&"value"in r&&f in r&&!r[f]){var n=c(e,t);n&&n[f]&&(e[t]=r.value,r={configurable:p in r?r[p]:n[p],enumerable:d in r?r[d]:n[d],writable:!1})}return u(e,t,r)}:u:function(e,t,r){if(s(e),t=o(t),s(r),a)try{return u(e,t,r)}catch(e){}if("get"in r||"set"in r)throw i("Accessors not supported");return"value"in r&&(e[t]=r.value),e}},9677:(e,t,r)=>{var n=r(5746),a=r(8834),l=r(6760),s=r(1887),o=r(4529),i=r(3894),u=r(953),c=r(2840),d=Object.getOwnPropertyDescriptor;t.f=n?d:function(e,t){if(e=o(e),t=i(t),c)try{return d(e,t)}catch(e){}if(u(e,t))return s(!a(l.f,e,t),e[t])}},7046:(e,t,r)=>{var n=r(5329);e.exports=n({}.isPrototypeOf)},6760:(e,t)=>{var r={}.propertyIsEnumerable,n=Object.getOwnPropertyDescriptor,a=n&&!r.call({1:2},1);t.f=a?function(e){var t=n(this,e);return!!t&&t.enumerable}:r},9811:(e,t,r)=>{var n=r(8834),a=r(7475),l=r(941),s=TypeError;e.exports=function(e,t){var r,o;if("string"===t&&a(r=e.toString)&&!l(o=n(r,e)))return o;if(a(r=e.valueOf)&&!l(o=n(r,e)))return o;if("string"!==t&&a(r=e.toString)&&!l(o=n(r,e)))return o;throw s("Can't convert object to primitive value")}},4058:e=>{e.exports={}},8219:(e,t,r)=>{var n=r(2119),a=TypeError;e.exports=function(e){if(n(e))throw a("Can't call method on "+e);return e}},3030:(e,t,r)=>{var n=r(1899),a=r(5609),l="__core-js_shared__",s=n[l]||a(l,{});e.exports=s},8726:(e,t,r)=>{var n=r(2529),a=r(3030);(e.exports=function(e,t){return a[e]||(a[e]=void 0!==t?t:{})})("versions",[]).push({version:"3.28.0",mode:n?"pure":"global",copyright:"© 2014-2023 Denis Pushkarev (zloirock.ru)",license:"https://github.com/zloirock/core-js/blob/v3.28.0/LICENSE",source:"https://github.com/zloirock/core-js"})},3405:(e,t,r)=>{var n=r(3385),a=r(5981);e.exports=!!Object.getOwnPropertySymbols&&!a((function(){var e=Symbol();return!String(e)||!(Object(e)instanceof Symbol)||!Symbol.sham&&n&&n<41}))},4529:(e,t,r)=>{var n=r(7026),a=r(8219);e.exports=function(e){return n(a(e))}},9678:(e,t,r)=>{var n=r(8219),a=Object;e.exports=function(e){return a(n(e))}},6935:(e,t,r)=>{var n=r(8834),a=r(941),l=r(6664),s=r(9733),o=r(9811),i=r(9813),u=TypeError,c=i("toPrimitive");e.exports=function(e,t){if(!a(e)||l(e))return e;var r,i=s(e,c);if(i){if(void 0===t&&(t="default"),r=n(i,e,t),!a(r)||l(r))return r;throw u("Can't convert object to primitive value")}return void 0===t&&(t="number"),o(e,t)}},3894:(e,t,r)=>{var n=r(6935),a=r(6664);e.exports=function(e){var t=n(e,"string");return a(t)?t:t+""}},9826:e=>{var t=String;e.exports=function(e){try{return t(e)}catch(e){return"Object"}}},9418:(e,t,r)=>{var n=r(5329),a=0,l=Math.random(),s=n(1..toString);e.exports=function(e){return"Symbol("+(void 0===e?"":e)+")_"+s(++a+l,36)}},2302:(e,t,r)=>{var n=r(3405);e.exports=n&&!Symbol.sham&&"symbol"==typeof Symbol.iterator},3937:(e,t,r)=>{var n=r(5746),a=r(5981);e.exports=n&&a((function(){return 42!=Object.defineProperty((function(){}),"prototype",{value:42,writable:!1}).prototype}))},9813:(e,t,r)=>{var n=r(1899),a=r(8726),l=r(953),s=r(9418),o=r(3405),i=r(2302),u=n.Symbol,c=a("wks"),d=i?u.for||u:u&&u.withoutSetter||s;e.exports=function(e){return l(c,e)||(c[e]=o&&l(u,e)?u[e]:d("Symbol."+e)),c[e]}},6450:(e,t,r)=>{var n=r(6887),a=r(5746),l=r(5988).f;n({target:"Object",stat:!0,forced:Object.defineProperty!==l,sham:!a},{defineProperty:l})},1910:(e,t,r)=>{var n=r(8171);e.exports=n},7698:(e,t,r)=>{var n=r(8764).Buffer;function a(e){return e instanceof n||e instanceof Date||e instanceof RegExp}function l(e){if(e instanceof n){var t=n.alloc?n.alloc(e.length):new n(e.length);return e.copy(t),t}if(e instanceof Date)return new Date(e.getTime());if(e instanceof RegExp)return new RegExp(e);throw new Error("Unexpected situation")}function s(e){var t=[];return e.forEach((function(e,r){"object"==typeof e&&null!==e?Array.isArray(e)?t[r]=s(e):a(e)?t[r]=l(e):t[r]=i({},e):t[r]=e})),t}function o(e,t){return"__proto__"===t?void 0:e[t]}var i=e.exports=function(){if(arguments.length<1||"object"!=typeof arguments[0])return!1;if(arguments.length<2)return arguments[0];var e,t,r=arguments[0];return Array.prototype.slice.call(arguments,1).forEach((function(n){"object"!=typeof n||null===n||Array.isArray(n)||Object.keys(n).forEach((function(u){return t=o(r,u),(e=o(n,u))===r?void 0:"object"!=typeof e||null===e?void(r[u]=e):Array.isArray(e)?void(r[u]=s(e)):a(e)?void(r[u]=l(e)):"object"!=typeof t||null===t||Array.isArray(t)?void(r[u]=i({},e)):void(r[u]=i(t,e))}))})),r}},7187:e=>{var t,r="object"==typeof Reflect?Reflect:null,n=r&&"function"==typeof r.apply?r.apply:function(e,t,r){return Function.prototype.apply.call(e,t,r)};t=r&&"function"==typeof r.ownKeys?r.ownKeys:Object.getOwnPropertySymbols?function(e){return Object.getOwnPropertyNames(e).concat(Object.getOwnPropertySymbols(e))}:function(e){return Object.getOwnPropertyNames(e)};var a=Number.isNaN||function(e){return e!=e};function l(){l.init.call(this)}e.exports=l,e.exports.once=function(e,t){return new Promise((function(r,n){function a(r){e.removeListener(t,l),n(r)}function l(){"function"==typeof e.removeListener&&e.removeListener("error",a),r([].slice.call(arguments))}m(e,t,l,{once:!0}),"error"!==t&&function(e,t,r){"function"==typeof e.on&&m(e,"error",t,r)}(e,a,{once:!0})}))},l.EventEmitter=l,l.prototype._events=void 0,l.prototype._eventsCount=0,l.prototype._maxListeners=void 0;var s=10;function o(e){if("function"!=typeof e)throw new TypeError('The "listener" argument must be of type Function. Received type '+typeof e)}function i(e){return void 0===e._maxListeners?l.defaultMaxListeners:e._maxListeners}function u(e,t,r,n){var a,l,s,u;if(o(r),void 0===(l=e._events)?(l=e._events=Object.create(null),e._eventsCount=0):(void 0!==l.newListener&&(e.emit("newListener",t,r.listener?r.listener:r),l=e._events),s=l[t]),void 0===s)s=l[t]=r,++e._eventsCount;else if("function"==typeof s?s=l[t]=n?[r,s]:[s,r]:n?s.unshift(r):s.push(r),(a=i(e))>0&&s.length>a&&!s.warned){s.warned=!0;var c=new Error("Possible EventEmitter memory leak detected. "+s.length+" "+String(t)+" listeners added. Use emitter.setMaxListeners() to increase limit");c.name="MaxListenersExceededWarning",c.emitter=e,c.type=t,c.count=s.length,u=c,console&&console.warn&&console.warn(u)}return e}function c(){if(!this.fired)return this.target.removeListener(this.type,this.wrapFn),this.fired=!0,0===arguments.length?this.listener.call(this.target):this.listener.apply(this.target,arguments)}function d(e,t,r){var n={fired:!1,wrapFn:void 0,target:e,type:t,listener:r},a=c.bind(n);return a.listener=r,n.wrapFn=a,a}function p(e,t,r){var n=e._events;if(void 0===n)return[];var a=n[t];return void 0===a?[]:"function"==typeof a?r?[a.listener||a]:[a]:r?function(e){for(var t=new Array(e.length),r=0;r<t.length;++r)t[r]=e[r].listener||e[r];return t}(a):h(a,a.length)}function f(e){var t=this._events;if(void 0!==t){var r=t[e];if("function"==typeof r)return 1;if(void 0!==r)return r.length}return 0}function h(e,t){for(var r=new Array(t),n=0;n<t;++n)r[n]=e[n];return r}function m(e,t,r,n){if("function"==typeof e.on)n.once?e.once(t,r):e.on(t,r);else{if("function"!=typeof e.addEventListener)throw new TypeError('The "emitter" argument must be of type EventEmitter. Received type '+typeof e);e.addEventListener(t,(function a(l){n.once&&e.removeEventListener(t,a),r(l)}))}}Object.defineProperty(l,"defaultMaxListeners",{enumerable:!0,get:function(){return s},set:function(e){if("number"!=typeof e||e<0||a(e))throw new RangeError('The value of "defaultMaxListeners" is out of range. It must be a non-negative number. Received '+e+".");s=e}}),l.init=function(){void 0!==this._events&&this._events!==Object.getPrototypeOf(this)._events||(this._events=Object.create(null),this._eventsCount=0),this._maxListeners=this._maxListeners||void 0},l.prototype.setMaxListeners=function(e){if("number"!=typeof e||e<0||a(e))throw new RangeError('The value of "n" is out of range. It must be a non-negative number. Received '+e+".");return this._maxListeners=e,this},l.prototype.getMaxListeners=function(){return i(this)},l.prototype.emit=function(e){for(var t=[],r=1;r<arguments.length;r++)t.push(arguments[r]);var a="error"===e,l=this._events;if(void 0!==l)a=a&&void 0===l.error;else if(!a)return!1;if(a){var s;if(t.length>0&&(s=t[0]),s instanceof Error)throw s;var o=new Error("Unhandled error."+(s?" ("+s.message+")":""));throw o.context=s,o}var i=l[e];if(void 0===i)return!1;if("function"==typeof i)n(i,this,t);else{var u=i.length,c=h(i,u);for(r=0;r<u;++r)n(c[r],this,t)}return!0},l.prototype.addListener=function(e,t){return u(this,e,t,!1)},l.prototype.on=l.prototype.addListener,l.prototype.prependListener=function(e,t){return u(this,e,t,!0)},l.prototype.once=function(e,t){return o(t),this.on(e,d(this,e,t)),this},l.prototype.prependOnceListener=function(e,t){return o(t),this.prependListener(e,d(this,e,t)),this},l.prototype.removeListener=function(e,t){var r,n,a,l,s;if(o(t),void 0===(n=this._events))return this;if(void 0===(r=n[e]))return this;if(r===t||r.listener===t)0==--this._eventsCount?this._events=Object.create(null):(delete n[e],n.removeListener&&this.emit("removeListener",e,r.listener||t));else if("function"!=typeof r){for(a=-1,l=r.length-1;l>=0;l--)if(r[l]===t||r[l].listener===t){s=r[l].listener,a=l;break}if(a<0)return this;0===a?r.shift():function(e,t){for(;t+1<e.length;t++)e[t]=e[t+1];e.pop()}(r,a),1===r.length&&(n[e]=r[0]),void 0!==n.removeListener&&this.emit("removeListener",e,s||t)}return this},l.prototype.off=l.prototype.removeListener,l.prototype.removeAllListeners=function(e){var t,r,n;if(void 0===(r=this._events))return this;if(void 0===r.removeListener)return 0===arguments.length?(this._events=Object.create(null),this._eventsCount=0):void 0!==r[e]&&(0==--this._eventsCount?this._events=Object.create(null):delete r[e]),this;if(0===arguments.length){var a,l=Object.keys(r);for(n=0;n<l.length;++n)"removeListener"!==(a=l[n])&&this.removeAllListeners(a);return this.removeAllListeners("removeListener"),this._events=Object.create(null),this._eventsCount=0,this}if("function"==typeof(t=r[e]))this.removeListener(e,t);else if(void 0!==t)for(n=t.length-1;n>=0;n--)this.removeListener(e,t[n]);return this},l.prototype.listeners=function(e){return p(this,e,!0)},l.prototype.rawListeners=function(e){return p(this,e,!1)},l.listenerCount=function(e,t){return"function"==typeof e.listenerCount?e.listenerCount(t):f.call(e,t)},l.prototype.listenerCount=f,l.prototype.eventNames=function(){return this._eventsCount>0?t(this._events):[]}},5717:e=>{"function"==typeof Object.create?e.exports=function(e,t){t&&(e.super_=t,e.prototype=Object.create(t.prototype,{constructor:{value:e,enumerable:!1,writable:!0,configurable:!0}}))}:e.exports=function(e,t){if(t){e.super_=t;var r=function(){};r.prototype=t.prototype,e.prototype=new r,e.prototype.constructor=e}}},4155:e=>{var t,r,n=e.exports={};function a(){throw new Error("setTimeout has not been defined")}function l(){throw new Error("clearTimeout has not been defined")}function s(e){if(t===setTimeout)return setTimeout(e,0);if((t===a||!t)&&setTimeout)return t=setTimeout,setTimeout(e,0);try{return t(e,0)}catch(r){try{return t.call(null,e,0)}catch(r){return t.call(this,e,0)}}}!function(){try{t="function"==typeof setTimeout?setTimeout:a}catch(e){t=a}try{r="function"==typeof clearTimeout?clearTimeout:l}catch(e){r=l}}();var o,i=[],u=!1,c=-1;function d(){u&&o&&(u=!1,o.length?i=o.concat(i):c=-1,i.length&&p())}function p(){if(!u){var e=s(d);u=!0;for(var t=i.length;t;){for(o=i,i=[];++c<t;)o&&o[c].run();c=-1,t=i.length}o=null,u=!1,function(e){if(r===clearTimeout)return clearTimeout(e);if((r===l||!r)&&clearTimeout)return r=clearTimeout,clearTimeout(e);try{return r(e)}catch(t){try{return r.call(null,e)}catch(t){return r.call(this,e)}}}(e)}}function f(e,t){this.fun=e,this.array=t}function h(){}n.nextTick=function(e){var t=new Array(arguments.length-1);if(arguments.length>1)for(var r=1;r<arguments.length;r++)t[r-1]=arguments[r];i.push(new f(e,t)),1!==i.length||u||s(p)},f.prototype.run=function(){this.fun.apply(null,this.array)},n.title="browser",n.browser=!0,n.env={},n.argv=[],n.version="",n.versions={},n.on=h,n.addListener=h,n.once=h,n.off=h,n.removeListener=h,n.removeAllListeners=h,n.emit=h,n.prependListener=h,n.prependOnceListener=h,n.listeners=function(e){return[]},n.binding=function(e){throw new Error("process.binding is not supported")},n.cwd=function(){return"/"},n.chdir=function(e){throw new Error("process.chdir is not supported")},n.umask=function(){return 0}},1798:(e,t,r)=>{var n=r(4155),a=65536,l=4294967295;var s=r(9509).Buffer,o=r.g.crypto||r.g.msCrypto;o&&o.getRandomValues?e.exports=function(e,t){if(e>l)throw new RangeError("requested too many random bytes");var r=s.allocUnsafe(e);if(e>0)if(e>a)for(var i=0;i<e;i+=a)o.getRandomValues(r.slice(i,i+a));else o.getRandomValues(r);if("function"==typeof t)return n.nextTick((function(){t(null,r)}));return r}:e.exports=function(){throw new Error("Secure random number generation is not supported by this browser.\nUse Chrome, Firefox or Internet Explorer 11")}},4281:e=>{var t={};function r(e,r,n){n||(n=Error);var a=function(e){var t,n;function a(t,n,a){return e.call(this,function(e,t,n){return"string"==typeof r?r:r(e,t,n)}(t,n,a))||this}return n=e,(t=a).prototype=Object.create(n.prototype),t.prototype.constructor=t,t.__proto__=n,a}(n);a.prototype.name=n.name,a.prototype.code=e,t[e]=a}function n(e,t){if(Array.isArray(e)){var r=e.length;return e=e.map((function(e){return String(e)})),r>2?"one of ".concat(t," ").concat(e.slice(0,r-1).join(", "),", or ")+e[r-1]:2===r?"one of ".concat(t," ").concat(e[0]," or ").concat(e[1]):"of ".concat(t," ").concat(e[0])}return"of ".concat(t," ").concat(String(e))}r("ERR_INVALID_OPT_VALUE",(function(e,t){return'The value "'+t+'" is invalid for option "'+e+'"'}),TypeError),r("ERR_INVALID_ARG_TYPE",(function(e,t,r){var a,l,s,o;if("string"==typeof t&&(l="not ",t.substr(!s||s<0?0:+s,l.length)===l)?(a="must not be",t=t.replace(/^not /,"")):a="must be",function(e,t,r){return(void 0===r||r>e.length)&&(r=e.length),e.substring(r-t.length,r)===t}(e," argument"))o="The ".concat(e," ").concat(a," ").concat(n(t,"type"));else{var i=function(e,t,r){return"number"!=typeof r&&(r=0),!(r+t.length>e.length)&&-1!==e.indexOf(t,r)}(e,".")?"property":"argument";o='The "'.concat(e,'" ').concat(i," ").concat(a," ").concat(n(t,"type"))}return o+=". Received type ".concat(typeof r)}),TypeError),r("ERR_STREAM_PUSH_AFTER_EOF","stream.push() after EOF"),r("ERR_METHOD_NOT_IMPLEMENTED",(function(e){return"The "+e+" method is not implemented"})),r("ERR_STREAM_PREMATURE_CLOSE","Premature close"),r("ERR_STREAM_DESTROYED",(function(e){return"Cannot call "+e+" after a stream was destroyed"})),r("ERR_MULTIPLE_CALLBACK","Callback called multiple times"),r("ERR_STREAM_CANNOT_PIPE","Cannot pipe, not readable"),r("ERR_STREAM_WRITE_AFTER_END","write after end"),r("ERR_STREAM_NULL_VALUES","May not write null values to stream",TypeError),r("ERR_UNKNOWN_ENCODING",(function(e){return"Unknown encoding: "+e}),TypeError),r("ERR_STREAM_UNSHIFT_AFTER_END_EVENT","stream.unshift() after end event"),e.exports.q=t},6753:(e,t,r)=>{var n=r(4155),a=Object.keys||function(e){var t=[];for(var r in e)t.push(r);return t};e.exports=i;const l=r(9481),s=r(4229);r(5717)(i,l);{const e=a(s.prototype);for(var o=0;o<e.length;o++){const t=e[o];i.prototype[t]||(i.prototype[t]=s.prototype[t])}}function i(e){if(!(this instanceof i))return new i(e);l.call(this,e),s.call(this,e),this.allowHalfOpen=!0,e&&(!1===e.readable&&(this.readable=!1),!1===e.writable&&(this.writable=!1),!1===e.allowHalfOpen&&(this.allowHalfOpen=!1,this.once("end",u)))}function u(){this._writableState.ended||n.nextTick(c,this)}function c(e){e.end()}Object.defineProperty(i.prototype,"writableHighWaterMark",{enumerable:!1,get(){return this._writableState.highWaterMark}}),Object.defineProperty(i.prototype,"writableBuffer",{enumerable:!1,get:function(){return this._writableState&&this._writableState.getBuffer()}}),Object.defineProperty(i.prototype,"writableLength",{enumerable:!1,get(){return this._writableState.length}}),Object.defineProperty(i.prototype,"destroyed",{enumerable:!1,get(){return void 0!==this._readableState&&void 0!==this._writableState&&(this._readableState.destroyed&&this._writableState.destroyed)},set(e){void 0!==this._readableState&&void 0!==this._writableState&&(this._readableState.destroyed=e,this._writableState.destroyed=e)}})},2725:(e,t,r)=>{e.exports=a;const n=r(4605);function a(e){if(!(this instanceof a))return new a(e);n.call(this,e)}r(5717)(a,n),a.prototype._transform=function(e,t,r){r(null,e)}},9481:(e,t,r)=>{var n,a=r(4155);e.exports=x,x.ReadableState=C;r(7187).EventEmitter;var l=function(e,t){return e.listeners(t).length},s=r(2503);const o=r(8764).Buffer,i=(void 0!==r.g?r.g:"undefined"!=typeof window?window:"undefined"!=typeof self?self:{}).Uint8Array||function(){};const u=r(4616);let c;c=u&&u.debuglog?u.debuglog("stream"):function(){};const d=r(7327),p=r(1195),f=r(2457).getHighWaterMark,h=r(4281).q,m=h.ERR_INVALID_ARG_TYPE,g=h.ERR_STREAM_PUSH_AFTER_EOF,y=h.ERR_METHOD_NOT_IMPLEMENTED,v=h.ERR_STREAM_UNSHIFT_AFTER_END_EVENT;let E,b,S;r(5717)(x,s);const _=p.errorOrDestroy,w=["error","close","destroy","pause","resume"];function C(e,t,a){n=n||r(6753),e=e||{},"boolean"!=typeof a&&(a=t instanceof n),this.objectMode=!!e.objectMode,a&&(this.objectMode=this.objectMode||!!e.readableObjectMode),this.highWaterMark=f(this,e,"readableHighWaterMark",a),this.buffer=new d,this.length=0,this.pipes=null,this.pipesCount=0,this.flowing=null,this.ended=!1,this.endEmitted=!1,this.reading=!1,this.sync=!0,this.needReadable=!1,this.emittedReadable=!1,this.readableListening=!1,this.resumeScheduled=!1,this.paused=!0,this.emitClose=!1!==e.emitClose,this.autoDestroy=!!e.autoDestroy,this.destroyed=!1,this.defaultEncoding=e.defaultEncoding||"utf8",this.awaitDrain=0,this.readingMore=!1,this.decoder=null,this.encoding=null,e.encoding&&(E||(E=r(2553).s),this.decoder=new E(e.encoding),this.encoding=e.encoding)}function x(e){if(n=n||r(6753),!(this instanceof x))return new x(e);const t=this instanceof n;this._readableState=new C(e,this,t),this.readable=!0,e&&("function"==typeof e.read&&(this._read=e.read),"function"==typeof e.destroy&&(this._destroy=e.destroy)),s.call(this)}function A(e,t,r,n,a){c("readableAddChunk",t);var l,s=e._readableState;if(null===t)s.reading=!1,function(e,t){if(c("onEofChunk"),t.ended)return;if(t.decoder){var r=t.decoder.end();r&&r.length&&(t.buffer.push(r),t.length+=t.objectMode?1:r.length)}t.ended=!0,t.sync?T(e):(t.needReadable=!1,t.emittedReadable||(t.emittedReadable=!0,O(e)))}(e,s);else if(a||(l=function(e,t){var r;n=t,o.isBuffer(n)||n instanceof i||"string"==typeof t||void 0===t||e.objectMode||(r=new m("chunk",["string","Buffer","Uint8Array"],t));var n;return r}(s,t)),l)_(e,l);else if(s.objectMode||t&&t.length>0)if("string"==typeof t||s.objectMode||Object.getPrototypeOf(t)===o.prototype||(t=function(e){return o.from(e)}(t)),n)s.endEmitted?_(e,new v):I(e,s,t,!0);else if(s.ended)_(e,new g);else{if(s.destroyed)return!1;s.reading=!1,s.decoder&&!r?(t=s.decoder.write(t),s.objectMode||0!==t.length?I(e,s,t,!1):k(e,s)):I(e,s,t,!1)}else n||(s.reading=!1,k(e,s));return!s.ended&&(s.length<s.highWaterMark||0===s.length)}function I(e,t,r,n){t.flowing&&0===t.length&&!t.sync?(t.awaitDrain=0,e.emit("data",r)):(t.length+=t.objectMode?1:r.length,n?t.buffer.unshift(r):t.buffer.push(r),t.needReadable&&T(e)),k(e,t)}Object.defineProperty(x.prototype,"destroyed",{enumerable:!1,get(){return void 0!==this._readableState&&this._readableState.destroyed},set(e){this._readableState&&(this._readableState.destroyed=e)}}),x.prototype.destroy=p.destroy,x.prototype._undestroy=p.undestroy,x.prototype._destroy=function(e,t){t(e)},x.prototype.push=function(e,t){var r,n=this._readableState;return n.objectMode?r=!0:"string"==typeof e&&((t=t||n.defaultEncoding)!==n.encoding&&(e=o.from(e,t),t=""),r=!0),A(this,e,t,!1,r)},x.prototype.unshift=function(e){return A(this,e,null,!0,!1)},x.prototype.isPaused=function(){return!1===this._readableState.flowing},x.prototype.setEncoding=function(e){E||(E=r(2553).s);const t=new E(e);this._readableState.decoder=t,this._readableState.encoding=this._readableState.decoder.encoding;let n=this._readableState.buffer.head,a="";for(;null!==n;)a+=t.write(n.data),n=n.next;return this._readableState.buffer.clear(),""!==a&&this._readableState.buffer.push(a),this._readableState.length=a.length,this};const R=1073741824;function N(e,t){return e<=0||0===t.length&&t.ended?0:t.objectMode?1:e!=e?t.flowing&&t.length?t.buffer.head.data.length:t.length:(e>t.highWaterMark&&(t.highWaterMark=function(e){return e>=R?e=R:(e--,e|=e>>>1,e|=e>>>2,e|=e>>>4,e|=e>>>8,e|=e>>>16,e++),e}(e)),e<=t.length?e:t.ended?t.length:(t.needReadable=!0,0))}function T(e){var t=e._readableState;c("emitReadable",t.needReadable,t.emittedReadable),t.needReadable=!1,t.emittedReadable||(c("emitReadable",t.flowing),t.emittedReadable=!0,a.nextTick(O,e))}function O(e){var t=e._readableState;c("emitReadable_",t.destroyed,t.length,t.ended),t.destroyed||!t.length&&!t.ended||(e.emit("readable"),t.emittedReadable=!1),t.needReadable=!t.flowing&&!t.ended&&t.length<=t.highWaterMark,q(e)}function k(e,t){t.readingMore||(t.readingMore=!0,a.nextTick(M,e,t))}function M(e,t){for(;!t.reading&&!t.ended&&(t.length<t.highWaterMark||t.flowing&&0===t.length);){const r=t.length;if(c("maybeReadMore read 0"),e.read(0),r===t.length)break}t.readingMore=!1}function P(e){const t=e._readableState;t.readableListening=e.listenerCount("readable")>0,t.resumeScheduled&&!t.paused?t.flowing=!0:e.listenerCount("data")>0&&e.resume()}function j(e){c("readable nexttick read 0"),e.read(0)}function L(e,t){c("resume",t.reading),t.reading||e.read(0),t.resumeScheduled=!1,e.emit("resume"),q(e),t.flowing&&!t.reading&&e.read(0)}function q(e){const t=e._readableState;for(c("flow",t.flowing);t.flowing&&null!==e.read(););}function B(e,t){return 0===t.length?null:(t.objectMode?r=t.buffer.shift():!e||e>=t.length?(r=t.decoder?t.buffer.join(""):1===t.buffer.length?t.buffer.first():t.buffer.concat(t.length),t.buffer.clear()):r=t.buffer.consume(e,t.decoder),r);var r}function D(e){var t=e._readableState;c("endReadable",t.endEmitted),t.endEmitted||(t.ended=!0,a.nextTick(U,t,e))}function U(e,t){if(c("endReadableNT",e.endEmitted,e.length),!e.endEmitted&&0===e.length&&(e.endEmitted=!0,t.readable=!1,t.emit("end"),e.autoDestroy)){const e=t._writableState;(!e||e.autoDestroy&&e.finished)&&t.destroy()}}function V(e,t){for(var r=0,n=e.length;r<n;r++)if(e[r]===t)return r;return-1}x.prototype.read=function(e){c("read",e),e=parseInt(e,10);var t=this._readableState,r=e;if(0!==e&&(t.emittedReadable=!1),0===e&&t.needReadable&&((0!==t.highWaterMark?t.length>=t.highWaterMark:t.length>0)||t.ended))return c("read: emitReadable",t.length,t.ended),0===t.length&&t.ended?D(this):T(this),null;if(0===(e=N(e,t))&&t.ended)return 0===t.length&&D(this),null;var n,a=t.needReadable;return c("need readable",a),(0===t.length||t.length-e<t.highWaterMark)&&c("length less than watermark",a=!0),t.ended||t.reading?c("reading or ended",a=!1):a&&(c("do read"),t.reading=!0,t.sync=!0,0===t.length&&(t.needReadable=!0),this._read(t.highWaterMark),t.sync=!1,t.reading||(e=N(r,t))),null===(n=e>0?B(e,t):null)?(t.needReadable=t.length<=t.highWaterMark,e=0):(t.length-=e,t.awaitDrain=0),0===t.length&&(t.ended||(t.needReadable=!0),r!==e&&t.ended&&D(this)),null!==n&&this.emit("data",n),n},x.prototype._read=function(e){_(this,new y("_read()"))},x.prototype.pipe=function(e,t){var r=this,n=this._readableState;switch(n.pipesCount){case 0:n.pipes=e;break;case 1:n.pipes=[n.pipes,e];break;default:n.pipes.push(e)}n.pipesCount+=1,c("pipe count=%d opts=%j",n.pipesCount,t);var s=(!t||!1!==t.end)&&e!==a.stdout&&e!==a.stderr?i:g;function o(t,a){c("onunpipe"),t===r&&a&&!1===a.hasUnpiped&&(a.hasUnpiped=!0,c("cleanup"),e.removeListener("close",h),e.removeListener("finish",m),e.removeListener("drain",u),e.removeListener("error",f),e.removeListener("unpipe",o),r.removeListener("end",i),r.removeListener("end",g),r.removeListener("data",p),d=!0,!n.awaitDrain||e._writableState&&!e._writableState.needDrain||u())}function i(){c("onend"),e.end()}n.endEmitted?a.nextTick(s):r.once("end",s),e.on("unpipe",o);var u=function(e){return function(){var t=e._readableState;c("pipeOnDrain",t.awaitDrain),t.awaitDrain&&t.awaitDrain--,0===t.awaitDrain&&l(e,"data")&&(t.flowing=!0,q(e))}}(r);e.on("drain",u);var d=!1;function p(t){c("ondata");var a=e.write(t);c("dest.write",a),!1===a&&((1===n.pipesCount&&n.pipes===e||n.pipesCount>1&&-1!==V(n.pipes,e))&&!d&&(c("false write response, pause",n.awaitDrain),n.awaitDrain++),r.pause())}function f(t){c("onerror",t),g(),e.removeListener("error",f),0===l(e,"error")&&_(e,t)}function h(){e.removeListener("finish",m),g()}function m(){c("onfinish"),e.removeListener("close",h),g()}function g(){c("unpipe"),r.unpipe(e)}return r.on("data",p),function(e,t,r){if("function"==typeof e.prependListener)return e.prependListener(t,r);e._events&&e._events[t]?Array.isArray(e._events[t])?e._events[t].unshift(r):e._events[t]=[r,e._events[t]]:e.on(t,r)}(e,"error",f),e.once("close",h),e.once("finish",m),e.emit("pipe",r),n.flowing||(c("pipe resume"),r.resume()),e},x.prototype.unpipe=function(e){var t=this._readableState,r={hasUnpiped:!1};if(0===t.pipesCount)return this;if(1===t.pipesCount)return e&&e!==t.pipes||(e||(e=t.pipes),t.pipes=null,t.pipesCount=0,t.flowing=!1,e&&e.emit("unpipe",this,r)),this;if(!e){var n=t.pipes,a=t.pipesCount;t.pipes=null,t.pipesCount=0,t.flowing=!1;for(var l=0;l<a;l++)n[l].emit("unpipe",this,{hasUnpiped:!1});return this}var s=V(t.pipes,e);return-1===s||(t.pipes.splice(s,1),t.pipesCount-=1,1===t.pipesCount&&(t.pipes=t.pipes[0]),e.emit("unpipe",this,r)),this},x.prototype.on=function(e,t){const r=s.prototype.on.call(this,e,t),n=this._readableState;return"data"===e?(n.readableListening=this.listenerCount("readable")>0,!1!==n.flowing&&this.resume()):"readable"===e&&(n.endEmitted||n.readableListening||(n.readableListening=n.needReadable=!0,n.flowing=!1,n.emittedReadable=!1,c("on readable",n.length,n.reading),n.length?T(this):n.reading||a.nextTick(j,this))),r},x.prototype.addListener=x.prototype.on,x.prototype.removeListener=function(e,t){const r=s.prototype.removeListener.call(this,e,t);return"readable"===e&&a.nextTick(P,this),r},x.prototype.removeAllListeners=function(e){const t=s.prototype.removeAllListeners.apply(this,arguments);return"readable"!==e&&void 0!==e||a.nextTick(P,this),t},x.prototype.resume=function(){var e=this._readableState;return e.flowing||(c("resume"),e.flowing=!e.readableListening,function(e,t){t.resumeScheduled||(t.resumeScheduled=!0,a.nextTick(L,e,t))}(this,e)),e.paused=!1,this},x.prototype.pause=function(){return c("call pause flowing=%j",this._readableState.flowing),!1!==this._readableState.flowing&&(c("pause"),this._readableState.flowing=!1,this.emit("pause")),this._readableState.paused=!0,this},x.prototype.wrap=function(e){var t=this._readableState,r=!1;for(var n in e.on("end",(()=>{if(c("wrapped end"),t.decoder&&!t.ended){var e=t.decoder.end();e&&e.length&&this.push(e)}this.push(null)})),e.on("data",(n=>{(c("wrapped data"),t.decoder&&(n=t.decoder.write(n)),t.objectMode&&null==n)||(t.objectMode||n&&n.length)&&(this.push(n)||(r=!0,e.pause()))})),e)void 0===this[n]&&"function"==typeof e[n]&&(this[n]=function(t){return function(){return e[t].apply(e,arguments)}}(n));for(var a=0;a<w.length;a++)e.on(w[a],this.emit.bind(this,w[a]));return this._read=t=>{c("wrapped _read",t),r&&(r=!1,e.resume())},this},"function"==typeof Symbol&&(x.prototype[Symbol.asyncIterator]=function(){return void 0===b&&(b=r(5850)),b(this)}),Object.defineProperty(x.prototype,"readableHighWaterMark",{enumerable:!1,get:function(){return this._readableState.highWaterMark}}),Object.defineProperty(x.prototype,"readableBuffer",{enumerable:!1,get:function(){return this._readableState&&this._readableState.buffer}}),Object.defineProperty(x.prototype,"readableFlowing",{enumerable:!1,get:function(){return this._readableState.flowing},set:function(e){this._readableState&&(this._readableState.flowing=e)}}),x._fromList=B,Object.defineProperty(x.prototype,"readableLength",{enumerable:!1,get(){return this._readableState.length}}),"function"==typeof Symbol&&(x.from=function(e,t){return void 0===S&&(S=r(5167)),S(x,e,t)})},4605:(e,t,r)=>{e.exports=c;const n=r(4281).q,a=n.ERR_METHOD_NOT_IMPLEMENTED,l=n.ERR_MULTIPLE_CALLBACK,s=n.ERR_TRANSFORM_ALREADY_TRANSFORMING,o=n.ERR_TRANSFORM_WITH_LENGTH_0,i=r(6753);function u(e,t){var r=this._transformState;r.transforming=!1;var n=r.writecb;if(null===n)return this.emit("error",new l);r.writechunk=null,r.writecb=null,null!=t&&this.push(t),n(e);var a=this._readableState;a.reading=!1,(a.needReadable||a.length<a.highWaterMark)&&this._read(a.highWaterMark)}function c(e){if(!(this instanceof c))return new c(e);i.call(this,e),this._transformState={afterTransform:u.bind(this),needTransform:!1,transforming:!1,writecb:null,writechunk:null,writeencoding:null},this._readableState.needReadable=!0,this._readableState.sync=!1,e&&("function"==typeof e.transform&&(this._transform=e.transform),"function"==typeof e.flush&&(this._flush=e.flush)),this.on("prefinish",d)}function d(){"function"!=typeof this._flush||this._readableState.destroyed?p(this,null,null):this._flush(((e,t)=>{p(this,e,t)}))}function p(e,t,r){if(t)return e.emit("error",t);if(null!=r&&e.push(r),e._writableState.length)throw new o;if(e._transformState.transforming)throw new s;return e.push(null)}r(5717)(c,i),c.prototype.push=function(e,t){return this._transformState.needTransform=!1,i.prototype.push.call(this,e,t)},c.prototype._transform=function(e,t,r){r(new a("_transform()"))},c.prototype._write=function(e,t,r){var n=this._transformState;if(n.writecb=r,n.writechunk=e,n.writeencoding=t,!n.transforming){var a=this._readableState;(n.needTransform||a.needReadable||a.length<a.highWaterMark)&&this._read(a.highWaterMark)}},c.prototype._read=function(e){var t=this._transformState;null===t.writechunk||t.transforming?t.needTransform=!0:(t.transforming=!0,this._transform(t.writechunk,t.writeencoding,t.afterTransform))},c.prototype._destroy=function(e,t){i.prototype._destroy.call(this,e,(e=>{t(e)}))}},4229:(e,t,r)=>{var n,a=r(4155);function l(e){this.next=null,this.entry=null,this.finish=()=>{!function(e,t,r){var n=e.entry;e.entry=null;for(;n;){var a=n.callback;t.pendingcb--,a(r),n=n.next}t.corkedRequestsFree.next=e}(this,e)}}e.exports=x,x.WritableState=w;const s={deprecate:r(4927)};var o=r(2503);const i=r(8764).Buffer,u=(void 0!==r.g?r.g:"undefined"!=typeof window?window:"undefined"!=typeof self?self:{}).Uint8Array||function(){};const c=r(1195),d=r(2457).getHighWaterMark,p=r(4281).q,f=p.ERR_INVALID_ARG_TYPE,h=p.ERR_METHOD_NOT_IMPLEMENTED,m=p.ERR_MULTIPLE_CALLBACK,g=p.ERR_STREAM_CANNOT_PIPE,y=p.ERR_STREAM_DESTROYED,v=p.ERR_STREAM_NULL_VALUES,E=p.ERR_STREAM_WRITE_AFTER_END,b=p.ERR_UNKNOWN_ENCODING,S=c.errorOrDestroy;function _(){}function w(e,t,s){n=n||r(6753),e=e||{},"boolean"!=typeof s&&(s=t instanceof n),this.objectMode=!!e.objectMode,s&&(this.objectMode=this.objectMode||!!e.writableObjectMode),this.highWaterMark=d(this,e,"writableHighWaterMark",s),this.finalCalled=!1,this.needDrain=!1,this.ending=!1,this.ended=!1,this.finished=!1,this.destroyed=!1;var o=!1===e.decodeStrings;this.decodeStrings=!o,this.defaultEncoding=e.defaultEncoding||"utf8",this.length=0,this.writing=!1,this.corked=0,this.sync=!0,this.bufferProcessing=!1,this.onwrite=function(e){!function(e,t){var r=e._writableState,n=r.sync,l=r.writecb;if("function"!=typeof l)throw new m;if(function(e){e.writing=!1,e.writecb=null,e.length-=e.writelen,e.writelen=0}(r),t)!function(e,t,r,n,l){--t.pendingcb,r?(a.nextTick(l,n),a.nextTick(O,e,t),e._writableState.errorEmitted=!0,S(e,n)):(l(n),e._writableState.errorEmitted=!0,S(e,n),O(e,t))}(e,r,n,t,l);else{var s=N(r)||e.destroyed;s||r.corked||r.bufferProcessing||!r.bufferedRequest||R(e,r),n?a.nextTick(I,e,r,s,l):I(e,r,s,l)}}(t,e)},this.writecb=null,this.writelen=0,this.bufferedRequest=null,this.lastBufferedRequest=null,this.pendingcb=0,this.prefinished=!1,this.errorEmitted=!1,this.emitClose=!1!==e.emitClose,this.autoDestroy=!!e.autoDestroy,this.bufferedRequestCount=0,this.corkedRequestsFree=new l(this)}var C;function x(e){const t=this instanceof(n=n||r(6753));if(!t&&!C.call(x,this))return new x(e);this._writableState=new w(e,this,t),this.writable=!0,e&&("function"==typeof e.write&&(this._write=e.write),"function"==typeof e.writev&&(this._writev=e.writev),"function"==typeof e.destroy&&(this._destroy=e.destroy),"function"==typeof e.final&&(this._final=e.final)),o.call(this)}function A(e,t,r,n,a,l,s){t.writelen=n,t.writecb=s,t.writing=!0,t.sync=!0,t.destroyed?t.onwrite(new y("write")):r?e._writev(a,t.onwrite):e._write(a,l,t.onwrite),t.sync=!1}function I(e,t,r,n){r||function(e,t){0===t.length&&t.needDrain&&(t.needDrain=!1,e.emit("drain"))}(e,t),t.pendingcb--,n(),O(e,t)}function R(e,t){t.bufferProcessing=!0;var r=t.bufferedRequest;if(e._writev&&r&&r.next){var n=t.bufferedRequestCount,a=new Array(n),s=t.corkedRequestsFree;s.entry=r;for(var o=0,i=!0;r;)a[o]=r,r.isBuf||(i=!1),r=r.next,o+=1;a.allBuffers=i,A(e,t,!0,t.length,a,"",s.finish),t.pendingcb++,t.lastBufferedRequest=null,s.next?(t.corkedRequestsFree=s.next,s.next=null):t.corkedRequestsFree=new l(t),t.bufferedRequestCount=0}else{for(;r;){var u=r.chunk,c=r.encoding,d=r.callback;if(A(e,t,!1,t.objectMode?1:u.length,u,c,d),r=r.next,t.bufferedRequestCount--,t.writing)break}null===r&&(t.lastBufferedRequest=null)}t.bufferedRequest=r,t.bufferProcessing=!1}function N(e){return e.ending&&0===e.length&&null===e.bufferedRequest&&!e.finished&&!e.writing}function T(e,t){e._final((r=>{t.pendingcb--,r&&S(e,r),t.prefinished=!0,e.emit("prefinish"),O(e,t)}))}function O(e,t){var r=N(t);if(r&&(function(e,t){t.prefinished||t.finalCalled||("function"!=typeof e._final||t.destroyed?(t.prefinished=!0,e.emit("prefinish")):(t.pendingcb++,t.finalCalled=!0,a.nextTick(T,e,t)))}(e,t),0===t.pendingcb&&(t.finished=!0,e.emit("finish"),t.autoDestroy))){const t=e._readableState;(!t||t.autoDestroy&&t.endEmitted)&&e.destroy()}return r}r(5717)(x,o),w.prototype.getBuffer=function(){for(var e=this.bufferedRequest,t=[];e;)t.push(e),e=e.next;return t},function(){try{Object.defineProperty(w.prototype,"buffer",{get:s.deprecate((function(){return this.getBuffer()}),"_writableState.buffer is deprecated. Use _writableState.getBuffer instead.","DEP0003")})}catch(e){}}(),"function"==typeof Symbol&&Symbol.hasInstance&&"function"==typeof Function.prototype[Symbol.hasInstance]?(C=Function.prototype[Symbol.hasInstance],Object.defineProperty(x,Symbol.hasInstance,{value:function(e){return!!C.call(this,e)||this===x&&(e&&e._writableState instanceof w)}})):C=function(e){return e instanceof this},x.prototype.pipe=function(){S(this,new g)},x.prototype.write=function(e,t,r){var n,l=this._writableState,s=!1,o=!l.objectMode&&(n=e,i.isBuffer(n)||n instanceof u);return o&&!i.isBuffer(e)&&(e=function(e){return i.from(e)}(e)),"function"==typeof t&&(r=t,t=null),o?t="buffer":t||(t=l.defaultEncoding),"function"!=typeof r&&(r=_),l.ending?function(e,t){var r=new E;S(e,r),a.nextTick(t,r)}(this,r):(o||function(e,t,r,n){var l;return null===r?l=new v:"string"==typeof r||t.objectMode||(l=new f("chunk",["string","Buffer"],r)),!l||(S(e,l),a.nextTick(n,l),!1)}(this,l,e,r))&&(l.pendingcb++,s=function(e,t,r,n,a,l){if(!r){var s=function(e,t,r){e.objectMode||!1===e.decodeStrings||"string"!=typeof t||(t=i.from(t,r));return t}(t,n,a);n!==s&&(r=!0,a="buffer",n=s)}var o=t.objectMode?1:n.length;t.length+=o;var u=t.length<t.highWaterMark;u||(t.needDrain=!0);if(t.writing||t.corked){var c=t.lastBufferedRequest;t.lastBufferedRequest={chunk:n,encoding:a,isBuf:r,callback:l,next:null},c?c.next=t.lastBufferedRequest:t.bufferedRequest=t.lastBufferedRequest,t.bufferedRequestCount+=1}else A(e,t,!1,o,n,a,l);return u}(this,l,o,e,t,r)),s},x.prototype.cork=function(){this._writableState.corked++},x.prototype.uncork=function(){var e=this._writableState;e.corked&&(e.corked--,e.writing||e.corked||e.bufferProcessing||!e.bufferedRequest||R(this,e))},x.prototype.setDefaultEncoding=function(e){if("string"==typeof e&&(e=e.toLowerCase()),!(["hex","utf8","utf-8","ascii","binary","base64","ucs2","ucs-2","utf16le","utf-16le","raw"].indexOf((e+"").toLowerCase())>-1))throw new b(e);return this._writableState.defaultEncoding=e,this},Object.defineProperty(x.prototype,"writableBuffer",{enumerable:!1,get:function(){return this._writableState&&this._writableState.getBuffer()}}),Object.defineProperty(x.prototype,"writableHighWaterMark",{enumerable:!1,get:function(){return this._writableState.highWaterMark}}),x.prototype._write=function(e,t,r){r(new h("_write()"))},x.prototype._writev=null,x.prototype.end=function(e,t,r){var n=this._writableState;return"function"==typeof e?(r=e,e=null,t=null):"function"==typeof t&&(r=t,t=null),null!=e&&this.write(e,t),n.corked&&(n.corked=1,this.uncork()),n.ending||function(e,t,r){t.ending=!0,O(e,t),r&&(t.finished?a.nextTick(r):e.once("finish",r));t.ended=!0,e.writable=!1}(this,n,r),this},Object.defineProperty(x.prototype,"writableLength",{enumerable:!1,get(){return this._writableState.length}}),Object.defineProperty(x.prototype,"destroyed",{enumerable:!1,get(){return void 0!==this._writableState&&this._writableState.destroyed},set(e){this._writableState&&(this._writableState.destroyed=e)}}),x.prototype.destroy=c.destroy,x.prototype._undestroy=c.undestroy,x.prototype._destroy=function(e,t){t(e)}},5850:(e,t,r)=>{var n=r(4155);const a=r(8610),l=Symbol("lastResolve"),s=Symbol("lastReject"),o=Symbol("error"),i=Symbol("ended"),u=Symbol("lastPromise"),c=Symbol("handlePromise"),d=Symbol("stream");function p(e,t){return{value:e,done:t}}function f(e){const t=e[l];if(null!==t){const r=e[d].read();null!==r&&(e[u]=null,e[l]=null,e[s]=null,t(p(r,!1)))}}function h(e){n.nextTick(f,e)}const m=Object.getPrototypeOf((function(){})),g=Object.setPrototypeOf({get stream(){return this[d]},next(){const e=this[o];if(null!==e)return Promise.reject(e);if(this[i])return Promise.resolve(p(void 0,!0));if(this[d].destroyed)return new Promise(((e,t)=>{n.nextTick((()=>{this[o]?t(this[o]):e(p(void 0,!0))}))}));const t=this[u];let r;if(t)r=new Promise(function(e,t){return(r,n)=>{e.then((()=>{t[i]?r(p(void 0,!0)):t[c](r,n)}),n)}}(t,this));else{const e=this[d].read();if(null!==e)return Promise.resolve(p(e,!1));r=new Promise(this[c])}return this[u]=r,r},[Symbol.asyncIterator](){return this},return(){return new Promise(((e,t)=>{this[d].destroy(null,(r=>{r?t(r):e(p(void 0,!0))}))}))}},m);e.exports=e=>{const t=Object.create(g,{[d]:{value:e,writable:!0},[l]:{value:null,writable:!0},[s]:{value:null,writable:!0},[o]:{value:null,writable:!0},[i]:{value:e._readableState.endEmitted,writable:!0},[c]:{value:(e,r)=>{const n=t[d].read();n?(t[u]=null,t[l]=null,t[s]=null,e(p(n,!1))):(t[l]=e,t[s]=r)},writable:!0}});return t[u]=null,a(e,(e=>{if(e&&"ERR_STREAM_PREMATURE_CLOSE"!==e.code){const r=t[s];return null!==r&&(t[u]=null,t[l]=null,t[s]=null,r(e)),void(t[o]=e)}const r=t[l];null!==r&&(t[u]=null,t[l]=null,t[s]=null,r(p(void 0,!0))),t[i]=!0})),e.on("readable",h.bind(null,t)),t}},7327:(e,t,r)=>{function n(e,t){var r=Object.keys(e);if(Object.getOwnPropertySymbols){var n=Object.getOwnPropertySymbols(e);t&&(n=n.filter((function(t){return Object.getOwnPropertyDescriptor(e,t).enumerable}))),r.push.apply(r,n)}return r}function a(e){for(var t=1;t<arguments.length;t++){var r=null!=arguments[t]?arguments[t]:{};t%2?n(Object(r),!0).forEach((function(t){l(e,t,r[t])})):Object.getOwnPropertyDescriptors?Object.defineProperties(e,Object.getOwnPropertyDescriptors(r)):n(Object(r)).forEach((function(t){Object.defineProperty(e,t,Object.getOwnPropertyDescriptor(r,t))}))}return e}function l(e,t,r){return(t=function(e){var t=function(e,t){if("object"!=typeof e||null===e)return e;var r=e[Symbol.toPrimitive];if(void 0!==r){var n=r.call(e,t||"default");if("object"!=typeof n)return n;throw new TypeError("@@toPrimitive must return a primitive value.")}return("string"===t?String:Number)(e)}(e,"string");return"symbol"==typeof t?t:String(t)}(t))in e?Object.defineProperty(e,t,{value:r,enumerable:!0,configurable:!0,writable:!0}):e[t]=r,e}const s=r(8764).Buffer,o=r(2361).inspect,i=o&&o.custom||"inspect";e.exports=class{constructor(){this.head=null,this.tail=null,this.length=0}push(e){const t={data:e,next:null};this.length>0?this.tail.next=t:this.head=t,this.tail=t,++this.length}unshift(e){const t={data:e,next:this.head};0===this.length&&(this.tail=t),this.head=t,++this.length}shift(){if(0===this.length)return;const e=this.head.data;return 1===this.length?this.head=this.tail=null:this.head=this.head.next,--this.length,e}clear(){this.head=this.tail=null,this.length=0}join(e){if(0===this.length)return"";for(var t=this.head,r=""+t.data;t=t.next;)r+=e+t.data;return r}concat(e){if(0===this.length)return s.alloc(0);const t=s.allocUnsafe(e>>>0);for(var r,n,a,l=this.head,o=0;l;)r=l.data,n=t,a=o,s.prototype.copy.call(r,n,a),o+=l.data.length,l=l.next;return t}consume(e,t){var r;return e<this.head.data.length?(r=this.head.data.slice(0,e),this.head.data=this.head.data.slice(e)):r=e===this.head.data.length?this.shift():t?this._getString(e):this._getBuffer(e),r}first(){return this.head.data}_getString(e){var t=this.head,r=1,n=t.data;for(e-=n.length;t=t.next;){const a=t.data,l=e>a.length?a.length:e;if(l===a.length?n+=a:n+=a.slice(0,e),0===(e-=l)){l===a.length?(++r,t.next?this.head=t.next:this.head=this.tail=null):(this.head=t,t.data=a.slice(l));break}++r}return this.length-=r,n}_getBuffer(e){const t=s.allocUnsafe(e);var r=this.head,n=1;for(r.data.copy(t),e-=r.data.length;r=r.next;){const a=r.data,l=e>a.length?a.length:e;if(a.copy(t,t.length-e,0,l),0===(e-=l)){l===a.length?(++n,r.next?this.head=r.next:this.head=this.tail=null):(this.head=r,r.data=a.slice(l));break}++n}return this.length-=n,t}[i](e,t){return o(this,a(a({},t),{},{depth:0,customInspect:!1}))}}},1195:(e,t,r)=>{var n=r(4155);function a(e,t){s(e,t),l(e)}function l(e){e._writableState&&!e._writableState.emitClose||e._readableState&&!e._readableState.emitClose||e.emit("close")}function s(e,t){e.emit("error",t)}e.exports={destroy:function(e,t){const r=this._readableState&&this._readableState.destroyed,o=this._writableState&&this._writableState.destroyed;return r||o?(t?t(e):e&&(this._writableState?this._writableState.errorEmitted||(this._writableState.errorEmitted=!0,n.nextTick(s,this,e)):n.nextTick(s,this,e)),this):(this._readableState&&(this._readableState.destroyed=!0),this._writableState&&(this._writableState.destroyed=!0),this._destroy(e||null,(e=>{!t&&e?this._writableState?this._writableState.errorEmitted?n.nextTick(l,this):(this._writableState.errorEmitted=!0,n.nextTick(a,this,e)):n.nextTick(a,this,e):t?(n.nextTick(l,this),t(e)):n.nextTick(l,this)})),this)},undestroy:function(){this._readableState&&(this._readableState.destroyed=!1,this._readableState.reading=!1,this._readableState.ended=!1,this._readableState.endEmitted=!1),this._writableState&&(this._writableState.destroyed=!1,this._writableState.ended=!1,this._writableState.ending=!1,this._writableState.finalCalled=!1,this._writableState.prefinished=!1,this._writableState.finished=!1,this._writableState.errorEmitted=!1)},errorOrDestroy:function(e,t){const r=e._readableState,n=e._writableState;r&&r.autoDestroy||n&&n.autoDestroy?e.destroy(t):e.emit("error",t)}}},8610:(e,t,r)=>{const n=r(4281).q.ERR_STREAM_PREMATURE_CLOSE;function a(){}e.exports=function e(t,r,l){if("function"==typeof r)return e(t,null,r);r||(r={}),l=function(e){let t=!1;return function(){if(!t){t=!0;for(var r=arguments.length,n=new Array(r),a=0;a<r;a++)n[a]=arguments[a];e.apply(this,n)}}}(l||a);let s=r.readable||!1!==r.readable&&t.readable,o=r.writable||!1!==r.writable&&t.writable;const i=()=>{t.writable||c()};var u=t._writableState&&t._writableState.finished;const c=()=>{o=!1,u=!0,s||l.call(t)};var d=t._readableState&&t._readableState.endEmitted;const p=()=>{s=!1,d=!0,o||l.call(t)},f=e=>{l.call(t,e)},h=()=>{let e;return s&&!d?(t._readableState&&t._readableState.ended||(e=new n),l.call(t,e)):o&&!u?(t._writableState&&t._writableState.ended||(e=new n),l.call(t,e)):void 0},m=()=>{t.req.on("finish",c)};return!function(e){return e.setHeader&&"function"==typeof e.abort}(t)?o&&!t._writableState&&(t.on("end",i),t.on("close",i)):(t.on("complete",c),t.on("abort",h),t.req?m():t.on("request",m)),t.on("end",p),t.on("finish",c),!1!==r.error&&t.on("error",f),t.on("close",h),function(){t.removeListener("complete",c),t.removeListener("abort",h),t.removeListener("request",m),t.req&&t.req.removeListener("finish",c),t.removeListener("end",i),t.removeListener("close",i),t.removeListener("finish",c),t.removeListener("end",p),t.removeListener("error",f),t.removeListener("close",h)}}},5167:e=>{e.exports=function(){throw new Error("Readable.from is not available in the browser")}},9946:(e,t,r)=>{let n;const a=r(4281).q,l=a.ERR_MISSING_ARGS,s=a.ERR_STREAM_DESTROYED;function o(e){if(e)throw e}function i(e){e()}function u(e,t){return e.pipe(t)}e.exports=function(){for(var e=arguments.length,t=new Array(e),a=0;a<e;a++)t[a]=arguments[a];const c=function(e){return e.length?"function"!=typeof e[e.length-1]?o:e.pop():o}(t);if(Array.isArray(t[0])&&(t=t[0]),t.length<2)throw new l("streams");let d;const p=t.map((function(e,a){const l=a<t.length-1;return function(e,t,a,l){l=function(e){let t=!1;return function(){t||(t=!0,e(...arguments))}}(l);let o=!1;e.on("close",(()=>{o=!0})),void 0===n&&(n=r(8610)),n(e,{readable:t,writable:a},(e=>{if(e)return l(e);o=!0,l()}));let i=!1;return t=>{if(!o&&!i)return i=!0,function(e){return e.setHeader&&"function"==typeof e.abort}(e)?e.abort():"function"==typeof e.destroy?e.destroy():void l(t||new s("pipe"))}}(e,l,a>0,(function(e){d||(d=e),e&&p.forEach(i),l||(p.forEach(i),c(d))}))}));return t.reduce(u)}},2457:(e,t,r)=>{const n=r(4281).q.ERR_INVALID_OPT_VALUE;e.exports={getHighWaterMark:function(e,t,r,a){const l=function(e,t,r){return null!=e.highWaterMark?e.highWaterMark:t?e[r]:null}(t,a,r);if(null!=l){if(!isFinite(l)||Math.floor(l)!==l||l<0){throw new n(a?r:"highWaterMark",l)}return Math.floor(l)}return e.objectMode?16:16384}}},2503:(e,t,r)=>{e.exports=r(7187).EventEmitter},9509:(e,t,r)=>{var n=r(8764),a=n.Buffer;function l(e,t){for(var r in e)t[r]=e[r]}function s(e,t,r){return a(e,t,r)}a.from&&a.alloc&&a.allocUnsafe&&a.allocUnsafeSlow?e.exports=n:(l(n,t),t.Buffer=s),s.prototype=Object.create(a.prototype),l(a,s),s.from=function(e,t,r){if("number"==typeof e)throw new TypeError("Argument must not be a number");return a(e,t,r)},s.alloc=function(e,t,r){if("number"!=typeof e)throw new TypeError("Argument must be a number");var n=a(e);return void 0!==t?"string"==typeof r?n.fill(t,r):n.fill(t):n.fill(0),n},s.allocUnsafe=function(e){if("number"!=typeof e)throw new TypeError("Argument must be a number");return a(e)},s.allocUnsafeSlow=function(e){if("number"!=typeof e)throw new TypeError("Argument must be a number");return n.SlowBuffer(e)}},4189:(e,t,r)=>{var n=r(9509).Buffer;function a(e,t){this._block=n.alloc(e),this._finalSize=t,this._blockSize=e,this._len=0}a.prototype.update=function(e,t){"string"==typeof e&&(t=t||"utf8",e=n.from(e,t));for(var r=this._block,a=this._blockSize,l=e.length,s=this._len,o=0;o<l;){for(var i=s%a,u=Math.min(l-o,a-i),c=0;c<u;c++)r[i+c]=e[o+c];o+=u,(s+=u)%a==0&&this._update(r)}return this._len+=l,this},a.prototype.digest=function(e){var t=this._len%this._blockSize;this._block[t]=128,this._block.fill(0,t+1),t>=this._finalSize&&(this._update(this._block),this._block.fill(0));var r=8*this._len;if(r<=4294967295)this._block.writeUInt32BE(r,this._blockSize-4);else{var n=(4294967295&r)>>>0,a=(r-n)/4294967296;this._block.writeUInt32BE(a,this._blockSize-8),this._block.writeUInt32BE(n,this._blockSize-4)}this._update(this._block);var l=this._hash();return e?l.toString(e):l},a.prototype._update=function(){throw new Error("_update must be implemented by subclass")},e.exports=a},9072:(e,t,r)=>{var n=e.exports=function(e){e=e.toLowerCase();var t=n[e];if(!t)throw new Error(e+" is not supported (we accept pull requests)");return new t};n.sha=r(4448),n.sha1=r(8336),n.sha224=r(8432),n.sha256=r(7499),n.sha384=r(1686),n.sha512=r(7816)},4448:(e,t,r)=>{var n=r(5717),a=r(4189),l=r(9509).Buffer,s=[1518500249,1859775393,-1894007588,-899497514],o=new Array(80);function i(){this.init(),this._w=o,a.call(this,64,56)}function u(e){return e<<30|e>>>2}function c(e,t,r,n){return 0===e?t&r|~t&n:2===e?t&r|t&n|r&n:t^r^n}n(i,a),i.prototype.init=function(){return this._a=1732584193,this._b=4023233417,this._c=2562383102,this._d=271733878,this._e=3285377520,this},i.prototype._update=function(e){for(var t,r=this._w,n=0|this._a,a=0|this._b,l=0|this._c,o=0|this._d,i=0|this._e,d=0;d<16;++d)r[d]=e.readInt32BE(4*d);for(;d<80;++d)r[d]=r[d-3]^r[d-8]^r[d-14]^r[d-16];for(var p=0;p<80;++p){var f=~~(p/20),h=0|((t=n)<<5|t>>>27)+c(f,a,l,o)+i+r[p]+s[f];i=o,o=l,l=u(a),a=n,n=h}this._a=n+this._a|0,this._b=a+this._b|0,this._c=l+this._c|0,this._d=o+this._d|0,this._e=i+this._e|0},i.prototype._hash=function(){var e=l.allocUnsafe(20);return e.writeInt32BE(0|this._a,0),e.writeInt32BE(0|this._b,4),e.writeInt32BE(0|this._c,8),e.writeInt32BE(0|this._d,12),e.writeInt32BE(0|this._e,16),e},e.exports=i},8336:(e,t,r)=>{var n=r(5717),a=r(4189),l=r(9509).Buffer,s=[1518500249,1859775393,-1894007588,-899497514],o=new Array(80);function i(){this.init(),this._w=o,a.call(this,64,56)}function u(e){return e<<5|e>>>27}function c(e){return e<<30|e>>>2}function d(e,t,r,n){return 0===e?t&r|~t&n:2===e?t&r|t&n|r&n:t^r^n}n(i,a),i.prototype.init=function(){return this._a=1732584193,this._b=4023233417,this._c=2562383102,this._d=271733878,this._e=3285377520,this},i.prototype._update=function(e){for(var t,r=this._w,n=0|this._a,a=0|this._b,l=0|this._c,o=0|this._d,i=0|this._e,p=0;p<16;++p)r[p]=e.readInt32BE(4*p);for(;p<80;++p)r[p]=(t=r[p-3]^r[p-8]^r[p-14]^r[p-16])<<1|t>>>31;for(var f=0;f<80;++f){var h=~~(f/20),m=u(n)+d(h,a,l,o)+i+r[f]+s[h]|0;i=o,o=l,l=c(a),a=n,n=m}this._a=n+this._a|0,this._b=a+this._b|0,this._c=l+this._c|0,this._d=o+this._d|0,this._e=i+this._e|0},i.prototype._hash=function(){var e=l.allocUnsafe(20);return e.writeInt32BE(0|this._a,0),e.writeInt32BE(0|this._b,4),e.writeInt32BE(0|this._c,8),e.writeInt32BE(0|this._d,12),e.writeInt32BE(0|this._e,16),e},e.exports=i},8432:(e,t,r)=>{var n=r(5717),a=r(7499),l=r(4189),s=r(9509).Buffer,o=new Array(64);function i(){this.init(),this._w=o,l.call(this,64,56)}n(i,a),i.prototype.init=function(){return this._a=3238371032,this._b=914150663,this._c=812702999,this._d=4144912697,this._e=4290775857,this._f=1750603025,this._g=1694076839,this._h=3204075428,this},i.prototype._hash=function(){var e=s.allocUnsafe(28);return e.writeInt32BE(this._a,0),e.writeInt32BE(this._b,4),e.writeInt32BE(this._c,8),e.writeInt32BE(this._d,12),e.writeInt32BE(this._e,16),e.writeInt32BE(this._f,20),e.writeInt32BE(this._g,24),e},e.exports=i},7499:(e,t,r)=>{var n=r(5717),a=r(4189),l=r(9509).Buffer,s=[1116352408,1899447441,3049323471,3921009573,961987163,1508970993,2453635748,2870763221,3624381080,310598401,607225278,1426881987,1925078388,2162078206,2614888103,3248222580,3835390401,4022224774,264347078,604807628,770255983,1249150122,1555081692,1996064986,2554220882,2821834349,2952996808,3210313671,3336571891,3584528711,113926993,338241895,666307205,773529912,1294757372,1396182291,1695183700,1986661051,2177026350,2456956037,2730485921,2820302411,3259730800,3345764771,3516065817,3600352804,4094571909,275423344,430227734,506948616,659060556,883997877,958139571,1322822218,1537002063,1747873779,1955562222,2024104815,2227730452,2361852424,2428436474,2756734187,3204031479,3329325298],o=new Array(64);function i(){this.init(),this._w=o,a.call(this,64,56)}function u(e,t,r){return r^e&(t^r)}function c(e,t,r){return e&t|r&(e|t)}function d(e){return(e>>>2|e<<30)^(e>>>13|e<<19)^(e>>>22|e<<10)}function p(e){return(e>>>6|e<<26)^(e>>>11|e<<21)^(e>>>25|e<<7)}function f(e){return(e>>>7|e<<25)^(e>>>18|e<<14)^e>>>3}n(i,a),i.prototype.init=function(){return this._a=1779033703,this._b=3144134277,this._c=1013904242,this._d=2773480762,this._e=1359893119,this._f=2600822924,this._g=528734635,this._h=1541459225,this},i.prototype._update=function(e){for(var t,r=this._w,n=0|this._a,a=0|this._b,l=0|this._c,o=0|this._d,i=0|this._e,h=0|this._f,m=0|this._g,g=0|this._h,y=0;y<16;++y)r[y]=e.readInt32BE(4*y);for(;y<64;++y)r[y]=0|(((t=r[y-2])>>>17|t<<15)^(t>>>19|t<<13)^t>>>10)+r[y-7]+f(r[y-15])+r[y-16];for(var v=0;v<64;++v){var E=g+p(i)+u(i,h,m)+s[v]+r[v]|0,b=d(n)+c(n,a,l)|0;g=m,m=h,h=i,i=o+E|0,o=l,l=a,a=n,n=E+b|0}this._a=n+this._a|0,this._b=a+this._b|0,this._c=l+this._c|0,this._d=o+this._d|0,this._e=i+this._e|0,this._f=h+this._f|0,this._g=m+this._g|0,this._h=g+this._h|0},i.prototype._hash=function(){var e=l.allocUnsafe(32);return e.writeInt32BE(this._a,0),e.writeInt32BE(this._b,4),e.writeInt32BE(this._c,8),e.writeInt32BE(this._d,12),e.writeInt32BE(this._e,16),e.writeInt32BE(this._f,20),e.writeInt32BE(this._g,24),e.writeInt32BE(this._h,28),e},e.exports=i},1686:(e,t,r)=>{var n=r(5717),a=r(7816),l=r(4189),s=r(9509).Buffer,o=new Array(160);function i(){this.init(),this._w=o,l.call(this,128,112)}n(i,a),i.prototype.init=function(){return this._ah=3418070365,this._bh=1654270250,this._ch=2438529370,this._dh=355462360,this._eh=1731405415,this._fh=2394180231,this._gh=3675008525,this._hh=1203062813,this._al=3238371032,this._bl=914150663,this._cl=812702999,this._dl=4144912697,this._el=4290775857,this._fl=1750603025,this._gl=1694076839,this._hl=3204075428,this},i.prototype._hash=function(){var e=s.allocUnsafe(48);function t(t,r,n){e.writeInt32BE(t,n),e.writeInt32BE(r,n+4)}return t(this._ah,this._al,0),t(this._bh,this._bl,8),t(this._ch,this._cl,16),t(this._dh,this._dl,24),t(this._eh,this._el,32),t(this._fh,this._fl,40),e},e.exports=i},7816:(e,t,r)=>{var n=r(5717),a=r(4189),l=r(9509).Buffer,s=[1116352408,3609767458,1899447441,602891725,3049323471,3964484399,3921009573,2173295548,961987163,4081628472,1508970993,3053834265,2453635748,2937671579,2870763221,3664609560,3624381080,2734883394,310598401,1164996542,607225278,1323610764,1426881987,3590304994,1925078388,4068182383,2162078206,991336113,2614888103,633803317,3248222580,3479774868,3835390401,2666613458,4022224774,944711139,264347078,2341262773,604807628,2007800933,770255983,1495990901,1249150122,1856431235,1555081692,3175218132,1996064986,2198950837,2554220882,3999719339,2821834349,766784016,2952996808,2566594879,3210313671,3203337956,3336571891,1034457026,3584528711,2466948901,113926993,3758326383,338241895,168717936,666307205,1188179964,773529912,1546045734,1294757372,1522805485,1396182291,2643833823,1695183700,2343527390,1986661051,1014477480,2177026350,1206759142,2456956037,344077627,2730485921,1290863460,2820302411,3158454273,3259730800,3505952657,3345764771,106217008,3516065817,3606008344,3600352804,1432725776,4094571909,1467031594,275423344,851169720,430227734,3100823752,506948616,1363258195,659060556,3750685593,883997877,3785050280,958139571,3318307427,1322822218,3812723403,1537002063,2003034995,1747873779,3602036899,1955562222,1575990012,2024104815,1125592928,2227730452,2716904306,2361852424,442776044,2428436474,593698344,2756734187,3733110249,3204031479,2999351573,3329325298,3815920427,3391569614,3928383900,3515267271,566280711,3940187606,3454069534,4118630271,4000239992,116418474,1914138554,174292421,2731055270,289380356,3203993006,460393269,320620315,685471733,587496836,852142971,1086792851,1017036298,365543100,1126000580,2618297676,1288033470,3409855158,1501505948,4234509866,1607167915,987167468,1816402316,1246189591],o=new Array(160);function i(){this.init(),this._w=o,a.call(this,128,112)}function u(e,t,r){return r^e&(t^r)}function c(e,t,r){return e&t|r&(e|t)}function d(e,t){return(e>>>28|t<<4)^(t>>>2|e<<30)^(t>>>7|e<<25)}function p(e,t){return(e>>>14|t<<18)^(e>>>18|t<<14)^(t>>>9|e<<23)}function f(e,t){return(e>>>1|t<<31)^(e>>>8|t<<24)^e>>>7}function h(e,t){return(e>>>1|t<<31)^(e>>>8|t<<24)^(e>>>7|t<<25)}function m(e,t){return(e>>>19|t<<13)^(t>>>29|e<<3)^e>>>6}function g(e,t){return(e>>>19|t<<13)^(t>>>29|e<<3)^(e>>>6|t<<26)}function y(e,t){return e>>>0<t>>>0?1:0}n(i,a),i.prototype.init=function(){return this._ah=1779033703,this._bh=3144134277,this._ch=1013904242,this._dh=2773480762,this._eh=1359893119,this._fh=2600822924,this._gh=528734635,this._hh=1541459225,this._al=4089235720,this._bl=2227873595,this._cl=4271175723,this._dl=1595750129,this._el=2917565137,this._fl=725511199,this._gl=4215389547,this._hl=327033209,this},i.prototype._update=function(e){for(var t=this._w,r=0|this._ah,n=0|this._bh,a=0|this._ch,l=0|this._dh,o=0|this._eh,i=0|this._fh,v=0|this._gh,E=0|this._hh,b=0|this._al,S=0|this._bl,_=0|this._cl,w=0|this._dl,C=0|this._el,x=0|this._fl,A=0|this._gl,I=0|this._hl,R=0;R<32;R+=2)t[R]=e.readInt32BE(4*R),t[R+1]=e.readInt32BE(4*R+4);for(;R<160;R+=2){var N=t[R-30],T=t[R-30+1],O=f(N,T),k=h(T,N),M=m(N=t[R-4],T=t[R-4+1]),P=g(T,N),j=t[R-14],L=t[R-14+1],q=t[R-32],B=t[R-32+1],D=k+L|0,U=O+j+y(D,k)|0;U=(U=U+M+y(D=D+P|0,P)|0)+q+y(D=D+B|0,B)|0,t[R]=U,t[R+1]=D}for(var V=0;V<160;V+=2){U=t[V],D=t[V+1];var z=c(r,n,a),F=c(b,S,_),$=d(r,b),J=d(b,r),W=p(o,C),H=p(C,o),K=s[V],G=s[V+1],Z=u(o,i,v),Y=u(C,x,A),X=I+H|0,Q=E+W+y(X,I)|0;Q=(Q=(Q=Q+Z+y(X=X+Y|0,Y)|0)+K+y(X=X+G|0,G)|0)+U+y(X=X+D|0,D)|0;var ee=J+F|0,te=$+z+y(ee,J)|0;E=v,I=A,v=i,A=x,i=o,x=C,o=l+Q+y(C=w+X|0,w)|0,l=a,w=_,a=n,_=S,n=r,S=b,r=Q+te+y(b=X+ee|0,X)|0}this._al=this._al+b|0,this._bl=this._bl+S|0,this._cl=this._cl+_|0,this._dl=this._dl+w|0,this._el=this._el+C|0,this._fl=this._fl+x|0,this._gl=this._gl+A|0,this._hl=this._hl+I|0,this._ah=this._ah+r+y(this._al,b)|0,this._bh=this._bh+n+y(this._bl,S)|0,this._ch=this._ch+a+y(this._cl,_)|0,this._dh=this._dh+l+y(this._dl,w)|0,this._eh=this._eh+o+y(this._el,C)|0,this._fh=this._fh+i+y(this._fl,x)|0,this._gh=this._gh+v+y(this._gl,A)|0,this._hh=this._hh+E+y(this._hl,I)|0},i.prototype._hash=function(){var e=l.allocUnsafe(64);function t(t,r,n){e.writeInt32BE(t,n),e.writeInt32BE(r,n+4)}return t(this._ah,this._al,0),t(this._bh,this._bl,8),t(this._ch,this._cl,16),t(this._dh,this._dl,24),t(this._eh,this._el,32),t(this._fh,this._fl,40),t(this._gh,this._gl,48),t(this._hh,this._hl,56),e},e.exports=i},2830:(e,t,r)=>{e.exports=a;var n=r(7187).EventEmitter;function a(){n.call(this)}r(5717)(a,n),a.Readable=r(9481),a.Writable=r(4229),a.Duplex=r(6753),a.Transform=r(4605),a.PassThrough=r(2725),a.finished=r(8610),a.pipeline=r(9946),a.Stream=a,a.prototype.pipe=function(e,t){var r=this;function a(t){e.writable&&!1===e.write(t)&&r.pause&&r.pause()}function l(){r.readable&&r.resume&&r.resume()}r.on("data",a),e.on("drain",l),e._isStdio||t&&!1===t.end||(r.on("end",o),r.on("close",i));var s=!1;function o(){s||(s=!0,e.end())}function i(){s||(s=!0,"function"==typeof e.destroy&&e.destroy())}function u(e){if(c(),0===n.listenerCount(this,"error"))throw e}function c(){r.removeListener("data",a),e.removeListener("drain",l),r.removeListener("end",o),r.removeListener("close",i),r.removeListener("error",u),e.removeListener("error",u),r.removeListener("end",c),r.removeListener("close",c),e.removeListener("close",c)}return r.on("error",u),e.on("error",u),r.on("end",c),r.on("close",c),e.on("close",c),e.emit("pipe",r),e}},2553:(e,t,r)=>{var n=r(9509).Buffer,a=n.isEncoding||function(e){switch((e=""+e)&&e.toLowerCase()){case"hex":case"utf8":case"utf-8":case"ascii":case"binary":case"base64":case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":case"raw":return!0;default:return!1}};function l(e){var t;switch(this.encoding=function(e){var t=function(e){if(!e)return"utf8";for(var t;;)switch(e){case"utf8":case"utf-8":return"utf8";case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return"utf16le";case"latin1":case"binary":return"latin1";case"base64":case"ascii":case"hex":return e;default:if(t)return;e=(""+e).toLowerCase(),t=!0}}(e);if("string"!=typeof t&&(n.isEncoding===a||!a(e)))throw new Error("Unknown encoding: "+e);return t||e}(e),this.encoding){case"utf16le":this.text=i,this.end=u,t=4;break;case"utf8":this.fillLast=o,t=4;break;case"base64":this.text=c,this.end=d,t=3;break;default:return this.write=p,void(this.end=f)}this.lastNeed=0,this.lastTotal=0,this.lastChar=n.allocUnsafe(t)}function s(e){return e<=127?0:e>>5==6?2:e>>4==14?3:e>>3==30?4:e>>6==2?-1:-2}function o(e){var t=this.lastTotal-this.lastNeed,r=function(e,t,r){if(128!=(192&t[0]))return e.lastNeed=0,"�";if(e.lastNeed>1&&t.length>1){if(128!=(192&t[1]))return e.lastNeed=1,"�";if(e.lastNeed>2&&t.length>2&&128!=(192&t[2]))return e.lastNeed=2,"�"}}(this,e);return void 0!==r?r:this.lastNeed<=e.length?(e.copy(this.lastChar,t,0,this.lastNeed),this.lastChar.toString(this.encoding,0,this.lastTotal)):(e.copy(this.lastChar,t,0,e.length),void(this.lastNeed-=e.length))}function i(e,t){if((e.length-t)%2==0){var r=e.toString("utf16le",t);if(r){var n=r.charCodeAt(r.length-1);if(n>=55296&&n<=56319)return this.lastNeed=2,this.lastTotal=4,this.lastChar[0]=e[e.length-2],this.lastChar[1]=e[e.length-1],r.slice(0,-1)}return r}return this.lastNeed=1,this.lastTotal=2,this.lastChar[0]=e[e.length-1],e.toString("utf16le",t,e.length-1)}function u(e){var t=e&&e.length?this.write(e):"";if(this.lastNeed){var r=this.lastTotal-this.lastNeed;return t+this.lastChar.toString("utf16le",0,r)}return t}function c(e,t){var r=(e.length-t)%3;return 0===r?e.toString("base64",t):(this.lastNeed=3-r,this.lastTotal=3,1===r?this.lastChar[0]=e[e.length-1]:(this.lastChar[0]=e[e.length-2],this.lastChar[1]=e[e.length-1]),e.toString("base64",t,e.length-r))}function d(e){var t=e&&e.length?this.write(e):"";return this.lastNeed?t+this.lastChar.toString("base64",0,3-this.lastNeed):t}function p(e){return e.toString(this.encoding)}function f(e){return e&&e.length?this.write(e):""}t.s=l,l.prototype.write=function(e){if(0===e.length)return"";var t,r;if(this.lastNeed){if(void 0===(t=this.fillLast(e)))return"";r=this.lastNeed,this.lastNeed=0}else r=0;return r<e.length?t?t+this.text(e,r):this.text(e,r):t||""},l.prototype.end=function(e){var t=e&&e.length?this.write(e):"";return this.lastNeed?t+"�":t},l.prototype.text=function(e,t){var r=function(e,t,r){var n=t.length-1;if(n<r)return 0;var a=s(t[n]);if(a>=0)return a>0&&(e.lastNeed=a-1),a;if(--n<r||-2===a)return 0;if(a=s(t[n]),a>=0)return a>0&&(e.lastNeed=a-2),a;if(--n<r||-2===a)return 0;if(a=s(t[n]),a>=0)return a>0&&(2===a?a=0:e.lastNeed=a-3),a;return 0}(this,e,t);if(!this.lastNeed)return e.toString("utf8",t);this.lastTotal=r;var n=e.length-(r-this.lastNeed);return e.copy(this.lastChar,0,n),e.toString("utf8",t,n)},l.prototype.fillLast=function(e){if(this.lastNeed<=e.length)return e.copy(this.lastChar,this.lastTotal-this.lastNeed,0,this.lastNeed),this.lastChar.toString(this.encoding,0,this.lastTotal);e.copy(this.lastChar,this.lastTotal-this.lastNeed,0,e.length),this.lastNeed-=e.length}},4927:(e,t,r)=>{function n(e){try{if(!r.g.localStorage)return!1}catch(e){return!1}var t=r.g.localStorage[e];return null!=t&&"true"===String(t).toLowerCase()}e.exports=function(e,t){if(n("noDeprecation"))return e;var r=!1;return function(){if(!r){if(n("throwDeprecation"))throw new Error(t);n("traceDeprecation")?console.trace(t):console.warn(t),r=!0}return e.apply(this,arguments)}}},255:e=>{var t={"&":"&amp;",'"':"&quot;","'":"&apos;","<":"&lt;",">":"&gt;"};e.exports=function(e){return e&&e.replace?e.replace(/([&"<>'])/g,(function(e,r){return t[r]})):e}},3479:(e,t,r)=>{var n=r(4155),a=r(255),l=r(2830).Stream,s="    ";function o(e,t,r){r=r||0;var n,l,s=(n=t,new Array(r||0).join(n||"")),i=e;if("object"==typeof e&&((i=e[l=Object.keys(e)[0]])&&i._elem))return i._elem.name=l,i._elem.icount=r,i._elem.indent=t,i._elem.indents=s,i._elem.interrupt=i,i._elem;var u,c=[],d=[];function p(e){Object.keys(e).forEach((function(t){c.push(function(e,t){return e+'="'+a(t)+'"'}(t,e[t]))}))}switch(typeof i){case"object":if(null===i)break;i._attr&&p(i._attr),i._cdata&&d.push(("<![CDATA["+i._cdata).replace(/\]\]>/g,"]]]]><![CDATA[>")+"]]>"),i.forEach&&(u=!1,d.push(""),i.forEach((function(e){"object"==typeof e?"_attr"==Object.keys(e)[0]?p(e._attr):d.push(o(e,t,r+1)):(d.pop(),u=!0,d.push(a(e)))})),u||d.push(""));break;default:d.push(a(i))}return{name:l,interrupt:!1,attributes:c,content:d,icount:r,indents:s,indent:t}}function i(e,t,r){if("object"!=typeof t)return e(!1,t);var n=t.interrupt?1:t.content.length;function a(){for(;t.content.length;){var a=t.content.shift();if(void 0!==a){if(l(a))return;i(e,a)}}e(!1,(n>1?t.indents:"")+(t.name?"</"+t.name+">":"")+(t.indent&&!r?"\n":"")),r&&r()}function l(t){return!!t.interrupt&&(t.interrupt.append=e,t.interrupt.end=a,t.interrupt=!1,e(!0),!0)}if(e(!1,t.indents+(t.name?"<"+t.name:"")+(t.attributes.length?" "+t.attributes.join(" "):"")+(n?t.name?">":"":t.name?"/>":"")+(t.indent&&n>1?"\n":"")),!n)return e(!1,t.indent?"\n":"");l(t)||a()}e.exports=function(e,t){"object"!=typeof t&&(t={indent:t});var r,a,u=t.stream?new l:null,c="",d=!1,p=t.indent?!0===t.indent?s:t.indent:"",f=!0;function h(e){f?n.nextTick(e):e()}function m(e,t){if(void 0!==t&&(c+=t),e&&!d&&(u=u||new l,d=!0),e&&d){var r=c;h((function(){u.emit("data",r)})),c=""}}function g(e,t){i(m,o(e,p,p?1:0),t)}function y(){if(u){var e=c;h((function(){u.emit("data",e),u.emit("end"),u.readable=!1,u.emit("close")}))}}return h((function(){f=!1})),t.declaration&&(r=t.declaration,a={version:"1.0",encoding:r.encoding||"UTF-8"},r.standalone&&(a.standalone=r.standalone),g({"?xml":{_attr:a}}),c=c.replace("/>","?>")),e&&e.forEach?e.forEach((function(t,r){var n;r+1===e.length&&(n=y),g(t,n)})):g(e,y),u?(u.readable=!0,u):c},e.exports.element=e.exports.Element=function(){var e={_elem:o(Array.prototype.slice.call(arguments)),push:function(e){if(!this.append)throw new Error("not assigned to a parent!");var t=this,r=this._elem.indent;i(this.append,o(e,r,this._elem.icount+(r?1:0)),(function(){t.append(!0)}))},close:function(e){void 0!==e&&this.push(e),this.end&&this.end()}};return e}},5102:(e,t,r)=>{var n={"./all.js":5308,"./auth/actions.js":5812,"./auth/index.js":3705,"./auth/reducers.js":3962,"./auth/selectors.js":35,"./auth/spec-wrap-actions.js":8302,"./configs/actions.js":714,"./configs/helpers.js":2256,"./configs/index.js":6709,"./configs/reducers.js":7743,"./configs/selectors.js":9018,"./configs/spec-actions.js":2698,"./deep-linking/helpers.js":1970,"./deep-linking/index.js":4980,"./deep-linking/layout.js":5858,"./deep-linking/operation-tag-wrapper.jsx":4584,"./deep-linking/operation-wrapper.jsx":877,"./download-url.js":8011,"./err/actions.js":4966,"./err/error-transformers/hook.js":6808,"./err/error-transformers/transformers/not-of-type.js":2392,"./err/error-transformers/transformers/parameter-oneof.js":1835,"./err/index.js":7793,"./err/reducers.js":3527,"./err/selectors.js":7667,"./filter/index.js":9978,"./filter/opsFilter.js":4309,"./layout/actions.js":5474,"./layout/index.js":6821,"./layout/reducers.js":5672,"./layout/selectors.js":4400,"./layout/spec-extensions/wrap-selector.js":8989,"./logs/index.js":9150,"./oas3/actions.js":7002,"./oas3/auth-extensions/wrap-selectors.js":3723,"./oas3/components/callbacks.jsx":3427,"./oas3/components/http-auth.jsx":6775,"./oas3/components/index.js":6467,"./oas3/components/operation-link.jsx":5757,"./oas3/components/operation-servers.jsx":6796,"./oas3/components/request-body-editor.jsx":5327,"./oas3/components/request-body.jsx":2458,"./oas3/components/servers-container.jsx":9928,"./oas3/components/servers.jsx":6617,"./oas3/helpers.jsx":7779,"./oas3/index.js":7451,"./oas3/reducers.js":2109,"./oas3/selectors.js":5065,"./oas3/spec-extensions/selectors.js":1741,"./oas3/spec-extensions/wrap-selectors.js":2044,"./oas3/wrap-components/auth-item.jsx":356,"./oas3/wrap-components/index.js":7761,"./oas3/wrap-components/json-schema-string.jsx":287,"./oas3/wrap-components/markdown.jsx":2460,"./oas3/wrap-components/model.jsx":3499,"./oas3/wrap-components/online-validator-badge.js":58,"./oas3/wrap-components/version-stamp.jsx":9487,"./on-complete/index.js":8560,"./request-snippets/fn.js":4624,"./request-snippets/index.js":6575,"./request-snippets/request-snippets.jsx":4206,"./request-snippets/selectors.js":4669,"./safe-render/components/error-boundary.jsx":6195,"./safe-render/components/fallback.jsx":9403,"./safe-render/fn.jsx":6189,"./safe-render/index.js":8102,"./samples/fn.js":2473,"./samples/index.js":8883,"./spec/actions.js":5179,"./spec/index.js":7038,"./spec/reducers.js":32,"./spec/selectors.js":3881,"./spec/wrap-actions.js":7508,"./swagger-js/configs-wrap-actions.js":4852,"./swagger-js/index.js":2990,"./util/index.js":8525,"./view/fn.js":8347,"./view/index.js":3420,"./view/root-injects.jsx":5005,"core/plugins/all.js":5308,"core/plugins/auth/actions.js":5812,"core/plugins/auth/index.js":3705,"core/plugins/auth/reducers.js":3962,"core/plugins/auth/selectors.js":35,"core/plugins/auth/spec-wrap-actions.js":8302,"core/plugins/configs/actions.js":714,"core/plugins/configs/helpers.js":2256,"core/plugins/configs/index.js":6709,"core/plugins/configs/reducers.js":7743,"core/plugins/configs/selectors.js":9018,"core/plugins/configs/spec-actions.js":2698,"core/plugins/deep-linking/helpers.js":1970,"core/plugins/deep-linking/index.js":4980,"core/plugins/deep-linking/layout.js":5858,"core/plugins/deep-linking/operation-tag-wrapper.jsx":4584,"core/plugins/deep-linking/operation-wrapper.jsx":877,"core/plugins/download-url.js":8011,"core/plugins/err/actions.js":4966,"core/plugins/err/error-transformers/hook.js":6808,"core/plugins/err/error-transformers/transformers/not-of-type.js":2392,"core/plugins/err/error-transformers/transformers/parameter-oneof.js":1835,"core/plugins/err/index.js":7793,"core/plugins/err/reducers.js":3527,"core/plugins/err/selectors.js":7667,"core/plugins/filter/index.js":9978,"core/plugins/filter/opsFilter.js":4309,"core/plugins/layout/actions.js":5474,"core/plugins/layout/index.js":6821,"core/plugins/layout/reducers.js":5672,"core/plugins/layout/selectors.js":4400,"core/plugins/layout/spec-extensions/wrap-selector.js":8989,"core/plugins/logs/index.js":9150,"core/plugins/oas3/actions.js":7002,"core/plugins/oas3/auth-extensions/wrap-selectors.js":3723,"core/plugins/oas3/components/callbacks.jsx":3427,"core/plugins/oas3/components/http-auth.jsx":6775,"core/plugins/oas3/components/index.js":6467,"core/plugins/oas3/components/operation-link.jsx":5757,"core/plugins/oas3/components/operation-servers.jsx":6796,"core/plugins/oas3/components/request-body-editor.jsx":5327,"core/plugins/oas3/components/request-body.jsx":2458,"core/plugins/oas3/components/servers-container.jsx":9928,"core/plugins/oas3/components/servers.jsx":6617,"core/plugins/oas3/helpers.jsx":7779,"core/plugins/oas3/index.js":7451,"core/plugins/oas3/reducers.js":2109,"core/plugins/oas3/selectors.js":5065,"core/plugins/oas3/spec-extensions/selectors.js":1741,"core/plugins/oas3/spec-extensions/wrap-selectors.js":2044,"core/plugins/oas3/wrap-components/auth-item.jsx":356,"core/plugins/oas3/wrap-components/index.js":7761,"core/plugins/oas3/wrap-components/json-schema-string.jsx":287,"core/plugins/oas3/wrap-components/markdown.jsx":2460,"core/plugins/oas3/wrap-components/model.jsx":3499,"core/plugins/oas3/wrap-components/online-validator-badge.js":58,"core/plugins/oas3/wrap-components/version-stamp.jsx":9487,"core/plugins/on-complete/index.js":8560,"core/plugins/request-snippets/fn.js":4624,"core/plugins/request-snippets/index.js":6575,"core/plugins/request-snippets/request-snippets.jsx":4206,"core/plugins/request-snippets/selectors.js":4669,"core/plugins/safe-render/components/error-boundary.jsx":6195,"core/plugins/safe-render/components/fallback.jsx":9403,"core/plugins/safe-render/fn.jsx":6189,"core/plugins/safe-render/index.js":8102,"core/plugins/samples/fn.js":2473,"core/plugins/samples/index.js":8883,"core/plugins/spec/actions.js":5179,"core/plugins/spec/index.js":7038,"core/plugins/spec/reducers.js":32,"core/plugins/spec/selectors.js":3881,"core/plugins/spec/wrap-actions.js":7508,"core/plugins/swagger-js/configs-wrap-actions.js":4852,"core/plugins/swagger-js/index.js":2990,"core/plugins/util/index.js":8525,"core/plugins/view/fn.js":8347,"core/plugins/view/index.js":3420,"core/plugins/view/root-injects.jsx":5005};function a(e){var t=l(e);return r(t)}function l(e){if(!r.o(n,e)){var t=new Error("Cannot find module '"+e+"'");throw t.code="MODULE_NOT_FOUND",t}return n[e]}a.keys=function(){return Object.keys(n)},a.resolve=l,e.exports=a,a.id=5102},2517:e=>{e.exports="data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMjAwcHgiICBoZWlnaHQ9IjIwMHB4IiAgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIiB2aWV3Qm94PSIwIDAgMTAwIDEwMCIgcHJlc2VydmVBc3BlY3RSYXRpbz0ieE1pZFlNaWQiIGNsYXNzPSJsZHMtcm9sbGluZyIgc3R5bGU9ImJhY2tncm91bmQtaW1hZ2U6IG5vbmU7IGJhY2tncm91bmQtcG9zaXRpb246IGluaXRpYWwgaW5pdGlhbDsgYmFja2dyb3VuZC1yZXBlYXQ6IGluaXRpYWwgaW5pdGlhbDsiPjxjaXJjbGUgY3g9IjUwIiBjeT0iNTAiIGZpbGw9Im5vbmUiIG5nLWF0dHItc3Ryb2tlPSJ7e2NvbmZpZy5jb2xvcn19IiBuZy1hdHRyLXN0cm9rZS13aWR0aD0ie3tjb25maWcud2lkdGh9fSIgbmctYXR0ci1yPSJ7e2NvbmZpZy5yYWRpdXN9fSIgbmctYXR0ci1zdHJva2UtZGFzaGFycmF5PSJ7e2NvbmZpZy5kYXNoYXJyYXl9fSIgc3Ryb2tlPSIjNTU1NTU1IiBzdHJva2Utd2lkdGg9IjEwIiByPSIzNSIgc3Ryb2tlLWRhc2hhcnJheT0iMTY0LjkzMzYxNDMxMzQ2NDE1IDU2Ljk3Nzg3MTQzNzgyMTM4Ij48YW5pbWF0ZVRyYW5zZm9ybSBhdHRyaWJ1dGVOYW1lPSJ0cmFuc2Zvcm0iIHR5cGU9InJvdGF0ZSIgY2FsY01vZGU9ImxpbmVhciIgdmFsdWVzPSIwIDUwIDUwOzM2MCA1MCA1MCIga2V5VGltZXM9IjA7MSIgZHVyPSIxcyIgYmVnaW49IjBzIiByZXBlYXRDb3VudD0iaW5kZWZpbml0ZSI+PC9hbmltYXRlVHJhbnNmb3JtPjwvY2lyY2xlPjwvc3ZnPgo="},8898:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>J.default})},4163:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>W.default})},5527:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>H.default})},5171:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>K.default})},2954:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>G.default})},7930:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Z.default})},6145:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Y.default})},1778:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>X.default})},29:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Q.default})},2372:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ee.default})},8818:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>te.default})},5487:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>re.default})},2565:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ne.default})},6785:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ae.default})},8136:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>le.default})},9963:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>se.default})},4350:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>oe.default})},3590:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ie.default})},5942:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ue.default})},313:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ce.default})},6914:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>de.default})},7512:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>pe.default})},2740:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>fe.default})},374:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>he.default})},6235:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>me.default})},3769:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ge.default})},775:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ye.default})},863:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>ve.default})},4780:e=>{e.exports=Ee},8096:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>be.default})},3294:e=>{e.exports=Se},9725:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({List:()=>_e.List,Map:()=>_e.Map,OrderedMap:()=>_e.OrderedMap,Seq:()=>_e.Seq,Set:()=>_e.Set,default:()=>_e.default,fromJS:()=>_e.fromJS})},626:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({JSON_SCHEMA:()=>we.JSON_SCHEMA,default:()=>we.default})},9908:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Ce.default})},7068:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>xe.default})},5476:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Ae.default})},5053:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Ie.default})},810:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({Component:()=>Re.Component,PureComponent:()=>Re.PureComponent,default:()=>Re.default,useEffect:()=>Re.useEffect,useRef:()=>Re.useRef,useState:()=>Re.useState})},9874:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({CopyToClipboard:()=>Ne.CopyToClipboard})},9569:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Te.default})},9871:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({applyMiddleware:()=>Oe.applyMiddleware,bindActionCreators:()=>Oe.bindActionCreators,compose:()=>Oe.compose,createStore:()=>Oe.createStore})},3952:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({Remarkable:()=>ke.Remarkable})},8639:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({createSelector:()=>Me.createSelector})},8518:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({serializeError:()=>Pe.serializeError})},5013:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({opId:()=>je.opId})},8900:(e,t,r)=>{e.exports=(e=>{var t={};return r.d(t,e),t})({default:()=>Le.default})},2361:()=>{},4616:()=>{},6718:(e,t,r)=>{e.exports=r(1910)}},Ke={};function Ge(e){var t=Ke[e];if(void 0!==t)return t.exports;var r=Ke[e]={exports:{}};return He[e](r,r.exports,Ge),r.exports}Ge.n=e=>{var t=e&&e.__esModule?()=>e.default:()=>e;return Ge.d(t,{a:t}),t},Ge.d=(e,t)=>{for(var r in t)Ge.o(t,r)&&!Ge.o(e,r)&&Object.defineProperty(e,r,{enumerable:!0,get:t[r]})},Ge.g=function(){if("object"==typeof globalThis)return globalThis;try{return this||new Function("return this")()}catch(e){if("object"==typeof window)return window}}(),Ge.o=(e,t)=>Object.prototype.hasOwnProperty.call(e,t),Ge.r=e=>{"undefined"!=typeof Symbol&&Symbol.toStringTag&&Object.defineProperty(e,Symbol.toStringTag,{value:"Module"}),Object.defineProperty(e,"__esModule",{value:!0})};var Ze={};(()=>{Ge.d(Ze,{Z:()=>Wr});var e={};Ge.r(e),Ge.d(e,{Button:()=>Pt,Col:()=>kt,Collapse:()=>Ut,Container:()=>Tt,Input:()=>Lt,Link:()=>Bt,Row:()=>Mt,Select:()=>qt,TextArea:()=>jt});var t={};Ge.r(t),Ge.d(t,{JsonSchemaArrayItemFile:()=>kr,JsonSchemaArrayItemText:()=>Or,JsonSchemaForm:()=>Rr,JsonSchema_array:()=>Tr,JsonSchema_boolean:()=>Mr,JsonSchema_object:()=>jr,JsonSchema_string:()=>Nr});const r=(e=>{var t={};return Ge.d(t,e),t})({default:()=>qe.default});var n=Ge(6145),a=Ge(2740),l=Ge(313),s=Ge(7698),o=Ge.n(s),i=Ge(5527),u=Ge(7512),c=Ge(8136),d=Ge(4163),p=Ge(6785),f=Ge(2565),h=Ge(5171),m=Ge(810),g=Ge(9871),y=Ge(9725);const v=(e=>{var t={};return Ge.d(t,e),t})({combineReducers:()=>Be.combineReducers});var E=Ge(8518);const b=(e=>{var t={};return Ge.d(t,e),t})({default:()=>De.default});var S=Ge(4966),_=Ge(7504),w=Ge(6298);const C=e=>e;class x{constructor(){var e;let t=arguments.length>0&&void 0!==arguments[0]?arguments[0]:{};var r,n,a;o()(this,{state:{},plugins:[],pluginsOptions:{},system:{configs:{},fn:{},components:{},rootInjects:{},statePlugins:{}},boundSystem:{},toolbox:{}},t),this.getSystem=(0,i.default)(e=this._getSystem).call(e,this),this.store=(r=C,n=(0,y.fromJS)(this.state),a=this.getSystem,function(e,t,r){let n=[(0,w._5)(r)];const a=_.Z.__REDUX_DEVTOOLS_EXTENSION_COMPOSE__||g.compose;return(0,g.createStore)(e,t,a((0,g.applyMiddleware)(...n)))}(r,n,a)),this.buildSystem(!1),this.register(this.plugins)}getStore(){return this.store}register(e){let t=!(arguments.length>1&&void 0!==arguments[1])||arguments[1];var r=A(e,this.getSystem(),this.pluginsOptions);R(this.system,r),t&&this.buildSystem();I.call(this.system,e,this.getSystem())&&this.buildSystem()}buildSystem(){let e=!(arguments.length>0&&void 0!==arguments[0])||arguments[0],t=this.getStore().dispatch,r=this.getStore().getState;this.boundSystem=(0,u.default)({},this.getRootInjects(),this.getWrappedAndBoundActions(t),this.getWrappedAndBoundSelectors(r,this.getSystem),this.getStateThunks(r),this.getFn(),this.getConfigs()),e&&this.rebuildReducer()}_getSystem(){return this.boundSystem}getRootInjects(){var e,t,r;return(0,u.default)({getSystem:this.getSystem,getStore:(0,i.default)(e=this.getStore).call(e,this),getComponents:(0,i.default)(t=this.getComponents).call(t,this),getState:this.getStore().getState,getConfigs:(0,i.default)(r=this._getConfigs).call(r,this),Im:y.default,React:m.default},this.system.rootInjects||{})}_getConfigs(){return this.system.configs}getConfigs(){return{configs:this.system.configs}}setConfigs(e){this.system.configs=e}rebuildReducer(){var e;this.store.replaceReducer((e=this.system.statePlugins,function(e){var t;let r=(0,p.default)(t=(0,a.default)(e)).call(t,((t,r)=>(t[r]=function(e){return function(){let t=arguments.length>0&&void 0!==arguments[0]?arguments[0]:new y.Map,r=arguments.length>1?arguments[1]:void 0;if(!e)return t;let n=e[r.type];if(n){const e=N(n)(t,r);return null===e?t:e}return t}}(e[r]),t)),{});return(0,a.default)(r).length?(0,v.combineReducers)(r):C}((0,w.Ay)(e,(e=>e.reducers)))))}getType(e){let t=e[0].toUpperCase()+(0,c.default)(e).call(e,1);return(0,w.Q2)(this.system.statePlugins,((r,n)=>{let a=r[e];if(a)return{[n+t]:a}}))}getSelectors(){return this.getType("selectors")}getActions(){let e=this.getType("actions");return(0,w.Ay)(e,(e=>(0,w.Q2)(e,((e,t)=>{if((0,w.LQ)(e))return{[t]:e}}))))}getWrappedAndBoundActions(e){var t=this;let r=this.getBoundActions(e);return(0,w.Ay)(r,((e,r)=>{let n=this.system.statePlugins[(0,c.default)(r).call(r,0,-7)].wrapActions;return n?(0,w.Ay)(e,((e,r)=>{let a=n[r];return a?((0,d.default)(a)||(a=[a]),(0,p.default)(a).call(a,((e,r)=>{let n=function(){return r(e,t.getSystem())(...arguments)};if(!(0,w.LQ)(n))throw new TypeError("wrapActions needs to return a function that returns a new function (ie the wrapped action)");return N(n)}),e||Function.prototype)):e})):e}))}getWrappedAndBoundSelectors(e,t){var r=this;let n=this.getBoundSelectors(e,t);return(0,w.Ay)(n,((t,n)=>{let a=[(0,c.default)(n).call(n,0,-9)],l=this.system.statePlugins[a].wrapSelectors;return l?(0,w.Ay)(t,((t,n)=>{let s=l[n];return s?((0,d.default)(s)||(s=[s]),(0,p.default)(s).call(s,((t,n)=>{let l=function(){for(var l=arguments.length,s=new Array(l),o=0;o<l;o++)s[o]=arguments[o];return n(t,r.getSystem())(e().getIn(a),...s)};if(!(0,w.LQ)(l))throw new TypeError("wrapSelector needs to return a function that returns a new function (ie the wrapped action)");return l}),t||Function.prototype)):t})):t}))}getStates(e){var t;return(0,p.default)(t=(0,a.default)(this.system.statePlugins)).call(t,((t,r)=>(t[r]=e.get(r),t)),{})}getStateThunks(e){var t;return(0,p.default)(t=(0,a.default)(this.system.statePlugins)).call(t,((t,r)=>(t[r]=()=>e().get(r),t)),{})}getFn(){return{fn:this.system.fn}}getComponents(e){const t=this.system.components[e];return(0,d.default)(t)?(0,p.default)(t).call(t,((e,t)=>t(e,this.getSystem()))):void 0!==e?this.system.components[e]:this.system.components}getBoundSelectors(e,t){return(0,w.Ay)(this.getSelectors(),((r,n)=>{let a=[(0,c.default)(n).call(n,0,-9)];const l=()=>e().getIn(a);return(0,w.Ay)(r,(e=>function(){for(var r=arguments.length,n=new Array(r),a=0;a<r;a++)n[a]=arguments[a];let s=N(e).apply(null,[l(),...n]);return"function"==typeof s&&(s=N(s)(t())),s}))}))}getBoundActions(e){e=e||this.getStore().dispatch;const t=this.getActions(),r=e=>"function"!=typeof e?(0,w.Ay)(e,(e=>r(e))):function(){var t=null;try{t=e(...arguments)}catch(e){t={type:S.NEW_THROWN_ERR,error:!0,payload:(0,E.serializeError)(e)}}finally{return t}};return(0,w.Ay)(t,(t=>(0,g.bindActionCreators)(r(t),e)))}getMapStateToProps(){return()=>(0,u.default)({},this.getSystem())}getMapDispatchToProps(e){return t=>o()({},this.getWrappedAndBoundActions(t),this.getFn(),e)}}function A(e,t,r){if((0,w.Kn)(e)&&!(0,w.kJ)(e))return(0,b.default)({},e);if((0,w.Wl)(e))return A(e(t),t,r);if((0,w.kJ)(e)){var n;const a="chain"===r.pluginLoadType?t.getComponents():{};return(0,p.default)(n=(0,f.default)(e).call(e,(e=>A(e,t,r)))).call(n,R,a)}return{}}function I(e,t){let{hasLoaded:r}=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{},n=r;return(0,w.Kn)(e)&&!(0,w.kJ)(e)&&"function"==typeof e.afterLoad&&(n=!0,N(e.afterLoad).call(this,t)),(0,w.Wl)(e)?I.call(this,e(t),t,{hasLoaded:n}):(0,w.kJ)(e)?(0,f.default)(e).call(e,(e=>I.call(this,e,t,{hasLoaded:n}))):n}function R(){let e=arguments.length>0&&void 0!==arguments[0]?arguments[0]:{},t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};if(!(0,w.Kn)(e))return{};if(!(0,w.Kn)(t))return e;t.wrapComponents&&((0,w.Ay)(t.wrapComponents,((r,n)=>{const a=e.components&&e.components[n];a&&(0,d.default)(a)?(e.components[n]=(0,h.default)(a).call(a,[r]),delete t.wrapComponents[n]):a&&(e.components[n]=[a,r],delete t.wrapComponents[n])})),(0,a.default)(t.wrapComponents).length||delete t.wrapComponents);const{statePlugins:r}=e;if((0,w.Kn)(r))for(let e in r){const a=r[e];if(!(0,w.Kn)(a))continue;const{wrapActions:s,wrapSelectors:o}=a;if((0,w.Kn)(s))for(let r in s){let a=s[r];var n;if((0,d.default)(a)||(a=[a],s[r]=a),t&&t.statePlugins&&t.statePlugins[e]&&t.statePlugins[e].wrapActions&&t.statePlugins[e].wrapActions[r])t.statePlugins[e].wrapActions[r]=(0,h.default)(n=s[r]).call(n,t.statePlugins[e].wrapActions[r])}if((0,w.Kn)(o))for(let r in o){let n=o[r];var l;if((0,d.default)(n)||(n=[n],o[r]=n),t&&t.statePlugins&&t.statePlugins[e]&&t.statePlugins[e].wrapSelectors&&t.statePlugins[e].wrapSelectors[r])t.statePlugins[e].wrapSelectors[r]=(0,h.default)(l=o[r]).call(l,t.statePlugins[e].wrapSelectors[r])}}return o()(e,t)}function N(e){let{logErrors:t=!0}=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};return"function"!=typeof e?e:function(){try{for(var r=arguments.length,n=new Array(r),a=0;a<r;a++)n[a]=arguments[a];return e.call(this,...n)}catch(e){return t&&console.error(e),null}}}var T=Ge(7793),O=Ge(6821),k=Ge(7038),M=Ge(3420),P=Ge(8883),j=Ge(6575),L=Ge(9150),q=Ge(2990),B=Ge(3705),D=Ge(8525),U=Ge(8011),V=Ge(6709),z=Ge(4980),F=Ge(9978),$=Ge(8560),J=Ge(8102),W=Ge(775),H=Ge(8818),K=(Ge(5053),Ge(9569),Ge(5013));class G extends m.PureComponent{constructor(e,t){super(e,t),(0,W.default)(this,"toggleShown",(()=>{let{layoutActions:e,tag:t,operationId:r,isShown:n}=this.props;const a=this.getResolvedSubtree();n||void 0!==a||this.requestResolvedSubtree(),e.show(["operations",t,r],!n)})),(0,W.default)(this,"onCancelClick",(()=>{this.setState({tryItOutEnabled:!this.state.tryItOutEnabled})})),(0,W.default)(this,"onTryoutClick",(()=>{this.setState({tryItOutEnabled:!this.state.tryItOutEnabled})})),(0,W.default)(this,"onResetClick",(e=>{const t=this.props.oas3Selectors.selectDefaultRequestBodyValue(...e);this.props.oas3Actions.setRequestBodyValue({value:t,pathMethod:e})})),(0,W.default)(this,"onExecute",(()=>{this.setState({executeInProgress:!0})})),(0,W.default)(this,"getResolvedSubtree",(()=>{const{specSelectors:e,path:t,method:r,specPath:n}=this.props;return n?e.specResolvedSubtree(n.toJS()):e.specResolvedSubtree(["paths",t,r])})),(0,W.default)(this,"requestResolvedSubtree",(()=>{const{specActions:e,path:t,method:r,specPath:n}=this.props;return n?e.requestResolvedSubtree(n.toJS()):e.requestResolvedSubtree(["paths",t,r])}));const{tryItOutEnabled:r}=e.getConfigs();this.state={tryItOutEnabled:!0===r||"true"===r,executeInProgress:!1}}mapStateToProps(e,t){const{op:r,layoutSelectors:n,getConfigs:a}=t,{docExpansion:l,deepLinking:s,displayOperationId:o,displayRequestDuration:i,supportedSubmitMethods:u}=a(),c=n.showSummary(),d=r.getIn(["operation","__originalOperationId"])||r.getIn(["operation","operationId"])||(0,K.opId)(r.get("operation"),t.path,t.method)||r.get("id"),p=["operations",t.tag,d],f=s&&"false"!==s,h=(0,H.default)(u).call(u,t.method)>=0&&(void 0===t.allowTryItOut?t.specSelectors.allowTryItOutFor(t.path,t.method):t.allowTryItOut),m=r.getIn(["operation","security"])||t.specSelectors.security();return{operationId:d,isDeepLinkingEnabled:f,showSummary:c,displayOperationId:o,displayRequestDuration:i,allowTryItOut:h,security:m,isAuthorized:t.authSelectors.isAuthorized(m),isShown:n.isShown(p,"full"===l),jumpToKey:`paths.${t.path}.${t.method}`,response:t.specSelectors.responseFor(t.path,t.method),request:t.specSelectors.requestFor(t.path,t.method)}}componentDidMount(){const{isShown:e}=this.props,t=this.getResolvedSubtree();e&&void 0===t&&this.requestResolvedSubtree()}UNSAFE_componentWillReceiveProps(e){const{response:t,isShown:r}=e,n=this.getResolvedSubtree();t!==this.props.response&&this.setState({executeInProgress:!1}),r&&void 0===n&&this.requestResolvedSubtree()}render(){let{op:e,tag:t,path:r,method:n,security:a,isAuthorized:l,operationId:s,showSummary:o,isShown:i,jumpToKey:u,allowTryItOut:c,response:d,request:p,displayOperationId:f,displayRequestDuration:h,isDeepLinkingEnabled:g,specPath:v,specSelectors:E,specActions:b,getComponent:S,getConfigs:_,layoutSelectors:w,layoutActions:C,authActions:x,authSelectors:A,oas3Actions:I,oas3Selectors:R,fn:N}=this.props;const T=S("operation"),O=this.getResolvedSubtree()||(0,y.Map)(),k=(0,y.fromJS)({op:O,tag:t,path:r,summary:e.getIn(["operation","summary"])||"",deprecated:O.get("deprecated")||e.getIn(["operation","deprecated"])||!1,method:n,security:a,isAuthorized:l,operationId:s,originalOperationId:O.getIn(["operation","__originalOperationId"]),showSummary:o,isShown:i,jumpToKey:u,allowTryItOut:c,request:p,displayOperationId:f,displayRequestDuration:h,isDeepLinkingEnabled:g,executeInProgress:this.state.executeInProgress,tryItOutEnabled:this.state.tryItOutEnabled});return m.default.createElement(T,{operation:k,response:d,request:p,isShown:i,toggleShown:this.toggleShown,onTryoutClick:this.onTryoutClick,onResetClick:this.onResetClick,onCancelClick:this.onCancelClick,onExecute:this.onExecute,specPath:v,specActions:b,specSelectors:E,oas3Actions:I,oas3Selectors:R,layoutActions:C,layoutSelectors:w,authActions:x,authSelectors:A,getComponent:S,getConfigs:_,fn:N})}}(0,W.default)(G,"defaultProps",{showSummary:!0,response:null,allowTryItOut:!0,displayOperationId:!1,displayRequestDuration:!1});class Z extends m.default.Component{getLayout(){let{getComponent:e,layoutSelectors:t}=this.props;const r=t.current(),n=e(r,!0);return n||(()=>m.default.createElement("h1",null,' No layout defined for "',r,'" '))}render(){const e=this.getLayout();return m.default.createElement(e,null)}}Z.defaultProps={};class Y extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"close",(()=>{let{authActions:e}=this.props;e.showDefinitions(!1)}))}render(){var e;let{authSelectors:t,authActions:r,getComponent:n,errSelectors:a,specSelectors:l,fn:{AST:s={}}}=this.props,o=t.shownDefinitions();const i=n("auths");return m.default.createElement("div",{className:"dialog-ux"},m.default.createElement("div",{className:"backdrop-ux"}),m.default.createElement("div",{className:"modal-ux"},m.default.createElement("div",{className:"modal-dialog-ux"},m.default.createElement("div",{className:"modal-ux-inner"},m.default.createElement("div",{className:"modal-ux-header"},m.default.createElement("h3",null,"Available authorizations"),m.default.createElement("button",{type:"button",className:"close-modal",onClick:this.close},m.default.createElement("svg",{width:"20",height:"20"},m.default.createElement("use",{href:"#close",xlinkHref:"#close"})))),m.default.createElement("div",{className:"modal-ux-content"},(0,f.default)(e=o.valueSeq()).call(e,((e,o)=>m.default.createElement(i,{key:o,AST:s,definitions:e,getComponent:n,errSelectors:a,authSelectors:t,authActions:r,specSelectors:l}))))))))}}class X extends m.default.Component{render(){let{isAuthorized:e,showPopup:t,onClick:r,getComponent:n}=this.props;const a=n("authorizationPopup",!0);return m.default.createElement("div",{className:"auth-wrapper"},m.default.createElement("button",{className:e?"btn authorize locked":"btn authorize unlocked",onClick:r},m.default.createElement("span",null,"Authorize"),m.default.createElement("svg",{width:"20",height:"20"},m.default.createElement("use",{href:e?"#locked":"#unlocked",xlinkHref:e?"#locked":"#unlocked"}))),t&&m.default.createElement(a,null))}}class Q extends m.default.Component{render(){const{authActions:e,authSelectors:t,specSelectors:r,getComponent:n}=this.props,a=r.securityDefinitions(),l=t.definitionsToAuthorize(),s=n("authorizeBtn");return a?m.default.createElement(s,{onClick:()=>e.showDefinitions(l),isAuthorized:!!t.authorized().size,showPopup:!!t.shownDefinitions(),getComponent:n}):null}}class ee extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"onClick",(e=>{e.stopPropagation();let{onClick:t}=this.props;t&&t()}))}render(){let{isAuthorized:e}=this.props;return m.default.createElement("button",{className:e?"authorization__btn locked":"authorization__btn unlocked","aria-label":e?"authorization button locked":"authorization button unlocked",onClick:this.onClick},m.default.createElement("svg",{width:"20",height:"20"},m.default.createElement("use",{href:e?"#locked":"#unlocked",xlinkHref:e?"#locked":"#unlocked"})))}}class te extends m.default.Component{constructor(e,t){super(e,t),(0,W.default)(this,"onAuthChange",(e=>{let{name:t}=e;this.setState({[t]:e})})),(0,W.default)(this,"submitAuth",(e=>{e.preventDefault();let{authActions:t}=this.props;t.authorizeWithPersistOption(this.state)})),(0,W.default)(this,"logoutClick",(e=>{e.preventDefault();let{authActions:t,definitions:r}=this.props,n=(0,f.default)(r).call(r,((e,t)=>t)).toArray();this.setState((0,p.default)(n).call(n,((e,t)=>(e[t]="",e)),{})),t.logoutWithPersistOption(n)})),(0,W.default)(this,"close",(e=>{e.preventDefault();let{authActions:t}=this.props;t.showDefinitions(!1)})),this.state={}}render(){var e;let{definitions:t,getComponent:r,authSelectors:a,errSelectors:l}=this.props;const s=r("AuthItem"),o=r("oauth2",!0),i=r("Button");let u=a.authorized(),c=(0,n.default)(t).call(t,((e,t)=>!!u.get(t))),d=(0,n.default)(t).call(t,(e=>"oauth2"!==e.get("type"))),p=(0,n.default)(t).call(t,(e=>"oauth2"===e.get("type")));return m.default.createElement("div",{className:"auth-container"},!!d.size&&m.default.createElement("form",{onSubmit:this.submitAuth},(0,f.default)(d).call(d,((e,t)=>m.default.createElement(s,{key:t,schema:e,name:t,getComponent:r,onAuthChange:this.onAuthChange,authorized:u,errSelectors:l}))).toArray(),m.default.createElement("div",{className:"auth-btn-wrapper"},d.size===c.size?m.default.createElement(i,{className:"btn modal-btn auth",onClick:this.logoutClick},"Logout"):m.default.createElement(i,{type:"submit",className:"btn modal-btn auth authorize"},"Authorize"),m.default.createElement(i,{className:"btn modal-btn auth btn-done",onClick:this.close},"Close"))),p&&p.size?m.default.createElement("div",null,m.default.createElement("div",{className:"scope-def"},m.default.createElement("p",null,"Scopes are used to grant an application different levels of access to data on behalf of the end user. Each API may declare one or more scopes."),m.default.createElement("p",null,"API requires the following scopes. Select which ones you want to grant to Swagger UI.")),(0,f.default)(e=(0,n.default)(t).call(t,(e=>"oauth2"===e.get("type")))).call(e,((e,t)=>m.default.createElement("div",{key:t},m.default.createElement(o,{authorized:u,schema:e,name:t})))).toArray()):null)}}class re extends m.default.Component{render(){let{schema:e,name:t,getComponent:r,onAuthChange:n,authorized:a,errSelectors:l}=this.props;const s=r("apiKeyAuth"),o=r("basicAuth");let i;const u=e.get("type");switch(u){case"apiKey":i=m.default.createElement(s,{key:t,schema:e,name:t,errSelectors:l,authorized:a,getComponent:r,onChange:n});break;case"basic":i=m.default.createElement(o,{key:t,schema:e,name:t,errSelectors:l,authorized:a,getComponent:r,onChange:n});break;default:i=m.default.createElement("div",{key:t},"Unknown security definition type ",u)}return m.default.createElement("div",{key:`${t}-jump`},i)}}class ne extends m.default.Component{render(){let{error:e}=this.props,t=e.get("level"),r=e.get("message"),n=e.get("source");return m.default.createElement("div",{className:"errors"},m.default.createElement("b",null,n," ",t),m.default.createElement("span",null,r))}}class ae extends m.default.Component{constructor(e,t){super(e,t),(0,W.default)(this,"onChange",(e=>{let{onChange:t}=this.props,r=e.target.value,n=(0,u.default)({},this.state,{value:r});this.setState(n),t(n)}));let{name:r,schema:n}=this.props,a=this.getValue();this.state={name:r,schema:n,value:a}}getValue(){let{name:e,authorized:t}=this.props;return t&&t.getIn([e,"value"])}render(){var e,t;let{schema:r,getComponent:a,errSelectors:l,name:s}=this.props;const o=a("Input"),i=a("Row"),u=a("Col"),c=a("authError"),d=a("Markdown",!0),p=a("JumpToPath",!0);let h=this.getValue(),g=(0,n.default)(e=l.allErrors()).call(e,(e=>e.get("authId")===s));return m.default.createElement("div",null,m.default.createElement("h4",null,m.default.createElement("code",null,s||r.get("name"))," (apiKey)",m.default.createElement(p,{path:["securityDefinitions",s]})),h&&m.default.createElement("h6",null,"Authorized"),m.default.createElement(i,null,m.default.createElement(d,{source:r.get("description")})),m.default.createElement(i,null,m.default.createElement("p",null,"Name: ",m.default.createElement("code",null,r.get("name")))),m.default.createElement(i,null,m.default.createElement("p",null,"In: ",m.default.createElement("code",null,r.get("in")))),m.default.createElement(i,null,m.default.createElement("label",null,"Value:"),h?m.default.createElement("code",null," ****** "):m.default.createElement(u,null,m.default.createElement(o,{type:"text",onChange:this.onChange,autoFocus:!0}))),(0,f.default)(t=g.valueSeq()).call(t,((e,t)=>m.default.createElement(c,{error:e,key:t}))))}}class le extends m.default.Component{constructor(e,t){super(e,t),(0,W.default)(this,"onChange",(e=>{let{onChange:t}=this.props,{value:r,name:n}=e.target,a=this.state.value;a[n]=r,this.setState({value:a}),t(this.state)}));let{schema:r,name:n}=this.props,a=this.getValue().username;this.state={name:n,schema:r,value:a?{username:a}:{}}}getValue(){let{authorized:e,name:t}=this.props;return e&&e.getIn([t,"value"])||{}}render(){var e,t;let{schema:r,getComponent:a,name:l,errSelectors:s}=this.props;const o=a("Input"),i=a("Row"),u=a("Col"),c=a("authError"),d=a("JumpToPath",!0),p=a("Markdown",!0);let h=this.getValue().username,g=(0,n.default)(e=s.allErrors()).call(e,(e=>e.get("authId")===l));return m.default.createElement("div",null,m.default.createElement("h4",null,"Basic authorization",m.default.createElement(d,{path:["securityDefinitions",l]})),h&&m.default.createElement("h6",null,"Authorized"),m.default.createElement(i,null,m.default.createElement(p,{source:r.get("description")})),m.default.createElement(i,null,m.default.createElement("label",null,"Username:"),h?m.default.createElement("code",null," ",h," "):m.default.createElement(u,null,m.default.createElement(o,{type:"text",required:"required",name:"username",onChange:this.onChange,autoFocus:!0}))),m.default.createElement(i,null,m.default.createElement("label",null,"Password:"),h?m.default.createElement("code",null," ****** "):m.default.createElement(u,null,m.default.createElement(o,{autoComplete:"new-password",name:"password",type:"password",onChange:this.onChange}))),(0,f.default)(t=g.valueSeq()).call(t,((e,t)=>m.default.createElement(c,{error:e,key:t}))))}}function se(e){const{example:t,showValue:r,getComponent:n,getConfigs:a}=e,l=n("Markdown",!0),s=n("highlightCode");return t?m.default.createElement("div",{className:"example"},t.get("description")?m.default.createElement("section",{className:"example__section"},m.default.createElement("div",{className:"example__section-header"},"Example Description"),m.default.createElement("p",null,m.default.createElement(l,{source:t.get("description")}))):null,r&&t.has("value")?m.default.createElement("section",{className:"example__section"},m.default.createElement("div",{className:"example__section-header"},"Example Value"),m.default.createElement(s,{getConfigs:a,value:(0,w.Pz)(t.get("value"))})):null):null}var oe=Ge(6914);class ie extends m.default.PureComponent{constructor(){var e;super(...arguments),e=this,(0,W.default)(this,"_onSelect",(function(t){let{isSyntheticChange:r=!1}=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};"function"==typeof e.props.onSelect&&e.props.onSelect(t,{isSyntheticChange:r})})),(0,W.default)(this,"_onDomSelect",(e=>{if("function"==typeof this.props.onSelect){const t=e.target.selectedOptions[0].getAttribute("value");this._onSelect(t,{isSyntheticChange:!1})}})),(0,W.default)(this,"getCurrentExample",(()=>{const{examples:e,currentExampleKey:t}=this.props,r=e.get(t),n=e.keySeq().first(),a=e.get(n);return r||a||(0,oe.default)({})}))}componentDidMount(){const{onSelect:e,examples:t}=this.props;if("function"==typeof e){const e=t.first(),r=t.keyOf(e);this._onSelect(r,{isSyntheticChange:!0})}}UNSAFE_componentWillReceiveProps(e){const{currentExampleKey:t,examples:r}=e;if(r!==this.props.examples&&!r.has(t)){const e=r.first(),t=r.keyOf(e);this._onSelect(t,{isSyntheticChange:!0})}}render(){const{examples:e,currentExampleKey:t,isValueModified:r,isModifiedValueAvailable:n,showLabels:a}=this.props;return m.default.createElement("div",{className:"examples-select"},a?m.default.createElement("span",{className:"examples-select__section-label"},"Examples: "):null,m.default.createElement("select",{className:"examples-select-element",onChange:this._onDomSelect,value:n&&r?"__MODIFIED__VALUE__":t||""},n?m.default.createElement("option",{value:"__MODIFIED__VALUE__"},"[Modified value]"):null,(0,f.default)(e).call(e,((e,t)=>m.default.createElement("option",{key:t,value:t},e.get("summary")||t))).valueSeq()))}}(0,W.default)(ie,"defaultProps",{examples:y.default.Map({}),onSelect:function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return console.log("DEBUG: ExamplesSelect was not given an onSelect callback",...t)},currentExampleKey:null,showLabels:!0});const ue=e=>y.List.isList(e)?e:(0,w.Pz)(e);class ce extends m.default.PureComponent{constructor(e){var t;super(e),t=this,(0,W.default)(this,"_getStateForCurrentNamespace",(()=>{const{currentNamespace:e}=this.props;return(this.state[e]||(0,y.Map)()).toObject()})),(0,W.default)(this,"_setStateForCurrentNamespace",(e=>{const{currentNamespace:t}=this.props;return this._setStateForNamespace(t,e)})),(0,W.default)(this,"_setStateForNamespace",((e,t)=>{const r=(this.state[e]||(0,y.Map)()).mergeDeep(t);return this.setState({[e]:r})})),(0,W.default)(this,"_isCurrentUserInputSameAsExampleValue",(()=>{const{currentUserInputValue:e}=this.props;return this._getCurrentExampleValue()===e})),(0,W.default)(this,"_getValueForExample",((e,t)=>{const{examples:r}=t||this.props;return ue((r||(0,y.Map)({})).getIn([e,"value"]))})),(0,W.default)(this,"_getCurrentExampleValue",(e=>{const{currentKey:t}=e||this.props;return this._getValueForExample(t,e||this.props)})),(0,W.default)(this,"_onExamplesSelect",(function(e){let{isSyntheticChange:r}=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{};const{onSelect:n,updateValue:a,currentUserInputValue:l,userHasEditedBody:s}=t.props,{lastUserEditedValue:o}=t._getStateForCurrentNamespace(),i=t._getValueForExample(e);if("__MODIFIED__VALUE__"===e)return a(ue(o)),t._setStateForCurrentNamespace({isModifiedValueSelected:!0});if("function"==typeof n){for(var u=arguments.length,c=new Array(u>2?u-2:0),d=2;d<u;d++)c[d-2]=arguments[d];n(e,{isSyntheticChange:r},...c)}t._setStateForCurrentNamespace({lastDownstreamValue:i,isModifiedValueSelected:r&&s||!!l&&l!==i}),r||"function"==typeof a&&a(ue(i))}));const r=this._getCurrentExampleValue();this.state={[e.currentNamespace]:(0,y.Map)({lastUserEditedValue:this.props.currentUserInputValue,lastDownstreamValue:r,isModifiedValueSelected:this.props.userHasEditedBody||this.props.currentUserInputValue!==r})}}componentWillUnmount(){this.props.setRetainRequestBodyValueFlag(!1)}UNSAFE_componentWillReceiveProps(e){const{currentUserInputValue:t,examples:r,onSelect:a,userHasEditedBody:l}=e,{lastUserEditedValue:s,lastDownstreamValue:o}=this._getStateForCurrentNamespace(),i=this._getValueForExample(e.currentKey,e),u=(0,n.default)(r).call(r,(e=>e.get("value")===t||(0,w.Pz)(e.get("value"))===t));if(u.size){let t;t=u.has(e.currentKey)?e.currentKey:u.keySeq().first(),a(t,{isSyntheticChange:!0})}else t!==this.props.currentUserInputValue&&t!==s&&t!==o&&(this.props.setRetainRequestBodyValueFlag(!0),this._setStateForNamespace(e.currentNamespace,{lastUserEditedValue:e.currentUserInputValue,isModifiedValueSelected:l||t!==i}))}render(){const{currentUserInputValue:e,examples:t,currentKey:r,getComponent:n,userHasEditedBody:a}=this.props,{lastDownstreamValue:l,lastUserEditedValue:s,isModifiedValueSelected:o}=this._getStateForCurrentNamespace(),i=n("ExamplesSelect");return m.default.createElement(i,{examples:t,currentExampleKey:r,onSelect:this._onExamplesSelect,isModifiedValueAvailable:!!s&&s!==l,isValueModified:void 0!==e&&o&&e!==this._getCurrentExampleValue()||a})}}(0,W.default)(ce,"defaultProps",{userHasEditedBody:!1,examples:(0,y.Map)({}),currentNamespace:"__DEFAULT__NAMESPACE__",setRetainRequestBodyValueFlag:()=>{},onSelect:function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return console.log("ExamplesSelectValueRetainer: no `onSelect` function was provided",...t)},updateValue:function(){for(var e=arguments.length,t=new Array(e),r=0;r<e;r++)t[r]=arguments[r];return console.log("ExamplesSelectValueRetainer: no `updateValue` function was provided",...t)}});var de=Ge(8898),pe=Ge(5487),fe=Ge(2372),he=Ge(8900);class me extends m.default.Component{constructor(e,t){super(e,t),(0,W.default)(this,"close",(e=>{e.preventDefault();let{authActions:t}=this.props;t.showDefinitions(!1)})),(0,W.default)(this,"authorize",(()=>{let{authActions:e,errActions:t,getConfigs:r,authSelectors:n,oas3Selectors:a}=this.props,l=r(),s=n.getConfigs();t.clear({authId:name,type:"auth",source:"auth"}),function(e){let{auth:t,authActions:r,errActions:n,configs:a,authConfigs:l={},currentServer:s}=e,{schema:o,scopes:i,name:u,clientId:c}=t,p=o.get("flow"),h=[];switch(p){case"password":return void r.authorizePassword(t);case"application":case"clientCredentials":case"client_credentials":return void r.authorizeApplication(t);case"accessCode":case"authorizationCode":case"authorization_code":h.push("response_type=code");break;case"implicit":h.push("response_type=token")}"string"==typeof c&&h.push("client_id="+encodeURIComponent(c));let m=a.oauth2RedirectUrl;if(void 0===m)return void n.newAuthErr({authId:u,source:"validation",level:"error",message:"oauth2RedirectUrl configuration is not passed. Oauth2 authorization cannot be performed."});h.push("redirect_uri="+encodeURIComponent(m));let g=[];if((0,d.default)(i)?g=i:y.default.List.isList(i)&&(g=i.toArray()),g.length>0){let e=l.scopeSeparator||" ";h.push("scope="+encodeURIComponent(g.join(e)))}let v=(0,w.r3)(new Date);if(h.push("state="+encodeURIComponent(v)),void 0!==l.realm&&h.push("realm="+encodeURIComponent(l.realm)),("authorizationCode"===p||"authorization_code"===p||"accessCode"===p)&&l.usePkceWithAuthorizationCodeGrant){const e=(0,w.Uj)(),r=(0,w.Xb)(e);h.push("code_challenge="+r),h.push("code_challenge_method=S256"),t.codeVerifier=e}let{additionalQueryStringParams:E}=l;for(let e in E){var b;void 0!==E[e]&&h.push((0,f.default)(b=[e,E[e]]).call(b,encodeURIComponent).join("="))}const S=o.get("authorizationUrl");let _;_=s?(0,he.default)((0,w.Nm)(S),s,!0).toString():(0,w.Nm)(S);let C,x=[_,h.join("&")].join(-1===(0,H.default)(S).call(S,"?")?"?":"&");C="implicit"===p?r.preAuthorizeImplicit:l.useBasicAuthenticationWithAccessCodeGrant?r.authorizeAccessCodeWithBasicAuthentication:r.authorizeAccessCodeWithFormParams,r.authPopup(x,{auth:t,state:v,redirectUrl:m,callback:C,errCb:n.newAuthErr})}({auth:this.state,currentServer:a.serverEffectiveValue(a.selectedServer()),authActions:e,errActions:t,configs:l,authConfigs:s})})),(0,W.default)(this,"onScopeChange",(e=>{var t,r;let{target:a}=e,{checked:l}=a,s=a.dataset.value;if(l&&-1===(0,H.default)(t=this.state.scopes).call(t,s)){var o;let e=(0,h.default)(o=this.state.scopes).call(o,[s]);this.setState({scopes:e})}else if(!l&&(0,H.default)(r=this.state.scopes).call(r,s)>-1){var i;this.setState({scopes:(0,n.default)(i=this.state.scopes).call(i,(e=>e!==s))})}})),(0,W.default)(this,"onInputChange",(e=>{let{target:{dataset:{name:t},value:r}}=e,n={[t]:r};this.setState(n)})),(0,W.default)(this,"selectScopes",(e=>{var t;e.target.dataset.all?this.setState({scopes:(0,de.default)((0,pe.default)(t=this.props.schema.get("allowedScopes")||this.props.schema.get("scopes")).call(t))}):this.setState({scopes:[]})})),(0,W.default)(this,"logout",(e=>{e.preventDefault();let{authActions:t,errActions:r,name:n}=this.props;r.clear({authId:n,type:"auth",source:"auth"}),t.logoutWithPersistOption([n])}));let{name:r,schema:a,authorized:l,authSelectors:s}=this.props,o=l&&l.get(r),i=s.getConfigs()||{},u=o&&o.get("username")||"",c=o&&o.get("clientId")||i.clientId||"",p=o&&o.get("clientSecret")||i.clientSecret||"",m=o&&o.get("passwordType")||"basic",g=o&&o.get("scopes")||i.scopes||[];"string"==typeof g&&(g=g.split(i.scopeSeparator||" ")),this.state={appName:i.appName,name:r,schema:a,scopes:g,clientId:c,clientSecret:p,username:u,password:"",passwordType:m}}render(){var e,t;let{schema:r,getComponent:a,authSelectors:l,errSelectors:s,name:o,specSelectors:i}=this.props;const u=a("Input"),c=a("Row"),d=a("Col"),p=a("Button"),h=a("authError"),g=a("JumpToPath",!0),y=a("Markdown",!0),v=a("InitializedInput"),{isOAS3:E}=i;let b=E()?r.get("openIdConnectUrl"):null;const S="implicit",_="password",w=E()?b?"authorization_code":"authorizationCode":"accessCode",C=E()?b?"client_credentials":"clientCredentials":"application";let x=!!(l.getConfigs()||{}).usePkceWithAuthorizationCodeGrant,A=r.get("flow"),I=A===w&&x?A+" with PKCE":A,R=r.get("allowedScopes")||r.get("scopes"),N=!!l.authorized().get(o),T=(0,n.default)(e=s.allErrors()).call(e,(e=>e.get("authId")===o)),O=!(0,n.default)(T).call(T,(e=>"validation"===e.get("source"))).size,k=r.get("description");return m.default.createElement("div",null,m.default.createElement("h4",null,o," (OAuth2, ",I,") ",m.default.createElement(g,{path:["securityDefinitions",o]})),this.state.appName?m.default.createElement("h5",null,"Application: ",this.state.appName," "):null,k&&m.default.createElement(y,{source:r.get("description")}),N&&m.default.createElement("h6",null,"Authorized"),b&&m.default.createElement("p",null,"OpenID Connect URL: ",m.default.createElement("code",null,b)),(A===S||A===w)&&m.default.createElement("p",null,"Authorization URL: ",m.default.createElement("code",null,r.get("authorizationUrl"))),(A===_||A===w||A===C)&&m.default.createElement("p",null,"Token URL:",m.default.createElement("code",null," ",r.get("tokenUrl"))),m.default.createElement("p",{className:"flow"},"Flow: ",m.default.createElement("code",null,I)),A!==_?null:m.default.createElement(c,null,m.default.createElement(c,null,m.default.createElement("label",{htmlFor:"oauth_username"},"username:"),N?m.default.createElement("code",null," ",this.state.username," "):m.default.createElement(d,{tablet:10,desktop:10},m.default.createElement("input",{id:"oauth_username",type:"text","data-name":"username",onChange:this.onInputChange,autoFocus:!0}))),m.default.createElement(c,null,m.default.createElement("label",{htmlFor:"oauth_password"},"password:"),N?m.default.createElement("code",null," ****** "):m.default.createElement(d,{tablet:10,desktop:10},m.default.createElement("input",{id:"oauth_password",type:"password","data-name":"password",onChange:this.onInputChange}))),m.default.createElement(c,null,m.default.createElement("label",{htmlFor:"password_type"},"Client credentials location:"),N?m.default.createElement("code",null," ",this.state.passwordType," "):m.default.createElement(d,{tablet:10,desktop:10},m.default.createElement("select",{id:"password_type","data-name":"passwordType",onChange:this.onInputChange},m.default.createElement("option",{value:"basic"},"Authorization header"),m.default.createElement("option",{value:"request-body"},"Request body"))))),(A===C||A===S||A===w||A===_)&&(!N||N&&this.state.clientId)&&m.default.createElement(c,null,m.default.createElement("label",{htmlFor:"client_id"},"client_id:"),N?m.default.createElement("code",null," ****** "):m.default.createElement(d,{tablet:10,desktop:10},m.default.createElement(v,{id:"client_id",type:"text",required:A===_,initialValue:this.state.clientId,"data-name":"clientId",onChange:this.onInputChange}))),(A===C||A===w||A===_)&&m.default.createElement(c,null,m.default.createElement("label",{htmlFor:"client_secret"},"client_secret:"),N?m.default.createElement("code",null," ****** "):m.default.createElement(d,{tablet:10,desktop:10},m.default.createElement(v,{id:"client_secret",initialValue:this.state.clientSecret,type:"password","data-name":"clientSecret",onChange:this.onInputChange}))),!N&&R&&R.size?m.default.createElement("div",{className:"scopes"},m.default.createElement("h2",null,"Scopes:",m.default.createElement("a",{onClick:this.selectScopes,"data-all":!0},"select all"),m.default.createElement("a",{onClick:this.selectScopes},"select none")),(0,f.default)(R).call(R,((e,t)=>{var r;return m.default.createElement(c,{key:t},m.default.createElement("div",{className:"checkbox"},m.default.createElement(u,{"data-value":t,id:`${t}-${A}-checkbox-${this.state.name}`,disabled:N,checked:(0,fe.default)(r=this.state.scopes).call(r,t),type:"checkbox",onChange:this.onScopeChange}),m.default.createElement("label",{htmlFor:`${t}-${A}-checkbox-${this.state.name}`},m.default.createElement("span",{className:"item"}),m.default.createElement("div",{className:"text"},m.default.createElement("p",{className:"name"},t),m.default.createElement("p",{className:"description"},e)))))})).toArray()):null,(0,f.default)(t=T.valueSeq()).call(t,((e,t)=>m.default.createElement(h,{error:e,key:t}))),m.default.createElement("div",{className:"auth-btn-wrapper"},O&&(N?m.default.createElement(p,{className:"btn modal-btn auth authorize",onClick:this.logout},"Logout"):m.default.createElement(p,{className:"btn modal-btn auth authorize",onClick:this.authorize},"Authorize")),m.default.createElement(p,{className:"btn modal-btn auth btn-done",onClick:this.close},"Close")))}}class ge extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onClick",(()=>{let{specActions:e,path:t,method:r}=this.props;e.clearResponse(t,r),e.clearRequest(t,r)}))}render(){return m.default.createElement("button",{className:"btn btn-clear opblock-control__btn",onClick:this.onClick},"Clear")}}const ye=e=>{let{headers:t}=e;return m.default.createElement("div",null,m.default.createElement("h5",null,"Response headers"),m.default.createElement("pre",{className:"microlight"},t))},ve=e=>{let{duration:t}=e;return m.default.createElement("div",null,m.default.createElement("h5",null,"Request duration"),m.default.createElement("pre",{className:"microlight"},t," ms"))};class Ee extends m.default.Component{shouldComponentUpdate(e){return this.props.response!==e.response||this.props.path!==e.path||this.props.method!==e.method||this.props.displayRequestDuration!==e.displayRequestDuration}render(){const{response:e,getComponent:t,getConfigs:r,displayRequestDuration:n,specSelectors:l,path:s,method:o}=this.props,{showMutatedRequest:i,requestSnippetsEnabled:u}=r(),c=i?l.mutatedRequestFor(s,o):l.requestFor(s,o),p=e.get("status"),h=c.get("url"),g=e.get("headers").toJS(),y=e.get("notDocumented"),v=e.get("error"),E=e.get("text"),b=e.get("duration"),S=(0,a.default)(g),_=g["content-type"]||g["Content-Type"],w=t("responseBody"),C=(0,f.default)(S).call(S,(e=>{var t=(0,d.default)(g[e])?g[e].join():g[e];return m.default.createElement("span",{className:"headerline",key:e}," ",e,": ",t," ")})),x=0!==C.length,A=t("Markdown",!0),I=t("RequestSnippets",!0),R=t("curl");return m.default.createElement("div",null,c&&(!0===u||"true"===u?m.default.createElement(I,{request:c}):m.default.createElement(R,{request:c,getConfigs:r})),h&&m.default.createElement("div",null,m.default.createElement("div",{className:"request-url"},m.default.createElement("h4",null,"Request URL"),m.default.createElement("pre",{className:"microlight"},h))),m.default.createElement("h4",null,"Server response"),m.default.createElement("table",{className:"responses-table live-responses-table"},m.default.createElement("thead",null,m.default.createElement("tr",{className:"responses-header"},m.default.createElement("td",{className:"col_header response-col_status"},"Code"),m.default.createElement("td",{className:"col_header response-col_description"},"Details"))),m.default.createElement("tbody",null,m.default.createElement("tr",{className:"response"},m.default.createElement("td",{className:"response-col_status"},p,y?m.default.createElement("div",{className:"response-undocumented"},m.default.createElement("i",null," Undocumented ")):null),m.default.createElement("td",{className:"response-col_description"},v?m.default.createElement(A,{source:`${""!==e.get("name")?`${e.get("name")}: `:""}${e.get("message")}`}):null,E?m.default.createElement(w,{content:E,contentType:_,url:h,headers:g,getConfigs:r,getComponent:t}):null,x?m.default.createElement(ye,{headers:C}):null,n&&b?m.default.createElement(ve,{duration:b}):null)))))}}var be=Ge(5623);const Se=["get","put","post","delete","options","head","patch"],_e=(0,h.default)(Se).call(Se,["trace"]);class we extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"renderOperationTag",((e,t)=>{const{specSelectors:r,getComponent:n,oas3Selectors:a,layoutSelectors:l,layoutActions:s,getConfigs:o}=this.props,i=n("OperationContainer",!0),u=n("OperationTag"),c=e.get("operations");return m.default.createElement(u,{key:"operation-"+t,tagObj:e,tag:t,oas3Selectors:a,layoutSelectors:l,layoutActions:s,getConfigs:o,getComponent:n,specUrl:r.url()},m.default.createElement("div",{className:"operation-tag-content"},(0,f.default)(c).call(c,(e=>{const n=e.get("path"),a=e.get("method"),l=y.default.List(["paths",n,a]),s=r.isOAS3()?_e:Se;return-1===(0,H.default)(s).call(s,a)?null:m.default.createElement(i,{key:`${n}-${a}`,specPath:l,op:e,path:n,method:a,tag:t})})).toArray()))}))}render(){let{specSelectors:e}=this.props;const t=e.taggedOperations();return 0===t.size?m.default.createElement("h3",null," No operations defined in spec!"):m.default.createElement("div",null,(0,f.default)(t).call(t,this.renderOperationTag).toArray(),t.size<1?m.default.createElement("h3",null," No operations defined in spec! "):null)}}var Ce=Ge(3769);function xe(e){return e.match(/^(?:[a-z]+:)?\/\//i)}function Ae(e,t){return e?xe(e)?(r=e).match(/^\/\//i)?`${window.location.protocol}${r}`:r:new Ce.default(e,t).href:t;var r}function Ie(e,t){let{selectedServer:r=""}=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{};try{return function(e,t){let{selectedServer:r=""}=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{};if(!e)return;if(xe(e))return e;const n=Ae(r,t);return xe(n)?new Ce.default(e,n).href:new Ce.default(e,window.location.href).href}(e,t,{selectedServer:r})}catch{return}}class Re extends m.default.Component{render(){const{tagObj:e,tag:t,children:r,oas3Selectors:n,layoutSelectors:a,layoutActions:l,getConfigs:s,getComponent:o,specUrl:i}=this.props;let{docExpansion:u,deepLinking:c}=s();const d=c&&"false"!==c,p=o("Collapse"),h=o("Markdown",!0),g=o("DeepLink"),y=o("Link");let v,E=e.getIn(["tagDetails","description"],null),b=e.getIn(["tagDetails","externalDocs","description"]),S=e.getIn(["tagDetails","externalDocs","url"]);v=(0,w.Wl)(n)&&(0,w.Wl)(n.selectedServer)?Ie(S,i,{selectedServer:n.selectedServer()}):S;let _=["operations-tag",t],C=a.isShown(_,"full"===u||"list"===u);return m.default.createElement("div",{className:C?"opblock-tag-section is-open":"opblock-tag-section"},m.default.createElement("h3",{onClick:()=>l.show(_,!C),className:E?"opblock-tag":"opblock-tag no-desc",id:(0,f.default)(_).call(_,(e=>(0,w.J6)(e))).join("-"),"data-tag":t,"data-is-open":C},m.default.createElement(g,{enabled:d,isShown:C,path:(0,w.oJ)(t),text:t}),E?m.default.createElement("small",null,m.default.createElement(h,{source:E})):m.default.createElement("small",null),v?m.default.createElement("div",{className:"info__externaldocs"},m.default.createElement("small",null,m.default.createElement(y,{href:(0,w.Nm)(v),onClick:e=>e.stopPropagation(),target:"_blank"},b||v))):null,m.default.createElement("button",{"aria-expanded":C,className:"expand-operation",title:C?"Collapse operation":"Expand operation",onClick:()=>l.show(_,!C)},m.default.createElement("svg",{className:"arrow",width:"20",height:"20","aria-hidden":"true",focusable:"false"},m.default.createElement("use",{href:C?"#large-arrow-up":"#large-arrow-down",xlinkHref:C?"#large-arrow-up":"#large-arrow-down"})))),m.default.createElement(p,{isOpened:C},r))}}(0,W.default)(Re,"defaultProps",{tagObj:y.default.fromJS({}),tag:""});class Ne extends m.PureComponent{render(){let{specPath:e,response:t,request:r,toggleShown:n,onTryoutClick:a,onResetClick:l,onCancelClick:s,onExecute:o,fn:i,getComponent:u,getConfigs:c,specActions:d,specSelectors:p,authActions:h,authSelectors:g,oas3Actions:y,oas3Selectors:v}=this.props,E=this.props.operation,{deprecated:b,isShown:S,path:_,method:C,op:x,tag:A,operationId:I,allowTryItOut:R,displayRequestDuration:N,tryItOutEnabled:T,executeInProgress:O}=E.toJS(),{description:k,externalDocs:M,schemes:P}=x;const j=M?Ie(M.url,p.url(),{selectedServer:v.selectedServer()}):"";let L=E.getIn(["op"]),q=L.get("responses"),B=(0,w.gp)(L,["parameters"]),D=p.operationScheme(_,C),U=["operations",A,I],V=(0,w.nX)(L);const z=u("responses"),F=u("parameters"),$=u("execute"),J=u("clear"),W=u("Collapse"),H=u("Markdown",!0),K=u("schemes"),G=u("OperationServers"),Z=u("OperationExt"),Y=u("OperationSummary"),X=u("Link"),{showExtensions:Q}=c();if(q&&t&&t.size>0){let e=!q.get(String(t.get("status")))&&!q.get("default");t=t.set("notDocumented",e)}let ee=[_,C];const te=p.validationErrors([_,C]);return m.default.createElement("div",{className:b?"opblock opblock-deprecated":S?`opblock opblock-${C} is-open`:`opblock opblock-${C}`,id:(0,w.J6)(U.join("-"))},m.default.createElement(Y,{operationProps:E,isShown:S,toggleShown:n,getComponent:u,authActions:h,authSelectors:g,specPath:e}),m.default.createElement(W,{isOpened:S},m.default.createElement("div",{className:"opblock-body"},L&&L.size||null===L?null:m.default.createElement("img",{height:"32px",width:"32px",src:Ge(2517),className:"opblock-loading-animation"}),b&&m.default.createElement("h4",{className:"opblock-title_normal"}," Warning: Deprecated"),k&&m.default.createElement("div",{className:"opblock-description-wrapper"},m.default.createElement("div",{className:"opblock-description"},m.default.createElement(H,{source:k}))),j?m.default.createElement("div",{className:"opblock-external-docs-wrapper"},m.default.createElement("h4",{className:"opblock-title_normal"},"Find more details"),m.default.createElement("div",{className:"opblock-external-docs"},M.description&&m.default.createElement("span",{className:"opblock-external-docs__description"},m.default.createElement(H,{source:M.description})),m.default.createElement(X,{target:"_blank",className:"opblock-external-docs__link",href:(0,w.Nm)(j)},j))):null,L&&L.size?m.default.createElement(F,{parameters:B,specPath:e.push("parameters"),operation:L,onChangeKey:ee,onTryoutClick:a,onResetClick:l,onCancelClick:s,tryItOutEnabled:T,allowTryItOut:R,fn:i,getComponent:u,specActions:d,specSelectors:p,pathMethod:[_,C],getConfigs:c,oas3Actions:y,oas3Selectors:v}):null,T?m.default.createElement(G,{getComponent:u,path:_,method:C,operationServers:L.get("servers"),pathServers:p.paths().getIn([_,"servers"]),getSelectedServer:v.selectedServer,setSelectedServer:y.setSelectedServer,setServerVariableValue:y.setServerVariableValue,getServerVariable:v.serverVariableValue,getEffectiveServerValue:v.serverEffectiveValue}):null,T&&R&&P&&P.size?m.default.createElement("div",{className:"opblock-schemes"},m.default.createElement(K,{schemes:P,path:_,method:C,specActions:d,currentScheme:D})):null,!T||!R||te.length<=0?null:m.default.createElement("div",{className:"validation-errors errors-wrapper"},"Please correct the following validation errors and try again.",m.default.createElement("ul",null,(0,f.default)(te).call(te,((e,t)=>m.default.createElement("li",{key:t}," ",e," "))))),m.default.createElement("div",{className:T&&t&&R?"btn-group":"execute-wrapper"},T&&R?m.default.createElement($,{operation:L,specActions:d,specSelectors:p,oas3Selectors:v,oas3Actions:y,path:_,method:C,onExecute:o,disabled:O}):null,T&&t&&R?m.default.createElement(J,{specActions:d,path:_,method:C}):null),O?m.default.createElement("div",{className:"loading-container"},m.default.createElement("div",{className:"loading"})):null,q?m.default.createElement(z,{responses:q,request:r,tryItOutResponse:t,getComponent:u,getConfigs:c,specSelectors:p,oas3Actions:y,oas3Selectors:v,specActions:d,produces:p.producesOptionsFor([_,C]),producesValue:p.currentProducesFor([_,C]),specPath:e.push("responses"),path:_,method:C,displayRequestDuration:N,fn:i}):null,Q&&V.size?m.default.createElement(Z,{extensions:V,getComponent:u}):null)))}}(0,W.default)(Ne,"defaultProps",{operation:null,response:null,request:null,specPath:(0,y.List)(),summary:""});const Te=(e=>{var t={};return Ge.d(t,e),t})({default:()=>Ue.default});class Oe extends m.PureComponent{render(){let{isShown:e,toggleShown:t,getComponent:r,authActions:n,authSelectors:a,operationProps:l,specPath:s}=this.props,{summary:o,isAuthorized:i,method:u,op:c,showSummary:d,path:p,operationId:f,originalOperationId:h,displayOperationId:g}=l.toJS(),{summary:y}=c,v=l.get("security");const E=r("authorizeOperationBtn"),b=r("OperationSummaryMethod"),S=r("OperationSummaryPath"),_=r("JumpToPath",!0),w=r("CopyToClipboardBtn",!0),C=v&&!!v.count(),x=C&&1===v.size&&v.first().isEmpty(),A=!C||x;return m.default.createElement("div",{className:`opblock-summary opblock-summary-${u}`},m.default.createElement("button",{"aria-label":`${u} ${p.replace(/\//g,"​/")}`,"aria-expanded":e,className:"opblock-summary-control",onClick:t},m.default.createElement(b,{method:u}),m.default.createElement(S,{getComponent:r,operationProps:l,specPath:s}),d?m.default.createElement("div",{className:"opblock-summary-description"},(0,Te.default)(y||o)):null,g&&(h||f)?m.default.createElement("span",{className:"opblock-summary-operation-id"},h||f):null,m.default.createElement("svg",{className:"arrow",width:"20",height:"20","aria-hidden":"true",focusable:"false"},m.default.createElement("use",{href:e?"#large-arrow-up":"#large-arrow-down",xlinkHref:e?"#large-arrow-up":"#large-arrow-down"}))),A?null:m.default.createElement(E,{isAuthorized:i,onClick:()=>{const e=a.definitionsForRequirements(v);n.showDefinitions(e)}}),m.default.createElement(w,{textToCopy:`${s.get(1)}`}),m.default.createElement(_,{path:s}))}}(0,W.default)(Oe,"defaultProps",{operationProps:null,specPath:(0,y.List)(),summary:""});class ke extends m.PureComponent{render(){let{method:e}=this.props;return m.default.createElement("span",{className:"opblock-summary-method"},e.toUpperCase())}}(0,W.default)(ke,"defaultProps",{operationProps:null});const Me=(e=>{var t={};return Ge.d(t,e),t})({default:()=>Ve.default});class Pe extends m.PureComponent{render(){let{getComponent:e,operationProps:t}=this.props,{deprecated:r,isShown:n,path:a,tag:l,operationId:s,isDeepLinkingEnabled:o}=t.toJS();const i=a.split(/(?=\/)/g);for(let e=1;e<i.length;e+=2)(0,Me.default)(i).call(i,e,0,m.default.createElement("wbr",{key:e}));const u=e("DeepLink");return m.default.createElement("span",{className:r?"opblock-summary-path__deprecated":"opblock-summary-path","data-path":a},m.default.createElement(u,{enabled:o,isShown:n,path:(0,w.oJ)(`${l}/${s}`),text:i}))}}const je=e=>{var t;let{extensions:r,getComponent:n}=e,a=n("OperationExtRow");return m.default.createElement("div",{className:"opblock-section"},m.default.createElement("div",{className:"opblock-section-header"},m.default.createElement("h4",null,"Extensions")),m.default.createElement("div",{className:"table-container"},m.default.createElement("table",null,m.default.createElement("thead",null,m.default.createElement("tr",null,m.default.createElement("td",{className:"col_header"},"Field"),m.default.createElement("td",{className:"col_header"},"Value"))),m.default.createElement("tbody",null,(0,f.default)(t=r.entrySeq()).call(t,(e=>{let[t,r]=e;return m.default.createElement(a,{key:`${t}-${r}`,xKey:t,xVal:r})}))))))},Le=e=>{let{xKey:t,xVal:r}=e;const n=r?r.toJS?r.toJS():r:null;return m.default.createElement("tr",null,m.default.createElement("td",null,t),m.default.createElement("td",null,(0,l.default)(n)))};var He=Ge(29),Ke=Ge(8096),Ye=Ge(471),Xe=Ge(9908),Qe=Ge(7068);const et=(e=>{var t={};return Ge.d(t,e),t})({default:()=>ze.default});var tt=Ge(9874);const rt=e=>{let{value:t,fileName:r,className:a,downloadable:l,getConfigs:s,canCopy:o,language:i}=e;const u=(0,Qe.default)(s)?s():null,c=!1!==(0,Xe.default)(u,"syntaxHighlight")&&(0,Xe.default)(u,"syntaxHighlight.activated",!0),d=(0,m.useRef)(null);(0,m.useEffect)((()=>{var e;const t=(0,n.default)(e=(0,de.default)(d.current.childNodes)).call(e,(e=>!!e.nodeType&&e.classList.contains("microlight")));return(0,He.default)(t).call(t,(e=>e.addEventListener("mousewheel",p,{passive:!1}))),()=>{(0,He.default)(t).call(t,(e=>e.removeEventListener("mousewheel",p)))}}),[t,a,i]);const p=e=>{const{target:t,deltaY:r}=e,{scrollHeight:n,offsetHeight:a,scrollTop:l}=t;n>a&&(0===l&&r<0||a+l>=n&&r>0)&&e.preventDefault()};return m.default.createElement("div",{className:"highlight-code",ref:d},l?m.default.createElement("div",{className:"download-contents",onClick:()=>{(0,et.default)(t,r)}},"Download"):null,o&&m.default.createElement("div",{className:"copy-to-clipboard"},m.default.createElement(tt.CopyToClipboard,{text:t},m.default.createElement("button",null))),c?m.default.createElement(Ye.d3,{language:i,className:(0,Ke.default)(a,"microlight"),style:(0,Ye.C2)((0,Xe.default)(u,"syntaxHighlight.theme","agate"))},t):m.default.createElement("pre",{className:(0,Ke.default)(a,"microlight")},t))};rt.defaultProps={fileName:"response.txt"};const nt=rt;class at extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"onChangeProducesWrapper",(e=>this.props.specActions.changeProducesValue([this.props.path,this.props.method],e))),(0,W.default)(this,"onResponseContentTypeChange",(e=>{let{controlsAcceptHeader:t,value:r}=e;const{oas3Actions:n,path:a,method:l}=this.props;t&&n.setResponseContentType({value:r,path:a,method:l})}))}render(){var e;let{responses:t,tryItOutResponse:r,getComponent:n,getConfigs:a,specSelectors:l,fn:s,producesValue:o,displayRequestDuration:i,specPath:u,path:c,method:d,oas3Selectors:p,oas3Actions:h}=this.props,g=(0,w.iQ)(t);const y=n("contentType"),v=n("liveResponse"),E=n("response");let b=this.props.produces&&this.props.produces.size?this.props.produces:at.defaultProps.produces;const S=l.isOAS3()?(0,w.QG)(t):null,_=function(e){let t=arguments.length>1&&void 0!==arguments[1]?arguments[1]:"_";return e.replace(/[^\w-]/g,t)}(`${d}${c}_responses`),C=`${_}_select`;return m.default.createElement("div",{className:"responses-wrapper"},m.default.createElement("div",{className:"opblock-section-header"},m.default.createElement("h4",null,"Responses"),l.isOAS3()?null:m.default.createElement("label",{htmlFor:C},m.default.createElement("span",null,"Response content type"),m.default.createElement(y,{value:o,ariaControls:_,ariaLabel:"Response content type",className:"execute-content-type",contentTypes:b,controlId:C,onChange:this.onChangeProducesWrapper}))),m.default.createElement("div",{className:"responses-inner"},r?m.default.createElement("div",null,m.default.createElement(v,{response:r,getComponent:n,getConfigs:a,specSelectors:l,path:this.props.path,method:this.props.method,displayRequestDuration:i}),m.default.createElement("h4",null,"Responses")):null,m.default.createElement("table",{"aria-live":"polite",className:"responses-table",id:_,role:"region"},m.default.createElement("thead",null,m.default.createElement("tr",{className:"responses-header"},m.default.createElement("td",{className:"col_header response-col_status"},"Code"),m.default.createElement("td",{className:"col_header response-col_description"},"Description"),l.isOAS3()?m.default.createElement("td",{className:"col col_header response-col_links"},"Links"):null)),m.default.createElement("tbody",null,(0,f.default)(e=t.entrySeq()).call(e,(e=>{let[t,i]=e,f=r&&r.get("status")==t?"response_current":"";return m.default.createElement(E,{key:t,path:c,method:d,specPath:u.push(t),isDefault:g===t,fn:s,className:f,code:t,response:i,specSelectors:l,controlsAcceptHeader:i===S,onContentTypeChange:this.onResponseContentTypeChange,contentType:o,getConfigs:a,activeExamplesKey:p.activeExamplesMember(c,d,"responses",t),oas3Actions:h,getComponent:n})})).toArray()))))}}(0,W.default)(at,"defaultProps",{tryItOutResponse:null,produces:(0,y.fromJS)(["application/json"]),displayRequestDuration:!1});const lt=(e=>{var t={};return Ge.d(t,e),t})({default:()=>Fe.default});var st=Ge(2518);class ot extends m.default.Component{constructor(e,t){super(e,t),(0,W.default)(this,"_onContentTypeChange",(e=>{const{onContentTypeChange:t,controlsAcceptHeader:r}=this.props;this.setState({responseContentType:e}),t({value:e,controlsAcceptHeader:r})})),(0,W.default)(this,"getTargetExamplesKey",(()=>{const{response:e,contentType:t,activeExamplesKey:r}=this.props,n=this.state.responseContentType||t,a=e.getIn(["content",n],(0,y.Map)({})).get("examples",null).keySeq().first();return r||a})),this.state={responseContentType:""}}render(){var e,t;let{path:r,method:n,code:a,response:l,className:s,specPath:o,fn:i,getComponent:u,getConfigs:c,specSelectors:d,contentType:p,controlsAcceptHeader:h,oas3Actions:g}=this.props,{inferSchema:v}=i,E=d.isOAS3();const{showExtensions:b}=c();let S=b?(0,w.nX)(l):null,_=l.get("headers"),C=l.get("links");const x=u("ResponseExtension"),A=u("headers"),I=u("highlightCode"),R=u("modelExample"),N=u("Markdown",!0),T=u("operationLink"),O=u("contentType"),k=u("ExamplesSelect"),M=u("Example");var P,j;const L=this.state.responseContentType||p,q=l.getIn(["content",L],(0,y.Map)({})),B=q.get("examples",null);if(E){const e=q.get("schema");P=e?v(e.toJS()):null,j=e?(0,y.List)(["content",this.state.responseContentType,"schema"]):o}else P=l.get("schema"),j=l.has("schema")?o.push("schema"):o;let D,U,V=!1,z={includeReadOnly:!0};if(E){var F;if(U=null===(F=q.get("schema"))||void 0===F?void 0:F.toJS(),B){const e=this.getTargetExamplesKey(),t=e=>e.get("value");D=t(B.get(e,(0,y.Map)({}))),void 0===D&&(D=t((0,lt.default)(B).call(B).next().value)),V=!0}else void 0!==q.get("example")&&(D=q.get("example"),V=!0)}else{U=P,z={...z,includeWriteOnly:!0};const e=l.getIn(["examples",L]);e&&(D=e,V=!0)}let $=((e,t,r)=>{if(null!=e){let n=null;return(0,st.O)(e)&&(n="json"),m.default.createElement("div",null,m.default.createElement(t,{className:"example",getConfigs:r,language:n,value:(0,w.Pz)(e)}))}return null})((0,w.xi)(U,L,z,V?D:void 0),I,c);return m.default.createElement("tr",{className:"response "+(s||""),"data-code":a},m.default.createElement("td",{className:"response-col_status"},a),m.default.createElement("td",{className:"response-col_description"},m.default.createElement("div",{className:"response-col_description__inner"},m.default.createElement(N,{source:l.get("description")})),b&&S.size?(0,f.default)(e=S.entrySeq()).call(e,(e=>{let[t,r]=e;return m.default.createElement(x,{key:`${t}-${r}`,xKey:t,xVal:r})})):null,E&&l.get("content")?m.default.createElement("section",{className:"response-controls"},m.default.createElement("div",{className:(0,Ke.default)("response-control-media-type",{"response-control-media-type--accept-controller":h})},m.default.createElement("small",{className:"response-control-media-type__title"},"Media type"),m.default.createElement(O,{value:this.state.responseContentType,contentTypes:l.get("content")?l.get("content").keySeq():(0,y.Seq)(),onChange:this._onContentTypeChange,ariaLabel:"Media Type"}),h?m.default.createElement("small",{className:"response-control-media-type__accept-message"},"Controls ",m.default.createElement("code",null,"Accept")," header."):null),B?m.default.createElement("div",{className:"response-control-examples"},m.default.createElement("small",{className:"response-control-examples__title"},"Examples"),m.default.createElement(k,{examples:B,currentExampleKey:this.getTargetExamplesKey(),onSelect:e=>g.setActiveExamplesMember({name:e,pathMethod:[r,n],contextType:"responses",contextName:a}),showLabels:!1})):null):null,$||P?m.default.createElement(R,{specPath:j,getComponent:u,getConfigs:c,specSelectors:d,schema:(0,w.oG)(P),example:$,includeReadOnly:!0}):null,E&&B?m.default.createElement(M,{example:B.get(this.getTargetExamplesKey(),(0,y.Map)({})),getComponent:u,getConfigs:c,omitValue:!0}):null,_?m.default.createElement(A,{headers:_,getComponent:u}):null),E?m.default.createElement("td",{className:"response-col_links"},C?(0,f.default)(t=C.toSeq().entrySeq()).call(t,(e=>{let[t,r]=e;return m.default.createElement(T,{key:t,name:t,link:r,getComponent:u})})):m.default.createElement("i",null,"No links")):null)}}(0,W.default)(ot,"defaultProps",{response:(0,y.fromJS)({}),onContentTypeChange:()=>{}});const it=e=>{let{xKey:t,xVal:r}=e;return m.default.createElement("div",{className:"response__extension"},t,": ",String(r))};const ut=(e=>{var t={};return Ge.d(t,e),t})({default:()=>$e.default});const ct=(e=>{var t={};return Ge.d(t,e),t})({default:()=>Je.default});class dt extends m.default.PureComponent{constructor(){super(...arguments),(0,W.default)(this,"state",{parsedContent:null}),(0,W.default)(this,"updateParsedContent",(e=>{const{content:t}=this.props;if(e!==t)if(t&&t instanceof Blob){var r=new FileReader;r.onload=()=>{this.setState({parsedContent:r.result})},r.readAsText(t)}else this.setState({parsedContent:t.toString()})}))}componentDidMount(){this.updateParsedContent(null)}componentDidUpdate(e){this.updateParsedContent(e.content)}render(){let{content:e,contentType:t,url:n,headers:a={},getConfigs:s,getComponent:o}=this.props;const{parsedContent:i}=this.state,u=o("highlightCode"),c="response_"+(new Date).getTime();let d,p;if(n=n||"",/^application\/octet-stream/i.test(t)||a["Content-Disposition"]&&/attachment/i.test(a["Content-Disposition"])||a["content-disposition"]&&/attachment/i.test(a["content-disposition"])||a["Content-Description"]&&/File Transfer/i.test(a["Content-Description"])||a["content-description"]&&/File Transfer/i.test(a["content-description"]))if("Blob"in window){let l=t||"text/html",s=e instanceof Blob?e:new Blob([e],{type:l}),o=Ce.default.createObjectURL(s),i=[l,n.substr((0,r.default)(n).call(n,"/")+1),o].join(":"),u=a["content-disposition"]||a["Content-Disposition"];if(void 0!==u){let e=(0,w.DR)(u);null!==e&&(i=e)}p=_.Z.navigator&&_.Z.navigator.msSaveOrOpenBlob?m.default.createElement("div",null,m.default.createElement("a",{href:o,onClick:()=>_.Z.navigator.msSaveOrOpenBlob(s,i)},"Download file")):m.default.createElement("div",null,m.default.createElement("a",{href:o,download:i},"Download file"))}else p=m.default.createElement("pre",{className:"microlight"},"Download headers detected but your browser does not support downloading binary via XHR (Blob).");else if(/json/i.test(t)){let t=null;(0,st.O)(e)&&(t="json");try{d=(0,l.default)(JSON.parse(e),null,"  ")}catch(t){d="can't parse JSON.  Raw result:\n\n"+e}p=m.default.createElement(u,{language:t,downloadable:!0,fileName:`${c}.json`,value:d,getConfigs:s,canCopy:!0})}else/xml/i.test(t)?(d=(0,ut.default)(e,{textNodesOnSameLine:!0,indentor:"  "}),p=m.default.createElement(u,{downloadable:!0,fileName:`${c}.xml`,value:d,getConfigs:s,canCopy:!0})):p="text/html"===(0,ct.default)(t)||/text\/plain/.test(t)?m.default.createElement(u,{downloadable:!0,fileName:`${c}.html`,value:e,getConfigs:s,canCopy:!0}):"text/csv"===(0,ct.default)(t)||/text\/csv/.test(t)?m.default.createElement(u,{downloadable:!0,fileName:`${c}.csv`,value:e,getConfigs:s,canCopy:!0}):/^image\//i.test(t)?(0,fe.default)(t).call(t,"svg")?m.default.createElement("div",null," ",e," "):m.default.createElement("img",{src:Ce.default.createObjectURL(e)}):/^audio\//i.test(t)?m.default.createElement("pre",{className:"microlight"},m.default.createElement("audio",{controls:!0,key:n},m.default.createElement("source",{src:n,type:t}))):"string"==typeof e?m.default.createElement(u,{downloadable:!0,fileName:`${c}.txt`,value:e,getConfigs:s,canCopy:!0}):e.size>0?i?m.default.createElement("div",null,m.default.createElement("p",{className:"i"},"Unrecognized response type; displaying content as text."),m.default.createElement(u,{downloadable:!0,fileName:`${c}.txt`,value:i,getConfigs:s,canCopy:!0})):m.default.createElement("p",{className:"i"},"Unrecognized response type; unable to display."):null;return p?m.default.createElement("div",null,m.default.createElement("h5",null,"Response body"),p):null}}var pt=Ge(374);class ft extends m.Component{constructor(e){super(e),(0,W.default)(this,"onChange",((e,t,r)=>{let{specActions:{changeParamByIdentity:n},onChangeKey:a}=this.props;n(a,e,t,r)})),(0,W.default)(this,"onChangeConsumesWrapper",(e=>{let{specActions:{changeConsumesValue:t},onChangeKey:r}=this.props;t(r,e)})),(0,W.default)(this,"toggleTab",(e=>"parameters"===e?this.setState({parametersVisible:!0,callbackVisible:!1}):"callbacks"===e?this.setState({callbackVisible:!0,parametersVisible:!1}):void 0)),(0,W.default)(this,"onChangeMediaType",(e=>{let{value:t,pathMethod:r}=e,{specActions:n,oas3Selectors:a,oas3Actions:l}=this.props;const s=a.hasUserEditedBody(...r),o=a.shouldRetainRequestBodyValue(...r);l.setRequestContentType({value:t,pathMethod:r}),l.initRequestBodyValidateError({pathMethod:r}),s||(o||l.setRequestBodyValue({value:void 0,pathMethod:r}),n.clearResponse(...r),n.clearRequest(...r),n.clearValidateParams(r))})),this.state={callbackVisible:!1,parametersVisible:!0}}render(){var e;let{onTryoutClick:t,onResetClick:r,parameters:n,allowTryItOut:a,tryItOutEnabled:l,specPath:s,fn:o,getComponent:i,getConfigs:u,specSelectors:d,specActions:g,pathMethod:v,oas3Actions:E,oas3Selectors:b,operation:S}=this.props;const _=i("parameterRow"),w=i("TryItOutButton"),C=i("contentType"),x=i("Callbacks",!0),A=i("RequestBody",!0),I=l&&a,R=d.isOAS3(),N=S.get("requestBody"),T=(0,p.default)(e=(0,pt.default)((0,p.default)(n).call(n,((e,t)=>{const r=t.get("in");return e[r]??(e[r]=[]),e[r].push(t),e}),{}))).call(e,((e,t)=>(0,h.default)(e).call(e,t)),[]);return m.default.createElement("div",{className:"opblock-section"},m.default.createElement("div",{className:"opblock-section-header"},R?m.default.createElement("div",{className:"tab-header"},m.default.createElement("div",{onClick:()=>this.toggleTab("parameters"),className:`tab-item ${this.state.parametersVisible&&"active"}`},m.default.createElement("h4",{className:"opblock-title"},m.default.createElement("span",null,"Parameters"))),S.get("callbacks")?m.default.createElement("div",{onClick:()=>this.toggleTab("callbacks"),className:`tab-item ${this.state.callbackVisible&&"active"}`},m.default.createElement("h4",{className:"opblock-title"},m.default.createElement("span",null,"Callbacks"))):null):m.default.createElement("div",{className:"tab-header"},m.default.createElement("h4",{className:"opblock-title"},"Parameters")),a?m.default.createElement(w,{isOAS3:d.isOAS3(),hasUserEditedBody:b.hasUserEditedBody(...v),enabled:l,onCancelClick:this.props.onCancelClick,onTryoutClick:t,onResetClick:()=>r(v)}):null),this.state.parametersVisible?m.default.createElement("div",{className:"parameters-container"},T.length?m.default.createElement("div",{className:"table-container"},m.default.createElement("table",{className:"parameters"},m.default.createElement("thead",null,m.default.createElement("tr",null,m.default.createElement("th",{className:"col_header parameters-col_name"},"Name"),m.default.createElement("th",{className:"col_header parameters-col_description"},"Description"))),m.default.createElement("tbody",null,(0,f.default)(T).call(T,((e,t)=>m.default.createElement(_,{fn:o,specPath:s.push(t.toString()),getComponent:i,getConfigs:u,rawParam:e,param:d.parameterWithMetaByIdentity(v,e),key:`${e.get("in")}.${e.get("name")}`,onChange:this.onChange,onChangeConsumes:this.onChangeConsumesWrapper,specSelectors:d,specActions:g,oas3Actions:E,oas3Selectors:b,pathMethod:v,isExecute:I})))))):m.default.createElement("div",{className:"opblock-description-wrapper"},m.default.createElement("p",null,"No parameters"))):null,this.state.callbackVisible?m.default.createElement("div",{className:"callbacks-container opblock-description-wrapper"},m.default.createElement(x,{callbacks:(0,y.Map)(S.get("callbacks")),specPath:(0,c.default)(s).call(s,0,-1).push("callbacks")})):null,R&&N&&this.state.parametersVisible&&m.default.createElement("div",{className:"opblock-section opblock-section-request-body"},m.default.createElement("div",{className:"opblock-section-header"},m.default.createElement("h4",{className:`opblock-title parameter__name ${N.get("required")&&"required"}`},"Request body"),m.default.createElement("label",null,m.default.createElement(C,{value:b.requestContentType(...v),contentTypes:N.get("content",(0,y.List)()).keySeq(),onChange:e=>{this.onChangeMediaType({value:e,pathMethod:v})},className:"body-param-content-type",ariaLabel:"Request content type"}))),m.default.createElement("div",{className:"opblock-description-wrapper"},m.default.createElement(A,{setRetainRequestBodyValueFlag:e=>E.setRetainRequestBodyValueFlag({value:e,pathMethod:v}),userHasEditedBody:b.hasUserEditedBody(...v),specPath:(0,c.default)(s).call(s,0,-1).push("requestBody"),requestBody:N,requestBodyValue:b.requestBodyValue(...v),requestBodyInclusionSetting:b.requestBodyInclusionSetting(...v),requestBodyErrors:b.requestBodyErrors(...v),isExecute:I,getConfigs:u,activeExamplesKey:b.activeExamplesMember(...v,"requestBody","requestBody"),updateActiveExamplesKey:e=>{this.props.oas3Actions.setActiveExamplesMember({name:e,pathMethod:this.props.pathMethod,contextType:"requestBody",contextName:"requestBody"})},onChange:(e,t)=>{if(t){const r=b.requestBodyValue(...v),n=y.Map.isMap(r)?r:(0,y.Map)();return E.setRequestBodyValue({pathMethod:v,value:n.setIn(t,e)})}E.setRequestBodyValue({value:e,pathMethod:v})},onChangeIncludeEmpty:(e,t)=>{E.setRequestBodyInclusion({pathMethod:v,value:t,name:e})},contentType:b.requestContentType(...v)}))))}}(0,W.default)(ft,"defaultProps",{onTryoutClick:Function.prototype,onCancelClick:Function.prototype,tryItOutEnabled:!1,allowTryItOut:!0,onChangeKey:[],specPath:[]});const ht=e=>{let{xKey:t,xVal:r}=e;return m.default.createElement("div",{className:"parameter__extension"},t,": ",String(r))},mt={onChange:()=>{},isIncludedOptions:{}};class gt extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onCheckboxChange",(e=>{const{onChange:t}=this.props;t(e.target.checked)}))}componentDidMount(){const{isIncludedOptions:e,onChange:t}=this.props,{shouldDispatchInit:r,defaultValue:n}=e;r&&t(n)}render(){let{isIncluded:e,isDisabled:t}=this.props;return m.default.createElement("div",null,m.default.createElement("label",{className:(0,Ke.default)("parameter__empty_value_toggle",{disabled:t})},m.default.createElement("input",{type:"checkbox",disabled:t,checked:!t&&e,onChange:this.onCheckboxChange}),"Send empty value"))}}(0,W.default)(gt,"defaultProps",mt);var yt=Ge(9069);class vt extends m.Component{constructor(e,t){var r;super(e,t),r=this,(0,W.default)(this,"onChangeWrapper",(function(e){let t,n=arguments.length>1&&void 0!==arguments[1]&&arguments[1],{onChange:a,rawParam:l}=r.props;return t=""===e||e&&0===e.size?null:e,a(l,t,n)})),(0,W.default)(this,"_onExampleSelect",(e=>{this.props.oas3Actions.setActiveExamplesMember({name:e,pathMethod:this.props.pathMethod,contextType:"parameters",contextName:this.getParamKey()})})),(0,W.default)(this,"onChangeIncludeEmpty",(e=>{let{specActions:t,param:r,pathMethod:n}=this.props;const a=r.get("name"),l=r.get("in");return t.updateEmptyParamInclusion(n,a,l,e)})),(0,W.default)(this,"setDefaultValue",(()=>{let{specSelectors:e,pathMethod:t,rawParam:r,oas3Selectors:n}=this.props;const a=e.parameterWithMetaByIdentity(t,r)||(0,y.Map)(),{schema:l}=(0,yt.Z)(a,{isOAS3:e.isOAS3()}),s=a.get("content",(0,y.Map)()).keySeq().first(),o=l?(0,w.xi)(l.toJS(),s,{includeWriteOnly:!0}):null;if(a&&void 0===a.get("value")&&"body"!==a.get("in")){let r;if(e.isSwagger2())r=void 0!==a.get("x-example")?a.get("x-example"):void 0!==a.getIn(["schema","example"])?a.getIn(["schema","example"]):l&&l.getIn(["default"]);else if(e.isOAS3()){const e=n.activeExamplesMember(...t,"parameters",this.getParamKey());r=void 0!==a.getIn(["examples",e,"value"])?a.getIn(["examples",e,"value"]):void 0!==a.getIn(["content",s,"example"])?a.getIn(["content",s,"example"]):void 0!==a.get("example")?a.get("example"):void 0!==(l&&l.get("example"))?l&&l.get("example"):void 0!==(l&&l.get("default"))?l&&l.get("default"):a.get("default")}void 0===r||y.List.isList(r)||(r=(0,w.Pz)(r)),void 0!==r?this.onChangeWrapper(r):l&&"object"===l.get("type")&&o&&!a.get("examples")&&this.onChangeWrapper(y.List.isList(o)?o:(0,w.Pz)(o))}})),this.setDefaultValue()}UNSAFE_componentWillReceiveProps(e){let t,{specSelectors:r,pathMethod:n,rawParam:a}=e,l=r.isOAS3(),s=r.parameterWithMetaByIdentity(n,a)||new y.Map;if(s=s.isEmpty()?a:s,l){let{schema:e}=(0,yt.Z)(s,{isOAS3:l});t=e?e.get("enum"):void 0}else t=s?s.get("enum"):void 0;let o,i=s?s.get("value"):void 0;void 0!==i?o=i:a.get("required")&&t&&t.size&&(o=t.first()),void 0!==o&&o!==i&&this.onChangeWrapper((0,w.D$)(o)),this.setDefaultValue()}getParamKey(){const{param:e}=this.props;return e?`${e.get("name")}-${e.get("in")}`:null}render(){var e,t;let{param:r,rawParam:n,getComponent:a,getConfigs:l,isExecute:s,fn:o,onChangeConsumes:i,specSelectors:u,pathMethod:c,specPath:d,oas3Selectors:p}=this.props,h=u.isOAS3();const{showExtensions:g,showCommonExtensions:v}=l();if(r||(r=n),!n)return null;const E=a("JsonSchemaForm"),b=a("ParamBody");let S=r.get("in"),C="body"!==S?null:m.default.createElement(b,{getComponent:a,getConfigs:l,fn:o,param:r,consumes:u.consumesOptionsFor(c),consumesValue:u.contentTypeValues(c).get("requestContentType"),onChange:this.onChangeWrapper,onChangeConsumes:i,isExecute:s,specSelectors:u,pathMethod:c});const x=a("modelExample"),A=a("Markdown",!0),I=a("ParameterExt"),R=a("ParameterIncludeEmpty"),N=a("ExamplesSelectValueRetainer"),T=a("Example");let O,k,M,P,{schema:j}=(0,yt.Z)(r,{isOAS3:h}),L=u.parameterWithMetaByIdentity(c,n)||(0,y.Map)(),q=j?j.get("format"):null,B=j?j.get("type"):null,D=j?j.getIn(["items","type"]):null,U="formData"===S,V="FormData"in _.Z,z=r.get("required"),F=L?L.get("value"):"",$=v?(0,w.po)(j):null,J=g?(0,w.nX)(r):null,W=!1;return void 0!==r&&j&&(O=j.get("items")),void 0!==O?(k=O.get("enum"),M=O.get("default")):j&&(k=j.get("enum")),k&&k.size&&k.size>0&&(W=!0),void 0!==r&&(j&&(M=j.get("default")),void 0===M&&(M=r.get("default")),P=r.get("example"),void 0===P&&(P=r.get("x-example"))),m.default.createElement("tr",{"data-param-name":r.get("name"),"data-param-in":r.get("in")},m.default.createElement("td",{className:"parameters-col_name"},m.default.createElement("div",{className:z?"parameter__name required":"parameter__name"},r.get("name"),z?m.default.createElement("span",null," *"):null),m.default.createElement("div",{className:"parameter__type"},B,D&&`[${D}]`,q&&m.default.createElement("span",{className:"prop-format"},"($",q,")")),m.default.createElement("div",{className:"parameter__deprecated"},h&&r.get("deprecated")?"deprecated":null),m.default.createElement("div",{className:"parameter__in"},"(",r.get("in"),")"),v&&$.size?(0,f.default)(e=$.entrySeq()).call(e,(e=>{let[t,r]=e;return m.default.createElement(I,{key:`${t}-${r}`,xKey:t,xVal:r})})):null,g&&J.size?(0,f.default)(t=J.entrySeq()).call(t,(e=>{let[t,r]=e;return m.default.createElement(I,{key:`${t}-${r}`,xKey:t,xVal:r})})):null),m.default.createElement("td",{className:"parameters-col_description"},r.get("description")?m.default.createElement(A,{source:r.get("description")}):null,!C&&s||!W?null:m.default.createElement(A,{className:"parameter__enum",source:"<i>Available values</i> : "+(0,f.default)(k).call(k,(function(e){return e})).toArray().join(", ")}),!C&&s||void 0===M?null:m.default.createElement(A,{className:"parameter__default",source:"<i>Default value</i> : "+M}),!C&&s||void 0===P?null:m.default.createElement(A,{source:"<i>Example</i> : "+P}),U&&!V&&m.default.createElement("div",null,"Error: your browser does not support FormData"),h&&r.get("examples")?m.default.createElement("section",{className:"parameter-controls"},m.default.createElement(N,{examples:r.get("examples"),onSelect:this._onExampleSelect,updateValue:this.onChangeWrapper,getComponent:a,defaultToFirstExample:!0,currentKey:p.activeExamplesMember(...c,"parameters",this.getParamKey()),currentUserInputValue:F})):null,C?null:m.default.createElement(E,{fn:o,getComponent:a,value:F,required:z,disabled:!s,description:r.get("name"),onChange:this.onChangeWrapper,errors:L.get("errors"),schema:j}),C&&j?m.default.createElement(x,{getComponent:a,specPath:d.push("schema"),getConfigs:l,isExecute:s,specSelectors:u,schema:j,example:C,includeWriteOnly:!0}):null,!C&&s&&r.get("allowEmptyValue")?m.default.createElement(R,{onChange:this.onChangeIncludeEmpty,isIncluded:u.parameterInclusionSettingFor(c,r.get("name"),r.get("in")),isDisabled:!(0,w.O2)(F)}):null,h&&r.get("examples")?m.default.createElement(T,{example:r.getIn(["examples",p.activeExamplesMember(...c,"parameters",this.getParamKey())]),getComponent:a,getConfigs:l}):null))}}var Et=Ge(6235);class bt extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"handleValidateParameters",(()=>{let{specSelectors:e,specActions:t,path:r,method:n}=this.props;return t.validateParams([r,n]),e.validateBeforeExecute([r,n])})),(0,W.default)(this,"handleValidateRequestBody",(()=>{let{path:e,method:t,specSelectors:r,oas3Selectors:n,oas3Actions:a}=this.props,l={missingBodyValue:!1,missingRequiredKeys:[]};a.clearRequestBodyValidateError({path:e,method:t});let s=r.getOAS3RequiredRequestBodyContentType([e,t]),o=n.requestBodyValue(e,t),i=n.validateBeforeExecute([e,t]),u=n.requestContentType(e,t);if(!i)return l.missingBodyValue=!0,a.setRequestBodyValidateError({path:e,method:t,validationErrors:l}),!1;if(!s)return!0;let c=n.validateShallowRequired({oas3RequiredRequestBodyContentType:s,oas3RequestContentType:u,oas3RequestBodyValue:o});return!c||c.length<1||((0,He.default)(c).call(c,(e=>{l.missingRequiredKeys.push(e)})),a.setRequestBodyValidateError({path:e,method:t,validationErrors:l}),!1)})),(0,W.default)(this,"handleValidationResultPass",(()=>{let{specActions:e,operation:t,path:r,method:n}=this.props;this.props.onExecute&&this.props.onExecute(),e.execute({operation:t,path:r,method:n})})),(0,W.default)(this,"handleValidationResultFail",(()=>{let{specActions:e,path:t,method:r}=this.props;e.clearValidateParams([t,r]),(0,Et.default)((()=>{e.validateParams([t,r])}),40)})),(0,W.default)(this,"handleValidationResult",(e=>{e?this.handleValidationResultPass():this.handleValidationResultFail()})),(0,W.default)(this,"onClick",(()=>{let e=this.handleValidateParameters(),t=this.handleValidateRequestBody(),r=e&&t;this.handleValidationResult(r)})),(0,W.default)(this,"onChangeProducesWrapper",(e=>this.props.specActions.changeProducesValue([this.props.path,this.props.method],e)))}render(){const{disabled:e}=this.props;return m.default.createElement("button",{className:"btn execute opblock-control__btn",onClick:this.onClick,disabled:e},"Execute")}}class St extends m.default.Component{render(){var e;let{headers:t,getComponent:r}=this.props;const n=r("Property"),a=r("Markdown",!0);return t&&t.size?m.default.createElement("div",{className:"headers-wrapper"},m.default.createElement("h4",{className:"headers__title"},"Headers:"),m.default.createElement("table",{className:"headers"},m.default.createElement("thead",null,m.default.createElement("tr",{className:"header-row"},m.default.createElement("th",{className:"header-col"},"Name"),m.default.createElement("th",{className:"header-col"},"Description"),m.default.createElement("th",{className:"header-col"},"Type"))),m.default.createElement("tbody",null,(0,f.default)(e=t.entrySeq()).call(e,(e=>{let[t,r]=e;if(!y.default.Map.isMap(r))return null;const l=r.get("description"),s=r.getIn(["schema"])?r.getIn(["schema","type"]):r.getIn(["type"]),o=r.getIn(["schema","example"]);return m.default.createElement("tr",{key:t},m.default.createElement("td",{className:"header-col"},t),m.default.createElement("td",{className:"header-col"},l?m.default.createElement(a,{source:l}):null),m.default.createElement("td",{className:"header-col"},s," ",o?m.default.createElement(n,{propKey:"Example",propVal:o,propClass:"header-example"}):null))})).toArray()))):null}}class _t extends m.default.Component{render(){let{editorActions:e,errSelectors:t,layoutSelectors:r,layoutActions:a,getComponent:l}=this.props;const s=l("Collapse");if(e&&e.jumpToLine)var o=e.jumpToLine;let i=t.allErrors(),u=(0,n.default)(i).call(i,(e=>"thrown"===e.get("type")||"error"===e.get("level")));if(!u||u.count()<1)return null;let c=r.isShown(["errorPane"],!0),d=u.sortBy((e=>e.get("line")));return m.default.createElement("pre",{className:"errors-wrapper"},m.default.createElement("hgroup",{className:"error"},m.default.createElement("h4",{className:"errors__title"},"Errors"),m.default.createElement("button",{className:"btn errors__clear-btn",onClick:()=>a.show(["errorPane"],!c)},c?"Hide":"Show")),m.default.createElement(s,{isOpened:c,animated:!0},m.default.createElement("div",{className:"errors"},(0,f.default)(d).call(d,((e,t)=>{let r=e.get("type");return"thrown"===r||"auth"===r?m.default.createElement(wt,{key:t,error:e.get("error")||e,jumpToLine:o}):"spec"===r?m.default.createElement(Ct,{key:t,error:e,jumpToLine:o}):void 0})))))}}const wt=e=>{let{error:t,jumpToLine:r}=e;if(!t)return null;let n=t.get("line");return m.default.createElement("div",{className:"error-wrapper"},t?m.default.createElement("div",null,m.default.createElement("h4",null,t.get("source")&&t.get("level")?xt(t.get("source"))+" "+t.get("level"):"",t.get("path")?m.default.createElement("small",null," at ",t.get("path")):null),m.default.createElement("span",{className:"message thrown"},t.get("message")),m.default.createElement("div",{className:"error-line"},n&&r?m.default.createElement("a",{onClick:(0,i.default)(r).call(r,null,n)},"Jump to line ",n):null)):null)},Ct=e=>{let{error:t,jumpToLine:r}=e,n=null;return t.get("path")?n=y.List.isList(t.get("path"))?m.default.createElement("small",null,"at ",t.get("path").join(".")):m.default.createElement("small",null,"at ",t.get("path")):t.get("line")&&!r&&(n=m.default.createElement("small",null,"on line ",t.get("line"))),m.default.createElement("div",{className:"error-wrapper"},t?m.default.createElement("div",null,m.default.createElement("h4",null,xt(t.get("source"))+" "+t.get("level")," ",n),m.default.createElement("span",{className:"message"},t.get("message")),m.default.createElement("div",{className:"error-line"},r?m.default.createElement("a",{onClick:(0,i.default)(r).call(r,null,t.get("line"))},"Jump to line ",t.get("line")):null)):null)};function xt(e){var t;return(0,f.default)(t=(e||"").split(" ")).call(t,(e=>e[0].toUpperCase()+(0,c.default)(e).call(e,1))).join(" ")}wt.defaultProps={jumpToLine:null};class At extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"onChangeWrapper",(e=>this.props.onChange(e.target.value)))}componentDidMount(){this.props.contentTypes&&this.props.onChange(this.props.contentTypes.first())}UNSAFE_componentWillReceiveProps(e){var t;e.contentTypes&&e.contentTypes.size&&((0,fe.default)(t=e.contentTypes).call(t,e.value)||e.onChange(e.contentTypes.first()))}render(){let{ariaControls:e,ariaLabel:t,className:r,contentTypes:n,controlId:a,value:l}=this.props;return n&&n.size?m.default.createElement("div",{className:"content-type-wrapper "+(r||"")},m.default.createElement("select",{"aria-controls":e,"aria-label":t,className:"content-type",id:a,onChange:this.onChangeWrapper,value:l||""},(0,f.default)(n).call(n,(e=>m.default.createElement("option",{key:e,value:e},e))).toArray())):null}}(0,W.default)(At,"defaultProps",{onChange:()=>{},value:null,contentTypes:(0,y.fromJS)(["application/json"])});var It=Ge(863),Rt=Ge(5942);function Nt(){for(var e,t=arguments.length,r=new Array(t),a=0;a<t;a++)r[a]=arguments[a];return(0,Rt.default)(e=(0,n.default)(r).call(r,(e=>!!e)).join(" ")).call(e)}class Tt extends m.default.Component{render(){let{fullscreen:e,full:t,...r}=this.props;if(e)return m.default.createElement("section",r);let n="swagger-container"+(t?"-full":"");return m.default.createElement("section",(0,It.default)({},r,{className:Nt(r.className,n)}))}}const Ot={mobile:"",tablet:"-tablet",desktop:"-desktop",large:"-hd"};class kt extends m.default.Component{render(){const{hide:e,keepContents:t,mobile:r,tablet:n,desktop:a,large:l,...s}=this.props;if(e&&!t)return m.default.createElement("span",null);let o=[];for(let e in Ot){if(!Object.prototype.hasOwnProperty.call(Ot,e))continue;let t=Ot[e];if(e in this.props){let r=this.props[e];if(r<1){o.push("none"+t);continue}o.push("block"+t),o.push("col-"+r+t)}}e&&o.push("hidden");let i=Nt(s.className,...o);return m.default.createElement("section",(0,It.default)({},s,{className:i}))}}class Mt extends m.default.Component{render(){return m.default.createElement("div",(0,It.default)({},this.props,{className:Nt(this.props.className,"wrapper")}))}}class Pt extends m.default.Component{render(){return m.default.createElement("button",(0,It.default)({},this.props,{className:Nt(this.props.className,"button")}))}}(0,W.default)(Pt,"defaultProps",{className:""});const jt=e=>m.default.createElement("textarea",e),Lt=e=>m.default.createElement("input",e);class qt extends m.default.Component{constructor(e,t){let r;super(e,t),(0,W.default)(this,"onChange",(e=>{let t,{onChange:r,multiple:a}=this.props,l=(0,c.default)([]).call(e.target.options);var s;a?t=(0,f.default)(s=(0,n.default)(l).call(l,(function(e){return e.selected}))).call(s,(function(e){return e.value})):t=e.target.value;this.setState({value:t}),r&&r(t)})),r=e.value?e.value:e.multiple?[""]:"",this.state={value:r}}UNSAFE_componentWillReceiveProps(e){e.value!==this.props.value&&this.setState({value:e.value})}render(){var e,t;let{allowedValues:r,multiple:n,allowEmptyValue:a,disabled:l}=this.props,s=(null===(e=this.state.value)||void 0===e||null===(t=e.toJS)||void 0===t?void 0:t.call(e))||this.state.value;return m.default.createElement("select",{className:this.props.className,multiple:n,value:s,onChange:this.onChange,disabled:l},a?m.default.createElement("option",{value:""},"--"):null,(0,f.default)(r).call(r,(function(e,t){return m.default.createElement("option",{key:t,value:String(e)},String(e))})))}}(0,W.default)(qt,"defaultProps",{multiple:!1,allowEmptyValue:!0});class Bt extends m.default.Component{render(){return m.default.createElement("a",(0,It.default)({},this.props,{rel:"noopener noreferrer",className:Nt(this.props.className,"link")}))}}const Dt=e=>{let{children:t}=e;return m.default.createElement("div",{className:"no-margin"}," ",t," ")};class Ut extends m.default.Component{renderNotAnimated(){return this.props.isOpened?m.default.createElement(Dt,null,this.props.children):m.default.createElement("noscript",null)}render(){let{animated:e,isOpened:t,children:r}=this.props;return e?(r=t?r:null,m.default.createElement(Dt,null,r)):this.renderNotAnimated()}}(0,W.default)(Ut,"defaultProps",{isOpened:!1,animated:!1});class Vt extends m.default.Component{constructor(){var e;super(...arguments),this.setTagShown=(0,i.default)(e=this._setTagShown).call(e,this)}_setTagShown(e,t){this.props.layoutActions.show(e,t)}showOp(e,t){let{layoutActions:r}=this.props;r.show(e,t)}render(){let{specSelectors:e,layoutSelectors:t,layoutActions:r,getComponent:n}=this.props,a=e.taggedOperations();const l=n("Collapse");return m.default.createElement("div",null,m.default.createElement("h4",{className:"overview-title"},"Overview"),(0,f.default)(a).call(a,((e,n)=>{let a=e.get("operations"),s=["overview-tags",n],o=t.isShown(s,!0);return m.default.createElement("div",{key:"overview-"+n},m.default.createElement("h4",{onClick:()=>r.show(s,!o),className:"link overview-tag"}," ",o?"-":"+",n),m.default.createElement(l,{isOpened:o,animated:!0},(0,f.default)(a).call(a,(e=>{let{path:n,method:a,id:l}=e.toObject(),s="operations",o=l,i=t.isShown([s,o]);return m.default.createElement(zt,{key:l,path:n,method:a,id:n+"-"+a,shown:i,showOpId:o,showOpIdPrefix:s,href:`#operation-${o}`,onClick:r.show})})).toArray()))})).toArray(),a.size<1&&m.default.createElement("h3",null," No operations defined in spec! "))}}class zt extends m.default.Component{constructor(e){var t;super(e),this.onClick=(0,i.default)(t=this._onClick).call(t,this)}_onClick(){let{showOpId:e,showOpIdPrefix:t,onClick:r,shown:n}=this.props;r([t,e],!n)}render(){let{id:e,method:t,shown:r,href:n}=this.props;return m.default.createElement(Bt,{href:n,onClick:this.onClick,className:"block opblock-link "+(r?"shown":"")},m.default.createElement("div",null,m.default.createElement("small",{className:`bold-label-${t}`},t.toUpperCase()),m.default.createElement("span",{className:"bold-label"},e)))}}class Ft extends m.default.Component{componentDidMount(){this.props.initialValue&&(this.inputRef.value=this.props.initialValue)}render(){const{value:e,defaultValue:t,initialValue:r,...n}=this.props;return m.default.createElement("input",(0,It.default)({},n,{ref:e=>this.inputRef=e}))}}class $t extends m.default.Component{render(){let{host:e,basePath:t}=this.props;return m.default.createElement("pre",{className:"base-url"},"[ Base URL: ",e,t," ]")}}class Jt extends m.default.Component{render(){let{data:e,getComponent:t,selectedServer:r,url:n}=this.props,a=e.get("name")||"the developer",l=Ie(e.get("url"),n,{selectedServer:r}),s=e.get("email");const o=t("Link");return m.default.createElement("div",{className:"info__contact"},l&&m.default.createElement("div",null,m.default.createElement(o,{href:(0,w.Nm)(l),target:"_blank"},a," - Website")),s&&m.default.createElement(o,{href:(0,w.Nm)(`mailto:${s}`)},l?`Send email to ${a}`:`Contact ${a}`))}}class Wt extends m.default.Component{render(){let{license:e,getComponent:t,selectedServer:r,url:n}=this.props;const a=t("Link");let l=e.get("name")||"License",s=Ie(e.get("url"),n,{selectedServer:r});return m.default.createElement("div",{className:"info__license"},s?m.default.createElement(a,{target:"_blank",href:(0,w.Nm)(s)},l):m.default.createElement("span",null,l))}}class Ht extends m.default.PureComponent{render(){const{url:e,getComponent:t}=this.props,r=t("Link");return m.default.createElement(r,{target:"_blank",href:(0,w.Nm)(e)},m.default.createElement("span",{className:"url"}," ",e))}}class Kt extends m.default.Component{render(){let{info:e,url:t,host:r,basePath:n,getComponent:a,externalDocs:l,selectedServer:s,url:o}=this.props,i=e.get("version"),u=e.get("description"),c=e.get("title"),d=Ie(e.get("termsOfService"),o,{selectedServer:s}),p=e.get("contact"),f=e.get("license"),h=Ie(l&&l.get("url"),o,{selectedServer:s}),g=l&&l.get("description");const y=a("Markdown",!0),v=a("Link"),E=a("VersionStamp"),b=a("InfoUrl"),S=a("InfoBasePath");return m.default.createElement("div",{className:"info"},m.default.createElement("hgroup",{className:"main"},m.default.createElement("h2",{className:"title"},c,i&&m.default.createElement(E,{version:i})),r||n?m.default.createElement(S,{host:r,basePath:n}):null,t&&m.default.createElement(b,{getComponent:a,url:t})),m.default.createElement("div",{className:"description"},m.default.createElement(y,{source:u})),d&&m.default.createElement("div",{className:"info__tos"},m.default.createElement(v,{target:"_blank",href:(0,w.Nm)(d)},"Terms of service")),p&&p.size?m.default.createElement(Jt,{getComponent:a,data:p,selectedServer:s,url:t}):null,f&&f.size?m.default.createElement(Wt,{getComponent:a,license:f,selectedServer:s,url:t}):null,h?m.default.createElement(v,{className:"info__extdocs",target:"_blank",href:(0,w.Nm)(h)},g||h):null)}}class Gt extends m.default.Component{render(){const{specSelectors:e,getComponent:t,oas3Selectors:r}=this.props,n=e.info(),a=e.url(),l=e.basePath(),s=e.host(),o=e.externalDocs(),i=r.selectedServer(),u=t("info");return m.default.createElement("div",null,n&&n.count()?m.default.createElement(u,{info:n,url:a,host:s,basePath:l,externalDocs:o,getComponent:t,selectedServer:i}):null)}}class Zt extends m.default.Component{render(){return null}}class Yt extends m.default.Component{render(){return m.default.createElement("div",{className:"view-line-link copy-to-clipboard",title:"Copy to clipboard"},m.default.createElement(tt.CopyToClipboard,{text:this.props.textToCopy},m.default.createElement("svg",{width:"15",height:"16"},m.default.createElement("use",{href:"#copy",xlinkHref:"#copy"}))))}}class Xt extends m.default.Component{render(){return m.default.createElement("div",{className:"footer"})}}class Qt extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"onFilterChange",(e=>{const{target:{value:t}}=e;this.props.layoutActions.updateFilter(t)}))}render(){const{specSelectors:e,layoutSelectors:t,getComponent:r}=this.props,n=r("Col"),a="loading"===e.loadingStatus(),l="failed"===e.loadingStatus(),s=t.currentFilter(),o=["operation-filter-input"];return l&&o.push("failed"),a&&o.push("loading"),m.default.createElement("div",null,null===s||!1===s||"false"===s?null:m.default.createElement("div",{className:"filter-container"},m.default.createElement(n,{className:"filter wrapper",mobile:12},m.default.createElement("input",{className:o.join(" "),placeholder:"Filter by tag",type:"text",onChange:this.onFilterChange,value:!0===s||"true"===s?"":s,disabled:a}))))}}const er=Function.prototype;class tr extends m.PureComponent{constructor(e,t){super(e,t),(0,W.default)(this,"updateValues",(e=>{let{param:t,isExecute:r,consumesValue:n=""}=e,a=/xml/i.test(n),l=/json/i.test(n),s=a?t.get("value_xml"):t.get("value");if(void 0!==s){let e=!s&&l?"{}":s;this.setState({value:e}),this.onChange(e,{isXml:a,isEditBox:r})}else a?this.onChange(this.sample("xml"),{isXml:a,isEditBox:r}):this.onChange(this.sample(),{isEditBox:r})})),(0,W.default)(this,"sample",(e=>{let{param:t,fn:{inferSchema:r}}=this.props,n=r(t.toJS());return(0,w.xi)(n,e,{includeWriteOnly:!0})})),(0,W.default)(this,"onChange",((e,t)=>{let{isEditBox:r,isXml:n}=t;this.setState({value:e,isEditBox:r}),this._onChange(e,n)})),(0,W.default)(this,"_onChange",((e,t)=>{(this.props.onChange||er)(e,t)})),(0,W.default)(this,"handleOnChange",(e=>{const{consumesValue:t}=this.props,r=/xml/i.test(t),n=e.target.value;this.onChange(n,{isXml:r,isEditBox:this.state.isEditBox})})),(0,W.default)(this,"toggleIsEditBox",(()=>this.setState((e=>({isEditBox:!e.isEditBox}))))),this.state={isEditBox:!1,value:""}}componentDidMount(){this.updateValues.call(this,this.props)}UNSAFE_componentWillReceiveProps(e){this.updateValues.call(this,e)}render(){let{onChangeConsumes:e,param:t,isExecute:r,specSelectors:n,pathMethod:a,getConfigs:l,getComponent:s}=this.props;const o=s("Button"),i=s("TextArea"),u=s("highlightCode"),c=s("contentType");let d=(n?n.parameterWithMetaByIdentity(a,t):t).get("errors",(0,y.List)()),p=n.contentTypeValues(a).get("requestContentType"),f=this.props.consumes&&this.props.consumes.size?this.props.consumes:tr.defaultProp.consumes,{value:h,isEditBox:g}=this.state,v=null;return(0,st.O)(h)&&(v="json"),m.default.createElement("div",{className:"body-param","data-param-name":t.get("name"),"data-param-in":t.get("in")},g&&r?m.default.createElement(i,{className:"body-param__text"+(d.count()?" invalid":""),value:h,onChange:this.handleOnChange}):h&&m.default.createElement(u,{className:"body-param__example",language:v,getConfigs:l,value:h}),m.default.createElement("div",{className:"body-param-options"},r?m.default.createElement("div",{className:"body-param-edit"},m.default.createElement(o,{className:g?"btn cancel body-param__example-edit":"btn edit body-param__example-edit",onClick:this.toggleIsEditBox},g?"Cancel":"Edit")):null,m.default.createElement("label",{htmlFor:""},m.default.createElement("span",null,"Parameter content type"),m.default.createElement(c,{value:p,contentTypes:f,onChange:e,className:"body-param-content-type",ariaLabel:"Parameter content type"}))))}}(0,W.default)(tr,"defaultProp",{consumes:(0,y.fromJS)(["application/json"]),param:(0,y.fromJS)({}),onChange:er,onChangeConsumes:er});var rr=Ge(4624);class nr extends m.default.Component{render(){let{request:e,getConfigs:t}=this.props,r=(0,rr.requestSnippetGenerator_curl_bash)(e);const n=t(),a=(0,Xe.default)(n,"syntaxHighlight.activated")?m.default.createElement(Ye.d3,{language:"bash",className:"curl microlight",style:(0,Ye.C2)((0,Xe.default)(n,"syntaxHighlight.theme"))},r):m.default.createElement("textarea",{readOnly:!0,className:"curl",value:r});return m.default.createElement("div",{className:"curl-command"},m.default.createElement("h4",null,"Curl"),m.default.createElement("div",{className:"copy-to-clipboard"},m.default.createElement(tt.CopyToClipboard,{text:r},m.default.createElement("button",null))),m.default.createElement("div",null,a))}}class ar extends m.default.Component{constructor(){super(...arguments),(0,W.default)(this,"onChange",(e=>{this.setScheme(e.target.value)})),(0,W.default)(this,"setScheme",(e=>{let{path:t,method:r,specActions:n}=this.props;n.setScheme(e,t,r)}))}UNSAFE_componentWillMount(){let{schemes:e}=this.props;this.setScheme(e.first())}UNSAFE_componentWillReceiveProps(e){var t;this.props.currentScheme&&(0,fe.default)(t=e.schemes).call(t,this.props.currentScheme)||this.setScheme(e.schemes.first())}render(){var e;let{schemes:t,currentScheme:r}=this.props;return m.default.createElement("label",{htmlFor:"schemes"},m.default.createElement("span",{className:"schemes-title"},"Schemes"),m.default.createElement("select",{onChange:this.onChange,value:r},(0,f.default)(e=t.valueSeq()).call(e,(e=>m.default.createElement("option",{value:e,key:e},e))).toArray()))}}class lr extends m.default.Component{render(){const{specActions:e,specSelectors:t,getComponent:r}=this.props,n=t.operationScheme(),a=t.schemes(),l=r("schemes");return a&&a.size?m.default.createElement(l,{currentScheme:n,schemes:a,specActions:e}):null}}class sr extends m.Component{constructor(e,t){super(e,t),(0,W.default)(this,"toggleCollapsed",(()=>{this.props.onToggle&&this.props.onToggle(this.props.modelName,!this.state.expanded),this.setState({expanded:!this.state.expanded})})),(0,W.default)(this,"onLoad",(e=>{if(e&&this.props.layoutSelectors){const t=this.props.layoutSelectors.getScrollToKey();y.default.is(t,this.props.specPath)&&this.toggleCollapsed(),this.props.layoutActions.readyToScroll(this.props.specPath,e.parentElement)}}));let{expanded:r,collapsedContent:n}=this.props;this.state={expanded:r,collapsedContent:n||sr.defaultProps.collapsedContent}}componentDidMount(){const{hideSelfOnExpand:e,expanded:t,modelName:r}=this.props;e&&t&&this.props.onToggle(r,t)}UNSAFE_componentWillReceiveProps(e){this.props.expanded!==e.expanded&&this.setState({expanded:e.expanded})}render(){const{title:e,classes:t}=this.props;return this.state.expanded&&this.props.hideSelfOnExpand?m.default.createElement("span",{className:t||""},this.props.children):m.default.createElement("span",{className:t||"",ref:this.onLoad},m.default.createElement("button",{"aria-expanded":this.state.expanded,className:"model-box-control",onClick:this.toggleCollapsed},e&&m.default.createElement("span",{className:"pointer"},e),m.default.createElement("span",{className:"model-toggle"+(this.state.expanded?"":" collapsed")}),!this.state.expanded&&m.default.createElement("span",null,this.state.collapsedContent)),this.state.expanded&&this.props.children)}}(0,W.default)(sr,"defaultProps",{collapsedContent:"{...}",expanded:!1,title:null,onToggle:()=>{},hideSelfOnExpand:!1,specPath:y.default.List([])});var or=Ge(1798),ir=Ge.n(or);class ur extends m.default.Component{constructor(e,t){super(e,t),(0,W.default)(this,"activeTab",(e=>{let{target:{dataset:{name:t}}}=e;this.setState({activeTab:t})}));let{getConfigs:r,isExecute:n}=this.props,{defaultModelRendering:a}=r(),l=a;"example"!==a&&"model"!==a&&(l="example"),n&&(l="example"),this.state={activeTab:l}}UNSAFE_componentWillReceiveProps(e){e.isExecute&&!this.props.isExecute&&this.props.example&&this.setState({activeTab:"example"})}render(){let{getComponent:e,specSelectors:t,schema:r,example:n,isExecute:a,getConfigs:l,specPath:s,includeReadOnly:o,includeWriteOnly:i}=this.props,{defaultModelExpandDepth:u}=l();const c=e("ModelWrapper"),d=e("highlightCode"),p=ir()(5).toString("base64"),f=ir()(5).toString("base64"),h=ir()(5).toString("base64"),g=ir()(5).toString("base64");let y=t.isOAS3();return m.default.createElement("div",{className:"model-example"},m.default.createElement("ul",{className:"tab",role:"tablist"},m.default.createElement("li",{className:(0,Ke.default)("tabitem",{active:"example"===this.state.activeTab}),role:"presentation"},m.default.createElement("button",{"aria-controls":f,"aria-selected":"example"===this.state.activeTab,className:"tablinks","data-name":"example",id:p,onClick:this.activeTab,role:"tab"},a?"Edit Value":"Example Value")),r&&m.default.createElement("li",{className:(0,Ke.default)("tabitem",{active:"model"===this.state.activeTab}),role:"presentation"},m.default.createElement("button",{"aria-controls":g,"aria-selected":"model"===this.state.activeTab,className:(0,Ke.default)("tablinks",{inactive:a}),"data-name":"model",id:h,onClick:this.activeTab,role:"tab"},y?"Schema":"Model"))),"example"===this.state.activeTab&&m.default.createElement("div",{"aria-hidden":"example"!==this.state.activeTab,"aria-labelledby":p,"data-name":"examplePanel",id:f,role:"tabpanel",tabIndex:"0"},n||m.default.createElement(d,{value:"(no example available)",getConfigs:l})),"model"===this.state.activeTab&&m.default.createElement("div",{"aria-hidden":"example"===this.state.activeTab,"aria-labelledby":h,"data-name":"modelPanel",id:g,role:"tabpanel",tabIndex:"0"},m.default.createElement(c,{schema:r,getComponent:e,getConfigs:l,specSelectors:t,expandDepth:u,specPath:s,includeReadOnly:o,includeWriteOnly:i})))}}class cr extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onToggle",((e,t)=>{this.props.layoutActions&&this.props.layoutActions.show(this.props.fullPath,t)}))}render(){let{getComponent:e,getConfigs:t}=this.props;const r=e("Model");let n;return this.props.layoutSelectors&&(n=this.props.layoutSelectors.isShown(this.props.fullPath)),m.default.createElement("div",{className:"model-box"},m.default.createElement(r,(0,It.default)({},this.props,{getConfigs:t,expanded:n,depth:1,onToggle:this.onToggle,expandDepth:this.props.expandDepth||0})))}}var dr=Ge(1543);class pr extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"getSchemaBasePath",(()=>this.props.specSelectors.isOAS3()?["components","schemas"]:["definitions"])),(0,W.default)(this,"getCollapsedContent",(()=>" ")),(0,W.default)(this,"handleToggle",((e,t)=>{const{layoutActions:r}=this.props;r.show([...this.getSchemaBasePath(),e],t),t&&this.props.specActions.requestResolvedSubtree([...this.getSchemaBasePath(),e])})),(0,W.default)(this,"onLoadModels",(e=>{e&&this.props.layoutActions.readyToScroll(this.getSchemaBasePath(),e)})),(0,W.default)(this,"onLoadModel",(e=>{if(e){const t=e.getAttribute("data-name");this.props.layoutActions.readyToScroll([...this.getSchemaBasePath(),t],e)}}))}render(){var e;let{specSelectors:t,getComponent:r,layoutSelectors:n,layoutActions:a,getConfigs:l}=this.props,s=t.definitions(),{docExpansion:o,defaultModelsExpandDepth:i}=l();if(!s.size||i<0)return null;const u=this.getSchemaBasePath();let c=n.isShown(u,i>0&&"none"!==o);const d=t.isOAS3(),p=r("ModelWrapper"),h=r("Collapse"),g=r("ModelCollapse"),v=r("JumpToPath",!0);return m.default.createElement("section",{className:c?"models is-open":"models",ref:this.onLoadModels},m.default.createElement("h4",null,m.default.createElement("button",{"aria-expanded":c,className:"models-control",onClick:()=>a.show(u,!c)},m.default.createElement("span",null,d?"Schemas":"Models"),m.default.createElement("svg",{width:"20",height:"20","aria-hidden":"true",focusable:"false"},m.default.createElement("use",{xlinkHref:c?"#large-arrow-up":"#large-arrow-down"})))),m.default.createElement(h,{isOpened:c},(0,f.default)(e=s.entrySeq()).call(e,(e=>{let[s]=e;const o=[...u,s],c=y.default.List(o),d=t.specResolvedSubtree(o),f=t.specJson().getIn(o),h=y.Map.isMap(d)?d:y.default.Map(),E=y.Map.isMap(f)?f:y.default.Map(),b=h.get("title")||E.get("title")||s,S=n.isShown(o,!1);S&&0===h.size&&E.size>0&&this.props.specActions.requestResolvedSubtree(o);const _=m.default.createElement(p,{name:s,expandDepth:i,schema:h||y.default.Map(),displayName:b,fullPath:o,specPath:c,getComponent:r,specSelectors:t,getConfigs:l,layoutSelectors:n,layoutActions:a,includeReadOnly:!0,includeWriteOnly:!0}),w=m.default.createElement("span",{className:"model-box"},m.default.createElement("span",{className:"model model-title"},b));return m.default.createElement("div",{id:`model-${s}`,className:"model-container",key:`models-section-${s}`,"data-name":s,ref:this.onLoadModel},m.default.createElement("span",{className:"models-jump-to-path"},m.default.createElement(v,{specPath:c})),m.default.createElement(g,{classes:"model-box",collapsedContent:this.getCollapsedContent(s),onToggle:this.handleToggle,title:w,displayName:b,modelName:s,specPath:c,layoutSelectors:n,layoutActions:a,hideSelfOnExpand:!0,expanded:i>0&&S},_))})).toArray()))}}const fr=e=>{let{value:t,getComponent:r}=e,n=r("ModelCollapse"),a=m.default.createElement("span",null,"Array [ ",t.count()," ]");return m.default.createElement("span",{className:"prop-enum"},"Enum:",m.default.createElement("br",null),m.default.createElement(n,{collapsedContent:a},"[ ",t.join(", ")," ]"))};class hr extends m.Component{render(){var e,t,r,a;let{schema:s,name:o,displayName:i,isRef:u,getComponent:d,getConfigs:p,depth:h,onToggle:g,expanded:v,specPath:E,...b}=this.props,{specSelectors:S,expandDepth:_,includeReadOnly:C,includeWriteOnly:x}=b;const{isOAS3:A}=S;if(!s)return null;const{showExtensions:I}=p();let R=s.get("description"),N=s.get("properties"),T=s.get("additionalProperties"),O=s.get("title")||i||o,k=s.get("required"),M=(0,n.default)(s).call(s,((e,t)=>{var r;return-1!==(0,H.default)(r=["maxProperties","minProperties","nullable","example"]).call(r,t)})),P=s.get("deprecated"),j=s.getIn(["externalDocs","url"]),L=s.getIn(["externalDocs","description"]);const q=d("JumpToPath",!0),B=d("Markdown",!0),D=d("Model"),U=d("ModelCollapse"),V=d("Property"),z=d("Link"),F=()=>m.default.createElement("span",{className:"model-jump-to-path"},m.default.createElement(q,{specPath:E})),$=m.default.createElement("span",null,m.default.createElement("span",null,"{"),"...",m.default.createElement("span",null,"}"),u?m.default.createElement(F,null):""),J=S.isOAS3()?s.get("anyOf"):null,W=S.isOAS3()?s.get("oneOf"):null,K=S.isOAS3()?s.get("not"):null,G=O&&m.default.createElement("span",{className:"model-title"},u&&s.get("$$ref")&&m.default.createElement("span",{className:"model-hint"},s.get("$$ref")),m.default.createElement("span",{className:"model-title__text"},O));return m.default.createElement("span",{className:"model"},m.default.createElement(U,{modelName:o,title:G,onToggle:g,expanded:!!v||h<=_,collapsedContent:$},m.default.createElement("span",{className:"brace-open object"},"{"),u?m.default.createElement(F,null):null,m.default.createElement("span",{className:"inner-object"},m.default.createElement("table",{className:"model"},m.default.createElement("tbody",null,R?m.default.createElement("tr",{className:"description"},m.default.createElement("td",null,"description:"),m.default.createElement("td",null,m.default.createElement(B,{source:R}))):null,j&&m.default.createElement("tr",{className:"external-docs"},m.default.createElement("td",null,"externalDocs:"),m.default.createElement("td",null,m.default.createElement(z,{target:"_blank",href:(0,w.Nm)(j)},L||j))),P?m.default.createElement("tr",{className:"property"},m.default.createElement("td",null,"deprecated:"),m.default.createElement("td",null,"true")):null,N&&N.size?(0,f.default)(e=(0,n.default)(t=N.entrySeq()).call(t,(e=>{let[,t]=e;return(!t.get("readOnly")||C)&&(!t.get("writeOnly")||x)}))).call(e,(e=>{let[t,r]=e,n=A()&&r.get("deprecated"),a=y.List.isList(k)&&k.contains(t),l=["property-row"];return n&&l.push("deprecated"),a&&l.push("required"),m.default.createElement("tr",{key:t,className:l.join(" ")},m.default.createElement("td",null,t,a&&m.default.createElement("span",{className:"star"},"*")),m.default.createElement("td",null,m.default.createElement(D,(0,It.default)({key:`object-${o}-${t}_${r}`},b,{required:a,getComponent:d,specPath:E.push("properties",t),getConfigs:p,schema:r,depth:h+1}))))})).toArray():null,I?m.default.createElement("tr",null,m.default.createElement("td",null," ")):null,I?(0,f.default)(r=s.entrySeq()).call(r,(e=>{let[t,r]=e;if("x-"!==(0,c.default)(t).call(t,0,2))return;const n=r?r.toJS?r.toJS():r:null;return m.default.createElement("tr",{key:t,className:"extension"},m.default.createElement("td",null,t),m.default.createElement("td",null,(0,l.default)(n)))})).toArray():null,T&&T.size?m.default.createElement("tr",null,m.default.createElement("td",null,"< * >:"),m.default.createElement("td",null,m.default.createElement(D,(0,It.default)({},b,{required:!1,getComponent:d,specPath:E.push("additionalProperties"),getConfigs:p,schema:T,depth:h+1})))):null,J?m.default.createElement("tr",null,m.default.createElement("td",null,"anyOf ->"),m.default.createElement("td",null,(0,f.default)(J).call(J,((e,t)=>m.default.createElement("div",{key:t},m.default.createElement(D,(0,It.default)({},b,{required:!1,getComponent:d,specPath:E.push("anyOf",t),getConfigs:p,schema:e,depth:h+1}))))))):null,W?m.default.createElement("tr",null,m.default.createElement("td",null,"oneOf ->"),m.default.createElement("td",null,(0,f.default)(W).call(W,((e,t)=>m.default.createElement("div",{key:t},m.default.createElement(D,(0,It.default)({},b,{required:!1,getComponent:d,specPath:E.push("oneOf",t),getConfigs:p,schema:e,depth:h+1}))))))):null,K?m.default.createElement("tr",null,m.default.createElement("td",null,"not ->"),m.default.createElement("td",null,m.default.createElement("div",null,m.default.createElement(D,(0,It.default)({},b,{required:!1,getComponent:d,specPath:E.push("not"),getConfigs:p,schema:K,depth:h+1}))))):null))),m.default.createElement("span",{className:"brace-close"},"}")),M.size?(0,f.default)(a=M.entrySeq()).call(a,(e=>{let[t,r]=e;return m.default.createElement(V,{key:`${t}-${r}`,propKey:t,propVal:r,propClass:"property"})})):null)}}class mr extends m.Component{render(){var e;let{getComponent:t,getConfigs:r,schema:a,depth:l,expandDepth:s,name:o,displayName:i,specPath:u}=this.props,c=a.get("description"),d=a.get("items"),p=a.get("title")||i||o,h=(0,n.default)(a).call(a,((e,t)=>{var r;return-1===(0,H.default)(r=["type","items","description","$$ref","externalDocs"]).call(r,t)})),g=a.getIn(["externalDocs","url"]),y=a.getIn(["externalDocs","description"]);const v=t("Markdown",!0),E=t("ModelCollapse"),b=t("Model"),S=t("Property"),_=t("Link"),C=p&&m.default.createElement("span",{className:"model-title"},m.default.createElement("span",{className:"model-title__text"},p));return m.default.createElement("span",{className:"model"},m.default.createElement(E,{title:C,expanded:l<=s,collapsedContent:"[...]"},"[",h.size?(0,f.default)(e=h.entrySeq()).call(e,(e=>{let[t,r]=e;return m.default.createElement(S,{key:`${t}-${r}`,propKey:t,propVal:r,propClass:"property"})})):null,c?m.default.createElement(v,{source:c}):h.size?m.default.createElement("div",{className:"markdown"}):null,g&&m.default.createElement("div",{className:"external-docs"},m.default.createElement(_,{target:"_blank",href:(0,w.Nm)(g)},y||g)),m.default.createElement("span",null,m.default.createElement(b,(0,It.default)({},this.props,{getConfigs:r,specPath:u.push("items"),name:null,schema:d,required:!1,depth:l+1}))),"]"))}}const gr="property primitive";class yr extends m.Component{render(){var e,t,r;let{schema:a,getComponent:l,getConfigs:s,name:o,displayName:i,depth:u,expandDepth:c}=this.props;const{showExtensions:d}=s();if(!a||!a.get)return m.default.createElement("div",null);let p=a.get("type"),h=a.get("format"),g=a.get("xml"),y=a.get("enum"),v=a.get("title")||i||o,E=a.get("description"),b=(0,w.nX)(a),S=(0,n.default)(a).call(a,((e,t)=>{var r;return-1===(0,H.default)(r=["enum","type","format","description","$$ref","externalDocs"]).call(r,t)})).filterNot(((e,t)=>b.has(t))),_=a.getIn(["externalDocs","url"]),C=a.getIn(["externalDocs","description"]);const x=l("Markdown",!0),A=l("EnumModel"),I=l("Property"),R=l("ModelCollapse"),N=l("Link"),T=v&&m.default.createElement("span",{className:"model-title"},m.default.createElement("span",{className:"model-title__text"},v));return m.default.createElement("span",{className:"model"},m.default.createElement(R,{title:T,expanded:u<=c,collapsedContent:"[...]",hideSelfOnExpand:c!==u},m.default.createElement("span",{className:"prop"},o&&u>1&&m.default.createElement("span",{className:"prop-name"},v),m.default.createElement("span",{className:"prop-type"},p),h&&m.default.createElement("span",{className:"prop-format"},"($",h,")"),S.size?(0,f.default)(e=S.entrySeq()).call(e,(e=>{let[t,r]=e;return m.default.createElement(I,{key:`${t}-${r}`,propKey:t,propVal:r,propClass:gr})})):null,d&&b.size?(0,f.default)(t=b.entrySeq()).call(t,(e=>{let[t,r]=e;return m.default.createElement(I,{key:`${t}-${r}`,propKey:t,propVal:r,propClass:gr})})):null,E?m.default.createElement(x,{source:E}):null,_&&m.default.createElement("div",{className:"external-docs"},m.default.createElement(N,{target:"_blank",href:(0,w.Nm)(_)},C||_)),g&&g.size?m.default.createElement("span",null,m.default.createElement("br",null),m.default.createElement("span",{className:gr},"xml:"),(0,f.default)(r=g.entrySeq()).call(r,(e=>{let[t,r]=e;return m.default.createElement("span",{key:`${t}-${r}`,className:gr},m.default.createElement("br",null),"   ",t,": ",String(r))})).toArray()):null,y&&m.default.createElement(A,{value:y,getComponent:l}))))}}const vr=e=>{let{propKey:t,propVal:r,propClass:n}=e;return m.default.createElement("span",{className:n},m.default.createElement("br",null),t,": ",String(r))};class Er extends m.default.Component{render(){const{onTryoutClick:e,onCancelClick:t,onResetClick:r,enabled:n,hasUserEditedBody:a,isOAS3:l}=this.props,s=l&&a;return m.default.createElement("div",{className:s?"try-out btn-group":"try-out"},n?m.default.createElement("button",{className:"btn try-out__btn cancel",onClick:t},"Cancel"):m.default.createElement("button",{className:"btn try-out__btn",onClick:e},"Try it out "),s&&m.default.createElement("button",{className:"btn try-out__btn reset",onClick:r},"Reset"))}}(0,W.default)(Er,"defaultProps",{onTryoutClick:Function.prototype,onCancelClick:Function.prototype,onResetClick:Function.prototype,enabled:!1,hasUserEditedBody:!1,isOAS3:!1});class br extends m.default.PureComponent{render(){const{bypass:e,isSwagger2:t,isOAS3:r,alsoShow:n}=this.props;return e?m.default.createElement("div",null,this.props.children):t&&r?m.default.createElement("div",{className:"version-pragma"},n,m.default.createElement("div",{className:"version-pragma__message version-pragma__message--ambiguous"},m.default.createElement("div",null,m.default.createElement("h3",null,"Unable to render this definition"),m.default.createElement("p",null,m.default.createElement("code",null,"swagger")," and ",m.default.createElement("code",null,"openapi")," fields cannot be present in the same Swagger or OpenAPI definition. Please remove one of the fields."),m.default.createElement("p",null,"Supported version fields are ",m.default.createElement("code",null,"swagger: ",'"2.0"')," and those that match ",m.default.createElement("code",null,"openapi: 3.0.n")," (for example, ",m.default.createElement("code",null,"openapi: 3.0.0"),").")))):t||r?m.default.createElement("div",null,this.props.children):m.default.createElement("div",{className:"version-pragma"},n,m.default.createElement("div",{className:"version-pragma__message version-pragma__message--missing"},m.default.createElement("div",null,m.default.createElement("h3",null,"Unable to render this definition"),m.default.createElement("p",null,"The provided definition does not specify a valid version field."),m.default.createElement("p",null,"Please indicate a valid Swagger or OpenAPI version field. Supported version fields are ",m.default.createElement("code",null,"swagger: ",'"2.0"')," and those that match ",m.default.createElement("code",null,"openapi: 3.0.n")," (for example, ",m.default.createElement("code",null,"openapi: 3.0.0"),")."))))}}(0,W.default)(br,"defaultProps",{alsoShow:null,children:null,bypass:!1});const Sr=e=>{let{version:t}=e;return m.default.createElement("small",null,m.default.createElement("pre",{className:"version"}," ",t," "))},_r=e=>{let{enabled:t,path:r,text:n}=e;return m.default.createElement("a",{className:"nostyle",onClick:t?e=>e.preventDefault():null,href:t?`#/${r}`:null},m.default.createElement("span",null,n))},wr=()=>m.default.createElement("div",null,m.default.createElement("svg",{xmlns:"http://www.w3.org/2000/svg",xmlnsXlink:"http://www.w3.org/1999/xlink",className:"svg-assets"},m.default.createElement("defs",null,m.default.createElement("symbol",{viewBox:"0 0 20 20",id:"unlocked"},m.default.createElement("path",{d:"M15.8 8H14V5.6C14 2.703 12.665 1 10 1 7.334 1 6 2.703 6 5.6V6h2v-.801C8 3.754 8.797 3 10 3c1.203 0 2 .754 2 2.199V8H4c-.553 0-1 .646-1 1.199V17c0 .549.428 1.139.951 1.307l1.197.387C5.672 18.861 6.55 19 7.1 19h5.8c.549 0 1.428-.139 1.951-.307l1.196-.387c.524-.167.953-.757.953-1.306V9.199C17 8.646 16.352 8 15.8 8z"})),m.default.createElement("symbol",{viewBox:"0 0 20 20",id:"locked"},m.default.createElement("path",{d:"M15.8 8H14V5.6C14 2.703 12.665 1 10 1 7.334 1 6 2.703 6 5.6V8H4c-.553 0-1 .646-1 1.199V17c0 .549.428 1.139.951 1.307l1.197.387C5.672 18.861 6.55 19 7.1 19h5.8c.549 0 1.428-.139 1.951-.307l1.196-.387c.524-.167.953-.757.953-1.306V9.199C17 8.646 16.352 8 15.8 8zM12 8H8V5.199C8 3.754 8.797 3 10 3c1.203 0 2 .754 2 2.199V8z"})),m.default.createElement("symbol",{viewBox:"0 0 20 20",id:"close"},m.default.createElement("path",{d:"M14.348 14.849c-.469.469-1.229.469-1.697 0L10 11.819l-2.651 3.029c-.469.469-1.229.469-1.697 0-.469-.469-.469-1.229 0-1.697l2.758-3.15-2.759-3.152c-.469-.469-.469-1.228 0-1.697.469-.469 1.228-.469 1.697 0L10 8.183l2.651-3.031c.469-.469 1.228-.469 1.697 0 .469.469.469 1.229 0 1.697l-2.758 3.152 2.758 3.15c.469.469.469 1.229 0 1.698z"})),m.default.createElement("symbol",{viewBox:"0 0 20 20",id:"large-arrow"},m.default.createElement("path",{d:"M13.25 10L6.109 2.58c-.268-.27-.268-.707 0-.979.268-.27.701-.27.969 0l7.83 7.908c.268.271.268.709 0 .979l-7.83 7.908c-.268.271-.701.27-.969 0-.268-.269-.268-.707 0-.979L13.25 10z"})),m.default.createElement("symbol",{viewBox:"0 0 20 20",id:"large-arrow-down"},m.default.createElement("path",{d:"M17.418 6.109c.272-.268.709-.268.979 0s.271.701 0 .969l-7.908 7.83c-.27.268-.707.268-.979 0l-7.908-7.83c-.27-.268-.27-.701 0-.969.271-.268.709-.268.979 0L10 13.25l7.418-7.141z"})),m.default.createElement("symbol",{viewBox:"0 0 20 20",id:"large-arrow-up"},m.default.createElement("path",{d:"M 17.418 14.908 C 17.69 15.176 18.127 15.176 18.397 14.908 C 18.667 14.64 18.668 14.207 18.397 13.939 L 10.489 6.109 C 10.219 5.841 9.782 5.841 9.51 6.109 L 1.602 13.939 C 1.332 14.207 1.332 14.64 1.602 14.908 C 1.873 15.176 2.311 15.176 2.581 14.908 L 10 7.767 L 17.418 14.908 Z"})),m.default.createElement("symbol",{viewBox:"0 0 24 24",id:"jump-to"},m.default.createElement("path",{d:"M19 7v4H5.83l3.58-3.59L8 6l-6 6 6 6 1.41-1.41L5.83 13H21V7z"})),m.default.createElement("symbol",{viewBox:"0 0 24 24",id:"expand"},m.default.createElement("path",{d:"M10 18h4v-2h-4v2zM3 6v2h18V6H3zm3 7h12v-2H6v2z"})),m.default.createElement("symbol",{viewBox:"0 0 15 16",id:"copy"},m.default.createElement("g",{transform:"translate(2, -1)"},m.default.createElement("path",{fill:"#ffffff",fillRule:"evenodd",d:"M2 13h4v1H2v-1zm5-6H2v1h5V7zm2 3V8l-3 3 3 3v-2h5v-2H9zM4.5 9H2v1h2.5V9zM2 12h2.5v-1H2v1zm9 1h1v2c-.02.28-.11.52-.3.7-.19.18-.42.28-.7.3H1c-.55 0-1-.45-1-1V4c0-.55.45-1 1-1h3c0-1.11.89-2 2-2 1.11 0 2 .89 2 2h3c.55 0 1 .45 1 1v5h-1V6H1v9h10v-2zM2 5h8c0-.55-.45-1-1-1H8c-.55 0-1-.45-1-1s-.45-1-1-1-1 .45-1 1-.45 1-1 1H3c-.55 0-1 .45-1 1z"}))))));var Cr=Ge(5466);class xr extends m.default.Component{render(){let{errSelectors:e,specSelectors:t,getComponent:r}=this.props,n=r("SvgAssets"),a=r("InfoContainer",!0),l=r("VersionPragmaFilter"),s=r("operations",!0),o=r("Models",!0),i=r("Row"),u=r("Col"),c=r("errors",!0);const d=r("ServersContainer",!0),p=r("SchemesContainer",!0),f=r("AuthorizeBtnContainer",!0),h=r("FilterContainer",!0);let g=t.isSwagger2(),y=t.isOAS3();const v=!t.specStr(),E=t.loadingStatus();let b=null;if("loading"===E&&(b=m.default.createElement("div",{className:"info"},m.default.createElement("div",{className:"loading-container"},m.default.createElement("div",{className:"loading"})))),"failed"===E&&(b=m.default.createElement("div",{className:"info"},m.default.createElement("div",{className:"loading-container"},m.default.createElement("h4",{className:"title"},"Failed to load API definition."),m.default.createElement(c,null)))),"failedConfig"===E){const t=e.lastError(),r=t?t.get("message"):"";b=m.default.createElement("div",{className:"info failed-config"},m.default.createElement("div",{className:"loading-container"},m.default.createElement("h4",{className:"title"},"Failed to load remote configuration."),m.default.createElement("p",null,r)))}if(!b&&v&&(b=m.default.createElement("h4",null,"No API definition provided.")),b)return m.default.createElement("div",{className:"swagger-ui"},m.default.createElement("div",{className:"loading-container"},b));const S=t.servers(),_=t.schemes(),w=S&&S.size,C=_&&_.size,x=!!t.securityDefinitions();return m.default.createElement("div",{className:"swagger-ui"},m.default.createElement(n,null),m.default.createElement(l,{isSwagger2:g,isOAS3:y,alsoShow:m.default.createElement(c,null)},m.default.createElement(c,null),m.default.createElement(i,{className:"information-container"},m.default.createElement(u,{mobile:12},m.default.createElement(a,null))),w||C||x?m.default.createElement("div",{className:"scheme-container"},m.default.createElement(u,{className:"schemes wrapper",mobile:12},w?m.default.createElement(d,null):null,C?m.default.createElement(p,null):null,x?m.default.createElement(f,null):null)):null,m.default.createElement(h,null),m.default.createElement(i,null,m.default.createElement(u,{mobile:12,desktop:12},m.default.createElement(s,null))),m.default.createElement(i,null,m.default.createElement(u,{mobile:12,desktop:12},m.default.createElement(o,null)))))}}const Ar=(e=>{var t={};return Ge.d(t,e),t})({default:()=>We.default}),Ir={value:"",onChange:()=>{},schema:{},keyName:"",required:!1,errors:(0,y.List)()};class Rr extends m.Component{componentDidMount(){const{dispatchInitialValue:e,value:t,onChange:r}=this.props;e?r(t):!1===e&&r("")}render(){let{schema:e,errors:t,value:r,onChange:n,getComponent:a,fn:l,disabled:s}=this.props;const o=e&&e.get?e.get("format"):null,i=e&&e.get?e.get("type"):null;let u=e=>a(e,!1,{failSilently:!0}),c=i?u(o?`JsonSchema_${i}_${o}`:`JsonSchema_${i}`):a("JsonSchema_string");return c||(c=a("JsonSchema_string")),m.default.createElement(c,(0,It.default)({},this.props,{errors:t,fn:l,getComponent:a,value:r,onChange:n,schema:e,disabled:s}))}}(0,W.default)(Rr,"defaultProps",Ir);class Nr extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onChange",(e=>{const t=this.props.schema&&"file"===this.props.schema.get("type")?e.target.files[0]:e.target.value;this.props.onChange(t,this.props.keyName)})),(0,W.default)(this,"onEnumChange",(e=>this.props.onChange(e)))}render(){let{getComponent:e,value:t,schema:r,errors:n,required:a,description:l,disabled:s}=this.props;const o=r&&r.get?r.get("enum"):null,i=r&&r.get?r.get("format"):null,u=r&&r.get?r.get("type"):null,c=r&&r.get?r.get("in"):null;if(t||(t=""),n=n.toJS?n.toJS():[],o){const r=e("Select");return m.default.createElement(r,{className:n.length?"invalid":"",title:n.length?n:"",allowedValues:[...o],value:t,allowEmptyValue:!a,disabled:s,onChange:this.onEnumChange})}const d=s||c&&"formData"===c&&!("FormData"in window),p=e("Input");return u&&"file"===u?m.default.createElement(p,{type:"file",className:n.length?"invalid":"",title:n.length?n:"",onChange:this.onChange,disabled:d}):m.default.createElement(Ar.default,{type:i&&"password"===i?"password":"text",className:n.length?"invalid":"",title:n.length?n:"",value:t,minLength:0,debounceTimeout:350,placeholder:l,onChange:this.onChange,disabled:d})}}(0,W.default)(Nr,"defaultProps",Ir);class Tr extends m.PureComponent{constructor(e,t){super(e,t),(0,W.default)(this,"onChange",(()=>{this.props.onChange(this.state.value)})),(0,W.default)(this,"onItemChange",((e,t)=>{this.setState((r=>{let{value:n}=r;return{value:n.set(t,e)}}),this.onChange)})),(0,W.default)(this,"removeItem",(e=>{this.setState((t=>{let{value:r}=t;return{value:r.delete(e)}}),this.onChange)})),(0,W.default)(this,"addItem",(()=>{let e=Lr(this.state.value);this.setState((()=>({value:e.push((0,w.xi)(this.state.schema.get("items"),!1,{includeWriteOnly:!0}))})),this.onChange)})),(0,W.default)(this,"onEnumChange",(e=>{this.setState((()=>({value:e})),this.onChange)})),this.state={value:Lr(e.value),schema:e.schema}}UNSAFE_componentWillReceiveProps(e){const t=Lr(e.value);t!==this.state.value&&this.setState({value:t}),e.schema!==this.state.schema&&this.setState({schema:e.schema})}render(){var e;let{getComponent:t,required:r,schema:a,errors:l,fn:s,disabled:o}=this.props;l=l.toJS?l.toJS():(0,d.default)(l)?l:[];const i=(0,n.default)(l).call(l,(e=>"string"==typeof e)),u=(0,f.default)(e=(0,n.default)(l).call(l,(e=>void 0!==e.needRemove))).call(e,(e=>e.error)),c=this.state.value,p=!!(c&&c.count&&c.count()>0),h=a.getIn(["items","enum"]),g=a.getIn(["items","type"]),v=a.getIn(["items","format"]),E=a.get("items");let b,S=!1,_="file"===g||"string"===g&&"binary"===v;if(g&&v?b=t(`JsonSchema_${g}_${v}`):"boolean"!==g&&"array"!==g&&"object"!==g||(b=t(`JsonSchema_${g}`)),b||_||(S=!0),h){const e=t("Select");return m.default.createElement(e,{className:l.length?"invalid":"",title:l.length?l:"",multiple:!0,value:c,disabled:o,allowedValues:h,allowEmptyValue:!r,onChange:this.onEnumChange})}const w=t("Button");return m.default.createElement("div",{className:"json-schema-array"},p?(0,f.default)(c).call(c,((e,r)=>{var a;const i=(0,y.fromJS)([...(0,f.default)(a=(0,n.default)(l).call(l,(e=>e.index===r))).call(a,(e=>e.error))]);return m.default.createElement("div",{key:r,className:"json-schema-form-item"},_?m.default.createElement(kr,{value:e,onChange:e=>this.onItemChange(e,r),disabled:o,errors:i,getComponent:t}):S?m.default.createElement(Or,{value:e,onChange:e=>this.onItemChange(e,r),disabled:o,errors:i}):m.default.createElement(b,(0,It.default)({},this.props,{value:e,onChange:e=>this.onItemChange(e,r),disabled:o,errors:i,schema:E,getComponent:t,fn:s})),o?null:m.default.createElement(w,{className:`btn btn-sm json-schema-form-item-remove ${u.length?"invalid":null}`,title:u.length?u:"",onClick:()=>this.removeItem(r)}," - "))})):null,o?null:m.default.createElement(w,{className:`btn btn-sm json-schema-form-item-add ${i.length?"invalid":null}`,title:i.length?i:"",onClick:this.addItem},"Add ",g?`${g} `:"","item"))}}(0,W.default)(Tr,"defaultProps",Ir);class Or extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onChange",(e=>{const t=e.target.value;this.props.onChange(t,this.props.keyName)}))}render(){let{value:e,errors:t,description:r,disabled:n}=this.props;return e||(e=""),t=t.toJS?t.toJS():[],m.default.createElement(Ar.default,{type:"text",className:t.length?"invalid":"",title:t.length?t:"",value:e,minLength:0,debounceTimeout:350,placeholder:r,onChange:this.onChange,disabled:n})}}(0,W.default)(Or,"defaultProps",Ir);class kr extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onFileChange",(e=>{const t=e.target.files[0];this.props.onChange(t,this.props.keyName)}))}render(){let{getComponent:e,errors:t,disabled:r}=this.props;const n=e("Input"),a=r||!("FormData"in window);return m.default.createElement(n,{type:"file",className:t.length?"invalid":"",title:t.length?t:"",onChange:this.onFileChange,disabled:a})}}(0,W.default)(kr,"defaultProps",Ir);class Mr extends m.Component{constructor(){super(...arguments),(0,W.default)(this,"onEnumChange",(e=>this.props.onChange(e)))}render(){let{getComponent:e,value:t,errors:r,schema:n,required:a,disabled:l}=this.props;r=r.toJS?r.toJS():[];let s=n&&n.get?n.get("enum"):null,o=!s||!a,i=!s&&["true","false"];const u=e("Select");return m.default.createElement(u,{className:r.length?"invalid":"",title:r.length?r:"",value:String(t),disabled:l,allowedValues:s?[...s]:i,allowEmptyValue:o,onChange:this.onEnumChange})}}(0,W.default)(Mr,"defaultProps",Ir);const Pr=e=>(0,f.default)(e).call(e,(e=>{const t=void 0!==e.propKey?e.propKey:e.index;let r="string"==typeof e?e:"string"==typeof e.error?e.error:null;if(!t&&r)return r;let n=e.error,a=`/${e.propKey}`;for(;"object"==typeof n;){const e=void 0!==n.propKey?n.propKey:n.index;if(void 0===e)break;if(a+=`/${e}`,!n.error)break;n=n.error}return`${a}: ${n}`}));class jr extends m.PureComponent{constructor(){super(),(0,W.default)(this,"onChange",(e=>{this.props.onChange(e)})),(0,W.default)(this,"handleOnChange",(e=>{const t=e.target.value;this.onChange(t)}))}render(){let{getComponent:e,value:t,errors:r,disabled:n}=this.props;const a=e("TextArea");return r=r.toJS?r.toJS():(0,d.default)(r)?r:[],m.default.createElement("div",null,m.default.createElement(a,{className:(0,Ke.default)({invalid:r.length}),title:r.length?Pr(r).join(", "):"",value:(0,w.Pz)(t),disabled:n,onChange:this.handleOnChange}))}}function Lr(e){return y.List.isList(e)?e:(0,d.default)(e)?(0,y.fromJS)(e):(0,y.List)()}function qr(){let r={components:{App:Z,authorizationPopup:Y,authorizeBtn:X,AuthorizeBtnContainer:Q,authorizeOperationBtn:ee,auths:te,AuthItem:re,authError:ne,oauth2:me,apiKeyAuth:ae,basicAuth:le,clear:ge,liveResponse:Ee,InitializedInput:Ft,info:Kt,InfoContainer:Gt,JumpToPath:Zt,CopyToClipboardBtn:Yt,onlineValidatorBadge:be.Z,operations:we,operation:Ne,OperationSummary:Oe,OperationSummaryMethod:ke,OperationSummaryPath:Pe,highlightCode:nt,responses:at,response:ot,ResponseExtension:it,responseBody:dt,parameters:ft,parameterRow:vt,execute:bt,headers:St,errors:_t,contentType:At,overview:Vt,footer:Xt,FilterContainer:Qt,ParamBody:tr,curl:nr,schemes:ar,SchemesContainer:lr,modelExample:ur,ModelWrapper:cr,ModelCollapse:sr,Model:dr.Z,Models:pr,EnumModel:fr,ObjectModel:hr,ArrayModel:mr,PrimitiveModel:yr,Property:vr,TryItOutButton:Er,Markdown:Cr.Z,BaseLayout:xr,VersionPragmaFilter:br,VersionStamp:Sr,OperationExt:je,OperationExtRow:Le,ParameterExt:ht,ParameterIncludeEmpty:gt,OperationTag:Re,OperationContainer:G,DeepLink:_r,InfoUrl:Ht,InfoBasePath:$t,SvgAssets:wr,Example:se,ExamplesSelect:ie,ExamplesSelectValueRetainer:ce}},n={components:e},a={components:t};return[V.default,D.default,L.default,M.default,k.default,T.default,O.default,P.default,r,n,q.default,a,B.default,U.default,z.default,F.default,$.default,j.default,(0,J.default)()]}(0,W.default)(jr,"defaultProps",Ir);var Br=Ge(7451);function Dr(){return[qr,Br.default]}var Ur=Ge(5308);const{GIT_DIRTY:Vr,GIT_COMMIT:zr,PACKAGE_VERSION:Fr,BUILD_TIME:$r}={PACKAGE_VERSION:"4.18.1",GIT_COMMIT:"g1ea30f1",GIT_DIRTY:!0,BUILD_TIME:"Fri, 10 Mar 2023 09:49:05 GMT"};function Jr(e){var t;_.Z.versions=_.Z.versions||{},_.Z.versions.swaggerUi={version:Fr,gitRevision:zr,gitDirty:Vr,buildTimestamp:$r};const s={dom_id:null,domNode:null,spec:{},url:"",urls:null,layout:"BaseLayout",docExpansion:"list",maxDisplayedTags:null,filter:null,validatorUrl:"https://validator.swagger.io/validator",oauth2RedirectUrl:`${window.location.protocol}//${window.location.host}${window.location.pathname.substring(0,(0,r.default)(t=window.location.pathname).call(t,"/"))}/oauth2-redirect.html`,persistAuthorization:!1,configs:{},custom:{},displayOperationId:!1,displayRequestDuration:!1,deepLinking:!1,tryItOutEnabled:!1,requestInterceptor:e=>e,responseInterceptor:e=>e,showMutatedRequest:!0,defaultModelRendering:"example",defaultModelExpandDepth:1,defaultModelsExpandDepth:1,showExtensions:!1,showCommonExtensions:!1,withCredentials:void 0,requestSnippetsEnabled:!1,requestSnippets:{generators:{curl_bash:{title:"cURL (bash)",syntax:"bash"},curl_powershell:{title:"cURL (PowerShell)",syntax:"powershell"},curl_cmd:{title:"cURL (CMD)",syntax:"bash"}},defaultExpanded:!0,languages:null},supportedSubmitMethods:["get","put","post","delete","options","head","patch","trace"],queryConfigEnabled:!1,presets:[Dr],plugins:[],pluginsOptions:{pluginLoadType:"legacy"},initialState:{},fn:{},components:{},syntaxHighlight:{activated:!0,theme:"agate"}};let i=e.queryConfigEnabled?(0,w.UG)():{};const u=e.domNode;delete e.domNode;const c=o()({},s,e,i),d={system:{configs:c.configs},plugins:c.presets,pluginsOptions:c.pluginsOptions,state:o()({layout:{layout:c.layout,filter:(0,n.default)(c)},spec:{spec:"",url:c.url},requestSnippets:c.requestSnippets},c.initialState)};if(c.initialState)for(var p in c.initialState)Object.prototype.hasOwnProperty.call(c.initialState,p)&&void 0===c.initialState[p]&&delete d.state[p];var f=new x(d);f.register([c.plugins,()=>({fn:c.fn,components:c.components,state:c.state})]);var h=f.getSystem();const m=e=>{let t=h.specSelectors.getLocalConfig?h.specSelectors.getLocalConfig():{},r=o()({},t,c,e||{},i);if(u&&(r.domNode=u),f.setConfigs(r),h.configsActions.loaded(),null!==e&&(!i.url&&"object"==typeof r.spec&&(0,a.default)(r.spec).length?(h.specActions.updateUrl(""),h.specActions.updateLoadingStatus("success"),h.specActions.updateSpec((0,l.default)(r.spec))):h.specActions.download&&r.url&&!r.urls&&(h.specActions.updateUrl(r.url),h.specActions.download(r.url))),r.domNode)h.render(r.domNode,"App");else if(r.dom_id){let e=document.querySelector(r.dom_id);h.render(e,"App")}else null===r.dom_id||null===r.domNode||console.error("Skipped rendering: no `dom_id` or `domNode` was specified");return h},g=i.config||c.configUrl;return g&&h.specActions&&h.specActions.getConfigByUrl?(h.specActions.getConfigByUrl({url:g,loadRemoteConfig:!0,requestInterceptor:c.requestInterceptor,responseInterceptor:c.responseInterceptor},m),h):m()}Jr.presets={apis:Dr},Jr.plugins=Ur.default;const Wr=Jr})();var Ye=Ze.Z;export{Ye as default};
-//# sourceMappingURL=swagger-ui-es-bundle-core.js.map
\ No newline at end of file
+//# sourceMappingURL=swagger-ui-es-bundle-core.js.b1d6e307bf5a.map
\ No newline at end of file
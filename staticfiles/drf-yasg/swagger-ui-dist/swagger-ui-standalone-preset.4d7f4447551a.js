@@ -1,3 +1,3 @@
 /*! For license information please see swagger-ui-standalone-preset.js.LICENSE.txt */
 !function(t,e){"object"==typeof exports&&"object"==typeof module?module.exports=e():"function"==typeof define&&define.amd?define([],e):"object"==typeof exports?exports.SwaggerUIStandalonePreset=e():t.SwaggerUIStandalonePreset=e()}(this,(()=>(()=>{var t={17967:(t,e)=>{"use strict";var r=/^([^\w]*)(javascript|data|vbscript)/im,n=/&#(\w+)(^\w|;)?/g,i=/&(newline|tab);/gi,o=/[\u0000-\u001F\u007F-\u009F\u2000-\u200D\uFEFF]/gim,s=/^.+(:|&colon;)/gim,u=[".","/"]},79742:(t,e)=>{"use strict";e.byteLength=function(t){var e=a(t),r=e[0],n=e[1];return 3*(r+n)/4-n},e.toByteArray=function(t){var e,r,o=a(t),s=o[0],u=o[1],c=new i(function(t,e,r){return 3*(e+r)/4-r}(0,s,u)),f=0,l=u>0?s-4:s;for(r=0;r<l;r+=4)e=n[t.charCodeAt(r)]<<18|n[t.charCodeAt(r+1)]<<12|n[t.charCodeAt(r+2)]<<6|n[t.charCodeAt(r+3)],c[f++]=e>>16&255,c[f++]=e>>8&255,c[f++]=255&e;2===u&&(e=n[t.charCodeAt(r)]<<2|n[t.charCodeAt(r+1)]>>4,c[f++]=255&e);1===u&&(e=n[t.charCodeAt(r)]<<10|n[t.charCodeAt(r+1)]<<4|n[t.charCodeAt(r+2)]>>2,c[f++]=e>>8&255,c[f++]=255&e);return c},e.fromByteArray=function(t){for(var e,n=t.length,i=n%3,o=[],s=16383,u=0,a=n-i;u<a;u+=s)o.push(c(t,u,u+s>a?a:u+s));1===i?(e=t[n-1],o.push(r[e>>2]+r[e<<4&63]+"==")):2===i&&(e=(t[n-2]<<8)+t[n-1],o.push(r[e>>10]+r[e>>4&63]+r[e<<2&63]+"="));return o.join("")};for(var r=[],n=[],i="undefined"!=typeof Uint8Array?Uint8Array:Array,o="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",s=0,u=o.length;s<u;++s)r[s]=o[s],n[o.charCodeAt(s)]=s;function a(t){var e=t.length;if(e%4>0)throw new Error("Invalid string. Length must be a multiple of 4");var r=t.indexOf("=");return-1===r&&(r=e),[r,r===e?0:4-r%4]}function c(t,e,n){for(var i,o,s=[],u=e;u<n;u+=3)i=(t[u]<<16&16711680)+(t[u+1]<<8&65280)+(255&t[u+2]),s.push(r[(o=i)>>18&63]+r[o>>12&63]+r[o>>6&63]+r[63&o]);return s.join("")}n["-".charCodeAt(0)]=62,n["_".charCodeAt(0)]=63},48764:(t,e,r)=>{"use strict";const n=r(79742),i=r(80645),o="function"==typeof Symbol&&"function"==typeof Symbol.for?Symbol.for("nodejs.util.inspect.custom"):null;e.Buffer=a,e.SlowBuffer=function(t){+t!=t&&(t=0);return a.alloc(+t)},e.INSPECT_MAX_BYTES=50;const s=2147483647;function u(t){if(t>s)throw new RangeError('The value "'+t+'" is invalid for option "size"');const e=new Uint8Array(t);return Object.setPrototypeOf(e,a.prototype),e}function a(t,e,r){if("number"==typeof t){if("string"==typeof e)throw new TypeError('The "string" argument must be of type string. Received type number');return l(t)}return c(t,e,r)}function c(t,e,r){if("string"==typeof t)return function(t,e){"string"==typeof e&&""!==e||(e="utf8");if(!a.isEncoding(e))throw new TypeError("Unknown encoding: "+e);const r=0|y(t,e);let n=u(r);const i=n.write(t,e);i!==r&&(n=n.slice(0,i));return n}(t,e);if(ArrayBuffer.isView(t))return function(t){if($(t,Uint8Array)){const e=new Uint8Array(t);return p(e.buffer,e.byteOffset,e.byteLength)}return h(t)}(t);if(null==t)throw new TypeError("The first argument must be one of type string, Buffer, ArrayBuffer, Array, or Array-like Object. Received type "+typeof t);if($(t,ArrayBuffer)||t&&$(t.buffer,ArrayBuffer))return p(t,e,r);if("undefined"!=typeof SharedArrayBuffer&&($(t,SharedArrayBuffer)||t&&$(t.buffer,SharedArrayBuffer)))return p(t,e,r);if("number"==typeof t)throw new TypeError('The "value" argument must not be of type number. Received type number');const n=t.valueOf&&t.valueOf();if(null!=n&&n!==t)return a.from(n,e,r);const i=function(t){if(a.isBuffer(t)){const e=0|d(t.length),r=u(e);return 0===r.length||t.copy(r,0,0,e),r}if(void 0!==t.length)return"number"!=typeof t.length||Z(t.length)?u(0):h(t);if("Buffer"===t.type&&Array.isArray(t.data))return h(t.data)}(t);if(i)return i;if("undefined"!=typeof Symbol&&null!=Symbol.toPrimitive&&"function"==typeof t[Symbol.toPrimitive])return a.from(t[Symbol.toPrimitive]("string"),e,r);throw new TypeError("The first argument must be one of type string, Buffer, ArrayBuffer, Array, or Array-like Object. Received type "+typeof t)}function f(t){if("number"!=typeof t)throw new TypeError('"size" argument must be of type number');if(t<0)throw new RangeError('The value "'+t+'" is invalid for option "size"')}function l(t){return f(t),u(t<0?0:0|d(t))}function h(t){const e=t.length<0?0:0|d(t.length),r=u(e);for(let n=0;n<e;n+=1)r[n]=255&t[n];return r}function p(t,e,r){if(e<0||t.byteLength<e)throw new RangeError('"offset" is outside of buffer bounds');if(t.byteLength<e+(r||0))throw new RangeError('"length" is outside of buffer bounds');let n;return n=void 0===e&&void 0===r?new Uint8Array(t):void 0===r?new Uint8Array(t,e):new Uint8Array(t,e,r),Object.setPrototypeOf(n,a.prototype),n}function d(t){if(t>=s)throw new RangeError("Attempt to allocate Buffer larger than maximum size: 0x"+s.toString(16)+" bytes");return 0|t}function y(t,e){if(a.isBuffer(t))return t.length;if(ArrayBuffer.isView(t)||$(t,ArrayBuffer))return t.byteLength;if("string"!=typeof t)throw new TypeError('The "string" argument must be one of type string, Buffer, or ArrayBuffer. Received type '+typeof t);const r=t.length,n=arguments.length>2&&!0===arguments[2];if(!n&&0===r)return 0;let i=!1;for(;;)switch(e){case"ascii":case"latin1":case"binary":return r;case"utf8":case"utf-8":return q(t).length;case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return 2*r;case"hex":return r>>>1;case"base64":return H(t).length;default:if(i)return n?-1:q(t).length;e=(""+e).toLowerCase(),i=!0}}function g(t,e,r){let n=!1;if((void 0===e||e<0)&&(e=0),e>this.length)return"";if((void 0===r||r>this.length)&&(r=this.length),r<=0)return"";if((r>>>=0)<=(e>>>=0))return"";for(t||(t="utf8");;)switch(t){case"hex":return E(this,e,r);case"utf8":case"utf-8":return N(this,e,r);case"ascii":return D(this,e,r);case"latin1":case"binary":return I(this,e,r);case"base64":return j(this,e,r);case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return A(this,e,r);default:if(n)throw new TypeError("Unknown encoding: "+t);t=(t+"").toLowerCase(),n=!0}}function v(t,e,r){const n=t[e];t[e]=t[r],t[r]=n}function w(t,e,r,n,i){if(0===t.length)return-1;if("string"==typeof r?(n=r,r=0):r>2147483647?r=2147483647:r<-2147483648&&(r=-2147483648),Z(r=+r)&&(r=i?0:t.length-1),r<0&&(r=t.length+r),r>=t.length){if(i)return-1;r=t.length-1}else if(r<0){if(!i)return-1;r=0}if("string"==typeof e&&(e=a.from(e,n)),a.isBuffer(e))return 0===e.length?-1:M(t,e,r,n,i);if("number"==typeof e)return e&=255,"function"==typeof Uint8Array.prototype.indexOf?i?Uint8Array.prototype.indexOf.call(t,e,r):Uint8Array.prototype.lastIndexOf.call(t,e,r):M(t,[e],r,n,i);throw new TypeError("val must be string, number or Buffer")}function M(t,e,r,n,i){let o,s=1,u=t.length,a=e.length;if(void 0!==n&&("ucs2"===(n=String(n).toLowerCase())||"ucs-2"===n||"utf16le"===n||"utf-16le"===n)){if(t.length<2||e.length<2)return-1;s=2,u/=2,a/=2,r/=2}function c(t,e){return 1===s?t[e]:t.readUInt16BE(e*s)}if(i){let n=-1;for(o=r;o<u;o++)if(c(t,o)===c(e,-1===n?0:o-n)){if(-1===n&&(n=o),o-n+1===a)return n*s}else-1!==n&&(o-=o-n),n=-1}else for(r+a>u&&(r=u-a),o=r;o>=0;o--){let r=!0;for(let n=0;n<a;n++)if(c(t,o+n)!==c(e,n)){r=!1;break}if(r)return o}return-1}function L(t,e,r,n){r=Number(r)||0;const i=t.length-r;n?(n=Number(n))>i&&(n=i):n=i;const o=e.length;let s;for(n>o/2&&(n=o/2),s=0;s<n;++s){const n=parseInt(e.substr(2*s,2),16);if(Z(n))return s;t[r+s]=n}return s}function _(t,e,r,n){return J(q(e,t.length-r),t,r,n)}function m(t,e,r,n){return J(function(t){const e=[];for(let r=0;r<t.length;++r)e.push(255&t.charCodeAt(r));return e}(e),t,r,n)}function b(t,e,r,n){return J(H(e),t,r,n)}function x(t,e,r,n){return J(function(t,e){let r,n,i;const o=[];for(let s=0;s<t.length&&!((e-=2)<0);++s)r=t.charCodeAt(s),n=r>>8,i=r%256,o.push(i),o.push(n);return o}(e,t.length-r),t,r,n)}function j(t,e,r){return 0===e&&r===t.length?n.fromByteArray(t):n.fromByteArray(t.slice(e,r))}function N(t,e,r){r=Math.min(t.length,r);const n=[];let i=e;for(;i<r;){const e=t[i];let o=null,s=e>239?4:e>223?3:e>191?2:1;if(i+s<=r){let r,n,u,a;switch(s){case 1:e<128&&(o=e);break;case 2:r=t[i+1],128==(192&r)&&(a=(31&e)<<6|63&r,a>127&&(o=a));break;case 3:r=t[i+1],n=t[i+2],128==(192&r)&&128==(192&n)&&(a=(15&e)<<12|(63&r)<<6|63&n,a>2047&&(a<55296||a>57343)&&(o=a));break;case 4:r=t[i+1],n=t[i+2],u=t[i+3],128==(192&r)&&128==(192&n)&&128==(192&u)&&(a=(15&e)<<18|(63&r)<<12|(63&n)<<6|63&u,a>65535&&a<1114112&&(o=a))}}null===o?(o=65533,s=1):o>65535&&(o-=65536,n.push(o>>>10&1023|55296),o=56320|1023&o),n.push(o),i+=s}return function(t){const e=t.length;if(e<=S)return String.fromCharCode.apply(String,t);let r="",n=0;for(;n<e;)r+=String.fromCharCode.apply(String,t.slice(n,n+=S));return r}(n)}e.kMaxLength=s,a.TYPED_ARRAY_SUPPORT=function(){try{const t=new Uint8Array(1),e={foo:function(){return 42}};return Object.setPrototypeOf(e,Uint8Array.prototype),Object.setPrototypeOf(t,e),42===t.foo()}catch(t){return!1}}(),a.TYPED_ARRAY_SUPPORT||"undefined"==typeof console||"function"!=typeof console.error||console.error("This browser lacks typed array (Uint8Array) support which is required by `buffer` v5.x. Use `buffer` v4.x if you require old browser support."),Object.defineProperty(a.prototype,"parent",{enumerable:!0,get:function(){if(a.isBuffer(this))return this.buffer}}),Object.defineProperty(a.prototype,"offset",{enumerable:!0,get:function(){if(a.isBuffer(this))return this.byteOffset}}),a.poolSize=8192,a.from=function(t,e,r){return c(t,e,r)},Object.setPrototypeOf(a.prototype,Uint8Array.prototype),Object.setPrototypeOf(a,Uint8Array),a.alloc=function(t,e,r){return function(t,e,r){return f(t),t<=0?u(t):void 0!==e?"string"==typeof r?u(t).fill(e,r):u(t).fill(e):u(t)}(t,e,r)},a.allocUnsafe=function(t){return l(t)},a.allocUnsafeSlow=function(t){return l(t)},a.isBuffer=function(t){return null!=t&&!0===t._isBuffer&&t!==a.prototype},a.compare=function(t,e){if($(t,Uint8Array)&&(t=a.from(t,t.offset,t.byteLength)),$(e,Uint8Array)&&(e=a.from(e,e.offset,e.byteLength)),!a.isBuffer(t)||!a.isBuffer(e))throw new TypeError('The "buf1", "buf2" arguments must be one of type Buffer or Uint8Array');if(t===e)return 0;let r=t.length,n=e.length;for(let i=0,o=Math.min(r,n);i<o;++i)if(t[i]!==e[i]){r=t[i],n=e[i];break}return r<n?-1:n<r?1:0},a.isEncoding=function(t){switch(String(t).toLowerCase()){case"hex":case"utf8":case"utf-8":case"ascii":case"latin1":case"binary":case"base64":case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return!0;default:return!1}},a.concat=function(t,e){if(!Array.isArray(t))throw new TypeError('"list" argument must be an Array of Buffers');if(0===t.length)return a.alloc(0);let r;if(void 0===e)for(e=0,r=0;r<t.length;++r)e+=t[r].length;const n=a.allocUnsafe(e);let i=0;for(r=0;r<t.length;++r){let e=t[r];if($(e,Uint8Array))i+e.length>n.length?(a.isBuffer(e)||(e=a.from(e)),e.copy(n,i)):Uint8Array.prototype.set.call(n,e,i);else{if(!a.isBuffer(e))throw new TypeError('"list" argument must be an Array of Buffers');e.copy(n,i)}i+=e.length}return n},a.byteLength=y,a.prototype._isBuffer=!0,a.prototype.swap16=function(){const t=this.length;if(t%2!=0)throw new RangeError("Buffer size must be a multiple of 16-bits");for(let e=0;e<t;e+=2)v(this,e,e+1);return this},a.prototype.swap32=function(){const t=this.length;if(t%4!=0)throw new RangeError("Buffer size must be a multiple of 32-bits");for(let e=0;e<t;e+=4)v(this,e,e+3),v(this,e+1,e+2);return this},a.prototype.swap64=function(){const t=this.length;if(t%8!=0)throw new RangeError("Buffer size must be a multiple of 64-bits");for(let e=0;e<t;e+=8)v(this,e,e+7),v(this,e+1,e+6),v(this,e+2,e+5),v(this,e+3,e+4);return this},a.prototype.toString=function(){const t=this.length;return 0===t?"":0===arguments.length?N(this,0,t):g.apply(this,arguments)},a.prototype.toLocaleString=a.prototype.toString,a.prototype.equals=function(t){if(!a.isBuffer(t))throw new TypeError("Argument must be a Buffer");return this===t||0===a.compare(this,t)},a.prototype.inspect=function(){let t="";const r=e.INSPECT_MAX_BYTES;return t=this.toString("hex",0,r).replace(/(.{2})/g,"$1 ").trim(),this.length>r&&(t+=" ... "),"<Buffer "+t+">"},o&&(a.prototype[o]=a.prototype.inspect),a.prototype.compare=function(t,e,r,n,i){if($(t,Uint8Array)&&(t=a.from(t,t.offset,t.byteLength)),!a.isBuffer(t))throw new TypeError('The "target" argument must be one of type Buffer or Uint8Array. Received type '+typeof t);if(void 0===e&&(e=0),void 0===r&&(r=t?t.length:0),void 0===n&&(n=0),void 0===i&&(i=this.length),e<0||r>t.length||n<0||i>this.length)throw new RangeError("out of range index");if(n>=i&&e>=r)return 0;if(n>=i)return-1;if(e>=r)return 1;if(this===t)return 0;let o=(i>>>=0)-(n>>>=0),s=(r>>>=0)-(e>>>=0);const u=Math.min(o,s),c=this.slice(n,i),f=t.slice(e,r);for(let t=0;t<u;++t)if(c[t]!==f[t]){o=c[t],s=f[t];break}return o<s?-1:s<o?1:0},a.prototype.includes=function(t,e,r){return-1!==this.indexOf(t,e,r)},a.prototype.indexOf=function(t,e,r){return w(this,t,e,r,!0)},a.prototype.lastIndexOf=function(t,e,r){return w(this,t,e,r,!1)},a.prototype.write=function(t,e,r,n){if(void 0===e)n="utf8",r=this.length,e=0;else if(void 0===r&&"string"==typeof e)n=e,r=this.length,e=0;else{if(!isFinite(e))throw new Error("Buffer.write(string, encoding, offset[, length]) is no longer supported");e>>>=0,isFinite(r)?(r>>>=0,void 0===n&&(n="utf8")):(n=r,r=void 0)}const i=this.length-e;if((void 0===r||r>i)&&(r=i),t.length>0&&(r<0||e<0)||e>this.length)throw new RangeError("Attempt to write outside buffer bounds");n||(n="utf8");let o=!1;for(;;)switch(n){case"hex":return L(this,t,e,r);case"utf8":case"utf-8":return _(this,t,e,r);case"ascii":case"latin1":case"binary":return m(this,t,e,r);case"base64":return b(this,t,e,r);case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return x(this,t,e,r);default:if(o)throw new TypeError("Unknown encoding: "+n);n=(""+n).toLowerCase(),o=!0}},a.prototype.toJSON=function(){return{type:"Buffer",data:Array.prototype.slice.call(this._arr||this,0)}};const S=4096;function D(t,e,r){let n="";r=Math.min(t.length,r);for(let i=e;i<r;++i)n+=String.fromCharCode(127&t[i]);return n}function I(t,e,r){let n="";r=Math.min(t.length,r);for(let i=e;i<r;++i)n+=String.fromCharCode(t[i]);return n}function E(t,e,r){const n=t.length;(!e||e<0)&&(e=0),(!r||r<0||r>n)&&(r=n);let i="";for(let n=e;n<r;++n)i+=V[t[n]];return i}function A(t,e,r){const n=t.slice(e,r);let i="";for(let t=0;t<n.length-1;t+=2)i+=String.fromCharCode(n[t]+256*n[t+1]);return i}function C(t,e,r){if(t%1!=0||t<0)throw new RangeError("offset is not uint");if(t+e>r)throw new RangeError("Trying to access beyond buffer length")}function T(t,e,r,n,i,o){if(!a.isBuffer(t))throw new TypeError('"buffer" argument must be a Buffer instance');if(e>i||e<o)throw new RangeError('"value" argument is out of bounds');if(r+n>t.length)throw new RangeError("Index out of range")}function O(t,e,r,n,i){Q(e,n,i,t,r,7);let o=Number(e&BigInt(4294967295));t[r++]=o,o>>=8,t[r++]=o,o>>=8,t[r++]=o,o>>=8,t[r++]=o;let s=Number(e>>BigInt(32)&BigInt(4294967295));return t[r++]=s,s>>=8,t[r++]=s,s>>=8,t[r++]=s,s>>=8,t[r++]=s,r}function z(t,e,r,n,i){Q(e,n,i,t,r,7);let o=Number(e&BigInt(4294967295));t[r+7]=o,o>>=8,t[r+6]=o,o>>=8,t[r+5]=o,o>>=8,t[r+4]=o;let s=Number(e>>BigInt(32)&BigInt(4294967295));return t[r+3]=s,s>>=8,t[r+2]=s,s>>=8,t[r+1]=s,s>>=8,t[r]=s,r+8}function k(t,e,r,n,i,o){if(r+n>t.length)throw new RangeError("Index out of range");if(r<0)throw new RangeError("Index out of range")}function U(t,e,r,n,o){return e=+e,r>>>=0,o||k(t,0,r,4),i.write(t,e,r,n,23,4),r+4}function R(t,e,r,n,o){return e=+e,r>>>=0,o||k(t,0,r,8),i.write(t,e,r,n,52,8),r+8}a.prototype.slice=function(t,e){const r=this.length;(t=~~t)<0?(t+=r)<0&&(t=0):t>r&&(t=r),(e=void 0===e?r:~~e)<0?(e+=r)<0&&(e=0):e>r&&(e=r),e<t&&(e=t);const n=this.subarray(t,e);return Object.setPrototypeOf(n,a.prototype),n},a.prototype.readUintLE=a.prototype.readUIntLE=function(t,e,r){t>>>=0,e>>>=0,r||C(t,e,this.length);let n=this[t],i=1,o=0;for(;++o<e&&(i*=256);)n+=this[t+o]*i;return n},a.prototype.readUintBE=a.prototype.readUIntBE=function(t,e,r){t>>>=0,e>>>=0,r||C(t,e,this.length);let n=this[t+--e],i=1;for(;e>0&&(i*=256);)n+=this[t+--e]*i;return n},a.prototype.readUint8=a.prototype.readUInt8=function(t,e){return t>>>=0,e||C(t,1,this.length),this[t]},a.prototype.readUint16LE=a.prototype.readUInt16LE=function(t,e){return t>>>=0,e||C(t,2,this.length),this[t]|this[t+1]<<8},a.prototype.readUint16BE=a.prototype.readUInt16BE=function(t,e){return t>>>=0,e||C(t,2,this.length),this[t]<<8|this[t+1]},a.prototype.readUint32LE=a.prototype.readUInt32LE=function(t,e){return t>>>=0,e||C(t,4,this.length),(this[t]|this[t+1]<<8|this[t+2]<<16)+16777216*this[t+3]},a.prototype.readUint32BE=a.prototype.readUInt32BE=function(t,e){return t>>>=0,e||C(t,4,this.length),16777216*this[t]+(this[t+1]<<16|this[t+2]<<8|this[t+3])},a.prototype.readBigUInt64LE=X((function(t){F(t>>>=0,"offset");const e=this[t],r=this[t+7];void 0!==e&&void 0!==r||G(t,this.length-8);const n=e+256*this[++t]+65536*this[++t]+this[++t]*2**24,i=this[++t]+256*this[++t]+65536*this[++t]+r*2**24;return BigInt(n)+(BigInt(i)<<BigInt(32))})),a.prototype.readBigUInt64BE=X((function(t){F(t>>>=0,"offset");const e=this[t],r=this[t+7];void 0!==e&&void 0!==r||G(t,this.length-8);const n=e*2**24+65536*this[++t]+256*this[++t]+this[++t],i=this[++t]*2**24+65536*this[++t]+256*this[++t]+r;return(BigInt(n)<<BigInt(32))+BigInt(i)})),a.prototype.readIntLE=function(t,e,r){t>>>=0,e>>>=0,r||C(t,e,this.length);let n=this[t],i=1,o=0;for(;++o<e&&(i*=256);)n+=this[t+o]*i;return i*=128,n>=i&&(n-=Math.pow(2,8*e)),n},a.prototype.readIntBE=function(t,e,r){t>>>=0,e>>>=0,r||C(t,e,this.length);let n=e,i=1,o=this[t+--n];for(;n>0&&(i*=256);)o+=this[t+--n]*i;return i*=128,o>=i&&(o-=Math.pow(2,8*e)),o},a.prototype.readInt8=function(t,e){return t>>>=0,e||C(t,1,this.length),128&this[t]?-1*(255-this[t]+1):this[t]},a.prototype.readInt16LE=function(t,e){t>>>=0,e||C(t,2,this.length);const r=this[t]|this[t+1]<<8;return 32768&r?4294901760|r:r},a.prototype.readInt16BE=function(t,e){t>>>=0,e||C(t,2,this.length);const r=this[t+1]|this[t]<<8;return 32768&r?4294901760|r:r},a.prototype.readInt32LE=function(t,e){return t>>>=0,e||C(t,4,this.length),this[t]|this[t+1]<<8|this[t+2]<<16|this[t+3]<<24},a.prototype.readInt32BE=function(t,e){return t>>>=0,e||C(t,4,this.length),this[t]<<24|this[t+1]<<16|this[t+2]<<8|this[t+3]},a.prototype.readBigInt64LE=X((function(t){F(t>>>=0,"offset");const e=this[t],r=this[t+7];void 0!==e&&void 0!==r||G(t,this.length-8);const n=this[t+4]+256*this[t+5]+65536*this[t+6]+(r<<24);return(BigInt(n)<<BigInt(32))+BigInt(e+256*this[++t]+65536*this[++t]+this[++t]*2**24)})),a.prototype.readBigInt64BE=X((function(t){F(t>>>=0,"offset");const e=this[t],r=this[t+7];void 0!==e&&void 0!==r||G(t,this.length-8);const n=(e<<24)+65536*this[++t]+256*this[++t]+this[++t];return(BigInt(n)<<BigInt(32))+BigInt(this[++t]*2**24+65536*this[++t]+256*this[++t]+r)})),a.prototype.readFloatLE=function(t,e){return t>>>=0,e||C(t,4,this.length),i.read(this,t,!0,23,4)},a.prototype.readFloatBE=function(t,e){return t>>>=0,e||C(t,4,this.length),i.read(this,t,!1,23,4)},a.prototype.readDoubleLE=function(t,e){return t>>>=0,e||C(t,8,this.length),i.read(this,t,!0,52,8)},a.prototype.readDoubleBE=function(t,e){return t>>>=0,e||C(t,8,this.length),i.read(this,t,!1,52,8)},a.prototype.writeUintLE=a.prototype.writeUIntLE=function(t,e,r,n){if(t=+t,e>>>=0,r>>>=0,!n){T(this,t,e,r,Math.pow(2,8*r)-1,0)}let i=1,o=0;for(this[e]=255&t;++o<r&&(i*=256);)this[e+o]=t/i&255;return e+r},a.prototype.writeUintBE=a.prototype.writeUIntBE=function(t,e,r,n){if(t=+t,e>>>=0,r>>>=0,!n){T(this,t,e,r,Math.pow(2,8*r)-1,0)}let i=r-1,o=1;for(this[e+i]=255&t;--i>=0&&(o*=256);)this[e+i]=t/o&255;return e+r},a.prototype.writeUint8=a.prototype.writeUInt8=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,1,255,0),this[e]=255&t,e+1},a.prototype.writeUint16LE=a.prototype.writeUInt16LE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,2,65535,0),this[e]=255&t,this[e+1]=t>>>8,e+2},a.prototype.writeUint16BE=a.prototype.writeUInt16BE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,2,65535,0),this[e]=t>>>8,this[e+1]=255&t,e+2},a.prototype.writeUint32LE=a.prototype.writeUInt32LE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,4,4294967295,0),this[e+3]=t>>>24,this[e+2]=t>>>16,this[e+1]=t>>>8,this[e]=255&t,e+4},a.prototype.writeUint32BE=a.prototype.writeUInt32BE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,4,4294967295,0),this[e]=t>>>24,this[e+1]=t>>>16,this[e+2]=t>>>8,this[e+3]=255&t,e+4},a.prototype.writeBigUInt64LE=X((function(t,e=0){return O(this,t,e,BigInt(0),BigInt("0xffffffffffffffff"))})),a.prototype.writeBigUInt64BE=X((function(t,e=0){return z(this,t,e,BigInt(0),BigInt("0xffffffffffffffff"))})),a.prototype.writeIntLE=function(t,e,r,n){if(t=+t,e>>>=0,!n){const n=Math.pow(2,8*r-1);T(this,t,e,r,n-1,-n)}let i=0,o=1,s=0;for(this[e]=255&t;++i<r&&(o*=256);)t<0&&0===s&&0!==this[e+i-1]&&(s=1),this[e+i]=(t/o>>0)-s&255;return e+r},a.prototype.writeIntBE=function(t,e,r,n){if(t=+t,e>>>=0,!n){const n=Math.pow(2,8*r-1);T(this,t,e,r,n-1,-n)}let i=r-1,o=1,s=0;for(this[e+i]=255&t;--i>=0&&(o*=256);)t<0&&0===s&&0!==this[e+i+1]&&(s=1),this[e+i]=(t/o>>0)-s&255;return e+r},a.prototype.writeInt8=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,1,127,-128),t<0&&(t=255+t+1),this[e]=255&t,e+1},a.prototype.writeInt16LE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,2,32767,-32768),this[e]=255&t,this[e+1]=t>>>8,e+2},a.prototype.writeInt16BE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,2,32767,-32768),this[e]=t>>>8,this[e+1]=255&t,e+2},a.prototype.writeInt32LE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,4,2147483647,-2147483648),this[e]=255&t,this[e+1]=t>>>8,this[e+2]=t>>>16,this[e+3]=t>>>24,e+4},a.prototype.writeInt32BE=function(t,e,r){return t=+t,e>>>=0,r||T(this,t,e,4,2147483647,-2147483648),t<0&&(t=4294967295+t+1),this[e]=t>>>24,this[e+1]=t>>>16,this[e+2]=t>>>8,this[e+3]=255&t,e+4},a.prototype.writeBigInt64LE=X((function(t,e=0){return O(this,t,e,-BigInt("0x8000000000000000"),BigInt("0x7fffffffffffffff"))})),a.prototype.writeBigInt64BE=X((function(t,e=0){return z(this,t,e,-BigInt("0x8000000000000000"),BigInt("0x7fffffffffffffff"))})),a.prototype.writeFloatLE=function(t,e,r){return U(this,t,e,!0,r)},a.prototype.writeFloatBE=function(t,e,r){return U(this,t,e,!1,r)},a.prototype.writeDoubleLE=function(t,e,r){return R(this,t,e,!0,r)},a.prototype.writeDoubleBE=function(t,e,r){return R(this,t,e,!1,r)},a.prototype.copy=function(t,e,r,n){if(!a.isBuffer(t))throw new TypeError("argument should be a Buffer");if(r||(r=0),n||0===n||(n=this.length),e>=t.length&&(e=t.length),e||(e=0),n>0&&n<r&&(n=r),n===r)return 0;if(0===t.length||0===this.length)return 0;if(e<0)throw new RangeError("targetStart out of bounds");if(r<0||r>=this.length)throw new RangeError("Index out of range");if(n<0)throw new RangeError("sourceEnd out of bounds");n>this.length&&(n=this.length),t.length-e<n-r&&(n=t.length-e+r);const i=n-r;return this===t&&"function"==typeof Uint8Array.prototype.copyWithin?this.copyWithin(e,r,n):Uint8Array.prototype.set.call(t,this.subarray(r,n),e),i},a.prototype.fill=function(t,e,r,n){if("string"==typeof t){if("string"==typeof e?(n=e,e=0,r=this.length):"string"==typeof r&&(n=r,r=this.length),void 0!==n&&"string"!=typeof n)throw new TypeError("encoding must be a string");if("string"==typeof n&&!a.isEncoding(n))throw new TypeError("Unknown encoding: "+n);if(1===t.length){const e=t.charCodeAt(0);("utf8"===n&&e<128||"latin1"===n)&&(t=e)}}else"number"==typeof t?t&=255:"boolean"==typeof t&&(t=Number(t));if(e<0||this.length<e||this.length<r)throw new RangeError("Out of range index");if(r<=e)return this;let i;if(e>>>=0,r=void 0===r?this.length:r>>>0,t||(t=0),"number"==typeof t)for(i=e;i<r;++i)this[i]=t;else{const o=a.isBuffer(t)?t:a.from(t,n),s=o.length;if(0===s)throw new TypeError('The value "'+t+'" is invalid for argument "value"');for(i=0;i<r-e;++i)this[i+e]=o[i%s]}return this};const Y={};function B(t,e,r){Y[t]=class extends r{constructor(){super(),Object.defineProperty(this,"message",{value:e.apply(this,arguments),writable:!0,configurable:!0}),this.name=`${this.name} [${t}]`,this.stack,delete this.name}get code(){return t}set code(t){Object.defineProperty(this,"code",{configurable:!0,enumerable:!0,value:t,writable:!0})}toString(){return`${this.name} [${t}]: ${this.message}`}}}function P(t){let e="",r=t.length;const n="-"===t[0]?1:0;for(;r>=n+4;r-=3)e=`_${t.slice(r-3,r)}${e}`;return`${t.slice(0,r)}${e}`}function Q(t,e,r,n,i,o){if(t>r||t<e){const n="bigint"==typeof e?"n":"";let i;throw i=o>3?0===e||e===BigInt(0)?`>= 0${n} and < 2${n} ** ${8*(o+1)}${n}`:`>= -(2${n} ** ${8*(o+1)-1}${n}) and < 2 ** ${8*(o+1)-1}${n}`:`>= ${e}${n} and <= ${r}${n}`,new Y.ERR_OUT_OF_RANGE("value",i,t)}!function(t,e,r){F(e,"offset"),void 0!==t[e]&&void 0!==t[e+r]||G(e,t.length-(r+1))}(n,i,o)}function F(t,e){if("number"!=typeof t)throw new Y.ERR_INVALID_ARG_TYPE(e,"number",t)}function G(t,e,r){if(Math.floor(t)!==t)throw F(t,r),new Y.ERR_OUT_OF_RANGE(r||"offset","an integer",t);if(e<0)throw new Y.ERR_BUFFER_OUT_OF_BOUNDS;throw new Y.ERR_OUT_OF_RANGE(r||"offset",`>= ${r?1:0} and <= ${e}`,t)}B("ERR_BUFFER_OUT_OF_BOUNDS",(function(t){return t?`${t} is outside of buffer bounds`:"Attempt to access memory outside buffer bounds"}),RangeError),B("ERR_INVALID_ARG_TYPE",(function(t,e){return`The "${t}" argument must be of type number. Received type ${typeof e}`}),TypeError),B("ERR_OUT_OF_RANGE",(function(t,e,r){let n=`The value of "${t}" is out of range.`,i=r;return Number.isInteger(r)&&Math.abs(r)>2**32?i=P(String(r)):"bigint"==typeof r&&(i=String(r),(r>BigInt(2)**BigInt(32)||r<-(BigInt(2)**BigInt(32)))&&(i=P(i)),i+="n"),n+=` It must be ${e}. Received ${i}`,n}),RangeError);const W=/[^+/0-9A-Za-z-_]/g;function q(t,e){let r;e=e||1/0;const n=t.length;let i=null;const o=[];for(let s=0;s<n;++s){if(r=t.charCodeAt(s),r>55295&&r<57344){if(!i){if(r>56319){(e-=3)>-1&&o.push(239,191,189);continue}if(s+1===n){(e-=3)>-1&&o.push(239,191,189);continue}i=r;continue}if(r<56320){(e-=3)>-1&&o.push(239,191,189),i=r;continue}r=65536+(i-55296<<10|r-56320)}else i&&(e-=3)>-1&&o.push(239,191,189);if(i=null,r<128){if((e-=1)<0)break;o.push(r)}else if(r<2048){if((e-=2)<0)break;o.push(r>>6|192,63&r|128)}else if(r<65536){if((e-=3)<0)break;o.push(r>>12|224,r>>6&63|128,63&r|128)}else{if(!(r<1114112))throw new Error("Invalid code point");if((e-=4)<0)break;o.push(r>>18|240,r>>12&63|128,r>>6&63|128,63&r|128)}}return o}function H(t){return n.toByteArray(function(t){if((t=(t=t.split("=")[0]).trim().replace(W,"")).length<2)return"";for(;t.length%4!=0;)t+="=";return t}(t))}function J(t,e,r,n){let i;for(i=0;i<n&&!(i+r>=e.length||i>=t.length);++i)e[i+r]=t[i];return i}function $(t,e){return t instanceof e||null!=t&&null!=t.constructor&&null!=t.constructor.name&&t.constructor.name===e.name}function Z(t){return t!=t}const V=function(){const t="0123456789abcdef",e=new Array(256);for(let r=0;r<16;++r){const n=16*r;for(let i=0;i<16;++i)e[n+i]=t[r]+t[i]}return e}();function X(t){return"undefined"==typeof BigInt?K:t}function K(){throw new Error("BigInt not supported")}},90093:(t,e,r)=>{var n=r(28196);t.exports=n},65362:(t,e,r)=>{var n=r(63383);t.exports=n},43536:(t,e,r)=>{var n=r(41910);t.exports=n},80281:(t,e,r)=>{var n=r(92547);r(43975),t.exports=n},40031:(t,e,r)=>{var n=r(46509);t.exports=n},17487:(t,e,r)=>{var n=r(35774);t.exports=n},54493:(t,e,r)=>{r(77971),r(53242);var n=r(54058);t.exports=n.Array.from},24034:(t,e,r)=>{r(92737);var n=r(54058);t.exports=n.Array.isArray},15367:(t,e,r)=>{r(85906);var n=r(35703);t.exports=n("Array").concat},12710:(t,e,r)=>{r(66274),r(55967);var n=r(35703);t.exports=n("Array").entries},51459:(t,e,r)=>{r(48851);var n=r(35703);t.exports=n("Array").every},6172:(t,e,r)=>{r(80290);var n=r(35703);t.exports=n("Array").fill},62383:(t,e,r)=>{r(21501);var n=r(35703);t.exports=n("Array").filter},60009:(t,e,r)=>{r(44929);var n=r(35703);t.exports=n("Array").findIndex},17671:(t,e,r)=>{r(80833);var n=r(35703);t.exports=n("Array").find},99324:(t,e,r)=>{r(2437);var n=r(35703);t.exports=n("Array").forEach},80991:(t,e,r)=>{r(97690);var n=r(35703);t.exports=n("Array").includes},8700:(t,e,r)=>{r(99076);var n=r(35703);t.exports=n("Array").indexOf},95909:(t,e,r)=>{r(66274),r(55967);var n=r(35703);t.exports=n("Array").keys},23866:(t,e,r)=>{r(68787);var n=r(35703);t.exports=n("Array").map},52999:(t,e,r)=>{r(81876);var n=r(35703);t.exports=n("Array").reduce},24900:(t,e,r)=>{r(60186);var n=r(35703);t.exports=n("Array").slice},3824:(t,e,r)=>{r(36026);var n=r(35703);t.exports=n("Array").some},2948:(t,e,r)=>{r(4115);var n=r(35703);t.exports=n("Array").sort},27700:(t,e,r)=>{r(73381);var n=r(35703);t.exports=n("Function").bind},16246:(t,e,r)=>{var n=r(7046),i=r(27700),o=Function.prototype;t.exports=function(t){var e=t.bind;return t===o||n(o,t)&&e===o.bind?i:e}},56043:(t,e,r)=>{var n=r(7046),i=r(15367),o=Array.prototype;t.exports=function(t){var e=t.concat;return t===o||n(o,t)&&e===o.concat?i:e}},13160:(t,e,r)=>{var n=r(7046),i=r(51459),o=Array.prototype;t.exports=function(t){var e=t.every;return t===o||n(o,t)&&e===o.every?i:e}},80446:(t,e,r)=>{var n=r(7046),i=r(6172),o=Array.prototype;t.exports=function(t){var e=t.fill;return t===o||n(o,t)&&e===o.fill?i:e}},2480:(t,e,r)=>{var n=r(7046),i=r(62383),o=Array.prototype;t.exports=function(t){var e=t.filter;return t===o||n(o,t)&&e===o.filter?i:e}},7147:(t,e,r)=>{var n=r(7046),i=r(60009),o=Array.prototype;t.exports=function(t){var e=t.findIndex;return t===o||n(o,t)&&e===o.findIndex?i:e}},32236:(t,e,r)=>{var n=r(7046),i=r(17671),o=Array.prototype;t.exports=function(t){var e=t.find;return t===o||n(o,t)&&e===o.find?i:e}},58557:(t,e,r)=>{var n=r(7046),i=r(80991),o=r(21631),s=Array.prototype,u=String.prototype;t.exports=function(t){var e=t.includes;return t===s||n(s,t)&&e===s.includes?i:"string"==typeof t||t===u||n(u,t)&&e===u.includes?o:e}},34570:(t,e,r)=>{var n=r(7046),i=r(8700),o=Array.prototype;t.exports=function(t){var e=t.indexOf;return t===o||n(o,t)&&e===o.indexOf?i:e}},88287:(t,e,r)=>{var n=r(7046),i=r(23866),o=Array.prototype;t.exports=function(t){var e=t.map;return t===o||n(o,t)&&e===o.map?i:e}},68025:(t,e,r)=>{var n=r(7046),i=r(52999),o=Array.prototype;t.exports=function(t){var e=t.reduce;return t===o||n(o,t)&&e===o.reduce?i:e}},69601:(t,e,r)=>{var n=r(7046),i=r(24900),o=Array.prototype;t.exports=function(t){var e=t.slice;return t===o||n(o,t)&&e===o.slice?i:e}},28299:(t,e,r)=>{var n=r(7046),i=r(3824),o=Array.prototype;t.exports=function(t){var e=t.some;return t===o||n(o,t)&&e===o.some?i:e}},69355:(t,e,r)=>{var n=r(7046),i=r(2948),o=Array.prototype;t.exports=function(t){var e=t.sort;return t===o||n(o,t)&&e===o.sort?i:e}},71611:(t,e,r)=>{var n=r(7046),i=r(3269),o=String.prototype;t.exports=function(t){var e=t.startsWith;return"string"==typeof t||t===o||n(o,t)&&e===o.startsWith?i:e}},62774:(t,e,r)=>{var n=r(7046),i=r(13348),o=String.prototype;t.exports=function(t){var e=t.trim;return"string"==typeof t||t===o||n(o,t)&&e===o.trim?i:e}},84426:(t,e,r)=>{r(32619);var n=r(54058),i=r(79730);n.JSON||(n.JSON={stringify:JSON.stringify}),t.exports=function(t,e,r){return i(n.JSON.stringify,null,arguments)}},91018:(t,e,r)=>{r(66274),r(37501),r(55967),r(77971);var n=r(54058);t.exports=n.Map},45999:(t,e,r)=>{r(49221);var n=r(54058);t.exports=n.Object.assign},48171:(t,e,r)=>{r(86450);var n=r(54058).Object,i=t.exports=function(t,e,r){return n.defineProperty(t,e,r)};n.defineProperty.sham&&(i.sham=!0)},48494:(t,e,r)=>{r(21724);var n=r(54058);t.exports=n.Object.keys},21631:(t,e,r)=>{r(11035);var n=r(35703);t.exports=n("String").includes},3269:(t,e,r)=>{r(94761);var n=r(35703);t.exports=n("String").startsWith},13348:(t,e,r)=>{r(57398);var n=r(35703);t.exports=n("String").trim},57473:(t,e,r)=>{r(85906),r(55967),r(35824),r(8555),r(52615),r(21732),r(35903),r(1825),r(28394),r(45915),r(61766),r(62737),r(89911),r(74315),r(63131),r(64714),r(70659),r(69120),r(79413),r(1502);var n=r(54058);t.exports=n.Symbol},24227:(t,e,r)=>{r(66274),r(55967),r(77971),r(1825);var n=r(11477);t.exports=n.f("iterator")},62978:(t,e,r)=>{r(18084),r(63131);var n=r(11477);t.exports=n.f("toPrimitive")},14122:(t,e,r)=>{t.exports=r(89097)},60269:(t,e,r)=>{t.exports=r(76936)},73685:(t,e,r)=>{t.exports=r(80621)},86600:(t,e,r)=>{t.exports=r(52201)},9759:(t,e,r)=>{t.exports=r(27398)},71384:(t,e,r)=>{t.exports=r(26189)},89097:(t,e,r)=>{var n=r(90093);t.exports=n},76936:(t,e,r)=>{var n=r(65362);t.exports=n},80621:(t,e,r)=>{var n=r(43536);t.exports=n},52201:(t,e,r)=>{var n=r(80281);r(28783),r(22731),r(85605),r(65799),r(31943),r(46774),r(45414),r(80620),r(36172),t.exports=n},27398:(t,e,r)=>{var n=r(40031);t.exports=n},26189:(t,e,r)=>{var n=r(17487);t.exports=n},24883:(t,e,r)=>{var n=r(57475),i=r(69826),o=TypeError;t.exports=function(t){if(n(t))return t;throw o(i(t)+" is not a function")}},11851:(t,e,r)=>{var n=r(57475),i=String,o=TypeError;t.exports=function(t){if("object"==typeof t||n(t))return t;throw o("Can't set "+i(t)+" as a prototype")}},18479:t=>{t.exports=function(){}},5743:(t,e,r)=>{var n=r(7046),i=TypeError;t.exports=function(t,e){if(n(e,t))return t;throw i("Incorrect invocation")}},96059:(t,e,r)=>{var n=r(10941),i=String,o=TypeError;t.exports=function(t){if(n(t))return t;throw o(i(t)+" is not an object")}},97135:(t,e,r)=>{var n=r(95981);t.exports=n((function(){if("function"==typeof ArrayBuffer){var t=new ArrayBuffer(8);Object.isExtensible(t)&&Object.defineProperty(t,"a",{value:8})}}))},91860:(t,e,r)=>{"use strict";var n=r(89678),i=r(59413),o=r(10623);t.exports=function(t){for(var e=n(this),r=o(e),s=arguments.length,u=i(s>1?arguments[1]:void 0,r),a=s>2?arguments[2]:void 0,c=void 0===a?r:i(a,r);c>u;)e[u++]=t;return e}},56837:(t,e,r)=>{"use strict";var n=r(3610).forEach,i=r(34194)("forEach");t.exports=i?[].forEach:function(t){return n(this,t,arguments.length>1?arguments[1]:void 0)}},11354:(t,e,r)=>{"use strict";var n=r(86843),i=r(78834),o=r(89678),s=r(75196),u=r(6782),a=r(24284),c=r(10623),f=r(55449),l=r(53476),h=r(22902),p=Array;t.exports=function(t){var e=o(t),r=a(this),d=arguments.length,y=d>1?arguments[1]:void 0,g=void 0!==y;g&&(y=n(y,d>2?arguments[2]:void 0));var v,w,M,L,_,m,b=h(e),x=0;if(!b||this===p&&u(b))for(v=c(e),w=r?new this(v):p(v);v>x;x++)m=g?y(e[x],x):e[x],f(w,x,m);else for(_=(L=l(e,b)).next,w=r?new this:[];!(M=i(_,L)).done;x++)m=g?s(L,y,[M.value,x],!0):M.value,f(w,x,m);return w.length=x,w}},31692:(t,e,r)=>{var n=r(74529),i=r(59413),o=r(10623),s=function(t){return function(e,r,s){var u,a=n(e),c=o(a),f=i(s,c);if(t&&r!=r){for(;c>f;)if((u=a[f++])!=u)return!0}else for(;c>f;f++)if((t||f in a)&&a[f]===r)return t||f||0;return!t&&-1}};t.exports={includes:s(!0),indexOf:s(!1)}},3610:(t,e,r)=>{var n=r(86843),i=r(95329),o=r(37026),s=r(89678),u=r(10623),a=r(64692),c=i([].push),f=function(t){var e=1==t,r=2==t,i=3==t,f=4==t,l=6==t,h=7==t,p=5==t||l;return function(d,y,g,v){for(var w,M,L=s(d),_=o(L),m=n(y,g),b=u(_),x=0,j=v||a,N=e?j(d,b):r||h?j(d,0):void 0;b>x;x++)if((p||x in _)&&(M=m(w=_[x],x,L),t))if(e)N[x]=M;else if(M)switch(t){case 3:return!0;case 5:return w;case 6:return x;case 2:c(N,w)}else switch(t){case 4:return!1;case 7:c(N,w)}return l?-1:i||f?f:N}};t.exports={forEach:f(0),map:f(1),filter:f(2),some:f(3),every:f(4),find:f(5),findIndex:f(6),filterReject:f(7)}},50568:(t,e,r)=>{var n=r(95981),i=r(99813),o=r(53385),s=i("species");t.exports=function(t){return o>=51||!n((function(){var e=[];return(e.constructor={})[s]=function(){return{foo:1}},1!==e[t](Boolean).foo}))}},34194:(t,e,r)=>{"use strict";var n=r(95981);t.exports=function(t,e){var r=[][t];return!!r&&n((function(){r.call(null,e||function(){return 1},1)}))}},46499:(t,e,r)=>{var n=r(24883),i=r(89678),o=r(37026),s=r(10623),u=TypeError,a=function(t){return function(e,r,a,c){n(r);var f=i(e),l=o(f),h=s(f),p=t?h-1:0,d=t?-1:1;if(a<2)for(;;){if(p in l){c=l[p],p+=d;break}if(p+=d,t?p<0:h<=p)throw u("Reduce of empty array with no initial value")}for(;t?p>=0:h>p;p+=d)p in l&&(c=r(c,l[p],p,f));return c}};t.exports={left:a(!1),right:a(!0)}},15790:(t,e,r)=>{var n=r(59413),i=r(10623),o=r(55449),s=Array,u=Math.max;t.exports=function(t,e,r){for(var a=i(t),c=n(e,a),f=n(void 0===r?a:r,a),l=s(u(f-c,0)),h=0;c<f;c++,h++)o(l,h,t[c]);return l.length=h,l}},93765:(t,e,r)=>{var n=r(95329);t.exports=n([].slice)},61388:(t,e,r)=>{var n=r(15790),i=Math.floor,o=function(t,e){var r=t.length,a=i(r/2);return r<8?s(t,e):u(t,o(n(t,0,a),e),o(n(t,a),e),e)},s=function(t,e){for(var r,n,i=t.length,o=1;o<i;){for(n=o,r=t[o];n&&e(t[n-1],r)>0;)t[n]=t[--n];n!==o++&&(t[n]=r)}return t},u=function(t,e,r,n){for(var i=e.length,o=r.length,s=0,u=0;s<i||u<o;)t[s+u]=s<i&&u<o?n(e[s],r[u])<=0?e[s++]:r[u++]:s<i?e[s++]:r[u++];return t};t.exports=o},5693:(t,e,r)=>{var n=r(1052),i=r(24284),o=r(10941),s=r(99813)("species"),u=Array;t.exports=function(t){var e;return n(t)&&(e=t.constructor,(i(e)&&(e===u||n(e.prototype))||o(e)&&null===(e=e[s]))&&(e=void 0)),void 0===e?u:e}},64692:(t,e,r)=>{var n=r(5693);t.exports=function(t,e){return new(n(t))(0===e?0:e)}},75196:(t,e,r)=>{var n=r(96059),i=r(7609);t.exports=function(t,e,r,o){try{return o?e(n(r)[0],r[1]):e(r)}catch(e){i(t,"throw",e)}}},21385:(t,e,r)=>{var n=r(99813)("iterator"),i=!1;try{var o=0,s={next:function(){return{done:!!o++}},return:function(){i=!0}};s[n]=function(){return this},Array.from(s,(function(){throw 2}))}catch(t){}t.exports=function(t,e){if(!e&&!i)return!1;var r=!1;try{var o={};o[n]=function(){return{next:function(){return{done:r=!0}}}},t(o)}catch(t){}return r}},82532:(t,e,r)=>{var n=r(95329),i=n({}.toString),o=n("".slice);t.exports=function(t){return o(i(t),8,-1)}},9697:(t,e,r)=>{var n=r(22885),i=r(57475),o=r(82532),s=r(99813)("toStringTag"),u=Object,a="Arguments"==o(function(){return arguments}());t.exports=n?o:function(t){var e,r,n;return void 0===t?"Undefined":null===t?"Null":"string"==typeof(r=function(t,e){try{return t[e]}catch(t){}}(e=u(t),s))?r:a?o(e):"Object"==(n=o(e))&&i(e.callee)?"Arguments":n}},85616:(t,e,r)=>{"use strict";var n=r(29290),i=r(29202),o=r(94380),s=r(86843),u=r(5743),a=r(82119),c=r(93091),f=r(75105),l=r(23538),h=r(94431),p=r(55746),d=r(21647).fastKey,y=r(45402),g=y.set,v=y.getterFor;t.exports={getConstructor:function(t,e,r,f){var l=t((function(t,i){u(t,h),g(t,{type:e,index:n(null),first:void 0,last:void 0,size:0}),p||(t.size=0),a(i)||c(i,t[f],{that:t,AS_ENTRIES:r})})),h=l.prototype,y=v(e),w=function(t,e,r){var n,i,o=y(t),s=M(t,e);return s?s.value=r:(o.last=s={index:i=d(e,!0),key:e,value:r,previous:n=o.last,next:void 0,removed:!1},o.first||(o.first=s),n&&(n.next=s),p?o.size++:t.size++,"F"!==i&&(o.index[i]=s)),t},M=function(t,e){var r,n=y(t),i=d(e);if("F"!==i)return n.index[i];for(r=n.first;r;r=r.next)if(r.key==e)return r};return o(h,{clear:function(){for(var t=y(this),e=t.index,r=t.first;r;)r.removed=!0,r.previous&&(r.previous=r.previous.next=void 0),delete e[r.index],r=r.next;t.first=t.last=void 0,p?t.size=0:this.size=0},delete:function(t){var e=this,r=y(e),n=M(e,t);if(n){var i=n.next,o=n.previous;delete r.index[n.index],n.removed=!0,o&&(o.next=i),i&&(i.previous=o),r.first==n&&(r.first=i),r.last==n&&(r.last=o),p?r.size--:e.size--}return!!n},forEach:function(t){for(var e,r=y(this),n=s(t,arguments.length>1?arguments[1]:void 0);e=e?e.next:r.first;)for(n(e.value,e.key,this);e&&e.removed;)e=e.previous},has:function(t){return!!M(this,t)}}),o(h,r?{get:function(t){var e=M(this,t);return e&&e.value},set:function(t,e){return w(this,0===t?0:t,e)}}:{add:function(t){return w(this,t=0===t?0:t,t)}}),p&&i(h,"size",{configurable:!0,get:function(){return y(this).size}}),l},setStrong:function(t,e,r){var n=e+" Iterator",i=v(e),o=v(n);f(t,e,(function(t,e){g(this,{type:n,target:t,state:i(t),kind:e,last:void 0})}),(function(){for(var t=o(this),e=t.kind,r=t.last;r&&r.removed;)r=r.previous;return t.target&&(t.last=r=r?r.next:t.state.first)?l("keys"==e?r.key:"values"==e?r.value:[r.key,r.value],!1):(t.target=void 0,l(void 0,!0))}),r?"entries":"values",!r,!0),h(e)}}},24683:(t,e,r)=>{"use strict";var n=r(76887),i=r(21899),o=r(21647),s=r(95981),u=r(32029),a=r(93091),c=r(5743),f=r(57475),l=r(10941),h=r(90904),p=r(65988).f,d=r(3610).forEach,y=r(55746),g=r(45402),v=g.set,w=g.getterFor;t.exports=function(t,e,r){var g,M=-1!==t.indexOf("Map"),L=-1!==t.indexOf("Weak"),_=M?"set":"add",m=i[t],b=m&&m.prototype,x={};if(y&&f(m)&&(L||b.forEach&&!s((function(){(new m).entries().next()})))){var j=(g=e((function(e,r){v(c(e,j),{type:t,collection:new m}),null!=r&&a(r,e[_],{that:e,AS_ENTRIES:M})}))).prototype,N=w(t);d(["add","clear","delete","forEach","get","has","set","keys","values","entries"],(function(t){var e="add"==t||"set"==t;!(t in b)||L&&"clear"==t||u(j,t,(function(r,n){var i=N(this).collection;if(!e&&L&&!l(r))return"get"==t&&void 0;var o=i[t](0===r?0:r,n);return e?this:o}))})),L||p(j,"size",{configurable:!0,get:function(){return N(this).collection.size}})}else g=r.getConstructor(e,t,M,_),o.enable();return h(g,t,!1,!0),x[t]=g,n({global:!0,forced:!0},x),L||r.setStrong(g,t,M),g}},67772:(t,e,r)=>{var n=r(99813)("match");t.exports=function(t){var e=/./;try{"/./"[t](e)}catch(r){try{return e[n]=!1,"/./"[t](e)}catch(t){}}return!1}},64160:(t,e,r)=>{var n=r(95981);t.exports=!n((function(){function t(){}return t.prototype.constructor=null,Object.getPrototypeOf(new t)!==t.prototype}))},23538:t=>{t.exports=function(t,e){return{value:t,done:e}}},32029:(t,e,r)=>{var n=r(55746),i=r(65988),o=r(31887);t.exports=n?function(t,e,r){return i.f(t,e,o(1,r))}:function(t,e,r){return t[e]=r,t}},31887:t=>{t.exports=function(t,e){return{enumerable:!(1&t),configurable:!(2&t),writable:!(4&t),value:e}}},55449:(t,e,r)=>{"use strict";var n=r(83894),i=r(65988),o=r(31887);t.exports=function(t,e,r){var s=n(e);s in t?i.f(t,s,o(0,r)):t[s]=r}},29202:(t,e,r)=>{var n=r(65988);t.exports=function(t,e,r){return n.f(t,e,r)}},95929:(t,e,r)=>{var n=r(32029);t.exports=function(t,e,r,i){return i&&i.enumerable?t[e]=r:n(t,e,r),t}},94380:(t,e,r)=>{var n=r(95929);t.exports=function(t,e,r){for(var i in e)r&&r.unsafe&&t[i]?t[i]=e[i]:n(t,i,e[i],r);return t}},75609:(t,e,r)=>{var n=r(21899),i=Object.defineProperty;t.exports=function(t,e){try{i(n,t,{value:e,configurable:!0,writable:!0})}catch(r){n[t]=e}return e}},15863:(t,e,r)=>{"use strict";var n=r(69826),i=TypeError;t.exports=function(t,e){if(!delete t[e])throw i("Cannot delete property "+n(e)+" of "+n(t))}},55746:(t,e,r)=>{var n=r(95981);t.exports=!n((function(){return 7!=Object.defineProperty({},1,{get:function(){return 7}})[1]}))},76616:t=>{var e="object"==typeof document&&document.all,r=void 0===e&&void 0!==e;t.exports={all:e,IS_HTMLDDA:r}},61333:(t,e,r)=>{var n=r(21899),i=r(10941),o=n.document,s=i(o)&&i(o.createElement);t.exports=function(t){return s?o.createElement(t):{}}},66796:t=>{var e=TypeError;t.exports=function(t){if(t>9007199254740991)throw e("Maximum allowed index exceeded");return t}},63281:t=>{t.exports={CSSRuleList:0,CSSStyleDeclaration:0,CSSValueList:0,ClientRectList:0,DOMRectList:0,DOMStringList:0,DOMTokenList:1,DataTransferItemList:0,FileList:0,HTMLAllCollection:0,HTMLCollection:0,HTMLFormElement:0,HTMLSelectElement:0,MediaList:0,MimeTypeArray:0,NamedNodeMap:0,NodeList:1,PaintRequestList:0,Plugin:0,PluginArray:0,SVGLengthList:0,SVGNumberList:0,SVGPathSegList:0,SVGPointList:0,SVGStringList:0,SVGTransformList:0,SourceBufferList:0,StyleSheetList:0,TextTrackCueList:0,TextTrackList:0,TouchList:0}},34342:(t,e,r)=>{var n=r(2861).match(/firefox\/(\d+)/i);t.exports=!!n&&+n[1]},81046:(t,e,r)=>{var n=r(2861);t.exports=/MSIE|Trident/.test(n)},6049:(t,e,r)=>{var n=r(34155),i=r(82532);t.exports=void 0!==n&&"process"==i(n)},2861:t=>{t.exports="undefined"!=typeof navigator&&String(navigator.userAgent)||""},53385:(t,e,r)=>{var n,i,o=r(21899),s=r(2861),u=o.process,a=o.Deno,c=u&&u.versions||a&&a.version,f=c&&c.v8;f&&(i=(n=f.split("."))[0]>0&&n[0]<4?1:+(n[0]+n[1])),!i&&s&&(!(n=s.match(/Edge\/(\d+)/))||n[1]>=74)&&(n=s.match(/Chrome\/(\d+)/))&&(i=+n[1]),t.exports=i},18938:(t,e,r)=>{var n=r(2861).match(/AppleWebKit\/(\d+)\./);t.exports=!!n&&+n[1]},35703:(t,e,r)=>{var n=r(54058);t.exports=function(t){return n[t+"Prototype"]}},56759:t=>{t.exports=["constructor","hasOwnProperty","isPrototypeOf","propertyIsEnumerable","toLocaleString","toString","valueOf"]},76887:(t,e,r)=>{"use strict";var n=r(21899),i=r(79730),o=r(97484),s=r(57475),u=r(49677).f,a=r(37252),c=r(54058),f=r(86843),l=r(32029),h=r(90953),p=function(t){var e=function(r,n,o){if(this instanceof e){switch(arguments.length){case 0:return new t;case 1:return new t(r);case 2:return new t(r,n)}return new t(r,n,o)}return i(t,this,arguments)};return e.prototype=t.prototype,e};t.exports=function(t,e){var r,i,d,y,g,v,w,M,L,_=t.target,m=t.global,b=t.stat,x=t.proto,j=m?n:b?n[_]:(n[_]||{}).prototype,N=m?c:c[_]||l(c,_,{})[_],S=N.prototype;for(y in e)i=!(r=a(m?y:_+(b?".":"#")+y,t.forced))&&j&&h(j,y),v=N[y],i&&(w=t.dontCallGetSet?(L=u(j,y))&&L.value:j[y]),g=i&&w?w:e[y],i&&typeof v==typeof g||(M=t.bind&&i?f(g,n):t.wrap&&i?p(g):x&&s(g)?o(g):g,(t.sham||g&&g.sham||v&&v.sham)&&l(M,"sham",!0),l(N,y,M),x&&(h(c,d=_+"Prototype")||l(c,d,{}),l(c[d],y,g),t.real&&S&&(r||!S[y])&&l(S,y,g)))}},95981:t=>{t.exports=function(t){try{return!!t()}catch(t){return!0}}},45602:(t,e,r)=>{var n=r(95981);t.exports=!n((function(){return Object.isExtensible(Object.preventExtensions({}))}))},79730:(t,e,r)=>{var n=r(18285),i=Function.prototype,o=i.apply,s=i.call;t.exports="object"==typeof Reflect&&Reflect.apply||(n?s.bind(o):function(){return s.apply(o,arguments)})},86843:(t,e,r)=>{var n=r(97484),i=r(24883),o=r(18285),s=n(n.bind);t.exports=function(t,e){return i(t),void 0===e?t:o?s(t,e):function(){return t.apply(e,arguments)}}},18285:(t,e,r)=>{var n=r(95981);t.exports=!n((function(){var t=function(){}.bind();return"function"!=typeof t||t.hasOwnProperty("prototype")}))},98308:(t,e,r)=>{"use strict";var n=r(95329),i=r(24883),o=r(10941),s=r(90953),u=r(93765),a=r(18285),c=Function,f=n([].concat),l=n([].join),h={},p=function(t,e,r){if(!s(h,e)){for(var n=[],i=0;i<e;i++)n[i]="a["+i+"]";h[e]=c("C,a","return new C("+l(n,",")+")")}return h[e](t,r)};t.exports=a?c.bind:function(t){var e=i(this),r=e.prototype,n=u(arguments,1),s=function(){var r=f(n,u(arguments));return this instanceof s?p(e,r.length,r):e.apply(t,r)};return o(r)&&(s.prototype=r),s}},78834:(t,e,r)=>{var n=r(18285),i=Function.prototype.call;t.exports=n?i.bind(i):function(){return i.apply(i,arguments)}},79417:(t,e,r)=>{var n=r(55746),i=r(90953),o=Function.prototype,s=n&&Object.getOwnPropertyDescriptor,u=i(o,"name"),a=u&&"something"===function(){}.name,c=u&&(!n||n&&s(o,"name").configurable);t.exports={EXISTS:u,PROPER:a,CONFIGURABLE:c}},45526:(t,e,r)=>{var n=r(95329),i=r(24883);t.exports=function(t,e,r){try{return n(i(Object.getOwnPropertyDescriptor(t,e)[r]))}catch(t){}}},97484:(t,e,r)=>{var n=r(82532),i=r(95329);t.exports=function(t){if("Function"===n(t))return i(t)}},95329:(t,e,r)=>{var n=r(18285),i=Function.prototype,o=i.call,s=n&&i.bind.bind(o,o);t.exports=n?s:function(t){return function(){return o.apply(t,arguments)}}},626:(t,e,r)=>{var n=r(54058),i=r(21899),o=r(57475),s=function(t){return o(t)?t:void 0};t.exports=function(t,e){return arguments.length<2?s(n[t])||s(i[t]):n[t]&&n[t][e]||i[t]&&i[t][e]}},22902:(t,e,r)=>{var n=r(9697),i=r(14229),o=r(82119),s=r(12077),u=r(99813)("iterator");t.exports=function(t){if(!o(t))return i(t,u)||i(t,"@@iterator")||s[n(t)]}},53476:(t,e,r)=>{var n=r(78834),i=r(24883),o=r(96059),s=r(69826),u=r(22902),a=TypeError;t.exports=function(t,e){var r=arguments.length<2?u(t):e;if(i(r))return o(n(r,t));throw a(s(t)+" is not iterable")}},33323:(t,e,r)=>{var n=r(95329),i=r(1052),o=r(57475),s=r(82532),u=r(85803),a=n([].push);t.exports=function(t){if(o(t))return t;if(i(t)){for(var e=t.length,r=[],n=0;n<e;n++){var c=t[n];"string"==typeof c?a(r,c):"number"!=typeof c&&"Number"!=s(c)&&"String"!=s(c)||a(r,u(c))}var f=r.length,l=!0;return function(t,e){if(l)return l=!1,e;if(i(this))return e;for(var n=0;n<f;n++)if(r[n]===t)return e}}}},14229:(t,e,r)=>{var n=r(24883),i=r(82119);t.exports=function(t,e){var r=t[e];return i(r)?void 0:n(r)}},21899:(t,e,r)=>{var n=function(t){return t&&t.Math==Math&&t};t.exports=n("object"==typeof globalThis&&globalThis)||n("object"==typeof window&&window)||n("object"==typeof self&&self)||n("object"==typeof r.g&&r.g)||function(){return this}()||Function("return this")()},90953:(t,e,r)=>{var n=r(95329),i=r(89678),o=n({}.hasOwnProperty);t.exports=Object.hasOwn||function(t,e){return o(i(t),e)}},27748:t=>{t.exports={}},15463:(t,e,r)=>{var n=r(626);t.exports=n("document","documentElement")},2840:(t,e,r)=>{var n=r(55746),i=r(95981),o=r(61333);t.exports=!n&&!i((function(){return 7!=Object.defineProperty(o("div"),"a",{get:function(){return 7}}).a}))},37026:(t,e,r)=>{var n=r(95329),i=r(95981),o=r(82532),s=Object,u=n("".split);t.exports=i((function(){return!s("z").propertyIsEnumerable(0)}))?function(t){return"String"==o(t)?u(t,""):s(t)}:s},81302:(t,e,r)=>{var n=r(95329),i=r(57475),o=r(63030),s=n(Function.toString);i(o.inspectSource)||(o.inspectSource=function(t){return s(t)}),t.exports=o.inspectSource},21647:(t,e,r)=>{var n=r(76887),i=r(95329),o=r(27748),s=r(10941),u=r(90953),a=r(65988).f,c=r(10946),f=r(684),l=r(91584),h=r(99418),p=r(45602),d=!1,y=h("meta"),g=0,v=function(t){a(t,y,{value:{objectID:"O"+g++,weakData:{}}})},w=t.exports={enable:function(){w.enable=function(){},d=!0;var t=c.f,e=i([].splice),r={};r[y]=1,t(r).length&&(c.f=function(r){for(var n=t(r),i=0,o=n.length;i<o;i++)if(n[i]===y){e(n,i,1);break}return n},n({target:"Object",stat:!0,forced:!0},{getOwnPropertyNames:f.f}))},fastKey:function(t,e){if(!s(t))return"symbol"==typeof t?t:("string"==typeof t?"S":"P")+t;if(!u(t,y)){if(!l(t))return"F";if(!e)return"E";v(t)}return t[y].objectID},getWeakData:function(t,e){if(!u(t,y)){if(!l(t))return!0;if(!e)return!1;v(t)}return t[y].weakData},onFreeze:function(t){return p&&d&&l(t)&&!u(t,y)&&v(t),t}};o[y]=!0},45402:(t,e,r)=>{var n,i,o,s=r(47093),u=r(21899),a=r(10941),c=r(32029),f=r(90953),l=r(63030),h=r(44262),p=r(27748),d="Object already initialized",y=u.TypeError,g=u.WeakMap;if(s||l.state){var v=l.state||(l.state=new g);v.get=v.get,v.has=v.has,v.set=v.set,n=function(t,e){if(v.has(t))throw y(d);return e.facade=t,v.set(t,e),e},i=function(t){return v.get(t)||{}},o=function(t){return v.has(t)}}else{var w=h("state");p[w]=!0,n=function(t,e){if(f(t,w))throw y(d);return e.facade=t,c(t,w,e),e},i=function(t){return f(t,w)?t[w]:{}},o=function(t){return f(t,w)}}t.exports={set:n,get:i,has:o,enforce:function(t){return o(t)?i(t):n(t,{})},getterFor:function(t){return function(e){var r;if(!a(e)||(r=i(e)).type!==t)throw y("Incompatible receiver, "+t+" required");return r}}}},6782:(t,e,r)=>{var n=r(99813),i=r(12077),o=n("iterator"),s=Array.prototype;t.exports=function(t){return void 0!==t&&(i.Array===t||s[o]===t)}},1052:(t,e,r)=>{var n=r(82532);t.exports=Array.isArray||function(t){return"Array"==n(t)}},57475:(t,e,r)=>{var n=r(76616),i=n.all;t.exports=n.IS_HTMLDDA?function(t){return"function"==typeof t||t===i}:function(t){return"function"==typeof t}},24284:(t,e,r)=>{var n=r(95329),i=r(95981),o=r(57475),s=r(9697),u=r(626),a=r(81302),c=function(){},f=[],l=u("Reflect","construct"),h=/^\s*(?:class|function)\b/,p=n(h.exec),d=!h.exec(c),y=function(t){if(!o(t))return!1;try{return l(c,f,t),!0}catch(t){return!1}},g=function(t){if(!o(t))return!1;switch(s(t)){case"AsyncFunction":case"GeneratorFunction":case"AsyncGeneratorFunction":return!1}try{return d||!!p(h,a(t))}catch(t){return!0}};g.sham=!0,t.exports=!l||i((function(){var t;return y(y.call)||!y(Object)||!y((function(){t=!0}))||t}))?g:y},37252:(t,e,r)=>{var n=r(95981),i=r(57475),o=/#|\.prototype\./,s=function(t,e){var r=a[u(t)];return r==f||r!=c&&(i(e)?n(e):!!e)},u=s.normalize=function(t){return String(t).replace(o,".").toLowerCase()},a=s.data={},c=s.NATIVE="N",f=s.POLYFILL="P";t.exports=s},82119:t=>{t.exports=function(t){return null==t}},10941:(t,e,r)=>{var n=r(57475),i=r(76616),o=i.all;t.exports=i.IS_HTMLDDA?function(t){return"object"==typeof t?null!==t:n(t)||t===o}:function(t){return"object"==typeof t?null!==t:n(t)}},82529:t=>{t.exports=!0},60685:(t,e,r)=>{var n=r(10941),i=r(82532),o=r(99813)("match");t.exports=function(t){var e;return n(t)&&(void 0!==(e=t[o])?!!e:"RegExp"==i(t))}},56664:(t,e,r)=>{var n=r(626),i=r(57475),o=r(7046),s=r(32302),u=Object;t.exports=s?function(t){return"symbol"==typeof t}:function(t){var e=n("Symbol");return i(e)&&o(e.prototype,u(t))}},93091:(t,e,r)=>{var n=r(86843),i=r(78834),o=r(96059),s=r(69826),u=r(6782),a=r(10623),c=r(7046),f=r(53476),l=r(22902),h=r(7609),p=TypeError,d=function(t,e){this.stopped=t,this.result=e},y=d.prototype;t.exports=function(t,e,r){var g,v,w,M,L,_,m,b=r&&r.that,x=!(!r||!r.AS_ENTRIES),j=!(!r||!r.IS_RECORD),N=!(!r||!r.IS_ITERATOR),S=!(!r||!r.INTERRUPTED),D=n(e,b),I=function(t){return g&&h(g,"normal",t),new d(!0,t)},E=function(t){return x?(o(t),S?D(t[0],t[1],I):D(t[0],t[1])):S?D(t,I):D(t)};if(j)g=t.iterator;else if(N)g=t;else{if(!(v=l(t)))throw p(s(t)+" is not iterable");if(u(v)){for(w=0,M=a(t);M>w;w++)if((L=E(t[w]))&&c(y,L))return L;return new d(!1)}g=f(t,v)}for(_=j?t.next:g.next;!(m=i(_,g)).done;){try{L=E(m.value)}catch(t){h(g,"throw",t)}if("object"==typeof L&&L&&c(y,L))return L}return new d(!1)}},7609:(t,e,r)=>{var n=r(78834),i=r(96059),o=r(14229);t.exports=function(t,e,r){var s,u;i(t);try{if(!(s=o(t,"return"))){if("throw"===e)throw r;return r}s=n(s,t)}catch(t){u=!0,s=t}if("throw"===e)throw r;if(u)throw s;return i(s),r}},53847:(t,e,r)=>{"use strict";var n=r(35143).IteratorPrototype,i=r(29290),o=r(31887),s=r(90904),u=r(12077),a=function(){return this};t.exports=function(t,e,r,c){var f=e+" Iterator";return t.prototype=i(n,{next:o(+!c,r)}),s(t,f,!1,!0),u[f]=a,t}},75105:(t,e,r)=>{"use strict";var n=r(76887),i=r(78834),o=r(82529),s=r(79417),u=r(57475),a=r(53847),c=r(249),f=r(88929),l=r(90904),h=r(32029),p=r(95929),d=r(99813),y=r(12077),g=r(35143),v=s.PROPER,w=s.CONFIGURABLE,M=g.IteratorPrototype,L=g.BUGGY_SAFARI_ITERATORS,_=d("iterator"),m="keys",b="values",x="entries",j=function(){return this};t.exports=function(t,e,r,s,d,g,N){a(r,e,s);var S,D,I,E=function(t){if(t===d&&z)return z;if(!L&&t in T)return T[t];switch(t){case m:case b:case x:return function(){return new r(this,t)}}return function(){return new r(this)}},A=e+" Iterator",C=!1,T=t.prototype,O=T[_]||T["@@iterator"]||d&&T[d],z=!L&&O||E(d),k="Array"==e&&T.entries||O;if(k&&(S=c(k.call(new t)))!==Object.prototype&&S.next&&(o||c(S)===M||(f?f(S,M):u(S[_])||p(S,_,j)),l(S,A,!0,!0),o&&(y[A]=j)),v&&d==b&&O&&O.name!==b&&(!o&&w?h(T,"name",b):(C=!0,z=function(){return i(O,this)})),d)if(D={values:E(b),keys:g?z:E(m),entries:E(x)},N)for(I in D)(L||C||!(I in T))&&p(T,I,D[I]);else n({target:e,proto:!0,forced:L||C},D);return o&&!N||T[_]===z||p(T,_,z,{name:d}),y[e]=z,D}},35143:(t,e,r)=>{"use strict";var n,i,o,s=r(95981),u=r(57475),a=r(10941),c=r(29290),f=r(249),l=r(95929),h=r(99813),p=r(82529),d=h("iterator"),y=!1;[].keys&&("next"in(o=[].keys())?(i=f(f(o)))!==Object.prototype&&(n=i):y=!0),!a(n)||s((function(){var t={};return n[d].call(t)!==t}))?n={}:p&&(n=c(n)),u(n[d])||l(n,d,(function(){return this})),t.exports={IteratorPrototype:n,BUGGY_SAFARI_ITERATORS:y}},12077:t=>{t.exports={}},10623:(t,e,r)=>{var n=r(43057);t.exports=function(t){return n(t.length)}},35331:t=>{var e=Math.ceil,r=Math.floor;t.exports=Math.trunc||function(t){var n=+t;return(n>0?r:e)(n)}},70344:(t,e,r)=>{var n=r(60685),i=TypeError;t.exports=function(t){if(n(t))throw i("The method doesn't accept regular expressions");return t}},24420:(t,e,r)=>{"use strict";var n=r(55746),i=r(95329),o=r(78834),s=r(95981),u=r(14771),a=r(87857),c=r(36760),f=r(89678),l=r(37026),h=Object.assign,p=Object.defineProperty,d=i([].concat);t.exports=!h||s((function(){if(n&&1!==h({b:1},h(p({},"a",{enumerable:!0,get:function(){p(this,"b",{value:3,enumerable:!1})}}),{b:2})).b)return!0;var t={},e={},r=Symbol(),i="abcdefghijklmnopqrst";return t[r]=7,i.split("").forEach((function(t){e[t]=t})),7!=h({},t)[r]||u(h({},e)).join("")!=i}))?function(t,e){for(var r=f(t),i=arguments.length,s=1,h=a.f,p=c.f;i>s;)for(var y,g=l(arguments[s++]),v=h?d(u(g),h(g)):u(g),w=v.length,M=0;w>M;)y=v[M++],n&&!o(p,g,y)||(r[y]=g[y]);return r}:h},29290:(t,e,r)=>{var n,i=r(96059),o=r(59938),s=r(56759),u=r(27748),a=r(15463),c=r(61333),f=r(44262),l="prototype",h="script",p=f("IE_PROTO"),d=function(){},y=function(t){return"<"+h+">"+t+"</"+h+">"},g=function(t){t.write(y("")),t.close();var e=t.parentWindow.Object;return t=null,e},v=function(){try{n=new ActiveXObject("htmlfile")}catch(t){}var t,e,r;v="undefined"!=typeof document?document.domain&&n?g(n):(e=c("iframe"),r="java"+h+":",e.style.display="none",a.appendChild(e),e.src=String(r),(t=e.contentWindow.document).open(),t.write(y("document.F=Object")),t.close(),t.F):g(n);for(var i=s.length;i--;)delete v[l][s[i]];return v()};u[p]=!0,t.exports=Object.create||function(t,e){var r;return null!==t?(d[l]=i(t),r=new d,d[l]=null,r[p]=t):r=v(),void 0===e?r:o.f(r,e)}},59938:(t,e,r)=>{var n=r(55746),i=r(83937),o=r(65988),s=r(96059),u=r(74529),a=r(14771);e.f=n&&!i?Object.defineProperties:function(t,e){s(t);for(var r,n=u(e),i=a(e),c=i.length,f=0;c>f;)o.f(t,r=i[f++],n[r]);return t}},65988:(t,e,r)=>{var n=r(55746),i=r(2840),o=r(83937),s=r(96059),u=r(83894),a=TypeError,c=Object.defineProperty,f=Object.getOwnPropertyDescriptor,l="enumerable",h="configurable",p="writable";e.f=n?o?function(t,e,r){if(s(t),e=u(e),s(r),"function"==typeof t&&"prototype"===e&&"value"in r&&p in r&&!r[p]){var n=f(t,e);n&&n[p]&&(t[e]=r.value,r={configurable:h in r?r[h]:n[h],enumerable:l in r?r[l]:n[l],writable:!1})}return c(t,e,r)}:c:function(t,e,r){if(s(t),e=u(e),s(r),i)try{return c(t,e,r)}catch(t){}if("get"in r||"set"in r)throw a("Accessors not supported");return"value"in r&&(t[e]=r.value),t}},49677:(t,e,r)=>{var n=r(55746),i=r(78834),o=r(36760),s=r(31887),u=r(74529),a=r(83894),c=r(90953),f=r(2840),l=Object.getOwnPropertyDescriptor;e.f=n?l:function(t,e){if(t=u(t),e=a(e),f)try{return l(t,e)}catch(t){}if(c(t,e))return s(!i(o.f,t,e),t[e])}},684:(t,e,r)=>{var n=r(82532),i=r(74529),o=r(10946).f,s=r(15790),u="object"==typeof window&&window&&Object.getOwnPropertyNames?Object.getOwnPropertyNames(window):[];t.exports.f=function(t){return u&&"Window"==n(t)?function(t){try{return o(t)}catch(t){return s(u)}}(t):o(i(t))}},10946:(t,e,r)=>{var n=r(55629),i=r(56759).concat("length","prototype");e.f=Object.getOwnPropertyNames||function(t){return n(t,i)}},87857:(t,e)=>{e.f=Object.getOwnPropertySymbols},249:(t,e,r)=>{var n=r(90953),i=r(57475),o=r(89678),s=r(44262),u=r(64160),a=s("IE_PROTO"),c=Object,f=c.prototype;t.exports=u?c.getPrototypeOf:function(t){var e=o(t);if(n(e,a))return e[a];var r=e.constructor;return i(r)&&e instanceof r?r.prototype:e instanceof c?f:null}},91584:(t,e,r)=>{var n=r(95981),i=r(10941),o=r(82532),s=r(97135),u=Object.isExtensible,a=n((function(){u(1)}));t.exports=a||s?function(t){return!!i(t)&&((!s||"ArrayBuffer"!=o(t))&&(!u||u(t)))}:u},7046:(t,e,r)=>{var n=r(95329);t.exports=n({}.isPrototypeOf)},55629:(t,e,r)=>{var n=r(95329),i=r(90953),o=r(74529),s=r(31692).indexOf,u=r(27748),a=n([].push);t.exports=function(t,e){var r,n=o(t),c=0,f=[];for(r in n)!i(u,r)&&i(n,r)&&a(f,r);for(;e.length>c;)i(n,r=e[c++])&&(~s(f,r)||a(f,r));return f}},14771:(t,e,r)=>{var n=r(55629),i=r(56759);t.exports=Object.keys||function(t){return n(t,i)}},36760:(t,e)=>{"use strict";var r={}.propertyIsEnumerable,n=Object.getOwnPropertyDescriptor,i=n&&!r.call({1:2},1);e.f=i?function(t){var e=n(this,t);return!!e&&e.enumerable}:r},88929:(t,e,r)=>{var n=r(45526),i=r(96059),o=r(11851);t.exports=Object.setPrototypeOf||("__proto__"in{}?function(){var t,e=!1,r={};try{(t=n(Object.prototype,"__proto__","set"))(r,[]),e=r instanceof Array}catch(t){}return function(r,n){return i(r),o(n),e?t(r,n):r.__proto__=n,r}}():void 0)},95623:(t,e,r)=>{"use strict";var n=r(22885),i=r(9697);t.exports=n?{}.toString:function(){return"[object "+i(this)+"]"}},39811:(t,e,r)=>{var n=r(78834),i=r(57475),o=r(10941),s=TypeError;t.exports=function(t,e){var r,u;if("string"===e&&i(r=t.toString)&&!o(u=n(r,t)))return u;if(i(r=t.valueOf)&&!o(u=n(r,t)))return u;if("string"!==e&&i(r=t.toString)&&!o(u=n(r,t)))return u;throw s("Can't convert object to primitive value")}},54058:t=>{t.exports={}},48219:(t,e,r)=>{var n=r(82119),i=TypeError;t.exports=function(t){if(n(t))throw i("Can't call method on "+t);return t}},94431:(t,e,r)=>{"use strict";var n=r(626),i=r(29202),o=r(99813),s=r(55746),u=o("species");t.exports=function(t){var e=n(t);s&&e&&!e[u]&&i(e,u,{configurable:!0,get:function(){return this}})}},90904:(t,e,r)=>{var n=r(22885),i=r(65988).f,o=r(32029),s=r(90953),u=r(95623),a=r(99813)("toStringTag");t.exports=function(t,e,r,c){if(t){var f=r?t:t.prototype;s(f,a)||i(f,a,{configurable:!0,value:e}),c&&!n&&o(f,"toString",u)}}},44262:(t,e,r)=>{var n=r(68726),i=r(99418),o=n("keys");t.exports=function(t){return o[t]||(o[t]=i(t))}},63030:(t,e,r)=>{var n=r(21899),i=r(75609),o="__core-js_shared__",s=n[o]||i(o,{});t.exports=s},68726:(t,e,r)=>{var n=r(82529),i=r(63030);(t.exports=function(t,e){return i[t]||(i[t]=void 0!==e?e:{})})("versions",[]).push({version:"3.28.0",mode:n?"pure":"global",copyright:"© 2014-2023 Denis Pushkarev (zloirock.ru)",license:"https://github.com/zloirock/core-js/blob/v3.28.0/LICENSE",source:"https://github.com/zloirock/core-js"})},64620:(t,e,r)=>{var n=r(95329),i=r(62435),o=r(85803),s=r(48219),u=n("".charAt),a=n("".charCodeAt),c=n("".slice),f=function(t){return function(e,r){var n,f,l=o(s(e)),h=i(r),p=l.length;return h<0||h>=p?t?"":void 0:(n=a(l,h))<55296||n>56319||h+1===p||(f=a(l,h+1))<56320||f>57343?t?u(l,h):n:t?c(l,h,h+2):f-56320+(n-55296<<10)+65536}};t.exports={codeAt:f(!1),charAt:f(!0)}},93093:(t,e,r)=>{var n=r(79417).PROPER,i=r(95981),o=r(73483);t.exports=function(t){return i((function(){return!!o[t]()||"​᠎"!=="​᠎"[t]()||n&&o[t].name!==t}))}},74853:(t,e,r)=>{var n=r(95329),i=r(48219),o=r(85803),s=r(73483),u=n("".replace),a=RegExp("^["+s+"]+"),c=RegExp("(^|[^"+s+"])["+s+"]+$"),f=function(t){return function(e){var r=o(i(e));return 1&t&&(r=u(r,a,"")),2&t&&(r=u(r,c,"$1")),r}};t.exports={start:f(1),end:f(2),trim:f(3)}},63405:(t,e,r)=>{var n=r(53385),i=r(95981);t.exports=!!Object.getOwnPropertySymbols&&!i((function(){var t=Symbol();return!String(t)||!(Object(t)instanceof Symbol)||!Symbol.sham&&n&&n<41}))},29630:(t,e,r)=>{var n=r(78834),i=r(626),o=r(99813),s=r(95929);t.exports=function(){var t=i("Symbol"),e=t&&t.prototype,r=e&&e.valueOf,u=o("toPrimitive");e&&!e[u]&&s(e,u,(function(t){return n(r,this)}),{arity:1})}},34680:(t,e,r)=>{var n=r(63405);t.exports=n&&!!Symbol.for&&!!Symbol.keyFor},59413:(t,e,r)=>{var n=r(62435),i=Math.max,o=Math.min;t.exports=function(t,e){var r=n(t);return r<0?i(r+e,0):o(r,e)}},74529:(t,e,r)=>{var n=r(37026),i=r(48219);t.exports=function(t){return n(i(t))}},62435:(t,e,r)=>{var n=r(35331);t.exports=function(t){var e=+t;return e!=e||0===e?0:n(e)}},43057:(t,e,r)=>{var n=r(62435),i=Math.min;t.exports=function(t){return t>0?i(n(t),9007199254740991):0}},89678:(t,e,r)=>{var n=r(48219),i=Object;t.exports=function(t){return i(n(t))}},46935:(t,e,r)=>{var n=r(78834),i=r(10941),o=r(56664),s=r(14229),u=r(39811),a=r(99813),c=TypeError,f=a("toPrimitive");t.exports=function(t,e){if(!i(t)||o(t))return t;var r,a=s(t,f);if(a){if(void 0===e&&(e="default"),r=n(a,t,e),!i(r)||o(r))return r;throw c("Can't convert object to primitive value")}return void 0===e&&(e="number"),u(t,e)}},83894:(t,e,r)=>{var n=r(46935),i=r(56664);t.exports=function(t){var e=n(t,"string");return i(e)?e:e+""}},22885:(t,e,r)=>{var n={};n[r(99813)("toStringTag")]="z",t.exports="[object z]"===String(n)},85803:(t,e,r)=>{var n=r(9697),i=String;t.exports=function(t){if("Symbol"===n(t))throw TypeError("Cannot convert a Symbol value to a string");return i(t)}},69826:t=>{var e=String;t.exports=function(t){try{return e(t)}catch(t){return"Object"}}},99418:(t,e,r)=>{var n=r(95329),i=0,o=Math.random(),s=n(1..toString);t.exports=function(t){return"Symbol("+(void 0===t?"":t)+")_"+s(++i+o,36)}},32302:(t,e,r)=>{var n=r(63405);t.exports=n&&!Symbol.sham&&"symbol"==typeof Symbol.iterator},83937:(t,e,r)=>{var n=r(55746),i=r(95981);t.exports=n&&i((function(){return 42!=Object.defineProperty((function(){}),"prototype",{value:42,writable:!1}).prototype}))},47093:(t,e,r)=>{var n=r(21899),i=r(57475),o=n.WeakMap;t.exports=i(o)&&/native code/.test(String(o))},73464:(t,e,r)=>{var n=r(54058),i=r(90953),o=r(11477),s=r(65988).f;t.exports=function(t){var e=n.Symbol||(n.Symbol={});i(e,t)||s(e,t,{value:o.f(t)})}},11477:(t,e,r)=>{var n=r(99813);e.f=n},99813:(t,e,r)=>{var n=r(21899),i=r(68726),o=r(90953),s=r(99418),u=r(63405),a=r(32302),c=n.Symbol,f=i("wks"),l=a?c.for||c:c&&c.withoutSetter||s;t.exports=function(t){return o(f,t)||(f[t]=u&&o(c,t)?c[t]:l("Symbol."+t)),f[t]}},73483:t=>{t.exports="\t\n\v\f\r                　\u2028\u2029\ufeff"},85906:(t,e,r)=>{"use strict";var n=r(76887),i=r(95981),o=r(1052),s=r(10941),u=r(89678),a=r(10623),c=r(66796),f=r(55449),l=r(64692),h=r(50568),p=r(99813),d=r(53385),y=p("isConcatSpreadable"),g=d>=51||!i((function(){var t=[];return t[y]=!1,t.concat()[0]!==t})),v=function(t){if(!s(t))return!1;var e=t[y];return void 0!==e?!!e:o(t)};n({target:"Array",proto:!0,arity:1,forced:!g||!h("concat")},{concat:function(t){var e,r,n,i,o,s=u(this),h=l(s,0),p=0;for(e=-1,n=arguments.length;e<n;e++)if(v(o=-1===e?s:arguments[e]))for(i=a(o),c(p+i),r=0;r<i;r++,p++)r in o&&f(h,p,o[r]);else c(p+1),f(h,p++,o);return h.length=p,h}})},48851:(t,e,r)=>{"use strict";var n=r(76887),i=r(3610).every;n({target:"Array",proto:!0,forced:!r(34194)("every")},{every:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}})},80290:(t,e,r)=>{var n=r(76887),i=r(91860),o=r(18479);n({target:"Array",proto:!0},{fill:i}),o("fill")},21501:(t,e,r)=>{"use strict";var n=r(76887),i=r(3610).filter;n({target:"Array",proto:!0,forced:!r(50568)("filter")},{filter:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}})},44929:(t,e,r)=>{"use strict";var n=r(76887),i=r(3610).findIndex,o=r(18479),s="findIndex",u=!0;s in[]&&Array(1)[s]((function(){u=!1})),n({target:"Array",proto:!0,forced:u},{findIndex:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}}),o(s)},80833:(t,e,r)=>{"use strict";var n=r(76887),i=r(3610).find,o=r(18479),s="find",u=!0;s in[]&&Array(1)[s]((function(){u=!1})),n({target:"Array",proto:!0,forced:u},{find:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}}),o(s)},2437:(t,e,r)=>{"use strict";var n=r(76887),i=r(56837);n({target:"Array",proto:!0,forced:[].forEach!=i},{forEach:i})},53242:(t,e,r)=>{var n=r(76887),i=r(11354);n({target:"Array",stat:!0,forced:!r(21385)((function(t){Array.from(t)}))},{from:i})},97690:(t,e,r)=>{"use strict";var n=r(76887),i=r(31692).includes,o=r(95981),s=r(18479);n({target:"Array",proto:!0,forced:o((function(){return!Array(1).includes()}))},{includes:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}}),s("includes")},99076:(t,e,r)=>{"use strict";var n=r(76887),i=r(97484),o=r(31692).indexOf,s=r(34194),u=i([].indexOf),a=!!u&&1/u([1],1,-0)<0;n({target:"Array",proto:!0,forced:a||!s("indexOf")},{indexOf:function(t){var e=arguments.length>1?arguments[1]:void 0;return a?u(this,t,e)||0:o(this,t,e)}})},92737:(t,e,r)=>{r(76887)({target:"Array",stat:!0},{isArray:r(1052)})},66274:(t,e,r)=>{"use strict";var n=r(74529),i=r(18479),o=r(12077),s=r(45402),u=r(65988).f,a=r(75105),c=r(23538),f=r(82529),l=r(55746),h="Array Iterator",p=s.set,d=s.getterFor(h);t.exports=a(Array,"Array",(function(t,e){p(this,{type:h,target:n(t),index:0,kind:e})}),(function(){var t=d(this),e=t.target,r=t.kind,n=t.index++;return!e||n>=e.length?(t.target=void 0,c(void 0,!0)):c("keys"==r?n:"values"==r?e[n]:[n,e[n]],!1)}),"values");var y=o.Arguments=o.Array;if(i("keys"),i("values"),i("entries"),!f&&l&&"values"!==y.name)try{u(y,"name",{value:"values"})}catch(t){}},68787:(t,e,r)=>{"use strict";var n=r(76887),i=r(3610).map;n({target:"Array",proto:!0,forced:!r(50568)("map")},{map:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}})},81876:(t,e,r)=>{"use strict";var n=r(76887),i=r(46499),o=r(34194),s=r(53385);n({target:"Array",proto:!0,forced:!r(6049)&&s>79&&s<83||!o("reduce")},{reduce:function(t){var e=arguments.length;return i(this,t,e,e>1?arguments[1]:void 0)}})},60186:(t,e,r)=>{"use strict";var n=r(76887),i=r(1052),o=r(24284),s=r(10941),u=r(59413),a=r(10623),c=r(74529),f=r(55449),l=r(99813),h=r(50568),p=r(93765),d=h("slice"),y=l("species"),g=Array,v=Math.max;n({target:"Array",proto:!0,forced:!d},{slice:function(t,e){var r,n,l,h=c(this),d=a(h),w=u(t,d),M=u(void 0===e?d:e,d);if(i(h)&&(r=h.constructor,(o(r)&&(r===g||i(r.prototype))||s(r)&&null===(r=r[y]))&&(r=void 0),r===g||void 0===r))return p(h,w,M);for(n=new(void 0===r?g:r)(v(M-w,0)),l=0;w<M;w++,l++)w in h&&f(n,l,h[w]);return n.length=l,n}})},36026:(t,e,r)=>{"use strict";var n=r(76887),i=r(3610).some;n({target:"Array",proto:!0,forced:!r(34194)("some")},{some:function(t){return i(this,t,arguments.length>1?arguments[1]:void 0)}})},4115:(t,e,r)=>{"use strict";var n=r(76887),i=r(95329),o=r(24883),s=r(89678),u=r(10623),a=r(15863),c=r(85803),f=r(95981),l=r(61388),h=r(34194),p=r(34342),d=r(81046),y=r(53385),g=r(18938),v=[],w=i(v.sort),M=i(v.push),L=f((function(){v.sort(void 0)})),_=f((function(){v.sort(null)})),m=h("sort"),b=!f((function(){if(y)return y<70;if(!(p&&p>3)){if(d)return!0;if(g)return g<603;var t,e,r,n,i="";for(t=65;t<76;t++){switch(e=String.fromCharCode(t),t){case 66:case 69:case 70:case 72:r=3;break;case 68:case 71:r=4;break;default:r=2}for(n=0;n<47;n++)v.push({k:e+n,v:r})}for(v.sort((function(t,e){return e.v-t.v})),n=0;n<v.length;n++)e=v[n].k.charAt(0),i.charAt(i.length-1)!==e&&(i+=e);return"DGBEFHACIJK"!==i}}));n({target:"Array",proto:!0,forced:L||!_||!m||!b},{sort:function(t){void 0!==t&&o(t);var e=s(this);if(b)return void 0===t?w(e):w(e,t);var r,n,i=[],f=u(e);for(n=0;n<f;n++)n in e&&M(i,e[n]);for(l(i,function(t){return function(e,r){return void 0===r?-1:void 0===e?1:void 0!==t?+t(e,r)||0:c(e)>c(r)?1:-1}}(t)),r=u(i),n=0;n<r;)e[n]=i[n++];for(;n<f;)a(e,n++);return e}})},18084:()=>{},73381:(t,e,r)=>{var n=r(76887),i=r(98308);n({target:"Function",proto:!0,forced:Function.bind!==i},{bind:i})},32619:(t,e,r)=>{var n=r(76887),i=r(626),o=r(79730),s=r(78834),u=r(95329),a=r(95981),c=r(57475),f=r(56664),l=r(93765),h=r(33323),p=r(63405),d=String,y=i("JSON","stringify"),g=u(/./.exec),v=u("".charAt),w=u("".charCodeAt),M=u("".replace),L=u(1..toString),_=/[\uD800-\uDFFF]/g,m=/^[\uD800-\uDBFF]$/,b=/^[\uDC00-\uDFFF]$/,x=!p||a((function(){var t=i("Symbol")();return"[null]"!=y([t])||"{}"!=y({a:t})||"{}"!=y(Object(t))})),j=a((function(){return'"\\udf06\\ud834"'!==y("\udf06\ud834")||'"\\udead"'!==y("\udead")})),N=function(t,e){var r=l(arguments),n=h(e);if(c(n)||void 0!==t&&!f(t))return r[1]=function(t,e){if(c(n)&&(e=s(n,this,d(t),e)),!f(e))return e},o(y,null,r)},S=function(t,e,r){var n=v(r,e-1),i=v(r,e+1);return g(m,t)&&!g(b,i)||g(b,t)&&!g(m,n)?"\\u"+L(w(t,0),16):t};y&&n({target:"JSON",stat:!0,arity:3,forced:x||j},{stringify:function(t,e,r){var n=l(arguments),i=o(x?N:y,null,n);return j&&"string"==typeof i?M(i,_,S):i}})},69120:(t,e,r)=>{var n=r(21899);r(90904)(n.JSON,"JSON",!0)},23112:(t,e,r)=>{"use strict";r(24683)("Map",(function(t){return function(){return t(this,arguments.length?arguments[0]:void 0)}}),r(85616))},37501:(t,e,r)=>{r(23112)},79413:()=>{},49221:(t,e,r)=>{var n=r(76887),i=r(24420);n({target:"Object",stat:!0,arity:2,forced:Object.assign!==i},{assign:i})},86450:(t,e,r)=>{var n=r(76887),i=r(55746),o=r(65988).f;n({target:"Object",stat:!0,forced:Object.defineProperty!==o,sham:!i},{defineProperty:o})},37144:(t,e,r)=>{var n=r(76887),i=r(63405),o=r(95981),s=r(87857),u=r(89678);n({target:"Object",stat:!0,forced:!i||o((function(){s.f(1)}))},{getOwnPropertySymbols:function(t){var e=s.f;return e?e(u(t)):[]}})},21724:(t,e,r)=>{var n=r(76887),i=r(89678),o=r(14771);n({target:"Object",stat:!0,forced:r(95981)((function(){o(1)}))},{keys:function(t){return o(i(t))}})},55967:()=>{},1502:()=>{},11035:(t,e,r)=>{"use strict";var n=r(76887),i=r(95329),o=r(70344),s=r(48219),u=r(85803),a=r(67772),c=i("".indexOf);n({target:"String",proto:!0,forced:!a("includes")},{includes:function(t){return!!~c(u(s(this)),u(o(t)),arguments.length>1?arguments[1]:void 0)}})},77971:(t,e,r)=>{"use strict";var n=r(64620).charAt,i=r(85803),o=r(45402),s=r(75105),u=r(23538),a="String Iterator",c=o.set,f=o.getterFor(a);s(String,"String",(function(t){c(this,{type:a,string:i(t),index:0})}),(function(){var t,e=f(this),r=e.string,i=e.index;return i>=r.length?u(void 0,!0):(t=n(r,i),e.index+=t.length,u(t,!1))}))},94761:(t,e,r)=>{"use strict";var n,i=r(76887),o=r(97484),s=r(49677).f,u=r(43057),a=r(85803),c=r(70344),f=r(48219),l=r(67772),h=r(82529),p=o("".startsWith),d=o("".slice),y=Math.min,g=l("startsWith");i({target:"String",proto:!0,forced:!!(h||g||(n=s(String.prototype,"startsWith"),!n||n.writable))&&!g},{startsWith:function(t){var e=a(f(this));c(t);var r=u(y(arguments.length>1?arguments[1]:void 0,e.length)),n=a(t);return p?p(e,n,r):d(e,r,r+n.length)===n}})},57398:(t,e,r)=>{"use strict";var n=r(76887),i=r(74853);n({target:"String",proto:!0,forced:r(93093)("trim")},{trim:function(){return i(this)}})},8555:(t,e,r)=>{r(73464)("asyncIterator")},48616:(t,e,r)=>{"use strict";var n=r(76887),i=r(21899),o=r(78834),s=r(95329),u=r(82529),a=r(55746),c=r(63405),f=r(95981),l=r(90953),h=r(7046),p=r(96059),d=r(74529),y=r(83894),g=r(85803),v=r(31887),w=r(29290),M=r(14771),L=r(10946),_=r(684),m=r(87857),b=r(49677),x=r(65988),j=r(59938),N=r(36760),S=r(95929),D=r(29202),I=r(68726),E=r(44262),A=r(27748),C=r(99418),T=r(99813),O=r(11477),z=r(73464),k=r(29630),U=r(90904),R=r(45402),Y=r(3610).forEach,B=E("hidden"),P="Symbol",Q="prototype",F=R.set,G=R.getterFor(P),W=Object[Q],q=i.Symbol,H=q&&q[Q],J=i.TypeError,$=i.QObject,Z=b.f,V=x.f,X=_.f,K=N.f,tt=s([].push),et=I("symbols"),rt=I("op-symbols"),nt=I("wks"),it=!$||!$[Q]||!$[Q].findChild,ot=a&&f((function(){return 7!=w(V({},"a",{get:function(){return V(this,"a",{value:7}).a}})).a}))?function(t,e,r){var n=Z(W,e);n&&delete W[e],V(t,e,r),n&&t!==W&&V(W,e,n)}:V,st=function(t,e){var r=et[t]=w(H);return F(r,{type:P,tag:t,description:e}),a||(r.description=e),r},ut=function(t,e,r){t===W&&ut(rt,e,r),p(t);var n=y(e);return p(r),l(et,n)?(r.enumerable?(l(t,B)&&t[B][n]&&(t[B][n]=!1),r=w(r,{enumerable:v(0,!1)})):(l(t,B)||V(t,B,v(1,{})),t[B][n]=!0),ot(t,n,r)):V(t,n,r)},at=function(t,e){p(t);var r=d(e),n=M(r).concat(ht(r));return Y(n,(function(e){a&&!o(ct,r,e)||ut(t,e,r[e])})),t},ct=function(t){var e=y(t),r=o(K,this,e);return!(this===W&&l(et,e)&&!l(rt,e))&&(!(r||!l(this,e)||!l(et,e)||l(this,B)&&this[B][e])||r)},ft=function(t,e){var r=d(t),n=y(e);if(r!==W||!l(et,n)||l(rt,n)){var i=Z(r,n);return!i||!l(et,n)||l(r,B)&&r[B][n]||(i.enumerable=!0),i}},lt=function(t){var e=X(d(t)),r=[];return Y(e,(function(t){l(et,t)||l(A,t)||tt(r,t)})),r},ht=function(t){var e=t===W,r=X(e?rt:d(t)),n=[];return Y(r,(function(t){!l(et,t)||e&&!l(W,t)||tt(n,et[t])})),n};c||(S(H=(q=function(){if(h(H,this))throw J("Symbol is not a constructor");var t=arguments.length&&void 0!==arguments[0]?g(arguments[0]):void 0,e=C(t),r=function(t){this===W&&o(r,rt,t),l(this,B)&&l(this[B],e)&&(this[B][e]=!1),ot(this,e,v(1,t))};return a&&it&&ot(W,e,{configurable:!0,set:r}),st(e,t)})[Q],"toString",(function(){return G(this).tag})),S(q,"withoutSetter",(function(t){return st(C(t),t)})),N.f=ct,x.f=ut,j.f=at,b.f=ft,L.f=_.f=lt,m.f=ht,O.f=function(t){return st(T(t),t)},a&&(D(H,"description",{configurable:!0,get:function(){return G(this).description}}),u||S(W,"propertyIsEnumerable",ct,{unsafe:!0}))),n({global:!0,constructor:!0,wrap:!0,forced:!c,sham:!c},{Symbol:q}),Y(M(nt),(function(t){z(t)})),n({target:P,stat:!0,forced:!c},{useSetter:function(){it=!0},useSimple:function(){it=!1}}),n({target:"Object",stat:!0,forced:!c,sham:!a},{create:function(t,e){return void 0===e?w(t):at(w(t),e)},defineProperty:ut,defineProperties:at,getOwnPropertyDescriptor:ft}),n({target:"Object",stat:!0,forced:!c},{getOwnPropertyNames:lt}),k(),U(q,P),A[B]=!0},52615:()=>{},64523:(t,e,r)=>{var n=r(76887),i=r(626),o=r(90953),s=r(85803),u=r(68726),a=r(34680),c=u("string-to-symbol-registry"),f=u("symbol-to-string-registry");n({target:"Symbol",stat:!0,forced:!a},{for:function(t){var e=s(t);if(o(c,e))return c[e];var r=i("Symbol")(e);return c[e]=r,f[r]=e,r}})},21732:(t,e,r)=>{r(73464)("hasInstance")},35903:(t,e,r)=>{r(73464)("isConcatSpreadable")},1825:(t,e,r)=>{r(73464)("iterator")},35824:(t,e,r)=>{r(48616),r(64523),r(38608),r(32619),r(37144)},38608:(t,e,r)=>{var n=r(76887),i=r(90953),o=r(56664),s=r(69826),u=r(68726),a=r(34680),c=u("symbol-to-string-registry");n({target:"Symbol",stat:!0,forced:!a},{keyFor:function(t){if(!o(t))throw TypeError(s(t)+" is not a symbol");if(i(c,t))return c[t]}})},45915:(t,e,r)=>{r(73464)("matchAll")},28394:(t,e,r)=>{r(73464)("match")},61766:(t,e,r)=>{r(73464)("replace")},62737:(t,e,r)=>{r(73464)("search")},89911:(t,e,r)=>{r(73464)("species")},74315:(t,e,r)=>{r(73464)("split")},63131:(t,e,r)=>{var n=r(73464),i=r(29630);n("toPrimitive"),i()},64714:(t,e,r)=>{var n=r(626),i=r(73464),o=r(90904);i("toStringTag"),o(n("Symbol"),"Symbol")},70659:(t,e,r)=>{r(73464)("unscopables")},28783:(t,e,r)=>{r(73464)("asyncDispose")},43975:(t,e,r)=>{r(73464)("dispose")},22731:(t,e,r)=>{var n=r(76887),i=r(626),o=r(95329),s=i("Symbol"),u=s.keyFor,a=o(s.prototype.valueOf);n({target:"Symbol",stat:!0},{isRegistered:function(t){try{return void 0!==u(a(t))}catch(t){return!1}}})},85605:(t,e,r)=>{for(var n=r(76887),i=r(68726),o=r(626),s=r(95329),u=r(56664),a=r(99813),c=o("Symbol"),f=c.isWellKnown,l=o("Object","getOwnPropertyNames"),h=s(c.prototype.valueOf),p=i("wks"),d=0,y=l(c),g=y.length;d<g;d++)try{var v=y[d];u(c[v])&&a(v)}catch(t){}n({target:"Symbol",stat:!0,forced:!0},{isWellKnown:function(t){if(f&&f(t))return!0;try{for(var e=h(t),r=0,n=l(p),i=n.length;r<i;r++)if(p[n[r]]==e)return!0}catch(t){}return!1}})},65799:(t,e,r)=>{r(73464)("matcher")},31943:(t,e,r)=>{r(73464)("metadataKey")},45414:(t,e,r)=>{r(73464)("metadata")},46774:(t,e,r)=>{r(73464)("observable")},80620:(t,e,r)=>{r(73464)("patternMatch")},36172:(t,e,r)=>{r(73464)("replaceAll")},7634:(t,e,r)=>{r(66274);var n=r(63281),i=r(21899),o=r(9697),s=r(32029),u=r(12077),a=r(99813)("toStringTag");for(var c in n){var f=i[c],l=f&&f.prototype;l&&o(l)!==a&&s(l,a,c),u[c]=u.Array}},27698:(t,e,r)=>{var n=r(54493);t.exports=n},83363:(t,e,r)=>{var n=r(24034);t.exports=n},62908:(t,e,r)=>{var n=r(12710);t.exports=n},49216:(t,e,r)=>{var n=r(99324);t.exports=n},56668:(t,e,r)=>{var n=r(95909);t.exports=n},28196:(t,e,r)=>{var n=r(16246);t.exports=n},8065:(t,e,r)=>{var n=r(56043);t.exports=n},57448:(t,e,r)=>{r(7634);var n=r(9697),i=r(90953),o=r(7046),s=r(62908),u=Array.prototype,a={DOMTokenList:!0,NodeList:!0};t.exports=function(t){var e=t.entries;return t===u||o(u,t)&&e===u.entries||i(a,n(t))?s:e}},29455:(t,e,r)=>{var n=r(13160);t.exports=n},69743:(t,e,r)=>{var n=r(80446);t.exports=n},11955:(t,e,r)=>{var n=r(2480);t.exports=n},96064:(t,e,r)=>{var n=r(7147);t.exports=n},61577:(t,e,r)=>{var n=r(32236);t.exports=n},46279:(t,e,r)=>{r(7634);var n=r(9697),i=r(90953),o=r(7046),s=r(49216),u=Array.prototype,a={DOMTokenList:!0,NodeList:!0};t.exports=function(t){var e=t.forEach;return t===u||o(u,t)&&e===u.forEach||i(a,n(t))?s:e}},33778:(t,e,r)=>{var n=r(58557);t.exports=n},19373:(t,e,r)=>{var n=r(34570);t.exports=n},73819:(t,e,r)=>{r(7634);var n=r(9697),i=r(90953),o=r(7046),s=r(56668),u=Array.prototype,a={DOMTokenList:!0,NodeList:!0};t.exports=function(t){var e=t.keys;return t===u||o(u,t)&&e===u.keys||i(a,n(t))?s:e}},61798:(t,e,r)=>{var n=r(88287);t.exports=n},52527:(t,e,r)=>{var n=r(68025);t.exports=n},82073:(t,e,r)=>{var n=r(69601);t.exports=n},45286:(t,e,r)=>{var n=r(28299);t.exports=n},62856:(t,e,r)=>{var n=r(69355);t.exports=n},35178:(t,e,r)=>{var n=r(71611);t.exports=n},76361:(t,e,r)=>{var n=r(62774);t.exports=n},8933:(t,e,r)=>{var n=r(84426);t.exports=n},15868:(t,e,r)=>{var n=r(91018);r(7634),t.exports=n},63383:(t,e,r)=>{var n=r(45999);t.exports=n},41910:(t,e,r)=>{var n=r(48171);t.exports=n},23059:(t,e,r)=>{var n=r(48494);t.exports=n},92547:(t,e,r)=>{var n=r(57473);r(7634),t.exports=n},46509:(t,e,r)=>{var n=r(24227);r(7634),t.exports=n},35774:(t,e,r)=>{var n=r(62978);t.exports=n},8269:function(t,e,r){var n;n=void 0!==r.g?r.g:this,t.exports=function(t){if(t.CSS&&t.CSS.escape)return t.CSS.escape;var e=function(t){if(0==arguments.length)throw new TypeError("`CSS.escape` requires an argument.");for(var e,r=String(t),n=r.length,i=-1,o="",s=r.charCodeAt(0);++i<n;)0!=(e=r.charCodeAt(i))?o+=e>=1&&e<=31||127==e||0==i&&e>=48&&e<=57||1==i&&e>=48&&e<=57&&45==s?"\\"+e.toString(16)+" ":0==i&&1==n&&45==e||!(e>=128||45==e||95==e||e>=48&&e<=57||e>=65&&e<=90||e>=97&&e<=122)?"\\"+r.charAt(i):r.charAt(i):o+="�";return o};return t.CSS||(t.CSS={}),t.CSS.escape=e,e}(n)},69450:t=>{"use strict";class e{constructor(t,e){this.low=t,this.high=e,this.length=1+e-t}overlaps(t){return!(this.high<t.low||this.low>t.high)}touches(t){return!(this.high+1<t.low||this.low-1>t.high)}add(t){return new e(Math.min(this.low,t.low),Math.max(this.high,t.high))}subtract(t){return t.low<=this.low&&t.high>=this.high?[]:t.low>this.low&&t.high<this.high?[new e(this.low,t.low-1),new e(t.high+1,this.high)]:t.low<=this.low?[new e(t.high+1,this.high)]:[new e(this.low,t.low-1)]}toString(){return this.low==this.high?this.low.toString():this.low+"-"+this.high}}class r{constructor(t,e){this.ranges=[],this.length=0,null!=t&&this.add(t,e)}_update_length(){this.length=this.ranges.reduce(((t,e)=>t+e.length),0)}add(t,n){var i=t=>{for(var e=0;e<this.ranges.length&&!t.touches(this.ranges[e]);)e++;for(var r=this.ranges.slice(0,e);e<this.ranges.length&&t.touches(this.ranges[e]);)t=t.add(this.ranges[e]),e++;r.push(t),this.ranges=r.concat(this.ranges.slice(e)),this._update_length()};return t instanceof r?t.ranges.forEach(i):(null==n&&(n=t),i(new e(t,n))),this}subtract(t,n){var i=t=>{for(var e=0;e<this.ranges.length&&!t.overlaps(this.ranges[e]);)e++;for(var r=this.ranges.slice(0,e);e<this.ranges.length&&t.overlaps(this.ranges[e]);)r=r.concat(this.ranges[e].subtract(t)),e++;this.ranges=r.concat(this.ranges.slice(e)),this._update_length()};return t instanceof r?t.ranges.forEach(i):(null==n&&(n=t),i(new e(t,n))),this}intersect(t,n){var i=[],o=t=>{for(var r=0;r<this.ranges.length&&!t.overlaps(this.ranges[r]);)r++;for(;r<this.ranges.length&&t.overlaps(this.ranges[r]);){var n=Math.max(this.ranges[r].low,t.low),o=Math.min(this.ranges[r].high,t.high);i.push(new e(n,o)),r++}};return t instanceof r?t.ranges.forEach(o):(null==n&&(n=t),o(new e(t,n))),this.ranges=i,this._update_length(),this}index(t){for(var e=0;e<this.ranges.length&&this.ranges[e].length<=t;)t-=this.ranges[e].length,e++;return this.ranges[e].low+t}toString(){return"[ "+this.ranges.join(", ")+" ]"}clone(){return new r(this)}numbers(){return this.ranges.reduce(((t,e)=>{for(var r=e.low;r<=e.high;)t.push(r),r++;return t}),[])}subranges(){return this.ranges.map((t=>({low:t.low,high:t.high,length:1+t.high-t.low})))}}t.exports=r},17187:t=>{"use strict";var e,r="object"==typeof Reflect?Reflect:null,n=r&&"function"==typeof r.apply?r.apply:function(t,e,r){return Function.prototype.apply.call(t,e,r)};e=r&&"function"==typeof r.ownKeys?r.ownKeys:Object.getOwnPropertySymbols?function(t){return Object.getOwnPropertyNames(t).concat(Object.getOwnPropertySymbols(t))}:function(t){return Object.getOwnPropertyNames(t)};var i=Number.isNaN||function(t){return t!=t};function o(){o.init.call(this)}t.exports=o,t.exports.once=function(t,e){return new Promise((function(r,n){function i(r){t.removeListener(e,o),n(r)}function o(){"function"==typeof t.removeListener&&t.removeListener("error",i),r([].slice.call(arguments))}y(t,e,o,{once:!0}),"error"!==e&&function(t,e,r){"function"==typeof t.on&&y(t,"error",e,r)}(t,i,{once:!0})}))},o.EventEmitter=o,o.prototype._events=void 0,o.prototype._eventsCount=0,o.prototype._maxListeners=void 0;var s=10;function u(t){if("function"!=typeof t)throw new TypeError('The "listener" argument must be of type Function. Received type '+typeof t)}function a(t){return void 0===t._maxListeners?o.defaultMaxListeners:t._maxListeners}function c(t,e,r,n){var i,o,s,c;if(u(r),void 0===(o=t._events)?(o=t._events=Object.create(null),t._eventsCount=0):(void 0!==o.newListener&&(t.emit("newListener",e,r.listener?r.listener:r),o=t._events),s=o[e]),void 0===s)s=o[e]=r,++t._eventsCount;else if("function"==typeof s?s=o[e]=n?[r,s]:[s,r]:n?s.unshift(r):s.push(r),(i=a(t))>0&&s.length>i&&!s.warned){s.warned=!0;var f=new Error("Possible EventEmitter memory leak detected. "+s.length+" "+String(e)+" listeners added. Use emitter.setMaxListeners() to increase limit");f.name="MaxListenersExceededWarning",f.emitter=t,f.type=e,f.count=s.length,c=f,console&&console.warn&&console.warn(c)}return t}function f(){if(!this.fired)return this.target.removeListener(this.type,this.wrapFn),this.fired=!0,0===arguments.length?this.listener.call(this.target):this.listener.apply(this.target,arguments)}function l(t,e,r){var n={fired:!1,wrapFn:void 0,target:t,type:e,listener:r},i=f.bind(n);return i.listener=r,n.wrapFn=i,i}function h(t,e,r){var n=t._events;if(void 0===n)return[];var i=n[e];return void 0===i?[]:"function"==typeof i?r?[i.listener||i]:[i]:r?function(t){for(var e=new Array(t.length),r=0;r<e.length;++r)e[r]=t[r].listener||t[r];return e}(i):d(i,i.length)}function p(t){var e=this._events;if(void 0!==e){var r=e[t];if("function"==typeof r)return 1;if(void 0!==r)return r.length}return 0}function d(t,e){for(var r=new Array(e),n=0;n<e;++n)r[n]=t[n];return r}function y(t,e,r,n){if("function"==typeof t.on)n.once?t.once(e,r):t.on(e,r);else{if("function"!=typeof t.addEventListener)throw new TypeError('The "emitter" argument must be of type EventEmitter. Received type '+typeof t);t.addEventListener(e,(function i(o){n.once&&t.removeEventListener(e,i),r(o)}))}}Object.defineProperty(o,"defaultMaxListeners",{enumerable:!0,get:function(){return s},set:function(t){if("number"!=typeof t||t<0||i(t))throw new RangeError('The value of "defaultMaxListeners" is out of range. It must be a non-negative number. Received '+t+".");s=t}}),o.init=function(){void 0!==this._events&&this._events!==Object.getPrototypeOf(this)._events||(this._events=Object.create(null),this._eventsCount=0),this._maxListeners=this._maxListeners||void 0},o.prototype.setMaxListeners=function(t){if("number"!=typeof t||t<0||i(t))throw new RangeError('The value of "n" is out of range. It must be a non-negative number. Received '+t+".");return this._maxListeners=t,this},o.prototype.getMaxListeners=function(){return a(this)},o.prototype.emit=function(t){for(var e=[],r=1;r<arguments.length;r++)e.push(arguments[r]);var i="error"===t,o=this._events;if(void 0!==o)i=i&&void 0===o.error;else if(!i)return!1;if(i){var s;if(e.length>0&&(s=e[0]),s instanceof Error)throw s;var u=new Error("Unhandled error."+(s?" ("+s.message+")":""));throw u.context=s,u}var a=o[t];if(void 0===a)return!1;if("function"==typeof a)n(a,this,e);else{var c=a.length,f=d(a,c);for(r=0;r<c;++r)n(f[r],this,e)}return!0},o.prototype.addListener=function(t,e){return c(this,t,e,!1)},o.prototype.on=o.prototype.addListener,o.prototype.prependListener=function(t,e){return c(this,t,e,!0)},o.prototype.once=function(t,e){return u(e),this.on(t,l(this,t,e)),this},o.prototype.prependOnceListener=function(t,e){return u(e),this.prependListener(t,l(this,t,e)),this},o.prototype.removeListener=function(t,e){var r,n,i,o,s;if(u(e),void 0===(n=this._events))return this;if(void 0===(r=n[t]))return this;if(r===e||r.listener===e)0==--this._eventsCount?this._events=Object.create(null):(delete n[t],n.removeListener&&this.emit("removeListener",t,r.listener||e));else if("function"!=typeof r){for(i=-1,o=r.length-1;o>=0;o--)if(r[o]===e||r[o].listener===e){s=r[o].listener,i=o;break}if(i<0)return this;0===i?r.shift():function(t,e){for(;e+1<t.length;e++)t[e]=t[e+1];t.pop()}(r,i),1===r.length&&(n[t]=r[0]),void 0!==n.removeListener&&this.emit("removeListener",t,s||e)}return this},o.prototype.off=o.prototype.removeListener,o.prototype.removeAllListeners=function(t){var e,r,n;if(void 0===(r=this._events))return this;if(void 0===r.removeListener)return 0===arguments.length?(this._events=Object.create(null),this._eventsCount=0):void 0!==r[t]&&(0==--this._eventsCount?this._events=Object.create(null):delete r[t]),this;if(0===arguments.length){var i,o=Object.keys(r);for(n=0;n<o.length;++n)"removeListener"!==(i=o[n])&&this.removeAllListeners(i);return this.removeAllListeners("removeListener"),this._events=Object.create(null),this._eventsCount=0,this}if("function"==typeof(e=r[t]))this.removeListener(t,e);else if(void 0!==e)for(n=e.length-1;n>=0;n--)this.removeListener(t,e[n]);return this},o.prototype.listeners=function(t){return h(this,t,!0)},o.prototype.rawListeners=function(t){return h(this,t,!1)},o.listenerCount=function(t,e){return"function"==typeof t.listenerCount?t.listenerCount(e):p.call(t,e)},o.prototype.listenerCount=p,o.prototype.eventNames=function(){return this._eventsCount>0?e(this._events):[]}},80645:(t,e)=>{e.read=function(t,e,r,n,i){var o,s,u=8*i-n-1,a=(1<<u)-1,c=a>>1,f=-7,l=r?i-1:0,h=r?-1:1,p=t[e+l];for(l+=h,o=p&(1<<-f)-1,p>>=-f,f+=u;f>0;o=256*o+t[e+l],l+=h,f-=8);for(s=o&(1<<-f)-1,o>>=-f,f+=n;f>0;s=256*s+t[e+l],l+=h,f-=8);if(0===o)o=1-c;else{if(o===a)return s?NaN:1/0*(p?-1:1);s+=Math.pow(2,n),o-=c}return(p?-1:1)*s*Math.pow(2,o-n)},e.write=function(t,e,r,n,i,o){var s,u,a,c=8*o-i-1,f=(1<<c)-1,l=f>>1,h=23===i?Math.pow(2,-24)-Math.pow(2,-77):0,p=n?0:o-1,d=n?1:-1,y=e<0||0===e&&1/e<0?1:0;for(e=Math.abs(e),isNaN(e)||e===1/0?(u=isNaN(e)?1:0,s=f):(s=Math.floor(Math.log(e)/Math.LN2),e*(a=Math.pow(2,-s))<1&&(s--,a*=2),(e+=s+l>=1?h/a:h*Math.pow(2,1-l))*a>=2&&(s++,a/=2),s+l>=f?(u=0,s=f):s+l>=1?(u=(e*a-1)*Math.pow(2,i),s+=l):(u=e*Math.pow(2,l-1)*Math.pow(2,i),s=0));i>=8;t[r+p]=255&u,p+=d,u/=256,i-=8);for(s=s<<i|u,c+=i;c>0;t[r+p]=255&s,p+=d,s/=256,c-=8);t[r+p-d]|=128*y}},43393:function(t){t.exports=function(){"use strict";var t=Array.prototype.slice;function e(t,e){e&&(t.prototype=Object.create(e.prototype)),t.prototype.constructor=t}function r(t){return s(t)?t:H(t)}function n(t){return u(t)?t:J(t)}function i(t){return a(t)?t:$(t)}function o(t){return s(t)&&!c(t)?t:Z(t)}function s(t){return!(!t||!t[l])}function u(t){return!(!t||!t[h])}function a(t){return!(!t||!t[p])}function c(t){return u(t)||a(t)}function f(t){return!(!t||!t[d])}e(n,r),e(i,r),e(o,r),r.isIterable=s,r.isKeyed=u,r.isIndexed=a,r.isAssociative=c,r.isOrdered=f,r.Keyed=n,r.Indexed=i,r.Set=o;var l="@@__IMMUTABLE_ITERABLE__@@",h="@@__IMMUTABLE_KEYED__@@",p="@@__IMMUTABLE_INDEXED__@@",d="@@__IMMUTABLE_ORDERED__@@",y="delete",g=5,v=1<<g,w=v-1,M={},L={value:!1},_={value:!1};function m(t){return t.value=!1,t}function b(t){t&&(t.value=!0)}function x(){}function j(t,e){e=e||0;for(var r=Math.max(0,t.length-e),n=new Array(r),i=0;i<r;i++)n[i]=t[i+e];return n}function N(t){return void 0===t.size&&(t.size=t.__iterate(D)),t.size}function S(t,e){if("number"!=typeof e){var r=e>>>0;if(""+r!==e||4294967295===r)return NaN;e=r}return e<0?N(t)+e:e}function D(){return!0}function I(t,e,r){return(0===t||void 0!==r&&t<=-r)&&(void 0===e||void 0!==r&&e>=r)}function E(t,e){return C(t,e,0)}function A(t,e){return C(t,e,e)}function C(t,e,r){return void 0===t?r:t<0?Math.max(0,e+t):void 0===e?t:Math.min(e,t)}var T=0,O=1,z=2,k="function"==typeof Symbol&&Symbol.iterator,U="@@iterator",R=k||U;function Y(t){this.next=t}function B(t,e,r,n){var i=0===t?e:1===t?r:[e,r];return n?n.value=i:n={value:i,done:!1},n}function P(){return{value:void 0,done:!0}}function Q(t){return!!W(t)}function F(t){return t&&"function"==typeof t.next}function G(t){var e=W(t);return e&&e.call(t)}function W(t){var e=t&&(k&&t[k]||t[U]);if("function"==typeof e)return e}function q(t){return t&&"number"==typeof t.length}function H(t){return null==t?st():s(t)?t.toSeq():ct(t)}function J(t){return null==t?st().toKeyedSeq():s(t)?u(t)?t.toSeq():t.fromEntrySeq():ut(t)}function $(t){return null==t?st():s(t)?u(t)?t.entrySeq():t.toIndexedSeq():at(t)}function Z(t){return(null==t?st():s(t)?u(t)?t.entrySeq():t:at(t)).toSetSeq()}Y.prototype.toString=function(){return"[Iterator]"},Y.KEYS=T,Y.VALUES=O,Y.ENTRIES=z,Y.prototype.inspect=Y.prototype.toSource=function(){return this.toString()},Y.prototype[R]=function(){return this},e(H,r),H.of=function(){return H(arguments)},H.prototype.toSeq=function(){return this},H.prototype.toString=function(){return this.__toString("Seq {","}")},H.prototype.cacheResult=function(){return!this._cache&&this.__iterateUncached&&(this._cache=this.entrySeq().toArray(),this.size=this._cache.length),this},H.prototype.__iterate=function(t,e){return lt(this,t,e,!0)},H.prototype.__iterator=function(t,e){return ht(this,t,e,!0)},e(J,H),J.prototype.toKeyedSeq=function(){return this},e($,H),$.of=function(){return $(arguments)},$.prototype.toIndexedSeq=function(){return this},$.prototype.toString=function(){return this.__toString("Seq [","]")},$.prototype.__iterate=function(t,e){return lt(this,t,e,!1)},$.prototype.__iterator=function(t,e){return ht(this,t,e,!1)},e(Z,H),Z.of=function(){return Z(arguments)},Z.prototype.toSetSeq=function(){return this},H.isSeq=ot,H.Keyed=J,H.Set=Z,H.Indexed=$;var V,X,K,tt="@@__IMMUTABLE_SEQ__@@";function et(t){this._array=t,this.size=t.length}function rt(t){var e=Object.keys(t);this._object=t,this._keys=e,this.size=e.length}function nt(t){this._iterable=t,this.size=t.length||t.size}function it(t){this._iterator=t,this._iteratorCache=[]}function ot(t){return!(!t||!t[tt])}function st(){return V||(V=new et([]))}function ut(t){var e=Array.isArray(t)?new et(t).fromEntrySeq():F(t)?new it(t).fromEntrySeq():Q(t)?new nt(t).fromEntrySeq():"object"==typeof t?new rt(t):void 0;if(!e)throw new TypeError("Expected Array or iterable object of [k, v] entries, or keyed object: "+t);return e}function at(t){var e=ft(t);if(!e)throw new TypeError("Expected Array or iterable object of values: "+t);return e}function ct(t){var e=ft(t)||"object"==typeof t&&new rt(t);if(!e)throw new TypeError("Expected Array or iterable object of values, or keyed object: "+t);return e}function ft(t){return q(t)?new et(t):F(t)?new it(t):Q(t)?new nt(t):void 0}function lt(t,e,r,n){var i=t._cache;if(i){for(var o=i.length-1,s=0;s<=o;s++){var u=i[r?o-s:s];if(!1===e(u[1],n?u[0]:s,t))return s+1}return s}return t.__iterateUncached(e,r)}function ht(t,e,r,n){var i=t._cache;if(i){var o=i.length-1,s=0;return new Y((function(){var t=i[r?o-s:s];return s++>o?P():B(e,n?t[0]:s-1,t[1])}))}return t.__iteratorUncached(e,r)}function pt(t,e){return e?dt(e,t,"",{"":t}):yt(t)}function dt(t,e,r,n){return Array.isArray(e)?t.call(n,r,$(e).map((function(r,n){return dt(t,r,n,e)}))):gt(e)?t.call(n,r,J(e).map((function(r,n){return dt(t,r,n,e)}))):e}function yt(t){return Array.isArray(t)?$(t).map(yt).toList():gt(t)?J(t).map(yt).toMap():t}function gt(t){return t&&(t.constructor===Object||void 0===t.constructor)}function vt(t,e){if(t===e||t!=t&&e!=e)return!0;if(!t||!e)return!1;if("function"==typeof t.valueOf&&"function"==typeof e.valueOf){if((t=t.valueOf())===(e=e.valueOf())||t!=t&&e!=e)return!0;if(!t||!e)return!1}return!("function"!=typeof t.equals||"function"!=typeof e.equals||!t.equals(e))}function wt(t,e){if(t===e)return!0;if(!s(e)||void 0!==t.size&&void 0!==e.size&&t.size!==e.size||void 0!==t.__hash&&void 0!==e.__hash&&t.__hash!==e.__hash||u(t)!==u(e)||a(t)!==a(e)||f(t)!==f(e))return!1;if(0===t.size&&0===e.size)return!0;var r=!c(t);if(f(t)){var n=t.entries();return e.every((function(t,e){var i=n.next().value;return i&&vt(i[1],t)&&(r||vt(i[0],e))}))&&n.next().done}var i=!1;if(void 0===t.size)if(void 0===e.size)"function"==typeof t.cacheResult&&t.cacheResult();else{i=!0;var o=t;t=e,e=o}var l=!0,h=e.__iterate((function(e,n){if(r?!t.has(e):i?!vt(e,t.get(n,M)):!vt(t.get(n,M),e))return l=!1,!1}));return l&&t.size===h}function Mt(t,e){if(!(this instanceof Mt))return new Mt(t,e);if(this._value=t,this.size=void 0===e?1/0:Math.max(0,e),0===this.size){if(X)return X;X=this}}function Lt(t,e){if(!t)throw new Error(e)}function _t(t,e,r){if(!(this instanceof _t))return new _t(t,e,r);if(Lt(0!==r,"Cannot step a Range by 0"),t=t||0,void 0===e&&(e=1/0),r=void 0===r?1:Math.abs(r),e<t&&(r=-r),this._start=t,this._end=e,this._step=r,this.size=Math.max(0,Math.ceil((e-t)/r-1)+1),0===this.size){if(K)return K;K=this}}function mt(){throw TypeError("Abstract")}function bt(){}function xt(){}function jt(){}H.prototype[tt]=!0,e(et,$),et.prototype.get=function(t,e){return this.has(t)?this._array[S(this,t)]:e},et.prototype.__iterate=function(t,e){for(var r=this._array,n=r.length-1,i=0;i<=n;i++)if(!1===t(r[e?n-i:i],i,this))return i+1;return i},et.prototype.__iterator=function(t,e){var r=this._array,n=r.length-1,i=0;return new Y((function(){return i>n?P():B(t,i,r[e?n-i++:i++])}))},e(rt,J),rt.prototype.get=function(t,e){return void 0===e||this.has(t)?this._object[t]:e},rt.prototype.has=function(t){return this._object.hasOwnProperty(t)},rt.prototype.__iterate=function(t,e){for(var r=this._object,n=this._keys,i=n.length-1,o=0;o<=i;o++){var s=n[e?i-o:o];if(!1===t(r[s],s,this))return o+1}return o},rt.prototype.__iterator=function(t,e){var r=this._object,n=this._keys,i=n.length-1,o=0;return new Y((function(){var s=n[e?i-o:o];return o++>i?P():B(t,s,r[s])}))},rt.prototype[d]=!0,e(nt,$),nt.prototype.__iterateUncached=function(t,e){if(e)return this.cacheResult().__iterate(t,e);var r=G(this._iterable),n=0;if(F(r))for(var i;!(i=r.next()).done&&!1!==t(i.value,n++,this););return n},nt.prototype.__iteratorUncached=function(t,e){if(e)return this.cacheResult().__iterator(t,e);var r=G(this._iterable);if(!F(r))return new Y(P);var n=0;return new Y((function(){var e=r.next();return e.done?e:B(t,n++,e.value)}))},e(it,$),it.prototype.__iterateUncached=function(t,e){if(e)return this.cacheResult().__iterate(t,e);for(var r,n=this._iterator,i=this._iteratorCache,o=0;o<i.length;)if(!1===t(i[o],o++,this))return o;for(;!(r=n.next()).done;){var s=r.value;if(i[o]=s,!1===t(s,o++,this))break}return o},it.prototype.__iteratorUncached=function(t,e){if(e)return this.cacheResult().__iterator(t,e);var r=this._iterator,n=this._iteratorCache,i=0;return new Y((function(){if(i>=n.length){var e=r.next();if(e.done)return e;n[i]=e.value}return B(t,i,n[i++])}))},e(Mt,$),Mt.prototype.toString=function(){return 0===this.size?"Repeat []":"Repeat [ "+this._value+" "+this.size+" times ]"},Mt.prototype.get=function(t,e){return this.has(t)?this._value:e},Mt.prototype.includes=function(t){return vt(this._value,t)},Mt.prototype.slice=function(t,e){var r=this.size;return I(t,e,r)?this:new Mt(this._value,A(e,r)-E(t,r))},Mt.prototype.reverse=function(){return this},Mt.prototype.indexOf=function(t){return vt(this._value,t)?0:-1},Mt.prototype.lastIndexOf=function(t){return vt(this._value,t)?this.size:-1},Mt.prototype.__iterate=function(t,e){for(var r=0;r<this.size;r++)if(!1===t(this._value,r,this))return r+1;return r},Mt.prototype.__iterator=function(t,e){var r=this,n=0;return new Y((function(){return n<r.size?B(t,n++,r._value):P()}))},Mt.prototype.equals=function(t){return t instanceof Mt?vt(this._value,t._value):wt(t)},e(_t,$),_t.prototype.toString=function(){return 0===this.size?"Range []":"Range [ "+this._start+"..."+this._end+(1!==this._step?" by "+this._step:"")+" ]"},_t.prototype.get=function(t,e){return this.has(t)?this._start+S(this,t)*this._step:e},_t.prototype.includes=function(t){var e=(t-this._start)/this._step;return e>=0&&e<this.size&&e===Math.floor(e)},_t.prototype.slice=function(t,e){return I(t,e,this.size)?this:(t=E(t,this.size),(e=A(e,this.size))<=t?new _t(0,0):new _t(this.get(t,this._end),this.get(e,this._end),this._step))},_t.prototype.indexOf=function(t){var e=t-this._start;if(e%this._step==0){var r=e/this._step;if(r>=0&&r<this.size)return r}return-1},_t.prototype.lastIndexOf=function(t){return this.indexOf(t)},_t.prototype.__iterate=function(t,e){for(var r=this.size-1,n=this._step,i=e?this._start+r*n:this._start,o=0;o<=r;o++){if(!1===t(i,o,this))return o+1;i+=e?-n:n}return o},_t.prototype.__iterator=function(t,e){var r=this.size-1,n=this._step,i=e?this._start+r*n:this._start,o=0;return new Y((function(){var s=i;return i+=e?-n:n,o>r?P():B(t,o++,s)}))},_t.prototype.equals=function(t){return t instanceof _t?this._start===t._start&&this._end===t._end&&this._step===t._step:wt(this,t)},e(mt,r),e(bt,mt),e(xt,mt),e(jt,mt),mt.Keyed=bt,mt.Indexed=xt,mt.Set=jt;var Nt="function"==typeof Math.imul&&-2===Math.imul(4294967295,2)?Math.imul:function(t,e){var r=65535&(t|=0),n=65535&(e|=0);return r*n+((t>>>16)*n+r*(e>>>16)<<16>>>0)|0};function St(t){return t>>>1&1073741824|3221225471&t}function Dt(t){if(!1===t||null==t)return 0;if("function"==typeof t.valueOf&&(!1===(t=t.valueOf())||null==t))return 0;if(!0===t)return 1;var e=typeof t;if("number"===e){if(t!=t||t===1/0)return 0;var r=0|t;for(r!==t&&(r^=4294967295*t);t>4294967295;)r^=t/=4294967295;return St(r)}if("string"===e)return t.length>Yt?It(t):Et(t);if("function"==typeof t.hashCode)return t.hashCode();if("object"===e)return At(t);if("function"==typeof t.toString)return Et(t.toString());throw new Error("Value type "+e+" cannot be hashed.")}function It(t){var e=Qt[t];return void 0===e&&(e=Et(t),Pt===Bt&&(Pt=0,Qt={}),Pt++,Qt[t]=e),e}function Et(t){for(var e=0,r=0;r<t.length;r++)e=31*e+t.charCodeAt(r)|0;return St(e)}function At(t){var e;if(kt&&void 0!==(e=zt.get(t)))return e;if(void 0!==(e=t[Rt]))return e;if(!Tt){if(void 0!==(e=t.propertyIsEnumerable&&t.propertyIsEnumerable[Rt]))return e;if(void 0!==(e=Ot(t)))return e}if(e=++Ut,1073741824&Ut&&(Ut=0),kt)zt.set(t,e);else{if(void 0!==Ct&&!1===Ct(t))throw new Error("Non-extensible objects are not allowed as keys.");if(Tt)Object.defineProperty(t,Rt,{enumerable:!1,configurable:!1,writable:!1,value:e});else if(void 0!==t.propertyIsEnumerable&&t.propertyIsEnumerable===t.constructor.prototype.propertyIsEnumerable)t.propertyIsEnumerable=function(){return this.constructor.prototype.propertyIsEnumerable.apply(this,arguments)},t.propertyIsEnumerable[Rt]=e;else{if(void 0===t.nodeType)throw new Error("Unable to set a non-enumerable property on object.");t[Rt]=e}}return e}var Ct=Object.isExtensible,Tt=function(){try{return Object.defineProperty({},"@",{}),!0}catch(t){return!1}}();function Ot(t){if(t&&t.nodeType>0)switch(t.nodeType){case 1:return t.uniqueID;case 9:return t.documentElement&&t.documentElement.uniqueID}}var zt,kt="function"==typeof WeakMap;kt&&(zt=new WeakMap);var Ut=0,Rt="__immutablehash__";"function"==typeof Symbol&&(Rt=Symbol(Rt));var Yt=16,Bt=255,Pt=0,Qt={};function Ft(t){Lt(t!==1/0,"Cannot perform this action with an infinite size.")}function Gt(t){return null==t?ie():Wt(t)&&!f(t)?t:ie().withMutations((function(e){var r=n(t);Ft(r.size),r.forEach((function(t,r){return e.set(r,t)}))}))}function Wt(t){return!(!t||!t[Ht])}e(Gt,bt),Gt.of=function(){var e=t.call(arguments,0);return ie().withMutations((function(t){for(var r=0;r<e.length;r+=2){if(r+1>=e.length)throw new Error("Missing value for key: "+e[r]);t.set(e[r],e[r+1])}}))},Gt.prototype.toString=function(){return this.__toString("Map {","}")},Gt.prototype.get=function(t,e){return this._root?this._root.get(0,void 0,t,e):e},Gt.prototype.set=function(t,e){return oe(this,t,e)},Gt.prototype.setIn=function(t,e){return this.updateIn(t,M,(function(){return e}))},Gt.prototype.remove=function(t){return oe(this,t,M)},Gt.prototype.deleteIn=function(t){return this.updateIn(t,(function(){return M}))},Gt.prototype.update=function(t,e,r){return 1===arguments.length?t(this):this.updateIn([t],e,r)},Gt.prototype.updateIn=function(t,e,r){r||(r=e,e=void 0);var n=ge(this,_r(t),e,r);return n===M?void 0:n},Gt.prototype.clear=function(){return 0===this.size?this:this.__ownerID?(this.size=0,this._root=null,this.__hash=void 0,this.__altered=!0,this):ie()},Gt.prototype.merge=function(){return he(this,void 0,arguments)},Gt.prototype.mergeWith=function(e){return he(this,e,t.call(arguments,1))},Gt.prototype.mergeIn=function(e){var r=t.call(arguments,1);return this.updateIn(e,ie(),(function(t){return"function"==typeof t.merge?t.merge.apply(t,r):r[r.length-1]}))},Gt.prototype.mergeDeep=function(){return he(this,pe,arguments)},Gt.prototype.mergeDeepWith=function(e){var r=t.call(arguments,1);return he(this,de(e),r)},Gt.prototype.mergeDeepIn=function(e){var r=t.call(arguments,1);return this.updateIn(e,ie(),(function(t){return"function"==typeof t.mergeDeep?t.mergeDeep.apply(t,r):r[r.length-1]}))},Gt.prototype.sort=function(t){return Qe(fr(this,t))},Gt.prototype.sortBy=function(t,e){return Qe(fr(this,e,t))},Gt.prototype.withMutations=function(t){var e=this.asMutable();return t(e),e.wasAltered()?e.__ensureOwner(this.__ownerID):this},Gt.prototype.asMutable=function(){return this.__ownerID?this:this.__ensureOwner(new x)},Gt.prototype.asImmutable=function(){return this.__ensureOwner()},Gt.prototype.wasAltered=function(){return this.__altered},Gt.prototype.__iterator=function(t,e){return new te(this,t,e)},Gt.prototype.__iterate=function(t,e){var r=this,n=0;return this._root&&this._root.iterate((function(e){return n++,t(e[1],e[0],r)}),e),n},Gt.prototype.__ensureOwner=function(t){return t===this.__ownerID?this:t?ne(this.size,this._root,t,this.__hash):(this.__ownerID=t,this.__altered=!1,this)},Gt.isMap=Wt;var qt,Ht="@@__IMMUTABLE_MAP__@@",Jt=Gt.prototype;function $t(t,e){this.ownerID=t,this.entries=e}function Zt(t,e,r){this.ownerID=t,this.bitmap=e,this.nodes=r}function Vt(t,e,r){this.ownerID=t,this.count=e,this.nodes=r}function Xt(t,e,r){this.ownerID=t,this.keyHash=e,this.entries=r}function Kt(t,e,r){this.ownerID=t,this.keyHash=e,this.entry=r}function te(t,e,r){this._type=e,this._reverse=r,this._stack=t._root&&re(t._root)}function ee(t,e){return B(t,e[0],e[1])}function re(t,e){return{node:t,index:0,__prev:e}}function ne(t,e,r,n){var i=Object.create(Jt);return i.size=t,i._root=e,i.__ownerID=r,i.__hash=n,i.__altered=!1,i}function ie(){return qt||(qt=ne(0))}function oe(t,e,r){var n,i;if(t._root){var o=m(L),s=m(_);if(n=se(t._root,t.__ownerID,0,void 0,e,r,o,s),!s.value)return t;i=t.size+(o.value?r===M?-1:1:0)}else{if(r===M)return t;i=1,n=new $t(t.__ownerID,[[e,r]])}return t.__ownerID?(t.size=i,t._root=n,t.__hash=void 0,t.__altered=!0,t):n?ne(i,n):ie()}function se(t,e,r,n,i,o,s,u){return t?t.update(e,r,n,i,o,s,u):o===M?t:(b(u),b(s),new Kt(e,n,[i,o]))}function ue(t){return t.constructor===Kt||t.constructor===Xt}function ae(t,e,r,n,i){if(t.keyHash===n)return new Xt(e,n,[t.entry,i]);var o,s=(0===r?t.keyHash:t.keyHash>>>r)&w,u=(0===r?n:n>>>r)&w;return new Zt(e,1<<s|1<<u,s===u?[ae(t,e,r+g,n,i)]:(o=new Kt(e,n,i),s<u?[t,o]:[o,t]))}function ce(t,e,r,n){t||(t=new x);for(var i=new Kt(t,Dt(r),[r,n]),o=0;o<e.length;o++){var s=e[o];i=i.update(t,0,void 0,s[0],s[1])}return i}function fe(t,e,r,n){for(var i=0,o=0,s=new Array(r),u=0,a=1,c=e.length;u<c;u++,a<<=1){var f=e[u];void 0!==f&&u!==n&&(i|=a,s[o++]=f)}return new Zt(t,i,s)}function le(t,e,r,n,i){for(var o=0,s=new Array(v),u=0;0!==r;u++,r>>>=1)s[u]=1&r?e[o++]:void 0;return s[n]=i,new Vt(t,o+1,s)}function he(t,e,r){for(var i=[],o=0;o<r.length;o++){var u=r[o],a=n(u);s(u)||(a=a.map((function(t){return pt(t)}))),i.push(a)}return ye(t,e,i)}function pe(t,e,r){return t&&t.mergeDeep&&s(e)?t.mergeDeep(e):vt(t,e)?t:e}function de(t){return function(e,r,n){if(e&&e.mergeDeepWith&&s(r))return e.mergeDeepWith(t,r);var i=t(e,r,n);return vt(e,i)?e:i}}function ye(t,e,r){return 0===(r=r.filter((function(t){return 0!==t.size}))).length?t:0!==t.size||t.__ownerID||1!==r.length?t.withMutations((function(t){for(var n=e?function(r,n){t.update(n,M,(function(t){return t===M?r:e(t,r,n)}))}:function(e,r){t.set(r,e)},i=0;i<r.length;i++)r[i].forEach(n)})):t.constructor(r[0])}function ge(t,e,r,n){var i=t===M,o=e.next();if(o.done){var s=i?r:t,u=n(s);return u===s?t:u}Lt(i||t&&t.set,"invalid keyPath");var a=o.value,c=i?M:t.get(a,M),f=ge(c,e,r,n);return f===c?t:f===M?t.remove(a):(i?ie():t).set(a,f)}function ve(t){return t=(t=(858993459&(t-=t>>1&1431655765))+(t>>2&858993459))+(t>>4)&252645135,t+=t>>8,127&(t+=t>>16)}function we(t,e,r,n){var i=n?t:j(t);return i[e]=r,i}function Me(t,e,r,n){var i=t.length+1;if(n&&e+1===i)return t[e]=r,t;for(var o=new Array(i),s=0,u=0;u<i;u++)u===e?(o[u]=r,s=-1):o[u]=t[u+s];return o}function Le(t,e,r){var n=t.length-1;if(r&&e===n)return t.pop(),t;for(var i=new Array(n),o=0,s=0;s<n;s++)s===e&&(o=1),i[s]=t[s+o];return i}Jt[Ht]=!0,Jt[y]=Jt.remove,Jt.removeIn=Jt.deleteIn,$t.prototype.get=function(t,e,r,n){for(var i=this.entries,o=0,s=i.length;o<s;o++)if(vt(r,i[o][0]))return i[o][1];return n},$t.prototype.update=function(t,e,r,n,i,o,s){for(var u=i===M,a=this.entries,c=0,f=a.length;c<f&&!vt(n,a[c][0]);c++);var l=c<f;if(l?a[c][1]===i:u)return this;if(b(s),(u||!l)&&b(o),!u||1!==a.length){if(!l&&!u&&a.length>=_e)return ce(t,a,n,i);var h=t&&t===this.ownerID,p=h?a:j(a);return l?u?c===f-1?p.pop():p[c]=p.pop():p[c]=[n,i]:p.push([n,i]),h?(this.entries=p,this):new $t(t,p)}},Zt.prototype.get=function(t,e,r,n){void 0===e&&(e=Dt(r));var i=1<<((0===t?e:e>>>t)&w),o=this.bitmap;return 0==(o&i)?n:this.nodes[ve(o&i-1)].get(t+g,e,r,n)},Zt.prototype.update=function(t,e,r,n,i,o,s){void 0===r&&(r=Dt(n));var u=(0===e?r:r>>>e)&w,a=1<<u,c=this.bitmap,f=0!=(c&a);if(!f&&i===M)return this;var l=ve(c&a-1),h=this.nodes,p=f?h[l]:void 0,d=se(p,t,e+g,r,n,i,o,s);if(d===p)return this;if(!f&&d&&h.length>=me)return le(t,h,c,u,d);if(f&&!d&&2===h.length&&ue(h[1^l]))return h[1^l];if(f&&d&&1===h.length&&ue(d))return d;var y=t&&t===this.ownerID,v=f?d?c:c^a:c|a,L=f?d?we(h,l,d,y):Le(h,l,y):Me(h,l,d,y);return y?(this.bitmap=v,this.nodes=L,this):new Zt(t,v,L)},Vt.prototype.get=function(t,e,r,n){void 0===e&&(e=Dt(r));var i=(0===t?e:e>>>t)&w,o=this.nodes[i];return o?o.get(t+g,e,r,n):n},Vt.prototype.update=function(t,e,r,n,i,o,s){void 0===r&&(r=Dt(n));var u=(0===e?r:r>>>e)&w,a=i===M,c=this.nodes,f=c[u];if(a&&!f)return this;var l=se(f,t,e+g,r,n,i,o,s);if(l===f)return this;var h=this.count;if(f){if(!l&&--h<be)return fe(t,c,h,u)}else h++;var p=t&&t===this.ownerID,d=we(c,u,l,p);return p?(this.count=h,this.nodes=d,this):new Vt(t,h,d)},Xt.prototype.get=function(t,e,r,n){for(var i=this.entries,o=0,s=i.length;o<s;o++)if(vt(r,i[o][0]))return i[o][1];return n},Xt.prototype.update=function(t,e,r,n,i,o,s){void 0===r&&(r=Dt(n));var u=i===M;if(r!==this.keyHash)return u?this:(b(s),b(o),ae(this,t,e,r,[n,i]));for(var a=this.entries,c=0,f=a.length;c<f&&!vt(n,a[c][0]);c++);var l=c<f;if(l?a[c][1]===i:u)return this;if(b(s),(u||!l)&&b(o),u&&2===f)return new Kt(t,this.keyHash,a[1^c]);var h=t&&t===this.ownerID,p=h?a:j(a);return l?u?c===f-1?p.pop():p[c]=p.pop():p[c]=[n,i]:p.push([n,i]),h?(this.entries=p,this):new Xt(t,this.keyHash,p)},Kt.prototype.get=function(t,e,r,n){return vt(r,this.entry[0])?this.entry[1]:n},Kt.prototype.update=function(t,e,r,n,i,o,s){var u=i===M,a=vt(n,this.entry[0]);return(a?i===this.entry[1]:u)?this:(b(s),u?void b(o):a?t&&t===this.ownerID?(this.entry[1]=i,this):new Kt(t,this.keyHash,[n,i]):(b(o),ae(this,t,e,Dt(n),[n,i])))},$t.prototype.iterate=Xt.prototype.iterate=function(t,e){for(var r=this.entries,n=0,i=r.length-1;n<=i;n++)if(!1===t(r[e?i-n:n]))return!1},Zt.prototype.iterate=Vt.prototype.iterate=function(t,e){for(var r=this.nodes,n=0,i=r.length-1;n<=i;n++){var o=r[e?i-n:n];if(o&&!1===o.iterate(t,e))return!1}},Kt.prototype.iterate=function(t,e){return t(this.entry)},e(te,Y),te.prototype.next=function(){for(var t=this._type,e=this._stack;e;){var r,n=e.node,i=e.index++;if(n.entry){if(0===i)return ee(t,n.entry)}else if(n.entries){if(i<=(r=n.entries.length-1))return ee(t,n.entries[this._reverse?r-i:i])}else if(i<=(r=n.nodes.length-1)){var o=n.nodes[this._reverse?r-i:i];if(o){if(o.entry)return ee(t,o.entry);e=this._stack=re(o,e)}continue}e=this._stack=this._stack.__prev}return P()};var _e=v/4,me=v/2,be=v/4;function xe(t){var e=Oe();if(null==t)return e;if(je(t))return t;var r=i(t),n=r.size;return 0===n?e:(Ft(n),n>0&&n<v?Te(0,n,g,null,new De(r.toArray())):e.withMutations((function(t){t.setSize(n),r.forEach((function(e,r){return t.set(r,e)}))})))}function je(t){return!(!t||!t[Ne])}e(xe,xt),xe.of=function(){return this(arguments)},xe.prototype.toString=function(){return this.__toString("List [","]")},xe.prototype.get=function(t,e){if((t=S(this,t))>=0&&t<this.size){var r=Re(this,t+=this._origin);return r&&r.array[t&w]}return e},xe.prototype.set=function(t,e){return ze(this,t,e)},xe.prototype.remove=function(t){return this.has(t)?0===t?this.shift():t===this.size-1?this.pop():this.splice(t,1):this},xe.prototype.insert=function(t,e){return this.splice(t,0,e)},xe.prototype.clear=function(){return 0===this.size?this:this.__ownerID?(this.size=this._origin=this._capacity=0,this._level=g,this._root=this._tail=null,this.__hash=void 0,this.__altered=!0,this):Oe()},xe.prototype.push=function(){var t=arguments,e=this.size;return this.withMutations((function(r){Ye(r,0,e+t.length);for(var n=0;n<t.length;n++)r.set(e+n,t[n])}))},xe.prototype.pop=function(){return Ye(this,0,-1)},xe.prototype.unshift=function(){var t=arguments;return this.withMutations((function(e){Ye(e,-t.length);for(var r=0;r<t.length;r++)e.set(r,t[r])}))},xe.prototype.shift=function(){return Ye(this,1)},xe.prototype.merge=function(){return Be(this,void 0,arguments)},xe.prototype.mergeWith=function(e){return Be(this,e,t.call(arguments,1))},xe.prototype.mergeDeep=function(){return Be(this,pe,arguments)},xe.prototype.mergeDeepWith=function(e){var r=t.call(arguments,1);return Be(this,de(e),r)},xe.prototype.setSize=function(t){return Ye(this,0,t)},xe.prototype.slice=function(t,e){var r=this.size;return I(t,e,r)?this:Ye(this,E(t,r),A(e,r))},xe.prototype.__iterator=function(t,e){var r=0,n=Ce(this,e);return new Y((function(){var e=n();return e===Ae?P():B(t,r++,e)}))},xe.prototype.__iterate=function(t,e){for(var r,n=0,i=Ce(this,e);(r=i())!==Ae&&!1!==t(r,n++,this););return n},xe.prototype.__ensureOwner=function(t){return t===this.__ownerID?this:t?Te(this._origin,this._capacity,this._level,this._root,this._tail,t,this.__hash):(this.__ownerID=t,this)},xe.isList=je;var Ne="@@__IMMUTABLE_LIST__@@",Se=xe.prototype;function De(t,e){this.array=t,this.ownerID=e}Se[Ne]=!0,Se[y]=Se.remove,Se.setIn=Jt.setIn,Se.deleteIn=Se.removeIn=Jt.removeIn,Se.update=Jt.update,Se.updateIn=Jt.updateIn,Se.mergeIn=Jt.mergeIn,Se.mergeDeepIn=Jt.mergeDeepIn,Se.withMutations=Jt.withMutations,Se.asMutable=Jt.asMutable,Se.asImmutable=Jt.asImmutable,Se.wasAltered=Jt.wasAltered,De.prototype.removeBefore=function(t,e,r){if(r===e?1<<e:0===this.array.length)return this;var n=r>>>e&w;if(n>=this.array.length)return new De([],t);var i,o=0===n;if(e>0){var s=this.array[n];if((i=s&&s.removeBefore(t,e-g,r))===s&&o)return this}if(o&&!i)return this;var u=Ue(this,t);if(!o)for(var a=0;a<n;a++)u.array[a]=void 0;return i&&(u.array[n]=i),u},De.prototype.removeAfter=function(t,e,r){if(r===(e?1<<e:0)||0===this.array.length)return this;var n,i=r-1>>>e&w;if(i>=this.array.length)return this;if(e>0){var o=this.array[i];if((n=o&&o.removeAfter(t,e-g,r))===o&&i===this.array.length-1)return this}var s=Ue(this,t);return s.array.splice(i+1),n&&(s.array[i]=n),s};var Ie,Ee,Ae={};function Ce(t,e){var r=t._origin,n=t._capacity,i=Pe(n),o=t._tail;return s(t._root,t._level,0);function s(t,e,r){return 0===e?u(t,r):a(t,e,r)}function u(t,s){var u=s===i?o&&o.array:t&&t.array,a=s>r?0:r-s,c=n-s;return c>v&&(c=v),function(){if(a===c)return Ae;var t=e?--c:a++;return u&&u[t]}}function a(t,i,o){var u,a=t&&t.array,c=o>r?0:r-o>>i,f=1+(n-o>>i);return f>v&&(f=v),function(){for(;;){if(u){var t=u();if(t!==Ae)return t;u=null}if(c===f)return Ae;var r=e?--f:c++;u=s(a&&a[r],i-g,o+(r<<i))}}}}function Te(t,e,r,n,i,o,s){var u=Object.create(Se);return u.size=e-t,u._origin=t,u._capacity=e,u._level=r,u._root=n,u._tail=i,u.__ownerID=o,u.__hash=s,u.__altered=!1,u}function Oe(){return Ie||(Ie=Te(0,0,g))}function ze(t,e,r){if((e=S(t,e))!=e)return t;if(e>=t.size||e<0)return t.withMutations((function(t){e<0?Ye(t,e).set(0,r):Ye(t,0,e+1).set(e,r)}));e+=t._origin;var n=t._tail,i=t._root,o=m(_);return e>=Pe(t._capacity)?n=ke(n,t.__ownerID,0,e,r,o):i=ke(i,t.__ownerID,t._level,e,r,o),o.value?t.__ownerID?(t._root=i,t._tail=n,t.__hash=void 0,t.__altered=!0,t):Te(t._origin,t._capacity,t._level,i,n):t}function ke(t,e,r,n,i,o){var s,u=n>>>r&w,a=t&&u<t.array.length;if(!a&&void 0===i)return t;if(r>0){var c=t&&t.array[u],f=ke(c,e,r-g,n,i,o);return f===c?t:((s=Ue(t,e)).array[u]=f,s)}return a&&t.array[u]===i?t:(b(o),s=Ue(t,e),void 0===i&&u===s.array.length-1?s.array.pop():s.array[u]=i,s)}function Ue(t,e){return e&&t&&e===t.ownerID?t:new De(t?t.array.slice():[],e)}function Re(t,e){if(e>=Pe(t._capacity))return t._tail;if(e<1<<t._level+g){for(var r=t._root,n=t._level;r&&n>0;)r=r.array[e>>>n&w],n-=g;return r}}function Ye(t,e,r){void 0!==e&&(e|=0),void 0!==r&&(r|=0);var n=t.__ownerID||new x,i=t._origin,o=t._capacity,s=i+e,u=void 0===r?o:r<0?o+r:i+r;if(s===i&&u===o)return t;if(s>=u)return t.clear();for(var a=t._level,c=t._root,f=0;s+f<0;)c=new De(c&&c.array.length?[void 0,c]:[],n),f+=1<<(a+=g);f&&(s+=f,i+=f,u+=f,o+=f);for(var l=Pe(o),h=Pe(u);h>=1<<a+g;)c=new De(c&&c.array.length?[c]:[],n),a+=g;var p=t._tail,d=h<l?Re(t,u-1):h>l?new De([],n):p;if(p&&h>l&&s<o&&p.array.length){for(var y=c=Ue(c,n),v=a;v>g;v-=g){var M=l>>>v&w;y=y.array[M]=Ue(y.array[M],n)}y.array[l>>>g&w]=p}if(u<o&&(d=d&&d.removeAfter(n,0,u)),s>=h)s-=h,u-=h,a=g,c=null,d=d&&d.removeBefore(n,0,s);else if(s>i||h<l){for(f=0;c;){var L=s>>>a&w;if(L!==h>>>a&w)break;L&&(f+=(1<<a)*L),a-=g,c=c.array[L]}c&&s>i&&(c=c.removeBefore(n,a,s-f)),c&&h<l&&(c=c.removeAfter(n,a,h-f)),f&&(s-=f,u-=f)}return t.__ownerID?(t.size=u-s,t._origin=s,t._capacity=u,t._level=a,t._root=c,t._tail=d,t.__hash=void 0,t.__altered=!0,t):Te(s,u,a,c,d)}function Be(t,e,r){for(var n=[],o=0,u=0;u<r.length;u++){var a=r[u],c=i(a);c.size>o&&(o=c.size),s(a)||(c=c.map((function(t){return pt(t)}))),n.push(c)}return o>t.size&&(t=t.setSize(o)),ye(t,e,n)}function Pe(t){return t<v?0:t-1>>>g<<g}function Qe(t){return null==t?We():Fe(t)?t:We().withMutations((function(e){var r=n(t);Ft(r.size),r.forEach((function(t,r){return e.set(r,t)}))}))}function Fe(t){return Wt(t)&&f(t)}function Ge(t,e,r,n){var i=Object.create(Qe.prototype);return i.size=t?t.size:0,i._map=t,i._list=e,i.__ownerID=r,i.__hash=n,i}function We(){return Ee||(Ee=Ge(ie(),Oe()))}function qe(t,e,r){var n,i,o=t._map,s=t._list,u=o.get(e),a=void 0!==u;if(r===M){if(!a)return t;s.size>=v&&s.size>=2*o.size?(n=(i=s.filter((function(t,e){return void 0!==t&&u!==e}))).toKeyedSeq().map((function(t){return t[0]})).flip().toMap(),t.__ownerID&&(n.__ownerID=i.__ownerID=t.__ownerID)):(n=o.remove(e),i=u===s.size-1?s.pop():s.set(u,void 0))}else if(a){if(r===s.get(u)[1])return t;n=o,i=s.set(u,[e,r])}else n=o.set(e,s.size),i=s.set(s.size,[e,r]);return t.__ownerID?(t.size=n.size,t._map=n,t._list=i,t.__hash=void 0,t):Ge(n,i)}function He(t,e){this._iter=t,this._useKeys=e,this.size=t.size}function Je(t){this._iter=t,this.size=t.size}function $e(t){this._iter=t,this.size=t.size}function Ze(t){this._iter=t,this.size=t.size}function Ve(t){var e=wr(t);return e._iter=t,e.size=t.size,e.flip=function(){return t},e.reverse=function(){var e=t.reverse.apply(this);return e.flip=function(){return t.reverse()},e},e.has=function(e){return t.includes(e)},e.includes=function(e){return t.has(e)},e.cacheResult=Mr,e.__iterateUncached=function(e,r){var n=this;return t.__iterate((function(t,r){return!1!==e(r,t,n)}),r)},e.__iteratorUncached=function(e,r){if(e===z){var n=t.__iterator(e,r);return new Y((function(){var t=n.next();if(!t.done){var e=t.value[0];t.value[0]=t.value[1],t.value[1]=e}return t}))}return t.__iterator(e===O?T:O,r)},e}function Xe(t,e,r){var n=wr(t);return n.size=t.size,n.has=function(e){return t.has(e)},n.get=function(n,i){var o=t.get(n,M);return o===M?i:e.call(r,o,n,t)},n.__iterateUncached=function(n,i){var o=this;return t.__iterate((function(t,i,s){return!1!==n(e.call(r,t,i,s),i,o)}),i)},n.__iteratorUncached=function(n,i){var o=t.__iterator(z,i);return new Y((function(){var i=o.next();if(i.done)return i;var s=i.value,u=s[0];return B(n,u,e.call(r,s[1],u,t),i)}))},n}function Ke(t,e){var r=wr(t);return r._iter=t,r.size=t.size,r.reverse=function(){return t},t.flip&&(r.flip=function(){var e=Ve(t);return e.reverse=function(){return t.flip()},e}),r.get=function(r,n){return t.get(e?r:-1-r,n)},r.has=function(r){return t.has(e?r:-1-r)},r.includes=function(e){return t.includes(e)},r.cacheResult=Mr,r.__iterate=function(e,r){var n=this;return t.__iterate((function(t,r){return e(t,r,n)}),!r)},r.__iterator=function(e,r){return t.__iterator(e,!r)},r}function tr(t,e,r,n){var i=wr(t);return n&&(i.has=function(n){var i=t.get(n,M);return i!==M&&!!e.call(r,i,n,t)},i.get=function(n,i){var o=t.get(n,M);return o!==M&&e.call(r,o,n,t)?o:i}),i.__iterateUncached=function(i,o){var s=this,u=0;return t.__iterate((function(t,o,a){if(e.call(r,t,o,a))return u++,i(t,n?o:u-1,s)}),o),u},i.__iteratorUncached=function(i,o){var s=t.__iterator(z,o),u=0;return new Y((function(){for(;;){var o=s.next();if(o.done)return o;var a=o.value,c=a[0],f=a[1];if(e.call(r,f,c,t))return B(i,n?c:u++,f,o)}}))},i}function er(t,e,r){var n=Gt().asMutable();return t.__iterate((function(i,o){n.update(e.call(r,i,o,t),0,(function(t){return t+1}))})),n.asImmutable()}function rr(t,e,r){var n=u(t),i=(f(t)?Qe():Gt()).asMutable();t.__iterate((function(o,s){i.update(e.call(r,o,s,t),(function(t){return(t=t||[]).push(n?[s,o]:o),t}))}));var o=vr(t);return i.map((function(e){return dr(t,o(e))}))}function nr(t,e,r,n){var i=t.size;if(void 0!==e&&(e|=0),void 0!==r&&(r===1/0?r=i:r|=0),I(e,r,i))return t;var o=E(e,i),s=A(r,i);if(o!=o||s!=s)return nr(t.toSeq().cacheResult(),e,r,n);var u,a=s-o;a==a&&(u=a<0?0:a);var c=wr(t);return c.size=0===u?u:t.size&&u||void 0,!n&&ot(t)&&u>=0&&(c.get=function(e,r){return(e=S(this,e))>=0&&e<u?t.get(e+o,r):r}),c.__iterateUncached=function(e,r){var i=this;if(0===u)return 0;if(r)return this.cacheResult().__iterate(e,r);var s=0,a=!0,c=0;return t.__iterate((function(t,r){if(!a||!(a=s++<o))return c++,!1!==e(t,n?r:c-1,i)&&c!==u})),c},c.__iteratorUncached=function(e,r){if(0!==u&&r)return this.cacheResult().__iterator(e,r);var i=0!==u&&t.__iterator(e,r),s=0,a=0;return new Y((function(){for(;s++<o;)i.next();if(++a>u)return P();var t=i.next();return n||e===O?t:B(e,a-1,e===T?void 0:t.value[1],t)}))},c}function ir(t,e,r){var n=wr(t);return n.__iterateUncached=function(n,i){var o=this;if(i)return this.cacheResult().__iterate(n,i);var s=0;return t.__iterate((function(t,i,u){return e.call(r,t,i,u)&&++s&&n(t,i,o)})),s},n.__iteratorUncached=function(n,i){var o=this;if(i)return this.cacheResult().__iterator(n,i);var s=t.__iterator(z,i),u=!0;return new Y((function(){if(!u)return P();var t=s.next();if(t.done)return t;var i=t.value,a=i[0],c=i[1];return e.call(r,c,a,o)?n===z?t:B(n,a,c,t):(u=!1,P())}))},n}function or(t,e,r,n){var i=wr(t);return i.__iterateUncached=function(i,o){var s=this;if(o)return this.cacheResult().__iterate(i,o);var u=!0,a=0;return t.__iterate((function(t,o,c){if(!u||!(u=e.call(r,t,o,c)))return a++,i(t,n?o:a-1,s)})),a},i.__iteratorUncached=function(i,o){var s=this;if(o)return this.cacheResult().__iterator(i,o);var u=t.__iterator(z,o),a=!0,c=0;return new Y((function(){var t,o,f;do{if((t=u.next()).done)return n||i===O?t:B(i,c++,i===T?void 0:t.value[1],t);var l=t.value;o=l[0],f=l[1],a&&(a=e.call(r,f,o,s))}while(a);return i===z?t:B(i,o,f,t)}))},i}function sr(t,e){var r=u(t),i=[t].concat(e).map((function(t){return s(t)?r&&(t=n(t)):t=r?ut(t):at(Array.isArray(t)?t:[t]),t})).filter((function(t){return 0!==t.size}));if(0===i.length)return t;if(1===i.length){var o=i[0];if(o===t||r&&u(o)||a(t)&&a(o))return o}var c=new et(i);return r?c=c.toKeyedSeq():a(t)||(c=c.toSetSeq()),(c=c.flatten(!0)).size=i.reduce((function(t,e){if(void 0!==t){var r=e.size;if(void 0!==r)return t+r}}),0),c}function ur(t,e,r){var n=wr(t);return n.__iterateUncached=function(n,i){var o=0,u=!1;function a(t,c){var f=this;t.__iterate((function(t,i){return(!e||c<e)&&s(t)?a(t,c+1):!1===n(t,r?i:o++,f)&&(u=!0),!u}),i)}return a(t,0),o},n.__iteratorUncached=function(n,i){var o=t.__iterator(n,i),u=[],a=0;return new Y((function(){for(;o;){var t=o.next();if(!1===t.done){var c=t.value;if(n===z&&(c=c[1]),e&&!(u.length<e)||!s(c))return r?t:B(n,a++,c,t);u.push(o),o=c.__iterator(n,i)}else o=u.pop()}return P()}))},n}function ar(t,e,r){var n=vr(t);return t.toSeq().map((function(i,o){return n(e.call(r,i,o,t))})).flatten(!0)}function cr(t,e){var r=wr(t);return r.size=t.size&&2*t.size-1,r.__iterateUncached=function(r,n){var i=this,o=0;return t.__iterate((function(t,n){return(!o||!1!==r(e,o++,i))&&!1!==r(t,o++,i)}),n),o},r.__iteratorUncached=function(r,n){var i,o=t.__iterator(O,n),s=0;return new Y((function(){return(!i||s%2)&&(i=o.next()).done?i:s%2?B(r,s++,e):B(r,s++,i.value,i)}))},r}function fr(t,e,r){e||(e=Lr);var n=u(t),i=0,o=t.toSeq().map((function(e,n){return[n,e,i++,r?r(e,n,t):e]})).toArray();return o.sort((function(t,r){return e(t[3],r[3])||t[2]-r[2]})).forEach(n?function(t,e){o[e].length=2}:function(t,e){o[e]=t[1]}),n?J(o):a(t)?$(o):Z(o)}function lr(t,e,r){if(e||(e=Lr),r){var n=t.toSeq().map((function(e,n){return[e,r(e,n,t)]})).reduce((function(t,r){return hr(e,t[1],r[1])?r:t}));return n&&n[0]}return t.reduce((function(t,r){return hr(e,t,r)?r:t}))}function hr(t,e,r){var n=t(r,e);return 0===n&&r!==e&&(null==r||r!=r)||n>0}function pr(t,e,n){var i=wr(t);return i.size=new et(n).map((function(t){return t.size})).min(),i.__iterate=function(t,e){for(var r,n=this.__iterator(O,e),i=0;!(r=n.next()).done&&!1!==t(r.value,i++,this););return i},i.__iteratorUncached=function(t,i){var o=n.map((function(t){return t=r(t),G(i?t.reverse():t)})),s=0,u=!1;return new Y((function(){var r;return u||(r=o.map((function(t){return t.next()})),u=r.some((function(t){return t.done}))),u?P():B(t,s++,e.apply(null,r.map((function(t){return t.value}))))}))},i}function dr(t,e){return ot(t)?e:t.constructor(e)}function yr(t){if(t!==Object(t))throw new TypeError("Expected [K, V] tuple: "+t)}function gr(t){return Ft(t.size),N(t)}function vr(t){return u(t)?n:a(t)?i:o}function wr(t){return Object.create((u(t)?J:a(t)?$:Z).prototype)}function Mr(){return this._iter.cacheResult?(this._iter.cacheResult(),this.size=this._iter.size,this):H.prototype.cacheResult.call(this)}function Lr(t,e){return t>e?1:t<e?-1:0}function _r(t){var e=G(t);if(!e){if(!q(t))throw new TypeError("Expected iterable or array-like: "+t);e=G(r(t))}return e}function mr(t,e){var r,n=function(o){if(o instanceof n)return o;if(!(this instanceof n))return new n(o);if(!r){r=!0;var s=Object.keys(t);Nr(i,s),i.size=s.length,i._name=e,i._keys=s,i._defaultValues=t}this._map=Gt(o)},i=n.prototype=Object.create(br);return i.constructor=n,n}e(Qe,Gt),Qe.of=function(){return this(arguments)},Qe.prototype.toString=function(){return this.__toString("OrderedMap {","}")},Qe.prototype.get=function(t,e){var r=this._map.get(t);return void 0!==r?this._list.get(r)[1]:e},Qe.prototype.clear=function(){return 0===this.size?this:this.__ownerID?(this.size=0,this._map.clear(),this._list.clear(),this):We()},Qe.prototype.set=function(t,e){return qe(this,t,e)},Qe.prototype.remove=function(t){return qe(this,t,M)},Qe.prototype.wasAltered=function(){return this._map.wasAltered()||this._list.wasAltered()},Qe.prototype.__iterate=function(t,e){var r=this;return this._list.__iterate((function(e){return e&&t(e[1],e[0],r)}),e)},Qe.prototype.__iterator=function(t,e){return this._list.fromEntrySeq().__iterator(t,e)},Qe.prototype.__ensureOwner=function(t){if(t===this.__ownerID)return this;var e=this._map.__ensureOwner(t),r=this._list.__ensureOwner(t);return t?Ge(e,r,t,this.__hash):(this.__ownerID=t,this._map=e,this._list=r,this)},Qe.isOrderedMap=Fe,Qe.prototype[d]=!0,Qe.prototype[y]=Qe.prototype.remove,e(He,J),He.prototype.get=function(t,e){return this._iter.get(t,e)},He.prototype.has=function(t){return this._iter.has(t)},He.prototype.valueSeq=function(){return this._iter.valueSeq()},He.prototype.reverse=function(){var t=this,e=Ke(this,!0);return this._useKeys||(e.valueSeq=function(){return t._iter.toSeq().reverse()}),e},He.prototype.map=function(t,e){var r=this,n=Xe(this,t,e);return this._useKeys||(n.valueSeq=function(){return r._iter.toSeq().map(t,e)}),n},He.prototype.__iterate=function(t,e){var r,n=this;return this._iter.__iterate(this._useKeys?function(e,r){return t(e,r,n)}:(r=e?gr(this):0,function(i){return t(i,e?--r:r++,n)}),e)},He.prototype.__iterator=function(t,e){if(this._useKeys)return this._iter.__iterator(t,e);var r=this._iter.__iterator(O,e),n=e?gr(this):0;return new Y((function(){var i=r.next();return i.done?i:B(t,e?--n:n++,i.value,i)}))},He.prototype[d]=!0,e(Je,$),Je.prototype.includes=function(t){return this._iter.includes(t)},Je.prototype.__iterate=function(t,e){var r=this,n=0;return this._iter.__iterate((function(e){return t(e,n++,r)}),e)},Je.prototype.__iterator=function(t,e){var r=this._iter.__iterator(O,e),n=0;return new Y((function(){var e=r.next();return e.done?e:B(t,n++,e.value,e)}))},e($e,Z),$e.prototype.has=function(t){return this._iter.includes(t)},$e.prototype.__iterate=function(t,e){var r=this;return this._iter.__iterate((function(e){return t(e,e,r)}),e)},$e.prototype.__iterator=function(t,e){var r=this._iter.__iterator(O,e);return new Y((function(){var e=r.next();return e.done?e:B(t,e.value,e.value,e)}))},e(Ze,J),Ze.prototype.entrySeq=function(){return this._iter.toSeq()},Ze.prototype.__iterate=function(t,e){var r=this;return this._iter.__iterate((function(e){if(e){yr(e);var n=s(e);return t(n?e.get(1):e[1],n?e.get(0):e[0],r)}}),e)},Ze.prototype.__iterator=function(t,e){var r=this._iter.__iterator(O,e);return new Y((function(){for(;;){var e=r.next();if(e.done)return e;var n=e.value;if(n){yr(n);var i=s(n);return B(t,i?n.get(0):n[0],i?n.get(1):n[1],e)}}}))},Je.prototype.cacheResult=He.prototype.cacheResult=$e.prototype.cacheResult=Ze.prototype.cacheResult=Mr,e(mr,bt),mr.prototype.toString=function(){return this.__toString(jr(this)+" {","}")},mr.prototype.has=function(t){return this._defaultValues.hasOwnProperty(t)},mr.prototype.get=function(t,e){if(!this.has(t))return e;var r=this._defaultValues[t];return this._map?this._map.get(t,r):r},mr.prototype.clear=function(){if(this.__ownerID)return this._map&&this._map.clear(),this;var t=this.constructor;return t._empty||(t._empty=xr(this,ie()))},mr.prototype.set=function(t,e){if(!this.has(t))throw new Error('Cannot set unknown key "'+t+'" on '+jr(this));if(this._map&&!this._map.has(t)&&e===this._defaultValues[t])return this;var r=this._map&&this._map.set(t,e);return this.__ownerID||r===this._map?this:xr(this,r)},mr.prototype.remove=function(t){if(!this.has(t))return this;var e=this._map&&this._map.remove(t);return this.__ownerID||e===this._map?this:xr(this,e)},mr.prototype.wasAltered=function(){return this._map.wasAltered()},mr.prototype.__iterator=function(t,e){var r=this;return n(this._defaultValues).map((function(t,e){return r.get(e)})).__iterator(t,e)},mr.prototype.__iterate=function(t,e){var r=this;return n(this._defaultValues).map((function(t,e){return r.get(e)})).__iterate(t,e)},mr.prototype.__ensureOwner=function(t){if(t===this.__ownerID)return this;var e=this._map&&this._map.__ensureOwner(t);return t?xr(this,e,t):(this.__ownerID=t,this._map=e,this)};var br=mr.prototype;function xr(t,e,r){var n=Object.create(Object.getPrototypeOf(t));return n._map=e,n.__ownerID=r,n}function jr(t){return t._name||t.constructor.name||"Record"}function Nr(t,e){try{e.forEach(Sr.bind(void 0,t))}catch(t){}}function Sr(t,e){Object.defineProperty(t,e,{get:function(){return this.get(e)},set:function(t){Lt(this.__ownerID,"Cannot set on an immutable record."),this.set(e,t)}})}function Dr(t){return null==t?zr():Ir(t)&&!f(t)?t:zr().withMutations((function(e){var r=o(t);Ft(r.size),r.forEach((function(t){return e.add(t)}))}))}function Ir(t){return!(!t||!t[Ar])}br[y]=br.remove,br.deleteIn=br.removeIn=Jt.removeIn,br.merge=Jt.merge,br.mergeWith=Jt.mergeWith,br.mergeIn=Jt.mergeIn,br.mergeDeep=Jt.mergeDeep,br.mergeDeepWith=Jt.mergeDeepWith,br.mergeDeepIn=Jt.mergeDeepIn,br.setIn=Jt.setIn,br.update=Jt.update,br.updateIn=Jt.updateIn,br.withMutations=Jt.withMutations,br.asMutable=Jt.asMutable,br.asImmutable=Jt.asImmutable,e(Dr,jt),Dr.of=function(){return this(arguments)},Dr.fromKeys=function(t){return this(n(t).keySeq())},Dr.prototype.toString=function(){return this.__toString("Set {","}")},Dr.prototype.has=function(t){return this._map.has(t)},Dr.prototype.add=function(t){return Tr(this,this._map.set(t,!0))},Dr.prototype.remove=function(t){return Tr(this,this._map.remove(t))},Dr.prototype.clear=function(){return Tr(this,this._map.clear())},Dr.prototype.union=function(){var e=t.call(arguments,0);return 0===(e=e.filter((function(t){return 0!==t.size}))).length?this:0!==this.size||this.__ownerID||1!==e.length?this.withMutations((function(t){for(var r=0;r<e.length;r++)o(e[r]).forEach((function(e){return t.add(e)}))})):this.constructor(e[0])},Dr.prototype.intersect=function(){var e=t.call(arguments,0);if(0===e.length)return this;e=e.map((function(t){return o(t)}));var r=this;return this.withMutations((function(t){r.forEach((function(r){e.every((function(t){return t.includes(r)}))||t.remove(r)}))}))},Dr.prototype.subtract=function(){var e=t.call(arguments,0);if(0===e.length)return this;e=e.map((function(t){return o(t)}));var r=this;return this.withMutations((function(t){r.forEach((function(r){e.some((function(t){return t.includes(r)}))&&t.remove(r)}))}))},Dr.prototype.merge=function(){return this.union.apply(this,arguments)},Dr.prototype.mergeWith=function(e){var r=t.call(arguments,1);return this.union.apply(this,r)},Dr.prototype.sort=function(t){return kr(fr(this,t))},Dr.prototype.sortBy=function(t,e){return kr(fr(this,e,t))},Dr.prototype.wasAltered=function(){return this._map.wasAltered()},Dr.prototype.__iterate=function(t,e){var r=this;return this._map.__iterate((function(e,n){return t(n,n,r)}),e)},Dr.prototype.__iterator=function(t,e){return this._map.map((function(t,e){return e})).__iterator(t,e)},Dr.prototype.__ensureOwner=function(t){if(t===this.__ownerID)return this;var e=this._map.__ensureOwner(t);return t?this.__make(e,t):(this.__ownerID=t,this._map=e,this)},Dr.isSet=Ir;var Er,Ar="@@__IMMUTABLE_SET__@@",Cr=Dr.prototype;function Tr(t,e){return t.__ownerID?(t.size=e.size,t._map=e,t):e===t._map?t:0===e.size?t.__empty():t.__make(e)}function Or(t,e){var r=Object.create(Cr);return r.size=t?t.size:0,r._map=t,r.__ownerID=e,r}function zr(){return Er||(Er=Or(ie()))}function kr(t){return null==t?Pr():Ur(t)?t:Pr().withMutations((function(e){var r=o(t);Ft(r.size),r.forEach((function(t){return e.add(t)}))}))}function Ur(t){return Ir(t)&&f(t)}Cr[Ar]=!0,Cr[y]=Cr.remove,Cr.mergeDeep=Cr.merge,Cr.mergeDeepWith=Cr.mergeWith,Cr.withMutations=Jt.withMutations,Cr.asMutable=Jt.asMutable,Cr.asImmutable=Jt.asImmutable,Cr.__empty=zr,Cr.__make=Or,e(kr,Dr),kr.of=function(){return this(arguments)},kr.fromKeys=function(t){return this(n(t).keySeq())},kr.prototype.toString=function(){return this.__toString("OrderedSet {","}")},kr.isOrderedSet=Ur;var Rr,Yr=kr.prototype;function Br(t,e){var r=Object.create(Yr);return r.size=t?t.size:0,r._map=t,r.__ownerID=e,r}function Pr(){return Rr||(Rr=Br(We()))}function Qr(t){return null==t?Jr():Fr(t)?t:Jr().unshiftAll(t)}function Fr(t){return!(!t||!t[Wr])}Yr[d]=!0,Yr.__empty=Pr,Yr.__make=Br,e(Qr,xt),Qr.of=function(){return this(arguments)},Qr.prototype.toString=function(){return this.__toString("Stack [","]")},Qr.prototype.get=function(t,e){var r=this._head;for(t=S(this,t);r&&t--;)r=r.next;return r?r.value:e},Qr.prototype.peek=function(){return this._head&&this._head.value},Qr.prototype.push=function(){if(0===arguments.length)return this;for(var t=this.size+arguments.length,e=this._head,r=arguments.length-1;r>=0;r--)e={value:arguments[r],next:e};return this.__ownerID?(this.size=t,this._head=e,this.__hash=void 0,this.__altered=!0,this):Hr(t,e)},Qr.prototype.pushAll=function(t){if(0===(t=i(t)).size)return this;Ft(t.size);var e=this.size,r=this._head;return t.reverse().forEach((function(t){e++,r={value:t,next:r}})),this.__ownerID?(this.size=e,this._head=r,this.__hash=void 0,this.__altered=!0,this):Hr(e,r)},Qr.prototype.pop=function(){return this.slice(1)},Qr.prototype.unshift=function(){return this.push.apply(this,arguments)},Qr.prototype.unshiftAll=function(t){return this.pushAll(t)},Qr.prototype.shift=function(){return this.pop.apply(this,arguments)},Qr.prototype.clear=function(){return 0===this.size?this:this.__ownerID?(this.size=0,this._head=void 0,this.__hash=void 0,this.__altered=!0,this):Jr()},Qr.prototype.slice=function(t,e){if(I(t,e,this.size))return this;var r=E(t,this.size);if(A(e,this.size)!==this.size)return xt.prototype.slice.call(this,t,e);for(var n=this.size-r,i=this._head;r--;)i=i.next;return this.__ownerID?(this.size=n,this._head=i,this.__hash=void 0,this.__altered=!0,this):Hr(n,i)},Qr.prototype.__ensureOwner=function(t){return t===this.__ownerID?this:t?Hr(this.size,this._head,t,this.__hash):(this.__ownerID=t,this.__altered=!1,this)},Qr.prototype.__iterate=function(t,e){if(e)return this.reverse().__iterate(t);for(var r=0,n=this._head;n&&!1!==t(n.value,r++,this);)n=n.next;return r},Qr.prototype.__iterator=function(t,e){if(e)return this.reverse().__iterator(t);var r=0,n=this._head;return new Y((function(){if(n){var e=n.value;return n=n.next,B(t,r++,e)}return P()}))},Qr.isStack=Fr;var Gr,Wr="@@__IMMUTABLE_STACK__@@",qr=Qr.prototype;function Hr(t,e,r,n){var i=Object.create(qr);return i.size=t,i._head=e,i.__ownerID=r,i.__hash=n,i.__altered=!1,i}function Jr(){return Gr||(Gr=Hr(0))}function $r(t,e){var r=function(r){t.prototype[r]=e[r]};return Object.keys(e).forEach(r),Object.getOwnPropertySymbols&&Object.getOwnPropertySymbols(e).forEach(r),t}qr[Wr]=!0,qr.withMutations=Jt.withMutations,qr.asMutable=Jt.asMutable,qr.asImmutable=Jt.asImmutable,qr.wasAltered=Jt.wasAltered,r.Iterator=Y,$r(r,{toArray:function(){Ft(this.size);var t=new Array(this.size||0);return this.valueSeq().__iterate((function(e,r){t[r]=e})),t},toIndexedSeq:function(){return new Je(this)},toJS:function(){return this.toSeq().map((function(t){return t&&"function"==typeof t.toJS?t.toJS():t})).__toJS()},toJSON:function(){return this.toSeq().map((function(t){return t&&"function"==typeof t.toJSON?t.toJSON():t})).__toJS()},toKeyedSeq:function(){return new He(this,!0)},toMap:function(){return Gt(this.toKeyedSeq())},toObject:function(){Ft(this.size);var t={};return this.__iterate((function(e,r){t[r]=e})),t},toOrderedMap:function(){return Qe(this.toKeyedSeq())},toOrderedSet:function(){return kr(u(this)?this.valueSeq():this)},toSet:function(){return Dr(u(this)?this.valueSeq():this)},toSetSeq:function(){return new $e(this)},toSeq:function(){return a(this)?this.toIndexedSeq():u(this)?this.toKeyedSeq():this.toSetSeq()},toStack:function(){return Qr(u(this)?this.valueSeq():this)},toList:function(){return xe(u(this)?this.valueSeq():this)},toString:function(){return"[Iterable]"},__toString:function(t,e){return 0===this.size?t+e:t+" "+this.toSeq().map(this.__toStringMapper).join(", ")+" "+e},concat:function(){return dr(this,sr(this,t.call(arguments,0)))},includes:function(t){return this.some((function(e){return vt(e,t)}))},entries:function(){return this.__iterator(z)},every:function(t,e){Ft(this.size);var r=!0;return this.__iterate((function(n,i,o){if(!t.call(e,n,i,o))return r=!1,!1})),r},filter:function(t,e){return dr(this,tr(this,t,e,!0))},find:function(t,e,r){var n=this.findEntry(t,e);return n?n[1]:r},forEach:function(t,e){return Ft(this.size),this.__iterate(e?t.bind(e):t)},join:function(t){Ft(this.size),t=void 0!==t?""+t:",";var e="",r=!0;return this.__iterate((function(n){r?r=!1:e+=t,e+=null!=n?n.toString():""})),e},keys:function(){return this.__iterator(T)},map:function(t,e){return dr(this,Xe(this,t,e))},reduce:function(t,e,r){var n,i;return Ft(this.size),arguments.length<2?i=!0:n=e,this.__iterate((function(e,o,s){i?(i=!1,n=e):n=t.call(r,n,e,o,s)})),n},reduceRight:function(t,e,r){var n=this.toKeyedSeq().reverse();return n.reduce.apply(n,arguments)},reverse:function(){return dr(this,Ke(this,!0))},slice:function(t,e){return dr(this,nr(this,t,e,!0))},some:function(t,e){return!this.every(tn(t),e)},sort:function(t){return dr(this,fr(this,t))},values:function(){return this.__iterator(O)},butLast:function(){return this.slice(0,-1)},isEmpty:function(){return void 0!==this.size?0===this.size:!this.some((function(){return!0}))},count:function(t,e){return N(t?this.toSeq().filter(t,e):this)},countBy:function(t,e){return er(this,t,e)},equals:function(t){return wt(this,t)},entrySeq:function(){var t=this;if(t._cache)return new et(t._cache);var e=t.toSeq().map(Kr).toIndexedSeq();return e.fromEntrySeq=function(){return t.toSeq()},e},filterNot:function(t,e){return this.filter(tn(t),e)},findEntry:function(t,e,r){var n=r;return this.__iterate((function(r,i,o){if(t.call(e,r,i,o))return n=[i,r],!1})),n},findKey:function(t,e){var r=this.findEntry(t,e);return r&&r[0]},findLast:function(t,e,r){return this.toKeyedSeq().reverse().find(t,e,r)},findLastEntry:function(t,e,r){return this.toKeyedSeq().reverse().findEntry(t,e,r)},findLastKey:function(t,e){return this.toKeyedSeq().reverse().findKey(t,e)},first:function(){return this.find(D)},flatMap:function(t,e){return dr(this,ar(this,t,e))},flatten:function(t){return dr(this,ur(this,t,!0))},fromEntrySeq:function(){return new Ze(this)},get:function(t,e){return this.find((function(e,r){return vt(r,t)}),void 0,e)},getIn:function(t,e){for(var r,n=this,i=_r(t);!(r=i.next()).done;){var o=r.value;if((n=n&&n.get?n.get(o,M):M)===M)return e}return n},groupBy:function(t,e){return rr(this,t,e)},has:function(t){return this.get(t,M)!==M},hasIn:function(t){return this.getIn(t,M)!==M},isSubset:function(t){return t="function"==typeof t.includes?t:r(t),this.every((function(e){return t.includes(e)}))},isSuperset:function(t){return(t="function"==typeof t.isSubset?t:r(t)).isSubset(this)},keyOf:function(t){return this.findKey((function(e){return vt(e,t)}))},keySeq:function(){return this.toSeq().map(Xr).toIndexedSeq()},last:function(){return this.toSeq().reverse().first()},lastKeyOf:function(t){return this.toKeyedSeq().reverse().keyOf(t)},max:function(t){return lr(this,t)},maxBy:function(t,e){return lr(this,e,t)},min:function(t){return lr(this,t?en(t):on)},minBy:function(t,e){return lr(this,e?en(e):on,t)},rest:function(){return this.slice(1)},skip:function(t){return this.slice(Math.max(0,t))},skipLast:function(t){return dr(this,this.toSeq().reverse().skip(t).reverse())},skipWhile:function(t,e){return dr(this,or(this,t,e,!0))},skipUntil:function(t,e){return this.skipWhile(tn(t),e)},sortBy:function(t,e){return dr(this,fr(this,e,t))},take:function(t){return this.slice(0,Math.max(0,t))},takeLast:function(t){return dr(this,this.toSeq().reverse().take(t).reverse())},takeWhile:function(t,e){return dr(this,ir(this,t,e))},takeUntil:function(t,e){return this.takeWhile(tn(t),e)},valueSeq:function(){return this.toIndexedSeq()},hashCode:function(){return this.__hash||(this.__hash=sn(this))}});var Zr=r.prototype;Zr[l]=!0,Zr[R]=Zr.values,Zr.__toJS=Zr.toArray,Zr.__toStringMapper=rn,Zr.inspect=Zr.toSource=function(){return this.toString()},Zr.chain=Zr.flatMap,Zr.contains=Zr.includes,$r(n,{flip:function(){return dr(this,Ve(this))},mapEntries:function(t,e){var r=this,n=0;return dr(this,this.toSeq().map((function(i,o){return t.call(e,[o,i],n++,r)})).fromEntrySeq())},mapKeys:function(t,e){var r=this;return dr(this,this.toSeq().flip().map((function(n,i){return t.call(e,n,i,r)})).flip())}});var Vr=n.prototype;function Xr(t,e){return e}function Kr(t,e){return[e,t]}function tn(t){return function(){return!t.apply(this,arguments)}}function en(t){return function(){return-t.apply(this,arguments)}}function rn(t){return"string"==typeof t?JSON.stringify(t):String(t)}function nn(){return j(arguments)}function on(t,e){return t<e?1:t>e?-1:0}function sn(t){if(t.size===1/0)return 0;var e=f(t),r=u(t),n=e?1:0;return un(t.__iterate(r?e?function(t,e){n=31*n+an(Dt(t),Dt(e))|0}:function(t,e){n=n+an(Dt(t),Dt(e))|0}:e?function(t){n=31*n+Dt(t)|0}:function(t){n=n+Dt(t)|0}),n)}function un(t,e){return e=Nt(e,3432918353),e=Nt(e<<15|e>>>-15,461845907),e=Nt(e<<13|e>>>-13,5),e=Nt((e=(e+3864292196|0)^t)^e>>>16,2246822507),e=St((e=Nt(e^e>>>13,3266489909))^e>>>16)}function an(t,e){return t^e+2654435769+(t<<6)+(t>>2)|0}return Vr[h]=!0,Vr[R]=Zr.entries,Vr.__toJS=Zr.toObject,Vr.__toStringMapper=function(t,e){return JSON.stringify(e)+": "+rn(t)},$r(i,{toKeyedSeq:function(){return new He(this,!1)},filter:function(t,e){return dr(this,tr(this,t,e,!1))},findIndex:function(t,e){var r=this.findEntry(t,e);return r?r[0]:-1},indexOf:function(t){var e=this.keyOf(t);return void 0===e?-1:e},lastIndexOf:function(t){var e=this.lastKeyOf(t);return void 0===e?-1:e},reverse:function(){return dr(this,Ke(this,!1))},slice:function(t,e){return dr(this,nr(this,t,e,!1))},splice:function(t,e){var r=arguments.length;if(e=Math.max(0|e,0),0===r||2===r&&!e)return this;t=E(t,t<0?this.count():this.size);var n=this.slice(0,t);return dr(this,1===r?n:n.concat(j(arguments,2),this.slice(t+e)))},findLastIndex:function(t,e){var r=this.findLastEntry(t,e);return r?r[0]:-1},first:function(){return this.get(0)},flatten:function(t){return dr(this,ur(this,t,!1))},get:function(t,e){return(t=S(this,t))<0||this.size===1/0||void 0!==this.size&&t>this.size?e:this.find((function(e,r){return r===t}),void 0,e)},has:function(t){return(t=S(this,t))>=0&&(void 0!==this.size?this.size===1/0||t<this.size:-1!==this.indexOf(t))},interpose:function(t){return dr(this,cr(this,t))},interleave:function(){var t=[this].concat(j(arguments)),e=pr(this.toSeq(),$.of,t),r=e.flatten(!0);return e.size&&(r.size=e.size*t.length),dr(this,r)},keySeq:function(){return _t(0,this.size)},last:function(){return this.get(-1)},skipWhile:function(t,e){return dr(this,or(this,t,e,!1))},zip:function(){return dr(this,pr(this,nn,[this].concat(j(arguments))))},zipWith:function(t){var e=j(arguments);return e[0]=this,dr(this,pr(this,t,e))}}),i.prototype[p]=!0,i.prototype[d]=!0,$r(o,{get:function(t,e){return this.has(t)?t:e},includes:function(t){return this.has(t)},keySeq:function(){return this.valueSeq()}}),o.prototype.has=Zr.includes,o.prototype.contains=o.prototype.includes,$r(J,n.prototype),$r($,i.prototype),$r(Z,o.prototype),$r(bt,n.prototype),$r(xt,i.prototype),$r(jt,o.prototype),{Iterable:r,Seq:H,Collection:mt,Map:Gt,OrderedMap:Qe,List:xe,Stack:Qr,Set:Dr,OrderedSet:kr,Record:mr,Range:_t,Repeat:Mt,is:vt,fromJS:pt}}()},35717:t=>{"function"==typeof Object.create?t.exports=function(t,e){e&&(t.super_=e,t.prototype=Object.create(e.prototype,{constructor:{value:t,enumerable:!1,writable:!0,configurable:!0}}))}:t.exports=function(t,e){if(e){t.super_=e;var r=function(){};r.prototype=e.prototype,t.prototype=new r,t.prototype.constructor=t}}},18552:(t,e,r)=>{var n=r(10852)(r(55639),"DataView");t.exports=n},1989:(t,e,r)=>{var n=r(51789),i=r(80401),o=r(57667),s=r(21327),u=r(81866);function a(t){var e=-1,r=null==t?0:t.length;for(this.clear();++e<r;){var n=t[e];this.set(n[0],n[1])}}a.prototype.clear=n,a.prototype.delete=i,a.prototype.get=o,a.prototype.has=s,a.prototype.set=u,t.exports=a},38407:(t,e,r)=>{var n=r(27040),i=r(14125),o=r(82117),s=r(67518),u=r(54705);function a(t){var e=-1,r=null==t?0:t.length;for(this.clear();++e<r;){var n=t[e];this.set(n[0],n[1])}}a.prototype.clear=n,a.prototype.delete=i,a.prototype.get=o,a.prototype.has=s,a.prototype.set=u,t.exports=a},57071:(t,e,r)=>{var n=r(10852)(r(55639),"Map");t.exports=n},83369:(t,e,r)=>{var n=r(24785),i=r(11285),o=r(96e3),s=r(49916),u=r(95265);function a(t){var e=-1,r=null==t?0:t.length;for(this.clear();++e<r;){var n=t[e];this.set(n[0],n[1])}}a.prototype.clear=n,a.prototype.delete=i,a.prototype.get=o,a.prototype.has=s,a.prototype.set=u,t.exports=a},53818:(t,e,r)=>{var n=r(10852)(r(55639),"Promise");t.exports=n},58525:(t,e,r)=>{var n=r(10852)(r(55639),"Set");t.exports=n},88668:(t,e,r)=>{var n=r(83369),i=r(90619),o=r(72385);function s(t){var e=-1,r=null==t?0:t.length;for(this.__data__=new n;++e<r;)this.add(t[e])}s.prototype.add=s.prototype.push=i,s.prototype.has=o,t.exports=s},46384:(t,e,r)=>{var n=r(38407),i=r(37465),o=r(63779),s=r(67599),u=r(44758),a=r(34309);function c(t){var e=this.__data__=new n(t);this.size=e.size}c.prototype.clear=i,c.prototype.delete=o,c.prototype.get=s,c.prototype.has=u,c.prototype.set=a,t.exports=c},62705:(t,e,r)=>{var n=r(55639).Symbol;t.exports=n},11149:(t,e,r)=>{var n=r(55639).Uint8Array;t.exports=n},70577:(t,e,r)=>{var n=r(10852)(r(55639),"WeakMap");t.exports=n},34963:t=>{t.exports=function(t,e){for(var r=-1,n=null==t?0:t.length,i=0,o=[];++r<n;){var s=t[r];e(s,r,t)&&(o[i++]=s)}return o}},14636:(t,e,r)=>{var n=r(22545),i=r(35694),o=r(1469),s=r(44144),u=r(65776),a=r(36719),c=Object.prototype.hasOwnProperty;t.exports=function(t,e){var r=o(t),f=!r&&i(t),l=!r&&!f&&s(t),h=!r&&!f&&!l&&a(t),p=r||f||l||h,d=p?n(t.length,String):[],y=d.length;for(var g in t)!e&&!c.call(t,g)||p&&("length"==g||l&&("offset"==g||"parent"==g)||h&&("buffer"==g||"byteLength"==g||"byteOffset"==g)||u(g,y))||d.push(g);return d}},29932:t=>{t.exports=function(t,e){for(var r=-1,n=null==t?0:t.length,i=Array(n);++r<n;)i[r]=e(t[r],r,t);return i}},62488:t=>{t.exports=function(t,e){for(var r=-1,n=e.length,i=t.length;++r<n;)t[i+r]=e[r];return t}},62663:t=>{t.exports=function(t,e,r,n){var i=-1,o=null==t?0:t.length;for(n&&o&&(r=t[++i]);++i<o;)r=e(r,t[i],i,t);return r}},82908:t=>{t.exports=function(t,e){for(var r=-1,n=null==t?0:t.length;++r<n;)if(e(t[r],r,t))return!0;return!1}},44286:t=>{t.exports=function(t){return t.split("")}},49029:t=>{var e=/[^\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f]+/g;t.exports=function(t){return t.match(e)||[]}},34865:(t,e,r)=>{var n=r(89465),i=r(77813),o=Object.prototype.hasOwnProperty;t.exports=function(t,e,r){var s=t[e];o.call(t,e)&&i(s,r)&&(void 0!==r||e in t)||n(t,e,r)}},18470:(t,e,r)=>{var n=r(77813);t.exports=function(t,e){for(var r=t.length;r--;)if(n(t[r][0],e))return r;return-1}},89465:(t,e,r)=>{var n=r(38777);t.exports=function(t,e,r){"__proto__"==e&&n?n(t,e,{configurable:!0,enumerable:!0,value:r,writable:!0}):t[e]=r}},89881:(t,e,r)=>{var n=r(47816),i=r(99291)(n);t.exports=i},41848:t=>{t.exports=function(t,e,r,n){for(var i=t.length,o=r+(n?1:-1);n?o--:++o<i;)if(e(t[o],o,t))return o;return-1}},28483:(t,e,r)=>{var n=r(25063)();t.exports=n},47816:(t,e,r)=>{var n=r(28483),i=r(3674);t.exports=function(t,e){return t&&n(t,e,i)}},97786:(t,e,r)=>{var n=r(71811),i=r(40327);t.exports=function(t,e){for(var r=0,o=(e=n(e,t)).length;null!=t&&r<o;)t=t[i(e[r++])];return r&&r==o?t:void 0}},68866:(t,e,r)=>{var n=r(62488),i=r(1469);t.exports=function(t,e,r){var o=e(t);return i(t)?o:n(o,r(t))}},44239:(t,e,r)=>{var n=r(62705),i=r(89607),o=r(2333),s="[object Null]",u="[object Undefined]",a=n?n.toStringTag:void 0;t.exports=function(t){return null==t?void 0===t?u:s:a&&a in Object(t)?i(t):o(t)}},13:t=>{t.exports=function(t,e){return null!=t&&e in Object(t)}},9454:(t,e,r)=>{var n=r(44239),i=r(37005),o="[object Arguments]";t.exports=function(t){return i(t)&&n(t)==o}},90939:(t,e,r)=>{var n=r(2492),i=r(37005);t.exports=function t(e,r,o,s,u){return e===r||(null==e||null==r||!i(e)&&!i(r)?e!=e&&r!=r:n(e,r,o,s,t,u))}},2492:(t,e,r)=>{var n=r(46384),i=r(67114),o=r(18351),s=r(16096),u=r(98882),a=r(1469),c=r(44144),f=r(36719),l=1,h="[object Arguments]",p="[object Array]",d="[object Object]",y=Object.prototype.hasOwnProperty;t.exports=function(t,e,r,g,v,w){var M=a(t),L=a(e),_=M?p:u(t),m=L?p:u(e),b=(_=_==h?d:_)==d,x=(m=m==h?d:m)==d,j=_==m;if(j&&c(t)){if(!c(e))return!1;M=!0,b=!1}if(j&&!b)return w||(w=new n),M||f(t)?i(t,e,r,g,v,w):o(t,e,_,r,g,v,w);if(!(r&l)){var N=b&&y.call(t,"__wrapped__"),S=x&&y.call(e,"__wrapped__");if(N||S){var D=N?t.value():t,I=S?e.value():e;return w||(w=new n),v(D,I,r,g,w)}}return!!j&&(w||(w=new n),s(t,e,r,g,v,w))}},2958:(t,e,r)=>{var n=r(46384),i=r(90939),o=1,s=2;t.exports=function(t,e,r,u){var a=r.length,c=a,f=!u;if(null==t)return!c;for(t=Object(t);a--;){var l=r[a];if(f&&l[2]?l[1]!==t[l[0]]:!(l[0]in t))return!1}for(;++a<c;){var h=(l=r[a])[0],p=t[h],d=l[1];if(f&&l[2]){if(void 0===p&&!(h in t))return!1}else{var y=new n;if(u)var g=u(p,d,h,t,e,y);if(!(void 0===g?i(d,p,o|s,u,y):g))return!1}}return!0}},28458:(t,e,r)=>{var n=r(23560),i=r(15346),o=r(13218),s=r(80346),u=/^\[object .+?Constructor\]$/,a=Function.prototype,c=Object.prototype,f=a.toString,l=c.hasOwnProperty,h=RegExp("^"+f.call(l).replace(/[\\^$.*+?()[\]{}|]/g,"\\$&").replace(/hasOwnProperty|(function).*?(?=\\\()| for .+?(?=\\\])/g,"$1.*?")+"$");t.exports=function(t){return!(!o(t)||i(t))&&(n(t)?h:u).test(s(t))}},38749:(t,e,r)=>{var n=r(44239),i=r(41780),o=r(37005),s={};s["[object Float32Array]"]=s["[object Float64Array]"]=s["[object Int8Array]"]=s["[object Int16Array]"]=s["[object Int32Array]"]=s["[object Uint8Array]"]=s["[object Uint8ClampedArray]"]=s["[object Uint16Array]"]=s["[object Uint32Array]"]=!0,s["[object Arguments]"]=s["[object Array]"]=s["[object ArrayBuffer]"]=s["[object Boolean]"]=s["[object DataView]"]=s["[object Date]"]=s["[object Error]"]=s["[object Function]"]=s["[object Map]"]=s["[object Number]"]=s["[object Object]"]=s["[object RegExp]"]=s["[object Set]"]=s["[object String]"]=s["[object WeakMap]"]=!1,t.exports=function(t){return o(t)&&i(t.length)&&!!s[n(t)]}},67206:(t,e,r)=>{var n=r(91573),i=r(16432),o=r(6557),s=r(1469),u=r(39601);t.exports=function(t){return"function"==typeof t?t:null==t?o:"object"==typeof t?s(t)?i(t[0],t[1]):n(t):u(t)}},280:(t,e,r)=>{var n=r(25726),i=r(86916),o=Object.prototype.hasOwnProperty;t.exports=function(t){if(!n(t))return i(t);var e=[];for(var r in Object(t))o.call(t,r)&&"constructor"!=r&&e.push(r);return e}},91573:(t,e,r)=>{var n=r(2958),i=r(1499),o=r(42634);t.exports=function(t){var e=i(t);return 1==e.length&&e[0][2]?o(e[0][0],e[0][1]):function(r){return r===t||n(r,t,e)}}},16432:(t,e,r)=>{var n=r(90939),i=r(27361),o=r(79095),s=r(15403),u=r(89162),a=r(42634),c=r(40327),f=1,l=2;t.exports=function(t,e){return s(t)&&u(e)?a(c(t),e):function(r){var s=i(r,t);return void 0===s&&s===e?o(r,t):n(e,s,f|l)}}},40371:t=>{t.exports=function(t){return function(e){return null==e?void 0:e[t]}}},79152:(t,e,r)=>{var n=r(97786);t.exports=function(t){return function(e){return n(e,t)}}},18674:t=>{t.exports=function(t){return function(e){return null==t?void 0:t[e]}}},14259:t=>{t.exports=function(t,e,r){var n=-1,i=t.length;e<0&&(e=-e>i?0:i+e),(r=r>i?i:r)<0&&(r+=i),i=e>r?0:r-e>>>0,e>>>=0;for(var o=Array(i);++n<i;)o[n]=t[n+e];return o}},5076:(t,e,r)=>{var n=r(89881);t.exports=function(t,e){var r;return n(t,(function(t,n,i){return!(r=e(t,n,i))})),!!r}},22545:t=>{t.exports=function(t,e){for(var r=-1,n=Array(t);++r<t;)n[r]=e(r);return n}},80531:(t,e,r)=>{var n=r(62705),i=r(29932),o=r(1469),s=r(33448),u=1/0,a=n?n.prototype:void 0,c=a?a.toString:void 0;t.exports=function t(e){if("string"==typeof e)return e;if(o(e))return i(e,t)+"";if(s(e))return c?c.call(e):"";var r=e+"";return"0"==r&&1/e==-u?"-0":r}},27561:(t,e,r)=>{var n=r(67990),i=/^\s+/;t.exports=function(t){return t?t.slice(0,n(t)+1).replace(i,""):t}},7518:t=>{t.exports=function(t){return function(e){return t(e)}}},1757:t=>{t.exports=function(t,e,r){for(var n=-1,i=t.length,o=e.length,s={};++n<i;){var u=n<o?e[n]:void 0;r(s,t[n],u)}return s}},74757:t=>{t.exports=function(t,e){return t.has(e)}},71811:(t,e,r)=>{var n=r(1469),i=r(15403),o=r(55514),s=r(79833);t.exports=function(t,e){return n(t)?t:i(t,e)?[t]:o(s(t))}},40180:(t,e,r)=>{var n=r(14259);t.exports=function(t,e,r){var i=t.length;return r=void 0===r?i:r,!e&&r>=i?t:n(t,e,r)}},14429:(t,e,r)=>{var n=r(55639)["__core-js_shared__"];t.exports=n},99291:(t,e,r)=>{var n=r(98612);t.exports=function(t,e){return function(r,i){if(null==r)return r;if(!n(r))return t(r,i);for(var o=r.length,s=e?o:-1,u=Object(r);(e?s--:++s<o)&&!1!==i(u[s],s,u););return r}}},25063:t=>{t.exports=function(t){return function(e,r,n){for(var i=-1,o=Object(e),s=n(e),u=s.length;u--;){var a=s[t?u:++i];if(!1===r(o[a],a,o))break}return e}}},98805:(t,e,r)=>{var n=r(40180),i=r(62689),o=r(83140),s=r(79833);t.exports=function(t){return function(e){e=s(e);var r=i(e)?o(e):void 0,u=r?r[0]:e.charAt(0),a=r?n(r,1).join(""):e.slice(1);return u[t]()+a}}},35393:(t,e,r)=>{var n=r(62663),i=r(53816),o=r(58748),s=RegExp("['’]","g");t.exports=function(t){return function(e){return n(o(i(e).replace(s,"")),t,"")}}},67740:(t,e,r)=>{var n=r(67206),i=r(98612),o=r(3674);t.exports=function(t){return function(e,r,s){var u=Object(e);if(!i(e)){var a=n(r,3);e=o(e),r=function(t){return a(u[t],t,u)}}var c=t(e,r,s);return c>-1?u[a?e[c]:c]:void 0}}},69389:(t,e,r)=>{var n=r(18674)({À:"A",Á:"A",Â:"A",Ã:"A",Ä:"A",Å:"A",à:"a",á:"a",â:"a",ã:"a",ä:"a",å:"a",Ç:"C",ç:"c",Ð:"D",ð:"d",È:"E",É:"E",Ê:"E",Ë:"E",è:"e",é:"e",ê:"e",ë:"e",Ì:"I",Í:"I",Î:"I",Ï:"I",ì:"i",í:"i",î:"i",ï:"i",Ñ:"N",ñ:"n",Ò:"O",Ó:"O",Ô:"O",Õ:"O",Ö:"O",Ø:"O",ò:"o",ó:"o",ô:"o",õ:"o",ö:"o",ø:"o",Ù:"U",Ú:"U",Û:"U",Ü:"U",ù:"u",ú:"u",û:"u",ü:"u",Ý:"Y",ý:"y",ÿ:"y",Æ:"Ae",æ:"ae",Þ:"Th",þ:"th",ß:"ss",Ā:"A",Ă:"A",Ą:"A",ā:"a",ă:"a",ą:"a",Ć:"C",Ĉ:"C",Ċ:"C",Č:"C",ć:"c",ĉ:"c",ċ:"c",č:"c",Ď:"D",Đ:"D",ď:"d",đ:"d",Ē:"E",Ĕ:"E",Ė:"E",Ę:"E",Ě:"E",ē:"e",ĕ:"e",ė:"e",ę:"e",ě:"e",Ĝ:"G",Ğ:"G",Ġ:"G",Ģ:"G",ĝ:"g",ğ:"g",ġ:"g",ģ:"g",Ĥ:"H",Ħ:"H",ĥ:"h",ħ:"h",Ĩ:"I",Ī:"I",Ĭ:"I",Į:"I",İ:"I",ĩ:"i",ī:"i",ĭ:"i",į:"i",ı:"i",Ĵ:"J",ĵ:"j",Ķ:"K",ķ:"k",ĸ:"k",Ĺ:"L",Ļ:"L",Ľ:"L",Ŀ:"L",Ł:"L",ĺ:"l",ļ:"l",ľ:"l",ŀ:"l",ł:"l",Ń:"N",Ņ:"N",Ň:"N",Ŋ:"N",ń:"n",ņ:"n",ň:"n",ŋ:"n",Ō:"O",Ŏ:"O",Ő:"O",ō:"o",ŏ:"o",ő:"o",Ŕ:"R",Ŗ:"R",Ř:"R",ŕ:"r",ŗ:"r",ř:"r",Ś:"S",Ŝ:"S",Ş:"S",Š:"S",ś:"s",ŝ:"s",ş:"s",š:"s",Ţ:"T",Ť:"T",Ŧ:"T",ţ:"t",ť:"t",ŧ:"t",Ũ:"U",Ū:"U",Ŭ:"U",Ů:"U",Ű:"U",Ų:"U",ũ:"u",ū:"u",ŭ:"u",ů:"u",ű:"u",ų:"u",Ŵ:"W",ŵ:"w",Ŷ:"Y",ŷ:"y",Ÿ:"Y",Ź:"Z",Ż:"Z",Ž:"Z",ź:"z",ż:"z",ž:"z",Ĳ:"IJ",ĳ:"ij",Œ:"Oe",œ:"oe",ŉ:"'n",ſ:"s"});t.exports=n},38777:(t,e,r)=>{var n=r(10852),i=function(){try{var t=n(Object,"defineProperty");return t({},"",{}),t}catch(t){}}();t.exports=i},67114:(t,e,r)=>{var n=r(88668),i=r(82908),o=r(74757),s=1,u=2;t.exports=function(t,e,r,a,c,f){var l=r&s,h=t.length,p=e.length;if(h!=p&&!(l&&p>h))return!1;var d=f.get(t),y=f.get(e);if(d&&y)return d==e&&y==t;var g=-1,v=!0,w=r&u?new n:void 0;for(f.set(t,e),f.set(e,t);++g<h;){var M=t[g],L=e[g];if(a)var _=l?a(L,M,g,e,t,f):a(M,L,g,t,e,f);if(void 0!==_){if(_)continue;v=!1;break}if(w){if(!i(e,(function(t,e){if(!o(w,e)&&(M===t||c(M,t,r,a,f)))return w.push(e)}))){v=!1;break}}else if(M!==L&&!c(M,L,r,a,f)){v=!1;break}}return f.delete(t),f.delete(e),v}},18351:(t,e,r)=>{var n=r(62705),i=r(11149),o=r(77813),s=r(67114),u=r(68776),a=r(21814),c=1,f=2,l="[object Boolean]",h="[object Date]",p="[object Error]",d="[object Map]",y="[object Number]",g="[object RegExp]",v="[object Set]",w="[object String]",M="[object Symbol]",L="[object ArrayBuffer]",_="[object DataView]",m=n?n.prototype:void 0,b=m?m.valueOf:void 0;t.exports=function(t,e,r,n,m,x,j){switch(r){case _:if(t.byteLength!=e.byteLength||t.byteOffset!=e.byteOffset)return!1;t=t.buffer,e=e.buffer;case L:return!(t.byteLength!=e.byteLength||!x(new i(t),new i(e)));case l:case h:case y:return o(+t,+e);case p:return t.name==e.name&&t.message==e.message;case g:case w:return t==e+"";case d:var N=u;case v:var S=n&c;if(N||(N=a),t.size!=e.size&&!S)return!1;var D=j.get(t);if(D)return D==e;n|=f,j.set(t,e);var I=s(N(t),N(e),n,m,x,j);return j.delete(t),I;case M:if(b)return b.call(t)==b.call(e)}return!1}},16096:(t,e,r)=>{var n=r(58234),i=1,o=Object.prototype.hasOwnProperty;t.exports=function(t,e,r,s,u,a){var c=r&i,f=n(t),l=f.length;if(l!=n(e).length&&!c)return!1;for(var h=l;h--;){var p=f[h];if(!(c?p in e:o.call(e,p)))return!1}var d=a.get(t),y=a.get(e);if(d&&y)return d==e&&y==t;var g=!0;a.set(t,e),a.set(e,t);for(var v=c;++h<l;){var w=t[p=f[h]],M=e[p];if(s)var L=c?s(M,w,p,e,t,a):s(w,M,p,t,e,a);if(!(void 0===L?w===M||u(w,M,r,s,a):L)){g=!1;break}v||(v="constructor"==p)}if(g&&!v){var _=t.constructor,m=e.constructor;_==m||!("constructor"in t)||!("constructor"in e)||"function"==typeof _&&_ instanceof _&&"function"==typeof m&&m instanceof m||(g=!1)}return a.delete(t),a.delete(e),g}},31957:(t,e,r)=>{var n="object"==typeof r.g&&r.g&&r.g.Object===Object&&r.g;t.exports=n},58234:(t,e,r)=>{var n=r(68866),i=r(99551),o=r(3674);t.exports=function(t){return n(t,o,i)}},45050:(t,e,r)=>{var n=r(37019);t.exports=function(t,e){var r=t.__data__;return n(e)?r["string"==typeof e?"string":"hash"]:r.map}},1499:(t,e,r)=>{var n=r(89162),i=r(3674);t.exports=function(t){for(var e=i(t),r=e.length;r--;){var o=e[r],s=t[o];e[r]=[o,s,n(s)]}return e}},10852:(t,e,r)=>{var n=r(28458),i=r(47801);t.exports=function(t,e){var r=i(t,e);return n(r)?r:void 0}},89607:(t,e,r)=>{var n=r(62705),i=Object.prototype,o=i.hasOwnProperty,s=i.toString,u=n?n.toStringTag:void 0;t.exports=function(t){var e=o.call(t,u),r=t[u];try{t[u]=void 0;var n=!0}catch(t){}var i=s.call(t);return n&&(e?t[u]=r:delete t[u]),i}},99551:(t,e,r)=>{var n=r(34963),i=r(70479),o=Object.prototype.propertyIsEnumerable,s=Object.getOwnPropertySymbols,u=s?function(t){return null==t?[]:(t=Object(t),n(s(t),(function(e){return o.call(t,e)})))}:i;t.exports=u},98882:(t,e,r)=>{var n=r(18552),i=r(57071),o=r(53818),s=r(58525),u=r(70577),a=r(44239),c=r(80346),f="[object Map]",l="[object Promise]",h="[object Set]",p="[object WeakMap]",d="[object DataView]",y=c(n),g=c(i),v=c(o),w=c(s),M=c(u),L=a;(n&&L(new n(new ArrayBuffer(1)))!=d||i&&L(new i)!=f||o&&L(o.resolve())!=l||s&&L(new s)!=h||u&&L(new u)!=p)&&(L=function(t){var e=a(t),r="[object Object]"==e?t.constructor:void 0,n=r?c(r):"";if(n)switch(n){case y:return d;case g:return f;case v:return l;case w:return h;case M:return p}return e}),t.exports=L},47801:t=>{t.exports=function(t,e){return null==t?void 0:t[e]}},222:(t,e,r)=>{var n=r(71811),i=r(35694),o=r(1469),s=r(65776),u=r(41780),a=r(40327);t.exports=function(t,e,r){for(var c=-1,f=(e=n(e,t)).length,l=!1;++c<f;){var h=a(e[c]);if(!(l=null!=t&&r(t,h)))break;t=t[h]}return l||++c!=f?l:!!(f=null==t?0:t.length)&&u(f)&&s(h,f)&&(o(t)||i(t))}},62689:t=>{var e=RegExp("[\\u200d\\ud800-\\udfff\\u0300-\\u036f\\ufe20-\\ufe2f\\u20d0-\\u20ff\\ufe0e\\ufe0f]");t.exports=function(t){return e.test(t)}},93157:t=>{var e=/[a-z][A-Z]|[A-Z]{2}[a-z]|[0-9][a-zA-Z]|[a-zA-Z][0-9]|[^a-zA-Z0-9 ]/;t.exports=function(t){return e.test(t)}},51789:(t,e,r)=>{var n=r(94536);t.exports=function(){this.__data__=n?n(null):{},this.size=0}},80401:t=>{t.exports=function(t){var e=this.has(t)&&delete this.__data__[t];return this.size-=e?1:0,e}},57667:(t,e,r)=>{var n=r(94536),i="__lodash_hash_undefined__",o=Object.prototype.hasOwnProperty;t.exports=function(t){var e=this.__data__;if(n){var r=e[t];return r===i?void 0:r}return o.call(e,t)?e[t]:void 0}},21327:(t,e,r)=>{var n=r(94536),i=Object.prototype.hasOwnProperty;t.exports=function(t){var e=this.__data__;return n?void 0!==e[t]:i.call(e,t)}},81866:(t,e,r)=>{var n=r(94536),i="__lodash_hash_undefined__";t.exports=function(t,e){var r=this.__data__;return this.size+=this.has(t)?0:1,r[t]=n&&void 0===e?i:e,this}},65776:t=>{var e=9007199254740991,r=/^(?:0|[1-9]\d*)$/;t.exports=function(t,n){var i=typeof t;return!!(n=null==n?e:n)&&("number"==i||"symbol"!=i&&r.test(t))&&t>-1&&t%1==0&&t<n}},16612:(t,e,r)=>{var n=r(77813),i=r(98612),o=r(65776),s=r(13218);t.exports=function(t,e,r){if(!s(r))return!1;var u=typeof e;return!!("number"==u?i(r)&&o(e,r.length):"string"==u&&e in r)&&n(r[e],t)}},15403:(t,e,r)=>{var n=r(1469),i=r(33448),o=/\.|\[(?:[^[\]]*|(["'])(?:(?!\1)[^\\]|\\.)*?\1)\]/,s=/^\w*$/;t.exports=function(t,e){if(n(t))return!1;var r=typeof t;return!("number"!=r&&"symbol"!=r&&"boolean"!=r&&null!=t&&!i(t))||(s.test(t)||!o.test(t)||null!=e&&t in Object(e))}},37019:t=>{t.exports=function(t){var e=typeof t;return"string"==e||"number"==e||"symbol"==e||"boolean"==e?"__proto__"!==t:null===t}},15346:(t,e,r)=>{var n,i=r(14429),o=(n=/[^.]+$/.exec(i&&i.keys&&i.keys.IE_PROTO||""))?"Symbol(src)_1."+n:"";t.exports=function(t){return!!o&&o in t}},25726:t=>{var e=Object.prototype;t.exports=function(t){var r=t&&t.constructor;return t===("function"==typeof r&&r.prototype||e)}},89162:(t,e,r)=>{var n=r(13218);t.exports=function(t){return t==t&&!n(t)}},27040:t=>{t.exports=function(){this.__data__=[],this.size=0}},14125:(t,e,r)=>{var n=r(18470),i=Array.prototype.splice;t.exports=function(t){var e=this.__data__,r=n(e,t);return!(r<0)&&(r==e.length-1?e.pop():i.call(e,r,1),--this.size,!0)}},82117:(t,e,r)=>{var n=r(18470);t.exports=function(t){var e=this.__data__,r=n(e,t);return r<0?void 0:e[r][1]}},67518:(t,e,r)=>{var n=r(18470);t.exports=function(t){return n(this.__data__,t)>-1}},54705:(t,e,r)=>{var n=r(18470);t.exports=function(t,e){var r=this.__data__,i=n(r,t);return i<0?(++this.size,r.push([t,e])):r[i][1]=e,this}},24785:(t,e,r)=>{var n=r(1989),i=r(38407),o=r(57071);t.exports=function(){this.size=0,this.__data__={hash:new n,map:new(o||i),string:new n}}},11285:(t,e,r)=>{var n=r(45050);t.exports=function(t){var e=n(this,t).delete(t);return this.size-=e?1:0,e}},96e3:(t,e,r)=>{var n=r(45050);t.exports=function(t){return n(this,t).get(t)}},49916:(t,e,r)=>{var n=r(45050);t.exports=function(t){return n(this,t).has(t)}},95265:(t,e,r)=>{var n=r(45050);t.exports=function(t,e){var r=n(this,t),i=r.size;return r.set(t,e),this.size+=r.size==i?0:1,this}},68776:t=>{t.exports=function(t){var e=-1,r=Array(t.size);return t.forEach((function(t,n){r[++e]=[n,t]})),r}},42634:t=>{t.exports=function(t,e){return function(r){return null!=r&&(r[t]===e&&(void 0!==e||t in Object(r)))}}},24523:(t,e,r)=>{var n=r(88306),i=500;t.exports=function(t){var e=n(t,(function(t){return r.size===i&&r.clear(),t})),r=e.cache;return e}},94536:(t,e,r)=>{var n=r(10852)(Object,"create");t.exports=n},86916:(t,e,r)=>{var n=r(5569)(Object.keys,Object);t.exports=n},31167:(t,e,r)=>{t=r.nmd(t);var n=r(31957),i=e&&!e.nodeType&&e,o=i&&t&&!t.nodeType&&t,s=o&&o.exports===i&&n.process,u=function(){try{var t=o&&o.require&&o.require("util").types;return t||s&&s.binding&&s.binding("util")}catch(t){}}();t.exports=u},2333:t=>{var e=Object.prototype.toString;t.exports=function(t){return e.call(t)}},5569:t=>{t.exports=function(t,e){return function(r){return t(e(r))}}},55639:(t,e,r)=>{var n=r(31957),i="object"==typeof self&&self&&self.Object===Object&&self,o=n||i||Function("return this")();t.exports=o},90619:t=>{var e="__lodash_hash_undefined__";t.exports=function(t){return this.__data__.set(t,e),this}},72385:t=>{t.exports=function(t){return this.__data__.has(t)}},21814:t=>{t.exports=function(t){var e=-1,r=Array(t.size);return t.forEach((function(t){r[++e]=t})),r}},37465:(t,e,r)=>{var n=r(38407);t.exports=function(){this.__data__=new n,this.size=0}},63779:t=>{t.exports=function(t){var e=this.__data__,r=e.delete(t);return this.size=e.size,r}},67599:t=>{t.exports=function(t){return this.__data__.get(t)}},44758:t=>{t.exports=function(t){return this.__data__.has(t)}},34309:(t,e,r)=>{var n=r(38407),i=r(57071),o=r(83369),s=200;t.exports=function(t,e){var r=this.__data__;if(r instanceof n){var u=r.__data__;if(!i||u.length<s-1)return u.push([t,e]),this.size=++r.size,this;r=this.__data__=new o(u)}return r.set(t,e),this.size=r.size,this}},83140:(t,e,r)=>{var n=r(44286),i=r(62689),o=r(676);t.exports=function(t){return i(t)?o(t):n(t)}},55514:(t,e,r)=>{var n=r(24523),i=/[^.[\]]+|\[(?:(-?\d+(?:\.\d+)?)|(["'])((?:(?!\2)[^\\]|\\.)*?)\2)\]|(?=(?:\.|\[\])(?:\.|\[\]|$))/g,o=/\\(\\)?/g,s=n((function(t){var e=[];return 46===t.charCodeAt(0)&&e.push(""),t.replace(i,(function(t,r,n,i){e.push(n?i.replace(o,"$1"):r||t)})),e}));t.exports=s},40327:(t,e,r)=>{var n=r(33448),i=1/0;t.exports=function(t){if("string"==typeof t||n(t))return t;var e=t+"";return"0"==e&&1/t==-i?"-0":e}},80346:t=>{var e=Function.prototype.toString;t.exports=function(t){if(null!=t){try{return e.call(t)}catch(t){}try{return t+""}catch(t){}}return""}},67990:t=>{var e=/\s/;t.exports=function(t){for(var r=t.length;r--&&e.test(t.charAt(r)););return r}},676:t=>{var e="\\ud800-\\udfff",r="["+e+"]",n="[\\u0300-\\u036f\\ufe20-\\ufe2f\\u20d0-\\u20ff]",i="\\ud83c[\\udffb-\\udfff]",o="[^"+e+"]",s="(?:\\ud83c[\\udde6-\\uddff]){2}",u="[\\ud800-\\udbff][\\udc00-\\udfff]",a="(?:"+n+"|"+i+")"+"?",c="[\\ufe0e\\ufe0f]?",f=c+a+("(?:\\u200d(?:"+[o,s,u].join("|")+")"+c+a+")*"),l="(?:"+[o+n+"?",n,s,u,r].join("|")+")",h=RegExp(i+"(?="+i+")|"+l+f,"g");t.exports=function(t){return t.match(h)||[]}},2757:t=>{var e="\\ud800-\\udfff",r="\\u2700-\\u27bf",n="a-z\\xdf-\\xf6\\xf8-\\xff",i="A-Z\\xc0-\\xd6\\xd8-\\xde",o="\\xac\\xb1\\xd7\\xf7\\x00-\\x2f\\x3a-\\x40\\x5b-\\x60\\x7b-\\xbf\\u2000-\\u206f \\t\\x0b\\f\\xa0\\ufeff\\n\\r\\u2028\\u2029\\u1680\\u180e\\u2000\\u2001\\u2002\\u2003\\u2004\\u2005\\u2006\\u2007\\u2008\\u2009\\u200a\\u202f\\u205f\\u3000",s="["+o+"]",u="\\d+",a="["+r+"]",c="["+n+"]",f="[^"+e+o+u+r+n+i+"]",l="(?:\\ud83c[\\udde6-\\uddff]){2}",h="[\\ud800-\\udbff][\\udc00-\\udfff]",p="["+i+"]",d="(?:"+c+"|"+f+")",y="(?:"+p+"|"+f+")",g="(?:['’](?:d|ll|m|re|s|t|ve))?",v="(?:['’](?:D|LL|M|RE|S|T|VE))?",w="(?:[\\u0300-\\u036f\\ufe20-\\ufe2f\\u20d0-\\u20ff]|\\ud83c[\\udffb-\\udfff])?",M="[\\ufe0e\\ufe0f]?",L=M+w+("(?:\\u200d(?:"+["[^"+e+"]",l,h].join("|")+")"+M+w+")*"),_="(?:"+[a,l,h].join("|")+")"+L,m=RegExp([p+"?"+c+"+"+g+"(?="+[s,p,"$"].join("|")+")",y+"+"+v+"(?="+[s,p+d,"$"].join("|")+")",p+"?"+d+"+"+g,p+"+"+v,"\\d*(?:1ST|2ND|3RD|(?![123])\\dTH)(?=\\b|[a-z_])","\\d*(?:1st|2nd|3rd|(?![123])\\dth)(?=\\b|[A-Z_])",u,_].join("|"),"g");t.exports=function(t){return t.match(m)||[]}},68929:(t,e,r)=>{var n=r(48403),i=r(35393)((function(t,e,r){return e=e.toLowerCase(),t+(r?n(e):e)}));t.exports=i},48403:(t,e,r)=>{var n=r(79833),i=r(11700);t.exports=function(t){return i(n(t).toLowerCase())}},53816:(t,e,r)=>{var n=r(69389),i=r(79833),o=/[\xc0-\xd6\xd8-\xf6\xf8-\xff\u0100-\u017f]/g,s=RegExp("[\\u0300-\\u036f\\ufe20-\\ufe2f\\u20d0-\\u20ff]","g");t.exports=function(t){return(t=i(t))&&t.replace(o,n).replace(s,"")}},77813:t=>{t.exports=function(t,e){return t===e||t!=t&&e!=e}},13311:(t,e,r)=>{var n=r(67740)(r(30998));t.exports=n},30998:(t,e,r)=>{var n=r(41848),i=r(67206),o=r(40554),s=Math.max;t.exports=function(t,e,r){var u=null==t?0:t.length;if(!u)return-1;var a=null==r?0:o(r);return a<0&&(a=s(u+a,0)),n(t,i(e,3),a)}},27361:(t,e,r)=>{var n=r(97786);t.exports=function(t,e,r){var i=null==t?void 0:n(t,e);return void 0===i?r:i}},79095:(t,e,r)=>{var n=r(13),i=r(222);t.exports=function(t,e){return null!=t&&i(t,e,n)}},6557:t=>{t.exports=function(t){return t}},35694:(t,e,r)=>{var n=r(9454),i=r(37005),o=Object.prototype,s=o.hasOwnProperty,u=o.propertyIsEnumerable,a=n(function(){return arguments}())?n:function(t){return i(t)&&s.call(t,"callee")&&!u.call(t,"callee")};t.exports=a},1469:t=>{var e=Array.isArray;t.exports=e},98612:(t,e,r)=>{var n=r(23560),i=r(41780);t.exports=function(t){return null!=t&&i(t.length)&&!n(t)}},44144:(t,e,r)=>{t=r.nmd(t);var n=r(55639),i=r(95062),o=e&&!e.nodeType&&e,s=o&&t&&!t.nodeType&&t,u=s&&s.exports===o?n.Buffer:void 0,a=(u?u.isBuffer:void 0)||i;t.exports=a},41609:(t,e,r)=>{var n=r(280),i=r(98882),o=r(35694),s=r(1469),u=r(98612),a=r(44144),c=r(25726),f=r(36719),l="[object Map]",h="[object Set]",p=Object.prototype.hasOwnProperty;t.exports=function(t){if(null==t)return!0;if(u(t)&&(s(t)||"string"==typeof t||"function"==typeof t.splice||a(t)||f(t)||o(t)))return!t.length;var e=i(t);if(e==l||e==h)return!t.size;if(c(t))return!n(t).length;for(var r in t)if(p.call(t,r))return!1;return!0}},23560:(t,e,r)=>{var n=r(44239),i=r(13218),o="[object AsyncFunction]",s="[object Function]",u="[object GeneratorFunction]",a="[object Proxy]";t.exports=function(t){if(!i(t))return!1;var e=n(t);return e==s||e==u||e==o||e==a}},41780:t=>{var e=9007199254740991;t.exports=function(t){return"number"==typeof t&&t>-1&&t%1==0&&t<=e}},13218:t=>{t.exports=function(t){var e=typeof t;return null!=t&&("object"==e||"function"==e)}},37005:t=>{t.exports=function(t){return null!=t&&"object"==typeof t}},33448:(t,e,r)=>{var n=r(44239),i=r(37005),o="[object Symbol]";t.exports=function(t){return"symbol"==typeof t||i(t)&&n(t)==o}},36719:(t,e,r)=>{var n=r(38749),i=r(7518),o=r(31167),s=o&&o.isTypedArray,u=s?i(s):n;t.exports=u},3674:(t,e,r)=>{var n=r(14636),i=r(280),o=r(98612);t.exports=function(t){return o(t)?n(t):i(t)}},88306:(t,e,r)=>{var n=r(83369),i="Expected a function";function o(t,e){if("function"!=typeof t||null!=e&&"function"!=typeof e)throw new TypeError(i);var r=function(){var n=arguments,i=e?e.apply(this,n):n[0],o=r.cache;if(o.has(i))return o.get(i);var s=t.apply(this,n);return r.cache=o.set(i,s)||o,s};return r.cache=new(o.Cache||n),r}o.Cache=n,t.exports=o},39601:(t,e,r)=>{var n=r(40371),i=r(79152),o=r(15403),s=r(40327);t.exports=function(t){return o(t)?n(s(t)):i(t)}},59704:(t,e,r)=>{var n=r(82908),i=r(67206),o=r(5076),s=r(1469),u=r(16612);t.exports=function(t,e,r){var a=s(t)?n:o;return r&&u(t,e,r)&&(e=void 0),a(t,i(e,3))}},70479:t=>{t.exports=function(){return[]}},95062:t=>{t.exports=function(){return!1}},18601:(t,e,r)=>{var n=r(14841),i=1/0,o=17976931348623157e292;t.exports=function(t){return t?(t=n(t))===i||t===-i?(t<0?-1:1)*o:t==t?t:0:0===t?t:0}},40554:(t,e,r)=>{var n=r(18601);t.exports=function(t){var e=n(t),r=e%1;return e==e?r?e-r:e:0}},14841:(t,e,r)=>{var n=r(27561),i=r(13218),o=r(33448),s=NaN,u=/^[-+]0x[0-9a-f]+$/i,a=/^0b[01]+$/i,c=/^0o[0-7]+$/i,f=parseInt;t.exports=function(t){if("number"==typeof t)return t;if(o(t))return s;if(i(t)){var e="function"==typeof t.valueOf?t.valueOf():t;t=i(e)?e+"":e}if("string"!=typeof t)return 0===t?t:+t;t=n(t);var r=a.test(t);return r||c.test(t)?f(t.slice(2),r?2:8):u.test(t)?s:+t}},79833:(t,e,r)=>{var n=r(80531);t.exports=function(t){return null==t?"":n(t)}},11700:(t,e,r)=>{var n=r(98805)("toUpperCase");t.exports=n},58748:(t,e,r)=>{var n=r(49029),i=r(93157),o=r(79833),s=r(2757);t.exports=function(t,e,r){return t=o(t),void 0===(e=r?void 0:e)?i(t)?s(t):n(t):t.match(e)||[]}},7287:(t,e,r)=>{var n=r(34865),i=r(1757);t.exports=function(t,e){return i(t||[],e||[],n)}},27418:t=>{"use strict";var e=Object.getOwnPropertySymbols,r=Object.prototype.hasOwnProperty,n=Object.prototype.propertyIsEnumerable;t.exports=function(){try{if(!Object.assign)return!1;var t=new String("abc");if(t[5]="de","5"===Object.getOwnPropertyNames(t)[0])return!1;for(var e={},r=0;r<10;r++)e["_"+String.fromCharCode(r)]=r;if("0123456789"!==Object.getOwnPropertyNames(e).map((function(t){return e[t]})).join(""))return!1;var n={};return"abcdefghijklmnopqrst".split("").forEach((function(t){n[t]=t})),"abcdefghijklmnopqrst"===Object.keys(Object.assign({},n)).join("")}catch(t){return!1}}()?Object.assign:function(t,i){for(var o,s,u=function(t){if(null==t)throw new TypeError("Object.assign cannot be called with null or undefined");return Object(t)}(t),a=1;a<arguments.length;a++){for(var c in o=Object(arguments[a]))r.call(o,c)&&(u[c]=o[c]);if(e){s=e(o);for(var f=0;f<s.length;f++)n.call(o,s[f])&&(u[s[f]]=o[s[f]])}}return u}},34155:t=>{var e,r,n=t.exports={};function i(){throw new Error("setTimeout has not been defined")}function o(){throw new Error("clearTimeout has not been defined")}function s(t){if(e===setTimeout)return setTimeout(t,0);if((e===i||!e)&&setTimeout)return e=setTimeout,setTimeout(t,0);try{return e(t,0)}catch(r){try{return e.call(null,t,0)}catch(r){return e.call(this,t,0)}}}!function(){try{e="function"==typeof setTimeout?setTimeout:i}catch(t){e=i}try{r="function"==typeof clearTimeout?clearTimeout:o}catch(t){r=o}}();var u,a=[],c=!1,f=-1;function l(){c&&u&&(c=!1,u.length?a=u.concat(a):f=-1,a.length&&h())}function h(){if(!c){var t=s(l);c=!0;for(var e=a.length;e;){for(u=a,a=[];++f<e;)u&&u[f].run();f=-1,e=a.length}u=null,c=!1,function(t){if(r===clearTimeout)return clearTimeout(t);if((r===o||!r)&&clearTimeout)return r=clearTimeout,clearTimeout(t);try{return r(t)}catch(e){try{return r.call(null,t)}catch(e){return r.call(this,t)}}}(t)}}function p(t,e){this.fun=t,this.array=e}function d(){}n.nextTick=function(t){var e=new Array(arguments.length-1);if(arguments.length>1)for(var r=1;r<arguments.length;r++)e[r-1]=arguments[r];a.push(new p(t,e)),1!==a.length||c||s(h)},p.prototype.run=function(){this.fun.apply(null,this.array)},n.title="browser",n.browser=!0,n.env={},n.argv=[],n.version="",n.versions={},n.on=d,n.addListener=d,n.once=d,n.off=d,n.removeListener=d,n.removeAllListeners=d,n.emit=d,n.prependListener=d,n.prependOnceListener=d,n.listeners=function(t){return[]},n.binding=function(t){throw new Error("process.binding is not supported")},n.cwd=function(){return"/"},n.chdir=function(t){throw new Error("process.chdir is not supported")},n.umask=function(){return 0}},14419:(t,e,r)=>{const n=r(60697),i=r(69450),o=n.types;t.exports=class t{constructor(t,e){if(this._setDefaults(t),t instanceof RegExp)this.ignoreCase=t.ignoreCase,this.multiline=t.multiline,t=t.source;else{if("string"!=typeof t)throw new Error("Expected a regexp or string");this.ignoreCase=e&&-1!==e.indexOf("i"),this.multiline=e&&-1!==e.indexOf("m")}this.tokens=n(t)}_setDefaults(e){this.max=null!=e.max?e.max:null!=t.prototype.max?t.prototype.max:100,this.defaultRange=e.defaultRange?e.defaultRange:this.defaultRange.clone(),e.randInt&&(this.randInt=e.randInt)}gen(){return this._gen(this.tokens,[])}_gen(t,e){var r,n,i,s,u;switch(t.type){case o.ROOT:case o.GROUP:if(t.followedBy||t.notFollowedBy)return"";for(t.remember&&void 0===t.groupNumber&&(t.groupNumber=e.push(null)-1),n="",s=0,u=(r=t.options?this._randSelect(t.options):t.stack).length;s<u;s++)n+=this._gen(r[s],e);return t.remember&&(e[t.groupNumber]=n),n;case o.POSITION:return"";case o.SET:var a=this._expand(t);return a.length?String.fromCharCode(this._randSelect(a)):"";case o.REPETITION:for(i=this.randInt(t.min,t.max===1/0?t.min+this.max:t.max),n="",s=0;s<i;s++)n+=this._gen(t.value,e);return n;case o.REFERENCE:return e[t.value-1]||"";case o.CHAR:var c=this.ignoreCase&&this._randBool()?this._toOtherCase(t.value):t.value;return String.fromCharCode(c)}}_toOtherCase(t){return t+(97<=t&&t<=122?-32:65<=t&&t<=90?32:0)}_randBool(){return!this.randInt(0,1)}_randSelect(t){return t instanceof i?t.index(this.randInt(0,t.length-1)):t[this.randInt(0,t.length-1)]}_expand(t){if(t.type===n.types.CHAR)return new i(t.value);if(t.type===n.types.RANGE)return new i(t.from,t.to);{let e=new i;for(let r=0;r<t.set.length;r++){let n=this._expand(t.set[r]);if(e.add(n),this.ignoreCase)for(let t=0;t<n.length;t++){let r=n.index(t),i=this._toOtherCase(r);r!==i&&e.add(i)}}return t.not?this.defaultRange.clone().subtract(e):this.defaultRange.clone().intersect(e)}}randInt(t,e){return t+Math.floor(Math.random()*(1+e-t))}get defaultRange(){return this._range=this._range||new i(32,126)}set defaultRange(t){this._range=t}static randexp(e,r){var n;return"string"==typeof e&&(e=new RegExp(e,r)),void 0===e._randexp?(n=new t(e,r),e._randexp=n):(n=e._randexp)._setDefaults(e),n.gen()}static sugar(){RegExp.prototype.gen=function(){return t.randexp(this)}}}},92282:(t,e,r)=>{"use strict";var n=r(34155),i=65536,o=4294967295;var s=r(89509).Buffer,u=r.g.crypto||r.g.msCrypto;u&&u.getRandomValues?t.exports=function(t,e){if(t>o)throw new RangeError("requested too many random bytes");var r=s.allocUnsafe(t);if(t>0)if(t>i)for(var a=0;a<t;a+=i)u.getRandomValues(r.slice(a,a+i));else u.getRandomValues(r);if("function"==typeof e)return n.nextTick((function(){e(null,r)}));return r}:t.exports=function(){throw new Error("Secure random number generation is not supported by this browser.\nUse Chrome, Firefox or Internet Explorer 11")}},72408:(t,e,r)=>{"use strict";var n=r(27418),i=60103,o=60106;e.Fragment=60107,e.StrictMode=60108,e.Profiler=60114;var s=60109,u=60110,a=60112;e.Suspense=60113;var c=60115,f=60116;if("function"==typeof Symbol&&Symbol.for){var l=Symbol.for;i=l("react.element"),o=l("react.portal"),e.Fragment=l("react.fragment"),e.StrictMode=l("react.strict_mode"),e.Profiler=l("react.profiler"),s=l("react.provider"),u=l("react.context"),a=l("react.forward_ref"),e.Suspense=l("react.suspense"),c=l("react.memo"),f=l("react.lazy")}var h="function"==typeof Symbol&&Symbol.iterator;function p(t){for(var e="https://reactjs.org/docs/error-decoder.html?invariant="+t,r=1;r<arguments.length;r++)e+="&args[]="+encodeURIComponent(arguments[r]);return"Minified React error #"+t+"; visit "+e+" for the full message or use the non-minified dev environment for full errors and additional helpful warnings."}var d={isMounted:function(){return!1},enqueueForceUpdate:function(){},enqueueReplaceState:function(){},enqueueSetState:function(){}},y={};function g(t,e,r){this.props=t,this.context=e,this.refs=y,this.updater=r||d}function v(){}function w(t,e,r){this.props=t,this.context=e,this.refs=y,this.updater=r||d}g.prototype.isReactComponent={},g.prototype.setState=function(t,e){if("object"!=typeof t&&"function"!=typeof t&&null!=t)throw Error(p(85));this.updater.enqueueSetState(this,t,e,"setState")},g.prototype.forceUpdate=function(t){this.updater.enqueueForceUpdate(this,t,"forceUpdate")},v.prototype=g.prototype;var M=w.prototype=new v;M.constructor=w,n(M,g.prototype),M.isPureReactComponent=!0;var L={current:null},_=Object.prototype.hasOwnProperty,m={key:!0,ref:!0,__self:!0,__source:!0};function b(t,e,r){var n,o={},s=null,u=null;if(null!=e)for(n in void 0!==e.ref&&(u=e.ref),void 0!==e.key&&(s=""+e.key),e)_.call(e,n)&&!m.hasOwnProperty(n)&&(o[n]=e[n]);var a=arguments.length-2;if(1===a)o.children=r;else if(1<a){for(var c=Array(a),f=0;f<a;f++)c[f]=arguments[f+2];o.children=c}if(t&&t.defaultProps)for(n in a=t.defaultProps)void 0===o[n]&&(o[n]=a[n]);return{$$typeof:i,type:t,key:s,ref:u,props:o,_owner:L.current}}function x(t){return"object"==typeof t&&null!==t&&t.$$typeof===i}var j=/\/+/g;function N(t,e){return"object"==typeof t&&null!==t&&null!=t.key?function(t){var e={"=":"=0",":":"=2"};return"$"+t.replace(/[=:]/g,(function(t){return e[t]}))}(""+t.key):e.toString(36)}function S(t,e,r,n,s){var u=typeof t;"undefined"!==u&&"boolean"!==u||(t=null);var a=!1;if(null===t)a=!0;else switch(u){case"string":case"number":a=!0;break;case"object":switch(t.$$typeof){case i:case o:a=!0}}if(a)return s=s(a=t),t=""===n?"."+N(a,0):n,Array.isArray(s)?(r="",null!=t&&(r=t.replace(j,"$&/")+"/"),S(s,e,r,"",(function(t){return t}))):null!=s&&(x(s)&&(s=function(t,e){return{$$typeof:i,type:t.type,key:e,ref:t.ref,props:t.props,_owner:t._owner}}(s,r+(!s.key||a&&a.key===s.key?"":(""+s.key).replace(j,"$&/")+"/")+t)),e.push(s)),1;if(a=0,n=""===n?".":n+":",Array.isArray(t))for(var c=0;c<t.length;c++){var f=n+N(u=t[c],c);a+=S(u,e,r,f,s)}else if(f=function(t){return null===t||"object"!=typeof t?null:"function"==typeof(t=h&&t[h]||t["@@iterator"])?t:null}(t),"function"==typeof f)for(t=f.call(t),c=0;!(u=t.next()).done;)a+=S(u=u.value,e,r,f=n+N(u,c++),s);else if("object"===u)throw e=""+t,Error(p(31,"[object Object]"===e?"object with keys {"+Object.keys(t).join(", ")+"}":e));return a}function D(t,e,r){if(null==t)return t;var n=[],i=0;return S(t,n,"","",(function(t){return e.call(r,t,i++)})),n}function I(t){if(-1===t._status){var e=t._result;e=e(),t._status=0,t._result=e,e.then((function(e){0===t._status&&(e=e.default,t._status=1,t._result=e)}),(function(e){0===t._status&&(t._status=2,t._result=e)}))}if(1===t._status)return t._result;throw t._result}var E={current:null};function A(){var t=E.current;if(null===t)throw Error(p(321));return t}var C={ReactCurrentDispatcher:E,ReactCurrentBatchConfig:{transition:0},ReactCurrentOwner:L,IsSomeRendererActing:{current:!1},assign:n};e.Children={map:D,forEach:function(t,e,r){D(t,(function(){e.apply(this,arguments)}),r)},count:function(t){var e=0;return D(t,(function(){e++})),e},toArray:function(t){return D(t,(function(t){return t}))||[]},only:function(t){if(!x(t))throw Error(p(143));return t}},e.Component=g,e.PureComponent=w,e.__SECRET_INTERNALS_DO_NOT_USE_OR_YOU_WILL_BE_FIRED=C,e.cloneElement=function(t,e,r){if(null==t)throw Error(p(267,t));var o=n({},t.props),s=t.key,u=t.ref,a=t._owner;if(null!=e){if(void 0!==e.ref&&(u=e.ref,a=L.current),void 0!==e.key&&(s=""+e.key),t.type&&t.type.defaultProps)var c=t.type.defaultProps;for(f in e)_.call(e,f)&&!m.hasOwnProperty(f)&&(o[f]=void 0===e[f]&&void 0!==c?c[f]:e[f])}var f=arguments.length-2;if(1===f)o.children=r;else if(1<f){c=Array(f);for(var l=0;l<f;l++)c[l]=arguments[l+2];o.children=c}return{$$typeof:i,type:t.type,key:s,ref:u,props:o,_owner:a}},e.createContext=function(t,e){return void 0===e&&(e=null),(t={$$typeof:u,_calculateChangedBits:e,_currentValue:t,_currentValue2:t,_threadCount:0,Provider:null,Consumer:null}).Provider={$$typeof:s,_context:t},t.Consumer=t},e.createElement=b,e.createFactory=function(t){var e=b.bind(null,t);return e.type=t,e},e.createRef=function(){return{current:null}},e.forwardRef=function(t){return{$$typeof:a,render:t}},e.isValidElement=x,e.lazy=function(t){return{$$typeof:f,_payload:{_status:-1,_result:t},_init:I}},e.memo=function(t,e){return{$$typeof:c,type:t,compare:void 0===e?null:e}},e.useCallback=function(t,e){return A().useCallback(t,e)},e.useContext=function(t,e){return A().useContext(t,e)},e.useDebugValue=function(){},e.useEffect=function(t,e){return A().useEffect(t,e)},e.useImperativeHandle=function(t,e,r){return A().useImperativeHandle(t,e,r)},e.useLayoutEffect=function(t,e){return A().useLayoutEffect(t,e)},e.useMemo=function(t,e){return A().useMemo(t,e)},e.useReducer=function(t,e,r){return A().useReducer(t,e,r)},e.useRef=function(t){return A().useRef(t)},e.useState=function(t){return A().useState(t)},e.version="17.0.2"},67294:(t,e,r)=>{"use strict";t.exports=r(72408)},94281:t=>{"use strict";var e={};function r(t,r,n){n||(n=Error);var i=function(t){var e,n;function i(e,n,i){return t.call(this,function(t,e,n){return"string"==typeof r?r:r(t,e,n)}(e,n,i))||this}return n=t,(e=i).prototype=Object.create(n.prototype),e.prototype.constructor=e,e.__proto__=n,i}(n);i.prototype.name=n.name,i.prototype.code=t,e[t]=i}function n(t,e){if(Array.isArray(t)){var r=t.length;return t=t.map((function(t){return String(t)})),r>2?"one of ".concat(e," ").concat(t.slice(0,r-1).join(", "),", or ")+t[r-1]:2===r?"one of ".concat(e," ").concat(t[0]," or ").concat(t[1]):"of ".concat(e," ").concat(t[0])}return"of ".concat(e," ").concat(String(t))}r("ERR_INVALID_OPT_VALUE",(function(t,e){return'The value "'+e+'" is invalid for option "'+t+'"'}),TypeError),r("ERR_INVALID_ARG_TYPE",(function(t,e,r){var i,o,s,u;if("string"==typeof e&&(o="not ",e.substr(!s||s<0?0:+s,o.length)===o)?(i="must not be",e=e.replace(/^not /,"")):i="must be",function(t,e,r){return(void 0===r||r>t.length)&&(r=t.length),t.substring(r-e.length,r)===e}(t," argument"))u="The ".concat(t," ").concat(i," ").concat(n(e,"type"));else{var a=function(t,e,r){return"number"!=typeof r&&(r=0),!(r+e.length>t.length)&&-1!==t.indexOf(e,r)}(t,".")?"property":"argument";u='The "'.concat(t,'" ').concat(a," ").concat(i," ").concat(n(e,"type"))}return u+=". Received type ".concat(typeof r)}),TypeError),r("ERR_STREAM_PUSH_AFTER_EOF","stream.push() after EOF"),r("ERR_METHOD_NOT_IMPLEMENTED",(function(t){return"The "+t+" method is not implemented"})),r("ERR_STREAM_PREMATURE_CLOSE","Premature close"),r("ERR_STREAM_DESTROYED",(function(t){return"Cannot call "+t+" after a stream was destroyed"})),r("ERR_MULTIPLE_CALLBACK","Callback called multiple times"),r("ERR_STREAM_CANNOT_PIPE","Cannot pipe, not readable"),r("ERR_STREAM_WRITE_AFTER_END","write after end"),r("ERR_STREAM_NULL_VALUES","May not write null values to stream",TypeError),r("ERR_UNKNOWN_ENCODING",(function(t){return"Unknown encoding: "+t}),TypeError),r("ERR_STREAM_UNSHIFT_AFTER_END_EVENT","stream.unshift() after end event"),t.exports.q=e},56753:(t,e,r)=>{"use strict";var n=r(34155),i=Object.keys||function(t){var e=[];for(var r in t)e.push(r);return e};t.exports=a;const o=r(79481),s=r(64229);r(35717)(a,o);{const t=i(s.prototype);for(var u=0;u<t.length;u++){const e=t[u];a.prototype[e]||(a.prototype[e]=s.prototype[e])}}function a(t){if(!(this instanceof a))return new a(t);o.call(this,t),s.call(this,t),this.allowHalfOpen=!0,t&&(!1===t.readable&&(this.readable=!1),!1===t.writable&&(this.writable=!1),!1===t.allowHalfOpen&&(this.allowHalfOpen=!1,this.once("end",c)))}function c(){this._writableState.ended||n.nextTick(f,this)}function f(t){t.end()}Object.defineProperty(a.prototype,"writableHighWaterMark",{enumerable:!1,get(){return this._writableState.highWaterMark}}),Object.defineProperty(a.prototype,"writableBuffer",{enumerable:!1,get:function(){return this._writableState&&this._writableState.getBuffer()}}),Object.defineProperty(a.prototype,"writableLength",{enumerable:!1,get(){return this._writableState.length}}),Object.defineProperty(a.prototype,"destroyed",{enumerable:!1,get(){return void 0!==this._readableState&&void 0!==this._writableState&&(this._readableState.destroyed&&this._writableState.destroyed)},set(t){void 0!==this._readableState&&void 0!==this._writableState&&(this._readableState.destroyed=t,this._writableState.destroyed=t)}})},82725:(t,e,r)=>{"use strict";t.exports=i;const n=r(74605);function i(t){if(!(this instanceof i))return new i(t);n.call(this,t)}r(35717)(i,n),i.prototype._transform=function(t,e,r){r(null,t)}},79481:(t,e,r)=>{"use strict";var n,i=r(34155);t.exports=j,j.ReadableState=x;r(17187).EventEmitter;var o=function(t,e){return t.listeners(e).length},s=r(22503);const u=r(48764).Buffer,a=(void 0!==r.g?r.g:"undefined"!=typeof window?window:"undefined"!=typeof self?self:{}).Uint8Array||function(){};const c=r(94616);let f;f=c&&c.debuglog?c.debuglog("stream"):function(){};const l=r(57327),h=r(61195),p=r(82457).getHighWaterMark,d=r(94281).q,y=d.ERR_INVALID_ARG_TYPE,g=d.ERR_STREAM_PUSH_AFTER_EOF,v=d.ERR_METHOD_NOT_IMPLEMENTED,w=d.ERR_STREAM_UNSHIFT_AFTER_END_EVENT;let M,L,_;r(35717)(j,s);const m=h.errorOrDestroy,b=["error","close","destroy","pause","resume"];function x(t,e,i){n=n||r(56753),t=t||{},"boolean"!=typeof i&&(i=e instanceof n),this.objectMode=!!t.objectMode,i&&(this.objectMode=this.objectMode||!!t.readableObjectMode),this.highWaterMark=p(this,t,"readableHighWaterMark",i),this.buffer=new l,this.length=0,this.pipes=null,this.pipesCount=0,this.flowing=null,this.ended=!1,this.endEmitted=!1,this.reading=!1,this.sync=!0,this.needReadable=!1,this.emittedReadable=!1,this.readableListening=!1,this.resumeScheduled=!1,this.paused=!0,this.emitClose=!1!==t.emitClose,this.autoDestroy=!!t.autoDestroy,this.destroyed=!1,this.defaultEncoding=t.defaultEncoding||"utf8",this.awaitDrain=0,this.readingMore=!1,this.decoder=null,this.encoding=null,t.encoding&&(M||(M=r(32553).s),this.decoder=new M(t.encoding),this.encoding=t.encoding)}function j(t){if(n=n||r(56753),!(this instanceof j))return new j(t);const e=this instanceof n;this._readableState=new x(t,this,e),this.readable=!0,t&&("function"==typeof t.read&&(this._read=t.read),"function"==typeof t.destroy&&(this._destroy=t.destroy)),s.call(this)}function N(t,e,r,n,i){f("readableAddChunk",e);var o,s=t._readableState;if(null===e)s.reading=!1,function(t,e){if(f("onEofChunk"),e.ended)return;if(e.decoder){var r=e.decoder.end();r&&r.length&&(e.buffer.push(r),e.length+=e.objectMode?1:r.length)}e.ended=!0,e.sync?E(t):(e.needReadable=!1,e.emittedReadable||(e.emittedReadable=!0,A(t)))}(t,s);else if(i||(o=function(t,e){var r;n=e,u.isBuffer(n)||n instanceof a||"string"==typeof e||void 0===e||t.objectMode||(r=new y("chunk",["string","Buffer","Uint8Array"],e));var n;return r}(s,e)),o)m(t,o);else if(s.objectMode||e&&e.length>0)if("string"==typeof e||s.objectMode||Object.getPrototypeOf(e)===u.prototype||(e=function(t){return u.from(t)}(e)),n)s.endEmitted?m(t,new w):S(t,s,e,!0);else if(s.ended)m(t,new g);else{if(s.destroyed)return!1;s.reading=!1,s.decoder&&!r?(e=s.decoder.write(e),s.objectMode||0!==e.length?S(t,s,e,!1):C(t,s)):S(t,s,e,!1)}else n||(s.reading=!1,C(t,s));return!s.ended&&(s.length<s.highWaterMark||0===s.length)}function S(t,e,r,n){e.flowing&&0===e.length&&!e.sync?(e.awaitDrain=0,t.emit("data",r)):(e.length+=e.objectMode?1:r.length,n?e.buffer.unshift(r):e.buffer.push(r),e.needReadable&&E(t)),C(t,e)}Object.defineProperty(j.prototype,"destroyed",{enumerable:!1,get(){return void 0!==this._readableState&&this._readableState.destroyed},set(t){this._readableState&&(this._readableState.destroyed=t)}}),j.prototype.destroy=h.destroy,j.prototype._undestroy=h.undestroy,j.prototype._destroy=function(t,e){e(t)},j.prototype.push=function(t,e){var r,n=this._readableState;return n.objectMode?r=!0:"string"==typeof t&&((e=e||n.defaultEncoding)!==n.encoding&&(t=u.from(t,e),e=""),r=!0),N(this,t,e,!1,r)},j.prototype.unshift=function(t){return N(this,t,null,!0,!1)},j.prototype.isPaused=function(){return!1===this._readableState.flowing},j.prototype.setEncoding=function(t){M||(M=r(32553).s);const e=new M(t);this._readableState.decoder=e,this._readableState.encoding=this._readableState.decoder.encoding;let n=this._readableState.buffer.head,i="";for(;null!==n;)i+=e.write(n.data),n=n.next;return this._readableState.buffer.clear(),""!==i&&this._readableState.buffer.push(i),this._readableState.length=i.length,this};const D=1073741824;function I(t,e){return t<=0||0===e.length&&e.ended?0:e.objectMode?1:t!=t?e.flowing&&e.length?e.buffer.head.data.length:e.length:(t>e.highWaterMark&&(e.highWaterMark=function(t){return t>=D?t=D:(t--,t|=t>>>1,t|=t>>>2,t|=t>>>4,t|=t>>>8,t|=t>>>16,t++),t}(t)),t<=e.length?t:e.ended?e.length:(e.needReadable=!0,0))}function E(t){var e=t._readableState;f("emitReadable",e.needReadable,e.emittedReadable),e.needReadable=!1,e.emittedReadable||(f("emitReadable",e.flowing),e.emittedReadable=!0,i.nextTick(A,t))}function A(t){var e=t._readableState;f("emitReadable_",e.destroyed,e.length,e.ended),e.destroyed||!e.length&&!e.ended||(t.emit("readable"),e.emittedReadable=!1),e.needReadable=!e.flowing&&!e.ended&&e.length<=e.highWaterMark,U(t)}function C(t,e){e.readingMore||(e.readingMore=!0,i.nextTick(T,t,e))}function T(t,e){for(;!e.reading&&!e.ended&&(e.length<e.highWaterMark||e.flowing&&0===e.length);){const r=e.length;if(f("maybeReadMore read 0"),t.read(0),r===e.length)break}e.readingMore=!1}function O(t){const e=t._readableState;e.readableListening=t.listenerCount("readable")>0,e.resumeScheduled&&!e.paused?e.flowing=!0:t.listenerCount("data")>0&&t.resume()}function z(t){f("readable nexttick read 0"),t.read(0)}function k(t,e){f("resume",e.reading),e.reading||t.read(0),e.resumeScheduled=!1,t.emit("resume"),U(t),e.flowing&&!e.reading&&t.read(0)}function U(t){const e=t._readableState;for(f("flow",e.flowing);e.flowing&&null!==t.read(););}function R(t,e){return 0===e.length?null:(e.objectMode?r=e.buffer.shift():!t||t>=e.length?(r=e.decoder?e.buffer.join(""):1===e.buffer.length?e.buffer.first():e.buffer.concat(e.length),e.buffer.clear()):r=e.buffer.consume(t,e.decoder),r);var r}function Y(t){var e=t._readableState;f("endReadable",e.endEmitted),e.endEmitted||(e.ended=!0,i.nextTick(B,e,t))}function B(t,e){if(f("endReadableNT",t.endEmitted,t.length),!t.endEmitted&&0===t.length&&(t.endEmitted=!0,e.readable=!1,e.emit("end"),t.autoDestroy)){const t=e._writableState;(!t||t.autoDestroy&&t.finished)&&e.destroy()}}function P(t,e){for(var r=0,n=t.length;r<n;r++)if(t[r]===e)return r;return-1}j.prototype.read=function(t){f("read",t),t=parseInt(t,10);var e=this._readableState,r=t;if(0!==t&&(e.emittedReadable=!1),0===t&&e.needReadable&&((0!==e.highWaterMark?e.length>=e.highWaterMark:e.length>0)||e.ended))return f("read: emitReadable",e.length,e.ended),0===e.length&&e.ended?Y(this):E(this),null;if(0===(t=I(t,e))&&e.ended)return 0===e.length&&Y(this),null;var n,i=e.needReadable;return f("need readable",i),(0===e.length||e.length-t<e.highWaterMark)&&f("length less than watermark",i=!0),e.ended||e.reading?f("reading or ended",i=!1):i&&(f("do read"),e.reading=!0,e.sync=!0,0===e.length&&(e.needReadable=!0),this._read(e.highWaterMark),e.sync=!1,e.reading||(t=I(r,e))),null===(n=t>0?R(t,e):null)?(e.needReadable=e.length<=e.highWaterMark,t=0):(e.length-=t,e.awaitDrain=0),0===e.length&&(e.ended||(e.needReadable=!0),r!==t&&e.ended&&Y(this)),null!==n&&this.emit("data",n),n},j.prototype._read=function(t){m(this,new v("_read()"))},j.prototype.pipe=function(t,e){var r=this,n=this._readableState;switch(n.pipesCount){case 0:n.pipes=t;break;case 1:n.pipes=[n.pipes,t];break;default:n.pipes.push(t)}n.pipesCount+=1,f("pipe count=%d opts=%j",n.pipesCount,e);var s=(!e||!1!==e.end)&&t!==i.stdout&&t!==i.stderr?a:g;function u(e,i){f("onunpipe"),e===r&&i&&!1===i.hasUnpiped&&(i.hasUnpiped=!0,f("cleanup"),t.removeListener("close",d),t.removeListener("finish",y),t.removeListener("drain",c),t.removeListener("error",p),t.removeListener("unpipe",u),r.removeListener("end",a),r.removeListener("end",g),r.removeListener("data",h),l=!0,!n.awaitDrain||t._writableState&&!t._writableState.needDrain||c())}function a(){f("onend"),t.end()}n.endEmitted?i.nextTick(s):r.once("end",s),t.on("unpipe",u);var c=function(t){return function(){var e=t._readableState;f("pipeOnDrain",e.awaitDrain),e.awaitDrain&&e.awaitDrain--,0===e.awaitDrain&&o(t,"data")&&(e.flowing=!0,U(t))}}(r);t.on("drain",c);var l=!1;function h(e){f("ondata");var i=t.write(e);f("dest.write",i),!1===i&&((1===n.pipesCount&&n.pipes===t||n.pipesCount>1&&-1!==P(n.pipes,t))&&!l&&(f("false write response, pause",n.awaitDrain),n.awaitDrain++),r.pause())}function p(e){f("onerror",e),g(),t.removeListener("error",p),0===o(t,"error")&&m(t,e)}function d(){t.removeListener("finish",y),g()}function y(){f("onfinish"),t.removeListener("close",d),g()}function g(){f("unpipe"),r.unpipe(t)}return r.on("data",h),function(t,e,r){if("function"==typeof t.prependListener)return t.prependListener(e,r);t._events&&t._events[e]?Array.isArray(t._events[e])?t._events[e].unshift(r):t._events[e]=[r,t._events[e]]:t.on(e,r)}(t,"error",p),t.once("close",d),t.once("finish",y),t.emit("pipe",r),n.flowing||(f("pipe resume"),r.resume()),t},j.prototype.unpipe=function(t){var e=this._readableState,r={hasUnpiped:!1};if(0===e.pipesCount)return this;if(1===e.pipesCount)return t&&t!==e.pipes||(t||(t=e.pipes),e.pipes=null,e.pipesCount=0,e.flowing=!1,t&&t.emit("unpipe",this,r)),this;if(!t){var n=e.pipes,i=e.pipesCount;e.pipes=null,e.pipesCount=0,e.flowing=!1;for(var o=0;o<i;o++)n[o].emit("unpipe",this,{hasUnpiped:!1});return this}var s=P(e.pipes,t);return-1===s||(e.pipes.splice(s,1),e.pipesCount-=1,1===e.pipesCount&&(e.pipes=e.pipes[0]),t.emit("unpipe",this,r)),this},j.prototype.on=function(t,e){const r=s.prototype.on.call(this,t,e),n=this._readableState;return"data"===t?(n.readableListening=this.listenerCount("readable")>0,!1!==n.flowing&&this.resume()):"readable"===t&&(n.endEmitted||n.readableListening||(n.readableListening=n.needReadable=!0,n.flowing=!1,n.emittedReadable=!1,f("on readable",n.length,n.reading),n.length?E(this):n.reading||i.nextTick(z,this))),r},j.prototype.addListener=j.prototype.on,j.prototype.removeListener=function(t,e){const r=s.prototype.removeListener.call(this,t,e);return"readable"===t&&i.nextTick(O,this),r},j.prototype.removeAllListeners=function(t){const e=s.prototype.removeAllListeners.apply(this,arguments);return"readable"!==t&&void 0!==t||i.nextTick(O,this),e},j.prototype.resume=function(){var t=this._readableState;return t.flowing||(f("resume"),t.flowing=!t.readableListening,function(t,e){e.resumeScheduled||(e.resumeScheduled=!0,i.nextTick(k,t,e))}(this,t)),t.paused=!1,this},j.prototype.pause=function(){return f("call pause flowing=%j",this._readableState.flowing),!1!==this._readableState.flowing&&(f("pause"),this._readableState.flowing=!1,this.emit("pause")),this._readableState.paused=!0,this},j.prototype.wrap=function(t){var e=this._readableState,r=!1;for(var n in t.on("end",(()=>{if(f("wrapped end"),e.decoder&&!e.ended){var t=e.decoder.end();t&&t.length&&this.push(t)}this.push(null)})),t.on("data",(n=>{(f("wrapped data"),e.decoder&&(n=e.decoder.write(n)),e.objectMode&&null==n)||(e.objectMode||n&&n.length)&&(this.push(n)||(r=!0,t.pause()))})),t)void 0===this[n]&&"function"==typeof t[n]&&(this[n]=function(e){return function(){return t[e].apply(t,arguments)}}(n));for(var i=0;i<b.length;i++)t.on(b[i],this.emit.bind(this,b[i]));return this._read=e=>{f("wrapped _read",e),r&&(r=!1,t.resume())},this},"function"==typeof Symbol&&(j.prototype[Symbol.asyncIterator]=function(){return void 0===L&&(L=r(45850)),L(this)}),Object.defineProperty(j.prototype,"readableHighWaterMark",{enumerable:!1,get:function(){return this._readableState.highWaterMark}}),Object.defineProperty(j.prototype,"readableBuffer",{enumerable:!1,get:function(){return this._readableState&&this._readableState.buffer}}),Object.defineProperty(j.prototype,"readableFlowing",{enumerable:!1,get:function(){return this._readableState.flowing},set:function(t){this._readableState&&(this._readableState.flowing=t)}}),j._fromList=R,Object.defineProperty(j.prototype,"readableLength",{enumerable:!1,get(){return this._readableState.length}}),"function"==typeof Symbol&&(j.from=function(t,e){return void 0===_&&(_=r(15167)),_(j,t,e)})},74605:(t,e,r)=>{"use strict";t.exports=f;const n=r(94281).q,i=n.ERR_METHOD_NOT_IMPLEMENTED,o=n.ERR_MULTIPLE_CALLBACK,s=n.ERR_TRANSFORM_ALREADY_TRANSFORMING,u=n.ERR_TRANSFORM_WITH_LENGTH_0,a=r(56753);function c(t,e){var r=this._transformState;r.transforming=!1;var n=r.writecb;if(null===n)return this.emit("error",new o);r.writechunk=null,r.writecb=null,null!=e&&this.push(e),n(t);var i=this._readableState;i.reading=!1,(i.needReadable||i.length<i.highWaterMark)&&this._read(i.highWaterMark)}function f(t){if(!(this instanceof f))return new f(t);a.call(this,t),this._transformState={afterTransform:c.bind(this),needTransform:!1,transforming:!1,writecb:null,writechunk:null,writeencoding:null},this._readableState.needReadable=!0,this._readableState.sync=!1,t&&("function"==typeof t.transform&&(this._transform=t.transform),"function"==typeof t.flush&&(this._flush=t.flush)),this.on("prefinish",l)}function l(){"function"!=typeof this._flush||this._readableState.destroyed?h(this,null,null):this._flush(((t,e)=>{h(this,t,e)}))}function h(t,e,r){if(e)return t.emit("error",e);if(null!=r&&t.push(r),t._writableState.length)throw new u;if(t._transformState.transforming)throw new s;return t.push(null)}r(35717)(f,a),f.prototype.push=function(t,e){return this._transformState.needTransform=!1,a.prototype.push.call(this,t,e)},f.prototype._transform=function(t,e,r){r(new i("_transform()"))},f.prototype._write=function(t,e,r){var n=this._transformState;if(n.writecb=r,n.writechunk=t,n.writeencoding=e,!n.transforming){var i=this._readableState;(n.needTransform||i.needReadable||i.length<i.highWaterMark)&&this._read(i.highWaterMark)}},f.prototype._read=function(t){var e=this._transformState;null===e.writechunk||e.transforming?e.needTransform=!0:(e.transforming=!0,this._transform(e.writechunk,e.writeencoding,e.afterTransform))},f.prototype._destroy=function(t,e){a.prototype._destroy.call(this,t,(t=>{e(t)}))}},64229:(t,e,r)=>{"use strict";var n,i=r(34155);function o(t){this.next=null,this.entry=null,this.finish=()=>{!function(t,e,r){var n=t.entry;t.entry=null;for(;n;){var i=n.callback;e.pendingcb--,i(r),n=n.next}e.corkedRequestsFree.next=t}(this,t)}}t.exports=j,j.WritableState=b;const s={deprecate:r(94927)};var u=r(22503);const a=r(48764).Buffer,c=(void 0!==r.g?r.g:"undefined"!=typeof window?window:"undefined"!=typeof self?self:{}).Uint8Array||function(){};const f=r(61195),l=r(82457).getHighWaterMark,h=r(94281).q,p=h.ERR_INVALID_ARG_TYPE,d=h.ERR_METHOD_NOT_IMPLEMENTED,y=h.ERR_MULTIPLE_CALLBACK,g=h.ERR_STREAM_CANNOT_PIPE,v=h.ERR_STREAM_DESTROYED,w=h.ERR_STREAM_NULL_VALUES,M=h.ERR_STREAM_WRITE_AFTER_END,L=h.ERR_UNKNOWN_ENCODING,_=f.errorOrDestroy;function m(){}function b(t,e,s){n=n||r(56753),t=t||{},"boolean"!=typeof s&&(s=e instanceof n),this.objectMode=!!t.objectMode,s&&(this.objectMode=this.objectMode||!!t.writableObjectMode),this.highWaterMark=l(this,t,"writableHighWaterMark",s),this.finalCalled=!1,this.needDrain=!1,this.ending=!1,this.ended=!1,this.finished=!1,this.destroyed=!1;var u=!1===t.decodeStrings;this.decodeStrings=!u,this.defaultEncoding=t.defaultEncoding||"utf8",this.length=0,this.writing=!1,this.corked=0,this.sync=!0,this.bufferProcessing=!1,this.onwrite=function(t){!function(t,e){var r=t._writableState,n=r.sync,o=r.writecb;if("function"!=typeof o)throw new y;if(function(t){t.writing=!1,t.writecb=null,t.length-=t.writelen,t.writelen=0}(r),e)!function(t,e,r,n,o){--e.pendingcb,r?(i.nextTick(o,n),i.nextTick(A,t,e),t._writableState.errorEmitted=!0,_(t,n)):(o(n),t._writableState.errorEmitted=!0,_(t,n),A(t,e))}(t,r,n,e,o);else{var s=I(r)||t.destroyed;s||r.corked||r.bufferProcessing||!r.bufferedRequest||D(t,r),n?i.nextTick(S,t,r,s,o):S(t,r,s,o)}}(e,t)},this.writecb=null,this.writelen=0,this.bufferedRequest=null,this.lastBufferedRequest=null,this.pendingcb=0,this.prefinished=!1,this.errorEmitted=!1,this.emitClose=!1!==t.emitClose,this.autoDestroy=!!t.autoDestroy,this.bufferedRequestCount=0,this.corkedRequestsFree=new o(this)}var x;function j(t){const e=this instanceof(n=n||r(56753));if(!e&&!x.call(j,this))return new j(t);this._writableState=new b(t,this,e),this.writable=!0,t&&("function"==typeof t.write&&(this._write=t.write),"function"==typeof t.writev&&(this._writev=t.writev),"function"==typeof t.destroy&&(this._destroy=t.destroy),"function"==typeof t.final&&(this._final=t.final)),u.call(this)}function N(t,e,r,n,i,o,s){e.writelen=n,e.writecb=s,e.writing=!0,e.sync=!0,e.destroyed?e.onwrite(new v("write")):r?t._writev(i,e.onwrite):t._write(i,o,e.onwrite),e.sync=!1}function S(t,e,r,n){r||function(t,e){0===e.length&&e.needDrain&&(e.needDrain=!1,t.emit("drain"))}(t,e),e.pendingcb--,n(),A(t,e)}function D(t,e){e.bufferProcessing=!0;var r=e.bufferedRequest;if(t._writev&&r&&r.next){var n=e.bufferedRequestCount,i=new Array(n),s=e.corkedRequestsFree;s.entry=r;for(var u=0,a=!0;r;)i[u]=r,r.isBuf||(a=!1),r=r.next,u+=1;i.allBuffers=a,N(t,e,!0,e.length,i,"",s.finish),e.pendingcb++,e.lastBufferedRequest=null,s.next?(e.corkedRequestsFree=s.next,s.next=null):e.corkedRequestsFree=new o(e),e.bufferedRequestCount=0}else{for(;r;){var c=r.chunk,f=r.encoding,l=r.callback;if(N(t,e,!1,e.objectMode?1:c.length,c,f,l),r=r.next,e.bufferedRequestCount--,e.writing)break}null===r&&(e.lastBufferedRequest=null)}e.bufferedRequest=r,e.bufferProcessing=!1}function I(t){return t.ending&&0===t.length&&null===t.bufferedRequest&&!t.finished&&!t.writing}function E(t,e){t._final((r=>{e.pendingcb--,r&&_(t,r),e.prefinished=!0,t.emit("prefinish"),A(t,e)}))}function A(t,e){var r=I(e);if(r&&(function(t,e){e.prefinished||e.finalCalled||("function"!=typeof t._final||e.destroyed?(e.prefinished=!0,t.emit("prefinish")):(e.pendingcb++,e.finalCalled=!0,i.nextTick(E,t,e)))}(t,e),0===e.pendingcb&&(e.finished=!0,t.emit("finish"),e.autoDestroy))){const e=t._readableState;(!e||e.autoDestroy&&e.endEmitted)&&t.destroy()}return r}r(35717)(j,u),b.prototype.getBuffer=function(){for(var t=this.bufferedRequest,e=[];t;)e.push(t),t=t.next;return e},function(){try{Object.defineProperty(b.prototype,"buffer",{get:s.deprecate((function(){return this.getBuffer()}),"_writableState.buffer is deprecated. Use _writableState.getBuffer instead.","DEP0003")})}catch(t){}}(),"function"==typeof Symbol&&Symbol.hasInstance&&"function"==typeof Function.prototype[Symbol.hasInstance]?(x=Function.prototype[Symbol.hasInstance],Object.defineProperty(j,Symbol.hasInstance,{value:function(t){return!!x.call(this,t)||this===j&&(t&&t._writableState instanceof b)}})):x=function(t){return t instanceof this},j.prototype.pipe=function(){_(this,new g)},j.prototype.write=function(t,e,r){var n,o=this._writableState,s=!1,u=!o.objectMode&&(n=t,a.isBuffer(n)||n instanceof c);return u&&!a.isBuffer(t)&&(t=function(t){return a.from(t)}(t)),"function"==typeof e&&(r=e,e=null),u?e="buffer":e||(e=o.defaultEncoding),"function"!=typeof r&&(r=m),o.ending?function(t,e){var r=new M;_(t,r),i.nextTick(e,r)}(this,r):(u||function(t,e,r,n){var o;return null===r?o=new w:"string"==typeof r||e.objectMode||(o=new p("chunk",["string","Buffer"],r)),!o||(_(t,o),i.nextTick(n,o),!1)}(this,o,t,r))&&(o.pendingcb++,s=function(t,e,r,n,i,o){if(!r){var s=function(t,e,r){t.objectMode||!1===t.decodeStrings||"string"!=typeof e||(e=a.from(e,r));return e}(e,n,i);n!==s&&(r=!0,i="buffer",n=s)}var u=e.objectMode?1:n.length;e.length+=u;var c=e.length<e.highWaterMark;c||(e.needDrain=!0);if(e.writing||e.corked){var f=e.lastBufferedRequest;e.lastBufferedRequest={chunk:n,encoding:i,isBuf:r,callback:o,next:null},f?f.next=e.lastBufferedRequest:e.bufferedRequest=e.lastBufferedRequest,e.bufferedRequestCount+=1}else N(t,e,!1,u,n,i,o);return c}(this,o,u,t,e,r)),s},j.prototype.cork=function(){this._writableState.corked++},j.prototype.uncork=function(){var t=this._writableState;t.corked&&(t.corked--,t.writing||t.corked||t.bufferProcessing||!t.bufferedRequest||D(this,t))},j.prototype.setDefaultEncoding=function(t){if("string"==typeof t&&(t=t.toLowerCase()),!(["hex","utf8","utf-8","ascii","binary","base64","ucs2","ucs-2","utf16le","utf-16le","raw"].indexOf((t+"").toLowerCase())>-1))throw new L(t);return this._writableState.defaultEncoding=t,this},Object.defineProperty(j.prototype,"writableBuffer",{enumerable:!1,get:function(){return this._writableState&&this._writableState.getBuffer()}}),Object.defineProperty(j.prototype,"writableHighWaterMark",{enumerable:!1,get:function(){return this._writableState.highWaterMark}}),j.prototype._write=function(t,e,r){r(new d("_write()"))},j.prototype._writev=null,j.prototype.end=function(t,e,r){var n=this._writableState;return"function"==typeof t?(r=t,t=null,e=null):"function"==typeof e&&(r=e,e=null),null!=t&&this.write(t,e),n.corked&&(n.corked=1,this.uncork()),n.ending||function(t,e,r){e.ending=!0,A(t,e),r&&(e.finished?i.nextTick(r):t.once("finish",r));e.ended=!0,t.writable=!1}(this,n,r),this},Object.defineProperty(j.prototype,"writableLength",{enumerable:!1,get(){return this._writableState.length}}),Object.defineProperty(j.prototype,"destroyed",{enumerable:!1,get(){return void 0!==this._writableState&&this._writableState.destroyed},set(t){this._writableState&&(this._writableState.destroyed=t)}}),j.prototype.destroy=f.destroy,j.prototype._undestroy=f.undestroy,j.prototype._destroy=function(t,e){e(t)}},45850:(t,e,r)=>{"use strict";var n=r(34155);const i=r(8610),o=Symbol("lastResolve"),s=Symbol("lastReject"),u=Symbol("error"),a=Symbol("ended"),c=Symbol("lastPromise"),f=Symbol("handlePromise"),l=Symbol("stream");function h(t,e){return{value:t,done:e}}function p(t){const e=t[o];if(null!==e){const r=t[l].read();null!==r&&(t[c]=null,t[o]=null,t[s]=null,e(h(r,!1)))}}function d(t){n.nextTick(p,t)}const y=Object.getPrototypeOf((function(){})),g=Object.setPrototypeOf({get stream(){return this[l]},next(){const t=this[u];if(null!==t)return Promise.reject(t);if(this[a])return Promise.resolve(h(void 0,!0));if(this[l].destroyed)return new Promise(((t,e)=>{n.nextTick((()=>{this[u]?e(this[u]):t(h(void 0,!0))}))}));const e=this[c];let r;if(e)r=new Promise(function(t,e){return(r,n)=>{t.then((()=>{e[a]?r(h(void 0,!0)):e[f](r,n)}),n)}}(e,this));else{const t=this[l].read();if(null!==t)return Promise.resolve(h(t,!1));r=new Promise(this[f])}return this[c]=r,r},[Symbol.asyncIterator](){return this},return(){return new Promise(((t,e)=>{this[l].destroy(null,(r=>{r?e(r):t(h(void 0,!0))}))}))}},y);t.exports=t=>{const e=Object.create(g,{[l]:{value:t,writable:!0},[o]:{value:null,writable:!0},[s]:{value:null,writable:!0},[u]:{value:null,writable:!0},[a]:{value:t._readableState.endEmitted,writable:!0},[f]:{value:(t,r)=>{const n=e[l].read();n?(e[c]=null,e[o]=null,e[s]=null,t(h(n,!1))):(e[o]=t,e[s]=r)},writable:!0}});return e[c]=null,i(t,(t=>{if(t&&"ERR_STREAM_PREMATURE_CLOSE"!==t.code){const r=e[s];return null!==r&&(e[c]=null,e[o]=null,e[s]=null,r(t)),void(e[u]=t)}const r=e[o];null!==r&&(e[c]=null,e[o]=null,e[s]=null,r(h(void 0,!0))),e[a]=!0})),t.on("readable",d.bind(null,e)),e}},57327:(t,e,r)=>{"use strict";function n(t,e){var r=Object.keys(t);if(Object.getOwnPropertySymbols){var n=Object.getOwnPropertySymbols(t);e&&(n=n.filter((function(e){return Object.getOwnPropertyDescriptor(t,e).enumerable}))),r.push.apply(r,n)}return r}function i(t){for(var e=1;e<arguments.length;e++){var r=null!=arguments[e]?arguments[e]:{};e%2?n(Object(r),!0).forEach((function(e){o(t,e,r[e])})):Object.getOwnPropertyDescriptors?Object.defineProperties(t,Object.getOwnPropertyDescriptors(r)):n(Object(r)).forEach((function(e){Object.defineProperty(t,e,Object.getOwnPropertyDescriptor(r,e))}))}return t}function o(t,e,r){return(e=function(t){var e=function(t,e){if("object"!=typeof t||null===t)return t;var r=t[Symbol.toPrimitive];if(void 0!==r){var n=r.call(t,e||"default");if("object"!=typeof n)return n;throw new TypeError("@@toPrimitive must return a primitive value.")}return("string"===e?String:Number)(t)}(t,"string");return"symbol"==typeof e?e:String(e)}(e))in t?Object.defineProperty(t,e,{value:r,enumerable:!0,configurable:!0,writable:!0}):t[e]=r,t}const s=r(48764).Buffer,u=r(52361).inspect,a=u&&u.custom||"inspect";t.exports=class{constructor(){this.head=null,this.tail=null,this.length=0}push(t){const e={data:t,next:null};this.length>0?this.tail.next=e:this.head=e,this.tail=e,++this.length}unshift(t){const e={data:t,next:this.head};0===this.length&&(this.tail=e),this.head=e,++this.length}shift(){if(0===this.length)return;const t=this.head.data;return 1===this.length?this.head=this.tail=null:this.head=this.head.next,--this.length,t}clear(){this.head=this.tail=null,this.length=0}join(t){if(0===this.length)return"";for(var e=this.head,r=""+e.data;e=e.next;)r+=t+e.data;return r}concat(t){if(0===this.length)return s.alloc(0);const e=s.allocUnsafe(t>>>0);for(var r,n,i,o=this.head,u=0;o;)r=o.data,n=e,i=u,s.prototype.copy.call(r,n,i),u+=o.data.length,o=o.next;return e}consume(t,e){var r;return t<this.head.data.length?(r=this.head.data.slice(0,t),this.head.data=this.head.data.slice(t)):r=t===this.head.data.length?this.shift():e?this._getString(t):this._getBuffer(t),r}first(){return this.head.data}_getString(t){var e=this.head,r=1,n=e.data;for(t-=n.length;e=e.next;){const i=e.data,o=t>i.length?i.length:t;if(o===i.length?n+=i:n+=i.slice(0,t),0===(t-=o)){o===i.length?(++r,e.next?this.head=e.next:this.head=this.tail=null):(this.head=e,e.data=i.slice(o));break}++r}return this.length-=r,n}_getBuffer(t){const e=s.allocUnsafe(t);var r=this.head,n=1;for(r.data.copy(e),t-=r.data.length;r=r.next;){const i=r.data,o=t>i.length?i.length:t;if(i.copy(e,e.length-t,0,o),0===(t-=o)){o===i.length?(++n,r.next?this.head=r.next:this.head=this.tail=null):(this.head=r,r.data=i.slice(o));break}++n}return this.length-=n,e}[a](t,e){return u(this,i(i({},e),{},{depth:0,customInspect:!1}))}}},61195:(t,e,r)=>{"use strict";var n=r(34155);function i(t,e){s(t,e),o(t)}function o(t){t._writableState&&!t._writableState.emitClose||t._readableState&&!t._readableState.emitClose||t.emit("close")}function s(t,e){t.emit("error",e)}t.exports={destroy:function(t,e){const r=this._readableState&&this._readableState.destroyed,u=this._writableState&&this._writableState.destroyed;return r||u?(e?e(t):t&&(this._writableState?this._writableState.errorEmitted||(this._writableState.errorEmitted=!0,n.nextTick(s,this,t)):n.nextTick(s,this,t)),this):(this._readableState&&(this._readableState.destroyed=!0),this._writableState&&(this._writableState.destroyed=!0),this._destroy(t||null,(t=>{!e&&t?this._writableState?this._writableState.errorEmitted?n.nextTick(o,this):(this._writableState.errorEmitted=!0,n.nextTick(i,this,t)):n.nextTick(i,this,t):e?(n.nextTick(o,this),e(t)):n.nextTick(o,this)})),this)},undestroy:function(){this._readableState&&(this._readableState.destroyed=!1,this._readableState.reading=!1,this._readableState.ended=!1,this._readableState.endEmitted=!1),this._writableState&&(this._writableState.destroyed=!1,this._writableState.ended=!1,this._writableState.ending=!1,this._writableState.finalCalled=!1,this._writableState.prefinished=!1,this._writableState.finished=!1,this._writableState.errorEmitted=!1)},errorOrDestroy:function(t,e){const r=t._readableState,n=t._writableState;r&&r.autoDestroy||n&&n.autoDestroy?t.destroy(e):t.emit("error",e)}}},8610:(t,e,r)=>{"use strict";const n=r(94281).q.ERR_STREAM_PREMATURE_CLOSE;function i(){}t.exports=function t(e,r,o){if("function"==typeof r)return t(e,null,r);r||(r={}),o=function(t){let e=!1;return function(){if(!e){e=!0;for(var r=arguments.length,n=new Array(r),i=0;i<r;i++)n[i]=arguments[i];t.apply(this,n)}}}(o||i);let s=r.readable||!1!==r.readable&&e.readable,u=r.writable||!1!==r.writable&&e.writable;const a=()=>{e.writable||f()};var c=e._writableState&&e._writableState.finished;const f=()=>{u=!1,c=!0,s||o.call(e)};var l=e._readableState&&e._readableState.endEmitted;const h=()=>{s=!1,l=!0,u||o.call(e)},p=t=>{o.call(e,t)},d=()=>{let t;return s&&!l?(e._readableState&&e._readableState.ended||(t=new n),o.call(e,t)):u&&!c?(e._writableState&&e._writableState.ended||(t=new n),o.call(e,t)):void 0},y=()=>{e.req.on("finish",f)};return!function(t){return t.setHeader&&"function"==typeof t.abort}(e)?u&&!e._writableState&&(e.on("end",a),e.on("close",a)):(e.on("complete",f),e.on("abort",d),e.req?y():e.on("request",y)),e.on("end",h),e.on("finish",f),!1!==r.error&&e.on("error",p),e.on("close",d),function(){e.removeListener("complete",f),e.removeListener("abort",d),e.removeListener("request",y),e.req&&e.req.removeListener("finish",f),e.removeListener("end",a),e.removeListener("close",a),e.removeListener("finish",f),e.removeListener("end",h),e.removeListener("error",p),e.removeListener("close",d)}}},15167:t=>{t.exports=function(){throw new Error("Readable.from is not available in the browser")}},59946:(t,e,r)=>{"use strict";let n;const i=r(94281).q,o=i.ERR_MISSING_ARGS,s=i.ERR_STREAM_DESTROYED;function u(t){if(t)throw t}function a(t){t()}function c(t,e){return t.pipe(e)}t.exports=function(){for(var t=arguments.length,e=new Array(t),i=0;i<t;i++)e[i]=arguments[i];const f=function(t){return t.length?"function"!=typeof t[t.length-1]?u:t.pop():u}(e);if(Array.isArray(e[0])&&(e=e[0]),e.length<2)throw new o("streams");let l;const h=e.map((function(t,i){const o=i<e.length-1;return function(t,e,i,o){o=function(t){let e=!1;return function(){e||(e=!0,t(...arguments))}}(o);let u=!1;t.on("close",(()=>{u=!0})),void 0===n&&(n=r(8610)),n(t,{readable:e,writable:i},(t=>{if(t)return o(t);u=!0,o()}));let a=!1;return e=>{if(!u&&!a)return a=!0,function(t){return t.setHeader&&"function"==typeof t.abort}(t)?t.abort():"function"==typeof t.destroy?t.destroy():void o(e||new s("pipe"))}}(t,o,i>0,(function(t){l||(l=t),t&&h.forEach(a),o||(h.forEach(a),f(l))}))}));return e.reduce(c)}},82457:(t,e,r)=>{"use strict";const n=r(94281).q.ERR_INVALID_OPT_VALUE;t.exports={getHighWaterMark:function(t,e,r,i){const o=function(t,e,r){return null!=t.highWaterMark?t.highWaterMark:e?t[r]:null}(e,i,r);if(null!=o){if(!isFinite(o)||Math.floor(o)!==o||o<0){throw new n(i?r:"highWaterMark",o)}return Math.floor(o)}return t.objectMode?16:16384}}},22503:(t,e,r)=>{t.exports=r(17187).EventEmitter},60697:(t,e,r)=>{const n=r(86245),i=r(30504),o=r(94992),s=r(82407);t.exports=t=>{var e,r,u=0,a={type:i.ROOT,stack:[]},c=a,f=a.stack,l=[],h=e=>{n.error(t,"Nothing to repeat at column "+(e-1))},p=n.strToChars(t);for(e=p.length;u<e;)switch(r=p[u++]){case"\\":switch(r=p[u++]){case"b":f.push(s.wordBoundary());break;case"B":f.push(s.nonWordBoundary());break;case"w":f.push(o.words());break;case"W":f.push(o.notWords());break;case"d":f.push(o.ints());break;case"D":f.push(o.notInts());break;case"s":f.push(o.whitespace());break;case"S":f.push(o.notWhitespace());break;default:/\d/.test(r)?f.push({type:i.REFERENCE,value:parseInt(r,10)}):f.push({type:i.CHAR,value:r.charCodeAt(0)})}break;case"^":f.push(s.begin());break;case"$":f.push(s.end());break;case"[":var d;"^"===p[u]?(d=!0,u++):d=!1;var y=n.tokenizeClass(p.slice(u),t);u+=y[1],f.push({type:i.SET,set:y[0],not:d});break;case".":f.push(o.anyChar());break;case"(":var g={type:i.GROUP,stack:[],remember:!0};"?"===(r=p[u])&&(r=p[u+1],u+=2,"="===r?g.followedBy=!0:"!"===r?g.notFollowedBy=!0:":"!==r&&n.error(t,`Invalid group, character '${r}' after '?' at column `+(u-1)),g.remember=!1),f.push(g),l.push(c),c=g,f=g.stack;break;case")":0===l.length&&n.error(t,"Unmatched ) at column "+(u-1)),f=(c=l.pop()).options?c.options[c.options.length-1]:c.stack;break;case"|":c.options||(c.options=[c.stack],delete c.stack);var v=[];c.options.push(v),f=v;break;case"{":var w,M,L=/^(\d+)(,(\d+)?)?\}/.exec(p.slice(u));null!==L?(0===f.length&&h(u),w=parseInt(L[1],10),M=L[2]?L[3]?parseInt(L[3],10):1/0:w,u+=L[0].length,f.push({type:i.REPETITION,min:w,max:M,value:f.pop()})):f.push({type:i.CHAR,value:123});break;case"?":0===f.length&&h(u),f.push({type:i.REPETITION,min:0,max:1,value:f.pop()});break;case"+":0===f.length&&h(u),f.push({type:i.REPETITION,min:1,max:1/0,value:f.pop()});break;case"*":0===f.length&&h(u),f.push({type:i.REPETITION,min:0,max:1/0,value:f.pop()});break;default:f.push({type:i.CHAR,value:r.charCodeAt(0)})}return 0!==l.length&&n.error(t,"Unterminated group"),a},t.exports.types=i},82407:(t,e,r)=>{const n=r(30504);e.wordBoundary=()=>({type:n.POSITION,value:"b"}),e.nonWordBoundary=()=>({type:n.POSITION,value:"B"}),e.begin=()=>({type:n.POSITION,value:"^"}),e.end=()=>({type:n.POSITION,value:"$"})},94992:(t,e,r)=>{const n=r(30504),i=()=>[{type:n.RANGE,from:48,to:57}],o=()=>[{type:n.CHAR,value:95},{type:n.RANGE,from:97,to:122},{type:n.RANGE,from:65,to:90}].concat(i()),s=()=>[{type:n.CHAR,value:9},{type:n.CHAR,value:10},{type:n.CHAR,value:11},{type:n.CHAR,value:12},{type:n.CHAR,value:13},{type:n.CHAR,value:32},{type:n.CHAR,value:160},{type:n.CHAR,value:5760},{type:n.RANGE,from:8192,to:8202},{type:n.CHAR,value:8232},{type:n.CHAR,value:8233},{type:n.CHAR,value:8239},{type:n.CHAR,value:8287},{type:n.CHAR,value:12288},{type:n.CHAR,value:65279}];e.words=()=>({type:n.SET,set:o(),not:!1}),e.notWords=()=>({type:n.SET,set:o(),not:!0}),e.ints=()=>({type:n.SET,set:i(),not:!1}),e.notInts=()=>({type:n.SET,set:i(),not:!0}),e.whitespace=()=>({type:n.SET,set:s(),not:!1}),e.notWhitespace=()=>({type:n.SET,set:s(),not:!0}),e.anyChar=()=>({type:n.SET,set:[{type:n.CHAR,value:10},{type:n.CHAR,value:13},{type:n.CHAR,value:8232},{type:n.CHAR,value:8233}],not:!0})},30504:t=>{t.exports={ROOT:0,GROUP:1,POSITION:2,SET:3,RANGE:4,REPETITION:5,REFERENCE:6,CHAR:7}},86245:(t,e,r)=>{const n=r(30504),i=r(94992),o={0:0,t:9,n:10,v:11,f:12,r:13};e.strToChars=function(t){return t=t.replace(/(\[\\b\])|(\\)?\\(?:u([A-F0-9]{4})|x([A-F0-9]{2})|(0?[0-7]{2})|c([@A-Z[\\\]^?])|([0tnvfr]))/g,(function(t,e,r,n,i,s,u,a){if(r)return t;var c=e?8:n?parseInt(n,16):i?parseInt(i,16):s?parseInt(s,8):u?"@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^ ?".indexOf(u):o[a],f=String.fromCharCode(c);return/[[\]{}^$.|?*+()]/.test(f)&&(f="\\"+f),f}))},e.tokenizeClass=(t,r)=>{for(var o,s,u=[],a=/\\(?:(w)|(d)|(s)|(W)|(D)|(S))|((?:(?:\\)(.)|([^\]\\]))-(?:\\)?([^\]]))|(\])|(?:\\)?([^])/g;null!=(o=a.exec(t));)if(o[1])u.push(i.words());else if(o[2])u.push(i.ints());else if(o[3])u.push(i.whitespace());else if(o[4])u.push(i.notWords());else if(o[5])u.push(i.notInts());else if(o[6])u.push(i.notWhitespace());else if(o[7])u.push({type:n.RANGE,from:(o[8]||o[9]).charCodeAt(0),to:o[10].charCodeAt(0)});else{if(!(s=o[12]))return[u,a.lastIndex];u.push({type:n.CHAR,value:s.charCodeAt(0)})}e.error(r,"Unterminated character class")},e.error=(t,e)=>{throw new SyntaxError("Invalid regular expression: /"+t+"/: "+e)}},89509:(t,e,r)=>{var n=r(48764),i=n.Buffer;function o(t,e){for(var r in t)e[r]=t[r]}function s(t,e,r){return i(t,e,r)}i.from&&i.alloc&&i.allocUnsafe&&i.allocUnsafeSlow?t.exports=n:(o(n,e),e.Buffer=s),s.prototype=Object.create(i.prototype),o(i,s),s.from=function(t,e,r){if("number"==typeof t)throw new TypeError("Argument must not be a number");return i(t,e,r)},s.alloc=function(t,e,r){if("number"!=typeof t)throw new TypeError("Argument must be a number");var n=i(t);return void 0!==e?"string"==typeof r?n.fill(e,r):n.fill(e):n.fill(0),n},s.allocUnsafe=function(t){if("number"!=typeof t)throw new TypeError("Argument must be a number");return i(t)},s.allocUnsafeSlow=function(t){if("number"!=typeof t)throw new TypeError("Argument must be a number");return n.SlowBuffer(t)}},24189:(t,e,r)=>{var n=r(89509).Buffer;function i(t,e){this._block=n.alloc(t),this._finalSize=e,this._blockSize=t,this._len=0}i.prototype.update=function(t,e){"string"==typeof t&&(e=e||"utf8",t=n.from(t,e));for(var r=this._block,i=this._blockSize,o=t.length,s=this._len,u=0;u<o;){for(var a=s%i,c=Math.min(o-u,i-a),f=0;f<c;f++)r[a+f]=t[u+f];u+=c,(s+=c)%i==0&&this._update(r)}return this._len+=o,this},i.prototype.digest=function(t){var e=this._len%this._blockSize;this._block[e]=128,this._block.fill(0,e+1),e>=this._finalSize&&(this._update(this._block),this._block.fill(0));var r=8*this._len;if(r<=4294967295)this._block.writeUInt32BE(r,this._blockSize-4);else{var n=(4294967295&r)>>>0,i=(r-n)/4294967296;this._block.writeUInt32BE(i,this._blockSize-8),this._block.writeUInt32BE(n,this._blockSize-4)}this._update(this._block);var o=this._hash();return t?o.toString(t):o},i.prototype._update=function(){throw new Error("_update must be implemented by subclass")},t.exports=i},89072:(t,e,r)=>{var n=t.exports=function(t){t=t.toLowerCase();var e=n[t];if(!e)throw new Error(t+" is not supported (we accept pull requests)");return new e};n.sha=r(74448),n.sha1=r(18336),n.sha224=r(48432),n.sha256=r(67499),n.sha384=r(51686),n.sha512=r(87816)},74448:(t,e,r)=>{var n=r(35717),i=r(24189),o=r(89509).Buffer,s=[1518500249,1859775393,-1894007588,-899497514],u=new Array(80);function a(){this.init(),this._w=u,i.call(this,64,56)}function c(t){return t<<30|t>>>2}function f(t,e,r,n){return 0===t?e&r|~e&n:2===t?e&r|e&n|r&n:e^r^n}n(a,i),a.prototype.init=function(){return this._a=1732584193,this._b=4023233417,this._c=2562383102,this._d=271733878,this._e=3285377520,this},a.prototype._update=function(t){for(var e,r=this._w,n=0|this._a,i=0|this._b,o=0|this._c,u=0|this._d,a=0|this._e,l=0;l<16;++l)r[l]=t.readInt32BE(4*l);for(;l<80;++l)r[l]=r[l-3]^r[l-8]^r[l-14]^r[l-16];for(var h=0;h<80;++h){var p=~~(h/20),d=0|((e=n)<<5|e>>>27)+f(p,i,o,u)+a+r[h]+s[p];a=u,u=o,o=c(i),i=n,n=d}this._a=n+this._a|0,this._b=i+this._b|0,this._c=o+this._c|0,this._d=u+this._d|0,this._e=a+this._e|0},a.prototype._hash=function(){var t=o.allocUnsafe(20);return t.writeInt32BE(0|this._a,0),t.writeInt32BE(0|this._b,4),t.writeInt32BE(0|this._c,8),t.writeInt32BE(0|this._d,12),t.writeInt32BE(0|this._e,16),t},t.exports=a},18336:(t,e,r)=>{var n=r(35717),i=r(24189),o=r(89509).Buffer,s=[1518500249,1859775393,-1894007588,-899497514],u=new Array(80);function a(){this.init(),this._w=u,i.call(this,64,56)}function c(t){return t<<5|t>>>27}function f(t){return t<<30|t>>>2}function l(t,e,r,n){return 0===t?e&r|~e&n:2===t?e&r|e&n|r&n:e^r^n}n(a,i),a.prototype.init=function(){return this._a=1732584193,this._b=4023233417,this._c=2562383102,this._d=271733878,this._e=3285377520,this},a.prototype._update=function(t){for(var e,r=this._w,n=0|this._a,i=0|this._b,o=0|this._c,u=0|this._d,a=0|this._e,h=0;h<16;++h)r[h]=t.readInt32BE(4*h);for(;h<80;++h)r[h]=(e=r[h-3]^r[h-8]^r[h-14]^r[h-16])<<1|e>>>31;for(var p=0;p<80;++p){var d=~~(p/20),y=c(n)+l(d,i,o,u)+a+r[p]+s[d]|0;a=u,u=o,o=f(i),i=n,n=y}this._a=n+this._a|0,this._b=i+this._b|0,this._c=o+this._c|0,this._d=u+this._d|0,this._e=a+this._e|0},a.prototype._hash=function(){var t=o.allocUnsafe(20);return t.writeInt32BE(0|this._a,0),t.writeInt32BE(0|this._b,4),t.writeInt32BE(0|this._c,8),t.writeInt32BE(0|this._d,12),t.writeInt32BE(0|this._e,16),t},t.exports=a},48432:(t,e,r)=>{var n=r(35717),i=r(67499),o=r(24189),s=r(89509).Buffer,u=new Array(64);function a(){this.init(),this._w=u,o.call(this,64,56)}n(a,i),a.prototype.init=function(){return this._a=3238371032,this._b=914150663,this._c=812702999,this._d=4144912697,this._e=4290775857,this._f=1750603025,this._g=1694076839,this._h=3204075428,this},a.prototype._hash=function(){var t=s.allocUnsafe(28);return t.writeInt32BE(this._a,0),t.writeInt32BE(this._b,4),t.writeInt32BE(this._c,8),t.writeInt32BE(this._d,12),t.writeInt32BE(this._e,16),t.writeInt32BE(this._f,20),t.writeInt32BE(this._g,24),t},t.exports=a},67499:(t,e,r)=>{var n=r(35717),i=r(24189),o=r(89509).Buffer,s=[1116352408,1899447441,3049323471,3921009573,961987163,1508970993,2453635748,2870763221,3624381080,310598401,607225278,1426881987,1925078388,2162078206,2614888103,3248222580,3835390401,4022224774,264347078,604807628,770255983,1249150122,1555081692,1996064986,2554220882,2821834349,2952996808,3210313671,3336571891,3584528711,113926993,338241895,666307205,773529912,1294757372,1396182291,1695183700,1986661051,2177026350,2456956037,2730485921,2820302411,3259730800,3345764771,3516065817,3600352804,4094571909,275423344,430227734,506948616,659060556,883997877,958139571,1322822218,1537002063,1747873779,1955562222,2024104815,2227730452,2361852424,2428436474,2756734187,3204031479,3329325298],u=new Array(64);function a(){this.init(),this._w=u,i.call(this,64,56)}function c(t,e,r){return r^t&(e^r)}function f(t,e,r){return t&e|r&(t|e)}function l(t){return(t>>>2|t<<30)^(t>>>13|t<<19)^(t>>>22|t<<10)}function h(t){return(t>>>6|t<<26)^(t>>>11|t<<21)^(t>>>25|t<<7)}function p(t){return(t>>>7|t<<25)^(t>>>18|t<<14)^t>>>3}n(a,i),a.prototype.init=function(){return this._a=1779033703,this._b=3144134277,this._c=1013904242,this._d=2773480762,this._e=1359893119,this._f=2600822924,this._g=528734635,this._h=1541459225,this},a.prototype._update=function(t){for(var e,r=this._w,n=0|this._a,i=0|this._b,o=0|this._c,u=0|this._d,a=0|this._e,d=0|this._f,y=0|this._g,g=0|this._h,v=0;v<16;++v)r[v]=t.readInt32BE(4*v);for(;v<64;++v)r[v]=0|(((e=r[v-2])>>>17|e<<15)^(e>>>19|e<<13)^e>>>10)+r[v-7]+p(r[v-15])+r[v-16];for(var w=0;w<64;++w){var M=g+h(a)+c(a,d,y)+s[w]+r[w]|0,L=l(n)+f(n,i,o)|0;g=y,y=d,d=a,a=u+M|0,u=o,o=i,i=n,n=M+L|0}this._a=n+this._a|0,this._b=i+this._b|0,this._c=o+this._c|0,this._d=u+this._d|0,this._e=a+this._e|0,this._f=d+this._f|0,this._g=y+this._g|0,this._h=g+this._h|0},a.prototype._hash=function(){var t=o.allocUnsafe(32);return t.writeInt32BE(this._a,0),t.writeInt32BE(this._b,4),t.writeInt32BE(this._c,8),t.writeInt32BE(this._d,12),t.writeInt32BE(this._e,16),t.writeInt32BE(this._f,20),t.writeInt32BE(this._g,24),t.writeInt32BE(this._h,28),t},t.exports=a},51686:(t,e,r)=>{var n=r(35717),i=r(87816),o=r(24189),s=r(89509).Buffer,u=new Array(160);function a(){this.init(),this._w=u,o.call(this,128,112)}n(a,i),a.prototype.init=function(){return this._ah=3418070365,this._bh=1654270250,this._ch=2438529370,this._dh=355462360,this._eh=1731405415,this._fh=2394180231,this._gh=3675008525,this._hh=1203062813,this._al=3238371032,this._bl=914150663,this._cl=812702999,this._dl=4144912697,this._el=4290775857,this._fl=1750603025,this._gl=1694076839,this._hl=3204075428,this},a.prototype._hash=function(){var t=s.allocUnsafe(48);function e(e,r,n){t.writeInt32BE(e,n),t.writeInt32BE(r,n+4)}return e(this._ah,this._al,0),e(this._bh,this._bl,8),e(this._ch,this._cl,16),e(this._dh,this._dl,24),e(this._eh,this._el,32),e(this._fh,this._fl,40),t},t.exports=a},87816:(t,e,r)=>{var n=r(35717),i=r(24189),o=r(89509).Buffer,s=[1116352408,3609767458,1899447441,602891725,3049323471,3964484399,3921009573,2173295548,961987163,4081628472,1508970993,3053834265,2453635748,2937671579,2870763221,3664609560,3624381080,2734883394,310598401,1164996542,607225278,1323610764,1426881987,3590304994,1925078388,4068182383,2162078206,991336113,2614888103,633803317,3248222580,3479774868,3835390401,2666613458,4022224774,944711139,264347078,2341262773,604807628,2007800933,770255983,1495990901,1249150122,1856431235,1555081692,3175218132,1996064986,2198950837,2554220882,3999719339,2821834349,766784016,2952996808,2566594879,3210313671,3203337956,3336571891,1034457026,3584528711,2466948901,113926993,3758326383,338241895,168717936,666307205,1188179964,773529912,1546045734,1294757372,1522805485,1396182291,2643833823,1695183700,2343527390,1986661051,1014477480,2177026350,1206759142,2456956037,344077627,2730485921,1290863460,2820302411,3158454273,3259730800,3505952657,3345764771,106217008,3516065817,3606008344,3600352804,1432725776,4094571909,1467031594,275423344,851169720,430227734,3100823752,506948616,1363258195,659060556,3750685593,883997877,3785050280,958139571,3318307427,1322822218,3812723403,1537002063,2003034995,1747873779,3602036899,1955562222,1575990012,2024104815,1125592928,2227730452,2716904306,2361852424,442776044,2428436474,593698344,2756734187,3733110249,3204031479,2999351573,3329325298,3815920427,3391569614,3928383900,3515267271,566280711,3940187606,3454069534,4118630271,4000239992,116418474,1914138554,174292421,2731055270,289380356,3203993006,460393269,320620315,685471733,587496836,852142971,1086792851,1017036298,365543100,1126000580,2618297676,1288033470,3409855158,1501505948,4234509866,1607167915,987167468,1816402316,1246189591],u=new Array(160);function a(){this.init(),this._w=u,i.call(this,128,112)}function c(t,e,r){return r^t&(e^r)}function f(t,e,r){return t&e|r&(t|e)}function l(t,e){return(t>>>28|e<<4)^(e>>>2|t<<30)^(e>>>7|t<<25)}function h(t,e){return(t>>>14|e<<18)^(t>>>18|e<<14)^(e>>>9|t<<23)}function p(t,e){return(t>>>1|e<<31)^(t>>>8|e<<24)^t>>>7}function d(t,e){return(t>>>1|e<<31)^(t>>>8|e<<24)^(t>>>7|e<<25)}function y(t,e){return(t>>>19|e<<13)^(e>>>29|t<<3)^t>>>6}function g(t,e){return(t>>>19|e<<13)^(e>>>29|t<<3)^(t>>>6|e<<26)}function v(t,e){return t>>>0<e>>>0?1:0}n(a,i),a.prototype.init=function(){return this._ah=1779033703,this._bh=3144134277,this._ch=1013904242,this._dh=2773480762,this._eh=1359893119,this._fh=2600822924,this._gh=528734635,this._hh=1541459225,this._al=4089235720,this._bl=2227873595,this._cl=4271175723,this._dl=1595750129,this._el=2917565137,this._fl=725511199,this._gl=4215389547,this._hl=327033209,this},a.prototype._update=function(t){for(var e=this._w,r=0|this._ah,n=0|this._bh,i=0|this._ch,o=0|this._dh,u=0|this._eh,a=0|this._fh,w=0|this._gh,M=0|this._hh,L=0|this._al,_=0|this._bl,m=0|this._cl,b=0|this._dl,x=0|this._el,j=0|this._fl,N=0|this._gl,S=0|this._hl,D=0;D<32;D+=2)e[D]=t.readInt32BE(4*D),e[D+1]=t.readInt32BE(4*D+4);for(;D<160;D+=2){var I=e[D-30],E=e[D-30+1],A=p(I,E),C=d(E,I),T=y(I=e[D-4],E=e[D-4+1]),O=g(E,I),z=e[D-14],k=e[D-14+1],U=e[D-32],R=e[D-32+1],Y=C+k|0,B=A+z+v(Y,C)|0;B=(B=B+T+v(Y=Y+O|0,O)|0)+U+v(Y=Y+R|0,R)|0,e[D]=B,e[D+1]=Y}for(var P=0;P<160;P+=2){B=e[P],Y=e[P+1];var Q=f(r,n,i),F=f(L,_,m),G=l(r,L),W=l(L,r),q=h(u,x),H=h(x,u),J=s[P],$=s[P+1],Z=c(u,a,w),V=c(x,j,N),X=S+H|0,K=M+q+v(X,S)|0;K=(K=(K=K+Z+v(X=X+V|0,V)|0)+J+v(X=X+$|0,$)|0)+B+v(X=X+Y|0,Y)|0;var tt=W+F|0,et=G+Q+v(tt,W)|0;M=w,S=N,w=a,N=j,a=u,j=x,u=o+K+v(x=b+X|0,b)|0,o=i,b=m,i=n,m=_,n=r,_=L,r=K+et+v(L=X+tt|0,X)|0}this._al=this._al+L|0,this._bl=this._bl+_|0,this._cl=this._cl+m|0,this._dl=this._dl+b|0,this._el=this._el+x|0,this._fl=this._fl+j|0,this._gl=this._gl+N|0,this._hl=this._hl+S|0,this._ah=this._ah+r+v(this._al,L)|0,this._bh=this._bh+n+v(this._bl,_)|0,this._ch=this._ch+i+v(this._cl,m)|0,this._dh=this._dh+o+v(this._dl,b)|0,this._eh=this._eh+u+v(this._el,x)|0,this._fh=this._fh+a+v(this._fl,j)|0,this._gh=this._gh+w+v(this._gl,N)|0,this._hh=this._hh+M+v(this._hl,S)|0},a.prototype._hash=function(){var t=o.allocUnsafe(64);function e(e,r,n){t.writeInt32BE(e,n),t.writeInt32BE(r,n+4)}return e(this._ah,this._al,0),e(this._bh,this._bl,8),e(this._ch,this._cl,16),e(this._dh,this._dl,24),e(this._eh,this._el,32),e(this._fh,this._fl,40),e(this._gh,this._gl,48),e(this._hh,this._hl,56),t},t.exports=a},42830:(t,e,r)=>{t.exports=i;var n=r(17187).EventEmitter;function i(){n.call(this)}r(35717)(i,n),i.Readable=r(79481),i.Writable=r(64229),i.Duplex=r(56753),i.Transform=r(74605),i.PassThrough=r(82725),i.finished=r(8610),i.pipeline=r(59946),i.Stream=i,i.prototype.pipe=function(t,e){var r=this;function i(e){t.writable&&!1===t.write(e)&&r.pause&&r.pause()}function o(){r.readable&&r.resume&&r.resume()}r.on("data",i),t.on("drain",o),t._isStdio||e&&!1===e.end||(r.on("end",u),r.on("close",a));var s=!1;function u(){s||(s=!0,t.end())}function a(){s||(s=!0,"function"==typeof t.destroy&&t.destroy())}function c(t){if(f(),0===n.listenerCount(this,"error"))throw t}function f(){r.removeListener("data",i),t.removeListener("drain",o),r.removeListener("end",u),r.removeListener("close",a),r.removeListener("error",c),t.removeListener("error",c),r.removeListener("end",f),r.removeListener("close",f),t.removeListener("close",f)}return r.on("error",c),t.on("error",c),r.on("end",f),r.on("close",f),t.on("close",f),t.emit("pipe",r),t}},32553:(t,e,r)=>{"use strict";var n=r(89509).Buffer,i=n.isEncoding||function(t){switch((t=""+t)&&t.toLowerCase()){case"hex":case"utf8":case"utf-8":case"ascii":case"binary":case"base64":case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":case"raw":return!0;default:return!1}};function o(t){var e;switch(this.encoding=function(t){var e=function(t){if(!t)return"utf8";for(var e;;)switch(t){case"utf8":case"utf-8":return"utf8";case"ucs2":case"ucs-2":case"utf16le":case"utf-16le":return"utf16le";case"latin1":case"binary":return"latin1";case"base64":case"ascii":case"hex":return t;default:if(e)return;t=(""+t).toLowerCase(),e=!0}}(t);if("string"!=typeof e&&(n.isEncoding===i||!i(t)))throw new Error("Unknown encoding: "+t);return e||t}(t),this.encoding){case"utf16le":this.text=a,this.end=c,e=4;break;case"utf8":this.fillLast=u,e=4;break;case"base64":this.text=f,this.end=l,e=3;break;default:return this.write=h,void(this.end=p)}this.lastNeed=0,this.lastTotal=0,this.lastChar=n.allocUnsafe(e)}function s(t){return t<=127?0:t>>5==6?2:t>>4==14?3:t>>3==30?4:t>>6==2?-1:-2}function u(t){var e=this.lastTotal-this.lastNeed,r=function(t,e,r){if(128!=(192&e[0]))return t.lastNeed=0,"�";if(t.lastNeed>1&&e.length>1){if(128!=(192&e[1]))return t.lastNeed=1,"�";if(t.lastNeed>2&&e.length>2&&128!=(192&e[2]))return t.lastNeed=2,"�"}}(this,t);return void 0!==r?r:this.lastNeed<=t.length?(t.copy(this.lastChar,e,0,this.lastNeed),this.lastChar.toString(this.encoding,0,this.lastTotal)):(t.copy(this.lastChar,e,0,t.length),void(this.lastNeed-=t.length))}function a(t,e){if((t.length-e)%2==0){var r=t.toString("utf16le",e);if(r){var n=r.charCodeAt(r.length-1);if(n>=55296&&n<=56319)return this.lastNeed=2,this.lastTotal=4,this.lastChar[0]=t[t.length-2],this.lastChar[1]=t[t.length-1],r.slice(0,-1)}return r}return this.lastNeed=1,this.lastTotal=2,this.lastChar[0]=t[t.length-1],t.toString("utf16le",e,t.length-1)}function c(t){var e=t&&t.length?this.write(t):"";if(this.lastNeed){var r=this.lastTotal-this.lastNeed;return e+this.lastChar.toString("utf16le",0,r)}return e}function f(t,e){var r=(t.length-e)%3;return 0===r?t.toString("base64",e):(this.lastNeed=3-r,this.lastTotal=3,1===r?this.lastChar[0]=t[t.length-1]:(this.lastChar[0]=t[t.length-2],this.lastChar[1]=t[t.length-1]),t.toString("base64",e,t.length-r))}function l(t){var e=t&&t.length?this.write(t):"";return this.lastNeed?e+this.lastChar.toString("base64",0,3-this.lastNeed):e}function h(t){return t.toString(this.encoding)}function p(t){return t&&t.length?this.write(t):""}e.s=o,o.prototype.write=function(t){if(0===t.length)return"";var e,r;if(this.lastNeed){if(void 0===(e=this.fillLast(t)))return"";r=this.lastNeed,this.lastNeed=0}else r=0;return r<t.length?e?e+this.text(t,r):this.text(t,r):e||""},o.prototype.end=function(t){var e=t&&t.length?this.write(t):"";return this.lastNeed?e+"�":e},o.prototype.text=function(t,e){var r=function(t,e,r){var n=e.length-1;if(n<r)return 0;var i=s(e[n]);if(i>=0)return i>0&&(t.lastNeed=i-1),i;if(--n<r||-2===i)return 0;if(i=s(e[n]),i>=0)return i>0&&(t.lastNeed=i-2),i;if(--n<r||-2===i)return 0;if(i=s(e[n]),i>=0)return i>0&&(2===i?i=0:t.lastNeed=i-3),i;return 0}(this,t,e);if(!this.lastNeed)return t.toString("utf8",e);this.lastTotal=r;var n=t.length-(r-this.lastNeed);return t.copy(this.lastChar,0,n),t.toString("utf8",e,n)},o.prototype.fillLast=function(t){if(this.lastNeed<=t.length)return t.copy(this.lastChar,this.lastTotal-this.lastNeed,0,this.lastNeed),this.lastChar.toString(this.encoding,0,this.lastTotal);t.copy(this.lastChar,this.lastTotal-this.lastNeed,0,t.length),this.lastNeed-=t.length}},94927:(t,e,r)=>{function n(t){try{if(!r.g.localStorage)return!1}catch(t){return!1}var e=r.g.localStorage[t];return null!=e&&"true"===String(e).toLowerCase()}t.exports=function(t,e){if(n("noDeprecation"))return t;var r=!1;return function(){if(!r){if(n("throwDeprecation"))throw new Error(e);n("traceDeprecation")?console.trace(e):console.warn(e),r=!0}return t.apply(this,arguments)}}},80255:t=>{var e={"&":"&amp;",'"':"&quot;","'":"&apos;","<":"&lt;",">":"&gt;"};t.exports=function(t){return t&&t.replace?t.replace(/([&"<>'])/g,(function(t,r){return e[r]})):t}},53479:(t,e,r)=>{var n=r(34155),i=r(80255),o=r(42830).Stream,s="    ";function u(t,e,r){r=r||0;var n,o,s=(n=e,new Array(r||0).join(n||"")),a=t;if("object"==typeof t&&((a=t[o=Object.keys(t)[0]])&&a._elem))return a._elem.name=o,a._elem.icount=r,a._elem.indent=e,a._elem.indents=s,a._elem.interrupt=a,a._elem;var c,f=[],l=[];function h(t){Object.keys(t).forEach((function(e){f.push(function(t,e){return t+'="'+i(e)+'"'}(e,t[e]))}))}switch(typeof a){case"object":if(null===a)break;a._attr&&h(a._attr),a._cdata&&l.push(("<![CDATA["+a._cdata).replace(/\]\]>/g,"]]]]><![CDATA[>")+"]]>"),a.forEach&&(c=!1,l.push(""),a.forEach((function(t){"object"==typeof t?"_attr"==Object.keys(t)[0]?h(t._attr):l.push(u(t,e,r+1)):(l.pop(),c=!0,l.push(i(t)))})),c||l.push(""));break;default:l.push(i(a))}return{name:o,interrupt:!1,attributes:f,content:l,icount:r,indents:s,indent:e}}function a(t,e,r){if("object"!=typeof e)return t(!1,e);var n=e.interrupt?1:e.content.length;function i(){for(;e.content.length;){var i=e.content.shift();if(void 0!==i){if(o(i))return;a(t,i)}}t(!1,(n>1?e.indents:"")+(e.name?"</"+e.name+">":"")+(e.indent&&!r?"\n":"")),r&&r()}function o(e){return!!e.interrupt&&(e.interrupt.append=t,e.interrupt.end=i,e.interrupt=!1,t(!0),!0)}if(t(!1,e.indents+(e.name?"<"+e.name:"")+(e.attributes.length?" "+e.attributes.join(" "):"")+(n?e.name?">":"":e.name?"/>":"")+(e.indent&&n>1?"\n":"")),!n)return t(!1,e.indent?"\n":"");o(e)||i()}t.exports=function(t,e){"object"!=typeof e&&(e={indent:e});var r,i,c=e.stream?new o:null,f="",l=!1,h=e.indent?!0===e.indent?s:e.indent:"",p=!0;function d(t){p?n.nextTick(t):t()}function y(t,e){if(void 0!==e&&(f+=e),t&&!l&&(c=c||new o,l=!0),t&&l){var r=f;d((function(){c.emit("data",r)})),f=""}}function g(t,e){a(y,u(t,h,h?1:0),e)}function v(){if(c){var t=f;d((function(){c.emit("data",t),c.emit("end"),c.readable=!1,c.emit("close")}))}}return d((function(){p=!1})),e.declaration&&(r=e.declaration,i={version:"1.0",encoding:r.encoding||"UTF-8"},r.standalone&&(i.standalone=r.standalone),g({"?xml":{_attr:i}}),f=f.replace("/>","?>")),t&&t.forEach?t.forEach((function(e,r){var n;r+1===t.length&&(n=v),g(e,n)})):g(t,v),c?(c.readable=!0,c):f},t.exports.element=t.exports.Element=function(){var t={_elem:u(Array.prototype.slice.call(arguments)),push:function(t){if(!this.append)throw new Error("not assigned to a parent!");var e=this,r=this._elem.indent;a(this.append,u(t,r,this._elem.icount+(r?1:0)),(function(){e.append(!0)}))},close:function(t){void 0!==t&&this.push(t),this.end&&this.end()}};return t}},52361:()=>{},94616:()=>{},25110:(t,e,r)=>{t.exports=r(27698)},58309:(t,e,r)=>{t.exports=r(83363)},11189:(t,e,r)=>{r(28196)},39022:(t,e,r)=>{t.exports=r(8065)},74386:(t,e,r)=>{r(57448)},2250:(t,e,r)=>{t.exports=r(29455)},47475:(t,e,r)=>{t.exports=r(69743)},14418:(t,e,r)=>{r(11955)},12373:(t,e,r)=>{t.exports=r(96064)},51679:(t,e,r)=>{t.exports=r(61577)},86:(t,e,r)=>{t.exports=r(46279)},58118:(t,e,r)=>{t.exports=r(33778)},11882:(t,e,r)=>{t.exports=r(19373)},8712:(t,e,r)=>{t.exports=r(73819)},97606:(t,e,r)=>{t.exports=r(61798)},24282:(t,e,r)=>{r(52527)},24278:(t,e,r)=>{t.exports=r(82073)},92039:(t,e,r)=>{t.exports=r(45286)},2578:(t,e,r)=>{r(62856)},27043:(t,e,r)=>{r(35178)},81607:(t,e,r)=>{r(76361)},35627:(t,e,r)=>{t.exports=r(8933)},18492:(t,e,r)=>{t.exports=r(15868)},76986:(t,e,r)=>{t.exports=r(63383)},28222:(t,e,r)=>{t.exports=r(23059)},48216:(t,e,r)=>{t.exports=r(14122)},67552:(t,e,r)=>{t.exports=r(60269)},57445:(t,e,r)=>{t.exports=r(73685)},52472:(t,e,r)=>{t.exports=r(86600)},48994:(t,e,r)=>{t.exports=r(9759)},40024:(t,e,r)=>{t.exports=r(71384)},61125:(t,e,r)=>{var n=r(57445),i=r(57696);t.exports=function(t,e,r){return(e=i(e))in t?n(t,e,{value:r,enumerable:!0,configurable:!0,writable:!0}):t[e]=r,t},t.exports.__esModule=!0,t.exports.default=t.exports},23101:(t,e,r)=>{var n=r(67552),i=r(48216);function o(){var e;return t.exports=o=n?i(e=n).call(e):function(t){for(var e=1;e<arguments.length;e++){var r=arguments[e];for(var n in r)Object.prototype.hasOwnProperty.call(r,n)&&(t[n]=r[n])}return t},t.exports.__esModule=!0,t.exports.default=t.exports,o.apply(this,arguments)}t.exports=o,t.exports.__esModule=!0,t.exports.default=t.exports},18504:(t,e,r)=>{var n=r(40024),i=r(20474).default;t.exports=function(t,e){if("object"!==i(t)||null===t)return t;var r=t[n];if(void 0!==r){var o=r.call(t,e||"default");if("object"!==i(o))return o;throw new TypeError("@@toPrimitive must return a primitive value.")}return("string"===e?String:Number)(t)},t.exports.__esModule=!0,t.exports.default=t.exports},57696:(t,e,r)=>{var n=r(20474).default,i=r(18504);t.exports=function(t){var e=i(t,"string");return"symbol"===n(e)?e:String(e)},t.exports.__esModule=!0,t.exports.default=t.exports},20474:(t,e,r)=>{var n=r(52472),i=r(48994);function o(e){return t.exports=o="function"==typeof n&&"symbol"==typeof i?function(t){return typeof t}:function(t){return t&&"function"==typeof n&&t.constructor===n&&t!==n.prototype?"symbol":typeof t},t.exports.__esModule=!0,t.exports.default=t.exports,o(e)}t.exports=o,t.exports.__esModule=!0,t.exports.default=t.exports}},e={};function r(n){var i=e[n];if(void 0!==i)return i.exports;var o=e[n]={id:n,loaded:!1,exports:{}};return t[n].call(o.exports,o,o.exports,r),o.loaded=!0,o.exports}r.n=t=>{var e=t&&t.__esModule?()=>t.default:()=>t;return r.d(e,{a:e}),e},r.d=(t,e)=>{for(var n in e)r.o(e,n)&&!r.o(t,n)&&Object.defineProperty(t,n,{enumerable:!0,get:e[n]})},r.g=function(){if("object"==typeof globalThis)return globalThis;try{return this||new Function("return this")()}catch(t){if("object"==typeof window)return window}}(),r.o=(t,e)=>Object.prototype.hasOwnProperty.call(t,e),r.r=t=>{"undefined"!=typeof Symbol&&Symbol.toStringTag&&Object.defineProperty(t,Symbol.toStringTag,{value:"Module"}),Object.defineProperty(t,"__esModule",{value:!0})},r.nmd=t=>(t.paths=[],t.children||(t.children=[]),t);var n={};return(()=>{"use strict";r.d(n,{default:()=>Dn});var t={};r.r(t),r.d(t,{TOGGLE_CONFIGS:()=>an,UPDATE_CONFIGS:()=>un,loaded:()=>ln,toggle:()=>fn,update:()=>cn});var e={};r.r(e),r.d(e,{downloadConfig:()=>hn,getConfigByUrl:()=>pn});var i={};r.r(i),r.d(i,{get:()=>dn});var o=r(67294);class s extends o.Component{render(){const{getComponent:t}=this.props,e=t("Container"),r=t("Row"),n=t("Col"),i=t("Topbar",!0),s=t("BaseLayout",!0),u=t("onlineValidatorBadge",!0);return o.createElement(e,{className:"swagger-ui"},i?o.createElement(i,null):null,o.createElement(s,null),o.createElement(r,null,o.createElement(n,null,o.createElement(u,null))))}}var u=r(61125),a=r.n(u),c=r(86),f=r.n(c),l=r(97606),h=r.n(l),p=r(58309),d=r.n(p),y=(r(74386),r(14418),r(28222)),g=r.n(y),v=(r(11189),r(24282),r(76986)),w=r.n(v),M=(r(2578),r(24278)),L=r.n(M),_=r(39022),m=r.n(_),b=r(92039),x=r.n(b),j=r(58118),N=r.n(j),S=r(35627),D=r.n(S),I=r(11882),E=r.n(I),A=r(51679),C=r.n(A),T=(r(27043),r(81607),r(43393)),O=r.n(T),z=(r(17967),r(68929),r(11700),r(88306)),k=r.n(z),U=(r(13311),r(59704),r(77813),r(23560),r(53479)),R=r.n(U),Y=r(14419),B=r.n(Y),P=r(41609),Q=r.n(P),F=r(2250),G=r.n(F),W=r(25110),q=r.n(W),H=r(8712),J=r.n(H),$=r(12373),Z=r.n($),V=r(18492),X=r.n(V);const K=t=>e=>d()(t)&&d()(e)&&t.length===e.length&&G()(t).call(t,((t,r)=>t===e[r])),tt=function(){for(var t=arguments.length,e=new Array(t),r=0;r<t;r++)e[r]=arguments[r];return e};class et extends(X()){delete(t){const e=q()(J()(this).call(this)),r=C()(e).call(e,K(t));return super.delete(r)}get(t){const e=q()(J()(this).call(this)),r=C()(e).call(e,K(t));return super.get(r)}has(t){const e=q()(J()(this).call(this));return-1!==Z()(e).call(e,K(t))}}const rt=function(t){let e=arguments.length>1&&void 0!==arguments[1]?arguments[1]:tt;const{Cache:r}=k();k().Cache=et;const n=k()(t,e);return k().Cache=r,n},nt={string:t=>t.pattern?(t=>{try{return new(B())(t).gen()}catch(t){return"string"}})(t.pattern):"string",string_email:()=>"user@example.com","string_date-time":()=>(new Date).toISOString(),string_date:()=>(new Date).toISOString().substring(0,10),string_uuid:()=>"3fa85f64-5717-4562-b3fc-2c963f66afa6",string_hostname:()=>"example.com",string_ipv4:()=>"198.51.100.42",string_ipv6:()=>"2001:0db8:5b96:0000:0000:426f:8e17:642a",number:()=>0,number_float:()=>0,integer:()=>0,boolean:t=>"boolean"!=typeof t.default||t.default},it=t=>{t=Vr(t);let{type:e,format:r}=t,n=nt[`${e}_${r}`]||nt[e];return tn(n)?n(t):"Unknown Type: "+t.type},ot=t=>rn(t,"$$ref",(t=>"string"==typeof t&&E()(t).call(t,"#")>-1)),st=["maxProperties","minProperties"],ut=["minItems","maxItems"],at=["minimum","maximum","exclusiveMinimum","exclusiveMaximum"],ct=["minLength","maxLength"],ft=function(t,e){var r;let n=arguments.length>2&&void 0!==arguments[2]?arguments[2]:{};var i;(f()(r=["example","default","enum","xml","type",...st,...ut,...at,...ct]).call(r,(r=>(r=>{void 0===e[r]&&void 0!==t[r]&&(e[r]=t[r])})(r))),void 0!==t.required&&d()(t.required))&&(void 0!==e.required&&e.required.length||(e.required=[]),f()(i=t.required).call(i,(t=>{var r;N()(r=e.required).call(r,t)||e.required.push(t)})));if(t.properties){e.properties||(e.properties={});let r=Vr(t.properties);for(let i in r){var o;if(Object.prototype.hasOwnProperty.call(r,i))if(!r[i]||!r[i].deprecated)if(!r[i]||!r[i].readOnly||n.includeReadOnly)if(!r[i]||!r[i].writeOnly||n.includeWriteOnly)if(!e.properties[i])e.properties[i]=r[i],!t.required&&d()(t.required)&&-1!==E()(o=t.required).call(o,i)&&(e.required?e.required.push(i):e.required=[i])}}return t.items&&(e.items||(e.items={}),e.items=ft(t.items,e.items,n)),e},lt=function(t){let e=arguments.length>1&&void 0!==arguments[1]?arguments[1]:{},r=arguments.length>2&&void 0!==arguments[2]?arguments[2]:void 0,n=arguments.length>3&&void 0!==arguments[3]&&arguments[3];t&&tn(t.toJS)&&(t=t.toJS());let i=void 0!==r||t&&void 0!==t.example||t&&void 0!==t.default;const o=!i&&t&&t.oneOf&&t.oneOf.length>0,s=!i&&t&&t.anyOf&&t.anyOf.length>0;if(!i&&(o||s)){const r=Vr(o?t.oneOf[0]:t.anyOf[0]);if(ft(r,t,e),!t.xml&&r.xml&&(t.xml=r.xml),void 0!==t.example&&void 0!==r.example)i=!0;else if(r.properties){t.properties||(t.properties={});let n=Vr(r.properties);for(let i in n){var u;if(Object.prototype.hasOwnProperty.call(n,i))if(!n[i]||!n[i].deprecated)if(!n[i]||!n[i].readOnly||e.includeReadOnly)if(!n[i]||!n[i].writeOnly||e.includeWriteOnly)if(!t.properties[i])t.properties[i]=n[i],!r.required&&d()(r.required)&&-1!==E()(u=r.required).call(u,i)&&(t.required?t.required.push(i):t.required=[i])}}}const a={};let{xml:c,type:l,example:p,properties:y,additionalProperties:g,items:v}=t||{},{includeReadOnly:w,includeWriteOnly:M}=e;c=c||{};let _,{name:b,prefix:j,namespace:S}=c,D={};if(n&&(b=b||"notagname",_=(j?j+":":"")+b,S)){a[j?"xmlns:"+j:"xmlns"]=S}n&&(D[_]=[]);const I=e=>x()(e).call(e,(e=>Object.prototype.hasOwnProperty.call(t,e)));t&&!l&&(y||g||I(st)?l="object":v||I(ut)?l="array":I(at)?(l="number",t.type="number"):i||t.enum||(l="string",t.type="string"));const A=e=>{var r,n,i,o,s;null!==(null===(r=t)||void 0===r?void 0:r.maxItems)&&void 0!==(null===(n=t)||void 0===n?void 0:n.maxItems)&&(e=L()(e).call(e,0,null===(s=t)||void 0===s?void 0:s.maxItems));if(null!==(null===(i=t)||void 0===i?void 0:i.minItems)&&void 0!==(null===(o=t)||void 0===o?void 0:o.minItems)){let r=0;for(;e.length<(null===(u=t)||void 0===u?void 0:u.minItems);){var u;e.push(e[r++%e.length])}}return e},T=Vr(y);let O,z=0;const k=()=>t&&null!==t.maxProperties&&void 0!==t.maxProperties&&z>=t.maxProperties,U=e=>!t||null===t.maxProperties||void 0===t.maxProperties||!k()&&(!(e=>{var r;return!(t&&t.required&&t.required.length&&N()(r=t.required).call(r,e))})(e)||t.maxProperties-z-(()=>{if(!t||!t.required)return 0;let e=0;var r,i;return n?f()(r=t.required).call(r,(t=>e+=void 0===D[t]?0:1)):f()(i=t.required).call(i,(t=>{var r;return e+=void 0===(null===(r=D[_])||void 0===r?void 0:C()(r).call(r,(e=>void 0!==e[t])))?0:1})),t.required.length-e})()>0);if(O=n?function(r){let i=arguments.length>1&&void 0!==arguments[1]?arguments[1]:void 0;if(t&&T[r]){if(T[r].xml=T[r].xml||{},T[r].xml.attribute){const t=d()(T[r].enum)?T[r].enum[0]:void 0,e=T[r].example,n=T[r].default;return void(a[T[r].xml.name||r]=void 0!==e?e:void 0!==n?n:void 0!==t?t:it(T[r]))}T[r].xml.name=T[r].xml.name||r}else T[r]||!1===g||(T[r]={xml:{name:r}});let o=lt(t&&T[r]||void 0,e,i,n);var s;U(r)&&(z++,d()(o)?D[_]=m()(s=D[_]).call(s,o):D[_].push(o))}:(r,i)=>{if(U(r)){if(Object.prototype.hasOwnProperty.call(t,"discriminator")&&t.discriminator&&Object.prototype.hasOwnProperty.call(t.discriminator,"mapping")&&t.discriminator.mapping&&Object.prototype.hasOwnProperty.call(t,"$$ref")&&t.$$ref&&t.discriminator.propertyName===r){for(let e in t.discriminator.mapping)if(-1!==t.$$ref.search(t.discriminator.mapping[e])){D[r]=e;break}}else D[r]=lt(T[r],e,i,n);z++}},i){let i;if(i=ot(void 0!==r?r:void 0!==p?p:t.default),!n){if("number"==typeof i&&"string"===l)return`${i}`;if("string"!=typeof i||"string"===l)return i;try{return JSON.parse(i)}catch(t){return i}}if(t||(l=d()(i)?"array":typeof i),"array"===l){if(!d()(i)){if("string"==typeof i)return i;i=[i]}const r=t?t.items:void 0;r&&(r.xml=r.xml||c||{},r.xml.name=r.xml.name||c.name);let o=h()(i).call(i,(t=>lt(r,e,t,n)));return o=A(o),c.wrapped?(D[_]=o,Q()(a)||D[_].push({_attr:a})):D=o,D}if("object"===l){if("string"==typeof i)return i;for(let e in i)Object.prototype.hasOwnProperty.call(i,e)&&(t&&T[e]&&T[e].readOnly&&!w||t&&T[e]&&T[e].writeOnly&&!M||(t&&T[e]&&T[e].xml&&T[e].xml.attribute?a[T[e].xml.name||e]=i[e]:O(e,i[e])));return Q()(a)||D[_].push({_attr:a}),D}return D[_]=Q()(a)?i:[{_attr:a},i],D}if("object"===l){for(let t in T)Object.prototype.hasOwnProperty.call(T,t)&&(T[t]&&T[t].deprecated||T[t]&&T[t].readOnly&&!w||T[t]&&T[t].writeOnly&&!M||O(t));if(n&&a&&D[_].push({_attr:a}),k())return D;if(!0===g)n?D[_].push({additionalProp:"Anything can be here"}):D.additionalProp1={},z++;else if(g){const r=Vr(g),i=lt(r,e,void 0,n);if(n&&r.xml&&r.xml.name&&"notagname"!==r.xml.name)D[_].push(i);else{const e=null!==t.minProperties&&void 0!==t.minProperties&&z<t.minProperties?t.minProperties-z:3;for(let t=1;t<=e;t++){if(k())return D;if(n){const e={};e["additionalProp"+t]=i.notagname,D[_].push(e)}else D["additionalProp"+t]=i;z++}}}return D}if("array"===l){if(!v)return;let r;var R,Y;if(n)v.xml=v.xml||(null===(R=t)||void 0===R?void 0:R.xml)||{},v.xml.name=v.xml.name||c.name;if(d()(v.anyOf))r=h()(Y=v.anyOf).call(Y,(t=>lt(ft(v,t,e),e,void 0,n)));else if(d()(v.oneOf)){var B;r=h()(B=v.oneOf).call(B,(t=>lt(ft(v,t,e),e,void 0,n)))}else{if(!(!n||n&&c.wrapped))return lt(v,e,void 0,n);r=[lt(v,e,void 0,n)]}return r=A(r),n&&c.wrapped?(D[_]=r,Q()(a)||D[_].push({_attr:a}),D):r}let P;if(t&&d()(t.enum))P=Xr(t.enum)[0];else{if(!t)return;if(P=it(t),"number"==typeof P){let e=t.minimum;null!=e&&(t.exclusiveMinimum&&e++,P=e);let r=t.maximum;null!=r&&(t.exclusiveMaximum&&r--,P=r)}if("string"==typeof P&&(null!==t.maxLength&&void 0!==t.maxLength&&(P=L()(P).call(P,0,t.maxLength)),null!==t.minLength&&void 0!==t.minLength)){let e=0;for(;P.length<t.minLength;)P+=P[e++%P.length]}}if("file"!==l)return n?(D[_]=Q()(a)?P:[{_attr:a},P],D):P},ht=(t,e,r)=>[t,D()(e),D()(r)];rt(((t,e,r)=>{const n=lt(t,e,r,!0);if(n)return"string"==typeof n?n:R()(n,{declaration:!0,indent:"\t"})}),ht),rt(((t,e,r)=>lt(t,e,r,!1)),ht);const pt=function(){var t={location:{},history:{},open:()=>{},close:()=>{},File:function(){}};if("undefined"==typeof window)return t;try{t=window;for(var e of["File","Blob","FormData"])e in window&&(t[e]=window[e])}catch(t){console.error(t)}return t}();r(8269);O().Set.of("type","format","items","default","maximum","exclusiveMaximum","minimum","exclusiveMinimum","maxLength","minLength","pattern","maxItems","minItems","uniqueItems","enum","multipleOf");r(92282),r(89072);function dt(t){return null==t}var yt={isNothing:dt,isObject:function(t){return"object"==typeof t&&null!==t},toArray:function(t){return Array.isArray(t)?t:dt(t)?[]:[t]},repeat:function(t,e){var r,n="";for(r=0;r<e;r+=1)n+=t;return n},isNegativeZero:function(t){return 0===t&&Number.NEGATIVE_INFINITY===1/t},extend:function(t,e){var r,n,i,o;if(e)for(r=0,n=(o=Object.keys(e)).length;r<n;r+=1)t[i=o[r]]=e[i];return t}};function gt(t,e){var r="",n=t.reason||"(unknown reason)";return t.mark?(t.mark.name&&(r+='in "'+t.mark.name+'" '),r+="("+(t.mark.line+1)+":"+(t.mark.column+1)+")",!e&&t.mark.snippet&&(r+="\n\n"+t.mark.snippet),n+" "+r):n}function vt(t,e){Error.call(this),this.name="YAMLException",this.reason=t,this.mark=e,this.message=gt(this,!1),Error.captureStackTrace?Error.captureStackTrace(this,this.constructor):this.stack=(new Error).stack||""}vt.prototype=Object.create(Error.prototype),vt.prototype.constructor=vt,vt.prototype.toString=function(t){return this.name+": "+gt(this,t)};var wt=vt;function Mt(t,e,r,n,i){var o="",s="",u=Math.floor(i/2)-1;return n-e>u&&(e=n-u+(o=" ... ").length),r-n>u&&(r=n+u-(s=" ...").length),{str:o+t.slice(e,r).replace(/\t/g,"→")+s,pos:n-e+o.length}}function Lt(t,e){return yt.repeat(" ",e-t.length)+t}var _t=function(t,e){if(e=Object.create(e||null),!t.buffer)return null;e.maxLength||(e.maxLength=79),"number"!=typeof e.indent&&(e.indent=1),"number"!=typeof e.linesBefore&&(e.linesBefore=3),"number"!=typeof e.linesAfter&&(e.linesAfter=2);for(var r,n=/\r?\n|\r|\0/g,i=[0],o=[],s=-1;r=n.exec(t.buffer);)o.push(r.index),i.push(r.index+r[0].length),t.position<=r.index&&s<0&&(s=i.length-2);s<0&&(s=i.length-1);var u,a,c="",f=Math.min(t.line+e.linesAfter,o.length).toString().length,l=e.maxLength-(e.indent+f+3);for(u=1;u<=e.linesBefore&&!(s-u<0);u++)a=Mt(t.buffer,i[s-u],o[s-u],t.position-(i[s]-i[s-u]),l),c=yt.repeat(" ",e.indent)+Lt((t.line-u+1).toString(),f)+" | "+a.str+"\n"+c;for(a=Mt(t.buffer,i[s],o[s],t.position,l),c+=yt.repeat(" ",e.indent)+Lt((t.line+1).toString(),f)+" | "+a.str+"\n",c+=yt.repeat("-",e.indent+f+3+a.pos)+"^\n",u=1;u<=e.linesAfter&&!(s+u>=o.length);u++)a=Mt(t.buffer,i[s+u],o[s+u],t.position-(i[s]-i[s+u]),l),c+=yt.repeat(" ",e.indent)+Lt((t.line+u+1).toString(),f)+" | "+a.str+"\n";return c.replace(/\n$/,"")},mt=["kind","multi","resolve","construct","instanceOf","predicate","represent","representName","defaultStyle","styleAliases"],bt=["scalar","sequence","mapping"];var xt=function(t,e){if(e=e||{},Object.keys(e).forEach((function(e){if(-1===mt.indexOf(e))throw new wt('Unknown option "'+e+'" is met in definition of "'+t+'" YAML type.')})),this.options=e,this.tag=t,this.kind=e.kind||null,this.resolve=e.resolve||function(){return!0},this.construct=e.construct||function(t){return t},this.instanceOf=e.instanceOf||null,this.predicate=e.predicate||null,this.represent=e.represent||null,this.representName=e.representName||null,this.defaultStyle=e.defaultStyle||null,this.multi=e.multi||!1,this.styleAliases=function(t){var e={};return null!==t&&Object.keys(t).forEach((function(r){t[r].forEach((function(t){e[String(t)]=r}))})),e}(e.styleAliases||null),-1===bt.indexOf(this.kind))throw new wt('Unknown kind "'+this.kind+'" is specified for "'+t+'" YAML type.')};function jt(t,e){var r=[];return t[e].forEach((function(t){var e=r.length;r.forEach((function(r,n){r.tag===t.tag&&r.kind===t.kind&&r.multi===t.multi&&(e=n)})),r[e]=t})),r}function Nt(t){return this.extend(t)}Nt.prototype.extend=function(t){var e=[],r=[];if(t instanceof xt)r.push(t);else if(Array.isArray(t))r=r.concat(t);else{if(!t||!Array.isArray(t.implicit)&&!Array.isArray(t.explicit))throw new wt("Schema.extend argument should be a Type, [ Type ], or a schema definition ({ implicit: [...], explicit: [...] })");t.implicit&&(e=e.concat(t.implicit)),t.explicit&&(r=r.concat(t.explicit))}e.forEach((function(t){if(!(t instanceof xt))throw new wt("Specified list of YAML types (or a single Type object) contains a non-Type object.");if(t.loadKind&&"scalar"!==t.loadKind)throw new wt("There is a non-scalar type in the implicit list of a schema. Implicit resolving of such types is not supported.");if(t.multi)throw new wt("There is a multi type in the implicit list of a schema. Multi tags can only be listed as explicit.")})),r.forEach((function(t){if(!(t instanceof xt))throw new wt("Specified list of YAML types (or a single Type object) contains a non-Type object.")}));var n=Object.create(Nt.prototype);return n.implicit=(this.implicit||[]).concat(e),n.explicit=(this.explicit||[]).concat(r),n.compiledImplicit=jt(n,"implicit"),n.compiledExplicit=jt(n,"explicit"),n.compiledTypeMap=function(){var t,e,r={scalar:{},sequence:{},mapping:{},fallback:{},multi:{scalar:[],sequence:[],mapping:[],fallback:[]}};function n(t){t.multi?(r.multi[t.kind].push(t),r.multi.fallback.push(t)):r[t.kind][t.tag]=r.fallback[t.tag]=t}for(t=0,e=arguments.length;t<e;t+=1)arguments[t].forEach(n);return r}(n.compiledImplicit,n.compiledExplicit),n};var St=Nt,Dt=new xt("tag:yaml.org,2002:str",{kind:"scalar",construct:function(t){return null!==t?t:""}}),It=new xt("tag:yaml.org,2002:seq",{kind:"sequence",construct:function(t){return null!==t?t:[]}}),Et=new xt("tag:yaml.org,2002:map",{kind:"mapping",construct:function(t){return null!==t?t:{}}}),At=new St({explicit:[Dt,It,Et]});var Ct=new xt("tag:yaml.org,2002:null",{kind:"scalar",resolve:function(t){if(null===t)return!0;var e=t.length;return 1===e&&"~"===t||4===e&&("null"===t||"Null"===t||"NULL"===t)},construct:function(){return null},predicate:function(t){return null===t},represent:{canonical:function(){return"~"},lowercase:function(){return"null"},uppercase:function(){return"NULL"},camelcase:function(){return"Null"},empty:function(){return""}},defaultStyle:"lowercase"});var Tt=new xt("tag:yaml.org,2002:bool",{kind:"scalar",resolve:function(t){if(null===t)return!1;var e=t.length;return 4===e&&("true"===t||"True"===t||"TRUE"===t)||5===e&&("false"===t||"False"===t||"FALSE"===t)},construct:function(t){return"true"===t||"True"===t||"TRUE"===t},predicate:function(t){return"[object Boolean]"===Object.prototype.toString.call(t)},represent:{lowercase:function(t){return t?"true":"false"},uppercase:function(t){return t?"TRUE":"FALSE"},camelcase:function(t){return t?"True":"False"}},defaultStyle:"lowercase"});function Ot(t){return 48<=t&&t<=55}function zt(t){return 48<=t&&t<=57}var kt=new xt("tag:yaml.org,2002:int",{kind:"scalar",resolve:function(t){if(null===t)return!1;var e,r,n=t.length,i=0,o=!1;if(!n)return!1;if("-"!==(e=t[i])&&"+"!==e||(e=t[++i]),"0"===e){if(i+1===n)return!0;if("b"===(e=t[++i])){for(i++;i<n;i++)if("_"!==(e=t[i])){if("0"!==e&&"1"!==e)return!1;o=!0}return o&&"_"!==e}if("x"===e){for(i++;i<n;i++)if("_"!==(e=t[i])){if(!(48<=(r=t.charCodeAt(i))&&r<=57||65<=r&&r<=70||97<=r&&r<=102))return!1;o=!0}return o&&"_"!==e}if("o"===e){for(i++;i<n;i++)if("_"!==(e=t[i])){if(!Ot(t.charCodeAt(i)))return!1;o=!0}return o&&"_"!==e}}if("_"===e)return!1;for(;i<n;i++)if("_"!==(e=t[i])){if(!zt(t.charCodeAt(i)))return!1;o=!0}return!(!o||"_"===e)},construct:function(t){var e,r=t,n=1;if(-1!==r.indexOf("_")&&(r=r.replace(/_/g,"")),"-"!==(e=r[0])&&"+"!==e||("-"===e&&(n=-1),e=(r=r.slice(1))[0]),"0"===r)return 0;if("0"===e){if("b"===r[1])return n*parseInt(r.slice(2),2);if("x"===r[1])return n*parseInt(r.slice(2),16);if("o"===r[1])return n*parseInt(r.slice(2),8)}return n*parseInt(r,10)},predicate:function(t){return"[object Number]"===Object.prototype.toString.call(t)&&t%1==0&&!yt.isNegativeZero(t)},represent:{binary:function(t){return t>=0?"0b"+t.toString(2):"-0b"+t.toString(2).slice(1)},octal:function(t){return t>=0?"0o"+t.toString(8):"-0o"+t.toString(8).slice(1)},decimal:function(t){return t.toString(10)},hexadecimal:function(t){return t>=0?"0x"+t.toString(16).toUpperCase():"-0x"+t.toString(16).toUpperCase().slice(1)}},defaultStyle:"decimal",styleAliases:{binary:[2,"bin"],octal:[8,"oct"],decimal:[10,"dec"],hexadecimal:[16,"hex"]}}),Ut=new RegExp("^(?:[-+]?(?:[0-9][0-9_]*)(?:\\.[0-9_]*)?(?:[eE][-+]?[0-9]+)?|\\.[0-9_]+(?:[eE][-+]?[0-9]+)?|[-+]?\\.(?:inf|Inf|INF)|\\.(?:nan|NaN|NAN))$");var Rt=/^[-+]?[0-9]+e/;var Yt=new xt("tag:yaml.org,2002:float",{kind:"scalar",resolve:function(t){return null!==t&&!(!Ut.test(t)||"_"===t[t.length-1])},construct:function(t){var e,r;return r="-"===(e=t.replace(/_/g,"").toLowerCase())[0]?-1:1,"+-".indexOf(e[0])>=0&&(e=e.slice(1)),".inf"===e?1===r?Number.POSITIVE_INFINITY:Number.NEGATIVE_INFINITY:".nan"===e?NaN:r*parseFloat(e,10)},predicate:function(t){return"[object Number]"===Object.prototype.toString.call(t)&&(t%1!=0||yt.isNegativeZero(t))},represent:function(t,e){var r;if(isNaN(t))switch(e){case"lowercase":return".nan";case"uppercase":return".NAN";case"camelcase":return".NaN"}else if(Number.POSITIVE_INFINITY===t)switch(e){case"lowercase":return".inf";case"uppercase":return".INF";case"camelcase":return".Inf"}else if(Number.NEGATIVE_INFINITY===t)switch(e){case"lowercase":return"-.inf";case"uppercase":return"-.INF";case"camelcase":return"-.Inf"}else if(yt.isNegativeZero(t))return"-0.0";return r=t.toString(10),Rt.test(r)?r.replace("e",".e"):r},defaultStyle:"lowercase"}),Bt=At.extend({implicit:[Ct,Tt,kt,Yt]}),Pt=Bt,Qt=new RegExp("^([0-9][0-9][0-9][0-9])-([0-9][0-9])-([0-9][0-9])$"),Ft=new RegExp("^([0-9][0-9][0-9][0-9])-([0-9][0-9]?)-([0-9][0-9]?)(?:[Tt]|[ \\t]+)([0-9][0-9]?):([0-9][0-9]):([0-9][0-9])(?:\\.([0-9]*))?(?:[ \\t]*(Z|([-+])([0-9][0-9]?)(?::([0-9][0-9]))?))?$");var Gt=new xt("tag:yaml.org,2002:timestamp",{kind:"scalar",resolve:function(t){return null!==t&&(null!==Qt.exec(t)||null!==Ft.exec(t))},construct:function(t){var e,r,n,i,o,s,u,a,c=0,f=null;if(null===(e=Qt.exec(t))&&(e=Ft.exec(t)),null===e)throw new Error("Date resolve error");if(r=+e[1],n=+e[2]-1,i=+e[3],!e[4])return new Date(Date.UTC(r,n,i));if(o=+e[4],s=+e[5],u=+e[6],e[7]){for(c=e[7].slice(0,3);c.length<3;)c+="0";c=+c}return e[9]&&(f=6e4*(60*+e[10]+ +(e[11]||0)),"-"===e[9]&&(f=-f)),a=new Date(Date.UTC(r,n,i,o,s,u,c)),f&&a.setTime(a.getTime()-f),a},instanceOf:Date,represent:function(t){return t.toISOString()}});var Wt=new xt("tag:yaml.org,2002:merge",{kind:"scalar",resolve:function(t){return"<<"===t||null===t}}),qt="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=\n\r";var Ht=new xt("tag:yaml.org,2002:binary",{kind:"scalar",resolve:function(t){if(null===t)return!1;var e,r,n=0,i=t.length,o=qt;for(r=0;r<i;r++)if(!((e=o.indexOf(t.charAt(r)))>64)){if(e<0)return!1;n+=6}return n%8==0},construct:function(t){var e,r,n=t.replace(/[\r\n=]/g,""),i=n.length,o=qt,s=0,u=[];for(e=0;e<i;e++)e%4==0&&e&&(u.push(s>>16&255),u.push(s>>8&255),u.push(255&s)),s=s<<6|o.indexOf(n.charAt(e));return 0===(r=i%4*6)?(u.push(s>>16&255),u.push(s>>8&255),u.push(255&s)):18===r?(u.push(s>>10&255),u.push(s>>2&255)):12===r&&u.push(s>>4&255),new Uint8Array(u)},predicate:function(t){return"[object Uint8Array]"===Object.prototype.toString.call(t)},represent:function(t){var e,r,n="",i=0,o=t.length,s=qt;for(e=0;e<o;e++)e%3==0&&e&&(n+=s[i>>18&63],n+=s[i>>12&63],n+=s[i>>6&63],n+=s[63&i]),i=(i<<8)+t[e];return 0===(r=o%3)?(n+=s[i>>18&63],n+=s[i>>12&63],n+=s[i>>6&63],n+=s[63&i]):2===r?(n+=s[i>>10&63],n+=s[i>>4&63],n+=s[i<<2&63],n+=s[64]):1===r&&(n+=s[i>>2&63],n+=s[i<<4&63],n+=s[64],n+=s[64]),n}}),Jt=Object.prototype.hasOwnProperty,$t=Object.prototype.toString;var Zt=new xt("tag:yaml.org,2002:omap",{kind:"sequence",resolve:function(t){if(null===t)return!0;var e,r,n,i,o,s=[],u=t;for(e=0,r=u.length;e<r;e+=1){if(n=u[e],o=!1,"[object Object]"!==$t.call(n))return!1;for(i in n)if(Jt.call(n,i)){if(o)return!1;o=!0}if(!o)return!1;if(-1!==s.indexOf(i))return!1;s.push(i)}return!0},construct:function(t){return null!==t?t:[]}}),Vt=Object.prototype.toString;var Xt=new xt("tag:yaml.org,2002:pairs",{kind:"sequence",resolve:function(t){if(null===t)return!0;var e,r,n,i,o,s=t;for(o=new Array(s.length),e=0,r=s.length;e<r;e+=1){if(n=s[e],"[object Object]"!==Vt.call(n))return!1;if(1!==(i=Object.keys(n)).length)return!1;o[e]=[i[0],n[i[0]]]}return!0},construct:function(t){if(null===t)return[];var e,r,n,i,o,s=t;for(o=new Array(s.length),e=0,r=s.length;e<r;e+=1)n=s[e],i=Object.keys(n),o[e]=[i[0],n[i[0]]];return o}}),Kt=Object.prototype.hasOwnProperty;var te=new xt("tag:yaml.org,2002:set",{kind:"mapping",resolve:function(t){if(null===t)return!0;var e,r=t;for(e in r)if(Kt.call(r,e)&&null!==r[e])return!1;return!0},construct:function(t){return null!==t?t:{}}}),ee=Pt.extend({implicit:[Gt,Wt],explicit:[Ht,Zt,Xt,te]}),re=Object.prototype.hasOwnProperty,ne=1,ie=2,oe=3,se=4,ue=1,ae=2,ce=3,fe=/[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x84\x86-\x9F\uFFFE\uFFFF]|[\uD800-\uDBFF](?![\uDC00-\uDFFF])|(?:[^\uD800-\uDBFF]|^)[\uDC00-\uDFFF]/,le=/[\x85\u2028\u2029]/,he=/[,\[\]\{\}]/,pe=/^(?:!|!!|![a-z\-]+!)$/i,de=/^(?:!|[^,\[\]\{\}])(?:%[0-9a-f]{2}|[0-9a-z\-#;\/\?:@&=\+\$,_\.!~\*'\(\)\[\]])*$/i;function ye(t){return Object.prototype.toString.call(t)}function ge(t){return 10===t||13===t}function ve(t){return 9===t||32===t}function we(t){return 9===t||32===t||10===t||13===t}function Me(t){return 44===t||91===t||93===t||123===t||125===t}function Le(t){var e;return 48<=t&&t<=57?t-48:97<=(e=32|t)&&e<=102?e-97+10:-1}function _e(t){return 48===t?"\0":97===t?"":98===t?"\b":116===t||9===t?"\t":110===t?"\n":118===t?"\v":102===t?"\f":114===t?"\r":101===t?"":32===t?" ":34===t?'"':47===t?"/":92===t?"\\":78===t?"":95===t?" ":76===t?"\u2028":80===t?"\u2029":""}function me(t){return t<=65535?String.fromCharCode(t):String.fromCharCode(55296+(t-65536>>10),56320+(t-65536&1023))}for(var be=new Array(256),xe=new Array(256),je=0;je<256;je++)be[je]=_e(je)?1:0,xe[je]=_e(je);function Ne(t,e){this.input=t,this.filename=e.filename||null,this.schema=e.schema||ee,this.onWarning=e.onWarning||null,this.legacy=e.legacy||!1,this.json=e.json||!1,this.listener=e.listener||null,this.implicitTypes=this.schema.compiledImplicit,this.typeMap=this.schema.compiledTypeMap,this.length=t.length,this.position=0,this.line=0,this.lineStart=0,this.lineIndent=0,this.firstTabInLine=-1,this.documents=[]}function Se(t,e){var r={name:t.filename,buffer:t.input.slice(0,-1),position:t.position,line:t.line,column:t.position-t.lineStart};return r.snippet=_t(r),new wt(e,r)}function De(t,e){throw Se(t,e)}function Ie(t,e){t.onWarning&&t.onWarning.call(null,Se(t,e))}var Ee={YAML:function(t,e,r){var n,i,o;null!==t.version&&De(t,"duplication of %YAML directive"),1!==r.length&&De(t,"YAML directive accepts exactly one argument"),null===(n=/^([0-9]+)\.([0-9]+)$/.exec(r[0]))&&De(t,"ill-formed argument of the YAML directive"),i=parseInt(n[1],10),o=parseInt(n[2],10),1!==i&&De(t,"unacceptable YAML version of the document"),t.version=r[0],t.checkLineBreaks=o<2,1!==o&&2!==o&&Ie(t,"unsupported YAML version of the document")},TAG:function(t,e,r){var n,i;2!==r.length&&De(t,"TAG directive accepts exactly two arguments"),n=r[0],i=r[1],pe.test(n)||De(t,"ill-formed tag handle (first argument) of the TAG directive"),re.call(t.tagMap,n)&&De(t,'there is a previously declared suffix for "'+n+'" tag handle'),de.test(i)||De(t,"ill-formed tag prefix (second argument) of the TAG directive");try{i=decodeURIComponent(i)}catch(e){De(t,"tag prefix is malformed: "+i)}t.tagMap[n]=i}};function Ae(t,e,r,n){var i,o,s,u;if(e<r){if(u=t.input.slice(e,r),n)for(i=0,o=u.length;i<o;i+=1)9===(s=u.charCodeAt(i))||32<=s&&s<=1114111||De(t,"expected valid JSON character");else fe.test(u)&&De(t,"the stream contains non-printable characters");t.result+=u}}function Ce(t,e,r,n){var i,o,s,u;for(yt.isObject(r)||De(t,"cannot merge mappings; the provided source object is unacceptable"),s=0,u=(i=Object.keys(r)).length;s<u;s+=1)o=i[s],re.call(e,o)||(e[o]=r[o],n[o]=!0)}function Te(t,e,r,n,i,o,s,u,a){var c,f;if(Array.isArray(i))for(c=0,f=(i=Array.prototype.slice.call(i)).length;c<f;c+=1)Array.isArray(i[c])&&De(t,"nested arrays are not supported inside keys"),"object"==typeof i&&"[object Object]"===ye(i[c])&&(i[c]="[object Object]");if("object"==typeof i&&"[object Object]"===ye(i)&&(i="[object Object]"),i=String(i),null===e&&(e={}),"tag:yaml.org,2002:merge"===n)if(Array.isArray(o))for(c=0,f=o.length;c<f;c+=1)Ce(t,e,o[c],r);else Ce(t,e,o,r);else t.json||re.call(r,i)||!re.call(e,i)||(t.line=s||t.line,t.lineStart=u||t.lineStart,t.position=a||t.position,De(t,"duplicated mapping key")),"__proto__"===i?Object.defineProperty(e,i,{configurable:!0,enumerable:!0,writable:!0,value:o}):e[i]=o,delete r[i];return e}function Oe(t){var e;10===(e=t.input.charCodeAt(t.position))?t.position++:13===e?(t.position++,10===t.input.charCodeAt(t.position)&&t.position++):De(t,"a line break is expected"),t.line+=1,t.lineStart=t.position,t.firstTabInLine=-1}function ze(t,e,r){for(var n=0,i=t.input.charCodeAt(t.position);0!==i;){for(;ve(i);)9===i&&-1===t.firstTabInLine&&(t.firstTabInLine=t.position),i=t.input.charCodeAt(++t.position);if(e&&35===i)do{i=t.input.charCodeAt(++t.position)}while(10!==i&&13!==i&&0!==i);if(!ge(i))break;for(Oe(t),i=t.input.charCodeAt(t.position),n++,t.lineIndent=0;32===i;)t.lineIndent++,i=t.input.charCodeAt(++t.position)}return-1!==r&&0!==n&&t.lineIndent<r&&Ie(t,"deficient indentation"),n}function ke(t){var e,r=t.position;return!(45!==(e=t.input.charCodeAt(r))&&46!==e||e!==t.input.charCodeAt(r+1)||e!==t.input.charCodeAt(r+2)||(r+=3,0!==(e=t.input.charCodeAt(r))&&!we(e)))}function Ue(t,e){1===e?t.result+=" ":e>1&&(t.result+=yt.repeat("\n",e-1))}function Re(t,e){var r,n,i=t.tag,o=t.anchor,s=[],u=!1;if(-1!==t.firstTabInLine)return!1;for(null!==t.anchor&&(t.anchorMap[t.anchor]=s),n=t.input.charCodeAt(t.position);0!==n&&(-1!==t.firstTabInLine&&(t.position=t.firstTabInLine,De(t,"tab characters must not be used in indentation")),45===n)&&we(t.input.charCodeAt(t.position+1));)if(u=!0,t.position++,ze(t,!0,-1)&&t.lineIndent<=e)s.push(null),n=t.input.charCodeAt(t.position);else if(r=t.line,Pe(t,e,oe,!1,!0),s.push(t.result),ze(t,!0,-1),n=t.input.charCodeAt(t.position),(t.line===r||t.lineIndent>e)&&0!==n)De(t,"bad indentation of a sequence entry");else if(t.lineIndent<e)break;return!!u&&(t.tag=i,t.anchor=o,t.kind="sequence",t.result=s,!0)}function Ye(t){var e,r,n,i,o=!1,s=!1;if(33!==(i=t.input.charCodeAt(t.position)))return!1;if(null!==t.tag&&De(t,"duplication of a tag property"),60===(i=t.input.charCodeAt(++t.position))?(o=!0,i=t.input.charCodeAt(++t.position)):33===i?(s=!0,r="!!",i=t.input.charCodeAt(++t.position)):r="!",e=t.position,o){do{i=t.input.charCodeAt(++t.position)}while(0!==i&&62!==i);t.position<t.length?(n=t.input.slice(e,t.position),i=t.input.charCodeAt(++t.position)):De(t,"unexpected end of the stream within a verbatim tag")}else{for(;0!==i&&!we(i);)33===i&&(s?De(t,"tag suffix cannot contain exclamation marks"):(r=t.input.slice(e-1,t.position+1),pe.test(r)||De(t,"named tag handle cannot contain such characters"),s=!0,e=t.position+1)),i=t.input.charCodeAt(++t.position);n=t.input.slice(e,t.position),he.test(n)&&De(t,"tag suffix cannot contain flow indicator characters")}n&&!de.test(n)&&De(t,"tag name cannot contain such characters: "+n);try{n=decodeURIComponent(n)}catch(e){De(t,"tag name is malformed: "+n)}return o?t.tag=n:re.call(t.tagMap,r)?t.tag=t.tagMap[r]+n:"!"===r?t.tag="!"+n:"!!"===r?t.tag="tag:yaml.org,2002:"+n:De(t,'undeclared tag handle "'+r+'"'),!0}function Be(t){var e,r;if(38!==(r=t.input.charCodeAt(t.position)))return!1;for(null!==t.anchor&&De(t,"duplication of an anchor property"),r=t.input.charCodeAt(++t.position),e=t.position;0!==r&&!we(r)&&!Me(r);)r=t.input.charCodeAt(++t.position);return t.position===e&&De(t,"name of an anchor node must contain at least one character"),t.anchor=t.input.slice(e,t.position),!0}function Pe(t,e,r,n,i){var o,s,u,a,c,f,l,h,p,d=1,y=!1,g=!1;if(null!==t.listener&&t.listener("open",t),t.tag=null,t.anchor=null,t.kind=null,t.result=null,o=s=u=se===r||oe===r,n&&ze(t,!0,-1)&&(y=!0,t.lineIndent>e?d=1:t.lineIndent===e?d=0:t.lineIndent<e&&(d=-1)),1===d)for(;Ye(t)||Be(t);)ze(t,!0,-1)?(y=!0,u=o,t.lineIndent>e?d=1:t.lineIndent===e?d=0:t.lineIndent<e&&(d=-1)):u=!1;if(u&&(u=y||i),1!==d&&se!==r||(h=ne===r||ie===r?e:e+1,p=t.position-t.lineStart,1===d?u&&(Re(t,p)||function(t,e,r){var n,i,o,s,u,a,c,f=t.tag,l=t.anchor,h={},p=Object.create(null),d=null,y=null,g=null,v=!1,w=!1;if(-1!==t.firstTabInLine)return!1;for(null!==t.anchor&&(t.anchorMap[t.anchor]=h),c=t.input.charCodeAt(t.position);0!==c;){if(v||-1===t.firstTabInLine||(t.position=t.firstTabInLine,De(t,"tab characters must not be used in indentation")),n=t.input.charCodeAt(t.position+1),o=t.line,63!==c&&58!==c||!we(n)){if(s=t.line,u=t.lineStart,a=t.position,!Pe(t,r,ie,!1,!0))break;if(t.line===o){for(c=t.input.charCodeAt(t.position);ve(c);)c=t.input.charCodeAt(++t.position);if(58===c)we(c=t.input.charCodeAt(++t.position))||De(t,"a whitespace character is expected after the key-value separator within a block mapping"),v&&(Te(t,h,p,d,y,null,s,u,a),d=y=g=null),w=!0,v=!1,i=!1,d=t.tag,y=t.result;else{if(!w)return t.tag=f,t.anchor=l,!0;De(t,"can not read an implicit mapping pair; a colon is missed")}}else{if(!w)return t.tag=f,t.anchor=l,!0;De(t,"can not read a block mapping entry; a multiline key may not be an implicit key")}}else 63===c?(v&&(Te(t,h,p,d,y,null,s,u,a),d=y=g=null),w=!0,v=!0,i=!0):v?(v=!1,i=!0):De(t,"incomplete explicit mapping pair; a key node is missed; or followed by a non-tabulated empty line"),t.position+=1,c=n;if((t.line===o||t.lineIndent>e)&&(v&&(s=t.line,u=t.lineStart,a=t.position),Pe(t,e,se,!0,i)&&(v?y=t.result:g=t.result),v||(Te(t,h,p,d,y,g,s,u,a),d=y=g=null),ze(t,!0,-1),c=t.input.charCodeAt(t.position)),(t.line===o||t.lineIndent>e)&&0!==c)De(t,"bad indentation of a mapping entry");else if(t.lineIndent<e)break}return v&&Te(t,h,p,d,y,null,s,u,a),w&&(t.tag=f,t.anchor=l,t.kind="mapping",t.result=h),w}(t,p,h))||function(t,e){var r,n,i,o,s,u,a,c,f,l,h,p,d=!0,y=t.tag,g=t.anchor,v=Object.create(null);if(91===(p=t.input.charCodeAt(t.position)))s=93,c=!1,o=[];else{if(123!==p)return!1;s=125,c=!0,o={}}for(null!==t.anchor&&(t.anchorMap[t.anchor]=o),p=t.input.charCodeAt(++t.position);0!==p;){if(ze(t,!0,e),(p=t.input.charCodeAt(t.position))===s)return t.position++,t.tag=y,t.anchor=g,t.kind=c?"mapping":"sequence",t.result=o,!0;d?44===p&&De(t,"expected the node content, but found ','"):De(t,"missed comma between flow collection entries"),h=null,u=a=!1,63===p&&we(t.input.charCodeAt(t.position+1))&&(u=a=!0,t.position++,ze(t,!0,e)),r=t.line,n=t.lineStart,i=t.position,Pe(t,e,ne,!1,!0),l=t.tag,f=t.result,ze(t,!0,e),p=t.input.charCodeAt(t.position),!a&&t.line!==r||58!==p||(u=!0,p=t.input.charCodeAt(++t.position),ze(t,!0,e),Pe(t,e,ne,!1,!0),h=t.result),c?Te(t,o,v,l,f,h,r,n,i):u?o.push(Te(t,null,v,l,f,h,r,n,i)):o.push(f),ze(t,!0,e),44===(p=t.input.charCodeAt(t.position))?(d=!0,p=t.input.charCodeAt(++t.position)):d=!1}De(t,"unexpected end of the stream within a flow collection")}(t,h)?g=!0:(s&&function(t,e){var r,n,i,o,s,u=ue,a=!1,c=!1,f=e,l=0,h=!1;if(124===(o=t.input.charCodeAt(t.position)))n=!1;else{if(62!==o)return!1;n=!0}for(t.kind="scalar",t.result="";0!==o;)if(43===(o=t.input.charCodeAt(++t.position))||45===o)ue===u?u=43===o?ce:ae:De(t,"repeat of a chomping mode identifier");else{if(!((i=48<=(s=o)&&s<=57?s-48:-1)>=0))break;0===i?De(t,"bad explicit indentation width of a block scalar; it cannot be less than one"):c?De(t,"repeat of an indentation width identifier"):(f=e+i-1,c=!0)}if(ve(o)){do{o=t.input.charCodeAt(++t.position)}while(ve(o));if(35===o)do{o=t.input.charCodeAt(++t.position)}while(!ge(o)&&0!==o)}for(;0!==o;){for(Oe(t),t.lineIndent=0,o=t.input.charCodeAt(t.position);(!c||t.lineIndent<f)&&32===o;)t.lineIndent++,o=t.input.charCodeAt(++t.position);if(!c&&t.lineIndent>f&&(f=t.lineIndent),ge(o))l++;else{if(t.lineIndent<f){u===ce?t.result+=yt.repeat("\n",a?1+l:l):u===ue&&a&&(t.result+="\n");break}for(n?ve(o)?(h=!0,t.result+=yt.repeat("\n",a?1+l:l)):h?(h=!1,t.result+=yt.repeat("\n",l+1)):0===l?a&&(t.result+=" "):t.result+=yt.repeat("\n",l):t.result+=yt.repeat("\n",a?1+l:l),a=!0,c=!0,l=0,r=t.position;!ge(o)&&0!==o;)o=t.input.charCodeAt(++t.position);Ae(t,r,t.position,!1)}}return!0}(t,h)||function(t,e){var r,n,i;if(39!==(r=t.input.charCodeAt(t.position)))return!1;for(t.kind="scalar",t.result="",t.position++,n=i=t.position;0!==(r=t.input.charCodeAt(t.position));)if(39===r){if(Ae(t,n,t.position,!0),39!==(r=t.input.charCodeAt(++t.position)))return!0;n=t.position,t.position++,i=t.position}else ge(r)?(Ae(t,n,i,!0),Ue(t,ze(t,!1,e)),n=i=t.position):t.position===t.lineStart&&ke(t)?De(t,"unexpected end of the document within a single quoted scalar"):(t.position++,i=t.position);De(t,"unexpected end of the stream within a single quoted scalar")}(t,h)||function(t,e){var r,n,i,o,s,u,a;if(34!==(u=t.input.charCodeAt(t.position)))return!1;for(t.kind="scalar",t.result="",t.position++,r=n=t.position;0!==(u=t.input.charCodeAt(t.position));){if(34===u)return Ae(t,r,t.position,!0),t.position++,!0;if(92===u){if(Ae(t,r,t.position,!0),ge(u=t.input.charCodeAt(++t.position)))ze(t,!1,e);else if(u<256&&be[u])t.result+=xe[u],t.position++;else if((s=120===(a=u)?2:117===a?4:85===a?8:0)>0){for(i=s,o=0;i>0;i--)(s=Le(u=t.input.charCodeAt(++t.position)))>=0?o=(o<<4)+s:De(t,"expected hexadecimal character");t.result+=me(o),t.position++}else De(t,"unknown escape sequence");r=n=t.position}else ge(u)?(Ae(t,r,n,!0),Ue(t,ze(t,!1,e)),r=n=t.position):t.position===t.lineStart&&ke(t)?De(t,"unexpected end of the document within a double quoted scalar"):(t.position++,n=t.position)}De(t,"unexpected end of the stream within a double quoted scalar")}(t,h)?g=!0:!function(t){var e,r,n;if(42!==(n=t.input.charCodeAt(t.position)))return!1;for(n=t.input.charCodeAt(++t.position),e=t.position;0!==n&&!we(n)&&!Me(n);)n=t.input.charCodeAt(++t.position);return t.position===e&&De(t,"name of an alias node must contain at least one character"),r=t.input.slice(e,t.position),re.call(t.anchorMap,r)||De(t,'unidentified alias "'+r+'"'),t.result=t.anchorMap[r],ze(t,!0,-1),!0}(t)?function(t,e,r){var n,i,o,s,u,a,c,f,l=t.kind,h=t.result;if(we(f=t.input.charCodeAt(t.position))||Me(f)||35===f||38===f||42===f||33===f||124===f||62===f||39===f||34===f||37===f||64===f||96===f)return!1;if((63===f||45===f)&&(we(n=t.input.charCodeAt(t.position+1))||r&&Me(n)))return!1;for(t.kind="scalar",t.result="",i=o=t.position,s=!1;0!==f;){if(58===f){if(we(n=t.input.charCodeAt(t.position+1))||r&&Me(n))break}else if(35===f){if(we(t.input.charCodeAt(t.position-1)))break}else{if(t.position===t.lineStart&&ke(t)||r&&Me(f))break;if(ge(f)){if(u=t.line,a=t.lineStart,c=t.lineIndent,ze(t,!1,-1),t.lineIndent>=e){s=!0,f=t.input.charCodeAt(t.position);continue}t.position=o,t.line=u,t.lineStart=a,t.lineIndent=c;break}}s&&(Ae(t,i,o,!1),Ue(t,t.line-u),i=o=t.position,s=!1),ve(f)||(o=t.position+1),f=t.input.charCodeAt(++t.position)}return Ae(t,i,o,!1),!!t.result||(t.kind=l,t.result=h,!1)}(t,h,ne===r)&&(g=!0,null===t.tag&&(t.tag="?")):(g=!0,null===t.tag&&null===t.anchor||De(t,"alias node should not have any properties")),null!==t.anchor&&(t.anchorMap[t.anchor]=t.result)):0===d&&(g=u&&Re(t,p))),null===t.tag)null!==t.anchor&&(t.anchorMap[t.anchor]=t.result);else if("?"===t.tag){for(null!==t.result&&"scalar"!==t.kind&&De(t,'unacceptable node kind for !<?> tag; it should be "scalar", not "'+t.kind+'"'),a=0,c=t.implicitTypes.length;a<c;a+=1)if((l=t.implicitTypes[a]).resolve(t.result)){t.result=l.construct(t.result),t.tag=l.tag,null!==t.anchor&&(t.anchorMap[t.anchor]=t.result);break}}else if("!"!==t.tag){if(re.call(t.typeMap[t.kind||"fallback"],t.tag))l=t.typeMap[t.kind||"fallback"][t.tag];else for(l=null,a=0,c=(f=t.typeMap.multi[t.kind||"fallback"]).length;a<c;a+=1)if(t.tag.slice(0,f[a].tag.length)===f[a].tag){l=f[a];break}l||De(t,"unknown tag !<"+t.tag+">"),null!==t.result&&l.kind!==t.kind&&De(t,"unacceptable node kind for !<"+t.tag+'> tag; it should be "'+l.kind+'", not "'+t.kind+'"'),l.resolve(t.result,t.tag)?(t.result=l.construct(t.result,t.tag),null!==t.anchor&&(t.anchorMap[t.anchor]=t.result)):De(t,"cannot resolve a node with !<"+t.tag+"> explicit tag")}return null!==t.listener&&t.listener("close",t),null!==t.tag||null!==t.anchor||g}function Qe(t){var e,r,n,i,o=t.position,s=!1;for(t.version=null,t.checkLineBreaks=t.legacy,t.tagMap=Object.create(null),t.anchorMap=Object.create(null);0!==(i=t.input.charCodeAt(t.position))&&(ze(t,!0,-1),i=t.input.charCodeAt(t.position),!(t.lineIndent>0||37!==i));){for(s=!0,i=t.input.charCodeAt(++t.position),e=t.position;0!==i&&!we(i);)i=t.input.charCodeAt(++t.position);for(n=[],(r=t.input.slice(e,t.position)).length<1&&De(t,"directive name must not be less than one character in length");0!==i;){for(;ve(i);)i=t.input.charCodeAt(++t.position);if(35===i){do{i=t.input.charCodeAt(++t.position)}while(0!==i&&!ge(i));break}if(ge(i))break;for(e=t.position;0!==i&&!we(i);)i=t.input.charCodeAt(++t.position);n.push(t.input.slice(e,t.position))}0!==i&&Oe(t),re.call(Ee,r)?Ee[r](t,r,n):Ie(t,'unknown document directive "'+r+'"')}ze(t,!0,-1),0===t.lineIndent&&45===t.input.charCodeAt(t.position)&&45===t.input.charCodeAt(t.position+1)&&45===t.input.charCodeAt(t.position+2)?(t.position+=3,ze(t,!0,-1)):s&&De(t,"directives end mark is expected"),Pe(t,t.lineIndent-1,se,!1,!0),ze(t,!0,-1),t.checkLineBreaks&&le.test(t.input.slice(o,t.position))&&Ie(t,"non-ASCII line breaks are interpreted as content"),t.documents.push(t.result),t.position===t.lineStart&&ke(t)?46===t.input.charCodeAt(t.position)&&(t.position+=3,ze(t,!0,-1)):t.position<t.length-1&&De(t,"end of the stream or a document separator is expected")}function Fe(t,e){e=e||{},0!==(t=String(t)).length&&(10!==t.charCodeAt(t.length-1)&&13!==t.charCodeAt(t.length-1)&&(t+="\n"),65279===t.charCodeAt(0)&&(t=t.slice(1)));var r=new Ne(t,e),n=t.indexOf("\0");for(-1!==n&&(r.position=n,De(r,"null byte is not allowed in input")),r.input+="\0";32===r.input.charCodeAt(r.position);)r.lineIndent+=1,r.position+=1;for(;r.position<r.length-1;)Qe(r);return r.documents}var Ge={loadAll:function(t,e,r){null!==e&&"object"==typeof e&&void 0===r&&(r=e,e=null);var n=Fe(t,r);if("function"!=typeof e)return n;for(var i=0,o=n.length;i<o;i+=1)e(n[i])},load:function(t,e){var r=Fe(t,e);if(0!==r.length){if(1===r.length)return r[0];throw new wt("expected a single document in the stream, but found more")}}},We=Object.prototype.toString,qe=Object.prototype.hasOwnProperty,He=65279,Je=9,$e=10,Ze=13,Ve=32,Xe=33,Ke=34,tr=35,er=37,rr=38,nr=39,ir=42,or=44,sr=45,ur=58,ar=61,cr=62,fr=63,lr=64,hr=91,pr=93,dr=96,yr=123,gr=124,vr=125,wr={0:"\\0",7:"\\a",8:"\\b",9:"\\t",10:"\\n",11:"\\v",12:"\\f",13:"\\r",27:"\\e",34:'\\"',92:"\\\\",133:"\\N",160:"\\_",8232:"\\L",8233:"\\P"},Mr=["y","Y","yes","Yes","YES","on","On","ON","n","N","no","No","NO","off","Off","OFF"],Lr=/^[-+]?[0-9_]+(?::[0-9_]+)+(?:\.[0-9_]*)?$/;function _r(t){var e,r,n;if(e=t.toString(16).toUpperCase(),t<=255)r="x",n=2;else if(t<=65535)r="u",n=4;else{if(!(t<=4294967295))throw new wt("code point within a string may not be greater than 0xFFFFFFFF");r="U",n=8}return"\\"+r+yt.repeat("0",n-e.length)+e}var mr=1,br=2;function xr(t){this.schema=t.schema||ee,this.indent=Math.max(1,t.indent||2),this.noArrayIndent=t.noArrayIndent||!1,this.skipInvalid=t.skipInvalid||!1,this.flowLevel=yt.isNothing(t.flowLevel)?-1:t.flowLevel,this.styleMap=function(t,e){var r,n,i,o,s,u,a;if(null===e)return{};for(r={},i=0,o=(n=Object.keys(e)).length;i<o;i+=1)s=n[i],u=String(e[s]),"!!"===s.slice(0,2)&&(s="tag:yaml.org,2002:"+s.slice(2)),(a=t.compiledTypeMap.fallback[s])&&qe.call(a.styleAliases,u)&&(u=a.styleAliases[u]),r[s]=u;return r}(this.schema,t.styles||null),this.sortKeys=t.sortKeys||!1,this.lineWidth=t.lineWidth||80,this.noRefs=t.noRefs||!1,this.noCompatMode=t.noCompatMode||!1,this.condenseFlow=t.condenseFlow||!1,this.quotingType='"'===t.quotingType?br:mr,this.forceQuotes=t.forceQuotes||!1,this.replacer="function"==typeof t.replacer?t.replacer:null,this.implicitTypes=this.schema.compiledImplicit,this.explicitTypes=this.schema.compiledExplicit,this.tag=null,this.result="",this.duplicates=[],this.usedDuplicates=null}function jr(t,e){for(var r,n=yt.repeat(" ",e),i=0,o=-1,s="",u=t.length;i<u;)-1===(o=t.indexOf("\n",i))?(r=t.slice(i),i=u):(r=t.slice(i,o+1),i=o+1),r.length&&"\n"!==r&&(s+=n),s+=r;return s}function Nr(t,e){return"\n"+yt.repeat(" ",t.indent*e)}function Sr(t){return t===Ve||t===Je}function Dr(t){return 32<=t&&t<=126||161<=t&&t<=55295&&8232!==t&&8233!==t||57344<=t&&t<=65533&&t!==He||65536<=t&&t<=1114111}function Ir(t){return Dr(t)&&t!==He&&t!==Ze&&t!==$e}function Er(t,e,r){var n=Ir(t),i=n&&!Sr(t);return(r?n:n&&t!==or&&t!==hr&&t!==pr&&t!==yr&&t!==vr)&&t!==tr&&!(e===ur&&!i)||Ir(e)&&!Sr(e)&&t===tr||e===ur&&i}function Ar(t,e){var r,n=t.charCodeAt(e);return n>=55296&&n<=56319&&e+1<t.length&&(r=t.charCodeAt(e+1))>=56320&&r<=57343?1024*(n-55296)+r-56320+65536:n}function Cr(t){return/^\n* /.test(t)}var Tr=1,Or=2,zr=3,kr=4,Ur=5;function Rr(t,e,r,n,i,o,s,u){var a,c,f=0,l=null,h=!1,p=!1,d=-1!==n,y=-1,g=Dr(c=Ar(t,0))&&c!==He&&!Sr(c)&&c!==sr&&c!==fr&&c!==ur&&c!==or&&c!==hr&&c!==pr&&c!==yr&&c!==vr&&c!==tr&&c!==rr&&c!==ir&&c!==Xe&&c!==gr&&c!==ar&&c!==cr&&c!==nr&&c!==Ke&&c!==er&&c!==lr&&c!==dr&&function(t){return!Sr(t)&&t!==ur}(Ar(t,t.length-1));if(e||s)for(a=0;a<t.length;f>=65536?a+=2:a++){if(!Dr(f=Ar(t,a)))return Ur;g=g&&Er(f,l,u),l=f}else{for(a=0;a<t.length;f>=65536?a+=2:a++){if((f=Ar(t,a))===$e)h=!0,d&&(p=p||a-y-1>n&&" "!==t[y+1],y=a);else if(!Dr(f))return Ur;g=g&&Er(f,l,u),l=f}p=p||d&&a-y-1>n&&" "!==t[y+1]}return h||p?r>9&&Cr(t)?Ur:s?o===br?Ur:Or:p?kr:zr:!g||s||i(t)?o===br?Ur:Or:Tr}function Yr(t,e,r,n,i){t.dump=function(){if(0===e.length)return t.quotingType===br?'""':"''";if(!t.noCompatMode&&(-1!==Mr.indexOf(e)||Lr.test(e)))return t.quotingType===br?'"'+e+'"':"'"+e+"'";var o=t.indent*Math.max(1,r),s=-1===t.lineWidth?-1:Math.max(Math.min(t.lineWidth,40),t.lineWidth-o),u=n||t.flowLevel>-1&&r>=t.flowLevel;switch(Rr(e,u,t.indent,s,(function(e){return function(t,e){var r,n;for(r=0,n=t.implicitTypes.length;r<n;r+=1)if(t.implicitTypes[r].resolve(e))return!0;return!1}(t,e)}),t.quotingType,t.forceQuotes&&!n,i)){case Tr:return e;case Or:return"'"+e.replace(/'/g,"''")+"'";case zr:return"|"+Br(e,t.indent)+Pr(jr(e,o));case kr:return">"+Br(e,t.indent)+Pr(jr(function(t,e){var r,n,i=/(\n+)([^\n]*)/g,o=(u=t.indexOf("\n"),u=-1!==u?u:t.length,i.lastIndex=u,Qr(t.slice(0,u),e)),s="\n"===t[0]||" "===t[0];var u;for(;n=i.exec(t);){var a=n[1],c=n[2];r=" "===c[0],o+=a+(s||r||""===c?"":"\n")+Qr(c,e),s=r}return o}(e,s),o));case Ur:return'"'+function(t){for(var e,r="",n=0,i=0;i<t.length;n>=65536?i+=2:i++)n=Ar(t,i),!(e=wr[n])&&Dr(n)?(r+=t[i],n>=65536&&(r+=t[i+1])):r+=e||_r(n);return r}(e)+'"';default:throw new wt("impossible error: invalid scalar style")}}()}function Br(t,e){var r=Cr(t)?String(e):"",n="\n"===t[t.length-1];return r+(n&&("\n"===t[t.length-2]||"\n"===t)?"+":n?"":"-")+"\n"}function Pr(t){return"\n"===t[t.length-1]?t.slice(0,-1):t}function Qr(t,e){if(""===t||" "===t[0])return t;for(var r,n,i=/ [^ ]/g,o=0,s=0,u=0,a="";r=i.exec(t);)(u=r.index)-o>e&&(n=s>o?s:u,a+="\n"+t.slice(o,n),o=n+1),s=u;return a+="\n",t.length-o>e&&s>o?a+=t.slice(o,s)+"\n"+t.slice(s+1):a+=t.slice(o),a.slice(1)}function Fr(t,e,r,n){var i,o,s,u="",a=t.tag;for(i=0,o=r.length;i<o;i+=1)s=r[i],t.replacer&&(s=t.replacer.call(r,String(i),s)),(Wr(t,e+1,s,!0,!0,!1,!0)||void 0===s&&Wr(t,e+1,null,!0,!0,!1,!0))&&(n&&""===u||(u+=Nr(t,e)),t.dump&&$e===t.dump.charCodeAt(0)?u+="-":u+="- ",u+=t.dump);t.tag=a,t.dump=u||"[]"}function Gr(t,e,r){var n,i,o,s,u,a;for(o=0,s=(i=r?t.explicitTypes:t.implicitTypes).length;o<s;o+=1)if(((u=i[o]).instanceOf||u.predicate)&&(!u.instanceOf||"object"==typeof e&&e instanceof u.instanceOf)&&(!u.predicate||u.predicate(e))){if(r?u.multi&&u.representName?t.tag=u.representName(e):t.tag=u.tag:t.tag="?",u.represent){if(a=t.styleMap[u.tag]||u.defaultStyle,"[object Function]"===We.call(u.represent))n=u.represent(e,a);else{if(!qe.call(u.represent,a))throw new wt("!<"+u.tag+'> tag resolver accepts not "'+a+'" style');n=u.represent[a](e,a)}t.dump=n}return!0}return!1}function Wr(t,e,r,n,i,o,s){t.tag=null,t.dump=r,Gr(t,r,!1)||Gr(t,r,!0);var u,a=We.call(t.dump),c=n;n&&(n=t.flowLevel<0||t.flowLevel>e);var f,l,h="[object Object]"===a||"[object Array]"===a;if(h&&(l=-1!==(f=t.duplicates.indexOf(r))),(null!==t.tag&&"?"!==t.tag||l||2!==t.indent&&e>0)&&(i=!1),l&&t.usedDuplicates[f])t.dump="*ref_"+f;else{if(h&&l&&!t.usedDuplicates[f]&&(t.usedDuplicates[f]=!0),"[object Object]"===a)n&&0!==Object.keys(t.dump).length?(!function(t,e,r,n){var i,o,s,u,a,c,f="",l=t.tag,h=Object.keys(r);if(!0===t.sortKeys)h.sort();else if("function"==typeof t.sortKeys)h.sort(t.sortKeys);else if(t.sortKeys)throw new wt("sortKeys must be a boolean or a function");for(i=0,o=h.length;i<o;i+=1)c="",n&&""===f||(c+=Nr(t,e)),u=r[s=h[i]],t.replacer&&(u=t.replacer.call(r,s,u)),Wr(t,e+1,s,!0,!0,!0)&&((a=null!==t.tag&&"?"!==t.tag||t.dump&&t.dump.length>1024)&&(t.dump&&$e===t.dump.charCodeAt(0)?c+="?":c+="? "),c+=t.dump,a&&(c+=Nr(t,e)),Wr(t,e+1,u,!0,a)&&(t.dump&&$e===t.dump.charCodeAt(0)?c+=":":c+=": ",f+=c+=t.dump));t.tag=l,t.dump=f||"{}"}(t,e,t.dump,i),l&&(t.dump="&ref_"+f+t.dump)):(!function(t,e,r){var n,i,o,s,u,a="",c=t.tag,f=Object.keys(r);for(n=0,i=f.length;n<i;n+=1)u="",""!==a&&(u+=", "),t.condenseFlow&&(u+='"'),s=r[o=f[n]],t.replacer&&(s=t.replacer.call(r,o,s)),Wr(t,e,o,!1,!1)&&(t.dump.length>1024&&(u+="? "),u+=t.dump+(t.condenseFlow?'"':"")+":"+(t.condenseFlow?"":" "),Wr(t,e,s,!1,!1)&&(a+=u+=t.dump));t.tag=c,t.dump="{"+a+"}"}(t,e,t.dump),l&&(t.dump="&ref_"+f+" "+t.dump));else if("[object Array]"===a)n&&0!==t.dump.length?(t.noArrayIndent&&!s&&e>0?Fr(t,e-1,t.dump,i):Fr(t,e,t.dump,i),l&&(t.dump="&ref_"+f+t.dump)):(!function(t,e,r){var n,i,o,s="",u=t.tag;for(n=0,i=r.length;n<i;n+=1)o=r[n],t.replacer&&(o=t.replacer.call(r,String(n),o)),(Wr(t,e,o,!1,!1)||void 0===o&&Wr(t,e,null,!1,!1))&&(""!==s&&(s+=","+(t.condenseFlow?"":" ")),s+=t.dump);t.tag=u,t.dump="["+s+"]"}(t,e,t.dump),l&&(t.dump="&ref_"+f+" "+t.dump));else{if("[object String]"!==a){if("[object Undefined]"===a)return!1;if(t.skipInvalid)return!1;throw new wt("unacceptable kind of an object to dump "+a)}"?"!==t.tag&&Yr(t,t.dump,e,o,c)}null!==t.tag&&"?"!==t.tag&&(u=encodeURI("!"===t.tag[0]?t.tag.slice(1):t.tag).replace(/!/g,"%21"),u="!"===t.tag[0]?"!"+u:"tag:yaml.org,2002:"===u.slice(0,18)?"!!"+u.slice(18):"!<"+u+">",t.dump=u+" "+t.dump)}return!0}function qr(t,e){var r,n,i=[],o=[];for(Hr(t,i,o),r=0,n=o.length;r<n;r+=1)e.duplicates.push(i[o[r]]);e.usedDuplicates=new Array(n)}function Hr(t,e,r){var n,i,o;if(null!==t&&"object"==typeof t)if(-1!==(i=e.indexOf(t)))-1===r.indexOf(i)&&r.push(i);else if(e.push(t),Array.isArray(t))for(i=0,o=t.length;i<o;i+=1)Hr(t[i],e,r);else for(i=0,o=(n=Object.keys(t)).length;i<o;i+=1)Hr(t[n[i]],e,r)}function Jr(t,e){return function(){throw new Error("Function yaml."+t+" is removed in js-yaml 4. Use yaml."+e+" instead, which is now safe by default.")}}const $r={Type:xt,Schema:St,FAILSAFE_SCHEMA:At,JSON_SCHEMA:Bt,CORE_SCHEMA:Pt,DEFAULT_SCHEMA:ee,load:Ge.load,loadAll:Ge.loadAll,dump:{dump:function(t,e){var r=new xr(e=e||{});r.noRefs||qr(t,r);var n=t;return r.replacer&&(n=r.replacer.call({"":n},"",n)),Wr(r,0,n,!0,!0)?r.dump+"\n":""}}.dump,YAMLException:wt,types:{binary:Ht,float:Yt,map:Et,null:Ct,pairs:Xt,set:te,timestamp:Gt,bool:Tt,int:kt,merge:Wt,omap:Zt,seq:It,str:Dt},safeLoad:Jr("safeLoad","load"),safeLoadAll:Jr("safeLoadAll","loadAll"),safeDump:Jr("safeDump","dump")};r(48764).Buffer;const Zr=t=>O().Iterable.isIterable(t);function Vr(t){return Kr(t)?Zr(t)?t.toJS():t:{}}function Xr(t){return d()(t)?t:[t]}function Kr(t){return!!t&&"object"==typeof t}function tn(t){return"function"==typeof t}const en=()=>{let t={},e=pt.location.search;if(!e)return{};if(""!=e){let r=e.substr(1).split("&");for(let e in r)Object.prototype.hasOwnProperty.call(r,e)&&(e=r[e].split("="),t[decodeURIComponent(e[0])]=e[1]&&decodeURIComponent(e[1])||"")}return t};function rn(t,e){var r;let n=arguments.length>2&&void 0!==arguments[2]?arguments[2]:()=>!0;if("object"!=typeof t||d()(t)||null===t||!e)return t;const i=w()({},t);return f()(r=g()(i)).call(r,(t=>{t===e&&n(i[t],t)?delete i[t]:i[t]=rn(i[t],e,n)})),i}class nn extends o.Component{constructor(t,e){super(t,e),a()(this,"onUrlChange",(t=>{let{target:{value:e}}=t;this.setState({url:e})})),a()(this,"loadSpec",(t=>{this.flushAuthData(),this.props.specActions.updateUrl(t),this.props.specActions.download(t)})),a()(this,"onUrlSelect",(t=>{let e=t.target.value||t.target.href;this.loadSpec(e),this.setSelectedUrl(e),t.preventDefault()})),a()(this,"downloadUrl",(t=>{this.loadSpec(this.state.url),t.preventDefault()})),a()(this,"setSearch",(t=>{let e=en();e["urls.primaryName"]=t.name;const r=`${window.location.protocol}//${window.location.host}${window.location.pathname}`;var n,i;window&&window.history&&window.history.pushState&&window.history.replaceState(null,"",`${r}?${n=e,h()(i=g()(n)).call(i,(t=>encodeURIComponent(t)+"="+encodeURIComponent(n[t]))).join("&")}`)})),a()(this,"setSelectedUrl",(t=>{const e=this.props.getConfigs().urls||[];e&&e.length&&t&&f()(e).call(e,((e,r)=>{e.url===t&&(this.setState({selectedIndex:r}),this.setSearch(e))}))})),a()(this,"onFilterChange",(t=>{let{target:{value:e}}=t;this.props.layoutActions.updateFilter(e)})),this.state={url:t.specSelectors.url(),selectedIndex:0}}UNSAFE_componentWillReceiveProps(t){this.setState({url:t.specSelectors.url()})}flushAuthData(){const{persistAuthorization:t}=this.props.getConfigs();t||this.props.authActions.restoreAuthorization({authorized:{}})}componentDidMount(){const t=this.props.getConfigs(),e=t.urls||[];if(e&&e.length){var r=this.state.selectedIndex;let n=en()["urls.primaryName"]||t["urls.primaryName"];n&&f()(e).call(e,((t,e)=>{t.name===n&&(this.setState({selectedIndex:e}),r=e)})),this.loadSpec(e[r].url)}}render(){let{getComponent:t,specSelectors:e,getConfigs:r}=this.props;const n=t("Button"),i=t("Link"),s=t("Logo");let u="loading"===e.loadingStatus();const a=["download-url-input"];"failed"===e.loadingStatus()&&a.push("failed"),u&&a.push("loading");const{urls:c}=r();let l=[],p=null;if(c){let t=[];f()(c).call(c,((e,r)=>{t.push(o.createElement("option",{key:r,value:e.url},e.name))})),l.push(o.createElement("label",{className:"select-label",htmlFor:"select"},o.createElement("span",null,"Select a definition"),o.createElement("select",{id:"select",disabled:u,onChange:this.onUrlSelect,value:c[this.state.selectedIndex].url},t)))}else p=this.downloadUrl,l.push(o.createElement("input",{className:a.join(" "),type:"text",onChange:this.onUrlChange,value:this.state.url,disabled:u})),l.push(o.createElement(n,{className:"download-url-button",onClick:this.downloadUrl},"Explore"));return o.createElement("div",{className:"topbar"},o.createElement("div",{className:"wrapper"},o.createElement("div",{className:"topbar-wrapper"},o.createElement(i,null,o.createElement(s,null)),o.createElement("form",{className:"download-url-wrapper",onSubmit:p},h()(l).call(l,((t,e)=>(0,o.cloneElement)(t,{key:e})))))))}}const on=()=>o.createElement("img",{height:"40",src:"data:image/svg+xml;base64,PHN2ZyB4bWxucz0iaHR0cDovL3d3dy53My5vcmcvMjAwMC9zdmciIHhtbG5zOnhsaW5rPSJodHRwOi8vd3d3LnczLm9yZy8xOTk5L3hsaW5rIiB2aWV3Qm94PSIwIDAgNDA3IDExNiI+DQogIDxkZWZzPg0KICAgIDxzdHlsZT4NCiAgICAgIC5jbHMtMSB7DQogICAgICAgIGNsaXAtcGF0aDogdXJsKCNjbGlwLVNXX1RNLWxvZ28tb24tZGFyayk7DQogICAgICB9DQoNCiAgICAgIC5jbHMtMiB7DQogICAgICAgIGZpbGw6ICNmZmY7DQogICAgICB9DQoNCiAgICAgIC5jbHMtMyB7DQogICAgICAgIGZpbGw6ICM4NWVhMmQ7DQogICAgICB9DQoNCiAgICAgIC5jbHMtNCB7DQogICAgICAgIGZpbGw6ICMxNzM2NDc7DQogICAgICB9DQogICAgPC9zdHlsZT4NCiAgICA8Y2xpcFBhdGggaWQ9ImNsaXAtU1dfVE0tbG9nby1vbi1kYXJrIj4NCiAgICAgIDxyZWN0IHdpZHRoPSI0MDciIGhlaWdodD0iMTE2Ii8+DQogICAgPC9jbGlwUGF0aD4NCiAgPC9kZWZzPg0KICA8ZyBpZD0iU1dfVE0tbG9nby1vbi1kYXJrIiBjbGFzcz0iY2xzLTEiPg0KICAgIDxnIGlkPSJTV19Jbi1Qcm9kdWN0IiB0cmFuc2Zvcm09InRyYW5zbGF0ZSgtMC4zMDEpIj4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5MzYiIGRhdGEtbmFtZT0iUGF0aCAyOTM2IiBjbGFzcz0iY2xzLTIiIGQ9Ik0zNTkuMTUsNzAuNjc0aC0uN1Y2Ni45OTJoLTEuMjZ2LS42aDMuMjE5di42SDM1OS4xNVoiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5MzciIGRhdGEtbmFtZT0iUGF0aCAyOTM3IiBjbGFzcz0iY2xzLTIiIGQ9Ik0zNjMuMjE3LDcwLjY3NCwzNjEuOTc1LDY3LjFoLS4wMjNxLjA1LjguMDUsMS40OTR2Mi4wODNoLS42MzZWNjYuMzkxaC45ODdsMS4xOSwzLjQwN2guMDE3bDEuMjI1LTMuNDA3aC45OXY0LjI4M0gzNjUuMVY2OC41NTZjMC0uMjEzLjAwNi0uNDkuMDE2LS44MzJzLjAyLS41NDkuMDI4LS42MjFoLS4wMjNsLTEuMjg2LDMuNTcxWiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjkzOCIgZGF0YS1uYW1lPSJQYXRoIDI5MzgiIGNsYXNzPSJjbHMtMyIgZD0iTTUwLjMyOCw5Ny42NjlBNDcuNjQyLDQ3LjY0MiwwLDEsMSw5Ny45NzEsNTAuMDI3LDQ3LjY0Miw0Ny42NDIsMCwwLDEsNTAuMzI4LDk3LjY2OVoiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5MzkiIGRhdGEtbmFtZT0iUGF0aCAyOTM5IiBjbGFzcz0iY2xzLTMiIGQ9Ik01MC4zMjgsNC43NjlBNDUuMjU4LDQ1LjI1OCwwLDEsMSw1LjA3LDUwLjAyNyw0NS4yNTgsNDUuMjU4LDAsMCwxLDUwLjMyOCw0Ljc2OW0wLTQuNzY5YTUwLjAyNyw1MC4wMjcsMCwxLDAsNTAuMDI3LDUwLjAyN0E1MC4wMjcsNTAuMDI3LDAsMCwwLDUwLjMyOCwwWiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk0MCIgZGF0YS1uYW1lPSJQYXRoIDI5NDAiIGNsYXNzPSJjbHMtNCIgZD0iTTMxLjgsMzMuODU0Yy0uMTU0LDEuNzEyLjA1OCwzLjQ4Mi0uMDU3LDUuMjEzYTQyLjY2NSw0Mi42NjUsMCwwLDEtLjY5Myw1LjE1Niw5LjUzLDkuNTMsMCwwLDEtNC4xLDUuODI5YzQuMDc5LDIuNjU0LDQuNTQsNi43NzEsNC44MSwxMC45NDYuMTM1LDIuMjUuMDc3LDQuNTIuMzA4LDYuNzUyLjE3MywxLjczMS44NDYsMi4xNzQsMi42MzYsMi4yMzEuNzMuMDIsMS40OCwwLDIuMzI3LDBWNzUuMzNjLTUuMjkuOS05LjY1Ny0uNi0xMC43MzQtNS4wNzlhMzAuNzYsMzAuNzYsMCwwLDEtLjY1NC01Yy0uMTE3LTEuNzg5LjA3Ni0zLjU3OC0uMDU4LTUuMzY3LS4zODYtNC45MDYtMS4wMi02LjU2LTUuNzEzLTYuNzkxdi02LjFBOS4xOTEsOS4xOTEsMCwwLDEsMjAuOSw0Ni44MmMyLjU3Ny0uMTM1LDMuNjc0LS45MjQsNC4yMzEtMy40NjNhMjkuMywyOS4zLDAsMCwwLC40ODEtNC4zMjksODIuMSw4Mi4xLDAsMCwxLC42LTguNDA2Yy42NzMtMy45ODIsMy4xMzYtNS45MDYsNy4yMzQtNi4xMzcsMS4xNTQtLjA1NywyLjMyNywwLDMuNjU1LDB2NS40NjRjLS41NTguMDM4LTEuMDM5LjExNS0xLjUzOS4xMTVDMzIuMjI2LDI5Ljk0OSwzMi4wNTIsMzEuMDg0LDMxLjgsMzMuODU0Wm02LjQwNiwxMi42NThoLS4wNzdhMy41MTUsMy41MTUsMCwxLDAtLjM0Niw3LjAyMWguMjMxYTMuNDYxLDMuNDYxLDAsMCwwLDMuNjU1LTMuMjUxVjUwLjA5YTMuNTIzLDMuNTIzLDAsMCwwLTMuNDYxLTMuNTc4Wm0xMi4wNjIsMGEzLjM3MywzLjM3MywwLDAsMC0zLjQ4MiwzLjI1MSwxLjc5LDEuNzksMCwwLDAsLjAyLjMyNywzLjMsMy4zLDAsMCwwLDMuNTc4LDMuNDQzLDMuMjYzLDMuMjYzLDAsMCwwLDMuNDQzLTMuNTU4LDMuMzA4LDMuMzA4LDAsMCwwLTMuNTU3LTMuNDYzWm0xMi4zNTEsMGEzLjU5MiwzLjU5MiwwLDAsMC0zLjY1NSwzLjQ4MkEzLjUyOSwzLjUyOSwwLDAsMCw2Mi41LDUzLjUzM2guMDM5YzEuNzY5LjMwOSwzLjU1OS0xLjQsMy42NzQtMy40NjJhMy41NzEsMy41NzEsMCwwLDAtMy42LTMuNTU5Wm0xNi45NDguMjg4Yy0yLjIzMi0uMS0zLjM0OC0uODQ2LTMuOS0yLjk2MmEyMS40NDcsMjEuNDQ3LDAsMCwxLS42MzUtNC4xMzZjLS4xNTQtMi41NzgtLjEzNS01LjE3NS0uMzA4LTcuNzUzLS40LTYuMTE3LTQuODI4LTguMjUyLTExLjI1NC03LjE5NXY1LjMxYzEuMDE5LDAsMS44MDgsMCwyLjYuMDE5LDEuMzY2LjAxOSwyLjQuNTM5LDIuNTM5LDIuMDU5LjEzNSwxLjM4NS4xMzUsMi43ODkuMjcsNC4xOTMuMjY5LDIuNzkuNDIyLDUuNjE4LjksOC4zNjlBOC43MTUsOC43MTUsMCwwLDAsNzMuNyw1MC4wNTJjLTMuNCwyLjI4OS00LjQwNiw1LjU1OS00LjU3OCw5LjIzNC0uMSwyLjUyLS4xNTQsNS4wNTktLjI4OSw3LjYtLjExNSwyLjMwOC0uOTIzLDMuMDU4LTMuMjUxLDMuMTE2LS42NTQuMDE5LTEuMjg5LjA3Ny0yLjAxOS4xMTV2NS40NDVjMS4zNjUsMCwyLjYxNi4wNzcsMy44NjYsMCwzLjg4Ni0uMjMxLDYuMjMzLTIuMTE3LDctNS44ODdBNDkuMDc5LDQ5LjA3OSwwLDAsMCw3NSw2My40Yy4xMzUtMS45MjMuMTE2LTMuODY2LjMwOC01Ljc3MS4yODktMi45ODIsMS42NTUtNC4yMTMsNC42MzYtNC40YTQuMDM3LDQuMDM3LDAsMCwwLC44MjgtLjE5MnYtNi4xYy0uNS0uMDU4LS44NDMtLjExNS0xLjIwOC0uMTM1WiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk0MSIgZGF0YS1uYW1lPSJQYXRoIDI5NDEiIGNsYXNzPSJjbHMtMiIgZD0iTTE1Mi4yNzMsNTguMTIyYTExLjIyOCwxMS4yMjgsMCwwLDEtNC4zODQsOS40MjRxLTQuMzgzLDMuMzgyLTExLjksMy4zODItOC4xNCwwLTEyLjUyNC0yLjFWNjMuN2EzMi45LDMyLjksMCwwLDAsNi4xMzcsMS44NzksMzIuMywzMi4zLDAsMCwwLDYuNTc1LjY4OXE1LjMyMiwwLDguMDE1LTIuMDJhNi42MjYsNi42MjYsMCwwLDAsMi42OTItNS42Miw3LjIyMiw3LjIyMiwwLDAsMC0uOTU0LTMuOSw4Ljg4NSw4Ljg4NSwwLDAsMC0zLjE5NC0yLjgsNDQuNjM0LDQ0LjYzNCwwLDAsMC02LjgxLTIuOTExcS02LjM4Ny0yLjI4Ni05LjEyNi01LjQxN2ExMS45NTUsMTEuOTU1LDAsMCwxLTIuNzQtOC4xNzJBMTAuMTY0LDEwLjE2NCwwLDAsMSwxMjguMDM5LDI3cTMuOTc3LTMuMTMxLDEwLjUyLTMuMTMxYTMxLDMxLDAsMCwxLDEyLjU1NSwyLjVMMTQ5LjQ1NSwzMWEyOC4zODIsMjguMzgyLDAsMCwwLTExLjAyMS0yLjM4LDEwLjY2OCwxMC42NjgsMCwwLDAtNi42MDYsMS44MTYsNS45ODQsNS45ODQsMCwwLDAtMi4zOCw1LjA0MSw3LjcyMiw3LjcyMiwwLDAsMCwuODc3LDMuOSw4LjI0Miw4LjI0MiwwLDAsMCwyLjk1OSwyLjc4NiwzNi43LDM2LjcsMCwwLDAsNi4zNzEsMi44cTcuMiwyLjU2Niw5LjkxLDUuNTFBMTAuODQsMTAuODQsMCwwLDEsMTUyLjI3Myw1OC4xMjJaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTQyIiBkYXRhLW5hbWU9IlBhdGggMjk0MiIgY2xhc3M9ImNscy0yIiBkPSJNMTg1LjI4OCw3MC4zLDE3OSw1MC4xN3EtLjU5NC0xLjg0OC0yLjIyMi04LjM5MWgtLjI1MXEtMS4yNTIsNS40NzktMi4xOTIsOC40NTNMMTY3Ljg0OSw3MC4zaC02LjAxMWwtOS4zNjEtMzQuMzE1aDUuNDQ3cTMuMzE4LDEyLjkzMSw1LjA1NywxOS42OTNhODAuMTEyLDgwLjExMiwwLDAsMSwxLjk4OCw5LjExMWguMjVxLjM0NS0xLjc4NSwxLjExMi00LjYxOHQxLjMzLTQuNDkzbDYuMjk0LTE5LjY5M2g1LjYzNWw2LjEzNywxOS42OTNhNjYuMzY5LDY2LjM2OSwwLDAsMSwyLjM3OSw5LjA0OGguMjUxYTMzLjE2MywzMy4xNjMsMCwwLDEsLjY3My0zLjQ3NXEuNTQ4LTIuMzQ3LDYuNTI4LTI1LjI2Nmg1LjM4NUwxOTEuNDU2LDcwLjNaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTQzIiBkYXRhLW5hbWU9IlBhdGggMjk0MyIgY2xhc3M9ImNscy0yIiBkPSJNMjI1LjExNSw3MC4zbC0xLjAzMy00Ljg4NWgtLjI1YTE0LjQ0NiwxNC40NDYsMCwwLDEtNS4xMTksNC4zNjgsMTUuNjA4LDE1LjYwOCwwLDAsMS02LjM3MiwxLjE0M3EtNS4xLDAtOC0yLjYzdC0yLjktNy40ODNxMC0xMC40LDE2LjYyNi0xMC45bDUuODIzLS4xODhWNDcuNnEwLTQuMDM4LTEuNzM4LTUuOTY0VDIxNi42LDM5LjcxM2EyMi42MzMsMjIuNjMzLDAsMCwwLTkuNzA2LDIuNjNsLTEuNi0zLjk3N2EyNC40MzcsMjQuNDM3LDAsMCwxLDUuNTU3LTIuMTYsMjQuMDU2LDI0LjA1NiwwLDAsMSw2LjA1OC0uNzgzcTYuMTM2LDAsOS4xLDIuNzI0dDIuOTU5LDguNzM1VjcwLjNabS0xMS43NDEtMy42NjNBMTAuNTQ5LDEwLjU0OSwwLDAsMCwyMjEsNjMuOTc3YTkuODQ1LDkuODQ1LDAsMCwwLDIuNzcxLTcuNDUxdi0zLjFsLTUuMi4yMTlxLTYuMi4yMTktOC45MzksMS45MjZhNS44LDUuOCwwLDAsMC0yLjc0LDUuMzA2LDUuMzU0LDUuMzU0LDAsMCwwLDEuNzA3LDQuMjksNy4wODEsNy4wODEsMCwwLDAsNC43NzUsMS40NzJaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTQ0IiBkYXRhLW5hbWU9IlBhdGggMjk0NCIgY2xhc3M9ImNscy0yIiBkPSJNMjY0LjYsMzUuOTg3djMuMjg3bC02LjM1Ni43NTJhMTEuMTYsMTEuMTYsMCwwLDEsMi4yNTUsNi44NTYsMTAuMTQ4LDEwLjE0OCwwLDAsMS0zLjQ0NCw4LjA0N3EtMy40NDQsMy05LjQ1NiwzYTE1LjczNCwxNS43MzQsMCwwLDEtMi44OC0uMjVRMjQxLjQsNTkuNDM4LDI0MS40LDYyLjFhMi4yNDIsMi4yNDIsMCwwLDAsMS4xNTksMi4wODIsOC40NTYsOC40NTYsMCwwLDAsMy45NzYuNjczaDYuMDc0cTUuNTczLDAsOC41NjMsMi4zNDhhOC4xNTgsOC4xNTgsMCwwLDEsMi45OSw2LjgyNSw5Ljc0Myw5Ljc0MywwLDAsMS00LjU3MSw4LjY4OHEtNC41NzIsMi45ODktMTMuMzM4LDIuOTktNi43MzIsMC0xMC4zNzktMi41YTguMDg3LDguMDg3LDAsMCwxLTMuNjQ3LTcuMDc2LDcuOTQ2LDcuOTQ2LDAsMCwxLDItNS40MTcsMTAuMjExLDEwLjIxMSwwLDAsMSw1LjYzNi0zLjEsNS40MjksNS40MjksMCwwLDEtMi4yMDctMS44NDcsNC44OSw0Ljg5LDAsMCwxLS44OTMtMi45MTIsNS41Myw1LjUzLDAsMCwxLDEtMy4yODgsMTAuNTI5LDEwLjUyOSwwLDAsMSwzLjE2Mi0yLjcyMyw5LjI3NSw5LjI3NSwwLDAsMS00LjMzNi0zLjcyNiwxMC45NDUsMTAuOTQ1LDAsMCwxLTEuNjc1LTYuMDEycTAtNS42MzQsMy4zODItOC42ODh0OS41OC0zLjA1MmExNy40MzksMTcuNDM5LDAsMCwxLDQuODUzLjYyNlpNMjM3LjIzMyw3Ni4wNjJhNC42Niw0LjY2LDAsMCwwLDIuMzQ4LDQuMjI3LDEyLjk3MywxMi45NzMsMCwwLDAsNi43MzIsMS40NHE2LjU0MywwLDkuNjktMS45NTZhNS45OTIsNS45OTIsMCwwLDAsMy4xNDctNS4zMDdxMC0yLjc4Ny0xLjcyMy0zLjg2N3QtNi40ODEtMS4wOGgtNi4yM2E4LjIwNSw4LjIwNSwwLDAsMC01LjUxLDEuNjksNi4wNDMsNi4wNDMsMCwwLDAtMS45NzMsNC44NTNabTIuODE4LTI5LjA4NmE2Ljk4NCw2Ljk4NCwwLDAsMCwyLjAzNSw1LjQ0OCw4LjEyMyw4LjEyMywwLDAsMCw1LjY2NywxLjg0N3E3LjYwOCwwLDcuNjA4LTcuMzg5LDAtNy43MzMtNy43LTcuNzMzYTcuNjI4LDcuNjI4LDAsMCwwLTUuNjM1LDEuOTcycS0xLjk3NiwxLjk3My0xLjk3NSw1Ljg1NVoiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NDUiIGRhdGEtbmFtZT0iUGF0aCAyOTQ1IiBjbGFzcz0iY2xzLTIiIGQ9Ik0yOTkuMTM2LDM1Ljk4N3YzLjI4N2wtNi4zNTYuNzUyYTExLjE2OCwxMS4xNjgsMCwwLDEsMi4yNTQsNi44NTYsMTAuMTQ1LDEwLjE0NSwwLDAsMS0zLjQ0NCw4LjA0N3EtMy40NDQsMy05LjQ1NSwzYTE1LjczNCwxNS43MzQsMCwwLDEtMi44OC0uMjVxLTMuMzIsMS43NTQtMy4zMTksNC40MTVhMi4yNDMsMi4yNDMsMCwwLDAsMS4xNTgsMi4wODIsOC40NTksOC40NTksMCwwLDAsMy45NzYuNjczaDYuMDc0cTUuNTc0LDAsOC41NjMsMi4zNDhhOC4xNTgsOC4xNTgsMCwwLDEsMi45OSw2LjgyNSw5Ljc0Myw5Ljc0MywwLDAsMS00LjU3MSw4LjY4OHEtNC41NywyLjk4OS0xMy4zMzcsMi45OS02LjczMiwwLTEwLjM3OS0yLjVhOC4wODgsOC4wODgsMCwwLDEtMy42NDgtNy4wNzYsNy45NDcsNy45NDcsMCwwLDEsMi01LjQxNywxMC4yMDcsMTAuMjA3LDAsMCwxLDUuNjM2LTMuMSw1LjQzMiw1LjQzMiwwLDAsMS0yLjIwOC0xLjg0Nyw0Ljg4OSw0Ljg4OSwwLDAsMS0uODkyLTIuOTEyLDUuNTMsNS41MywwLDAsMSwxLTMuMjg4LDEwLjUyOSwxMC41MjksMCwwLDEsMy4xNjItMi43MjMsOS4yNzEsOS4yNzEsMCwwLDEtNC4zMzYtMy43MjYsMTAuOTQ1LDEwLjk0NSwwLDAsMS0xLjY3NS02LjAxMnEwLTUuNjM0LDMuMzgxLTguNjg4dDkuNTgxLTMuMDUyYTE3LjQ0NCwxNy40NDQsMCwwLDEsNC44NTMuNjI2Wk0yNzEuNzcyLDc2LjA2MmE0LjY1OCw0LjY1OCwwLDAsMCwyLjM0OCw0LjIyNywxMi45NjksMTIuOTY5LDAsMCwwLDYuNzMxLDEuNDRxNi41NDQsMCw5LjY5MS0xLjk1NmE1Ljk5Myw1Ljk5MywwLDAsMCwzLjE0Ni01LjMwN3EwLTIuNzg3LTEuNzIyLTMuODY3dC02LjQ4MS0xLjA4aC02LjIzYTguMjA4LDguMjA4LDAsMCwwLTUuNTExLDEuNjlBNi4wNDIsNi4wNDIsMCwwLDAsMjcxLjc3Miw3Ni4wNjJabTIuODE4LTI5LjA4NmE2Ljk4NCw2Ljk4NCwwLDAsMCwyLjAzNSw1LjQ0OCw4LjEyMSw4LjEyMSwwLDAsMCw1LjY2NywxLjg0N3E3LjYwNywwLDcuNjA4LTcuMzg5LDAtNy43MzMtNy43LTcuNzMzYTcuNjI5LDcuNjI5LDAsMCwwLTUuNjM1LDEuOTcycS0xLjk3NSwxLjk3My0xLjk3NSw1Ljg1NVoiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NDYiIGRhdGEtbmFtZT0iUGF0aCAyOTQ2IiBjbGFzcz0iY2xzLTIiIGQ9Ik0zMTYuNzc4LDcwLjkyOHEtNy42MDgsMC0xMi4wMDctNC42MzR0LTQuNC0xMi44NjhxMC04LjMsNC4wODYtMTMuMTgxYTEzLjU3MywxMy41NzMsMCwwLDEsMTAuOTc0LTQuODg0QTEyLjkzOCwxMi45MzgsMCwwLDEsMzI1LjYzOCwzOS42cTMuNzYyLDQuMjQ3LDMuNzYyLDExLjJ2My4yODdIMzA1Ljc1N3EuMTU2LDYuMDQ0LDMuMDUzLDkuMTc0dDguMTU2LDMuMTMxYTI3LjYzMywyNy42MzMsMCwwLDAsMTAuOTU4LTIuMzE3djQuNjM0YTI3LjUsMjcuNSwwLDAsMS01LjIxMywxLjcwNiwyOS4yNTEsMjkuMjUxLDAsMCwxLTUuOTMzLjUxM1ptLTEuNDA5LTMxLjIxNWE4LjQ4OSw4LjQ4OSwwLDAsMC02LjU5MSwyLjY5MiwxMi40MTYsMTIuNDE2LDAsMCwwLTIuOSw3LjQ1MmgxNy45NHEwLTQuOTE2LTIuMTkxLTcuNTNhNy43MTQsNy43MTQsMCwwLDAtNi4yNTgtMi42MTRaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTQ3IiBkYXRhLW5hbWU9IlBhdGggMjk0NyIgY2xhc3M9ImNscy0yIiBkPSJNMzUwLjksMzUuMzYxYTIwLjM4LDIwLjM4LDAsMCwxLDQuMS4zNzVsLS43MjEsNC44MjJhMTcuNzEyLDE3LjcxMiwwLDAsMC0zLjc1Ny0uNDdBOS4xNDIsOS4xNDIsMCwwLDAsMzQzLjQsNDMuNDdhMTIuMzI3LDEyLjMyNywwLDAsMC0yLjk1OSw4LjQyMlY3MC4zaC01LjJWMzUuOTg3aDQuMjlsLjYsNi4zNTZoLjI1YTE1LjA3MiwxNS4wNzIsMCwwLDEsNC42LTUuMTY2LDEwLjM1NiwxMC4zNTYsMCwwLDEsNS45MTktMS44MTZaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTQ4IiBkYXRhLW5hbWU9IlBhdGggMjk0OCIgY2xhc3M9ImNscy0yIiBkPSJNMjU1Ljg1Nyw5Ni42MzhzLTMuNDMtLjM5MS00Ljg1LS4zOTFjLTIuMDU4LDAtMy4xMTEuNzM1LTMuMTExLDIuMTgsMCwxLjU2OC44ODIsMS45MzUsMy43NDgsMi43MTksMy41MjcuOTgsNC44LDEuOTExLDQuOCw0Ljc3NywwLDMuNjc1LTIuMyw1LjI2Ny01LjYxLDUuMjY3YTM1LjY4NywzNS42ODcsMCwwLDEtNS40ODctLjY2MmwuMjctMi4xOHMzLjMwNi40NDEsNS4wNDYuNDQxYzIuMDgyLDAsMy4wMzctLjkzMSwzLjAzNy0yLjcsMC0xLjQyMS0uNzU5LTEuOTEtMy4zMzEtMi41MjMtMy42MjYtLjkzLTUuMTkzLTIuMDMzLTUuMTkzLTQuOTQ4LDAtMy4zODEsMi4yMjktNC43NzYsNS41ODUtNC43NzZhMzcuMiwzNy4yLDAsMCwxLDUuMzE1LjU4N1oiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NDkiIGRhdGEtbmFtZT0iUGF0aCAyOTQ5IiBjbGFzcz0iY2xzLTIiIGQ9Ik0yNjIuOTY3LDk0LjE0SDI2Ny43bDMuNzQ4LDEzLjEwNkwyNzUuMiw5NC4xNGg0Ljc1MnYxNi43OEgyNzcuMlY5Ni40MmgtLjE0NWwtNC4xOTEsMTMuODE2aC0yLjg0MkwyNjUuODMxLDk2LjQyaC0uMTQ1djE0LjVoLTIuNzE5WiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk1MCIgZGF0YS1uYW1lPSJQYXRoIDI5NTAiIGNsYXNzPSJjbHMtMiIgZD0iTTMyMi4wNTcsOTQuMTRIMzM0LjN2Mi40MjVoLTQuNzI4VjExMC45MmgtMi43NDNWOTYuNTY1aC00Ljc3N1oiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NTEiIGRhdGEtbmFtZT0iUGF0aCAyOTUxIiBjbGFzcz0iY2xzLTIiIGQ9Ik0zNDYuMTM3LDk0LjE0YzMuMzMyLDAsNS4xMiwxLjI0OSw1LjEyLDQuMzYxLDAsMi4wMzMtLjYzNywzLjAzNy0xLjk4NCwzLjc3MiwxLjQ0NS41NjMsMi40LDEuNTkyLDIuNCwzLjksMCwzLjQzLTIuMDgxLDQuNzUyLTUuMzM5LDQuNzUyaC02LjU2NlY5NC4xNFptLTMuNjUsMi4zNTJ2NC44aDMuNmMxLjY2NiwwLDIuNC0uODMyLDIuNC0yLjQ3NCwwLTEuNjE3LS44MzMtMi4zMjctMi41LTIuMzI3Wm0wLDcuMXY0Ljk3M2gzLjdjMS42ODksMCwyLjY5NC0uNTM5LDIuNjk0LTIuNTQ4LDAtMS45MTEtMS40MjEtMi40MjUtMi43NDQtMi40MjVaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTUyIiBkYXRhLW5hbWU9IlBhdGggMjk1MiIgY2xhc3M9ImNscy0yIiBkPSJNMzU4LjQxNCw5NC4xNEgzNjl2Mi4zNzdoLTcuODY0djQuNzUxaDYuMzk0VjEwMy42aC02LjM5NHY0LjkyNEgzNjl2Mi40SDM1OC40MTRaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTUzIiBkYXRhLW5hbWU9IlBhdGggMjk1MyIgY2xhc3M9ImNscy0yIiBkPSJNMzc4Ljc0Nyw5NC4xNGg1LjQxNGw0LjE2NCwxNi43OGgtMi43NDRMMzg0LjM0MiwxMDZoLTUuNzc3bC0xLjIzOSw0LjkyM2gtMi43MTlabS4zNjEsOS40NTZoNC43MDhsLTEuNzM3LTcuMTc4aC0xLjIyNVoiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NTQiIGRhdGEtbmFtZT0iUGF0aCAyOTU0IiBjbGFzcz0iY2xzLTIiIGQ9Ik0zOTcuMSwxMDUuOTQ3djQuOTczaC0yLjcxOVY5NC4xNGg2LjM3YzMuNywwLDUuNjgzLDIuMTIsNS42ODMsNS44NDMsMCwyLjM3Ni0uOTU2LDQuNTE5LTIuNzQ0LDUuMzUybDIuNzY5LDUuNTg1SDQwMy40N2wtMi40MjYtNC45NzNabTMuNjUxLTkuNDU1SDM5Ny4xdjcuMWgzLjdjMi4wNTcsMCwyLjg0MS0xLjg1LDIuODQxLTMuNTg5LDAtMS45LS45MzQtMy41MTEtMi44OTQtMy41MTFaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTU1IiBkYXRhLW5hbWU9IlBhdGggMjk1NSIgY2xhc3M9ImNscy0yIiBkPSJNMjkwLjAxMyw5NC4xNGg1LjQxM2w0LjE2NCwxNi43OGgtMi43NDNMMjk1LjYwOCwxMDZoLTUuNzc3bC0xLjIzOSw0LjkyM2gtMi43MTlabS4zNjEsOS40NTZoNC43MDdsLTEuNzM3LTcuMTc4aC0xLjIyNVoiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NTYiIGRhdGEtbmFtZT0iUGF0aCAyOTU2IiBjbGFzcz0iY2xzLTIiIGQ9Ik0zMDguMzYyLDEwNS45NDd2NC45NzNoLTIuNzE5Vjk0LjE0aDYuMzY5YzMuNywwLDUuNjgzLDIuMTIsNS42ODMsNS44NDMsMCwyLjM3Ni0uOTU1LDQuNTE5LTIuNzQzLDUuMzUybDIuNzY4LDUuNTg1aC0yLjk4OWwtMi40MjUtNC45NzNabTMuNjUtOS40NTVoLTMuNjV2Ny4xaDMuN2MyLjA1OCwwLDIuODQxLTEuODUsMi44NDEtMy41ODlDMzE0LjksOTguMSwzMTMuOTcyLDk2LjQ5MiwzMTIuMDEyLDk2LjQ5MloiLz4NCiAgICAgIDxwYXRoIGlkPSJQYXRoXzI5NTciIGRhdGEtbmFtZT0iUGF0aCAyOTU3IiBjbGFzcz0iY2xzLTIiIGQ9Ik0xMzAuNjA2LDEwNy42NDNhMy4wMiwzLjAyLDAsMCwxLTEuMTgsMi41MzcsNS4xMTMsNS4xMTMsMCwwLDEtMy4yLjkxLDguMDMsOC4wMywwLDAsMS0zLjM3MS0uNTY0di0xLjM4M2E4Ljc5Myw4Ljc5MywwLDAsMCwxLjY1Mi41MDYsOC42NzIsOC42NzIsMCwwLDAsMS43Ny4xODYsMy41NjUsMy41NjUsMCwwLDAsMi4xNTctLjU0NCwxLjc4MywxLjc4MywwLDAsMCwuNzI1LTEuNTEyLDEuOTQ3LDEuOTQ3LDAsMCwwLS4yNTctMS4wNSwyLjM5MywyLjM5MywwLDAsMC0uODYtLjc1NCwxMi4xNzEsMTIuMTcxLDAsMCwwLTEuODMzLS43ODQsNS44NDIsNS44NDIsMCwwLDEtMi40NTYtMS40NTgsMy4yMTMsMy4yMTMsMCwwLDEtLjczOC0yLjIsMi43MzYsMi43MzYsMCwwLDEsMS4wNzEtMi4yNjcsNC40NDQsNC40NDQsMCwwLDEsMi44MzEtLjg0Myw4LjM0MSw4LjM0MSwwLDAsMSwzLjM4LjY3NWwtLjQ0NywxLjI0N2E3LjYzOSw3LjYzOSwwLDAsMC0yLjk2Ni0uNjQxLDIuODc4LDIuODc4LDAsMCwwLTEuNzc5LjQ4OSwxLjYxMiwxLjYxMiwwLDAsMC0uNjQsMS4zNTcsMi4wODEsMi4wODEsMCwwLDAsLjIzNiwxLjA0OSwyLjIzMSwyLjIzMSwwLDAsMCwuOC43NSw5Ljg3OCw5Ljg3OCwwLDAsMCwxLjcxNS43NTQsNi44LDYuOCwwLDAsMSwyLjY2NywxLjQ4MywyLjkxOSwyLjkxOSwwLDAsMSwuNzIzLDIuMDU3WiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk1OCIgZGF0YS1uYW1lPSJQYXRoIDI5NTgiIGNsYXNzPSJjbHMtMiIgZD0iTTEzNC40NDcsMTAxLjY4NnY1Ljk5MWEyLjQxMSwyLjQxMSwwLDAsMCwuNTE1LDEuNjg2LDIuMDksMi4wOSwwLDAsMCwxLjYwOS41NTYsMi42MjksMi42MjksMCwwLDAsMi4xMi0uNzkyLDQsNCwwLDAsMCwuNjctMi41ODd2LTQuODU0aDEuNHY5LjIzNkgxMzkuNmwtLjItMS4yMzloLS4wNzVhMi43OTMsMi43OTMsMCwwLDEtMS4xOTMsMS4wNDUsNCw0LDAsMCwxLTEuNzQuMzYyLDMuNTI5LDMuNTI5LDAsMCwxLTIuNTI0LS44LDMuNDA5LDMuNDA5LDAsMCwxLS44MzktMi41NjJ2LTYuMDQyWiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk1OSIgZGF0YS1uYW1lPSJQYXRoIDI5NTkiIGNsYXNzPSJjbHMtMiIgZD0iTTE0OC4yMDYsMTExLjA5YTMuOTkzLDMuOTkzLDAsMCwxLTEuNjQ3LS4zMzMsMy4xLDMuMSwwLDAsMS0xLjI1Mi0xLjAyM2gtLjFhMTIuMjY1LDEyLjI2NSwwLDAsMSwuMSwxLjUzM3YzLjhoLTEuNFYxMDEuNjg2aDEuMTM3bC4xOTQsMS4yNjRoLjA2N2EzLjI1NywzLjI1NywwLDAsMSwxLjI1Ni0xLjEsMy44MzEsMy44MzEsMCwwLDEsMS42NDMtLjMzNywzLjQxMywzLjQxMywwLDAsMSwyLjgzNiwxLjI1Niw2LjY4Myw2LjY4MywwLDAsMS0uMDE3LDcuMDU3LDMuNDIsMy40MiwwLDAsMS0yLjgxNywxLjI2NFptLS4yLTguMzg1YTIuNDgyLDIuNDgyLDAsMCwwLTIuMDQ4Ljc4NCw0LjA0MSw0LjA0MSwwLDAsMC0uNjQ5LDIuNDk0di4zMTJhNC42MjUsNC42MjUsMCwwLDAsLjY0OSwyLjc4NSwyLjQ2NywyLjQ2NywwLDAsMCwyLjA4Mi44MzksMi4xNjQsMi4xNjQsMCwwLDAsMS44NzUtLjk2OSw0LjYsNC42LDAsMCwwLC42NzgtMi42NzEsNC40MjgsNC40MjgsMCwwLDAtLjY3OC0yLjY1MSwyLjIzMiwyLjIzMiwwLDAsMC0xLjkxNS0uOTIzWiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk2MCIgZGF0YS1uYW1lPSJQYXRoIDI5NjAiIGNsYXNzPSJjbHMtMiIgZD0iTTE1OS4wMzksMTExLjA5YTMuOTkzLDMuOTkzLDAsMCwxLTEuNjQ3LS4zMzMsMy4xLDMuMSwwLDAsMS0xLjI1Mi0xLjAyM2gtLjFhMTIuMjY1LDEyLjI2NSwwLDAsMSwuMSwxLjUzM3YzLjhoLTEuNFYxMDEuNjg2aDEuMTM3bC4xOTQsMS4yNjRoLjA2N2EzLjI1NywzLjI1NywwLDAsMSwxLjI1Ni0xLjEsMy44MzEsMy44MzEsMCwwLDEsMS42NDMtLjMzNywzLjQxMywzLjQxMywwLDAsMSwyLjgzNiwxLjI1Niw2LjY4Myw2LjY4MywwLDAsMS0uMDE3LDcuMDU3LDMuNDIsMy40MiwwLDAsMS0yLjgxNywxLjI2NFptLS4yLTguMzg1YTIuNDgyLDIuNDgyLDAsMCwwLTIuMDQ4Ljc4NCw0LjA0MSw0LjA0MSwwLDAsMC0uNjQ5LDIuNDk0di4zMTJhNC42MjUsNC42MjUsMCwwLDAsLjY0OSwyLjc4NSwyLjQ2NywyLjQ2NywwLDAsMCwyLjA4Mi44MzksMi4xNjQsMi4xNjQsMCwwLDAsMS44NzUtLjk2OSw0LjYsNC42LDAsMCwwLC42NzgtMi42NzEsNC40MjgsNC40MjgsMCwwLDAtLjY3OC0yLjY1MSwyLjIzMiwyLjIzMiwwLDAsMC0xLjkxMS0uOTIzWiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk2MSIgZGF0YS1uYW1lPSJQYXRoIDI5NjEiIGNsYXNzPSJjbHMtMiIgZD0iTTE3My42MTIsMTA2LjNhNS4wOTMsNS4wOTMsMCwwLDEtMS4xMzcsMy41MjcsNC4wMDUsNC4wMDUsMCwwLDEtMy4xNDMsMS4yNjgsNC4xNzIsNC4xNzIsMCwwLDEtMi4yLS41ODEsMy44NCwzLjg0LDAsMCwxLTEuNDgzLTEuNjY5LDUuOCw1LjgsMCwwLDEtLjUyMi0yLjU0NSw1LjA4Nyw1LjA4NywwLDAsMSwxLjEyOS0zLjUxOCwzLjk5MSwzLjk5MSwwLDAsMSwzLjEzNS0xLjI2LDMuOTA3LDMuOTA3LDAsMCwxLDMuMDgsMS4yOSw1LjA3MSw1LjA3MSwwLDAsMSwxLjE0MSwzLjQ4OFptLTcuMDM2LDBhNC4zODQsNC4zODQsMCwwLDAsLjcwOCwyLjcsMi44MDksMi44MDksMCwwLDAsNC4xNjcsMCw0LjM2NSw0LjM2NSwwLDAsMCwuNzEyLTIuNyw0LjI5Myw0LjI5MywwLDAsMC0uNzEyLTIuNjc1LDIuNSwyLjUsMCwwLDAtMi4xLS45MTUsMi40NjEsMi40NjEsMCwwLDAtMi4wNzIuOSw0LjMzNCw0LjMzNCwwLDAsMC0uNywyLjY5WiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk2MiIgZGF0YS1uYW1lPSJQYXRoIDI5NjIiIGNsYXNzPSJjbHMtMiIgZD0iTTE4MC41MjUsMTAxLjUxN2E1LjUwNiw1LjUwNiwwLDAsMSwxLjEuMWwtLjE5NCwxLjNhNC43ODYsNC43ODYsMCwwLDAtMS4wMTEtLjEyNywyLjQ2LDIuNDYsMCwwLDAtMS45MTcuOTExLDMuMzE4LDMuMzE4LDAsMCwwLS44LDIuMjY3djQuOTU1aC0xLjR2LTkuMjM2aDEuMTU0bC4xNiwxLjcxaC4wNjhhNC4wNTQsNC4wNTQsMCwwLDEsMS4yMzgtMS4zOSwyLjc4NywyLjc4NywwLDAsMSwxLjYtLjQ5WiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk2MyIgZGF0YS1uYW1lPSJQYXRoIDI5NjMiIGNsYXNzPSJjbHMtMiIgZD0iTTE4Ny4zNjMsMTA5LjkzNmE0LjUwNiw0LjUwNiwwLDAsMCwuNzE2LS4wNTUsNC4zODcsNC4zODcsMCwwLDAsLjU0OC0uMTE0djEuMDdhMi41LDIuNSwwLDAsMS0uNjcuMTgxLDUsNSwwLDAsMS0uOC4wNzJxLTIuNjgsMC0yLjY4LTIuODIzdi01LjQ5NGgtMS4zMjNWMTAyLjFsMS4zMjMtLjU4Mi41OS0xLjk3MmguODA5djIuMTQxaDIuNjh2MS4wODdoLTIuNjh2NS40MzVhMS44NjksMS44NjksMCwwLDAsLjQsMS4yODFBMS4zNzcsMS4zNzcsMCwwLDAsMTg3LjM2MywxMDkuOTM2WiIvPg0KICAgICAgPHBhdGggaWQ9IlBhdGhfMjk2NCIgZGF0YS1uYW1lPSJQYXRoIDI5NjQiIGNsYXNzPSJjbHMtMiIgZD0iTTE5NC41MzgsMTExLjA5YTQuMjM5LDQuMjM5LDAsMCwxLTMuMjMxLTEuMjQ3LDQuODI0LDQuODI0LDAsMCwxLTEuMTg0LTMuNDYzLDUuMzU1LDUuMzU1LDAsMCwxLDEuMS0zLjU0OCwzLjY1MiwzLjY1MiwwLDAsMSwyLjk1NC0xLjMxNSwzLjQ4NCwzLjQ4NCwwLDAsMSwyLjc0NywxLjE0Miw0LjM3OCw0LjM3OCwwLDAsMSwxLjAxMSwzLjAxM3YuODg1aC02LjM2MmEzLjY2LDMuNjYsMCwwLDAsLjgyMiwyLjQ2OSwyLjg0MywyLjg0MywwLDAsMCwyLjIuODQzLDcuNDMxLDcuNDMxLDAsMCwwLDIuOTQ5LS42MjR2MS4yNDdhNy4zNzcsNy4zNzcsMCwwLDEtMS40LjQ1OSw3Ljg2Myw3Ljg2MywwLDAsMS0xLjYuMTM5Wm0tLjM3OS04LjRhMi4yODYsMi4yODYsMCwwLDAtMS43NzQuNzI1LDMuMzM3LDMuMzM3LDAsMCwwLS43NzksMi4wMDZoNC44MjhhMy4wNzIsMy4wNzIsMCwwLDAtLjU5LTIuMDI3LDIuMDc2LDIuMDc2LDAsMCwwLTEuNjg1LS43MDZaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTY1IiBkYXRhLW5hbWU9IlBhdGggMjk2NSIgY2xhc3M9ImNscy0yIiBkPSJNMjA2Ljk1MSwxMDkuNjgzaC0uMDc2YTMuMjg3LDMuMjg3LDAsMCwxLTIuOSwxLjQwNywzLjQyNywzLjQyNywwLDAsMS0yLjgxOS0xLjIzOSw1LjQ1Miw1LjQ1MiwwLDAsMS0xLjAwNi0zLjUyMiw1LjU0Miw1LjU0MiwwLDAsMSwxLjAxMS0zLjU0OCwzLjQsMy40LDAsMCwxLDIuODE0LTEuMjY0LDMuMzYxLDMuMzYxLDAsMCwxLDIuODgzLDEuMzY1aC4xMDlsLS4wNTktLjY2NS0uMDM0LS42NDlWOTcuODA5aDEuNHYxMy4xMTNoLTEuMTM4Wm0tMi44LjIzNmEyLjU1MSwyLjU1MSwwLDAsMCwyLjA3OC0uNzc5LDMuOTQ3LDMuOTQ3LDAsMCwwLC42NDQtMi41MTZ2LS4zYTQuNjM4LDQuNjM4LDAsMCwwLS42NTMtMi44LDIuNDgxLDIuNDgxLDAsMCwwLTIuMDg2LS44MzksMi4xNCwyLjE0LDAsMCwwLTEuODgzLjk1Nyw0Ljc2LDQuNzYsMCwwLDAtLjY1MywyLjcsNC41NTQsNC41NTQsMCwwLDAsLjY0OSwyLjY3MSwyLjE5NCwyLjE5NCwwLDAsMCwxLjkwNi45MDZaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTY2IiBkYXRhLW5hbWU9IlBhdGggMjk2NiIgY2xhc3M9ImNscy0yIiBkPSJNMjIwLjcxMiwxMDEuNTM0YTMuNDM1LDMuNDM1LDAsMCwxLDIuODI3LDEuMjQzLDYuNjUzLDYuNjUzLDAsMCwxLS4wMDksNy4wNTMsMy40MTcsMy40MTcsMCwwLDEtMi44MTgsMS4yNiw0LDQsMCwwLDEtMS42NDgtLjMzMywzLjA5NCwzLjA5NCwwLDAsMS0xLjI1MS0xLjAyM2gtLjFsLS4yOTUsMS4xODhoLTFWOTcuODA5aDEuNFYxMDFxMCwxLjA2OS0uMDY4LDEuOTIxaC4wNjhhMy4zMjIsMy4zMjIsMCwwLDEsMi44OTQtMS4zODdabS0uMiwxLjE3MWEyLjQ0LDIuNDQsMCwwLDAtMi4wNjQuODIyLDYuMzM4LDYuMzM4LDAsMCwwLC4wMTcsNS41NTMsMi40NjQsMi40NjQsMCwwLDAsMi4wODEuODM5LDIuMTU4LDIuMTU4LDAsMCwwLDEuOTIyLS45NCw0LjgyOCw0LjgyOCwwLDAsMCwuNjMyLTIuNyw0LjY0NSw0LjY0NSwwLDAsMC0uNjMyLTIuNjg5LDIuMjQyLDIuMjQyLDAsMCwwLTEuOTU5LS44ODVaIi8+DQogICAgICA8cGF0aCBpZD0iUGF0aF8yOTY3IiBkYXRhLW5hbWU9IlBhdGggMjk2NyIgY2xhc3M9ImNscy0yIiBkPSJNMjI1Ljc1OCwxMDEuNjg2aDEuNWwyLjAyMyw1LjI2N2EyMC4xODgsMjAuMTg4LDAsMCwxLC44MjYsMi42aC4wNjdxLjEwOS0uNDMxLjQ1OS0xLjQ3MXQyLjI4OC02LjRoMS41TDIzMC40NTIsMTEyLjJhNS4yNTMsNS4yNTMsMCwwLDEtMS4zNzgsMi4yMTIsMi45MzIsMi45MzIsMCwwLDEtMS45MzQuNjUzLDUuNjU5LDUuNjU5LDAsMCwxLTEuMjY0LS4xNDNWMTEzLjhhNC45LDQuOSwwLDAsMCwxLjAzNy4xLDIuMTM2LDIuMTM2LDAsMCwwLDIuMDU2LTEuNjE4bC41MTQtMS4zMTRaIi8+DQogICAgPC9nPg0KICA8L2c+DQo8L3N2Zz4NCg==",alt:"Swagger UI"});const sn=(t,e)=>{try{return $r.load(t)}catch(t){return e&&e.errActions.newThrownErr(new Error(t)),{}}},un="configs_update",an="configs_toggle";function cn(t,e){return{type:un,payload:{[t]:e}}}function fn(t){return{type:an,payload:t}}const ln=()=>t=>{let{getConfigs:e,authActions:r}=t;if(e().persistAuthorization){const t=localStorage.getItem("authorized");t&&r.restoreAuthorization({authorized:JSON.parse(t)})}},hn=t=>e=>{const{fn:{fetch:r}}=e;return r(t)},pn=(t,e)=>r=>{let{specActions:n}=r;if(t)return n.downloadConfig(t).then(i,i);function i(r){r instanceof Error||r.status>=400?(n.updateLoadingStatus("failedConfig"),n.updateLoadingStatus("failedConfig"),n.updateUrl(""),console.error(r.statusText+" "+t.url),e(null)):e(sn(r.text))}},dn=(t,e)=>t.getIn(d()(e)?e:[e]),yn={[un]:(t,e)=>t.merge((0,T.fromJS)(e.payload)),[an]:(t,e)=>{const r=e.payload,n=t.get(r);return t.set(r,!n)}},gn={getLocalConfig:()=>sn('---\nurl: "https://petstore.swagger.io/v2/swagger.json"\ndom_id: "#swagger-ui"\nvalidatorUrl: "https://validator.swagger.io/validator"\n')};var vn=r(47475),wn=r.n(vn),Mn=r(7287),Ln=r.n(Mn),_n=r(23101),mn=r.n(_n);const bn=console.error,xn=t=>e=>{const{getComponent:r,fn:n}=t(),i=r("ErrorBoundary"),s=n.getDisplayName(e);class u extends o.Component{render(){return o.createElement(i,{targetName:s,getComponent:r,fn:n},o.createElement(e,mn()({},this.props,this.context)))}}var a;return u.displayName=`WithErrorBoundary(${s})`,(a=e).prototype&&a.prototype.isReactComponent&&(u.prototype.mapStateToProps=e.prototype.mapStateToProps),u},jn=t=>{let{name:e}=t;return o.createElement("div",{className:"fallback"},"😱 ",o.createElement("i",null,"Could not render ","t"===e?"this component":e,", see the console."))};class Nn extends o.Component{static getDerivedStateFromError(t){return{hasError:!0,error:t}}constructor(){super(...arguments),this.state={hasError:!1,error:null}}componentDidCatch(t,e){this.props.fn.componentDidCatch(t,e)}render(){const{getComponent:t,targetName:e,children:r}=this.props;if(this.state.hasError){const r=t("Fallback");return o.createElement(r,{name:e})}return r}}Nn.defaultProps={targetName:"this component",getComponent:()=>jn,fn:{componentDidCatch:bn},children:null};const Sn=Nn,Dn=[function(){return{components:{Topbar:nn,Logo:on}}},function(){return{statePlugins:{spec:{actions:e,selectors:gn},configs:{reducers:yn,actions:t,selectors:i}}}},()=>({components:{StandaloneLayout:s}}),function(){let{componentList:t=[],fullOverride:e=!1}=arguments.length>0&&void 0!==arguments[0]?arguments[0]:{};return r=>{var n;let{getSystem:i}=r;const o=e?t:["App","BaseLayout","VersionPragmaFilter","InfoContainer","ServersContainer","SchemesContainer","AuthorizeBtnContainer","FilterContainer","Operations","OperationContainer","parameters","responses","OperationServers","Models","ModelWrapper",...t],s=Ln()(o,wn()(n=Array(o.length)).call(n,((t,e)=>{let{fn:r}=e;return r.withErrorBoundary(t)})));return{fn:{componentDidCatch:bn,withErrorBoundary:xn(i)},components:{ErrorBoundary:Sn,Fallback:jn},wrapComponents:s}}}({fullOverride:!0,componentList:["Topbar","StandaloneLayout","onlineValidatorBadge"]})]})(),n=n.default})()));
-//# sourceMappingURL=swagger-ui-standalone-preset.js.map
\ No newline at end of file
+//# sourceMappingURL=swagger-ui-standalone-preset.js.c470a4c82080.map
\ No newline at end of file